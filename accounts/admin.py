@@ -4,7 +4,9 @@ from .models import (
     Account,
     Customer,
     Mechanic,
+    MechanicStats,
     Dealership,
+    DealershipStats,
     Location,
     OTP,
     Dealer,
@@ -921,13 +923,49 @@ class DealershipAdmin(admin.ModelAdmin):
     mark_logo_for_review.short_description = "Mark logos for review"
 
 
+class MechanicStatsAdmin(admin.ModelAdmin):
+    actions = ['rebuild_stats']
+    list_display = ['mechanic', 'completed_jobs', 'avg_rating', 'review_count', 'min_charge', 'avg_response_minutes', 'boost_end', 'refreshed_at']
+    list_filter = ['refreshed_at']
+    search_fields = ['mechanic__business_name', 'mechanic__user__email']
+    readonly_fields = [field.name for field in MechanicStats._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def rebuild_stats(self, request, queryset):
+        from .ranking import rebuild_stats
+        count = rebuild_stats(Mechanic.objects.filter(pk__in=queryset.values('mechanic_id')))
+        self.message_user(request, f"Rebuilt stats for {count} mechanics.")
+    rebuild_stats.short_description = "Rebuild selected stats"
+
+
+class DealershipStatsAdmin(admin.ModelAdmin):
+    actions = ['rebuild_stats']
+    list_display = ['dealership', 'live_sale_listings', 'live_rental_listings', 'completed_orders', 'gmv', 'avg_rating', 'review_count', 'verification_completeness', 'refreshed_at']
+    list_filter = ['refreshed_at']
+    search_fields = ['dealership__business_name', 'dealership__user__email']
+    readonly_fields = [field.name for field in DealershipStats._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def rebuild_stats(self, request, queryset):
+        from .dealer_stats import rebuild_stats
+        count = rebuild_stats(Dealership.objects.filter(pk__in=queryset.values('dealership_id')))
+        self.message_user(request, f"Rebuilt stats for {count} dealerships.")
+    rebuild_stats.short_description = "Rebuild selected stats"
+
+
 # Register your models here.
 veyu_admin.register(Account, AccountsAdmin)
 veyu_admin.register(Customer)
 veyu_admin.register(Newsletter, NewsletterAdmin)
 veyu_admin.register(Mechanic, MechanicAdmin)
+veyu_admin.register(MechanicStats, MechanicStatsAdmin)
 veyu_admin.register(Location)
 veyu_admin.register(Dealer, DealershipAdmin)
+veyu_admin.register(DealershipStats, DealershipStatsAdmin)
 veyu_admin.register(OTP, OTPAdmin)
 veyu_admin.register(BusinessVerificationSubmission, BusinessVerificationSubmissionAdmin)
 
@@ -321,7 +321,9 @@ class EnhancedSignUpView(APIView):
                 }, status=status.HTTP_400_BAD_REQUEST)
             
             # Validate the social auth token
-            is_valid, provider_data = validate_social_auth_token(provider, oauth_token)
+            is_valid, provider_data = validate_social_auth_token(
+                provider, oauth_token, nonce=request.data.get('nonce')
+            )
             if not is_valid:
                 logger.warning(f"Social auth validation failed for {provider}: {provider_data.get('error')}")
                 return Response({
@@ -504,7 +506,9 @@ class EnhancedLoginView(APIView):
                     )
             else:
                 oauth_token = validated_data.get('oauth_token') or validated_data.get('access_token')
-                is_valid, provider_data = validate_social_auth_token(provider, oauth_token)
+                is_valid, provider_data = validate_social_auth_token(
+                    provider, oauth_token, nonce=validated_data.get('nonce')
+                )
                 if not is_valid:
                     logger.warning(f"Social auth validation failed for {provider}: {provider_data.get('error')}")
                     raise AuthenticationError(
@@ -190,13 +190,13 @@ def serve_verification_document(request, submission_id, document_type):
         
         # Log the access attempt
         try:
-            DocumentAccessLog.objects.create(
+            DocumentAccessLog.log_access(
                 submission=submission,
                 document_type=document_type,
-                accessed_by=user,
+                user=user,
                 access_type='view',
                 ip_address=_get_client_ip(request),
-                user_agent=request.META.get('HTTP_USER_AGENT', '')[:500]
+                user_agent=request.META.get('HTTP_USER_AGENT', '')
             )
         except Exception as log_error:
             logger.warning(f"Failed to log document access: {str(log_error)}")
@@ -2,7 +2,9 @@ from ..models import (
     Account,
     Customer,
     Dealer,
+    DealershipStats,
     Mechanic,
+    MechanicStats,
     PayoutInformation,
     Location,
     FCMDevice,
@@ -275,6 +277,7 @@ class MechanicSerializer(ModelSerializer):
     avg_rating = SerializerMethodField()
     ratings = SerializerMethodField()
     jobs_done = SerializerMethodField()
+    rating = SerializerMethodField()
 
     class Meta:
         model = Mechanic
@@ -298,7 +301,24 @@ class MechanicSerializer(ModelSerializer):
         reviews = Review.objects.filter(object_type='mechanic', related_object=obj.uuid)
         return ReviewSerializer(reviews, many=True, context=self.context).data
 
+    def _stats(self, obj):
+        # denormalized ranking profile (select_related('stats') in list views)
+        try:
+            return obj.stats
+        except MechanicStats.DoesNotExist:
+            return None
+
+    def get_rating(self, obj):
+        stats = self._stats(obj)
+        if stats is not None:
+            return stats.avg_rating
+        return obj.average_rating
+
     def get_avg_rating(self, obj):
+        stats = self._stats(obj)
+        if stats is not None:
+            return stats.avg_rating
+
         # Optimization: Use reviews from context if available
         reviews_by_mech = self.context.get('mechanic_reviews')
         if reviews_by_mech is not None:
@@ -317,6 +337,10 @@ class MechanicSerializer(ModelSerializer):
         return round(total_rating / reviews.count(), 1)
 
     def get_ratings(self, obj):
+        stats = self._stats(obj)
+        if stats is not None:
+            return stats.rating_breakdown
+
         # Optimization: Use reviews from context if available
         reviews_by_mech = self.context.get('mechanic_reviews')
         if reviews_by_mech is not None:
@@ -346,6 +370,9 @@ class MechanicSerializer(ModelSerializer):
         return avg_ratings
 
     def get_jobs_done(self, obj):
+        stats = self._stats(obj)
+        if stats is not None:
+            return stats.completed_jobs
         return obj.job_history.filter(booking_status='completed').count()
 
     def get_logo(self, obj):
@@ -363,6 +390,10 @@ class MechanicSerializer(ModelSerializer):
         return obj.get_level_display()
 
     def get_price_start(self, obj):
+        stats = self._stats(obj)
+        if stats is not None:
+            return stats.min_charge or 0
+
         # Optimization: Use prefetched services instead of a new query
         services = obj.services.all()
         if not services:
@@ -386,6 +417,11 @@ class MechanicSerializer(ModelSerializer):
         }
 
     def get_distance(self, obj):
+        # annotated in SQL by accounts.ranking
+        distance = getattr(obj, 'distance_km', None)
+        if distance is not None:
+            return f"{round(distance, 2)}km"
+
         coords = self.context.get('coords', None)
         if coords and obj.location and obj.location.lat is not None and obj.location.lng is not None:
             # if user coords is present in context and mech has set location
@@ -405,50 +441,73 @@ class MechanicSerializer(ModelSerializer):
 
 
 
-class GetDealershipSerializer(ModelSerializer):
-    logo = SerializerMethodField()
-    verification_status = SerializerMethodField()
-    account_status = SerializerMethodField()
-    services = serializers.ListField(read_only=True)  # Read-only property from model
-    extended_services = serializers.JSONField(read_only=True)
-    reviews = SerializerMethodField()
-    avg_rating = SerializerMethodField()
-    ratings = SerializerMethodField()
+class DealershipStatsSerializer(ModelSerializer):
+    live_listings = serializers.IntegerField(read_only=True)
+    response_rate = serializers.FloatField(read_only=True)
 
     class Meta:
-        model = Dealer
-        fields = [
-            'uuid', 'id', 'business_name', 'slug', 'logo',
-            'verified_phone_number', 'account_status',
-            'verified_business', 'verified_tin', 'verification_status',
-            'offers_rental', 'offers_purchase', 'offers_drivers', 'offers_trade_in',
-            'services', 'extended_services', 'reviews', 'avg_rating', 'ratings'
-        ]
+        model = DealershipStats
+        fields = (
+            'total_vehicles', 'total_listings', 'live_listings', 'live_sale_listings', 'live_rental_listings',
+            'completed_orders', 'review_count', 'avg_rating', 'response_rate', 'verification_completeness',
+        )
+
+
+class DealershipReviewsMixin:
+    """
+    Reviews for a dealership, fetched once per object and shared by
+    ``reviews``, ``avg_rating`` and ``ratings``; the aggregates come from
+    ``DealershipStats`` when the row exists (``select_related('stats')``).
+    """
+
+    def _stats(self, obj):
+        try:
+            return obj.stats
+        except DealershipStats.DoesNotExist:
+            return None
+
+    def _reviews(self, obj):
+        if not hasattr(obj, '_dealer_reviews'):
+            obj._dealer_reviews = list(
+                Review.objects.filter(object_type='dealer', related_object=obj.uuid)
+                .select_related('reviewer', 'reviewer__customer_profile').prefetch_related('rating_items')
+            )
+        return obj._dealer_reviews
+
+    def get_stats(self, obj):
+        stats = self._stats(obj)
+        return DealershipStatsSerializer(stats).data if stats is not None else None
 
     def get_reviews(self, obj):
-        reviews = Review.objects.filter(object_type='dealer', related_object=obj.uuid)
-        return ReviewSerializer(reviews, many=True, context=self.context).data
+        return ReviewSerializer(self._reviews(obj), many=True, context=self.context).data
 
     def get_avg_rating(self, obj):
-        reviews = Review.objects.filter(object_type='dealer', related_object=obj.uuid)
-        if not reviews.exists():
+        stats = self._stats(obj)
+        if stats is not None:
+            return stats.avg_rating
+
+        reviews = self._reviews(obj)
+        if not reviews:
             return 0  # Avoid division by zero
 
         total_rating = sum(review.avg_rating for review in reviews)
-        return round(total_rating / reviews.count(), 1)
+        return round(total_rating / len(reviews), 1)
 
     def get_ratings(self, obj):
-        reviews = Review.objects.filter(object_type='dealer', related_object=obj.uuid)
+        stats = self._stats(obj)
+        if stats is not None:
+            return stats.rating_breakdown
+
         ratings = {}
         
         # Aggregate ratings from all reviews
-        for review in reviews:
+        for review in self._reviews(obj):
             _ratings = review.get_ratings()  # Call method, don't reference directly
             
             for key, stars in _ratings.items():
                 if key not in ratings:
                     ratings[key] = {'total_stars': 0, 'count': 0}
-            
+                
                 ratings[key]['total_stars'] += stars
                 ratings[key]['count'] += 1
 
@@ -460,6 +519,28 @@ class GetDealershipSerializer(ModelSerializer):
 
         return avg_ratings
 
+
+class GetDealershipSerializer(DealershipReviewsMixin, ModelSerializer):
+    logo = SerializerMethodField()
+    verification_status = SerializerMethodField()
+    account_status = SerializerMethodField()
+    services = serializers.ListField(read_only=True)  # Read-only property from model
+    extended_services = serializers.JSONField(read_only=True)
+    reviews = SerializerMethodField()
+    avg_rating = SerializerMethodField()
+    ratings = SerializerMethodField()
+    stats = SerializerMethodField()
+
+    class Meta:
+        model = Dealer
+        fields = [
+            'uuid', 'id', 'business_name', 'slug', 'logo',
+            'verified_phone_number', 'account_status',
+            'verified_business', 'verified_tin', 'verification_status',
+            'offers_rental', 'offers_purchase', 'offers_drivers', 'offers_trade_in',
+            'services', 'extended_services', 'reviews', 'avg_rating', 'ratings', 'stats'
+        ]
+
     def get_logo(self, obj):
         request = self.context.get('request', None)
         if obj.logo:
@@ -475,7 +556,7 @@ class GetDealershipSerializer(ModelSerializer):
         return obj.get_verification_status_display()
 
 
-class DealershipSerializer(ModelSerializer):
+class DealershipSerializer(DealershipReviewsMixin, ModelSerializer):
     user = SerializerMethodField()
     reviews = SerializerMethodField()
     location = SimpleLocationSerializer(read_only=True)
@@ -485,6 +566,7 @@ class DealershipSerializer(ModelSerializer):
     extended_services = serializers.JSONField(read_only=True)
     listings = ListingSerializer(many=True, read_only=True)
     logo = SerializerMethodField()
+    stats = SerializerMethodField()
 
     class Meta:
         model = Dealer
@@ -493,44 +575,10 @@ class DealershipSerializer(ModelSerializer):
             "verified_phone_number", 'listings', "location", "reviews", 'logo',
             'business_name', 'slug', 'headline', 'about', 'ratings', 'services',
             'avg_rating', 'contact_email', 'contact_phone', 'offers_rental',
-            'offers_purchase', 'offers_drivers', 'offers_trade_in', 'extended_services'
+            'offers_purchase', 'offers_drivers', 'offers_trade_in', 'extended_services',
+            'stats'
         )
 
-    def get_reviews(self, obj):
-        reviews = Review.objects.filter(object_type='dealer', related_object=obj.uuid)
-        return ReviewSerializer(reviews, many=True, context=self.context).data
-
-    def get_avg_rating(self, obj):
-        reviews = Review.objects.filter(object_type='dealer', related_object=obj.uuid)
-        if not reviews.exists():
-            return 0  # Avoid division by zero
-
-        total_rating = sum(review.avg_rating for review in reviews)
-        return round(total_rating / reviews.count(), 1)
-
-    def get_ratings(self, obj):
-        reviews = Review.objects.filter(object_type='dealer', related_object=obj.uuid)
-        ratings = {}
-        
-        # Aggregate ratings from all reviews
-        for review in reviews:
-            _ratings = review.get_ratings()  # Call method, don't reference directly
-            
-            for key, stars in _ratings.items():
-                if key not in ratings:
-                    ratings[key] = {'total_stars': 0, 'count': 0}
-                
-                ratings[key]['total_stars'] += stars
-                ratings[key]['count'] += 1
-
-        # Compute average ratings per category
-        avg_ratings = {
-            key: round(value['total_stars'] / value['count'], 1)
-            for key, value in ratings.items() if value['count'] > 0
-        }
-
-        return avg_ratings
-
     def get_user(self, obj):
         account = obj.user
         return {
@@ -625,6 +673,11 @@ class LoginSerializer(Serializer):
         write_only=True,
         help_text="Alias for oauth_token"
     )
+    nonce = CharField(
+        required=False,
+        write_only=True,
+        help_text="Nonce used when requesting the identity token (Google/Apple)"
+    )
 
     class Meta:
         ref_name = 'VeyuLoginSerializer'  # Unique ref_name to avoid conflict with dj_rest_auth
@@ -8,6 +8,7 @@ from .views import (
     BusinessVerificationView,
     CartView,
     NotificationView,
+    NotificationPreferencesView,
     RegisterDeviceView,
     VerifyEmailUnauthenticatedView,
     LocationViewSet,
@@ -67,6 +68,7 @@ urlpatterns = [
     # Notifications
     path('notifications/', NotificationView.as_view(), name='notifications'),
     path('notifications/register-device/', RegisterDeviceView.as_view(), name='register-device'),
+    path('notifications/preferences/', NotificationPreferencesView.as_view(), name='notification-preferences'),
     
     # Unauthenticated email verification
     path('verify-email-unauthenticated/', VerifyEmailUnauthenticatedView.as_view(), name='verify-email-unauthenticated'),
@@ -4,6 +4,8 @@ import logging
 from datetime import timedelta
 from django.shortcuts import render, get_object_or_404
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.db import transaction
 from django.contrib.auth import authenticate, login, logout
 from rest_framework.response import Response
@@ -96,8 +98,9 @@ from listings.api.serializers import OrderSerializer
 from .filters import (
     MechanicFilter,
 )
-from feedback.models import Notification
-from feedback.api.serializers import NotificationSerializer
+from feedback import inbox
+from feedback.models import Notification, NotificationSettings
+from feedback.api.serializers import NotificationSerializer, NotificationSettingsSerializer
 from bookings.models import (ServiceBooking, )
 from bookings.api.serializers import (BookingSerializer, )
 from dj_rest_auth.jwt_auth import JWTAuthentication
@@ -1704,13 +1707,13 @@ class DocumentViewingView(APIView):
                 
                 # Log the access attempt
                 try:
-                    DocumentAccessLog.objects.create(
+                    DocumentAccessLog.log_access(
                         submission=submission,
                         document_type=document_type,
-                        accessed_by=user,
+                        user=user,
                         access_type='view',
                         ip_address=self._get_client_ip(request),
-                        user_agent=request.META.get('HTTP_USER_AGENT', '')[:500]
+                        user_agent=request.META.get('HTTP_USER_AGENT', '')
                     )
                 except Exception as log_error:
                     logger.warning(f"Failed to log document access: {str(log_error)}")
@@ -2234,98 +2237,123 @@ class RegisterDeviceView(APIView):
 
 
 class NotificationView(APIView):
+    """
+    The notification inbox.
+
+    GET lists notifications newest first with a cursor (``?cursor=``,
+    ``?limit=``, ``?unread_only=``, ``?archived=``). POST marks read or
+    archives notifications in bulk: ``action`` is ``read`` (default) or
+    ``archive``, selecting ``ids`` (or a single ``notification_id``), those
+    created up to ``before``, or with ``all`` every notification.
+    Live unread counts are pushed over the ``notifications/`` websocket.
+    """
     permission_classes = [IsAuthenticated]
     allowed_methods = ['GET', 'POST']
     serializer_class =  NotificationSerializer
 
-    def get(self, request):
-        unread_only_raw = request.GET.get('unread_only', 'false')
-        unread_only = str(unread_only_raw).lower() in ['true', '1', 'yes', 'on']
-
-        qs = Notification.objects.filter(user=request.user).order_by('-date_created')
-        unread_count = qs.filter(read=False).count()
-        if unread_only:
-            qs = qs.filter(read=False)
+    @staticmethod
+    def _flag(value, default='false'):
+        return str(value if value is not None else default).lower() in ['true', '1', 'yes', 'on']
 
-        paginator = OffsetPaginator(default_limit=50)
-        page = paginator.paginate_queryset(qs, request, view=self)
+    def get(self, request):
+        try:
+            page = inbox.get_page(
+                request.user,
+                cursor=request.GET.get('cursor'),
+                limit=request.GET.get('limit'),
+                unread_only=self._flag(request.GET.get('unread_only')),
+                archived=self._flag(request.GET.get('archived')),
+            )
+        except ValueError as e:
+            return Response({'error': True, 'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response(
             {
                 'error': False,
                 'message': '',
                 'data': {
-                    'unread_count': unread_count,
+                    'unread_count': inbox.unread_count(request.user),
                     'pagination': {
-                        'offset': paginator.offset,
-                        'limit': paginator.limit,
-                        'count': paginator.count,
-                        'next': paginator.get_next_link(),
-                        'previous': paginator.get_previous_link()
+                        'next_cursor': page['next_cursor'],
+                        'has_more': page['has_more'],
                     },
-                    'results': NotificationSerializer(page, many=True).data
+                    'results': NotificationSerializer(page['notifications'], many=True).data
                 }
             },
             200
         )
 
     def post(self, request):
-        import logging
-        logger = logging.getLogger(__name__)
-        
-        # Get notification_id from request data
-        notification_id = request.data.get('notification_id') or request.data.get('uuid')
-        
-        if not notification_id:
-            logger.error(f"Missing notification_id in request. Received data: {request.data}")
+        action = request.data.get('action', 'read')
+        if action not in ('read', 'archive'):
+            return Response({'error': True, 'message': "action must be 'read' or 'archive'"}, status=status.HTTP_400_BAD_REQUEST)
+
+        single = request.data.get('notification_id') or request.data.get('uuid')
+        ids = request.data.get('ids')
+        if single:
+            ids = [single]
+        before = request.data.get('before')
+        if before:
+            before = parse_datetime(str(before))
+            if before is None:
+                return Response({'error': True, 'message': 'before must be an ISO 8601 timestamp'}, status=status.HTTP_400_BAD_REQUEST)
+        if ids is None and not before and not self._flag(request.data.get('all')):
+            logger.error(f"Missing notification selection in request. Received data: {request.data}")
             return Response({
                 'error': True,
-                'message': 'notification_id is required',
+                'message': 'notification_id, ids, before or all is required',
                 'received_fields': list(request.data.keys())
             }, status=status.HTTP_400_BAD_REQUEST)
-        
-        try:
-            notifications = Notification.objects.filter(user=request.user).order_by('-date_created')
-            notification = notifications.get(uuid=notification_id)
-            notification.mark_as_read()
 
-            unread_only_raw = request.GET.get('unread_only', 'true')
-            unread_only = str(unread_only_raw).lower() in ['true', '1', 'yes', 'on']
-            unread_count = notifications.filter(read=False).count()
-
-            qs = notifications.filter(read=False) if unread_only else notifications
-            paginator = OffsetPaginator(default_limit=50)
-            page = paginator.paginate_queryset(qs, request, view=self)
-
-            return Response(
-                {
-                    'error': False,
-                    'message': '',
-                    'data': {
-                        'unread_count': unread_count,
-                        'pagination': {
-                            'offset': paginator.offset,
-                            'limit': paginator.limit,
-                            'count': paginator.count,
-                            'next': paginator.get_next_link(),
-                            'previous': paginator.get_previous_link()
-                        },
-                        'results': NotificationSerializer(page, many=True).data
-                    }
-                },
-                200
-            )
-        except Notification.DoesNotExist:
+        try:
+            change = inbox.archive if action == 'archive' else inbox.mark_read
+            updated = change(request.user, ids=ids, before=before or None)
+        except (ValueError, DjangoValidationError) as e:
+            return Response({'error': True, 'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if single and not updated and not Notification.objects.filter(user=request.user, uuid=single).exists():
             return Response({
                 'error': True,
                 'message': 'Notification not found'
             }, status=status.HTTP_404_NOT_FOUND)
-        except Exception as e:
-            logger.error(f"Error marking notification as read: {str(e)}", exc_info=True)
-            return Response({
-                'error': True,
-                'message': str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        return Response(
+            {
+                'error': False,
+                'message': '',
+                'data': {
+                    'updated': updated,
+                    'unread_count': inbox.unread_count(request.user),
+                }
+            },
+            200
+        )
+
+
+
+class NotificationPreferencesView(APIView):
+    """
+    GET the user's quiet hours, digest hour and the mode (instant, digest or
+    off) of every notification category on every channel. PATCH any of
+    them; ``preferences`` only needs the category/channel pairs that change.
+    """
+    permission_classes = [IsAuthenticated]
+    allowed_methods = ['GET', 'PATCH']
+    serializer_class = NotificationSettingsSerializer
+
+    def get_object(self, request):
+        settings_row, _ = NotificationSettings.objects.get_or_create(user=request.user)
+        return settings_row
+
+    def get(self, request):
+        serializer = NotificationSettingsSerializer(self.get_object(request))
+        return Response({'error': False, 'message': '', 'data': serializer.data}, 200)
+
+    def patch(self, request):
+        serializer = NotificationSettingsSerializer(self.get_object(request), data=request.data, partial=True)
+        if not serializer.is_valid():
+            return Response({'error': True, 'message': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        serializer.save()
+        return Response({'error': False, 'message': 'Notification preferences updated', 'data': serializer.data}, 200)
 
 
 
@@ -0,0 +1,213 @@
+"""
+Materialized dealership statistics.
+
+``DealershipStats`` is split into sections, each computed set-based from
+its source tables for a batch of dealerships:
+
+    listings      vehicles owned, listings, and live listings (approved,
+                  verified, vehicle available) by type
+    orders        completed and expired orders, GMV (listing price of
+                  completed orders)
+    reviews       review count, average rating and per-area breakdown
+    testdrives    test drive requests received and how many were granted
+    verification  verification completeness
+
+The signals in ``accounts.signals`` refresh only the section an event can
+affect, for one dealership, once the transaction commits. Writes that skip
+signals (``QuerySet.update()``, bulk loads, raw SQL) leave rows stale, so
+``check_drift`` recomputes everything from source and reports (and with
+``fix=True`` repairs) the rows that differ. Run it nightly with
+``manage.py check_dealership_stats``.
+"""
+import logging
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from accounts.models import Dealership, DealershipStats
+from accounts.ranking import review_aggregates
+from listings.models import Listing, Order, TestDriveRequest, Vehicle
+
+logger = logging.getLogger(__name__)
+
+
+def _listings(dealers):
+    ids = list(dealers)
+    vehicles = dict(
+        Vehicle.objects.filter(dealer_id__in=ids).order_by()
+        .values('dealer_id').annotate(total=Count('id')).values_list('dealer_id', 'total')
+    )
+    live = Q(approved=True, verified=True, vehicle__available=True)
+    listings = {
+        row['vehicle__dealer_id']: row
+        for row in Listing.objects.filter(vehicle__dealer_id__in=ids).order_by().values('vehicle__dealer_id').annotate(
+            total=Count('id'),
+            live_sale=Count('id', filter=live & Q(listing_type='sale')),
+            live_rental=Count('id', filter=live & Q(listing_type='rental')),
+        )
+    }
+    return {
+        dealer_id: {
+            'total_vehicles': vehicles.get(dealer_id, 0),
+            'total_listings': listings.get(dealer_id, {}).get('total', 0),
+            'live_sale_listings': listings.get(dealer_id, {}).get('live_sale', 0),
+            'live_rental_listings': listings.get(dealer_id, {}).get('live_rental', 0),
+        }
+        for dealer_id in ids
+    }
+
+
+def _orders(dealers):
+    ids = list(dealers)
+    completed = Q(order_status='completed')
+    rows = {
+        row['order_item__vehicle__dealer_id']: row
+        for row in Order.objects.filter(order_item__vehicle__dealer_id__in=ids).order_by()
+        .values('order_item__vehicle__dealer_id').annotate(
+            completed=Count('id', filter=completed),
+            expired=Count('id', filter=Q(order_status='expired')),
+            gmv=Sum('order_item__price', filter=completed),
+        )
+    }
+    return {
+        dealer_id: {
+            'completed_orders': rows.get(dealer_id, {}).get('completed', 0),
+            'expired_orders': rows.get(dealer_id, {}).get('expired', 0),
+            'gmv': rows.get(dealer_id, {}).get('gmv') or Decimal('0.00'),
+        }
+        for dealer_id in ids
+    }
+
+
+def _reviews(dealers):
+    ratings = review_aggregates(dealers, object_type='dealer')
+    values = {}
+    for dealer_id in dealers:
+        review_count, avg_rating, breakdown = ratings.get(dealer_id, (0, 0, {}))
+        values[dealer_id] = {'review_count': review_count, 'avg_rating': avg_rating, 'rating_breakdown': breakdown}
+    return values
+
+
+def _testdrives(dealers):
+    rows = {
+        row['requested_to_id']: row
+        for row in TestDriveRequest.objects.filter(requested_to_id__in=list(dealers)).order_by()
+        .values('requested_to_id').annotate(
+            total=Count('id'), responded=Count('id', filter=Q(granted=True) | Q(testdrive_complete=True)),
+        )
+    }
+    return {
+        dealer_id: {
+            'testdrive_requests': rows.get(dealer_id, {}).get('total', 0),
+            'testdrive_responded': rows.get(dealer_id, {}).get('responded', 0),
+        }
+        for dealer_id in dealers
+    }
+
+
+def _verification(dealers):
+    fields = ['verified_business', 'verified_tin', 'verified_location', 'cac_number', 'tin_number']
+    return {
+        dealer.pk: {'verification_completeness': dealer.verification_completeness}
+        for dealer in Dealership.objects.filter(pk__in=list(dealers)).only('pk', *fields)
+    }
+
+
+# section -> (fields, compute({dealer_id: uuid}) -> {dealer_id: {field: value}})
+SECTIONS = {
+    'listings': (['total_vehicles', 'total_listings', 'live_sale_listings', 'live_rental_listings'], _listings),
+    'orders': (['completed_orders', 'expired_orders', 'gmv'], _orders),
+    'reviews': (['review_count', 'avg_rating', 'rating_breakdown'], _reviews),
+    'testdrives': (['testdrive_requests', 'testdrive_responded'], _testdrives),
+    'verification': (['verification_completeness'], _verification),
+}
+ALL_FIELDS = [field for fields, _ in SECTIONS.values() for field in fields]
+
+
+def compute(dealers, sections=None):
+    """{dealer_id: {field: value}} recomputed from source for ``dealers`` ({id: uuid})."""
+    values = {dealer_id: {} for dealer_id in dealers}
+    for name in sections or SECTIONS:
+        for dealer_id, row in SECTIONS[name][1](dealers).items():
+            values[dealer_id].update(row)
+    return values
+
+
+def _write(values, sections=None):
+    fields = [field for name in sections or SECTIONS for field in SECTIONS[name][0]]
+    now = timezone.now()
+    DealershipStats.objects.bulk_create(
+        [DealershipStats(dealership_id=dealer_id, refreshed_at=now, **row) for dealer_id, row in values.items()],
+        update_conflicts=True, unique_fields=['dealership'], update_fields=fields + ['refreshed_at'],
+    )
+    return len(values)
+
+
+def _batches(queryset, batch_size):
+    rows = list(queryset.order_by('pk').values_list('pk', 'uuid'))
+    for start in range(0, len(rows), batch_size):
+        yield dict(rows[start:start + batch_size])
+
+
+def rebuild_stats(dealerships=None, batch_size=500):
+    """Recompute every section for ``dealerships`` (default all). Returns rows written."""
+    queryset = Dealership.objects.all() if dealerships is None else dealerships
+    return sum(_write(compute(dealers)) for dealers in _batches(queryset, batch_size))
+
+
+def refresh_stats(dealership_id, *sections):
+    """Recompute ``sections`` (default all) for one dealership; a missing row gets every section."""
+    dealers = dict(Dealership.objects.filter(pk=dealership_id).values_list('pk', 'uuid'))
+    if not dealers:
+        return 0
+    if not DealershipStats.objects.filter(dealership_id=dealership_id).exists():
+        sections = ()
+    return _write(compute(dealers, sections), sections)
+
+
+def refresh_stats_on_commit(dealership_id, *sections):
+    # robust: a failed refresh is logged and left to check_drift rather than
+    # surfacing from the commit of the write that triggered it
+    if dealership_id:
+        transaction.on_commit(lambda: refresh_stats(dealership_id, *sections), robust=True)
+
+
+def _differs(stored, expected):
+    if isinstance(expected, float) or isinstance(stored, float):
+        return round(float(stored or 0), 1) != round(float(expected or 0), 1)
+    if isinstance(expected, Decimal):
+        return Decimal(stored or 0).quantize(Decimal('0.01')) != expected.quantize(Decimal('0.01'))
+    return stored != expected
+
+
+def check_drift(fix=False, batch_size=500):
+    """
+    Compare every stored row with a fresh computation.
+
+    Returns ``[(dealership_id, field, stored, expected)]``; a missing row is
+    reported once with field ``None``. With ``fix=True`` the affected rows
+    are rewritten from source.
+    """
+    mismatches = []
+    for dealers in _batches(Dealership.objects.all(), batch_size):
+        expected = compute(dealers)
+        stored = {
+            row['dealership_id']: row
+            for row in DealershipStats.objects.filter(dealership_id__in=list(dealers)).values('dealership_id', *ALL_FIELDS)
+        }
+        stale = {}
+        for dealer_id, values in expected.items():
+            if dealer_id not in stored:
+                mismatches.append((dealer_id, None, None, None))
+                stale[dealer_id] = values
+                continue
+            for field, value in values.items():
+                if _differs(stored[dealer_id][field], value):
+                    mismatches.append((dealer_id, field, stored[dealer_id][field], value))
+                    stale[dealer_id] = values
+        if fix and stale:
+            _write(stale)
+            logger.warning(f"Repaired drifted stats for {len(stale)} dealerships")
+    return mismatches
@@ -0,0 +1,142 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import Account, Location, Mechanic
+from accounts.ranking import rebuild_stats, ranked_mechanics, within_radius
+from bookings.models import Service, ServiceBooking, ServiceOffering
+from feedback.models import Rating, Review
+from utils.location import haversine
+
+LAT, LNG = 6.5244, 3.3792  # Lagos
+AREAS = ['communication', 'support', 'service-delivery']
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Benchmark mechanic listing and ranking against a large number of mechanics. Runs inside a rolled back transaction."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mechanics', type=int, default=10_000, help='Mechanics to create (default: 10000)')
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--iterations', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options)
+                raise _Rollback()
+        except _Rollback:
+            self.stdout.write(self.style.SUCCESS("Benchmark data rolled back."))
+
+    def _seed(self, total, rng):
+        now = timezone.now()
+        accounts = Account.objects.bulk_create([
+            Account(email=f'bench-mechanic-{i}@veyu.test', first_name='Bench', last_name=f'Mechanic {i}', user_type='mechanic')
+            for i in range(total)
+        ], batch_size=2000)
+        locations = Location.objects.bulk_create([
+            Location(user=account, state='Lagos', city='Ikeja', address='1 Bench Street',
+                     lat=Decimal(f'{LAT + rng.uniform(-0.5, 0.5):.6f}'), lng=Decimal(f'{LNG + rng.uniform(-0.5, 0.5):.6f}'))
+            for account in accounts
+        ], batch_size=2000)
+        mechanics = Mechanic.objects.bulk_create([
+            Mechanic(user=account, location=location, business_name=f'Bench Repairs {i}',
+                     slug=f'bench-repairs-{i}', phone_number=f'+2349{i:09d}')
+            for i, (account, location) in enumerate(zip(accounts, locations))
+        ], batch_size=2000)
+
+        services = [Service.objects.get_or_create(title=f'Bench service {i}')[0] for i in range(3)]
+        ServiceOffering.objects.bulk_create([
+            ServiceOffering(offered_by=mechanic, service=service, charge=Decimal(rng.randrange(5000, 100000, 500)))
+            for mechanic in mechanics for service in rng.sample(services, rng.randint(1, 3))
+        ], batch_size=5000)
+
+        customer = Account.objects.create_user(
+            email='bench-customer@veyu.test', password='bench-pass-123', user_type='customer'
+        ).customer_profile
+        bookings = []
+        for mechanic in mechanics:
+            for _ in range(rng.randint(0, 6)):
+                bookings.append(ServiceBooking(
+                    customer=customer, mechanic=mechanic,
+                    booking_status=rng.choice(['completed', 'completed', 'declined', 'requested']),
+                    responded_on=now + timedelta(minutes=rng.randint(1, 600)),
+                ))
+        ServiceBooking.objects.bulk_create(bookings, batch_size=5000)
+
+        reviews = Review.objects.bulk_create([
+            Review(reviewer=customer.user, object_type='mechanic', related_object=mechanic.uuid)
+            for mechanic in mechanics for _ in range(rng.randint(0, 4))
+        ], batch_size=5000)
+        Rating.objects.bulk_create([
+            Rating(reviewId=review, area=area, stars=rng.randint(1, 5)) for review in reviews for area in AREAS
+        ], batch_size=5000)
+        return mechanics
+
+    def _run(self, options):
+        rng = random.Random(options['seed'])
+        page_size, iterations = options['page_size'], options['iterations']
+
+        started = time.perf_counter()
+        mechanics = self._seed(options['mechanics'], rng)
+        self.stdout.write(f"Seeded {len(mechanics)} mechanics in {time.perf_counter() - started:.2f}s")
+
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as ctx:
+            rebuild_stats()
+        self.stdout.write(f"rebuild_stats: {time.perf_counter() - started:.2f}s, {len(ctx.captured_queries)} queries")
+
+        base = Mechanic.objects.select_related('user', 'location', 'stats')
+        self._measure('legacy (python distance)', iterations, lambda: self._legacy_page(page_size))
+        self._measure('ranked, relevance', iterations,
+                      lambda: list(ranked_mechanics(within_radius(base, LAT, LNG), LAT, LNG)[:page_size]))
+        self._measure('ranked, distance', iterations,
+                      lambda: list(ranked_mechanics(within_radius(base, LAT, LNG), LAT, LNG, ordering='distance')[:page_size]))
+        self._measure('ranked, no coordinates', iterations, lambda: list(ranked_mechanics(base)[:page_size]))
+
+        client = Client()
+        self._measure('GET /api/v1/mechanics/', iterations,
+                      lambda: client.get(f'/api/v1/mechanics/?lat={LAT}&lng={LNG}&limit={page_size}'))
+
+    def _legacy_page(self, page_size):
+        # the previous MechanicListView: bounding box, haversine in Python,
+        # then per-mechanic counting in the serializer
+        delta = 0.3
+        rows = Mechanic.objects.select_related('location').filter(
+            location__lat__gte=LAT - delta, location__lat__lte=LAT + delta,
+            location__lng__gte=LNG - delta, location__lng__lte=LNG + delta,
+        )
+        near = [(haversine(LAT, LNG, float(m.location.lat), float(m.location.lng)), m) for m in rows]
+        near.sort(key=lambda pair: pair[0])
+        page = [m for distance, m in near if distance <= 30][:page_size]
+        for mechanic in page:
+            mechanic.job_history.filter(booking_status='completed').count()
+            list(mechanic.services.all())
+            list(Review.objects.filter(object_type='mechanic', related_object=mechanic.uuid))
+        return page
+
+    def _measure(self, label, iterations, func):
+        timings = []
+        with CaptureQueriesContext(connection) as ctx:
+            for _ in range(iterations):
+                started = time.perf_counter()
+                func()
+                timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p50 = timings[len(timings) // 2]
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(
+            f"{label:<28} p50={p50:8.2f}ms p95={p95:8.2f}ms queries/call={len(ctx.captured_queries) / iterations:.1f}"
+        )
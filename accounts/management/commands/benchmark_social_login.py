@@ -0,0 +1,45 @@
+import json
+import time
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from accounts.providers import AppleProvider, JWKSKeyCache
+
+
+class Command(BaseCommand):
+    help = "Benchmark offline Apple/Google ID token verification against a locally generated key set (no network calls)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tokens', type=int, default=5000, help='Number of distinct tokens to validate (default: 5000)')
+
+    def handle(self, *args, **options):
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+        jwk.update({'kid': 'bench', 'use': 'sig', 'alg': 'RS256'})
+
+        provider = AppleProvider()
+        provider.jwks = JWKSKeyCache('apple', 'local://bench', fetcher=lambda url, timeout: {'keys': [jwk]})
+
+        now = int(time.time())
+        tokens = [
+            jwt.encode(
+                {'iss': 'https://appleid.apple.com', 'aud': 'com.veyu.bench', 'sub': f'user-{i}',
+                 'email': f'user-{i}@veyu.test', 'iat': now, 'exp': now + 600},
+                private_key, algorithm='RS256', headers={'kid': 'bench'},
+            )
+            for i in range(options['tokens'])
+        ]
+
+        with override_settings(APPLE_CLIENT_IDS=['com.veyu.bench']):
+            started = time.perf_counter()
+            for token in tokens:
+                provider.validate_token(token)
+            elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Validated {len(tokens)} tokens in {elapsed:.2f}s "
+            f"({len(tokens) / elapsed:,.0f} validations/sec, {provider.jwks.fetch_count} JWKS fetch)"
+        ))
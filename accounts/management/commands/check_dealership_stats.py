@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.dealer_stats import check_drift, rebuild_stats
+
+
+class Command(BaseCommand):
+    help = "Compare DealershipStats with a fresh computation from source and report (or repair) drifted rows. Run nightly."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Rewrite drifted or missing rows from source')
+        parser.add_argument('--rebuild', action='store_true', help='Recompute every row without comparing first')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['rebuild']:
+            count = rebuild_stats(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Rebuilt stats for {count} dealerships in {time.perf_counter() - started:.2f}s."
+            ))
+            return
+
+        mismatches = check_drift(fix=options['fix'], batch_size=options['batch_size'])
+        suffix = " (fixed)" if options['fix'] else ""
+        for dealer_id, field, stored, expected in mismatches:
+            if field is None:
+                self.stdout.write(self.style.WARNING(f"Dealership #{dealer_id}: no stats row{suffix}"))
+            else:
+                self.stdout.write(self.style.WARNING(
+                    f"Dealership #{dealer_id}: {field} {stored!r} != {expected!r}{suffix}"
+                ))
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS(
+                f"Dealership stats match their sources ({time.perf_counter() - started:.2f}s)."
+            ))
+        else:
+            dealers = len({dealer_id for dealer_id, *_ in mismatches})
+            self.stdout.write(f"{len(mismatches)} drifted values across {dealers} dealerships.")
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.models import Mechanic
+from accounts.ranking import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized MechanicStats ranking profile for every mechanic (or the given ids)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('mechanic_ids', nargs='*', type=int, help='Only rebuild these mechanics')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        mechanics = Mechanic.objects.all()
+        if options['mechanic_ids']:
+            mechanics = mechanics.filter(pk__in=options['mechanic_ids'])
+        started = time.perf_counter()
+        count = rebuild_stats(mechanics, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt stats for {count} mechanics in {time.perf_counter() - started:.2f}s."
+        ))
@@ -18,6 +18,7 @@ from datetime import timedelta
 import hashlib
 import json
 from threading import current_thread
+from utils import audit
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
@@ -438,16 +439,33 @@ class SecurityLoggingMiddleware(MiddlewareMixin):
             )
     
     def process_response(self, request: HttpRequest, response: HttpResponse) -> HttpResponse:
-        """Log security-relevant response information."""
+        """Log security-relevant response information and record it in the audit log."""
+        
+        if not self._is_security_relevant_endpoint(request):
+            return response
+        
+        client_ip = self._get_client_ip(request)
+        failed = response.status_code in [401, 403, 423]
         
         # Log failed authentication attempts
-        if self._is_security_relevant_endpoint(request) and response.status_code in [401, 403, 423]:
-            client_ip = self._get_client_ip(request)
+        if failed:
             logger.warning(
                 f"Security alert: Failed authentication from {client_ip} "
                 f"to {request.path} (Status: {response.status_code})"
             )
         
+        audit.record(
+            'security',
+            'auth_failed' if failed else 'auth_request',
+            actor=getattr(request, 'user', None),
+            ip_address=client_ip,
+            details={
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'user_agent': request.META.get('HTTP_USER_AGENT', '')[:200],
+            },
+        )
         return response
     
     def _is_security_relevant_endpoint(self, request: HttpRequest) -> bool:
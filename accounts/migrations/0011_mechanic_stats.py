@@ -0,0 +1,41 @@
+# Generated by Django 5.1.1 on 2026-10-18 22:12
+
+import django.db.models.deletion
+import django.utils.timezone
+import utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_customer_date_of_birth_dealership_date_of_birth_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MechanicStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(blank=True, default=utils.make_UUID)),
+                ('date_created', models.DateTimeField(auto_now=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('completed_jobs', models.PositiveIntegerField(default=0)),
+                ('min_charge', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('median_charge', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('avg_rating', models.FloatField(default=0)),
+                ('rating_breakdown', models.JSONField(blank=True, default=dict)),
+                ('avg_response_minutes', models.FloatField(blank=True, null=True)),
+                ('boost_start', models.DateField(blank=True, null=True)),
+                ('boost_end', models.DateField(blank=True, null=True)),
+                ('refreshed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('mechanic', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='accounts.mechanic')),
+            ],
+            options={
+                'verbose_name': 'Mechanic Stats',
+                'verbose_name_plural': 'Mechanic Stats',
+                'indexes': [models.Index(fields=['avg_rating'], name='accounts_me_avg_rat_d9e665_idx'), models.Index(fields=['completed_jobs'], name='accounts_me_complet_a28cc8_idx'), models.Index(fields=['min_charge'], name='accounts_me_min_cha_368bfd_idx'), models.Index(fields=['boost_start', 'boost_end'], name='accounts_me_boost_s_169c03_idx')],
+            },
+        ),
+    ]
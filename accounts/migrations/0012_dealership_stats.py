@@ -0,0 +1,45 @@
+# Generated by Django 5.1.1 on 2026-10-18 22:27
+
+import django.db.models.deletion
+import django.utils.timezone
+import utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_mechanic_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DealershipStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(blank=True, default=utils.make_UUID)),
+                ('date_created', models.DateTimeField(auto_now=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('total_vehicles', models.PositiveIntegerField(default=0)),
+                ('total_listings', models.PositiveIntegerField(default=0)),
+                ('live_sale_listings', models.PositiveIntegerField(default=0)),
+                ('live_rental_listings', models.PositiveIntegerField(default=0)),
+                ('completed_orders', models.PositiveIntegerField(default=0)),
+                ('expired_orders', models.PositiveIntegerField(default=0)),
+                ('gmv', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('avg_rating', models.FloatField(default=0)),
+                ('rating_breakdown', models.JSONField(blank=True, default=dict)),
+                ('testdrive_requests', models.PositiveIntegerField(default=0)),
+                ('testdrive_responded', models.PositiveIntegerField(default=0)),
+                ('verification_completeness', models.FloatField(default=0)),
+                ('refreshed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('dealership', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='accounts.dealership')),
+            ],
+            options={
+                'verbose_name': 'Dealership Stats',
+                'verbose_name_plural': 'Dealership Stats',
+                'indexes': [models.Index(fields=['avg_rating'], name='accounts_de_avg_rat_7fe6c6_idx'), models.Index(fields=['completed_orders'], name='accounts_de_complet_d20f67_idx'), models.Index(fields=['live_sale_listings'], name='accounts_de_live_sa_226658_idx'), models.Index(fields=['live_rental_listings'], name='accounts_de_live_re_e9071b_idx')],
+            },
+        ),
+    ]
@@ -806,6 +806,46 @@ class MechanicBoost(DbModel):
         verbose_name_plural = 'Mechanic Boosts'
 
 
+class MechanicStats(DbModel):
+    """
+    Denormalized ranking profile for a mechanic, kept up to date by signals
+    on bookings, offerings, reviews and boosts (see ``accounts.ranking``).
+    Rebuild with ``manage.py rebuild_mechanic_stats``.
+    """
+    mechanic = models.OneToOneField('Mechanic', on_delete=models.CASCADE, related_name='stats')
+    completed_jobs = models.PositiveIntegerField(default=0)
+    min_charge = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
+    median_charge = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
+    review_count = models.PositiveIntegerField(default=0)
+    avg_rating = models.FloatField(default=0)
+    rating_breakdown = models.JSONField(default=dict, blank=True)  # {area: avg stars}
+    avg_response_minutes = models.FloatField(blank=True, null=True)
+    boost_start = models.DateField(blank=True, null=True)
+    boost_end = models.DateField(blank=True, null=True)
+    refreshed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Stats for {self.mechanic}"
+
+    def __repr__(self):
+        return f"<MechanicStats: {self.mechanic_id} - {self.completed_jobs} jobs, {self.avg_rating}/5.0>"
+
+    @property
+    def is_boosted(self):
+        today = now().date()
+        return bool(self.boost_start and self.boost_end and self.boost_start <= today <= self.boost_end)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['avg_rating']),
+            models.Index(fields=['completed_jobs']),
+            models.Index(fields=['min_charge']),
+            models.Index(fields=['boost_start', 'boost_end']),
+        ]
+        verbose_name = 'Mechanic Stats'
+        verbose_name_plural = 'Mechanic Stats'
+
+
 
 class Dealership(UserProfile):
     """
@@ -947,19 +987,34 @@ class Dealership(UserProfile):
     def __repr__(self):
         return f"<Dealership: {self.business_name or self.user.email} - {self.get_level_display()}>"
     
+    def _stats(self):
+        try:
+            return self.stats
+        except DealershipStats.DoesNotExist:
+            return None
+
     @property
     def total_listings(self):
         """Returns the total number of listings"""
+        stats = self._stats()
+        if stats is not None:
+            return stats.total_listings
         return self.listings.count()
     
     @property
     def total_vehicles(self):
         """Returns the total number of vehicles"""
+        stats = self._stats()
+        if stats is not None:
+            return stats.total_vehicles
         return self.vehicles.count()
     
     @property
     def completed_orders(self):
         """Returns the number of completed orders"""
+        stats = self._stats()
+        if stats is not None:
+            return stats.completed_orders
         return self.orders.filter(order_status='completed').count()
     
     @property
@@ -991,6 +1046,10 @@ class Dealership(UserProfile):
         ordering = ['-date_created']
 
     def rating(self):
+        stats = self._stats()
+        if stats is not None:
+            return stats.avg_rating
+
         from feedback.models import Review
         reviews = Review.objects.filter(object_type='dealer', related_object=self.uuid)
         if not reviews.exists():
@@ -1023,10 +1082,66 @@ class Dealership(UserProfile):
         # Add extended services
         if self.extended_services:
             servs.extend(self.extended_services)
-        
+
         return servs
 
 
+class DealershipStats(DbModel):
+    """
+    Materialized storefront figures for a dealership. Each group of fields
+    is recomputed from source by the listing, order, review, test drive and
+    verification signals (see ``accounts.dealer_stats``);
+    ``manage.py check_dealership_stats`` reports and repairs drift.
+    """
+    dealership = models.OneToOneField('Dealership', on_delete=models.CASCADE, related_name='stats')
+    # listings
+    total_vehicles = models.PositiveIntegerField(default=0)
+    total_listings = models.PositiveIntegerField(default=0)
+    live_sale_listings = models.PositiveIntegerField(default=0)
+    live_rental_listings = models.PositiveIntegerField(default=0)
+    # orders
+    completed_orders = models.PositiveIntegerField(default=0)
+    expired_orders = models.PositiveIntegerField(default=0)
+    gmv = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    # reviews
+    review_count = models.PositiveIntegerField(default=0)
+    avg_rating = models.FloatField(default=0)
+    rating_breakdown = models.JSONField(default=dict, blank=True)
+    # test drive requests
+    testdrive_requests = models.PositiveIntegerField(default=0)
+    testdrive_responded = models.PositiveIntegerField(default=0)
+    # verification
+    verification_completeness = models.FloatField(default=0)
+    refreshed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Stats for {self.dealership}"
+
+    def __repr__(self):
+        return f"<DealershipStats: {self.dealership_id} - {self.total_listings} listings, {self.avg_rating}/5.0>"
+
+    @property
+    def live_listings(self):
+        return self.live_sale_listings + self.live_rental_listings
+
+    @property
+    def response_rate(self):
+        """Share of test drive requests the dealer granted or completed"""
+        if not self.testdrive_requests:
+            return None
+        return round(self.testdrive_responded / self.testdrive_requests * 100, 1)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['avg_rating']),
+            models.Index(fields=['completed_orders']),
+            models.Index(fields=['live_sale_listings']),
+            models.Index(fields=['live_rental_listings']),
+        ]
+        verbose_name = 'Dealership Stats'
+        verbose_name_plural = 'Dealership Stats'
+
+
 class PayoutInformation(DbModel):
     CHANNEL_CHOICES = [
         ('bank', 'Bank Transfer'),
@@ -2124,35 +2239,6 @@ class DocumentAccessLog(DbModel):
         """Returns human-readable time since access"""
         return timesince(self.date_created)
     
-    @classmethod
-    def log_access(cls, submission, document_type, user, access_type, ip_address, user_agent='', success=True, failure_reason=''):
-        """
-        Convenience method to log document access
-        
-        Args:
-            submission: BusinessVerificationSubmission instance
-            document_type: Type of document (e.g., 'cac_document')
-            user: User who accessed the document
-            access_type: Type of access ('view', 'download', 'thumbnail')
-            ip_address: IP address of the user
-            user_agent: Browser user agent string
-            success: Whether the access was successful
-            failure_reason: Reason for failure if applicable
-            
-        Returns:
-            DocumentAccessLog instance
-        """
-        return cls.objects.create(
-            submission=submission,
-            document_type=document_type,
-            accessed_by=user,
-            access_type=access_type,
-            ip_address=ip_address,
-            user_agent=user_agent[:500] if user_agent else '',  # Truncate user agent
-            success=success,
-            failure_reason=failure_reason
-        )
-    
     @property
     def document_display_name(self):
         """Returns human-readable document name"""
@@ -2167,7 +2253,9 @@ class DocumentAccessLog(DbModel):
     @classmethod
     def log_access(cls, submission, document_type, user, access_type, ip_address, user_agent='', success=True, failure_reason=''):
         """
-        Convenience method to create an access log entry
+        Convenience method to create an access log entry. The access is also
+        recorded in the 'business_documents' stream of the audit log
+        (utils.audit), which cannot be edited unnoticed.
         
         Args:
             submission: BusinessVerificationSubmission instance
@@ -2182,6 +2270,16 @@ class DocumentAccessLog(DbModel):
         Returns:
             DocumentAccessLog instance
         """
+        from utils import audit
+
+        user_agent = user_agent[:500] if user_agent else ''
+        audit.record(
+            'business_documents', access_type, actor=user, obj=submission, ip_address=ip_address,
+            details={
+                'document_type': document_type, 'user_agent': user_agent[:200],
+                'success': success, 'failure_reason': failure_reason,
+            },
+        )
         return cls.objects.create(
             submission=submission,
             document_type=document_type,
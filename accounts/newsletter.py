@@ -9,6 +9,8 @@ from django.conf import settings
 from django.contrib.sites.models import Site
 import logging
 
+from feedback.delivery import decide
+
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
@@ -160,8 +162,14 @@ class Newsletter(models.Model):
         
         success_count = 0
         fail_count = 0
+        skip_count = 0
+        now = timezone.now()
         
         for user in recipients:
+            # newsletters go out in one batch already, so only opt-outs matter
+            if decide(user, 'marketing', 'email', now).action == 'skip':
+                skip_count += 1
+                continue
             try:
                 email_msg = self.prepare_email(user)
                 email_msg.send()
@@ -176,6 +184,9 @@ class Newsletter(models.Model):
                 logger.error(f"Failed to send newsletter {self.id} to {user.email}: {str(e)}")
                 fail_count += 1
         
+        if skip_count:
+            logger.info(f"Newsletter {self.id}: skipped {skip_count} recipients who opted out")
+        
         # Update final status
         self.status = 'sent' if success_count > 0 else 'failed'
         self.sent_at = timezone.now()
@@ -5,9 +5,13 @@ This module provides authentication validation for external OAuth providers
 including Google, Apple, and Facebook.
 """
 
+import hashlib
+import hmac
 import logging
+import threading
+import time
 import requests
-from typing import Dict, Any, Optional, Tuple
+from typing import Callable, Dict, Any, Iterable, Optional, Tuple
 from django.conf import settings
 from django.core.cache import cache
 from abc import ABC, abstractmethod
@@ -31,12 +35,13 @@ class BaseProvider(ABC):
         self.timeout = getattr(settings, 'OAUTH_VALIDATION_TIMEOUT', 10)
     
     @abstractmethod
-    def validate_token(self, token: str) -> Dict[str, Any]:
+    def validate_token(self, token: str, nonce: Optional[str] = None) -> Dict[str, Any]:
         """
         Validate the OAuth token and return user information.
         
         Args:
             token: The OAuth access token
+            nonce: Nonce sent with the authorization request, if any
             
         Returns:
             Dictionary containing user information
@@ -48,7 +53,10 @@ class BaseProvider(ABC):
     
     def get_cache_key(self, token: str) -> str:
         """Generate cache key for token validation results."""
-        return f"oauth_validation:{self.provider_name}:{token[:16]}"
+        # Hash the whole token: JWTs from the same provider share their
+        # header, so any prefix would collide across users.
+        digest = hashlib.sha256(token.encode()).hexdigest()
+        return f"oauth_validation:{self.provider_name}:{digest}"
     
     def cache_validation_result(self, token: str, result: Dict[str, Any], timeout: int = 300) -> None:
         """Cache validation result to reduce API calls."""
@@ -61,26 +69,278 @@ class BaseProvider(ABC):
         return cache.get(cache_key)
 
 
+class JWKSKeyCache:
+    """
+    Cached JSON Web Key Set for a single provider.
+
+    Keys are held in-process and mirrored to the Django cache so other
+    workers can reuse a fetch. The set is refreshed in a background thread
+    shortly before it expires, re-fetched on an unknown ``kid`` (key
+    rotation) at most once per ``min_refresh_interval``, and served stale
+    for up to ``max_stale`` seconds when the provider cannot be reached.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        url: str,
+        ttl: int = 3600,
+        refresh_ahead: int = 300,
+        min_refresh_interval: int = 60,
+        max_stale: int = 86400,
+        timeout: int = 5,
+        fetcher: Optional[Callable[[str, int], Dict[str, Any]]] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.name = name
+        self.url = url
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.min_refresh_interval = min_refresh_interval
+        self.max_stale = max_stale
+        self.timeout = timeout
+        self.fetcher = fetcher or self._http_fetch
+        self.clock = clock
+        self.fetch_count = 0
+
+        self._lock = threading.Lock()
+        self._keys: Dict[str, Any] = {}
+        self._fetched_at = 0.0
+        self._last_attempt = 0.0
+        self._refreshing = False
+
+    @property
+    def cache_key(self) -> str:
+        return f"oauth_jwks:{self.name}"
+
+    @staticmethod
+    def _http_fetch(url: str, timeout: int) -> Dict[str, Any]:
+        response = requests.get(url, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def _load(self, jwks: Dict[str, Any], fetched_at: float) -> None:
+        import jwt
+
+        keys = {}
+        for jwk in jwks.get('keys', []):
+            if jwk.get('kty') != 'RSA' or jwk.get('use', 'sig') != 'sig':
+                continue
+            try:
+                keys[jwk['kid']] = jwt.PyJWK(jwk, algorithm='RS256').key
+            except (KeyError, jwt.exceptions.PyJWKError) as e:
+                logger.warning(f"Skipping unusable {self.name} JWK: {str(e)}")
+        if not keys:
+            raise ValueError(f"{self.name} JWKS contains no usable RSA signing keys")
+        self._keys = keys
+        self._fetched_at = fetched_at
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Fetch the key set now. Returns False when the fetch failed or was
+        throttled and the current (possibly stale) keys were kept.
+        """
+        with self._lock:
+            now = self.clock()
+            if not force and now - self._last_attempt < self.min_refresh_interval:
+                return False
+            self._last_attempt = now
+            try:
+                self.fetch_count += 1
+                jwks = self.fetcher(self.url, self.timeout)
+                self._load(jwks, now)
+            except (requests.RequestException, ValueError) as e:
+                if self._keys and now - self._fetched_at < self.max_stale:
+                    logger.warning(f"{self.name} JWKS refresh failed, serving stale keys: {str(e)}")
+                    return False
+                logger.error(f"{self.name} JWKS unavailable: {str(e)}")
+                raise AuthenticationError(
+                    f"{self.name} signing keys unavailable: {str(e)}",
+                    ErrorCodes.API_SERVICE_UNAVAILABLE,
+                    user_message=f"{self.name.title()} authentication service is temporarily unavailable."
+                )
+            cache.set(self.cache_key, {'jwks': jwks, 'fetched_at': now}, timeout=self.max_stale)
+            return True
+
+    def _refresh_in_background(self) -> None:
+        try:
+            self.refresh(force=True)
+        except AuthenticationError:
+            pass
+        finally:
+            self._refreshing = False
+
+    def _ensure_fresh(self) -> None:
+        now = self.clock()
+        if not self._keys:
+            shared = cache.get(self.cache_key)
+            if shared and now - shared['fetched_at'] < self.ttl:
+                try:
+                    self._load(shared['jwks'], shared['fetched_at'])
+                except ValueError:
+                    pass
+
+        age = now - self._fetched_at
+        if not self._keys or age >= self.ttl:
+            # Throttled like a kid miss: while the provider is down only one
+            # login per min_refresh_interval waits out the HTTP timeout, the
+            # rest go straight to the stale keys.
+            self.refresh()
+            if not self._keys or self.clock() - self._fetched_at >= self.max_stale:
+                raise AuthenticationError(
+                    f"{self.name} signing keys unavailable",
+                    ErrorCodes.API_SERVICE_UNAVAILABLE,
+                    user_message=f"{self.name.title()} authentication service is temporarily unavailable."
+                )
+        elif age >= self.ttl - self.refresh_ahead and not self._refreshing:
+            self._refreshing = True
+            threading.Thread(target=self._refresh_in_background, daemon=True).start()
+
+    def get_signing_key(self, kid: Optional[str]) -> Any:
+        """Return the public key for ``kid``, re-fetching once on rotation."""
+        self._ensure_fresh()
+        key = self._keys.get(kid)
+        if key is None:
+            self.refresh()
+            key = self._keys.get(kid)
+        if key is None:
+            raise AuthenticationError(
+                f"Unknown {self.name} signing key: {kid}",
+                ErrorCodes.TOKEN_INVALID,
+                user_message=f"Invalid {self.name.title()} token."
+            )
+        return key
+
+
+def verify_id_token(
+    token: str,
+    key_cache: JWKSKeyCache,
+    issuers: Iterable[str],
+    audiences: Optional[Iterable[str]] = None,
+    nonce: Optional[str] = None,
+    leeway: int = 60,
+) -> Dict[str, Any]:
+    """
+    Verify an RS256 OpenID Connect ID token locally against a cached JWKS.
+
+    Checks signature, ``iss``, ``exp`` and ``aud``; with no ``audiences``
+    configured every token is refused. When a
+    nonce is supplied the ``nonce`` claim must match it, either verbatim or
+    as its SHA-256 hex digest (Apple hashes the nonce it is given).
+    """
+    import jwt
+
+    try:
+        header = jwt.get_unverified_header(token)
+    except jwt.exceptions.InvalidTokenError as e:
+        raise AuthenticationError(
+            f"Malformed {key_cache.name} token: {str(e)}",
+            ErrorCodes.TOKEN_INVALID,
+            user_message=f"Invalid {key_cache.name.title()} token."
+        )
+    if header.get('alg') != 'RS256':
+        raise AuthenticationError(
+            f"Unexpected {key_cache.name} token algorithm: {header.get('alg')}",
+            ErrorCodes.TOKEN_INVALID,
+            user_message=f"Invalid {key_cache.name.title()} token."
+        )
+
+    audiences = [aud for aud in (audiences or []) if aud]
+    if not audiences:
+        # Without an audience any token the provider issued to another app
+        # would verify, so an unconfigured provider refuses every login.
+        logger.error(f"No {key_cache.name} client IDs configured; refusing ID token")
+        raise AuthenticationError(
+            f"{key_cache.name} client IDs are not configured",
+            ErrorCodes.API_SERVICE_UNAVAILABLE,
+            user_message=f"{key_cache.name.title()} sign-in is not available."
+        )
+
+    key = key_cache.get_signing_key(header.get('kid'))
+    try:
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=['RS256'],
+            audience=audiences,
+            issuer=list(issuers),
+            leeway=leeway,
+            options={'require': ['exp', 'iss', 'sub', 'aud']},
+        )
+    except jwt.exceptions.ExpiredSignatureError:
+        raise AuthenticationError(
+            f"{key_cache.name} token expired",
+            ErrorCodes.TOKEN_EXPIRED,
+            user_message=f"Your {key_cache.name.title()} session has expired. Please sign in again."
+        )
+    except jwt.exceptions.InvalidTokenError as e:
+        raise AuthenticationError(
+            f"Invalid {key_cache.name} token: {str(e)}",
+            ErrorCodes.TOKEN_INVALID,
+            user_message=f"{key_cache.name.title()} authentication failed. Please try again."
+        )
+
+    if nonce is not None:
+        claimed = claims.get('nonce') or ''
+        hashed = hashlib.sha256(nonce.encode()).hexdigest()
+        if not (hmac.compare_digest(claimed, nonce) or hmac.compare_digest(claimed, hashed)):
+            raise AuthenticationError(
+                f"{key_cache.name} token nonce mismatch",
+                ErrorCodes.TOKEN_INVALID,
+                user_message=f"{key_cache.name.title()} authentication failed. Please try again."
+            )
+    return claims
+
+
+def _setting_list(name: str) -> list:
+    value = getattr(settings, name, None)
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(',') if item.strip()]
+    return list(value)
+
+
+def _jwks_cache(name: str, url: str) -> JWKSKeyCache:
+    return JWKSKeyCache(
+        name,
+        url,
+        ttl=getattr(settings, 'OAUTH_JWKS_CACHE_TTL', 3600),
+        max_stale=getattr(settings, 'OAUTH_JWKS_MAX_STALE', 86400),
+        timeout=getattr(settings, 'OAUTH_VALIDATION_TIMEOUT', 10),
+    )
+
+
 class GoogleProvider(BaseProvider):
     """
     Google OAuth provider validation.
     """
     
+    ISSUERS = ['https://accounts.google.com', 'accounts.google.com']
+    
     def __init__(self):
         super().__init__('google')
         self.validation_url = 'https://www.googleapis.com/oauth2/v1/tokeninfo'
         self.userinfo_url = 'https://www.googleapis.com/oauth2/v2/userinfo'
+        self.jwks = _jwks_cache('google', 'https://www.googleapis.com/oauth2/v3/certs')
     
-    def validate_token(self, token: str) -> Dict[str, Any]:
+    def validate_token(self, token: str, nonce: Optional[str] = None) -> Dict[str, Any]:
         """
         Validate Google OAuth token.
         
+        ID tokens (JWTs) are verified offline against Google's cached JWKS;
+        opaque access tokens fall back to the tokeninfo endpoint.
+        
         Args:
-            token: Google OAuth access token
+            token: Google ID token or OAuth access token
+            nonce: Nonce sent with the authorization request, if any
             
         Returns:
             Dictionary containing user information
         """
+        if token.count('.') == 2:
+            return self.validate_id_token(token, nonce)
+        
         # Check cache first
         cached_result = self.get_cached_validation(token)
         if cached_result:
@@ -163,6 +423,21 @@ class GoogleProvider(BaseProvider):
                 ErrorCodes.AUTHENTICATION_FAILED,
                 user_message="Google authentication failed. Please try again."
             )
+    
+    def validate_id_token(self, token: str, nonce: Optional[str] = None) -> Dict[str, Any]:
+        """Verify a Google ID token locally without calling Google."""
+        audiences = _setting_list('GOOGLE_OAUTH_CLIENT_IDS') or _setting_list('GOOGLE_OAUTH_CLIENT_ID')
+        claims = verify_id_token(token, self.jwks, self.ISSUERS, audiences, nonce)
+        return {
+            'provider': 'google',
+            'provider_id': claims.get('sub'),
+            'email': claims.get('email'),
+            'first_name': claims.get('given_name', ''),
+            'last_name': claims.get('family_name', ''),
+            'verified_email': claims.get('email_verified', False),
+            'picture': claims.get('picture'),
+            'raw_data': claims
+        }
 
 
 class FacebookProvider(BaseProvider):
@@ -174,7 +449,7 @@ class FacebookProvider(BaseProvider):
         super().__init__('facebook')
         self.validation_url = 'https://graph.facebook.com/me'
     
-    def validate_token(self, token: str) -> Dict[str, Any]:
+    def validate_token(self, token: str, nonce: Optional[str] = None) -> Dict[str, Any]:
         """
         Validate Facebook OAuth token.
         
@@ -258,84 +533,33 @@ class AppleProvider(BaseProvider):
     """
     Apple OAuth provider validation.
     
-    Note: Apple Sign-In uses JWT tokens that need to be validated differently.
-    This is a simplified implementation that would need to be enhanced for production.
+    Sign in with Apple issues RS256 identity tokens; they are verified
+    offline against Apple's cached JWKS.
     """
     
+    ISSUERS = ['https://appleid.apple.com']
+    
     def __init__(self):
         super().__init__('apple')
         self.validation_url = 'https://appleid.apple.com/auth/keys'
+        self.jwks = _jwks_cache('apple', self.validation_url)
     
-    def validate_token(self, token: str) -> Dict[str, Any]:
+    def validate_token(self, token: str, nonce: Optional[str] = None) -> Dict[str, Any]:
         """
         Validate Apple OAuth token (JWT).
         
         Args:
-            token: Apple OAuth JWT token
+            token: Apple identity token
+            nonce: Nonce sent with the authorization request, if any
             
         Returns:
             Dictionary containing user information
-            
-        Note:
-            This is a simplified implementation. Production should include:
-            - JWT signature validation using Apple's public keys
-            - Proper audience and issuer validation
-            - Nonce validation if used
         """
-        # Check cache first
-        cached_result = self.get_cached_validation(token)
-        if cached_result:
-            logger.info("Using cached Apple token validation")
-            return cached_result
-        
+        audiences = _setting_list('APPLE_CLIENT_IDS') or _setting_list('APPLE_CLIENT_ID')
         try:
-            import jwt
-            from jwt.exceptions import InvalidTokenError
-            
-            # For now, we'll decode without verification (NOT RECOMMENDED FOR PRODUCTION)
-            # In production, you should validate the signature using Apple's public keys
-            decoded_token = jwt.decode(token, options={"verify_signature": False})
-            
-            # Basic validation
-            if decoded_token.get('iss') != 'https://appleid.apple.com':
-                raise AuthenticationError(
-                    "Invalid Apple token issuer",
-                    ErrorCodes.TOKEN_INVALID,
-                    user_message="Invalid Apple token."
-                )
-            
-            # Extract user information
-            result = {
-                'provider': 'apple',
-                'provider_id': decoded_token.get('sub'),
-                'email': decoded_token.get('email'),
-                'first_name': '',  # Apple doesn't always provide names in JWT
-                'last_name': '',
-                'verified_email': decoded_token.get('email_verified', False),
-                'picture': None,  # Apple doesn't provide profile pictures
-                'raw_data': decoded_token
-            }
-            
-            # Cache the result
-            self.cache_validation_result(token, result)
-            
-            logger.info(f"Apple token validated successfully for email: {result['email']}")
-            return result
-            
-        except ImportError:
-            logger.error("PyJWT library not installed for Apple token validation")
-            raise AuthenticationError(
-                "Apple authentication not properly configured",
-                ErrorCodes.API_INTERNAL_ERROR,
-                user_message="Apple authentication is temporarily unavailable."
-            )
-        except InvalidTokenError as e:
-            logger.warning(f"Apple JWT validation failed: {str(e)}")
-            raise AuthenticationError(
-                f"Invalid Apple token: {str(e)}",
-                ErrorCodes.TOKEN_INVALID,
-                user_message="Apple authentication failed. Please try again."
-            )
+            decoded_token = verify_id_token(token, self.jwks, self.ISSUERS, audiences, nonce)
+        except AuthenticationError:
+            raise
         except Exception as e:
             logger.error(f"Unexpected error during Apple token validation: {str(e)}")
             raise AuthenticationError(
@@ -343,6 +567,25 @@ class AppleProvider(BaseProvider):
                 ErrorCodes.AUTHENTICATION_FAILED,
                 user_message="Apple authentication failed. Please try again."
             )
+        
+        # Apple sends email_verified as a string in some token versions
+        verified = decoded_token.get('email_verified', False)
+        if isinstance(verified, str):
+            verified = verified.lower() == 'true'
+        
+        result = {
+            'provider': 'apple',
+            'provider_id': decoded_token.get('sub'),
+            'email': decoded_token.get('email'),
+            'first_name': '',  # Apple doesn't always provide names in JWT
+            'last_name': '',
+            'verified_email': verified,
+            'picture': None,  # Apple doesn't provide profile pictures
+            'raw_data': decoded_token
+        }
+        
+        logger.info(f"Apple token validated successfully for email: {result['email']}")
+        return result
 
 
 class ProviderManager:
@@ -379,19 +622,20 @@ class ProviderManager:
         
         return self.providers[provider_name]
     
-    def validate_provider_token(self, provider_name: str, token: str) -> Dict[str, Any]:
+    def validate_provider_token(self, provider_name: str, token: str, nonce: Optional[str] = None) -> Dict[str, Any]:
         """
         Validate token for a specific provider.
         
         Args:
             provider_name: Name of the provider
             token: OAuth token to validate
+            nonce: Nonce sent with the authorization request, if any
             
         Returns:
             Dictionary containing validated user information
         """
         provider = self.get_provider(provider_name)
-        return provider.validate_token(token)
+        return provider.validate_token(token, nonce=nonce)
     
     def is_provider_supported(self, provider_name: str) -> bool:
         """Check if a provider is supported."""
@@ -406,19 +650,20 @@ class ProviderManager:
 provider_manager = ProviderManager()
 
 
-def validate_social_auth_token(provider: str, token: str) -> Tuple[bool, Dict[str, Any]]:
+def validate_social_auth_token(provider: str, token: str, nonce: Optional[str] = None) -> Tuple[bool, Dict[str, Any]]:
     """
     Convenience function to validate social authentication tokens.
     
     Args:
         provider: Provider name (google, facebook, apple)
         token: OAuth token to validate
+        nonce: Nonce sent with the authorization request, if any
         
     Returns:
         Tuple of (is_valid, user_data)
     """
     try:
-        user_data = provider_manager.validate_provider_token(provider, token)
+        user_data = provider_manager.validate_provider_token(provider, token, nonce=nonce)
         return True, user_data
     except (AuthenticationError, ValidationError) as e:
         logger.warning(f"Social auth validation failed for {provider}: {str(e)}")
@@ -0,0 +1,277 @@
+"""
+Mechanic ranking.
+
+``MechanicStats`` holds the per-mechanic figures the listing endpoints sort
+and display on (completed jobs, service charges, ratings, response time and
+boost window), so a page of mechanics needs no per-row counting.
+``rebuild_stats`` recomputes them set-based for any number of mechanics; the
+signals in ``accounts.signals`` queue the mechanics a booking, offering,
+review or boost change touched and rebuild them together once the
+transaction commits.
+
+``ranked_mechanics`` annotates a queryset with the great-circle distance to
+the caller (computed in SQL) and a weighted relevance score::
+
+    relevance = w_distance * (1 - min(distance / radius, 1))
+              + w_rating   * avg_rating / 5
+              + w_jobs     * jobs / (jobs + JOBS_HALF_SATURATION)
+              + w_boost    * (1 if boosted today else 0)
+
+Weights come from ``settings.MECHANIC_RANKING_WEIGHTS`` merged over
+``DEFAULT_WEIGHTS``. Mechanics without coordinates get no distance credit.
+"""
+import math
+import statistics
+import threading
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, ExpressionWrapper, F, FloatField, Q, Value, When
+from django.db.models.functions import ASin, Cast, Coalesce, Cos, Least, Power, Radians, Sin, Sqrt
+from django.utils import timezone
+
+from accounts.models import Mechanic, MechanicBoost, MechanicStats
+from bookings.models import ServiceBooking, ServiceOffering
+from feedback.models import Rating, Review
+
+EARTH_RADIUS_KM = 6371
+DEFAULT_RADIUS_KM = 30
+JOBS_HALF_SATURATION = 20
+DEFAULT_WEIGHTS = {'distance': 0.35, 'rating': 0.35, 'jobs': 0.2, 'boost': 0.1}
+RATING_AREAS = ('communication', 'support', 'service-delivery', 'car-quality', 'car-cleanliness')
+
+# mechanics waiting on the current transaction's commit; see refresh_stats_on_commit
+_pending = threading.local()
+
+ORDERINGS = {
+    'relevance': (F('relevance').desc(),),
+    'distance': (F('distance_km').asc(nulls_last=True), F('relevance').desc()),
+    'rating': (F('stats__avg_rating').desc(nulls_last=True), F('relevance').desc()),
+    'jobs': (F('stats__completed_jobs').desc(nulls_last=True), F('relevance').desc()),
+    'price': (F('stats__min_charge').asc(nulls_last=True), F('relevance').desc()),
+    '-price': (F('stats__min_charge').desc(nulls_last=True), F('relevance').desc()),
+}
+
+STATS_FIELDS = [
+    'completed_jobs', 'min_charge', 'median_charge', 'review_count', 'avg_rating',
+    'rating_breakdown', 'avg_response_minutes', 'boost_start', 'boost_end', 'refreshed_at',
+]
+
+
+def ranking_weights():
+    return {**DEFAULT_WEIGHTS, **getattr(settings, 'MECHANIC_RANKING_WEIGHTS', {})}
+
+
+def ranking_radius_km():
+    return getattr(settings, 'MECHANIC_RANKING_RADIUS_KM', DEFAULT_RADIUS_KM)
+
+
+# stats
+
+def _completed_jobs(ids):
+    return dict(
+        ServiceBooking.objects.filter(mechanic_id__in=ids, booking_status='completed')
+        .order_by().values('mechanic_id').annotate(total=Count('id')).values_list('mechanic_id', 'total')
+    )
+
+
+def _charges(ids):
+    charges = defaultdict(list)
+    rows = ServiceOffering.objects.filter(offered_by_id__in=ids, charge__gt=0).values_list('offered_by_id', 'charge')
+    for mechanic_id, charge in rows:
+        charges[mechanic_id].append(charge)
+    return charges
+
+
+def _response_minutes(ids):
+    minutes = defaultdict(list)
+    rows = ServiceBooking.objects.filter(
+        mechanic_id__in=ids, requested_on__isnull=False, responded_on__isnull=False
+    ).values_list('mechanic_id', 'requested_on', 'responded_on')
+    for mechanic_id, requested, responded in rows:
+        minutes[mechanic_id].append(max(0.0, (responded - requested).total_seconds() / 60))
+    return {mechanic_id: round(sum(values) / len(values), 1) for mechanic_id, values in minutes.items()}
+
+
+def review_aggregates(uuids_by_id, object_type='mechanic'):
+    """
+    {profile_id: (review_count, avg_rating, breakdown)} for the reviews of
+    ``object_type`` about each profile, computed the same way as
+    ``Review.avg_rating``: a review scores the mean of its rated areas (0 when
+    it has none) and a profile the mean of its review scores.
+    """
+    ids_by_uuid = {uuid: profile_id for profile_id, uuid in uuids_by_id.items()}
+    reviews = dict(
+        Review.objects.filter(object_type=object_type, related_object__in=ids_by_uuid)
+        .values_list('pk', 'related_object')
+    )
+    stars = defaultdict(dict)
+    for review_id, area, value in Rating.objects.filter(reviewId__in=reviews, area__in=RATING_AREAS).values_list(
+        'reviewId_id', 'area', 'stars'
+    ):
+        stars[review_id][area] = value
+
+    scores, areas = defaultdict(list), defaultdict(lambda: defaultdict(list))
+    for review_id, related_object in reviews.items():
+        profile_id = ids_by_uuid[related_object]
+        review_stars = stars.get(review_id, {})
+        scores[profile_id].append(round(sum(review_stars.values()) / len(review_stars), 1) if review_stars else 0)
+        for area, value in review_stars.items():
+            areas[profile_id][area].append(value)
+
+    return {
+        profile_id: (
+            len(values),
+            round(sum(values) / len(values), 1),
+            {area: round(sum(stars) / len(stars), 1) for area, stars in areas[profile_id].items()},
+        )
+        for profile_id, values in scores.items()
+    }
+
+
+def _rebuild_chunk(uuids_by_id):
+    ids = list(uuids_by_id)
+    jobs = _completed_jobs(ids)
+    charges = _charges(ids)
+    response = _response_minutes(ids)
+    ratings = review_aggregates(uuids_by_id)
+    boosts = {
+        mechanic_id: (start, end)
+        for mechanic_id, start, end in MechanicBoost.objects.filter(mechanic_id__in=ids).values_list(
+            'mechanic_id', 'start_date', 'end_date'
+        )
+    }
+    now = timezone.now()
+
+    rows = []
+    for mechanic_id in ids:
+        prices = sorted(charges.get(mechanic_id, []))
+        review_count, avg_rating, breakdown = ratings.get(mechanic_id, (0, 0, {}))
+        boost_start, boost_end = boosts.get(mechanic_id, (None, None))
+        rows.append(MechanicStats(
+            mechanic_id=mechanic_id,
+            completed_jobs=jobs.get(mechanic_id, 0),
+            min_charge=prices[0] if prices else None,
+            median_charge=Decimal(statistics.median(prices)).quantize(Decimal('0.01')) if prices else None,
+            review_count=review_count,
+            avg_rating=avg_rating,
+            rating_breakdown=breakdown,
+            avg_response_minutes=response.get(mechanic_id),
+            boost_start=boost_start,
+            boost_end=boost_end,
+            refreshed_at=now,
+        ))
+    MechanicStats.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=['mechanic'], update_fields=STATS_FIELDS
+    )
+    return len(rows)
+
+
+def rebuild_stats(mechanics=None, batch_size=1000):
+    """
+    Recompute ``MechanicStats`` for ``mechanics`` (a queryset, default every
+    mechanic), a batch at a time. Returns the number of rows written.
+    """
+    queryset = Mechanic.objects.all() if mechanics is None else mechanics
+    rows = list(queryset.order_by('pk').values_list('pk', 'uuid'))
+    written = 0
+    for start in range(0, len(rows), batch_size):
+        written += _rebuild_chunk(dict(rows[start:start + batch_size]))
+    return written
+
+
+def refresh_stats(mechanic_id):
+    return rebuild_stats(Mechanic.objects.filter(pk=mechanic_id))
+
+
+def _refresh_pending():
+    mechanic_ids, _pending.mechanic_ids = getattr(_pending, 'mechanic_ids', set()), set()
+    if mechanic_ids:
+        rebuild_stats(Mechanic.objects.filter(pk__in=mechanic_ids))
+
+
+def refresh_stats_on_commit(mechanic_id):
+    """
+    Refresh once the current transaction commits (immediately in
+    autocommit). Mechanics touched inside one transaction are collected and
+    the first callback to run rebuilds them all in one pass; the rest find
+    nothing left to do, so a bulk rating import costs one rebuild rather
+    than one per row.
+    """
+    if mechanic_id:
+        if not hasattr(_pending, 'mechanic_ids'):
+            _pending.mechanic_ids = set()
+        _pending.mechanic_ids.add(mechanic_id)
+        transaction.on_commit(_refresh_pending, robust=True)
+
+
+# ranking
+
+def distance_expression(lat, lng, prefix='location__'):
+    """Haversine distance in km from (lat, lng) to the row's location, as SQL."""
+    lat1 = math.radians(float(lat))
+    lat2 = Radians(Cast(f'{prefix}lat', FloatField()))
+    lng2 = Radians(Cast(f'{prefix}lng', FloatField()))
+    a = (
+        Power(Sin((lat2 - Value(lat1)) / 2), 2)
+        + Value(math.cos(lat1)) * Cos(lat2) * Power(Sin((lng2 - Value(math.radians(float(lng)))) / 2), 2)
+    )
+    # clamp against rounding pushing sqrt(a) just above 1 (asin -> NULL/error)
+    return ExpressionWrapper(
+        Value(2.0 * EARTH_RADIUS_KM) * ASin(Least(Sqrt(a), Value(1.0))), output_field=FloatField()
+    )
+
+
+def within_radius(queryset, lat, lng, radius_km=None):
+    """
+    Mechanics within ``radius_km`` of (lat, lng) plus those without
+    coordinates (the frontend falls back to matching their location text).
+    A bounding box in front of the distance check keeps it index friendly.
+    """
+    radius = radius_km or ranking_radius_km()
+    delta = radius / 111.0  # ~111 km per degree of latitude
+    lng_delta = delta / max(math.cos(math.radians(float(lat))), 0.01)
+    nearby = Q(
+        location__lat__gte=lat - delta, location__lat__lte=lat + delta,
+        location__lng__gte=lng - lng_delta, location__lng__lte=lng + lng_delta,
+        distance_km__lte=radius,
+    )
+    return queryset.annotate(distance_km=distance_expression(lat, lng)).filter(
+        nearby | Q(location__lat__isnull=True) | Q(location__lng__isnull=True)
+    )
+
+
+def ranked_mechanics(queryset, lat=None, lng=None, ordering='relevance', weights=None, radius_km=None):
+    """
+    Annotate ``distance_km`` (when coordinates are given) and ``relevance``
+    and order by ``ordering`` (a key of ``ORDERINGS``; unknown values fall
+    back to relevance).
+    """
+    weights = {**ranking_weights(), **(weights or {})}
+    radius = radius_km or ranking_radius_km()
+    today = timezone.localdate()
+
+    if lat is not None and lng is not None:
+        if 'distance_km' not in queryset.query.annotations:
+            queryset = queryset.annotate(distance_km=distance_expression(lat, lng))
+        proximity = Coalesce(Value(1.0) - Least(F('distance_km') / Value(float(radius)), Value(1.0)), Value(0.0))
+    else:
+        queryset = queryset.annotate(distance_km=Value(None, output_field=FloatField()))
+        proximity = Value(0.0)
+
+    jobs = Cast(Coalesce('stats__completed_jobs', 0), FloatField())
+    rating = Cast(Coalesce('stats__avg_rating', 0.0), FloatField())
+    boosted = Case(
+        When(stats__boost_start__lte=today, stats__boost_end__gte=today, then=Value(1.0)),
+        default=Value(0.0), output_field=FloatField(),
+    )
+    relevance = (
+        Value(float(weights['distance'])) * proximity
+        + Value(float(weights['rating'])) * rating / Value(5.0)
+        + Value(float(weights['jobs'])) * jobs / (jobs + Value(float(JOBS_HALF_SATURATION)))
+        + Value(float(weights['boost'])) * boosted
+    )
+    queryset = queryset.annotate(relevance=ExpressionWrapper(relevance, output_field=FloatField()))
+    return queryset.order_by(*ORDERINGS.get(ordering, ORDERINGS['relevance']), '-date_created', 'pk')
@@ -1,11 +1,12 @@
 """
 Signal handlers for accounts app.
-Handles automatic profile updates when business verification status changes
-and auto-creates user profiles based on user type.
+Handles automatic profile updates when business verification status changes,
+auto-creates user profiles based on user type and keeps mechanic ranking
+stats in sync.
 """
 
 import logging
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.utils import timezone
 from utils.async_email import send_email_async
@@ -344,3 +345,103 @@ def trigger_referral_reward_booking(sender, instance, created, **kwargs):
             process_referral_reward(user, amount, instance)
         except Exception as e:
             logger.error(f"Error in referral trigger for Booking {instance.id}: {str(e)}")
+
+
+# Mechanic ranking stats (see accounts.ranking) and dealership stats
+# (see accounts.dealer_stats)
+
+def _refresh_mechanic_stats(mechanic_id):
+    from accounts.ranking import refresh_stats_on_commit
+    refresh_stats_on_commit(mechanic_id)
+
+
+def _refresh_dealership_stats(dealership_id, *sections):
+    from accounts.dealer_stats import refresh_stats_on_commit
+    refresh_stats_on_commit(dealership_id, *sections)
+
+
+def _refresh_review_subject(object_type, related_object):
+    from accounts.models import Dealership, Mechanic
+    if related_object is None:
+        return
+    if object_type == 'mechanic':
+        _refresh_mechanic_stats(Mechanic.objects.filter(uuid=related_object).values_list('pk', flat=True).first())
+    elif object_type == 'dealer':
+        _refresh_dealership_stats(
+            Dealership.objects.filter(uuid=related_object).values_list('pk', flat=True).first(), 'reviews'
+        )
+
+
+@receiver(post_save, sender='accounts.Mechanic')
+def create_mechanic_stats(sender, instance, created, **kwargs):
+    if created:
+        from accounts.models import MechanicStats
+        MechanicStats.objects.get_or_create(mechanic=instance)
+
+
+@receiver([post_save, post_delete], sender='bookings.ServiceBooking')
+def refresh_mechanic_stats_on_booking(sender, instance, **kwargs):
+    _refresh_mechanic_stats(instance.mechanic_id)
+
+
+@receiver([post_save, post_delete], sender='bookings.ServiceOffering')
+def refresh_mechanic_stats_on_offering(sender, instance, **kwargs):
+    _refresh_mechanic_stats(instance.offered_by_id)
+
+
+@receiver([post_save, post_delete], sender='accounts.MechanicBoost')
+def refresh_mechanic_stats_on_boost(sender, instance, **kwargs):
+    _refresh_mechanic_stats(instance.mechanic_id)
+
+
+@receiver([post_save, post_delete], sender='feedback.Review')
+def refresh_stats_on_review(sender, instance, **kwargs):
+    _refresh_review_subject(instance.object_type, instance.related_object)
+
+
+@receiver([post_save, post_delete], sender='feedback.Rating')
+def refresh_stats_on_rating(sender, instance, **kwargs):
+    # on a cascaded delete the review may already be gone; its own handler runs
+    from feedback.models import Review
+    review = Review.objects.filter(pk=instance.reviewId_id).values_list('object_type', 'related_object').first()
+    if review:
+        _refresh_review_subject(*review)
+
+
+@receiver(post_save, sender='accounts.Dealership')
+def refresh_dealership_stats_on_profile(sender, instance, created, **kwargs):
+    # a new dealership gets its full row; afterwards only verification can change here
+    _refresh_dealership_stats(instance.pk, *(() if created else ('verification',)))
+
+
+def refresh_dealership_stats_on_vehicle(sender, instance, **kwargs):
+    _refresh_dealership_stats(instance.dealer_id, 'listings')
+
+
+def refresh_dealership_stats_on_listing(sender, instance, **kwargs):
+    from listings.models import Vehicle
+    dealer_id = Vehicle.objects.filter(pk=instance.vehicle_id).values_list('dealer_id', flat=True).first()
+    _refresh_dealership_stats(dealer_id, 'listings')
+
+
+def refresh_dealership_stats_on_order(sender, instance, **kwargs):
+    from listings.models import Listing
+    dealer_id = Listing.objects.filter(pk=instance.order_item_id).values_list('vehicle__dealer_id', flat=True).first()
+    _refresh_dealership_stats(dealer_id, 'orders')
+
+
+@receiver([post_save, post_delete], sender='listings.TestDriveRequest')
+def refresh_dealership_stats_on_testdrive(sender, instance, **kwargs):
+    _refresh_dealership_stats(instance.requested_to_id, 'testdrives')
+
+
+# model signals are sent with the concrete class, so every vehicle and
+# order subclass needs its own connection
+for _sender in ('Vehicle', 'Car', 'Boat', 'Plane', 'Bike', 'UAV'):
+    for _signal in (post_save, post_delete):
+        _signal.connect(refresh_dealership_stats_on_vehicle, sender=f'listings.{_sender}')
+for _signal in (post_save, post_delete):
+    _signal.connect(refresh_dealership_stats_on_listing, sender='listings.Listing')
+for _sender in ('Order', 'RentalOrder', 'PurchaseOrder'):
+    for _signal in (post_save, post_delete):
+        _signal.connect(refresh_dealership_stats_on_order, sender=f'listings.{_sender}')
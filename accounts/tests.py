@@ -1,3 +1,408 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
 
-# Create your tests here.
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.dealer_stats import check_drift
+from accounts.models import Account, Dealership, DealershipStats, Location, Mechanic, MechanicBoost, MechanicStats
+from accounts.providers import AppleProvider, GoogleProvider, JWKSKeyCache
+from accounts.ranking import rebuild_stats
+from bookings.models import Service, ServiceBooking, ServiceOffering
+from feedback.models import Rating, Review
+from listings.models import Car, Listing, Order, TestDriveRequest
+from utils.exceptions import AuthenticationError, ErrorCodes
+
+
+def make_rsa_key(kid):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+    jwk.update({'kid': kid, 'use': 'sig', 'alg': 'RS256'})
+    return private_key, jwk
+
+
+class FakeJWKSServer:
+    """Local HTTP endpoint serving a mutable JWKS document."""
+
+    def __init__(self):
+        self.jwks = {'keys': []}
+        self.available = True
+        self.hits = 0
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                fake.hits += 1
+                if not fake.available:
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+                body = json.dumps(fake.jwks).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = HTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/keys'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@override_settings(APPLE_CLIENT_IDS=['com.veyu.app'], GOOGLE_OAUTH_CLIENT_IDS=['veyu-web.apps.googleusercontent.com'])
+class JWKSVerificationTestCase(SimpleTestCase):
+    """Offline ID token verification for Google and Apple."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.key_a, cls.jwk_a = make_rsa_key('key-a')
+        cls.key_b, cls.jwk_b = make_rsa_key('key-b')
+
+    def setUp(self):
+        cache.clear()
+        self.server = FakeJWKSServer()
+        self.server.jwks = {'keys': [self.jwk_a]}
+        self.clock = FakeClock()
+        self.apple = AppleProvider()
+        self.apple.jwks = JWKSKeyCache('apple', self.server.url, ttl=3600, min_refresh_interval=0, clock=self.clock)
+        self.google = GoogleProvider()
+        self.google.jwks = JWKSKeyCache('google', self.server.url, ttl=3600, min_refresh_interval=0, clock=self.clock)
+
+    def tearDown(self):
+        self.server.close()
+
+    def make_token(self, key=None, kid='key-a', **claims):
+        payload = {
+            'iss': 'https://appleid.apple.com',
+            'aud': 'com.veyu.app',
+            'sub': 'apple-user-1',
+            'email': 'user@privaterelay.appleid.com',
+            'email_verified': 'true',
+            'iat': int(time.time()),
+            'exp': int(time.time()) + 600,
+        }
+        payload.update(claims)
+        return jwt.encode(payload, key or self.key_a, algorithm='RS256', headers={'kid': kid})
+
+    def assertRejected(self, token, code=ErrorCodes.TOKEN_INVALID, **kwargs):
+        with self.assertRaises(AuthenticationError) as ctx:
+            self.apple.validate_token(token, **kwargs)
+        self.assertEqual(ctx.exception.error_code, code)
+
+    def test_valid_apple_token(self):
+        result = self.apple.validate_token(self.make_token())
+        self.assertEqual(result['provider_id'], 'apple-user-1')
+        self.assertTrue(result['verified_email'])
+
+    def test_signature_from_unknown_key_rejected(self):
+        forged = self.make_token(key=self.key_b)  # signed with key-b but claims kid key-a
+        self.assertRejected(forged)
+
+    def test_issuer_audience_and_expiry_checked(self):
+        self.assertRejected(self.make_token(iss='https://evil.example.com'))
+        self.assertRejected(self.make_token(aud='com.someone.else'))
+        self.assertRejected(self.make_token(exp=int(time.time()) - 3600), code=ErrorCodes.TOKEN_EXPIRED)
+
+    def test_nonce_plain_or_hashed(self):
+        import hashlib
+        raw = 'n-0S6_WzA2Mj'
+        self.apple.validate_token(self.make_token(nonce=raw), nonce=raw)
+        self.apple.validate_token(self.make_token(nonce=hashlib.sha256(raw.encode()).hexdigest()), nonce=raw)
+        self.assertRejected(self.make_token(nonce='other'), nonce=raw)
+
+    def test_hs256_token_rejected(self):
+        token = jwt.encode({'iss': 'https://appleid.apple.com', 'sub': 'x'}, 'secret', algorithm='HS256')
+        self.assertRejected(token)
+
+    def test_keys_are_cached(self):
+        for _ in range(5):
+            self.apple.validate_token(self.make_token())
+        self.assertEqual(self.server.hits, 1)
+
+    def test_kid_rotation_triggers_refetch(self):
+        self.apple.validate_token(self.make_token())
+        self.server.jwks = {'keys': [self.jwk_a, self.jwk_b]}
+        self.apple.validate_token(self.make_token(key=self.key_b, kid='key-b'))
+        self.assertEqual(self.server.hits, 2)
+
+    def test_stale_keys_served_when_provider_unreachable(self):
+        self.apple.validate_token(self.make_token())
+        self.server.available = False
+        self.clock.now += 7200  # past ttl, within max_stale
+        self.apple.validate_token(self.make_token())
+        self.assertEqual(self.server.hits, 2)
+
+    def test_expired_keys_refetched_at_most_once_per_interval_while_down(self):
+        self.apple.jwks.min_refresh_interval = 60
+        self.apple.validate_token(self.make_token())
+        self.server.available = False
+        self.clock.now += 7200
+        for _ in range(5):
+            self.apple.validate_token(self.make_token())
+        self.assertEqual(self.server.hits, 2)
+
+    def test_no_client_ids_configured_refuses_login(self):
+        with override_settings(APPLE_CLIENT_IDS=[], APPLE_CLIENT_ID=None):
+            self.assertRejected(self.make_token(), code=ErrorCodes.API_SERVICE_UNAVAILABLE)
+        self.assertEqual(self.server.hits, 0)
+
+    def test_unreachable_without_keys_is_service_error(self):
+        self.server.available = False
+        self.assertRejected(self.make_token(), code=ErrorCodes.API_SERVICE_UNAVAILABLE)
+
+    def test_background_refresh_before_expiry(self):
+        self.apple.validate_token(self.make_token())
+        self.clock.now += 3600 - 60  # inside refresh-ahead window
+        self.apple.validate_token(self.make_token())
+        deadline = time.time() + 5
+        while self.server.hits < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.server.hits, 2)
+
+    def test_google_id_token_verified_locally(self):
+        token = self.make_token(
+            iss='https://accounts.google.com',
+            aud='veyu-web.apps.googleusercontent.com',
+            sub='google-user-1',
+            email='user@gmail.com',
+            email_verified=True,
+            given_name='Ada',
+        )
+        result = self.google.validate_token(token)
+        self.assertEqual(result['provider_id'], 'google-user-1')
+        self.assertEqual(result['first_name'], 'Ada')
+
+
+class MechanicStatsTestCase(TestCase):
+
+    def setUp(self):
+        self.customer = Account.objects.create_user(
+            email='customer@example.com', password='testpass123', user_type='customer'
+        ).customer_profile
+
+    def make_mechanic(self, index, lat=None, lng=None):
+        user = Account.objects.create_user(email=f'mechanic{index}@example.com', password='testpass123', user_type='mechanic')
+        mechanic = user.mechanic_profile
+        mechanic.business_name = f'Repairs {index}'
+        if lat is not None:
+            mechanic.location = Location.objects.create(user=user, state='Lagos', address='1 Allen Avenue', lat=Decimal(str(lat)), lng=Decimal(str(lng)))
+        mechanic.save()
+        return mechanic
+
+    def offer(self, mechanic, title, charge):
+        service = Service.objects.get_or_create(title=title)[0]
+        return ServiceOffering.objects.create(offered_by=mechanic, service=service, charge=charge)
+
+    def review(self, mechanic, **stars):
+        review = Review.objects.create(reviewer=self.customer.user, object_type='mechanic', related_object=mechanic.uuid)
+        for area, value in stars.items():
+            Rating.objects.create(reviewId=review, area=area.replace('_', '-'), stars=value)
+        return review
+
+    def test_signals_keep_stats_current(self):
+        mechanic = self.make_mechanic(1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.offer(mechanic, 'Oil change', 5000)
+            self.offer(mechanic, 'Brakes', 20000)
+            self.offer(mechanic, 'Engine', 80000)
+            for status in ('completed', 'completed', 'declined'):
+                ServiceBooking.objects.create(
+                    customer=self.customer, mechanic=mechanic, booking_status=status,
+                    responded_on=timezone.now() + timedelta(minutes=30),
+                )
+            self.review(mechanic, communication=5, support=3)
+            review = self.review(mechanic, service_delivery=2)
+            MechanicBoost.objects.create(
+                mechanic=mechanic, start_date=timezone.localdate(), end_date=timezone.localdate() + timedelta(days=7), amount_paid=1000
+            )
+
+        stats = MechanicStats.objects.get(mechanic=mechanic)
+        self.assertEqual(stats.completed_jobs, 2)
+        self.assertEqual(stats.min_charge, Decimal('5000.00'))
+        self.assertEqual(stats.median_charge, Decimal('20000.00'))
+        self.assertEqual(stats.review_count, 2)
+        self.assertEqual(stats.avg_rating, mechanic.average_rating)
+        self.assertEqual(stats.rating_breakdown, {'communication': 5.0, 'support': 3.0, 'service-delivery': 2.0})
+        self.assertAlmostEqual(stats.avg_response_minutes, 30, delta=1)
+        self.assertTrue(stats.is_boosted)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            review.delete()
+        stats.refresh_from_db()
+        self.assertEqual((stats.review_count, stats.avg_rating), (1, 4.0))
+
+        # a full rebuild agrees with the incrementally maintained row
+        fields = ('completed_jobs', 'min_charge', 'median_charge', 'review_count', 'avg_rating', 'rating_breakdown')
+        snapshot = MechanicStats.objects.values(*fields).get()
+        MechanicStats.objects.all().delete()
+        call_command('rebuild_mechanic_stats', stdout=open('/dev/null', 'w'))
+        self.assertEqual(MechanicStats.objects.values(*fields).get(), snapshot)
+
+    def test_bulk_ratings_rebuild_once_per_transaction(self):
+        first, second = self.make_mechanic(1), self.make_mechanic(2)
+        with mock.patch('accounts.ranking.rebuild_stats', wraps=rebuild_stats) as rebuild:
+            with self.captureOnCommitCallbacks(execute=True):
+                for mechanic in (first, second, first):
+                    self.review(mechanic, communication=4, support=2, service_delivery=3)
+        self.assertEqual(rebuild.call_count, 1)
+        self.assertEqual(MechanicStats.objects.get(mechanic=first).review_count, 2)
+        self.assertEqual(MechanicStats.objects.get(mechanic=second).review_count, 1)
+
+    def test_list_ranked_in_sql(self):
+        near = self.make_mechanic(1, 6.5244, 3.3792)
+        rated = self.make_mechanic(2, 6.6000, 3.3500)  # ~9km away
+        far = self.make_mechanic(3, 7.3775, 3.9470)  # Ibadan, outside the radius
+        nowhere = self.make_mechanic(4)
+        self.offer(near, 'Oil change', 9000)
+        self.offer(rated, 'Oil change', 4000)
+        self.review(rated, communication=5, support=5)
+        for _ in range(5):
+            ServiceBooking.objects.create(customer=self.customer, mechanic=rated, booking_status='completed')
+        rebuild_stats()
+
+        def ranked(**params):
+            response = self.client.get('/api/v1/mechanics/', {'lat': 6.5244, 'lng': 3.3792, **params})
+            self.assertEqual(response.status_code, 200)
+            return response.json()['data']['results']
+
+        results = ranked()
+        self.assertEqual([r['uuid'] for r in results], [str(rated.uuid), str(near.uuid), str(nowhere.uuid)])
+        self.assertNotIn(str(far.uuid), [r['uuid'] for r in results])
+        self.assertEqual(results[0]['jobs_done'], 5)
+        self.assertEqual(results[0]['avg_rating'], 5.0)
+        self.assertEqual(results[1]['distance'], '0.0km')
+        self.assertIsNone(results[2]['distance'])
+
+        self.assertEqual(ranked(ordering='distance')[0]['uuid'], str(near.uuid))
+        self.assertEqual([r['uuid'] for r in ranked(ordering='price')][:2], [str(rated.uuid), str(near.uuid)])
+        with override_settings(MECHANIC_RANKING_WEIGHTS={'distance': 1, 'rating': 0, 'jobs': 0, 'boost': 0}):
+            self.assertEqual(ranked()[0]['uuid'], str(near.uuid))
+
+        # a boost lifts the nearest mechanic back to the top
+        with self.captureOnCommitCallbacks(execute=True):
+            MechanicBoost.objects.create(
+                mechanic=near, start_date=timezone.localdate(), end_date=timezone.localdate(), amount_paid=1000
+            )
+        with override_settings(MECHANIC_RANKING_WEIGHTS={'boost': 1}):
+            self.assertEqual(ranked()[0]['uuid'], str(near.uuid))
+
+
+class DealershipStatsTestCase(TestCase):
+
+    def setUp(self):
+        self.customer = Account.objects.create_user(
+            email='buyer@example.com', password='testpass123', user_type='customer'
+        ).customer_profile
+        self.dealer_user = Account.objects.create_user(email='dealer@example.com', password='testpass123', user_type='dealer')
+        self.dealer = Dealership.objects.get(user=self.dealer_user)
+
+    def make_listing(self, listing_type='sale', price=1000000, **fields):
+        car = Car.objects.create(dealer=self.dealer, name='Corolla', brand='Toyota', color='Red')
+        return Listing.objects.create(
+            vehicle=car, created_by=self.dealer_user, listing_type=listing_type, price=price,
+            title='Toyota Corolla', **fields
+        )
+
+    def review(self, **stars):
+        review = Review.objects.create(reviewer=self.customer.user, object_type='dealer', related_object=self.dealer.uuid)
+        for area, value in stars.items():
+            Rating.objects.create(reviewId=review, area=area, stars=value)
+        return review
+
+    def test_signals_keep_stats_current(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            sale = self.make_listing(approved=True, verified=True)
+            self.make_listing('rental', 20000, approved=True, verified=True)
+            pending = self.make_listing()
+            Order.objects.create(customer=self.customer, order_type='sale', order_item=sale, order_status='completed')
+            Order.objects.create(customer=self.customer, order_type='sale', order_item=pending, order_status='expired')
+            TestDriveRequest.objects.create(requested_by=self.customer, requested_to=self.dealer, listing=sale, granted=True)
+            TestDriveRequest.objects.create(requested_by=self.customer, requested_to=self.dealer, listing=pending)
+            self.review(communication=4, support=2)
+            self.dealer.verified_tin = True
+            self.dealer.save()
+
+        stats = DealershipStats.objects.get(dealership=self.dealer)
+        self.assertEqual((stats.total_vehicles, stats.total_listings), (3, 3))
+        self.assertEqual((stats.live_sale_listings, stats.live_rental_listings, stats.live_listings), (1, 1, 2))
+        self.assertEqual((stats.completed_orders, stats.expired_orders), (1, 1))
+        self.assertEqual(stats.gmv, Decimal('1000000.00'))
+        self.assertEqual((stats.review_count, stats.avg_rating), (1, 3.0))
+        self.assertEqual(stats.rating_breakdown, {'communication': 4.0, 'support': 2.0})
+        self.assertEqual(stats.response_rate, 50.0)
+        self.assertEqual(stats.verification_completeness, self.dealer.verification_completeness)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sale.vehicle.available = False
+            sale.vehicle.save()
+        stats.refresh_from_db()
+        self.assertEqual(stats.live_sale_listings, 0)
+        self.assertEqual(check_drift(), [])
+
+    def test_drift_detected_and_fixed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            listing = self.make_listing(approved=True, verified=True)
+        # update() skips signals, leaving the stored counts stale
+        Listing.objects.filter(pk=listing.pk).update(approved=False)
+        DealershipStats.objects.filter(dealership=self.dealer).update(review_count=7)
+
+        drift = {(field, stored, expected) for _, field, stored, expected in check_drift()}
+        self.assertEqual(drift, {('live_sale_listings', 1, 0), ('review_count', 7, 0)})
+
+        call_command('check_dealership_stats', '--fix', stdout=open('/dev/null', 'w'))
+        self.assertEqual(check_drift(), [])
+        stats = DealershipStats.objects.get(dealership=self.dealer)
+        self.assertEqual((stats.live_sale_listings, stats.review_count), (0, 0))
+
+    def test_storefront_reads_stats(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(5):
+                self.make_listing(approved=True, verified=True)
+            for _ in range(3):
+                self.review(communication=5)
+        self.client.force_login(self.customer.user)
+
+        response = self.client.get(f'/api/v1/listings/dealer/{self.dealer.uuid}/')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()['data']
+        self.assertEqual(data['stats']['live_sale_listings'], 5)
+        self.assertEqual(data['stats']['review_count'], 3)
+        self.assertEqual(data['avg_rating'], 5.0)
+
+        # the query count does not grow with the dealer's reviews
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(5):
+                self.review(support=4)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(f'/api/v1/listings/dealer/{self.dealer.uuid}/')
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(5):
+                self.review(support=4)
+        with self.assertNumQueries(len(ctx.captured_queries)):
+            self.client.get(f'/api/v1/listings/dealer/{self.dealer.uuid}/')
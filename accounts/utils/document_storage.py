@@ -7,15 +7,35 @@ from typing import Optional, Dict, Any, Tuple
 from django.conf import settings
 from django.core.files.uploadedfile import UploadedFile
 from django.utils import timezone
-import cloudinary
-import cloudinary.uploader
-import cloudinary.utils
 from cloudinary.exceptions import Error as CloudinaryError
 
+from utils.lazy import LazyResource
+
 
 logger = logging.getLogger(__name__)
 
 
+def _configure_cloudinary():
+    """Import the upload/admin APIs and apply CLOUDINARY_STORAGE credentials once."""
+    import cloudinary
+    import cloudinary.api
+    import cloudinary.uploader
+    import cloudinary.utils
+
+    storage = getattr(settings, 'CLOUDINARY_STORAGE', None) or {}
+    if storage.get('CLOUD_NAME'):
+        cloudinary.config(
+            cloud_name=storage['CLOUD_NAME'],
+            api_key=storage.get('API_KEY'),
+            api_secret=storage.get('API_SECRET'),
+            secure=storage.get('SECURE', True),
+        )
+    return cloudinary
+
+
+cloudinary = LazyResource(_configure_cloudinary, name='Cloudinary')
+
+
 class CloudinaryDocumentStorage:
     """
     Handles Cloudinary document operations for business verification
@@ -1,12 +1,12 @@
 from django.shortcuts import render, get_object_or_404
 from django.utils.timezone import now
-from django.db.models import Q
+from django.db.models import Prefetch, Q
 import uuid
 from rest_framework.response import Response
 from django.db.models import QuerySet
 from django.contrib.auth import authenticate, login, logout
 from utils.sms import send_sms
-from utils.location import haversine
+from wallet import ledger
 from wallet.gateway.payment_adapter import PaystackAdapter
 from utils.mail import send_email
 from django_filters.rest_framework import DjangoFilterBackend
@@ -57,6 +57,7 @@ from ..models import(
 from accounts.api.filters import (
     MechanicFilter,
 )
+from accounts.ranking import ranked_mechanics, within_radius
 
 class MechanicListView(ListAPIView):
     pagination_class = OffsetPaginator
@@ -74,66 +75,30 @@ class MechanicListView(ListAPIView):
     def get_queryset(self):
         request = self.request
         
-        # Base queryset with optimization for related objects
-        queryset = Mechanic.objects.select_related('user', 'location').prefetch_related('services')
+        # Base queryset with optimization for related objects; ``stats`` carries
+        # the precomputed jobs / price / rating figures the serializer shows
+        queryset = Mechanic.objects.select_related('user', 'location', 'stats').prefetch_related(
+            'services', Prefetch('job_history', queryset=ServiceBooking.objects.only('id'))
+        )
+        ordering = request.GET.get('ordering', 'relevance')
 
         lat_raw = request.GET.get('lat')
         lng_raw = request.GET.get('lng')
 
-        if not lat_raw or not lng_raw:
-            return queryset
-
         try:
-            user_lat = float(lat_raw)
-            user_lng = float(lng_raw)
+            user_lat = float(lat_raw) if lat_raw else None
+            user_lng = float(lng_raw) if lng_raw else None
         except (ValueError, TypeError):
-            return queryset
-
-        # 1. Bounding Box Optimization (Database Level)
-        # Roughly 1 degree = 111km. 30km is approx 0.27 degrees.
-        # This drastically reduces the O(n) loop in Python.
-        delta = 0.3 
-
-        # 2. Precise Haversine Filtering (Python Level)
-        # Only loop through mechanics that actually have coordinates.
-        coords_qs = queryset.filter(location__lat__isnull=False, location__lng__isnull=False)
-        coords_qs = coords_qs.filter(
-            location__lat__gte=user_lat - delta,
-            location__lat__lte=user_lat + delta,
-            location__lng__gte=user_lng - delta,
-            location__lng__lte=user_lng + delta
-        )
+            user_lat = user_lng = None
 
-        exclude_uuids = []
-        near_uuids = []
-        for mech in coords_qs:
-            dist = haversine(
-                user_lat,
-                user_lng,
-                float(mech.location.lat),
-                float(mech.location.lng),
-            )
-            if dist > 30:
-                exclude_uuids.append(mech.uuid)
-            else:
-                near_uuids.append(mech.uuid)
-
-        # Include:
-        # - mechanics within 30km (near_uuids)
-        # - mechanics without coordinates (fallback to location text filtering on frontend)
-        return queryset.filter(
-            Q(uuid__in=near_uuids)
-            | Q(location__lat__isnull=True)
-            | Q(location__lng__isnull=True)
-        ).exclude(uuid__in=exclude_uuids)
-                # results.append({
-                #     "id": m.id,
-                #     "name": m.name,
-                #     "distance_km": round(dist, 2)
-                # })
-
-        # results.sort(key=lambda x: x["distance_km"])
-        return mechanics
+        if user_lat is None or user_lng is None:
+            return ranked_mechanics(queryset, ordering=ordering)
+
+        # Distance is computed in SQL: mechanics within the ranking radius
+        # plus mechanics without coordinates (fallback to location text
+        # filtering on frontend)
+        queryset = within_radius(queryset, user_lat, user_lng)
+        return ranked_mechanics(queryset, user_lat, user_lng, ordering=ordering)
 
     def get(self, request, *args, **kwargs):
         try:
@@ -156,7 +121,7 @@ class MechanicListView(ListAPIView):
             reviews = Review.objects.filter(
                 object_type='mechanic', 
                 related_object__in=mechanic_uuids
-            ).select_related('reviewer').prefetch_related('rating_items')
+            ).select_related('reviewer', 'reviewer__customer_profile').prefetch_related('rating_items')
             
             # Group reviews by mechanic uuid
             reviews_by_mech = {}
@@ -202,7 +167,7 @@ class MechanicSearchView(ListAPIView):
 
     def get_queryset(self):
         find = self.request.GET.get('find', None)
-        qs = Mechanic.objects.all()
+        qs = Mechanic.objects.select_related('user', 'location', 'stats')
         if find:
             qs = qs.filter(
                 Q(user__first_name__icontains=find) |
@@ -211,6 +176,9 @@ class MechanicSearchView(ListAPIView):
             ).distinct()
         
         print("Matches:", qs)
+        ordering = self.request.GET.get('ordering')
+        if ordering:
+            qs = ranked_mechanics(qs, ordering=ordering)
         return qs
 
             
@@ -367,7 +335,12 @@ class MechanicProfileView(APIView):
                     tx_ref=tx_ref[:40],
                     narration=f'Mechanic booking payment - {mech.business_name or mech.user.name}'[:200],
                 )
-                user_wallet.apply_transaction(payment_transaction)
+                try:
+                    user_wallet.apply_transaction(payment_transaction)
+                except ledger.InsufficientFunds:
+                    # a concurrent debit won the race after the balance check
+                    db_transaction.set_rollback(True)
+                    return Response({'error': True, 'message': 'Insufficient wallet balance'}, status=400)
             payment_status = 'paid'
 
         elif payment_method == 'cash':
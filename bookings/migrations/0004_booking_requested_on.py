@@ -0,0 +1,28 @@
+# Generated by Django 5.1.1 on 2026-10-18 22:13
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def clear_existing(apps, schema_editor):
+    # date_created is auto_now, so existing rows have no record of when they
+    # were requested; leave them out of response-time stats rather than
+    # stamping the migration time on them
+    ServiceBooking = apps.get_model('bookings', 'ServiceBooking')
+    ServiceBooking.objects.update(requested_on=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0003_servicebooking_payment_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicebooking',
+            name='requested_on',
+            field=models.DateTimeField(blank=True, default=django.utils.timezone.now, editable=False, null=True),
+        ),
+        migrations.RunPython(clear_existing, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from utils.models import DbModel
 # Create your models here.
  
@@ -53,6 +54,7 @@ class ServiceBooking(DbModel):
 
     completed = models.BooleanField(default=False) # marked by client approval
     booking_status = models.CharField(max_length=20, default='requested', choices=BOOKING_STATUS)
+    requested_on = models.DateTimeField(default=timezone.now, null=True, blank=True, editable=False) # date_created moves on every save
     started_on = models.DateTimeField(blank=True, null=True) # date of contract start
     responded_on = models.DateTimeField(blank=True, null=True) # accept/decline request date
     ended_on = models.DateTimeField(blank=True, null=True) # date of service completion
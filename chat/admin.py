@@ -3,6 +3,7 @@ from .models import (
     ChatAttachment,    
     ChatMessage,    
     ChatRoom,
+    ChatReadMarker,
 )
 from utils.admin import veyu_admin
 # Register your models here.
@@ -10,3 +11,4 @@ from utils.admin import veyu_admin
 veyu_admin.register(ChatAttachment)
 veyu_admin.register(ChatMessage)
 veyu_admin.register(ChatRoom)
+veyu_admin.register(ChatReadMarker)
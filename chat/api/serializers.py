@@ -1,3 +1,4 @@
+from django.utils.timesince import timesince
 from rest_framework.serializers import (
 	ModelSerializer,
 	SerializerMethodField,
@@ -9,6 +10,7 @@ from ..models import (
 	ChatAttachment
 )
 from accounts.models import Account
+from ..history import get_history
 
 
 class ChatAttachmentSerializer(ModelSerializer):
@@ -35,6 +37,20 @@ class ChatMessageSerializer(ModelSerializer):
 		fields = ['sender', 'attachments', 'text', 'room', 'uuid', 'id', 'sent']
 
 
+class ChatHistoryMessageSerializer(ModelSerializer):
+	"""Message payload for paginated history; the room is implied by the URL."""
+	sender = StringRelatedField()
+	sender_id = SerializerMethodField()
+	attachments = ChatAttachmentSerializer(many=True)
+
+	class Meta:
+		model = ChatMessage
+		fields = ['sender', 'sender_id', 'attachments', 'text', 'message_type', 'uuid', 'id', 'sent', 'date_created']
+
+	def get_sender_id(self, obj):
+		return obj.sender.uuid if obj.sender else None
+
+
 class ChatMemberSerializer(ModelSerializer):
 	image = SerializerMethodField()
 	name = SerializerMethodField()
@@ -68,39 +84,60 @@ class ChatMemberSerializer(ModelSerializer):
 
 
 class ChatRoomSerializer(ModelSerializer):
-	messages = ChatMessageSerializer(source='room_messages', many=True)
+	messages = SerializerMethodField()
+	next_cursor = SerializerMethodField()
 	members = ChatMemberSerializer(many=True)
 
 	class Meta:
 		model = ChatRoom
 		fields = '__all__'
 
+	def _latest_page(self, obj):
+		# only the most recent page is embedded; older messages are fetched
+		# through the history endpoint using next_cursor
+		if not hasattr(obj, '_history_page'):
+			obj._history_page = get_history(obj, limit=self.context.get('limit'))
+		return obj._history_page
+
+	def get_messages(self, obj):
+		return ChatHistoryMessageSerializer(self._latest_page(obj)['messages'], many=True, context=self.context).data
+
+	def get_next_cursor(self, obj):
+		return self._latest_page(obj)['next_cursor']
+
 
 class ChatRoomListSerializer(ModelSerializer):
+	"""Expects rooms from chat.history.room_list_queryset."""
 	last_message = SerializerMethodField()
 	recipient = SerializerMethodField()
+	unread_count = SerializerMethodField()
 
 	class Meta:
 		model = ChatRoom
-		fields = ['uuid', 'id', 'last_message', 'recipient']
+		fields = ['uuid', 'id', 'last_message', 'recipient', 'unread_count']
 
 	def get_last_message(self, obj):
-		# Use room_messages (reverse relation) instead of messages (M2M field)
-		message = obj.room_messages.order_by('-date_created').first()
-		if message:
+		if getattr(obj, 'last_message_at', None):
 			return {
-				'message': message.text,
-				'date': message.sent
+				'message': obj.last_message_text,
+				'date': timesince(obj.last_message_at)
 			}
 		return None
 
+	def get_unread_count(self, obj):
+		return getattr(obj, 'unread_count', 0)
+
 	def get_recipient(self, obj):
 		request = self.context.get('request', None)
 		if not request:
 			raise Exception("request context missing for <serializer: ChatRoomListSerializer>")
 
 		user = request.user
-		other_person = obj.members.exclude(email__iexact=user.email).first()
+		# members are prefetched, so filter in Python rather than re-querying
+		other_person = next(
+			(member for member in obj.members.all() if member.email.lower() != user.email.lower()),
+			None
+		)
 		
 		# Handle case where there's no other person (shouldn't happen, but defensive)
 		if not other_person:
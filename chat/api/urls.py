@@ -4,6 +4,8 @@ from .views import (
 	chat_room_view,
 	new_chat_view,
 	send_message_view,
+	chat_history_view,
+	mark_room_read_view,
 )
 
 app_name = 'chat_api'
@@ -13,6 +15,8 @@ urlpatterns = [
 	path('message/', send_message_view),
 	path('new/', new_chat_view),
 	path('chats/<room_id>/', chat_room_view),
+	path('chats/<room_id>/messages/', chat_history_view),
+	path('chats/<room_id>/read/', mark_room_read_view),
 ]
 
 
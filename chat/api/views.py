@@ -6,29 +6,32 @@ from rest_framework.decorators import (
 )
 from ..models import ChatRoom, ChatMessage
 from .serializers import (
+	ChatHistoryMessageSerializer,
 	ChatMessageSerializer,
 	ChatRoomSerializer,
 	ChatRoomListSerializer,
 )
+from ..history import (
+	get_history,
+	get_messages_after,
+	mark_room_read,
+	room_list_queryset,
+)
 from django.db.models import Count, Q
 from rest_framework.response import Response
 from rest_framework.permissions import (
 	IsAuthenticated,
 )
 from accounts.models import Dealership, Customer, Mechanic, Account
-from feedback.models import create_and_send_user_notifications
-from accounts.utils.email_notifications import send_simple_email, send_security_alert
+from feedback.delivery import notify
+from accounts.utils.email_notifications import send_security_alert
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def chats_view(request):
 	user = request.user
-	# Filter for rooms where user is a member AND there are at least 2 members
-	# Fix: Annotate BEFORE filtering by members to ensure count includes all members
-	rooms = ChatRoom.objects.annotate(
-		member_count=Count('members')
-	).filter(members__in=[user]).filter(member_count__gte=2)
-	
+	# rooms with at least 2 members, annotated with last message and unread count
+	rooms = room_list_queryset(user)
 	rooms = ChatRoomListSerializer(rooms, many=True, context={'request': request}).data
 	data = {
 		'error': False,
@@ -104,33 +107,21 @@ def send_message_view(request, room_id=None):
 		message_type='user',
 		text=message_text
 	)
-	room.messages.add(message,)
 	room.save()
 
 	recipients = room.members.exclude(id=request.user.id)
 	for recipient in recipients:
-		create_and_send_user_notifications(
-			user=recipient,
-			subject="New message",
-			message=f"{request.user.name or request.user.email}: {message_text}",
-			level="info",
+		notify(
+			recipient, 'chat', "New message", f"{request.user.name or request.user.email}: {message_text}",
 			cta_link=f"/chat/{room.uuid}",
+			channels=['in-app', 'push'] + (['email'] if recipient.user_type == 'dealer' else []),
+			email_template="chat_new_message.html",
+			email_context={
+				"user_name": recipient.first_name or recipient.email,
+				"sender_name": request.user.name or request.user.email,
+				"message_preview": message_text[:200],
+			},
 		)
-
-		if recipient.user_type == 'dealer':
-			try:
-				send_simple_email(
-					subject="New chat message on Veyu",
-					recipients=[recipient.email],
-					template_name="chat_new_message.html",
-					context={
-						"user_name": recipient.first_name or recipient.email,
-						"sender_name": request.user.name or request.user.email,
-						"message_preview": message_text[:200],
-					},
-				)
-			except Exception:
-				pass
 	
 	return Response({'error': False, 'message': 'Message sent!', 'data': {'room_id': str(room.uuid)}}, 200)
 
@@ -170,36 +161,22 @@ def new_chat_view(request):
 		sender=sender
 	)
 	message.save()
-
-	# add message to room
-	room.messages.add(message,)
 	room.save()
 
 	recipients = room.members.exclude(id=sender.id)
 	for recipient in recipients:
-		create_and_send_user_notifications(
-			user=recipient,
-			subject="New message",
-			message=f"{sender.name or sender.email}: {text}",
-			level="info",
+		notify(
+			recipient, 'chat', "New message", f"{sender.name or sender.email}: {text}",
 			cta_link=f"/chat/{room.uuid}",
+			channels=['in-app', 'push'] + (['email'] if recipient.user_type == 'dealer' else []),
+			email_template="chat_new_message.html",
+			email_context={
+				"user_name": recipient.first_name or recipient.email,
+				"sender_name": sender.name or sender.email,
+				"message_preview": text[:200],
+			},
 		)
 
-		if recipient.user_type == 'dealer':
-			try:
-				send_simple_email(
-					subject="New chat message on Veyu",
-					recipients=[recipient.email],
-					template_name="chat_new_message.html",
-					context={
-						"user_name": recipient.first_name or recipient.email,
-						"sender_name": sender.name or sender.email,
-						"message_preview": text[:200],
-					},
-				)
-			except Exception:
-				pass
-
 	# dispatch a signal (in a thread)
 	data = {
 		'error': False,
@@ -213,7 +190,7 @@ def new_chat_view(request):
 def chat_room_view(request, room_id):
 	user = request.user
 	room = ChatRoom.objects.get(uuid=room_id)
-	room = ChatRoomSerializer(room, context={'request': request}).data
+	room = ChatRoomSerializer(room, context={'request': request, 'limit': request.GET.get('limit')}).data
 	data = {
 		'error': False,
 		'data': room
@@ -221,4 +198,61 @@ def chat_room_view(request, room_id):
 	return Response(data)
 
 
+def _get_member_room(user, room_id):
+	return ChatRoom.objects.filter(uuid=room_id, members=user).first()
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def chat_history_view(request, room_id):
+	"""
+	Cursor-paginated message history.
+	?before=<message_id> loads older messages, ?after=<message_id> returns
+	messages newer than the client's last one (delta sync).
+	"""
+	room = _get_member_room(request.user, room_id)
+	if room is None:
+		return Response({'error': True, 'message': 'Chat room not found'}, 404)
+
+	before = request.GET.get('before')
+	after = request.GET.get('after')
+	limit = request.GET.get('limit')
+	try:
+		if after is not None:
+			page = get_messages_after(room, int(after), limit=limit)
+		else:
+			page = get_history(room, before=int(before) if before is not None else None, limit=limit)
+	except ValueError:
+		return Response({'error': True, 'message': 'before and after must be message ids'}, 400)
+
+	data = {
+		'error': False,
+		'data': {
+			'messages': ChatHistoryMessageSerializer(page['messages'], many=True, context={'request': request}).data,
+			'next_cursor': page['next_cursor'],
+			'has_more': page['has_more'],
+		}
+	}
+	return Response(data)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def mark_room_read_view(request, room_id):
+	room = _get_member_room(request.user, room_id)
+	if room is None:
+		return Response({'error': True, 'message': 'Chat room not found'}, 404)
+
+	message_id = request.data.get('message_id')
+	try:
+		marker = mark_room_read(room, request.user, int(message_id) if message_id is not None else None)
+	except ValueError:
+		return Response({'error': True, 'message': 'message_id must be a message id'}, 400)
+
+	return Response({
+		'error': False,
+		'data': {'last_read_message_id': marker.last_read_message_id if marker else None}
+	})
+
+
 
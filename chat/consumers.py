@@ -1,4 +1,5 @@
 import json
+import logging
 from urllib.parse import parse_qs
 from channels.generic.websocket import (
     WebsocketConsumer,
@@ -15,23 +16,60 @@ from rest_framework.authtoken.models import Token
 from .api.serializers import (
     ChatMessageSerializer,
 )
-from feedback.models import create_and_send_user_notifications
-from accounts.utils.email_notifications import send_simple_email
+from feedback import inbox
+from feedback.delivery import notify
+from utils import metrics
 
+logger = logging.getLogger(__name__)
 
-class LiveEventRelayConsumer(WebsocketConsumer):
+
+class TrackedConnectionMixin:
+    """Counts accepted connections in the ``channels_connections`` gauge."""
+
+    def accept(self, *args, **kwargs):
+        super().accept(*args, **kwargs)
+        if not getattr(self, '_tracked', False):
+            self._tracked = True
+            metrics.track_connection(type(self).__name__, 1)
+
+    def websocket_disconnect(self, message):
+        if getattr(self, '_tracked', False):
+            self._tracked = False
+            metrics.track_connection(type(self).__name__, -1)
+        super().websocket_disconnect(message)
+
+
+class LiveEventRelayConsumer(TrackedConnectionMixin, JsonWebsocketConsumer):
     # for live notifications
     # use to update icon badges and show alert when user
     # is on page and update online status of other users
     def connect(self):
-        # when a new connection is formed
-        # if user.is_authenticated
-        # if user.is_offline, user.online=True
-        pass
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            self.close()
+            return
+        self.inbox_group_name = inbox.group_name(user.pk)
+        async_to_sync(self.channel_layer.group_add)(
+            self.inbox_group_name,
+            self.channel_name
+        )
+        self.accept()
+        # the current count, then every change as it commits
+        self.send_json({'type': 'inbox.counter', 'unread': inbox.unread_count(user)})
 
+    def disconnect(self, close_code):
+        if hasattr(self, 'inbox_group_name'):
+            async_to_sync(self.channel_layer.group_discard)(
+                self.inbox_group_name,
+                self.channel_name
+            )
 
+    def inbox_counter(self, event):
+        self.send_json({'type': 'inbox.counter', 'unread': event['unread']})
 
-class SupportLiveChatConsumer(WebsocketConsumer):
+
+
+class SupportLiveChatConsumer(TrackedConnectionMixin, WebsocketConsumer):
     def connect(self):
         token = self.scope["query_string"].decode().split("token=")[-1]
 
@@ -77,7 +115,7 @@ class SupportLiveChatConsumer(WebsocketConsumer):
         self.send(text_data=json.dumps({"message": message}))
 
 
-class LiveChatConsumer(JsonWebsocketConsumer):
+class LiveChatConsumer(TrackedConnectionMixin, JsonWebsocketConsumer):
     def connect(self):
         print(f"connecting {self.scope['user']}")
         self.room_name = self.scope["url_route"]["kwargs"]["room_id"]
@@ -133,7 +171,6 @@ class LiveChatConsumer(JsonWebsocketConsumer):
                 sender=self.scope['user']
             )
             message.save()
-            self.room.messages.add(message,)
             self.room.save()
 
             data = ChatMessageSerializer(message).data
@@ -142,34 +179,25 @@ class LiveChatConsumer(JsonWebsocketConsumer):
                 {"type": "chat.message", "data": data}
             )
 
-            # Send Push Notification to offline members
+            # Notify the other members; feedback.delivery caps and digests
+            # bursts of chat notifications per each recipient's preferences
             recipients = self.room.members.exclude(id=user.id)
             for recipient in recipients:
                 try:
-                    create_and_send_user_notifications(
-                        user=recipient,
-                        subject="New message",
-                        message=f"{user.name or user.email}: {message.text}",
-                        level="info",
+                    channels = ['in-app', 'push'] + (['email'] if recipient.user_type == 'dealer' else [])
+                    notify(
+                        recipient, 'chat', "New message", f"{user.name or user.email}: {message.text}",
                         cta_link=f"/chat/{self.room.uuid}",
+                        channels=channels,
+                        email_template="chat_new_message.html",
+                        email_context={
+                            "user_name": recipient.first_name or recipient.email,
+                            "sender_name": user.name or user.email,
+                            "message_preview": message.text[:200],
+                        },
                     )
-
-                    if recipient.user_type == 'dealer':
-                        try:
-                            send_simple_email(
-                                subject="New chat message on Veyu",
-                                recipients=[recipient.email],
-                                template_name="chat_new_message.html",
-                                context={
-                                    "user_name": recipient.first_name or recipient.email,
-                                    "sender_name": user.name or user.email,
-                                    "message_preview": message.text[:200],
-                                },
-                            )
-                        except Exception as e:
-                            print(f"Error sending email to dealer: {e}")
                 except Exception as e:
-                    print(f"Error sending push notification: {e}")
+                    logger.error(f"Error sending chat notification: {str(e)}", exc_info=True)
 
     # Receive message from room group
     def chat_message(self, event):
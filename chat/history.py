@@ -0,0 +1,161 @@
+"""
+Chat history access.
+
+Messages are always read through the ``ChatMessage.room`` foreign key and
+paginated with a keyset cursor over ``(date_created, id)`` so that opening a
+long-running conversation never loads the whole room. The cursor is the id of
+a boundary message; the index on ``(room, date_created)`` serves both
+directions.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Prefetch, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from accounts.models import Account
+from .models import ChatMessage, ChatReadMarker, ChatRoom
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def _page_size(limit):
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def _message_queryset(room):
+    return (
+        ChatMessage.objects
+        .filter(room=room)
+        .select_related('sender')
+        .prefetch_related('attachments')
+    )
+
+
+def _pivot(room, message_id):
+    return (
+        ChatMessage.objects
+        .filter(room=room, id=message_id)
+        .values('date_created', 'id')
+        .first()
+    )
+
+
+def get_history(room, before=None, limit=None):
+    """
+    Return a page of messages older than ``before`` (or the latest page).
+
+    Messages are returned oldest-first so they can be rendered directly.
+    ``next_cursor`` is the id to pass as ``before`` to load the previous
+    page, or ``None`` once the start of the conversation is reached.
+    """
+    limit = _page_size(limit)
+    queryset = _message_queryset(room)
+
+    if before is not None:
+        pivot = _pivot(room, before)
+        if pivot is None:
+            return {'messages': [], 'next_cursor': None, 'has_more': False}
+        queryset = queryset.filter(
+            Q(date_created__lt=pivot['date_created'])
+            | Q(date_created=pivot['date_created'], id__lt=pivot['id'])
+        )
+
+    page = list(queryset.order_by('-date_created', '-id')[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+    page.reverse()
+    return {
+        'messages': page,
+        'next_cursor': page[0].id if has_more and page else None,
+        'has_more': has_more,
+    }
+
+
+def get_messages_after(room, after, limit=None):
+    """
+    Delta sync: return messages newer than message ``after``, oldest-first.
+
+    Clients call this with the id of the last message they hold and keep
+    following ``next_cursor`` while ``has_more`` is true.
+    """
+    limit = _page_size(limit)
+    pivot = _pivot(room, after)
+    if pivot is None:
+        return {'messages': [], 'next_cursor': None, 'has_more': False}
+
+    queryset = _message_queryset(room).filter(
+        Q(date_created__gt=pivot['date_created'])
+        | Q(date_created=pivot['date_created'], id__gt=pivot['id'])
+    )
+    page = list(queryset.order_by('date_created', 'id')[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+    return {
+        'messages': page,
+        'next_cursor': page[-1].id if has_more and page else None,
+        'has_more': has_more,
+    }
+
+
+def mark_room_read(room, member, message_id=None):
+    """
+    Move ``member``'s read marker to ``message_id`` (or the latest message).
+    The marker never moves backwards.
+    """
+    messages = ChatMessage.objects.filter(room=room)
+    if message_id is not None:
+        messages = messages.filter(id=message_id)
+    last_id = messages.order_by('-date_created', '-id').values_list('id', flat=True).first()
+    if last_id is None:
+        return None
+
+    marker, created = ChatReadMarker.objects.get_or_create(
+        room=room, member=member, defaults={'last_read_message_id': last_id}
+    )
+    if not created and (marker.last_read_message_id or 0) < last_id:
+        ChatReadMarker.objects.filter(pk=marker.pk).update(last_read_message_id=last_id)
+        marker.last_read_message_id = last_id
+    return marker
+
+
+def room_list_queryset(user):
+    """
+    Rooms ``user`` belongs to, annotated with the last message and the
+    user's unread count in a single query. Members are prefetched with
+    their business profiles so recipients can be resolved without extra
+    queries per room.
+    """
+    latest = ChatMessage.objects.filter(room=OuterRef('pk')).order_by('-date_created', '-id')
+    last_read = ChatReadMarker.objects.filter(
+        room=OuterRef(OuterRef('pk')), member=user
+    ).values('last_read_message_id')[:1]
+    unread = (
+        ChatMessage.objects
+        .filter(room=OuterRef('pk'))
+        .exclude(sender=user)
+        .filter(id__gt=Coalesce(Subquery(last_read), Value(0)))
+        .order_by()
+        .values('room')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    members = Account.objects.select_related(
+        'customer_profile', 'dealership_profile', 'mechanic_profile'
+    )
+
+    return (
+        ChatRoom.objects
+        .filter(id__in=user.chat_rooms.values('id'))
+        .annotate(
+            member_count=Count('members'),
+            last_message_text=Subquery(latest.values('text')[:1]),
+            last_message_at=Subquery(latest.values('date_created')[:1]),
+            unread_count=Coalesce(Subquery(unread, output_field=IntegerField()), Value(0)),
+        )
+        .filter(member_count__gte=2)
+        .prefetch_related(Prefetch('members', queryset=members))
+        .order_by(F('last_message_at').desc(nulls_last=True), '-id')
+    )
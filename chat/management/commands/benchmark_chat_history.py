@@ -0,0 +1,73 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import Account
+from chat.history import get_history, get_messages_after, room_list_queryset
+from chat.models import ChatMessage, ChatRoom
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Benchmark chat history pagination against rooms holding a large number of messages. Runs inside a rolled back transaction."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=100_000, help='Messages per room (default: 100000)')
+        parser.add_argument('--rooms', type=int, default=2, help='Number of rooms to populate (default: 2)')
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--iterations', type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options)
+                raise _Rollback()
+        except _Rollback:
+            self.stdout.write(self.style.SUCCESS("Benchmark data rolled back."))
+
+    def _run(self, options):
+        total, page_size = options['messages'], options['page_size']
+        customer = Account.objects.create_user(email='bench-customer@veyu.test', password='bench-pass-123', first_name='Bench')
+        dealer = Account.objects.create_user(email='bench-dealer@veyu.test', password='bench-pass-123', first_name='Bench')
+
+        rooms = []
+        started = time.perf_counter()
+        for _ in range(options['rooms']):
+            room = ChatRoom.objects.create(room_type='sales-chat')
+            room.members.add(customer, dealer)
+            batch = [
+                ChatMessage(room=room, sender=customer if i % 2 else dealer, text=f'message {i}')
+                for i in range(total)
+            ]
+            ChatMessage.objects.bulk_create(batch, batch_size=5000)
+            rooms.append(room)
+        self.stdout.write(f"Seeded {len(rooms)} rooms x {total} messages in {time.perf_counter() - started:.2f}s")
+
+        room = rooms[0]
+        ids = list(ChatMessage.objects.filter(room=room).order_by('date_created', 'id').values_list('id', flat=True))
+        middle, near_end = ids[len(ids) // 2], ids[-page_size * 2]
+
+        self._measure('latest page', options['iterations'], lambda: get_history(room, limit=page_size))
+        self._measure('page before middle', options['iterations'], lambda: get_history(room, before=middle, limit=page_size))
+        self._measure('page before oldest+1', options['iterations'], lambda: get_history(room, before=ids[1], limit=page_size))
+        self._measure('delta sync after recent', options['iterations'], lambda: get_messages_after(room, near_end, limit=page_size))
+        self._measure('room list', options['iterations'], lambda: list(room_list_queryset(customer)))
+
+    def _measure(self, label, iterations, func):
+        timings = []
+        with CaptureQueriesContext(connection) as ctx:
+            for _ in range(iterations):
+                started = time.perf_counter()
+                func()
+                timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p50 = timings[len(timings) // 2]
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(
+            f"{label:<28} p50={p50:8.2f}ms p95={p95:8.2f}ms queries/call={len(ctx.captured_queries) / iterations:.1f}"
+        )
@@ -0,0 +1,83 @@
+# Generated by Django 5.1.1 on 2026-10-18 21:14
+
+import django.db.models.deletion
+import utils
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_room_fk(apps, schema_editor):
+    """Point every message linked through the legacy M2M at that room."""
+    ChatRoom = apps.get_model('chat', 'ChatRoom')
+    ChatMessage = apps.get_model('chat', 'ChatMessage')
+    links = ChatRoom.messages.through.objects.exclude(
+        chatmessage__room_id=models.F('chatroom_id')
+    ).values_list('chatmessage_id', 'chatroom_id')
+    for message_id, room_id in links.iterator(chunk_size=2000):
+        ChatMessage.objects.filter(pk=message_id).update(room_id=room_id)
+
+
+def restore_m2m_links(apps, schema_editor):
+    ChatRoom = apps.get_model('chat', 'ChatRoom')
+    ChatMessage = apps.get_model('chat', 'ChatMessage')
+    Through = ChatRoom.messages.through
+    batch = []
+    for message_id, room_id in ChatMessage.objects.values_list('id', 'room_id').iterator(chunk_size=2000):
+        batch.append(Through(chatroom_id=room_id, chatmessage_id=message_id))
+        if len(batch) >= 2000:
+            Through.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        Through.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatReadMarker',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(blank=True, default=utils.make_UUID)),
+                ('date_created', models.DateTimeField(auto_now=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Chat Read Marker',
+                'verbose_name_plural': 'Chat Read Markers',
+            },
+        ),
+        migrations.RunPython(backfill_room_fk, restore_m2m_links),
+        migrations.RemoveField(
+            model_name='chatroom',
+            name='messages',
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['room', 'date_created'], name='chat_msg_room_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='chatreadmarker',
+            name='last_read_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chat.chatmessage'),
+        ),
+        migrations.AddField(
+            model_name='chatreadmarker',
+            name='member',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_read_markers', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='chatreadmarker',
+            name='room',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_markers', to='chat.chatroom'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='chatreadmarker',
+            unique_together={('room', 'member')},
+        ),
+    ]
@@ -11,7 +11,6 @@ class ChatRoom(DbModel):
     }
     room_type = models.CharField(max_length=200, default='sales-chat', choices=ROOM_TYPES)
     members = models.ManyToManyField('accounts.Account', blank=True, related_name='chat_rooms')
-    messages = models.ManyToManyField('ChatMessage', blank=True, related_name='chat_rooms')
 
     def __str__(self) -> str:
         member_count = self.members.count()
@@ -33,7 +32,7 @@ class ChatRoom(DbModel):
     @property
     def last_message_time(self):
         """Returns the time of the last message"""
-        last_message = self.room_messages.last()
+        last_message = self.room_messages.order_by('date_created', 'id').last()
         return last_message.date_created if last_message else None
     
     class Meta:
@@ -120,6 +119,28 @@ class ChatMessage(DbModel):
             models.Index(fields=['sender']),
             models.Index(fields=['message_type']),
             models.Index(fields=['date_created']),
+            models.Index(fields=['room', 'date_created'], name='chat_msg_room_created_idx'),
         ]
         ordering = ['date_created']
+
+
+class ChatReadMarker(DbModel):
+    """
+    Tracks the last message a member has read in a room.
+    Unread counts are derived from messages newer than this marker.
+    """
+    room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, related_name='read_markers')
+    member = models.ForeignKey('accounts.Account', on_delete=models.CASCADE, related_name='chat_read_markers')
+    last_read_message = models.ForeignKey(ChatMessage, on_delete=models.SET_NULL, blank=True, null=True, related_name='+')
+
+    def __str__(self):
+        return f"{self.member} read up to #{self.last_read_message_id} in {self.room.short_uuid}"
+
+    def __repr__(self):
+        return f"<ChatReadMarker: {self.member_id} - {self.room_id} - {self.last_read_message_id}>"
+
+    class Meta:
+        unique_together = ['room', 'member']
+        verbose_name = 'Chat Read Marker'
+        verbose_name_plural = 'Chat Read Markers'
     
\ No newline at end of file
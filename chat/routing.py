@@ -2,6 +2,7 @@ from django.urls import re_path
 
 from .consumers import (
     LiveChatConsumer,
+    LiveEventRelayConsumer,
     SupportLiveChatConsumer,
 )
 
@@ -10,6 +11,7 @@ from .consumers import (
 urlpatterns = [
     re_path(r"support/(?P<ticket_id>\w+)/$", SupportLiveChatConsumer.as_asgi()),
     re_path(r"chat/(?P<room_id>[\w-]+)/$", LiveChatConsumer.as_asgi()),
+    re_path(r"notifications/$", LiveEventRelayConsumer.as_asgi()),
 ]
 
 
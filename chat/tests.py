@@ -1,3 +1,89 @@
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from accounts.models import Account
+from .history import get_history, get_messages_after, mark_room_read, room_list_queryset
+from .models import ChatMessage, ChatRoom
+
+
+class ChatHistoryTestCase(TestCase):
+    """Cursor pagination, delta sync and room list annotations."""
+
+    def setUp(self):
+        self.customer = Account.objects.create_user(
+            email='customer@test.com', password='testpass123', first_name='Test', last_name='Customer'
+        )
+        self.dealer = Account.objects.create_user(
+            email='dealer@test.com', password='testpass123', first_name='Test', last_name='Dealer'
+        )
+        self.room = ChatRoom.objects.create(room_type='sales-chat')
+        self.room.members.add(self.customer, self.dealer)
+        ChatMessage.objects.bulk_create([
+            ChatMessage(room=self.room, sender=self.customer if i % 2 else self.dealer, text=f'message {i}')
+            for i in range(25)
+        ])
+        self.ids = list(
+            ChatMessage.objects.filter(room=self.room).order_by('date_created', 'id').values_list('id', flat=True)
+        )
+
+    def test_latest_page_is_oldest_first(self):
+        page = get_history(self.room, limit=10)
+        self.assertEqual([m.id for m in page['messages']], self.ids[-10:])
+        self.assertTrue(page['has_more'])
+        self.assertEqual(page['next_cursor'], self.ids[-10])
+
+    def test_walking_backwards_visits_every_message_once(self):
+        seen, cursor = [], None
+        while True:
+            page = get_history(self.room, before=cursor, limit=7)
+            seen = [m.id for m in page['messages']] + seen
+            if not page['has_more']:
+                break
+            cursor = page['next_cursor']
+        self.assertEqual(seen, self.ids)
+
+    def test_delta_sync_after_message(self):
+        page = get_messages_after(self.room, self.ids[19], limit=3)
+        self.assertEqual([m.id for m in page['messages']], self.ids[20:23])
+        self.assertEqual(page['next_cursor'], self.ids[22])
+        page = get_messages_after(self.room, page['next_cursor'], limit=3)
+        self.assertEqual([m.id for m in page['messages']], self.ids[23:])
+        self.assertFalse(page['has_more'])
+
+    def test_unknown_cursor_returns_empty_page(self):
+        self.assertEqual(get_history(self.room, before=10 ** 9)['messages'], [])
+        self.assertEqual(get_messages_after(self.room, 10 ** 9)['messages'], [])
+
+    def test_room_list_annotations_in_one_query(self):
+        mark_room_read(self.room, self.customer, self.ids[14])
+        with self.assertNumQueries(2):  # rooms + prefetched members
+            rooms = list(room_list_queryset(self.customer))
+            rooms[0].members.all()
+        room = rooms[0]
+        self.assertEqual(room.last_message_text, 'message 24')
+        # unread = messages after id[14] not sent by the customer (even indices)
+        expected = sum(1 for i in range(15, 25) if i % 2 == 0)
+        self.assertEqual(room.unread_count, expected)
+
+    def test_read_marker_never_moves_backwards(self):
+        mark_room_read(self.room, self.dealer)
+        marker = mark_room_read(self.room, self.dealer, self.ids[0])
+        self.assertEqual(marker.last_read_message_id, self.ids[-1])
+        self.assertEqual(room_list_queryset(self.dealer).get().unread_count, 0)
+
+    def test_history_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        response = client.get(f'/api/v1/chat/chats/{self.room.uuid}/messages/', {'before': self.ids[5], 'limit': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([m['id'] for m in response.data['data']['messages']], self.ids[2:5])
+
+        response = client.get(f'/api/v1/chat/chats/{self.room.uuid}/messages/', {'after': self.ids[-2]})
+        self.assertEqual([m['id'] for m in response.data['data']['messages']], self.ids[-1:])
+
+    def test_history_endpoint_requires_membership(self):
+        outsider = Account.objects.create_user(email='outsider@test.com', password='testpass123')
+        client = APIClient()
+        client.force_authenticate(outsider)
+        response = client.get(f'/api/v1/chat/chats/{self.room.uuid}/messages/')
+        self.assertEqual(response.status_code, 404)
@@ -7,6 +7,11 @@ from .models import (
     TicketCategory,
     Notification,
     Rating,
+    BusinessCalendar,
+    SLAPolicy,
+    NotificationCounter,
+    NotificationSettings,
+    NotificationPreference,
 )
 
 
@@ -23,11 +28,60 @@ class ReviewAdmin(admin.ModelAdmin):
     ]
 
 
+class SupportTicketAdmin(admin.ModelAdmin):
+    list_display = ['id', 'subject', 'status', 'severity_level', 'first_response_due_at', 'due_at', 'escalation_level']
+    list_filter = ['status', 'severity_level', 'category', 'sla_policy']
+    search_fields = ['subject', 'customer__user__email']
+    readonly_fields = [
+        'sla_started_at', 'sla_paused_at', 'first_response_due_at', 'first_responded_at',
+        'due_at', 'resolved_at', 'escalated_at', 'escalation_level',
+    ]
+
+
+class SLAPolicyAdmin(admin.ModelAdmin):
+    list_display = ['name', 'severity_level', 'category', 'calendar', 'first_response_minutes', 'resolution_minutes', 'is_active']
+    list_filter = ['is_active', 'severity_level', 'category']
+
+
+class BusinessCalendarAdmin(admin.ModelAdmin):
+    list_display = ['name', 'timezone', 'opens_at', 'closes_at']
+
+
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'subject', 'channel', 'category', 'level', 'read', 'archived', 'delivered_at', 'date_created']
+    list_filter = ['channel', 'category', 'level', 'read', 'archived']
+    raw_id_fields = ['user']
+
+
+class NotificationCounterAdmin(admin.ModelAdmin):
+    list_display = ['user', 'unread', 'last_updated']
+    raw_id_fields = ['user']
+    readonly_fields = ['unread']
+
+
+class NotificationSettingsAdmin(admin.ModelAdmin):
+    list_display = ['user', 'timezone', 'quiet_hours_start', 'quiet_hours_end', 'digest_hour']
+    search_fields = ['user__email']
+    raw_id_fields = ['user']
+
+
+class NotificationPreferenceAdmin(admin.ModelAdmin):
+    list_display = ['user', 'category', 'channel', 'mode']
+    list_filter = ['category', 'channel', 'mode']
+    search_fields = ['user__email']
+    raw_id_fields = ['user']
+
+
 # Register your models here.
 veyu_admin.register(Rating)
-veyu_admin.register(Notification)
+veyu_admin.register(Notification, NotificationAdmin)
+veyu_admin.register(NotificationCounter, NotificationCounterAdmin)
+veyu_admin.register(NotificationSettings, NotificationSettingsAdmin)
+veyu_admin.register(NotificationPreference, NotificationPreferenceAdmin)
 veyu_admin.register(Review, ReviewAdmin)
-veyu_admin.register(SupportTicket)
+veyu_admin.register(SupportTicket, SupportTicketAdmin)
+veyu_admin.register(SLAPolicy, SLAPolicyAdmin)
+veyu_admin.register(BusinessCalendar, BusinessCalendarAdmin)
 veyu_admin.register(Tag)
 veyu_admin.register(TicketCategory)
 
@@ -5,7 +5,10 @@ from ..models import (
     TicketCategory,
     Tag,
     Notification,
+    NotificationPreference,
+    NotificationSettings,
 )
+from ..delivery import CATEGORIES, CHANNELS
 
 from rest_framework.serializers import (
     ModelSerializer,
@@ -19,6 +22,7 @@ from rest_framework.serializers import (
 )
 
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError as DjangoValidationError
 
 Account = get_user_model()
 
@@ -121,6 +125,56 @@ class NotificationSerializer(ModelSerializer):
         fields = '__all__'
 
 
+class NotificationPreferenceSerializer(ModelSerializer):
+    class Meta:
+        model = NotificationPreference
+        fields = ('category', 'channel', 'mode')
+
+
+class NotificationSettingsSerializer(ModelSerializer):
+    preferences = NotificationPreferenceSerializer(many=True, required=False)
+
+    class Meta:
+        model = NotificationSettings
+        fields = ('timezone', 'quiet_hours_start', 'quiet_hours_end', 'digest_hour', 'preferences')
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # every category and channel, with the defaults filled in
+        chosen = {(p.category, p.channel): p.mode for p in instance.user.notification_preferences.all()}
+        data['preferences'] = [
+            {
+                'category': key,
+                'label': category.label,
+                'channel': channel,
+                'mode': chosen.get((key, channel), 'instant' if channel in category.channels else 'off'),
+                'critical': category.critical,
+            }
+            for key, category in CATEGORIES.items() for channel in CHANNELS
+        ]
+        return data
+
+    def validate(self, attrs):
+        instance = NotificationSettings(**{**{
+            field: getattr(self.instance, field) for field in ('timezone', 'quiet_hours_start', 'quiet_hours_end', 'digest_hour')
+        }, **{k: v for k, v in attrs.items() if k != 'preferences'}})
+        try:
+            instance.clean()
+        except DjangoValidationError as e:
+            raise ValidationError(e.message_dict)
+        return attrs
+
+    def update(self, instance, validated_data):
+        preferences = validated_data.pop('preferences', [])
+        instance = super().update(instance, validated_data)
+        for preference in preferences:
+            NotificationPreference.objects.update_or_create(
+                user=instance.user, category=preference['category'], channel=preference['channel'],
+                defaults={'mode': preference['mode']},
+            )
+        return instance
+
+
 class TagSerializer(ModelSerializer):
     class Meta:
         model = Tag
@@ -153,9 +207,13 @@ class SupportTicketSerializer(ModelSerializer):
             'id', 'uuid', 'customer', 'customer_name', 'customer_email',
             'status', 'status_display', 'severity_level', 'severity_display',
             'subject', 'tags', 'category', 'chat_room', 'correspondents',
-            'days_open', 'is_overdue', 'total_correspondents', 'date_created', 'last_updated'
+            'days_open', 'is_overdue', 'first_response_due_at', 'first_responded_at', 'due_at',
+            'resolved_at', 'escalation_level', 'total_correspondents', 'date_created', 'last_updated'
+        )
+        read_only_fields = (
+            'customer', 'chat_room', 'days_open', 'is_overdue', 'first_response_due_at', 'first_responded_at',
+            'due_at', 'resolved_at', 'escalation_level', 'total_correspondents',
         )
-        read_only_fields = ('customer', 'chat_room', 'days_open', 'is_overdue', 'total_correspondents')
     
     def get_customer_name(self, obj):
         return obj.customer.user.name if obj.customer and obj.customer.user else None
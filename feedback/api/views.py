@@ -7,6 +7,7 @@ from rest_framework.pagination import PageNumberPagination
 from django.shortcuts import get_object_or_404
 
 from ..models import SupportTicket, Tag, TicketCategory, Review
+from .. import sla
 from .serializers import (
     SupportTicketSerializer,
     SupportTicketCreateSerializer,
@@ -74,7 +75,7 @@ class SupportTicketViewSet(ModelViewSet):
         
         # Filter overdue tickets
         if self.request.query_params.get('overdue') == 'true':
-            queryset = [t for t in queryset if t.is_overdue]
+            queryset = queryset.filter(sla.overdue_q())
         
         return queryset.select_related('customer', 'category', 'chat_room').prefetch_related('tags', 'correspondents')
     
@@ -276,19 +277,7 @@ def ticket_stats(request):
             status=status.HTTP_403_FORBIDDEN
         )
     
-    tickets = SupportTicket.objects.all()
-    
-    stats = {
-        'total': tickets.count(),
-        'open': tickets.filter(status='open').count(),
-        'in_progress': tickets.filter(status='in-progress').count(),
-        'awaiting_user': tickets.filter(status='awaiting-user').count(),
-        'resolved': tickets.filter(status='resolved').count(),
-        'high_severity': tickets.filter(severity_level='high').count(),
-        'moderate_severity': tickets.filter(severity_level='moderate').count(),
-        'low_severity': tickets.filter(severity_level='low').count(),
-        'overdue': len([t for t in tickets if t.is_overdue]),
-    }
+    stats = sla.ticket_stats(SupportTicket.objects.all())
     
     return Response(stats)
 
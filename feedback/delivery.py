@@ -0,0 +1,279 @@
+"""
+Notification delivery policy.
+
+Every notification is sent through ``notify``, which asks ``decide`` what
+to do with it on each channel:
+
+    'send'      dispatch it now
+    'digest'    hold it until ``deliver_after`` and send it collapsed with
+                everything else due for the user on that channel
+    'skip'      the user opted out
+
+The rules, in order:
+
+1. The user's ``NotificationPreference`` for the category and channel, or
+   the category's default (``instant`` on its default channels, ``off``
+   elsewhere). ``off`` skips, except in-app for critical categories.
+2. In-app notifications only land in the inbox, so they are always sent.
+3. Critical categories (account, wallet) are always sent at once.
+4. ``digest`` mode holds the notification until the user's digest hour.
+5. Push and SMS are held until the end of the user's quiet hours.
+6. A category's rate cap per channel and hour holds the notification
+   until the oldest delivery in the window expires.
+
+``evaluate`` applies the rules to plain values and touches neither the
+database nor the clock, so the policy can be tested with a fake clock.
+``notify`` and ``send_digests`` take ``now`` and ``transports`` (channel
+name to callable) for the same reason; ``manage.py send_notification_digests``
+runs the digests.
+"""
+import logging
+from collections import defaultdict, namedtuple
+from dataclasses import dataclass, field
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+Category = namedtuple('Category', 'label channels rate_limits critical')
+
+# rate_limits: instant deliveries per channel per RATE_WINDOW
+CATEGORIES = {
+    'general': Category('General', {'in-app', 'push'}, {'push': 10}, False),
+    'account': Category('Account and security', {'in-app', 'push', 'email'}, {}, True),
+    'wallet': Category('Wallet and payments', {'in-app', 'push'}, {}, True),
+    'orders': Category('Orders and bookings', {'in-app', 'push', 'email'}, {'push': 20}, False),
+    'chat': Category('Chat messages', {'in-app', 'push', 'email'}, {'push': 5, 'email': 1}, False),
+    'listings': Category('New and featured listings', {'in-app', 'push'}, {'push': 3}, False),
+    'support': Category('Support tickets', {'in-app', 'push', 'email'}, {'push': 10}, False),
+    'marketing': Category('Newsletters and offers', {'email'}, {}, False),
+}
+CHANNELS = ('in-app', 'push', 'email', 'sms')
+MODES = ('instant', 'digest', 'off')
+QUIET_CHANNELS = {'push', 'sms'}
+RATE_WINDOW = timedelta(hours=1)
+
+
+@dataclass(frozen=True)
+class Preferences:
+    """A user's delivery settings, as plain values."""
+    timezone: str = 'Africa/Lagos'
+    quiet_start: time = None
+    quiet_end: time = None
+    digest_hour: int = 8
+    # (category, channel) -> mode, only where the user changed the default
+    modes: dict = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, user):
+        from feedback.models import NotificationPreference, NotificationSettings
+
+        settings = NotificationSettings.objects.filter(user=user).first()
+        modes = {
+            (category, channel): mode for category, channel, mode in
+            NotificationPreference.objects.filter(user=user).values_list('category', 'channel', 'mode')
+        }
+        if settings is None:
+            return cls(modes=modes)
+        return cls(
+            timezone=settings.timezone, quiet_start=settings.quiet_hours_start, quiet_end=settings.quiet_hours_end,
+            digest_hour=settings.digest_hour, modes=modes,
+        )
+
+    def mode(self, category, channel):
+        default = 'instant' if channel in CATEGORIES[category].channels else 'off'
+        return self.modes.get((category, channel), default)
+
+    def local(self, moment):
+        return moment.astimezone(ZoneInfo(self.timezone))
+
+    def in_quiet_hours(self, moment):
+        if self.quiet_start is None or self.quiet_end is None or self.quiet_start == self.quiet_end:
+            return False
+        now = self.local(moment).time()
+        if self.quiet_start < self.quiet_end:
+            return self.quiet_start <= now < self.quiet_end
+        # overnight, e.g. 22:00 to 07:00
+        return now >= self.quiet_start or now < self.quiet_end
+
+    def next_local(self, moment, at):
+        """The first ``at`` (local wall time) strictly after ``moment``."""
+        local = self.local(moment)
+        candidate = datetime.combine(local.date(), at, tzinfo=local.tzinfo)
+        if candidate <= local:
+            candidate = datetime.combine(local.date() + timedelta(days=1), at, tzinfo=local.tzinfo)
+        return candidate.astimezone(moment.tzinfo)
+
+
+@dataclass(frozen=True)
+class Decision:
+    channel: str
+    action: str
+    reason: str
+    deliver_after: datetime = None
+
+    @property
+    def sends(self):
+        return self.action == 'send'
+
+
+def evaluate(preferences, category, channel, now, recent=()):
+    """
+    The ``Decision`` for one notification. ``recent`` holds the times of
+    this user's instant deliveries in ``category`` on ``channel`` during
+    the last ``RATE_WINDOW``, oldest first.
+    """
+    if category not in CATEGORIES:
+        raise ValueError(f"Unknown notification category {category}")
+    if channel not in CHANNELS:
+        raise ValueError(f"Unknown notification channel {channel}")
+    spec = CATEGORIES[category]
+    mode = preferences.mode(category, channel)
+
+    if mode == 'off' and not (spec.critical and channel == 'in-app'):
+        return Decision(channel, 'skip', 'opted_out')
+    if channel == 'in-app':
+        return Decision(channel, 'send', 'inbox')
+    if spec.critical:
+        return Decision(channel, 'send', 'critical')
+    if mode == 'digest':
+        return Decision(channel, 'digest', 'digest', preferences.next_local(now, time(preferences.digest_hour)))
+    if channel in QUIET_CHANNELS and preferences.in_quiet_hours(now):
+        return Decision(channel, 'digest', 'quiet_hours', preferences.next_local(now, preferences.quiet_end))
+    limit = spec.rate_limits.get(channel)
+    if limit is not None and len(recent) >= limit:
+        return Decision(channel, 'digest', 'rate_limited', recent[-limit] + RATE_WINDOW)
+    return Decision(channel, 'send', 'instant')
+
+
+def recent_deliveries(user, category, channel, now):
+    from feedback.models import Notification
+
+    return list(
+        Notification.objects.filter(
+            user=user, category=category, channel=channel, deliver_after__isnull=True,
+            delivered_at__gt=now - RATE_WINDOW, delivered_at__lte=now,
+        ).order_by('delivered_at').values_list('delivered_at', flat=True)
+    )
+
+
+def decide(user, category, channel, now=None, preferences=None):
+    """What to do with a ``category`` notification for ``user`` on ``channel`` at ``now``."""
+    now = now or timezone.now()
+    preferences = preferences or Preferences.load(user)
+    recent = ()
+    if channel != 'in-app' and CATEGORIES.get(category, CATEGORIES['general']).rate_limits.get(channel) is not None:
+        recent = recent_deliveries(user, category, channel, now)
+    return evaluate(preferences, category, channel, now, recent)
+
+
+# dispatch
+
+def _send(notification, template=None, context=None):
+    if notification.channel == 'email' and template:
+        from utils.mail import send_email
+
+        return send_email(subject=notification.subject, recipients=[notification.user.email], template=template, context=context or {})
+    return notification.send()
+
+
+TRANSPORTS = {'push': _send, 'email': _send, 'sms': _send}
+
+
+def notify(user, category, subject, message, *, level='info', cta_text=None, cta_link=None, channels=None,
+           email_template=None, email_context=None, now=None, transports=None):
+    """
+    Deliver a notification on ``channels`` (the category's defaults when
+    None) as ``decide`` allows. Returns the ``Notification`` rows created:
+    sent, held for a digest, or just stored in-app.
+    """
+    from feedback.models import Notification
+
+    now = now or timezone.now()
+    transports = transports or TRANSPORTS
+    preferences = Preferences.load(user)
+    channels = channels if channels is not None else sorted(CATEGORIES[category].channels)
+
+    notifications = []
+    for channel in channels:
+        decision = decide(user, category, channel, now, preferences)
+        if decision.action == 'skip':
+            continue
+        notification = Notification.objects.create(
+            user=user, subject=subject, message=message, level=level, cta_text=cta_text, cta_link=cta_link,
+            channel=channel, category=category, deliver_after=decision.deliver_after,
+            delivered_at=now if decision.sends else None,
+        )
+        notifications.append(notification)
+        if decision.sends and channel != 'in-app':
+            try:
+                transports[channel](notification, template=email_template, context=email_context)
+            except Exception as e:
+                logger.error(f"Failed to send {channel} notification {notification.pk} to {user.email}: {e}")
+    return notifications
+
+
+def send_digests(now=None, transports=None, batch_size=500):
+    """
+    Send every held notification that is due as one digest per user and
+    channel. Users who are in quiet hours again are held until they end.
+    Returns the number of digests sent.
+    """
+    from feedback.models import Notification
+
+    now = now or timezone.now()
+    transports = transports or TRANSPORTS
+    due = Notification.objects.filter(delivered_at__isnull=True, deliver_after__lte=now).exclude(channel='in-app')
+
+    groups = defaultdict(list)
+    for pk, user_id, channel in due.order_by('user_id', 'channel', 'pk').values_list('pk', 'user_id', 'channel').iterator(chunk_size=batch_size):
+        groups[(user_id, channel)].append(pk)
+
+    sent = 0
+    for (user_id, channel), pks in groups.items():
+        with transaction.atomic():
+            items = list(Notification.objects.select_for_update().filter(pk__in=pks, delivered_at__isnull=True).select_related('user').order_by('pk'))
+            if not items:
+                continue
+            user = items[0].user
+            preferences = Preferences.load(user)
+            if channel in QUIET_CHANNELS and preferences.in_quiet_hours(now):
+                Notification.objects.filter(pk__in=[item.pk for item in items]).update(
+                    deliver_after=preferences.next_local(now, preferences.quiet_end)
+                )
+                continue
+            digest = _digest(user, channel, items, now)
+            Notification.objects.filter(pk__in=[item.pk for item in items]).update(delivered_at=now)
+        try:
+            transports[channel](digest, template='generic_notification.html', context={
+                'subject': digest.subject, 'message': digest.message, 'cta_text': digest.cta_text,
+                'cta_link': digest.cta_link, 'user_name': getattr(user, 'name', None) or 'User',
+            })
+            sent += 1
+        except Exception as e:
+            logger.error(f"Failed to send {channel} digest to {user.email}: {e}")
+    logger.info(f"Sent {sent} notification digests")
+    return sent
+
+
+def _digest(user, channel, items, now):
+    from feedback.models import Notification
+
+    if len(items) == 1:
+        subject, message = items[0].subject, items[0].message
+    else:
+        subject = f"You have {len(items)} new notifications"
+        lines = [f"- {item.subject}" for item in items[:10]]
+        if len(items) > 10:
+            lines.append(f"and {len(items) - 10} more")
+        message = '\n'.join(lines)
+    cta_link = items[0].cta_link if len({item.cta_link for item in items}) == 1 else '/notifications'
+    return Notification.objects.create(
+        user=user, subject=subject, message=message, level='info', cta_text='View' if cta_link else None,
+        cta_link=cta_link, channel=channel, category='digest', delivered_at=now,
+        # a digest stands in for rows already counted as unread
+        read=True,
+    )
@@ -0,0 +1,200 @@
+"""
+Notification inbox.
+
+Each user's unread count is kept on a ``NotificationCounter`` row, moved by
+F() expressions in the same transaction as the change that caused it: +1
+when an unread notification is created (``feedback.signals``) and -n when
+``mark_read`` or ``archive`` flips n rows with a single UPDATE. Polling the
+badge is a primary key lookup, and every change is pushed to the user's
+``notifications_<id>`` channel group once it commits, so connected clients
+need not poll at all.
+
+Listing is a keyset cursor over ``(date_created, id)``, newest first,
+served by the ``(user, read, date_created)`` and ``(user, archived,
+date_created)`` indexes, so page 20,000 costs the same as page one.
+``prune`` deletes read notifications past ``NOTIFICATION_RETENTION_DAYS``
+in chunks (``manage.py prune_notifications``).
+"""
+import base64
+import logging
+from datetime import datetime, timedelta
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from feedback.models import Notification, NotificationCounter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+MAX_BULK_IDS = 1000
+
+
+def group_name(user_id):
+    return f'notifications_{user_id}'
+
+
+# counter
+
+def recount(user_id):
+    """Rebuild ``user_id``'s counter from the notifications table."""
+    unread = Notification.objects.filter(user_id=user_id, read=False).count()
+    NotificationCounter.objects.update_or_create(user_id=user_id, defaults={'unread': unread})
+    return unread
+
+
+def unread_count(user):
+    unread = NotificationCounter.objects.filter(user=user).values_list('unread', flat=True).first()
+    return recount(user.pk) if unread is None else unread
+
+
+def adjust(user_id, delta):
+    updated = NotificationCounter.objects.filter(user_id=user_id).update(
+        unread=Greatest(F('unread') + delta, Value(0)), last_updated=timezone.now(),
+    )
+    if not updated:
+        # first notification for this user: the count already includes it
+        try:
+            with transaction.atomic():
+                NotificationCounter.objects.create(
+                    user_id=user_id, unread=Notification.objects.filter(user_id=user_id, read=False).count()
+                )
+        except IntegrityError:
+            NotificationCounter.objects.filter(user_id=user_id).update(unread=Greatest(F('unread') + delta, Value(0)))
+    transaction.on_commit(lambda: publish(user_id))
+
+
+def publish(user_id):
+    """Push ``user_id``'s current unread count to their open connections."""
+    from channels.layers import get_channel_layer
+
+    try:
+        layer = get_channel_layer()
+        if layer is None:
+            return
+        unread = NotificationCounter.objects.filter(user_id=user_id).values_list('unread', flat=True).first() or 0
+        async_to_sync(layer.group_send)(group_name(user_id), {'type': 'inbox.counter', 'unread': unread})
+    except Exception as e:
+        # a missing channel layer must never fail the write that got us here
+        logger.warning(f"Could not push the unread count of user {user_id}: {e}")
+
+
+def notification_created(notification):
+    if not notification.read:
+        adjust(notification.user_id, 1)
+
+
+# bulk actions
+
+def _selection(user, ids=None, before=None):
+    queryset = Notification.objects.filter(user=user)
+    if ids is not None:
+        ids = list(ids)
+        if len(ids) > MAX_BULK_IDS:
+            raise ValueError(f"At most {MAX_BULK_IDS} notifications can be changed at once")
+        queryset = queryset.filter(uuid__in=ids)
+    if before is not None:
+        queryset = queryset.filter(date_created__lte=before)
+    return queryset
+
+
+def mark_read(user, ids=None, before=None):
+    """
+    Mark ``user``'s notifications read: the ones with the given uuids, the
+    ones created up to ``before``, or all of them. Returns how many changed.
+    """
+    with transaction.atomic():
+        changed = _selection(user, ids, before).filter(read=False).update(read=True)
+        if changed:
+            adjust(user.pk, -changed)
+    return changed
+
+
+def archive(user, ids=None, before=None):
+    """Archive (and so read) notifications selected as in ``mark_read``. Returns how many changed."""
+    with transaction.atomic():
+        selection = _selection(user, ids, before)
+        unread = selection.filter(read=False).update(read=True, archived=True)
+        changed = unread + selection.filter(archived=False).update(archived=True)
+        if unread:
+            adjust(user.pk, -unread)
+    return changed
+
+
+# listing
+
+def encode_cursor(notification):
+    raw = f'{notification.date_created.isoformat()}|{notification.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        created, pk = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit('|', 1)
+        return datetime.fromisoformat(created), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+
+def _page_size(limit):
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def get_page(user, cursor=None, limit=None, unread_only=False, archived=False):
+    """
+    A page of ``user``'s notifications, newest first. ``next_cursor`` is
+    passed back as ``cursor`` for the next (older) page and is ``None`` on
+    the last one. Raises ``ValueError`` for a malformed cursor.
+    """
+    limit = _page_size(limit)
+    queryset = Notification.objects.filter(user=user)
+    if unread_only:
+        # archived notifications are always read
+        queryset = queryset.filter(read=False)
+    else:
+        queryset = queryset.filter(archived=archived)
+    if cursor:
+        created, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(date_created__lt=created) | Q(date_created=created, pk__lt=pk))
+
+    page = list(queryset.order_by('-date_created', '-pk')[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+    return {
+        'notifications': page,
+        'next_cursor': encode_cursor(page[-1]) if has_more else None,
+        'has_more': has_more,
+    }
+
+
+# retention
+
+def prune(older_than=None, batch_size=None, now=None):
+    """
+    Delete read notifications created more than ``older_than`` days ago
+    (``NOTIFICATION_RETENTION_DAYS``), ``batch_size`` rows per statement so
+    no single delete holds locks for long. Returns the number deleted.
+    """
+    days = older_than if older_than is not None else getattr(settings, 'NOTIFICATION_RETENTION_DAYS', 90)
+    batch_size = batch_size or getattr(settings, 'NOTIFICATION_PRUNE_BATCH_SIZE', 5000)
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    expired = Notification.objects.filter(read=True, date_created__lt=cutoff)
+
+    deleted = 0
+    while True:
+        pks = list(expired.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            break
+        count, _ = Notification.objects.filter(pk__in=pks).delete()
+        deleted += count
+    logger.info(f"Pruned {deleted} read notifications older than {days} days")
+    return deleted
@@ -0,0 +1,81 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import Account
+from feedback import inbox
+from feedback.models import Notification
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Benchmark the notification inbox for a user holding a large number of notifications. Runs inside a rolled back transaction."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--notifications', type=int, default=1_000_000, help='Notifications for the user (default: 1000000)')
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--iterations', type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options)
+                raise _Rollback()
+        except _Rollback:
+            self.stdout.write(self.style.SUCCESS("Benchmark data rolled back."))
+
+    def _run(self, options):
+        total, page_size, iterations = options['notifications'], options['page_size'], options['iterations']
+        user = Account.objects.create_user(email='bench-inbox@veyu.test', password='bench-pass-123', first_name='Bench')
+
+        started = time.perf_counter()
+        for start in range(0, total, 50_000):
+            Notification.objects.bulk_create(
+                [Notification(user=user, subject=f'notification {i}', message='Benchmark', read=i % 3 == 0)
+                 for i in range(start, min(start + 50_000, total))],
+                batch_size=5000,
+            )
+        inbox.recount(user.pk)
+        ids = list(Notification.objects.filter(user=user).order_by('-date_created', '-pk').values_list('pk', flat=True))
+        self.stdout.write(f"Seeded {total} notifications in {time.perf_counter() - started:.2f}s")
+
+        middle = Notification.objects.get(pk=ids[len(ids) // 2])
+        cursor = inbox.encode_cursor(middle)
+        self._measure('unread count', iterations, lambda: inbox.unread_count(user))
+        self._measure('latest page', iterations, lambda: inbox.get_page(user, limit=page_size))
+        self._measure('latest unread page', iterations, lambda: inbox.get_page(user, limit=page_size, unread_only=True))
+        self._measure('page after middle', iterations, lambda: inbox.get_page(user, cursor=cursor, limit=page_size))
+        self._measure('offset count + page (old)', iterations, lambda: (
+            Notification.objects.filter(user=user, read=False).count(),
+            Notification.objects.filter(user=user).count(),
+            list(Notification.objects.filter(user=user).order_by('-date_created')[len(ids) // 2:len(ids) // 2 + page_size]),
+        ))
+
+        uuids = list(Notification.objects.filter(user=user, read=False).values_list('uuid', flat=True)[:page_size])
+        self._measure('mark page read', 1, lambda: inbox.mark_read(user, ids=uuids))
+        self._measure('mark all read', 1, lambda: inbox.mark_read(user, before=timezone.now()))
+        self._measure('archive oldest half', 1, lambda: inbox.archive(user, before=middle.date_created))
+        Notification.objects.filter(pk__in=ids[len(ids) // 2:]).update(date_created=timezone.now() - timedelta(days=365))
+        self._measure('prune old read', 1, lambda: inbox.prune())
+        self.stdout.write(f"Left {Notification.objects.filter(user=user).count()} notifications, {inbox.unread_count(user)} unread")
+
+    def _measure(self, label, iterations, func):
+        timings = []
+        with CaptureQueriesContext(connection) as ctx:
+            for _ in range(iterations):
+                started = time.perf_counter()
+                func()
+                timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p50 = timings[len(timings) // 2]
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(
+            f"{label:<28} p50={p50:8.2f}ms p95={p95:8.2f}ms queries/call={len(ctx.captured_queries) / iterations:.1f}"
+        )
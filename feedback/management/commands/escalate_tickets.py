@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from feedback.sla import escalate_overdue
+
+
+class Command(BaseCommand):
+    help = (
+        "Escalate support tickets that missed their SLA: raise their severity, assign the least "
+        "busy staff member and notify the staff on them. Meant to run every few minutes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='Tickets per transaction')
+
+    def handle(self, *args, **options):
+        count = escalate_overdue(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Escalated {count} overdue tickets"))
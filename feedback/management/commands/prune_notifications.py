@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from feedback.inbox import prune
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete read notifications older than NOTIFICATION_RETENTION_DAYS in chunks. "
+        "Unread notifications are never pruned."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Override NOTIFICATION_RETENTION_DAYS')
+        parser.add_argument('--batch-size', type=int, default=None, help='Rows per DELETE statement')
+
+    def handle(self, *args, **options):
+        deleted = prune(older_than=options['days'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} read notifications"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from feedback.delivery import send_digests
+
+
+class Command(BaseCommand):
+    help = (
+        "Send notifications held back by quiet hours, rate caps or digest preferences, "
+        "collapsed into one push or email per user and channel. Meant to run every few minutes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows fetched per query while grouping')
+
+    def handle(self, *args, **options):
+        sent = send_digests(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Sent {sent} notification digests"))
@@ -0,0 +1,147 @@
+# Generated by Django 5.1.1 on 2026-10-18 23:40
+
+import datetime
+import django.db.models.deletion
+import feedback.models
+import utils
+from django.conf import settings
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+# (first response, resolution) of the built-in policies in feedback.sla
+DEFAULT_WINDOWS = {
+    'high': (timedelta(hours=1), timedelta(days=1)),
+    'moderate': (timedelta(hours=4), timedelta(days=3)),
+    'low': (timedelta(hours=24), timedelta(days=7)),
+}
+
+
+def backfill_deadlines(apps, schema_editor):
+    """Start existing tickets' clocks at date_created, as the old is_overdue did."""
+    SupportTicket = apps.get_model('feedback', 'SupportTicket')
+    for severity, (first_response, resolution) in DEFAULT_WINDOWS.items():
+        tickets = SupportTicket.objects.filter(severity_level=severity)
+        if severity == 'low':
+            tickets = SupportTicket.objects.exclude(severity_level__in=['high', 'moderate'])
+        tickets.update(
+            sla_started_at=F('date_created'),
+            first_response_due_at=F('date_created') + first_response,
+            due_at=F('date_created') + resolution,
+        )
+    SupportTicket.objects.exclude(status='open').update(first_responded_at=F('last_updated'))
+    SupportTicket.objects.filter(status='resolved').update(resolved_at=F('last_updated'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_dealership_stats'),
+        ('chat', '0002_room_messages_history'),
+        ('feedback', '0004_remove_review_ratings'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BusinessCalendar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(blank=True, default=utils.make_UUID)),
+                ('date_created', models.DateTimeField(auto_now=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(max_length=200)),
+                ('timezone', models.CharField(default='Africa/Lagos', max_length=64)),
+                ('work_days', models.JSONField(default=feedback.models.default_work_days)),
+                ('opens_at', models.TimeField(default=datetime.time(9, 0))),
+                ('closes_at', models.TimeField(default=datetime.time(17, 0))),
+                ('holidays', models.JSONField(blank=True, default=list)),
+            ],
+            options={
+                'verbose_name': 'Business Calendar',
+                'verbose_name_plural': 'Business Calendars',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='supportticket',
+            name='due_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='supportticket',
+            name='escalated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='supportticket',
+            name='escalation_level',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='supportticket',
+            name='first_responded_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='supportticket',
+            name='first_response_due_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='supportticket',
+            name='resolved_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='supportticket',
+            name='sla_paused_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='supportticket',
+            name='sla_started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='SLAPolicy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(blank=True, default=utils.make_UUID)),
+                ('date_created', models.DateTimeField(auto_now=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(max_length=200)),
+                ('severity_level', models.CharField(blank=True, choices=[('high', 'High Severity'), ('low', 'Low Severity'), ('moderate', 'Moderate Severity')], max_length=20)),
+                ('first_response_minutes', models.PositiveIntegerField()),
+                ('resolution_minutes', models.PositiveIntegerField()),
+                ('is_active', models.BooleanField(default=True)),
+                ('calendar', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='policies', to='feedback.businesscalendar')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sla_policies', to='feedback.ticketcategory')),
+            ],
+            options={
+                'verbose_name': 'SLA Policy',
+                'verbose_name_plural': 'SLA Policies',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='supportticket',
+            name='sla_policy',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tickets', to='feedback.slapolicy'),
+        ),
+        migrations.AddIndex(
+            model_name='supportticket',
+            index=models.Index(fields=['status', 'due_at'], name='feedback_su_status_2f147d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supportticket',
+            index=models.Index(fields=['status', 'first_response_due_at'], name='feedback_su_status_c9908b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='slapolicy',
+            index=models.Index(fields=['is_active', 'severity_level'], name='feedback_sl_is_acti_8654ab_idx'),
+        ),
+        migrations.RunPython(backfill_deadlines, migrations.RunPython.noop),
+    ]
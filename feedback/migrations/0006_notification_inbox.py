@@ -0,0 +1,62 @@
+# Generated by Django 5.1.1 on 2026-10-18 23:50
+
+import django.db.models.deletion
+import utils
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def create_counters(apps, schema_editor):
+    """Seed a counter for every user with unread notifications."""
+    Notification = apps.get_model('feedback', 'Notification')
+    NotificationCounter = apps.get_model('feedback', 'NotificationCounter')
+    unread = Notification.objects.filter(read=False).values('user_id').annotate(unread=Count('id')).order_by()
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=row['user_id'], unread=row['unread']) for row in unread.iterator()],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback', '0005_sla'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(blank=True, default=utils.make_UUID)),
+                ('date_created', models.DateTimeField(auto_now=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('unread', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Notification Counter',
+                'verbose_name_plural': 'Notification Counters',
+            },
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='archived',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'read', 'date_created'], name='feedback_no_user_id_7adead_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'archived', 'date_created'], name='feedback_no_user_id_a4f61a_idx'),
+        ),
+        migrations.AddField(
+            model_name='notificationcounter',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='notification_counter', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(create_counters, migrations.RunPython.noop),
+    ]
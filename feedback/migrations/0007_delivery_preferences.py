@@ -0,0 +1,88 @@
+# Generated by Django 5.1.1 on 2026-10-19 00:04
+
+import django.core.validators
+import django.db.models.deletion
+import utils
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback', '0006_notification_inbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationPreference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(blank=True, default=utils.make_UUID)),
+                ('date_created', models.DateTimeField(auto_now=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('category', models.CharField(choices=[('general', 'General'), ('account', 'Account and security'), ('wallet', 'Wallet and payments'), ('orders', 'Orders and bookings'), ('chat', 'Chat messages'), ('listings', 'New and featured listings'), ('support', 'Support tickets'), ('marketing', 'Newsletters and offers')], max_length=30)),
+                ('channel', models.CharField(choices=[('email', 'Email Notification'), ('in-app', 'In-App Notification'), ('sms', 'SMS Notification'), ('push', 'Push Notification')], max_length=10)),
+                ('mode', models.CharField(choices=[('instant', 'Instantly'), ('digest', 'In a daily digest'), ('off', 'Off')], default='instant', max_length=10)),
+            ],
+            options={
+                'verbose_name': 'Notification Preference',
+                'verbose_name_plural': 'Notification Preferences',
+            },
+        ),
+        migrations.CreateModel(
+            name='NotificationSettings',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(blank=True, default=utils.make_UUID)),
+                ('date_created', models.DateTimeField(auto_now=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('timezone', models.CharField(default='Africa/Lagos', max_length=64)),
+                ('quiet_hours_start', models.TimeField(blank=True, null=True)),
+                ('quiet_hours_end', models.TimeField(blank=True, null=True)),
+                ('digest_hour', models.PositiveSmallIntegerField(default=8, validators=[django.core.validators.MaxValueValidator(23)])),
+            ],
+            options={
+                'verbose_name': 'Notification Settings',
+                'verbose_name_plural': 'Notification Settings',
+            },
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='category',
+            field=models.CharField(default='general', max_length=30),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='deliver_after',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='delivered_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'category', 'channel', 'delivered_at'], name='feedback_no_user_id_d17b05_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['delivered_at', 'deliver_after'], name='feedback_no_deliver_053250_idx'),
+        ),
+        migrations.AddField(
+            model_name='notificationpreference',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_preferences', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='notificationsettings',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='notification_settings', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='notificationpreference',
+            constraint=models.UniqueConstraint(fields=('user', 'category', 'channel'), name='unique_notification_preference'),
+        ),
+    ]
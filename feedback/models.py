@@ -1,15 +1,28 @@
+import datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator
 from django.db import models
 from django.utils.timezone import now
 from utils.models import DbModel
-import firebase_admin
-from firebase_admin import credentials, messaging
+from feedback.delivery import CATEGORIES
 from django.conf import settings
 import logging
+import threading
+import time
+from utils import metrics
+from utils.lazy import lazy_import
 from utils.mail import send_email
 from utils.sms import sms_service, normalize_phone_number
 
 logger = logging.getLogger(__name__)
 
+# The Firebase SDK is only needed for push notifications; import it on first use
+firebase_admin = lazy_import('firebase_admin')
+credentials = lazy_import('firebase_admin.credentials')
+messaging = lazy_import('firebase_admin.messaging')
+_firebase_lock = threading.Lock()
+
 # Initialize Firebase App
 def initialize_firebase():
     try:
@@ -18,6 +31,13 @@ def initialize_firebase():
             firebase_admin.get_app()
             return True
         except ValueError:
+            pass
+        with _firebase_lock:
+            try:
+                firebase_admin.get_app()
+                return True
+            except ValueError:
+                pass
             # Not initialized, proceed with initialization
             cred_dict = getattr(settings, 'FIREBASE_CREDENTIALS_DICT', None)
             if cred_dict:
@@ -73,12 +93,9 @@ class Review(DbModel):
             'car-quality',
             'car-cleanliness',
         ]
-        categories = {}
-        for key in keys:
-            rating = self.rating_items.filter(area=key).first()
-            if rating:
-                categories[key] = rating.stars
-        return categories
+        # one pass over rating_items so a prefetch_related('rating_items') is used
+        stars = {rating.area: rating.stars for rating in self.rating_items.all()}
+        return {key: stars[key] for key in keys if key in stars}
     
     def __str__(self):
         rating_text = f"{self.avg_rating}/5.0" if self.avg_rating > 0 else "No rating"
@@ -167,6 +184,17 @@ class SupportTicket(DbModel):
     category = models.ForeignKey('TicketCategory', on_delete=models.SET_NULL, blank=True, null=True, related_name='category_tickets')
     chat_room = models.ForeignKey('chat.ChatRoom', blank=True, related_name='support_chat', null=True, on_delete=models.CASCADE)
     correspondents = models.ManyToManyField('accounts.Account', blank=True, limit_choices_to={'is_staff': True}, related_name='assigned_tickets') # staff that have been added to this chat
+
+    # SLA, maintained by feedback.sla.apply_sla on save
+    sla_policy = models.ForeignKey('SLAPolicy', on_delete=models.SET_NULL, blank=True, null=True, related_name='tickets') # null: built-in default
+    sla_started_at = models.DateTimeField(blank=True, null=True)
+    sla_paused_at = models.DateTimeField(blank=True, null=True) # set while awaiting the customer
+    first_response_due_at = models.DateTimeField(blank=True, null=True)
+    first_responded_at = models.DateTimeField(blank=True, null=True)
+    due_at = models.DateTimeField(blank=True, null=True)
+    resolved_at = models.DateTimeField(blank=True, null=True)
+    escalated_at = models.DateTimeField(blank=True, null=True)
+    escalation_level = models.PositiveSmallIntegerField(default=0)
     
     def __str__(self):
         return f"Ticket #{self.id}: {self.subject} ({self.get_status_display()}) - {self.get_severity_level_display()}"
@@ -186,14 +214,22 @@ class SupportTicket(DbModel):
     
     @property
     def is_overdue(self):
-        """Check if ticket is overdue based on severity"""
-        days_open = self.days_open
-        if self.severity_level == 'high':
-            return days_open > 1
-        elif self.severity_level == 'moderate':
-            return days_open > 3
-        else:  # low
-            return days_open > 7
+        """Check if ticket missed its resolution or first response deadline (see feedback.sla.overdue_q)"""
+        current = now()
+        if self.status in ('open', 'in-progress') and self.due_at and self.due_at < current:
+            return True
+        return bool(
+            self.status == 'open' and self.first_responded_at is None
+            and self.first_response_due_at and self.first_response_due_at < current
+        )
+
+    def save(self, *args, **kwargs):
+        from feedback.sla import apply_sla
+
+        changed = apply_sla(self)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | changed
+        super().save(*args, **kwargs)
     
     class Meta:
         indexes = [
@@ -202,6 +238,8 @@ class SupportTicket(DbModel):
             models.Index(fields=['severity_level']),
             models.Index(fields=['category']),
             models.Index(fields=['date_created']),
+            models.Index(fields=['status', 'due_at']),
+            models.Index(fields=['status', 'first_response_due_at']),
         ]
         ordering = ['-date_created']
         verbose_name = 'Support Ticket'
@@ -247,6 +285,72 @@ class TicketCategory(DbModel):
 
 
 
+def default_work_days():
+    return [0, 1, 2, 3, 4]
+
+
+class BusinessCalendar(DbModel):
+    """Working hours SLA clocks run in; time outside them does not count."""
+    name = models.CharField(max_length=200)
+    timezone = models.CharField(max_length=64, default='Africa/Lagos')
+    work_days = models.JSONField(default=default_work_days) # weekday numbers, Monday is 0
+    opens_at = models.TimeField(default=datetime.time(9))
+    closes_at = models.TimeField(default=datetime.time(17))
+    holidays = models.JSONField(default=list, blank=True) # ISO dates, e.g. "2026-12-25"
+
+    def __str__(self):
+        return f"{self.name} ({self.opens_at:%H:%M}-{self.closes_at:%H:%M} {self.timezone})"
+
+    def __repr__(self):
+        return f"<BusinessCalendar: {self.name}>"
+
+    def clean(self):
+        if self.opens_at >= self.closes_at:
+            raise ValidationError({'closes_at': 'Closing time must be after opening time'})
+        if not self.work_days or any(day not in range(7) for day in self.work_days):
+            raise ValidationError({'work_days': 'Work days must be weekday numbers from 0 (Monday) to 6'})
+        try:
+            ZoneInfo(self.timezone)
+        except (ValueError, ZoneInfoNotFoundError):
+            raise ValidationError({'timezone': f'Unknown timezone {self.timezone}'})
+
+    class Meta:
+        ordering = ['name']
+        verbose_name = 'Business Calendar'
+        verbose_name_plural = 'Business Calendars'
+
+
+
+class SLAPolicy(DbModel):
+    """
+    Response and resolution targets for tickets of a severity and/or
+    category; blank severity or category matches any. The most specific
+    active policy wins (see feedback.sla.policy_for).
+    """
+    name = models.CharField(max_length=200)
+    severity_level = models.CharField(max_length=20, choices=SupportTicket.TICKET_SEVERITY, blank=True)
+    category = models.ForeignKey(TicketCategory, on_delete=models.CASCADE, blank=True, null=True, related_name='sla_policies')
+    calendar = models.ForeignKey(BusinessCalendar, on_delete=models.SET_NULL, blank=True, null=True, related_name='policies') # null: around the clock
+    first_response_minutes = models.PositiveIntegerField()
+    resolution_minutes = models.PositiveIntegerField()
+    is_active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return self.name
+
+    def __repr__(self):
+        return f"<SLAPolicy: {self.name} - {self.severity_level or 'any'} / {self.category or 'any'}>"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_active', 'severity_level']),
+        ]
+        ordering = ['name']
+        verbose_name = 'SLA Policy'
+        verbose_name_plural = 'SLA Policies'
+
+
+
 class Notification(DbModel):
     CHANNELS = {
         'email': 'Email Notification',
@@ -264,10 +368,15 @@ class Notification(DbModel):
     subject = models.CharField(max_length=350)
     message = models.TextField()
     read = models.BooleanField(default=False)
+    archived = models.BooleanField(default=False)
     level = models.CharField(max_length=10, choices=LEVELS, default='info')
     channel = models.CharField(max_length=10, default='in-app', choices=CHANNELS)
     cta_text = models.CharField(max_length=20, blank=True, null=True)
     cta_link = models.CharField(max_length=500, blank=True, null=True)
+    # delivery, see feedback.delivery
+    category = models.CharField(max_length=30, default='general')
+    deliver_after = models.DateTimeField(blank=True, null=True) # held for a digest until then
+    delivered_at = models.DateTimeField(blank=True, null=True)
 
     def send(self):
         """
@@ -338,7 +447,10 @@ class Notification(DbModel):
                 )
                 
                 try:
+                    started = time.perf_counter()
                     response = messaging.send_each_for_multicast(message)
+                    metrics.record_outbound('push', 'fcm', 'sent', time.perf_counter() - started, count=response.success_count)
+                    metrics.record_outbound('push', 'fcm', 'failed', count=response.failure_count)
                     if response.failure_count > 0:
                         responses = response.responses
                         failed_tokens = []
@@ -353,14 +465,17 @@ class Notification(DbModel):
                         # But for now, we just log it.
                         
                 except Exception as e:
+                    metrics.record_outbound('push', 'fcm', 'failed', count=len(registration_ids))
                     logger.error(f"Error sending FCM message: {e}")
 
         # else do nothing, they'll see this notification in notifications tab
         return
 
     def mark_as_read(self):
+        from feedback.inbox import mark_read
+
+        mark_read(self.user, ids=[self.uuid])
         self.read = True
-        self.save()
     
     def __str__(self):
         status = "Read" if self.read else "Unread"
@@ -386,12 +501,88 @@ class Notification(DbModel):
             models.Index(fields=['level']),
             models.Index(fields=['channel']),
             models.Index(fields=['date_created']),
+            models.Index(fields=['user', 'read', 'date_created']),
+            models.Index(fields=['user', 'archived', 'date_created']),
+            models.Index(fields=['user', 'category', 'channel', 'delivered_at']),
+            models.Index(fields=['delivered_at', 'deliver_after']),
         ]
         ordering = ['-date_created']
         verbose_name = 'Notification'
         verbose_name_plural = 'Notifications'
+
+
+class NotificationCounter(DbModel):
+    """
+    A user's unread notification count, kept in step by ``feedback.inbox``
+    so the badge never needs a COUNT over the notifications table.
+    """
+    user = models.OneToOneField('accounts.Account', on_delete=models.CASCADE, related_name='notification_counter')
+    unread = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user} ({self.unread} unread)"
+
+    def __repr__(self):
+        return f"<NotificationCounter: {self.user_id} - {self.unread}>"
+
+    class Meta:
+        verbose_name = 'Notification Counter'
+        verbose_name_plural = 'Notification Counters'
         
 
+class NotificationSettings(DbModel):
+    """A user's quiet hours and digest time, in their own timezone (see feedback.delivery)."""
+    user = models.OneToOneField('accounts.Account', on_delete=models.CASCADE, related_name='notification_settings')
+    timezone = models.CharField(max_length=64, default='Africa/Lagos')
+    quiet_hours_start = models.TimeField(blank=True, null=True)
+    quiet_hours_end = models.TimeField(blank=True, null=True)
+    digest_hour = models.PositiveSmallIntegerField(default=8, validators=[MaxValueValidator(23)])
+
+    def __str__(self):
+        return f"Notification settings for {self.user}"
+
+    def __repr__(self):
+        return f"<NotificationSettings: {self.user_id} - {self.timezone}>"
+
+    def clean(self):
+        try:
+            ZoneInfo(self.timezone)
+        except (ValueError, ZoneInfoNotFoundError):
+            raise ValidationError({'timezone': f'Unknown timezone {self.timezone}'})
+        if (self.quiet_hours_start is None) != (self.quiet_hours_end is None):
+            raise ValidationError({'quiet_hours_end': 'Quiet hours need both a start and an end'})
+
+    class Meta:
+        verbose_name = 'Notification Settings'
+        verbose_name_plural = 'Notification Settings'
+
+
+class NotificationPreference(DbModel):
+    """A user's choice for one category on one channel; absent rows mean the category's default."""
+    MODES = {
+        'instant': 'Instantly',
+        'digest': 'In a daily digest',
+        'off': 'Off',
+    }
+    user = models.ForeignKey('accounts.Account', on_delete=models.CASCADE, related_name='notification_preferences')
+    category = models.CharField(max_length=30, choices={key: category.label for key, category in CATEGORIES.items()})
+    channel = models.CharField(max_length=10, choices=Notification.CHANNELS)
+    mode = models.CharField(max_length=10, choices=MODES, default='instant')
+
+    def __str__(self):
+        return f"{self.user}: {self.category} by {self.channel} {self.mode}"
+
+    def __repr__(self):
+        return f"<NotificationPreference: {self.user_id} - {self.category}/{self.channel} - {self.mode}>"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'category', 'channel'], name='unique_notification_preference'),
+        ]
+        verbose_name = 'Notification Preference'
+        verbose_name_plural = 'Notification Preferences'
+
+
 def create_and_send_user_notifications(
     *,
     user,
@@ -402,41 +593,18 @@ def create_and_send_user_notifications(
     cta_link=None,
     create_in_app=True,
     send_push=True,
+    category='general',
 ):
     """
-    Create an in-app notification record and optionally dispatch a push notification.
+    Create an in-app notification record and optionally dispatch a push notification,
+    as the user's preferences for ``category`` allow (see feedback.delivery.notify).
 
     Returns a list of created Notification instances.
     """
-    notifications = []
-
-    notification_kwargs = {
-        'user': user,
-        'subject': subject,
-        'message': message,
-        'level': level,
-        'cta_text': cta_text,
-        'cta_link': cta_link,
-    }
-
-    if create_in_app:
-        notifications.append(
-            Notification.objects.create(
-                channel='in-app',
-                **notification_kwargs,
-            )
-        )
-
-    if send_push:
-        push_notification = Notification.objects.create(
-            channel='push',
-            **notification_kwargs,
-        )
-        push_notification.send()
-        notifications.append(push_notification)
-
-    return notifications
-
-
-
+    from feedback.delivery import notify
 
+    channels = [channel for channel, wanted in (('in-app', create_in_app), ('push', send_push)) if wanted]
+    return notify(
+        user, category, subject, message,
+        level=level, cta_text=cta_text, cta_link=cta_link, channels=channels,
+    )
@@ -0,0 +1,35 @@
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+
+from chat.models import ChatMessage
+from feedback import inbox
+from feedback.models import Notification, SupportTicket
+from feedback.sla import record_first_response
+
+
+@receiver(post_save, sender=ChatMessage)
+def stamp_first_response(sender, instance, created, **kwargs):
+    """A staff reply in a ticket's chat room is the ticket's first response."""
+    if not created or instance.sender is None or not instance.sender.is_staff:
+        return
+    tickets = SupportTicket.objects.filter(chat_room_id=instance.room_id, first_responded_at__isnull=True)
+    record_first_response(tickets.values_list('pk', flat=True), instance.date_created)
+
+
+@receiver(pre_save, sender=Notification)
+def notification_pre_save(sender, instance, **kwargs):
+    instance._old_read = None
+    if instance.pk:
+        instance._old_read = Notification.objects.filter(pk=instance.pk).values_list('read', flat=True).first()
+
+
+@receiver(post_save, sender=Notification)
+def notification_post_save(sender, instance, created, **kwargs):
+    # bulk updates go through feedback.inbox, which adjusts the counter itself;
+    # there is deliberately no post_delete receiver, which would stop prune's
+    # chunked deletes from being plain DELETE statements (only read rows are pruned)
+    if created:
+        inbox.notification_created(instance)
+    elif instance._old_read is not None and instance._old_read != instance.read:
+        inbox.adjust(instance.user_id, -1 if instance.read else 1)
+
@@ -0,0 +1,268 @@
+"""
+Support ticket SLAs.
+
+Every open ticket carries two deadlines, ``first_response_due_at`` and
+``due_at`` (resolution), so overdue lists and counts are plain SQL
+(``overdue_q``). Deadlines come from the ``SLAPolicy`` that matches the
+ticket most closely:
+
+    severity and category  >  category  >  severity  >  catch-all
+
+and fall back to ``DEFAULT_POLICIES`` when no policy matches. A policy with
+a ``BusinessCalendar`` only counts time inside its working hours; without
+one the clock runs around the clock.
+
+``apply_sla`` (called from ``SupportTicket.save``) recomputes the deadlines
+whenever the severity or category changes, stamps the first response when
+the ticket leaves 'open', stops the clock while the ticket is awaiting the
+customer and restarts it when a resolved ticket is reopened.
+``escalate_overdue`` is the periodic job (``manage.py
+escalate_tickets``): breached tickets move one severity up, get a fresh
+window at that severity, gain the least busy staff member as a
+correspondent, and every affected staff member receives one notification
+per run.
+"""
+import logging
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# minutes, used when no SLAPolicy matches; resolution mirrors the old
+# is_overdue thresholds of 1, 3 and 7 days
+Policy = namedtuple('Policy', 'id first_response_minutes resolution_minutes calendar')
+DEFAULT_POLICIES = {
+    'high': Policy(None, 60, 24 * 60, None),
+    'moderate': Policy(None, 4 * 60, 3 * 24 * 60, None),
+    'low': Policy(None, 24 * 60, 7 * 24 * 60, None),
+}
+ESCALATION = {'low': 'moderate', 'moderate': 'high', 'high': 'high'}
+MAX_CALENDAR_DAYS = 366 * 2
+
+
+def add_business_time(calendar, start, minutes):
+    """
+    ``start`` plus ``minutes`` of working time on ``calendar`` (None for
+    around the clock). Time outside working hours, on non-working days and
+    on holidays does not count.
+    """
+    if calendar is None:
+        return start + timedelta(minutes=minutes)
+    tz = ZoneInfo(calendar.timezone)
+    holidays = set(calendar.holidays or ())
+    remaining = timedelta(minutes=minutes)
+    current = start.astimezone(tz)
+    for _ in range(MAX_CALENDAR_DAYS):
+        day = current.date()
+        if day.weekday() in calendar.work_days and day.isoformat() not in holidays:
+            opens = datetime.combine(day, calendar.opens_at, tzinfo=tz)
+            closes = datetime.combine(day, calendar.closes_at, tzinfo=tz)
+            current = max(current, opens)
+            if current < closes:
+                if remaining <= closes - current:
+                    return (current + remaining).astimezone(start.tzinfo)
+                remaining -= closes - current
+        current = datetime.combine(day + timedelta(days=1), calendar.opens_at, tzinfo=tz)
+    raise ValueError(f"{calendar} has no working time in the next {MAX_CALENDAR_DAYS} days")
+
+
+def policy_for(severity_level, category_id):
+    """The most specific active ``SLAPolicy`` for a ticket, or the built-in default."""
+    from feedback.models import SLAPolicy
+
+    candidates = SLAPolicy.objects.filter(
+        Q(severity_level=severity_level) | Q(severity_level=''),
+        Q(category_id=category_id) | Q(category__isnull=True),
+        is_active=True,
+    ).select_related('calendar')
+    ranked = sorted(candidates, key=lambda policy: (policy.category_id is None, policy.severity_level == '', policy.pk))
+    return ranked[0] if ranked else DEFAULT_POLICIES.get(severity_level, DEFAULT_POLICIES['low'])
+
+
+def deadlines(policy, start):
+    """``(first_response_due_at, due_at)`` for a clock started at ``start``."""
+    return (
+        add_business_time(policy.calendar, start, policy.first_response_minutes),
+        add_business_time(policy.calendar, start, policy.resolution_minutes),
+    )
+
+
+def apply_sla(ticket, now=None):
+    """
+    Bring ``ticket``'s SLA fields in line with its status, severity and
+    category before it is saved. Returns the names of the fields it set.
+    """
+    from feedback.models import SupportTicket
+
+    now = now or timezone.now()
+    previous = None
+    if ticket.pk:
+        previous = SupportTicket.objects.filter(pk=ticket.pk).values('status', 'severity_level', 'category_id').first()
+    changed = set()
+
+    if ticket.sla_started_at is None:
+        ticket.sla_started_at = now
+        changed.add('sla_started_at')
+    elif previous and previous['status'] == 'resolved' and ticket.status != 'resolved':
+        # reopened: a new clock, and a new first response is owed
+        ticket.sla_started_at, ticket.resolved_at, ticket.first_responded_at = now, None, None
+        changed.update(['sla_started_at', 'resolved_at', 'first_responded_at'])
+
+    if ticket.status == 'awaiting-user' and ticket.sla_paused_at is None:
+        ticket.sla_paused_at = now
+        changed.add('sla_paused_at')
+    elif ticket.status != 'awaiting-user' and ticket.sla_paused_at is not None:
+        # the time spent waiting on the customer does not count
+        if 'sla_started_at' not in changed:
+            ticket.sla_started_at += now - ticket.sla_paused_at
+            changed.add('sla_started_at')
+        ticket.sla_paused_at = None
+        changed.add('sla_paused_at')
+
+    if ticket.status == 'resolved' and ticket.resolved_at is None:
+        ticket.resolved_at = now
+        changed.add('resolved_at')
+    if ticket.status not in ('open', 'resolved') and ticket.first_responded_at is None:
+        ticket.first_responded_at = now
+        changed.add('first_responded_at')
+
+    scope_changed = previous is None or 'sla_started_at' in changed or any(
+        previous[field] != getattr(ticket, field) for field in ('severity_level', 'category_id')
+    )
+    if scope_changed or ticket.due_at is None:
+        policy = policy_for(ticket.severity_level, ticket.category_id)
+        ticket.sla_policy_id = policy.id
+        ticket.first_response_due_at, ticket.due_at = deadlines(policy, ticket.sla_started_at)
+        changed.update(['sla_policy', 'first_response_due_at', 'due_at'])
+    return changed
+
+
+def record_first_response(ticket_ids, when):
+    """Stamp the first staff reply on tickets that have not had one."""
+    from feedback.models import SupportTicket
+
+    return SupportTicket.objects.filter(pk__in=ticket_ids, first_responded_at__isnull=True).update(
+        first_responded_at=when
+    )
+
+
+def response_overdue_q(now=None):
+    """Tickets still without a staff response past their first response deadline."""
+    return Q(status='open', first_responded_at__isnull=True, first_response_due_at__lt=now or timezone.now())
+
+
+def overdue_q(now=None):
+    """
+    Tickets past their resolution or first response deadline. Resolved
+    tickets and tickets awaiting the customer are never overdue.
+    """
+    now = now or timezone.now()
+    return Q(status__in=['open', 'in-progress'], due_at__lt=now) | response_overdue_q(now)
+
+
+def ticket_stats(queryset, now=None):
+    """Status, severity and overdue counts for ``queryset`` in one aggregate query."""
+    now = now or timezone.now()
+    return queryset.aggregate(
+        total=Count('pk'),
+        open=Count('pk', filter=Q(status='open')),
+        in_progress=Count('pk', filter=Q(status='in-progress')),
+        awaiting_user=Count('pk', filter=Q(status='awaiting-user')),
+        resolved=Count('pk', filter=Q(status='resolved')),
+        high_severity=Count('pk', filter=Q(severity_level='high')),
+        moderate_severity=Count('pk', filter=Q(severity_level='moderate')),
+        low_severity=Count('pk', filter=Q(severity_level='low')),
+        overdue=Count('pk', filter=overdue_q(now)),
+        response_overdue=Count('pk', filter=response_overdue_q(now)),
+    )
+
+
+# escalation
+
+def _least_busy_staff(exclude=()):
+    from accounts.models import Account
+
+    return (
+        Account.objects.filter(is_staff=True, is_active=True).exclude(pk__in=exclude)
+        .annotate(load=Count('assigned_tickets', filter=~Q(assigned_tickets__status='resolved')))
+        .order_by('load', 'pk').first()
+    )
+
+
+def _escalate(ticket, now):
+    ticket.severity_level = ESCALATION[ticket.severity_level]
+    # a fresh window at the new severity, counted from now
+    policy = policy_for(ticket.severity_level, ticket.category_id)
+    first_response_due_at, due_at = deadlines(policy, now)
+    ticket.sla_policy_id = policy.id
+    ticket.due_at = due_at
+    if ticket.first_responded_at is None:
+        ticket.first_response_due_at = first_response_due_at
+    ticket.escalated_at = now
+    ticket.escalation_level += 1
+
+    staff = _least_busy_staff(exclude=[account.pk for account in ticket.correspondents.all()])
+    if staff is not None:
+        ticket.correspondents.add(staff)
+    return [account for account in ticket.correspondents.all()]
+
+
+def _notify(escalated):
+    from feedback.models import create_and_send_user_notifications
+
+    for staff, tickets in escalated.items():
+        subjects = ', '.join(f"#{ticket.pk}" for ticket in tickets[:10])
+        more = f" and {len(tickets) - 10} more" if len(tickets) > 10 else ''
+        try:
+            create_and_send_user_notifications(
+                user=staff,
+                subject=f"{len(tickets)} support ticket{'s' if len(tickets) != 1 else ''} escalated",
+                message=f"Tickets {subjects}{more} missed their SLA and were escalated to you.",
+                level='warning',
+                cta_text='View Tickets',
+                cta_link='/support/tickets?overdue=true',
+                category='support',
+            )
+        except Exception as e:
+            logger.error(f"Failed to notify {staff.email} of escalated tickets: {e}")
+
+
+def escalate_overdue(now=None, batch_size=200):
+    """
+    Escalate every ticket that is overdue at ``now``, ``batch_size`` tickets
+    per transaction, then notify the staff on them. Escalated tickets get a
+    fresh window, so they are only escalated again if that one is missed
+    too. Returns the number of tickets escalated.
+    """
+    from feedback.models import SupportTicket
+
+    now = now or timezone.now()
+    escalated, count, last_id = defaultdict(list), 0, 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                SupportTicket.objects.filter(overdue_q(now), pk__gt=last_id)
+                .select_for_update().order_by('pk')[:batch_size]
+            )
+            if not batch:
+                break
+            for ticket in batch:
+                for staff in _escalate(ticket, now):
+                    escalated[staff].append(ticket)
+                # a plain UPDATE: the new deadlines are counted from now, not
+                # from sla_started_at as SupportTicket.save would
+                SupportTicket.objects.filter(pk=ticket.pk).update(
+                    severity_level=ticket.severity_level, sla_policy_id=ticket.sla_policy_id,
+                    due_at=ticket.due_at, first_response_due_at=ticket.first_response_due_at,
+                    escalated_at=now, escalation_level=ticket.escalation_level, last_updated=now,
+                )
+            last_id = batch[-1].pk
+            count += len(batch)
+    _notify(escalated)
+    logger.info(f"Escalated {count} overdue support tickets")
+    return count
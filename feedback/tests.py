@@ -1,3 +1,519 @@
-from django.test import TestCase
+import os
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import Account, Customer
+from chat.models import ChatMessage, ChatRoom
+from feedback import delivery, inbox, sla
+from feedback.models import (
+    BusinessCalendar, Notification, NotificationPreference, NotificationSettings, SLAPolicy, SupportTicket, TicketCategory,
+)
+
+# Friday 2026-10-16, 15:00 UTC (16:00 in Lagos)
+FRIDAY = datetime(2026, 10, 16, 15, 0, tzinfo=dt_timezone.utc)
+
+
+@contextmanager
+def frozen(at):
+    with mock.patch('django.utils.timezone.now', return_value=at), mock.patch('feedback.models.now', return_value=at):
+        yield
+
+
+class SLATestMixin:
+
+    @classmethod
+    def setUpTestData(cls):
+        user = Account.objects.create_user(email='sla-customer@example.com', password='testpass123', user_type='customer')
+        cls.customer = Customer.objects.get(user=user)
+        cls.billing = TicketCategory.objects.create(name='Billing')
+        cls.listings = TicketCategory.objects.create(name='Listings')
+
+    def ticket(self, severity='low', category=None, at=FRIDAY, **fields):
+        with frozen(at):
+            return SupportTicket.objects.create(
+                customer=self.customer, status='open', severity_level=severity, category=category,
+                subject='Payment failed', **fields,
+            )
+
+    def update(self, ticket, at, **fields):
+        for name, value in fields.items():
+            setattr(ticket, name, value)
+        with frozen(at):
+            ticket.save()
+        ticket.refresh_from_db()
+        return ticket
+
+
+class SLAPolicyTest(SLATestMixin, TestCase):
+
+    def test_default_policy(self):
+        ticket = self.ticket('high')
+        self.assertIsNone(ticket.sla_policy)
+        self.assertEqual(ticket.sla_started_at, FRIDAY)
+        self.assertEqual(ticket.first_response_due_at, FRIDAY + timedelta(hours=1))
+        self.assertEqual(ticket.due_at, FRIDAY + timedelta(days=1))
+        self.assertEqual(self.ticket('low').due_at, FRIDAY + timedelta(days=7))
+
+    def test_severity_policy(self):
+        policy = SLAPolicy.objects.create(name='Moderate', severity_level='moderate', first_response_minutes=30, resolution_minutes=480)
+        ticket = self.ticket('moderate', self.billing)
+        self.assertEqual(ticket.sla_policy, policy)
+        self.assertEqual(ticket.first_response_due_at, FRIDAY + timedelta(minutes=30))
+        self.assertEqual(ticket.due_at, FRIDAY + timedelta(hours=8))
+        # other severities keep the default
+        self.assertIsNone(self.ticket('high').sla_policy)
+
+    def test_category_policy_and_precedence(self):
+        catch_all = SLAPolicy.objects.create(name='Any', first_response_minutes=600, resolution_minutes=6000)
+        severity = SLAPolicy.objects.create(name='High', severity_level='high', first_response_minutes=15, resolution_minutes=240)
+        category = SLAPolicy.objects.create(name='Billing', category=self.billing, first_response_minutes=20, resolution_minutes=120)
+        both = SLAPolicy.objects.create(
+            name='Billing high', severity_level='high', category=self.billing, first_response_minutes=5, resolution_minutes=60,
+        )
+        SLAPolicy.objects.create(name='Retired', category=self.listings, first_response_minutes=1, resolution_minutes=1, is_active=False)
+
+        self.assertEqual(self.ticket('high', self.billing).sla_policy, both)
+        ticket = self.ticket('low', self.billing)
+        self.assertEqual(ticket.sla_policy, category)
+        self.assertEqual(ticket.due_at, FRIDAY + timedelta(hours=2))
+        self.assertEqual(self.ticket('high', self.listings).sla_policy, severity)
+        self.assertEqual(self.ticket('low', self.listings).sla_policy, catch_all)
+
+    def test_business_hours_calendar(self):
+        calendar = BusinessCalendar.objects.create(
+            name='Lagos office', timezone='Africa/Lagos', opens_at=time(9), closes_at=time(17), holidays=['2026-10-19'],
+        )
+        SLAPolicy.objects.create(
+            name='Office hours', category=self.billing, calendar=calendar, first_response_minutes=120, resolution_minutes=16 * 60,
+        )
+        # an hour left on Friday and Monday is a holiday: 10:00 on Tuesday and 16:00 on Wednesday in Lagos
+        ticket = self.ticket('low', self.billing)
+        self.assertEqual(ticket.first_response_due_at, datetime(2026, 10, 20, 9, 0, tzinfo=dt_timezone.utc))
+        self.assertEqual(ticket.due_at, datetime(2026, 10, 21, 15, 0, tzinfo=dt_timezone.utc))
+        # raised on Saturday, the clock starts on Tuesday morning
+        saturday = self.ticket('low', self.billing, at=FRIDAY + timedelta(days=1))
+        self.assertEqual(saturday.first_response_due_at, datetime(2026, 10, 20, 10, 0, tzinfo=dt_timezone.utc))
+
+    def test_recomputed_on_changes(self):
+        SLAPolicy.objects.create(name='Billing', category=self.billing, first_response_minutes=60, resolution_minutes=600)
+        ticket = self.ticket('low')
+        ticket = self.update(ticket, FRIDAY + timedelta(hours=1), category=self.billing)
+        self.assertEqual(ticket.due_at, FRIDAY + timedelta(hours=10))
+        ticket = self.update(ticket, FRIDAY + timedelta(hours=2), category=None, severity_level='high')
+        self.assertEqual(ticket.due_at, FRIDAY + timedelta(days=1))
+
+        # responding stops the first response clock, waiting on the customer pauses the other
+        ticket = self.update(ticket, FRIDAY + timedelta(hours=3), status='in-progress')
+        self.assertEqual(ticket.first_responded_at, FRIDAY + timedelta(hours=3))
+        ticket = self.update(ticket, FRIDAY + timedelta(hours=4), status='awaiting-user')
+        ticket = self.update(ticket, FRIDAY + timedelta(hours=10), status='in-progress')
+        self.assertEqual(ticket.due_at, FRIDAY + timedelta(days=1, hours=6))
+
+        ticket = self.update(ticket, FRIDAY + timedelta(hours=12), status='resolved')
+        self.assertEqual(ticket.resolved_at, FRIDAY + timedelta(hours=12))
+        reopened = FRIDAY + timedelta(days=3)
+        ticket = self.update(ticket, reopened, status='open')
+        self.assertEqual((ticket.sla_started_at, ticket.resolved_at, ticket.first_responded_at), (reopened, None, None))
+        self.assertEqual(ticket.due_at, reopened + timedelta(days=1))
+
+    def test_staff_reply_is_first_response(self):
+        room = ChatRoom.objects.create(room_type='staff-chat')
+        ticket = self.ticket('high', chat_room=room)
+        staff = Account.objects.create_user(email='agent@example.com', password='testpass123', is_staff=True)
+        with frozen(FRIDAY + timedelta(minutes=5)):
+            ChatMessage.objects.create(room=room, sender=self.customer.user, text='Any update?')
+        ticket.refresh_from_db()
+        self.assertIsNone(ticket.first_responded_at)
+        with frozen(FRIDAY + timedelta(minutes=20)):
+            ChatMessage.objects.create(room=room, sender=staff, text='Looking into it')
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.first_responded_at, FRIDAY + timedelta(minutes=20))
+
+
+class OverdueTest(SLATestMixin, TestCase):
+
+    def setUp(self):
+        self.late = self.ticket('high', at=FRIDAY - timedelta(days=2))
+        self.unanswered = self.ticket('low', at=FRIDAY - timedelta(hours=30))
+        self.answered = self.update(self.ticket('low', at=FRIDAY - timedelta(hours=30)), FRIDAY - timedelta(hours=29), status='in-progress')
+        self.waiting = self.update(self.ticket('high', at=FRIDAY - timedelta(days=2)), FRIDAY - timedelta(days=2), status='awaiting-user')
+        self.resolved = self.update(self.ticket('high', at=FRIDAY - timedelta(days=5)), FRIDAY - timedelta(days=1), status='resolved')
+        self.fresh = self.ticket('high')
+
+    def test_overdue_in_sql(self):
+        overdue = SupportTicket.objects.filter(sla.overdue_q(FRIDAY + timedelta(minutes=1)))
+        self.assertEqual(set(overdue), {self.late, self.unanswered})
+        with frozen(FRIDAY + timedelta(minutes=1)):
+            self.assertEqual([t.is_overdue for t in (self.late, self.unanswered, self.answered, self.waiting, self.resolved)],
+                             [True, True, False, False, False])
+
+    def test_stats_in_one_query(self):
+        with self.assertNumQueries(1):
+            stats = sla.ticket_stats(SupportTicket.objects.all(), now=FRIDAY + timedelta(hours=2))
+        self.assertEqual(stats['total'], 6)
+        self.assertEqual((stats['open'], stats['in_progress'], stats['awaiting_user'], stats['resolved']), (3, 1, 1, 1))
+        self.assertEqual((stats['high_severity'], stats['low_severity']), (4, 2))
+        # the fresh ticket missed its first response by now too
+        self.assertEqual((stats['overdue'], stats['response_overdue']), (3, 3))
+
+    def test_api_overdue_filter(self):
+        staff = Account.objects.create_user(email='agent@example.com', password='testpass123', is_staff=True)
+        client = APIClient()
+        client.force_authenticate(staff)
+        with frozen(FRIDAY + timedelta(minutes=1)):
+            response = client.get('/api/v1/support/tickets/', {'overdue': 'true'})
+            stats = client.get('/api/v1/support/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({t['id'] for t in response.data['results']}, {self.late.id, self.unanswered.id})
+        self.assertEqual(stats.data['overdue'], 2)
+
+
+class EscalationTest(SLATestMixin, TestCase):
+
+    def setUp(self):
+        self.agents = [
+            Account.objects.create_user(email=f'agent{i}@example.com', password='testpass123', is_staff=True)
+            for i in range(2)
+        ]
+        # agent0 is busy with another ticket
+        self.ticket('high', at=FRIDAY).correspondents.add(self.agents[0])
+
+    def test_escalation_bumps_assigns_and_notifies(self):
+        low = self.ticket('low', at=FRIDAY - timedelta(days=8))
+        moderate = self.ticket('moderate', at=FRIDAY - timedelta(days=4))
+        moderate.correspondents.add(self.agents[0])
+        on_time = self.ticket('low', at=FRIDAY - timedelta(hours=1))
+
+        with mock.patch.object(Notification, 'send'):
+            escalated = sla.escalate_overdue(now=FRIDAY, batch_size=1)
+        self.assertEqual(escalated, 2)
+
+        low.refresh_from_db()
+        self.assertEqual((low.severity_level, low.escalation_level, low.escalated_at), ('moderate', 1, FRIDAY))
+        self.assertEqual(low.due_at, FRIDAY + timedelta(days=3))
+        self.assertEqual(low.first_response_due_at, FRIDAY + timedelta(hours=4))
+        self.assertEqual(list(low.correspondents.all()), [self.agents[1]])
+        moderate.refresh_from_db()
+        self.assertEqual(moderate.severity_level, 'high')
+        self.assertEqual(set(moderate.correspondents.all()), set(self.agents))
+        on_time.refresh_from_db()
+        self.assertEqual((on_time.severity_level, on_time.escalation_level), ('low', 0))
+
+        # one in-app and one push notification per agent, whatever the number of tickets
+        notifications = Notification.objects.filter(channel='in-app')
+        self.assertEqual(notifications.filter(user=self.agents[0]).count(), 1)
+        self.assertIn('2 support tickets escalated', notifications.get(user=self.agents[1]).subject)
+
+        # nothing is due again until the new window runs out
+        self.assertEqual(sla.escalate_overdue(now=FRIDAY + timedelta(minutes=30)), 0)
+        with mock.patch.object(Notification, 'send'):
+            self.assertEqual(sla.escalate_overdue(now=FRIDAY + timedelta(days=4)), 4)
+        low.refresh_from_db()
+        self.assertEqual((low.severity_level, low.escalation_level), ('high', 2))
+
+    def test_escalation_uses_policy_of_new_severity(self):
+        SLAPolicy.objects.create(name='Billing high', severity_level='high', category=self.billing,
+                                 first_response_minutes=10, resolution_minutes=90)
+        ticket = self.update(self.ticket('moderate', self.billing, at=FRIDAY - timedelta(days=4)),
+                             FRIDAY - timedelta(days=4), status='in-progress')
+        with mock.patch.object(Notification, 'send'):
+            sla.escalate_overdue(now=FRIDAY)
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.sla_policy.name, 'Billing high')
+        self.assertEqual(ticket.due_at, FRIDAY + timedelta(minutes=90))
+        # already answered: the first response deadline stays as it was
+        self.assertEqual(ticket.first_response_due_at, FRIDAY - timedelta(days=4) + timedelta(hours=4))
+
+
+class NotificationInboxTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Account.objects.create_user(email='inbox@example.com', password='testpass123', user_type='customer')
+        cls.other = Account.objects.create_user(email='inbox-other@example.com', password='testpass123', user_type='customer')
+
+    def notify(self, user=None, count=1, **fields):
+        return [
+            Notification.objects.create(user=user or self.user, subject=f'Notice {i}', message='Hello', **fields)
+            for i in range(count)
+        ]
+
+    def test_counter_follows_changes(self):
+        notifications = self.notify(count=5)
+        self.notify(read=True)
+        self.notify(self.other, count=2)
+        self.assertEqual(inbox.unread_count(self.user), 5)
+
+        self.assertEqual(inbox.mark_read(self.user, ids=[n.uuid for n in notifications[:2]]), 2)
+        self.assertEqual(inbox.mark_read(self.user, ids=[notifications[0].uuid]), 0)
+        self.assertEqual(inbox.unread_count(self.user), 3)
+        notifications[2].mark_as_read()
+        self.assertEqual(inbox.unread_count(self.user), 2)
+
+        # saving a read flip keeps the counter too
+        notifications[0].read = False
+        notifications[0].save()
+        self.assertEqual(inbox.unread_count(self.user), 3)
+
+        self.assertEqual(inbox.archive(self.user, ids=[n.uuid for n in notifications[:4]]), 4)
+        self.assertEqual(inbox.unread_count(self.user), 1)
+        self.assertEqual(inbox.mark_read(self.user), 1)
+        self.assertEqual((inbox.unread_count(self.user), inbox.unread_count(self.other)), (0, 2))
+        self.assertEqual(inbox.recount(self.user.pk), 0)
+
+    def test_before_selects_by_creation_time(self):
+        old = self.notify(count=3)
+        Notification.objects.filter(pk__in=[n.pk for n in old]).update(date_created=FRIDAY - timedelta(days=2))
+        inbox.recount(self.user.pk)
+        self.notify(count=2)
+        with self.assertNumQueries(4):
+            # savepoint, one UPDATE of the notifications, the counter, release
+            self.assertEqual(inbox.mark_read(self.user, before=FRIDAY), 3)
+        self.assertEqual(inbox.unread_count(self.user), 2)
+        self.assertEqual(inbox.archive(self.user, before=FRIDAY), 3)
+        self.assertEqual(Notification.objects.filter(user=self.user, archived=True).count(), 3)
+
+    def test_cursor_pages(self):
+        notifications = self.notify(count=7)
+        # the same timestamp for all of them: the id breaks the tie
+        Notification.objects.filter(user=self.user).update(date_created=FRIDAY)
+        seen, cursor = [], None
+        while True:
+            with self.assertNumQueries(1):
+                page = inbox.get_page(self.user, cursor=cursor, limit=3)
+            seen += [n.pk for n in page['notifications']]
+            cursor = page['next_cursor']
+            if not page['has_more']:
+                break
+        self.assertEqual(seen, sorted((n.pk for n in notifications), reverse=True))
+        self.assertIsNone(cursor)
+
+        inbox.archive(self.user, ids=[notifications[0].uuid])
+        inbox.mark_read(self.user, ids=[notifications[1].uuid])
+        self.assertEqual(len(inbox.get_page(self.user)['notifications']), 6)
+        self.assertEqual([n.pk for n in inbox.get_page(self.user, archived=True)['notifications']], [notifications[0].pk])
+        self.assertEqual(len(inbox.get_page(self.user, unread_only=True)['notifications']), 5)
+        with self.assertRaises(ValueError):
+            inbox.get_page(self.user, cursor='not-a-cursor')
+
+    def test_prune_keeps_unread_and_recent(self):
+        old_read = self.notify(count=7, read=True)
+        old_unread = self.notify(count=2)
+        recent_read = self.notify(count=2, read=True)
+        Notification.objects.filter(pk__in=[n.pk for n in old_read + old_unread]).update(date_created=FRIDAY - timedelta(days=100))
+        with self.settings(NOTIFICATION_RETENTION_DAYS=90):
+            self.assertEqual(inbox.prune(batch_size=3, now=FRIDAY), 7)
+        self.assertEqual(set(Notification.objects.values_list('pk', flat=True)), {n.pk for n in old_unread + recent_read})
+        self.assertEqual(inbox.unread_count(self.user), 2)
+
+    @override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+    def test_counter_changes_are_pushed(self):
+        layer = get_channel_layer()
+        async_to_sync(layer.group_add)(inbox.group_name(self.user.pk), 'inbox-test')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.notify(count=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            inbox.mark_read(self.user)
+        # every push carries the count as committed
+        received = [async_to_sync(layer.receive)('inbox-test')['unread'] for _ in range(3)]
+        self.assertEqual(received, [2, 2, 0])
+
+    def test_api(self):
+        notifications = self.notify(count=4)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.get('/api/v1/accounts/notifications/', {'limit': 3})
+        self.assertEqual(response.status_code, 200)
+        data = response.data['data']
+        self.assertEqual((data['unread_count'], len(data['results']), data['pagination']['has_more']), (4, 3, True))
+        response = client.get('/api/v1/accounts/notifications/', {'cursor': data['pagination']['next_cursor']})
+        self.assertEqual(len(response.data['data']['results']), 1)
+        self.assertEqual(client.get('/api/v1/accounts/notifications/', {'cursor': '!!'}).status_code, 400)
+
+        response = client.post('/api/v1/accounts/notifications/', {'notification_id': str(notifications[0].uuid)}, format='json')
+        self.assertEqual(response.data['data'], {'updated': 1, 'unread_count': 3})
+        response = client.post('/api/v1/accounts/notifications/', {'action': 'archive', 'ids': [str(n.uuid) for n in notifications[:2]]}, format='json')
+        self.assertEqual(response.data['data'], {'updated': 2, 'unread_count': 2})
+        response = client.post('/api/v1/accounts/notifications/', {'all': True}, format='json')
+        self.assertEqual(response.data['data'], {'updated': 2, 'unread_count': 0})
+
+        missing = client.post('/api/v1/accounts/notifications/', {'notification_id': str(self.notify(self.other)[0].uuid)}, format='json')
+        self.assertEqual(missing.status_code, 404)
+        self.assertEqual(client.post('/api/v1/accounts/notifications/', {}, format='json').status_code, 400)
+        self.assertEqual(client.post('/api/v1/accounts/notifications/', {'ids': ['nope']}, format='json').status_code, 400)
+
+
+class NotificationInboxLoadTest(TestCase):
+    """
+    The inbox against one user holding ``ROWS`` notifications. Every read
+    is a fixed number of queries whatever the table size; run with
+    NOTIFICATION_INBOX_TEST_ROWS=1000000 for the full load (about three
+    minutes on SQLite), or see ``manage.py benchmark_notification_inbox``.
+    """
+
+    ROWS = int(os.environ.get('NOTIFICATION_INBOX_TEST_ROWS', 100_000))
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Account.objects.create_user(email='inbox-load@example.com', password='testpass123', user_type='customer')
+        for start in range(0, cls.ROWS, 50_000):
+            Notification.objects.bulk_create(
+                [Notification(user=cls.user, subject='Notice', message='Hello', read=i % 4 == 0)
+                 for i in range(start, min(start + 50_000, cls.ROWS))],
+                batch_size=5000,
+            )
+        cls.unread = cls.ROWS - (cls.ROWS + 3) // 4
+        inbox.recount(cls.user.pk)
+
+    def test_reads_do_not_scale_with_the_table(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(inbox.unread_count(self.user), self.unread)
+        with self.assertNumQueries(1):
+            page = inbox.get_page(self.user, limit=50)
+        deep = Notification.objects.filter(user=self.user).order_by('pk')[self.ROWS // 2]
+        with self.assertNumQueries(1):
+            middle = inbox.get_page(self.user, cursor=inbox.encode_cursor(deep), limit=50)
+        self.assertEqual(len(page['notifications']), 50)
+        self.assertEqual(middle['notifications'][0].pk, deep.pk - 1)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(inbox.get_page(self.user, unread_only=True)['notifications']), 50)
+
+    def test_bulk_actions_and_prune(self):
+        with self.assertNumQueries(4):
+            self.assertEqual(inbox.mark_read(self.user, before=timezone.now()), self.unread)
+        self.assertEqual(inbox.unread_count(self.user), 0)
+        self.assertEqual(inbox.archive(self.user), self.ROWS)
+        Notification.objects.filter(user=self.user).update(date_created=timezone.now() - timedelta(days=365))
+        self.assertEqual(inbox.prune(batch_size=20_000), self.ROWS)
+        self.assertFalse(Notification.objects.filter(user=self.user).exists())
+
+
+class DeliveryPolicyTest(TestCase):
+    """The rules of ``delivery.evaluate``, with a fixed clock and no database."""
+
+    def test_defaults_and_opt_out(self):
+        preferences = delivery.Preferences()
+        self.assertEqual(delivery.evaluate(preferences, 'orders', 'push', FRIDAY).reason, 'instant')
+        self.assertEqual(delivery.evaluate(preferences, 'listings', 'email', FRIDAY).action, 'skip')
+
+        preferences = delivery.Preferences(modes={('orders', 'push'): 'off', ('orders', 'in-app'): 'off', ('wallet', 'in-app'): 'off'})
+        self.assertEqual(delivery.evaluate(preferences, 'orders', 'push', FRIDAY).reason, 'opted_out')
+        self.assertEqual(delivery.evaluate(preferences, 'orders', 'in-app', FRIDAY).action, 'skip')
+        # critical notifications always reach the inbox
+        self.assertEqual(delivery.evaluate(preferences, 'wallet', 'in-app', FRIDAY).action, 'send')
+        with self.assertRaises(ValueError):
+            delivery.evaluate(preferences, 'nope', 'push', FRIDAY)
+
+    def test_quiet_hours_overnight_in_local_time(self):
+        # 22:00 to 07:00 in Lagos (UTC+1)
+        preferences = delivery.Preferences(quiet_start=time(22), quiet_end=time(7))
+        late = datetime(2026, 10, 16, 22, 30, tzinfo=dt_timezone.utc)
+        decision = delivery.evaluate(preferences, 'orders', 'push', late)
+        self.assertEqual((decision.action, decision.reason), ('digest', 'quiet_hours'))
+        self.assertEqual(decision.deliver_after, datetime(2026, 10, 17, 6, 0, tzinfo=dt_timezone.utc))
+        self.assertTrue(delivery.evaluate(preferences, 'orders', 'email', late).sends)
+        self.assertTrue(delivery.evaluate(preferences, 'orders', 'push', FRIDAY).sends)
+        self.assertTrue(delivery.evaluate(preferences, 'account', 'push', late).sends)
+
+        tokyo = delivery.Preferences(timezone='Asia/Tokyo', quiet_start=time(22), quiet_end=time(7))
+        # 15:00 UTC is midnight in Tokyo
+        self.assertEqual(delivery.evaluate(tokyo, 'orders', 'push', FRIDAY).reason, 'quiet_hours')
+
+    def test_digest_mode(self):
+        preferences = delivery.Preferences(digest_hour=8, modes={('chat', 'email'): 'digest'})
+        decision = delivery.evaluate(preferences, 'chat', 'email', FRIDAY)
+        self.assertEqual((decision.action, decision.deliver_after), ('digest', datetime(2026, 10, 17, 7, 0, tzinfo=dt_timezone.utc)))
+        self.assertTrue(delivery.evaluate(preferences, 'chat', 'in-app', FRIDAY).sends)
+
+    def test_rate_cap(self):
+        preferences = delivery.Preferences()
+        recent = [FRIDAY - timedelta(minutes=minutes) for minutes in (50, 40, 30)]
+        self.assertTrue(delivery.evaluate(preferences, 'listings', 'push', FRIDAY, recent[:2]).sends)
+        decision = delivery.evaluate(preferences, 'listings', 'push', FRIDAY, recent)
+        self.assertEqual((decision.reason, decision.deliver_after), ('rate_limited', FRIDAY + timedelta(minutes=10)))
+        self.assertTrue(delivery.evaluate(preferences, 'wallet', 'push', FRIDAY, recent * 10).sends)
+
+
+class DeliveryTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Account.objects.create_user(email='delivery@example.com', password='testpass123', user_type='customer')
+
+    def setUp(self):
+        self.sent = []
+        self.transports = {channel: self.record for channel in ('push', 'email', 'sms')}
+
+    def record(self, notification, template=None, context=None):
+        self.sent.append((notification.channel, notification.subject))
+
+    def notify(self, category='listings', at=FRIDAY, **kwargs):
+        return delivery.notify(self.user, category, 'New car', 'A new car was listed', now=at, transports=self.transports, **kwargs)
+
+    def test_notify_rate_caps_and_digests(self):
+        for minute in range(5):
+            self.notify(at=FRIDAY + timedelta(minutes=minute))
+        self.assertEqual(self.sent, [('push', 'New car')] * 3)
+        self.assertEqual(Notification.objects.filter(user=self.user, channel='in-app').count(), 5)
+        held = Notification.objects.filter(user=self.user, channel='push', delivered_at__isnull=True)
+        self.assertEqual(held.count(), 2)
+
+        self.sent.clear()
+        self.assertEqual(delivery.send_digests(now=FRIDAY + timedelta(minutes=30), transports=self.transports), 0)
+        self.assertEqual(delivery.send_digests(now=FRIDAY + timedelta(hours=1), transports=self.transports), 1)
+        self.assertEqual(self.sent, [('push', 'You have 2 new notifications')])
+        self.assertFalse(held.exists())
+        self.assertEqual(delivery.send_digests(now=FRIDAY + timedelta(hours=2), transports=self.transports), 0)
+        # the digest does not add to the unread count of the rows it collapses
+        self.assertEqual(inbox.unread_count(self.user), 10)
+
+    def test_preferences_are_honoured(self):
+        NotificationSettings.objects.create(user=self.user, quiet_hours_start=time(16), quiet_hours_end=time(18))
+        NotificationPreference.objects.create(user=self.user, category='orders', channel='email', mode='digest')
+        NotificationPreference.objects.create(user=self.user, category='orders', channel='in-app', mode='off')
+
+        notifications = self.notify('orders')
+        self.assertEqual(self.sent, [])
+        self.assertEqual(sorted((n.channel, n.deliver_after) for n in notifications), [
+            ('email', datetime(2026, 10, 17, 7, 0, tzinfo=dt_timezone.utc)),
+            ('push', datetime(2026, 10, 16, 17, 0, tzinfo=dt_timezone.utc)),
+        ])
+        self.notify('account')
+        self.assertEqual(sorted(self.sent), [('email', 'New car'), ('push', 'New car')])
+
+        # quiet hours again at delivery time: held once more
+        self.sent.clear()
+        NotificationSettings.objects.filter(user=self.user).update(quiet_hours_start=time(18), quiet_hours_end=time(19))
+        self.assertEqual(delivery.send_digests(now=datetime(2026, 10, 16, 17, 30, tzinfo=dt_timezone.utc), transports=self.transports), 0)
+        self.assertEqual(delivery.send_digests(now=datetime(2026, 10, 17, 7, 0, tzinfo=dt_timezone.utc), transports=self.transports), 2)
+        self.assertEqual(sorted(self.sent), [('email', 'New car'), ('push', 'New car')])
+
+    def test_preferences_api(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/v1/accounts/notifications/preferences/')
+        self.assertEqual(response.status_code, 200)
+        modes = {(p['category'], p['channel']): p['mode'] for p in response.data['data']['preferences']}
+        self.assertEqual((modes[('chat', 'email')], modes[('listings', 'email')]), ('instant', 'off'))
+
+        response = client.patch('/api/v1/accounts/notifications/preferences/', {
+            'timezone': 'Europe/London', 'quiet_hours_start': '22:00', 'quiet_hours_end': '07:00',
+            'preferences': [{'category': 'chat', 'channel': 'email', 'mode': 'digest'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        preferences = delivery.Preferences.load(self.user)
+        self.assertEqual((preferences.timezone, preferences.quiet_end), ('Europe/London', time(7)))
+        self.assertEqual(preferences.mode('chat', 'email'), 'digest')
+
+        self.assertEqual(client.patch('/api/v1/accounts/notifications/preferences/', {'timezone': 'Mars/Base'}, format='json').status_code, 400)
+        self.assertEqual(client.patch('/api/v1/accounts/notifications/preferences/', {'quiet_hours_end': None}, format='json').status_code, 400)
+        bad = {'preferences': [{'category': 'chat', 'channel': 'email', 'mode': 'sometimes'}]}
+        self.assertEqual(client.patch('/api/v1/accounts/notifications/preferences/', bad, format='json').status_code, 400)
@@ -7,9 +7,12 @@ from .models import (
     VehicleInspection,
     InspectionPhoto,
     InspectionDocument,
+    DocumentVersion,
     DigitalSignature,
     InspectionTemplate,
     InspectionFeeSetting,
+    RetentionRun,
+    InspectionDailyStats,
 )
 # Import revenue admin configurations
 from .admin_revenue import (
@@ -156,10 +159,11 @@ class InspectionDocumentAdmin(admin.ModelAdmin):
         'id', 'inspection', 'template_type', 'status', 'signature_status_badge',
         'page_count', 'view_document_link', 'download_document_link', 'generated_at'
     ]
-    list_filter = ['template_type', 'status', 'generated_at', 'expires_at']
+    list_filter = ['template_type', 'status', 'legal_hold', 'generated_at', 'expires_at']
     search_fields = ['inspection__id', 'document_hash', 'inspection__vehicle__name']
+    actions = ['place_legal_hold', 'release_legal_hold']
     readonly_fields = [
-        'document_hash', 'generated_at', 'date_created', 'last_updated',
+        'document_hash', 'sealed_at', 'generated_at', 'archived_at', 'date_created', 'last_updated',
         'document_preview', 'signature_summary', 'view_document_link', 'download_document_link'
     ]
     
@@ -168,7 +172,7 @@ class InspectionDocumentAdmin(admin.ModelAdmin):
             'fields': ('inspection', 'template_type', 'status')
         }),
         ('Document Details', {
-            'fields': ('document_file', 'document_preview', 'document_hash', 'file_size', 'page_count')
+            'fields': ('document_file', 'document_preview', 'document_hash', 'sealed_at', 'file_size', 'page_count')
         }),
         ('Signature Information', {
             'fields': ('signature_summary',)
@@ -180,6 +184,9 @@ class InspectionDocumentAdmin(admin.ModelAdmin):
             'fields': ('include_photos', 'include_recommendations', 'language', 'compliance_standards'),
             'classes': ('collapse',)
         }),
+        ('Retention', {
+            'fields': ('legal_hold', 'archived_at')
+        }),
         ('Timestamps', {
             'fields': ('generated_at', 'expires_at', 'date_created', 'last_updated'),
             'classes': ('collapse',)
@@ -189,6 +196,16 @@ class InspectionDocumentAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('inspection').prefetch_related('signatures')
     
+    @admin.action(description='Place on legal hold (exempt from retention)')
+    def place_legal_hold(self, request, queryset):
+        updated = queryset.update(legal_hold=True)
+        self.message_user(request, f"{updated} document(s) placed on legal hold.")
+    
+    @admin.action(description='Release legal hold')
+    def release_legal_hold(self, request, queryset):
+        updated = queryset.update(legal_hold=False)
+        self.message_user(request, f"{updated} document(s) released from legal hold.")
+    
     def signature_status_badge(self, obj):
         """Display signature completion status as a badge"""
         signatures = obj.signatures.all()
@@ -454,9 +471,51 @@ class InspectionFeeSettingAdmin(admin.ModelAdmin):
 
 
 # Register models with custom Veyu admin site
+@admin.register(DocumentVersion)
+class DocumentVersionAdmin(admin.ModelAdmin):
+    list_display = ['document', 'version_number', 'status', 'reason', 'date_created']
+    list_filter = ['status']
+    search_fields = ['document__id', 'file_hash']
+    raw_id_fields = ['document']
+    readonly_fields = ['date_created', 'last_updated']
+
+
+@admin.register(RetentionRun)
+class RetentionRunAdmin(admin.ModelAdmin):
+    list_display = [
+        'id', 'action', 'status', 'dry_run', 'cutoff', 'batches', 'processed',
+        'files_deleted', 'files_failed', 'date_created', 'finished_at'
+    ]
+    list_filter = ['action', 'status', 'dry_run']
+    readonly_fields = [
+        'action', 'status', 'dry_run', 'cutoff', 'last_id', 'batches', 'processed',
+        'files_deleted', 'files_failed', 'error', 'finished_at', 'date_created', 'last_updated'
+    ]
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(InspectionDailyStats)
+class InspectionDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ['scope', 'scope_id', 'day', 'inspection_type', 'status', 'inspections', 'signed_documents']
+    list_filter = ['scope', 'inspection_type', 'status']
+    date_hierarchy = 'day'
+    readonly_fields = [
+        'scope', 'scope_id', 'day', 'inspection_type', 'status', 'inspections', 'rated', 'rating_total',
+        'signed_documents', 'date_created', 'last_updated'
+    ]
+
+    def has_add_permission(self, request):
+        return False
+
+
 veyu_admin.register(VehicleInspection, VehicleInspectionAdmin)
 veyu_admin.register(InspectionPhoto, InspectionPhotoAdmin)
 veyu_admin.register(InspectionDocument, InspectionDocumentAdmin)
 veyu_admin.register(DigitalSignature, DigitalSignatureAdmin)
 veyu_admin.register(InspectionTemplate, InspectionTemplateAdmin)
 veyu_admin.register(InspectionFeeSetting, InspectionFeeSettingAdmin)
+veyu_admin.register(DocumentVersion, DocumentVersionAdmin)
+veyu_admin.register(RetentionRun, RetentionRunAdmin)
+veyu_admin.register(InspectionDailyStats, InspectionDailyStatsAdmin)
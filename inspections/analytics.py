@@ -0,0 +1,302 @@
+"""
+Inspection statistics.
+
+``summary`` computes every figure of the stats endpoint for a queryset in
+one aggregate query: counts by status and type are conditional
+aggregates, ratings are mapped to numbers with ``Case``/``When`` and the
+signed document count is a correlated subquery.
+
+For the platform-wide view the same figures come from
+``InspectionDailyStats`` rollups instead (``rollup_summary``): one row per
+day, inspection type and status for the platform and for every dealer,
+customer and inspector. ``inspections.signals`` moves an inspection's
+contribution between rows whenever its date, type, status, rating or
+owners change and when one of its documents is signed or unsigned;
+``daily`` reads the per-day series from them. Bulk updates bypass the
+signals, so code that changes document status in bulk calls
+``documents_unsigned``, and ``rebuild`` (``manage.py
+rebuild_inspection_stats``) recomputes the rollups from scratch.
+"""
+import logging
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.apps import apps as django_apps
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+RATING_VALUES = {'poor': 1, 'fair': 2, 'good': 3, 'excellent': 4}
+COMPLETED_STATUSES = ('completed', 'signed')
+PENDING_STATUSES = ('draft', 'in_progress')
+SCOPE_FIELDS = {'dealer': 'dealer_id', 'customer': 'customer_id', 'inspector': 'inspector_id'}
+# the fields an inspection's contribution to the rollups depends on
+STATE_FIELDS = ('inspection_date', 'inspection_type', 'status', 'overall_rating', *SCOPE_FIELDS.values())
+DEFAULT_DAYS = 30
+MAX_DAYS = 366
+
+
+def rating_value(field='overall_rating'):
+    return Case(
+        *[When(**{field: rating}, then=Value(value)) for rating, value in RATING_VALUES.items()],
+        default=None, output_field=IntegerField(),
+    )
+
+
+def _signed_documents(document_model=None):
+    document_model = document_model or django_apps.get_model('inspections', 'InspectionDocument')
+    return Subquery(
+        document_model.objects.filter(inspection=OuterRef('pk'), status='signed').order_by()
+        .values('inspection').annotate(count=Count('pk')).values('count'),
+        output_field=IntegerField(),
+    )
+
+
+# scopes
+
+def scope_for(user):
+    """``(scope, scope_id)`` of the inspections ``user`` gets statistics for."""
+    if hasattr(user, 'customer_profile'):
+        return 'customer', user.customer_profile.pk
+    if hasattr(user, 'dealership_profile'):
+        return 'dealer', user.dealership_profile.pk
+    if getattr(user, 'user_type', None) == 'mechanic':
+        return 'inspector', user.pk
+    return 'platform', 0
+
+
+def scoped_queryset(scope, scope_id=0):
+    from .models import VehicleInspection
+
+    if scope == 'platform':
+        return VehicleInspection.objects.all()
+    return VehicleInspection.objects.filter(**{SCOPE_FIELDS[scope]: scope_id})
+
+
+# summaries
+
+def _figures(count, **extra):
+    from .models import VehicleInspection
+
+    return {
+        'total': count(),
+        'completed': count(Q(status__in=COMPLETED_STATUSES)),
+        'pending': count(Q(status__in=PENDING_STATUSES)),
+        **{f'type_{key}': count(Q(inspection_type=key)) for key, _ in VehicleInspection.INSPECTION_TYPES},
+        **{f'status_{key}': count(Q(status=key)) for key, _ in VehicleInspection.STATUS_CHOICES},
+        **extra,
+    }
+
+
+def _result(figures):
+    from .models import VehicleInspection
+
+    rated = figures['rated'] or 0
+    return {
+        'total_inspections': figures['total'] or 0,
+        'completed_inspections': figures['completed'] or 0,
+        'pending_inspections': figures['pending'] or 0,
+        'signed_documents': figures['signed_documents'] or 0,
+        'average_rating': round(figures['rating_total'] / rated, 2) if rated else 0,
+        'inspections_by_type': {
+            key: figures[f'type_{key}'] for key, _ in VehicleInspection.INSPECTION_TYPES if figures[f'type_{key}']
+        },
+        'inspections_by_status': {
+            key: figures[f'status_{key}'] for key, _ in VehicleInspection.STATUS_CHOICES if figures[f'status_{key}']
+        },
+    }
+
+
+def summary(queryset):
+    """The stats endpoint's figures for ``queryset``, in one query."""
+    figures = queryset.order_by().aggregate(**_figures(
+        lambda condition=None: Count('pk', filter=condition),
+        rated=Count(rating_value()),
+        rating_total=Sum(rating_value()),
+        signed_documents=Sum(Coalesce(_signed_documents(), 0)),
+    ))
+    return _result(figures)
+
+
+def rollup_summary(scope='platform', scope_id=0):
+    """The same figures as ``summary``, read from the daily rollups."""
+    from .models import InspectionDailyStats
+
+    figures = InspectionDailyStats.objects.filter(scope=scope, scope_id=scope_id).aggregate(**_figures(
+        lambda condition=None: Sum('inspections', filter=condition),
+        rated=Sum('rated'),
+        rating_total=Sum('rating_total'),
+        signed_documents=Sum('signed_documents'),
+    ))
+    return _result(figures)
+
+
+def daily(scope='platform', scope_id=0, days=DEFAULT_DAYS, today=None):
+    """
+    Inspections per day for the last ``days`` days up to ``today``, oldest
+    first, with their split by type and by status. Days without
+    inspections are included with a total of 0.
+    """
+    from .models import InspectionDailyStats
+
+    end = today or timezone.localdate()
+    start = end - timedelta(days=days - 1)
+    series = {
+        start + timedelta(days=offset): {'total': 0, 'by_type': defaultdict(int), 'by_status': defaultdict(int)}
+        for offset in range(days)
+    }
+    rows = InspectionDailyStats.objects.filter(
+        scope=scope, scope_id=scope_id, day__range=(start, end), inspections__gt=0,
+    ).values_list('day', 'inspection_type', 'status', 'inspections')
+    for day, inspection_type, status, count in rows:
+        entry = series[day]
+        entry['total'] += count
+        entry['by_type'][inspection_type] += count
+        entry['by_status'][status] += count
+    return [
+        {'date': day, 'total': entry['total'], 'by_type': dict(entry['by_type']), 'by_status': dict(entry['by_status'])}
+        for day, entry in series.items()
+    ]
+
+
+# rollup maintenance
+
+def state(inspection):
+    """The values of ``STATE_FIELDS`` on an inspection instance."""
+    return {field: getattr(inspection, field) for field in STATE_FIELDS}
+
+
+def stored_state(pk):
+    """The values of ``STATE_FIELDS`` in the database, or None."""
+    from .models import VehicleInspection
+
+    if pk is None:
+        return None
+    return VehicleInspection.objects.filter(pk=pk).values(*STATE_FIELDS).first()
+
+
+def _day(moment):
+    return timezone.localdate(moment) if timezone.is_aware(moment) else moment.date()
+
+
+def _keys(values):
+    scopes = [('platform', 0)] + [
+        (scope, values[field]) for scope, field in SCOPE_FIELDS.items() if values[field] is not None
+    ]
+    day = _day(values['inspection_date'])
+    return [(scope, scope_id, day, values['inspection_type'], values['status']) for scope, scope_id in scopes]
+
+
+def _contribution(values, sign, signed=0):
+    rating = RATING_VALUES.get(values['overall_rating'])
+    deltas = {
+        'inspections': sign,
+        'rated': sign if rating else 0,
+        'rating_total': sign * (rating or 0),
+        'signed_documents': sign * signed,
+    }
+    return [(key, deltas) for key in _keys(values)]
+
+
+def _apply(contributions):
+    changes = defaultdict(Counter)
+    for key, deltas in contributions:
+        changes[key].update(deltas)
+    for key, deltas in changes.items():
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        if deltas:
+            _bump(key, deltas)
+
+
+def _bump(key, deltas):
+    from .models import InspectionDailyStats
+
+    scope, scope_id, day, inspection_type, status = key
+    fields = {'scope': scope, 'scope_id': scope_id, 'day': day, 'inspection_type': inspection_type, 'status': status}
+    rows = InspectionDailyStats.objects.filter(**fields)
+    updates = {field: F(field) + delta for field, delta in deltas.items()}
+    if rows.update(**updates, last_updated=timezone.now()):
+        return
+    try:
+        with transaction.atomic():
+            InspectionDailyStats.objects.create(**fields, **deltas)
+    except IntegrityError:
+        rows.update(**updates, last_updated=timezone.now())
+
+
+def inspection_changed(pk, before, after):
+    """
+    Move inspection ``pk``'s contribution from the ``before`` state to the
+    ``after`` state; None for either means it did not or no longer exists.
+    """
+    from .models import InspectionDocument
+
+    signed = 0
+    if before is not None and after is not None and _keys(before) != _keys(after):
+        # its signed documents move with it
+        signed = InspectionDocument.objects.filter(inspection_id=pk, status='signed').count()
+    contributions = []
+    if before is not None:
+        contributions += _contribution(before, -1, signed)
+    if after is not None:
+        contributions += _contribution(after, 1, signed)
+    _apply(contributions)
+
+
+def documents_signed(counts):
+    """Add ``counts`` (inspection id to a signed document delta) to the inspections' rows."""
+    from .models import VehicleInspection
+
+    counts = {pk: delta for pk, delta in counts.items() if delta}
+    if not counts:
+        return
+    contributions = []
+    for values in VehicleInspection.objects.filter(pk__in=list(counts)).values('pk', *STATE_FIELDS):
+        deltas = {'signed_documents': counts[values['pk']]}
+        contributions += [(key, deltas) for key in _keys(values)]
+    _apply(contributions)
+
+
+def documents_unsigned(queryset):
+    """Call before a bulk update or delete takes the signed documents in ``queryset`` out of 'signed'."""
+    documents_signed({
+        pk: -count for pk, count in
+        queryset.filter(status='signed').order_by().values('inspection_id').annotate(count=Count('pk'))
+        .values_list('inspection_id', 'count')
+    })
+
+
+def rebuild(apps=None):
+    """Recompute every rollup row from the inspections table. Returns the number of rows."""
+    get_model = (apps or django_apps).get_model
+    VehicleInspection = get_model('inspections', 'VehicleInspection')
+    InspectionDocument = get_model('inspections', 'InspectionDocument')
+    InspectionDailyStats = get_model('inspections', 'InspectionDailyStats')
+
+    rows = []
+    for scope, field in (('platform', None), *SCOPE_FIELDS.items()):
+        queryset = VehicleInspection.objects.order_by()
+        if field is not None:
+            queryset = queryset.filter(**{f'{field}__isnull': False})
+        grouped = (
+            queryset.annotate(day=TruncDate('inspection_date'), scope_key=F(field) if field else Value(0))
+            .values('scope_key', 'day', 'inspection_type', 'status')
+            .annotate(
+                inspections=Count('pk'),
+                rated=Count(rating_value()),
+                rating_total=Coalesce(Sum(rating_value()), 0),
+                signed_documents=Coalesce(Sum(Coalesce(_signed_documents(InspectionDocument), 0)), 0),
+            )
+        )
+        rows.extend(
+            InspectionDailyStats(scope=scope, scope_id=row.pop('scope_key'), **row)
+            for row in grouped.iterator(chunk_size=5000)
+        )
+    with transaction.atomic():
+        InspectionDailyStats.objects.all().delete()
+        InspectionDailyStats.objects.bulk_create(rows, batch_size=5000)
+    logger.info(f"Rebuilt {len(rows)} inspection stats rows")
+    return len(rows)
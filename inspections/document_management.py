@@ -9,8 +9,9 @@ from datetime import timedelta
 from typing import List, Dict, Optional, Tuple
 import logging
 
-from .models import InspectionDocument, DigitalSignature, VehicleInspection
+from .models import InspectionDocument, DigitalSignature, DocumentVersion, VehicleInspection
 from accounts.models import Account
+from utils import audit
 
 logger = logging.getLogger(__name__)
 
@@ -118,19 +119,14 @@ class DocumentVersionManager:
             Version information dictionary
         """
         try:
-            # In a real implementation, you would:
-            # 1. Copy the current document file
-            # 2. Store it with a version number
-            # 3. Update metadata
-            
-            version_info = {
-                'document_id': document.id,
-                'version_number': DocumentVersionManager._get_next_version_number(document),
-                'created_at': timezone.now(),
-                'reason': reason or 'Version created',
-                'file_hash': document.document_hash,
-                'status': document.status
-            }
+            version = DocumentVersion.objects.create(
+                document=document,
+                version_number=DocumentVersionManager._get_next_version_number(document),
+                status=document.status,
+                file_hash=document.document_hash,
+                reason=reason or 'Version created',
+            )
+            version_info = DocumentVersionManager._version_info(version)
             
             logger.info(f"Created version for document {document.id}: {version_info}")
             return version_info
@@ -142,9 +138,19 @@ class DocumentVersionManager:
     @staticmethod
     def _get_next_version_number(document: InspectionDocument) -> int:
         """Get next version number for document"""
-        # In a real implementation, you would query version history
-        # For now, return a simple version number
-        return 1
+        latest = document.versions.aggregate(latest=models.Max('version_number'))['latest']
+        return (latest or 0) + 1
+    
+    @staticmethod
+    def _version_info(version: DocumentVersion) -> Dict:
+        return {
+            'document_id': version.document_id,
+            'version_number': version.version_number,
+            'created_at': version.date_created,
+            'reason': version.reason,
+            'file_hash': version.file_hash,
+            'status': version.status
+        }
     
     @staticmethod
     def get_version_history(document: InspectionDocument) -> List[Dict]:
@@ -155,8 +161,15 @@ class DocumentVersionManager:
             List of version information dictionaries
         """
         try:
-            # In a real implementation, you would query version records
-            # For now, return current version info
+            versions = [
+                {**DocumentVersionManager._version_info(version), 'is_current': False}
+                for version in document.versions.order_by('-version_number')
+            ]
+            if versions:
+                versions[0]['is_current'] = True
+                return versions
+            
+            # Documents that never changed state have no version rows
             return [
                 {
                     'version_number': 1,
@@ -174,7 +187,9 @@ class DocumentVersionManager:
 
 class DocumentAuditTrail:
     """
-    Manages audit trail for document access and modifications
+    Manages audit trail for document access and modifications, kept in the
+    'documents' stream of the audit log (utils.audit). Signature events are
+    in the 'signatures' stream and show up in the document's trail too.
     """
     
     @staticmethod
@@ -190,25 +205,10 @@ class DocumentAuditTrail:
             ip_address: IP address of user
             details: Additional details
         """
-        try:
-            audit_entry = {
-                'timestamp': timezone.now(),
-                'user_id': user.id,
-                'user_email': user.email,
-                'document_id': document.id,
-                'inspection_id': document.inspection.id,
-                'action': action,
-                'ip_address': ip_address,
-                'details': details or {}
-            }
-            
-            logger.info(f"Document audit: {audit_entry}")
-            
-            # In a real implementation, you would store this in a database table
-            # For now, we're just logging it
-            
-        except Exception as e:
-            logger.error(f"Error logging document access: {str(e)}")
+        audit.record(
+            'documents', action, actor=user, obj=document, ip_address=ip_address,
+            details={'inspection_id': document.inspection_id, **(details or {})},
+        )
     
     @staticmethod
     def log_modification(user: Account, document: InspectionDocument, 
@@ -222,22 +222,15 @@ class DocumentAuditTrail:
             modification_type: Type of modification
             details: Additional details
         """
-        try:
-            audit_entry = {
-                'timestamp': timezone.now(),
-                'user_id': user.id,
-                'user_email': user.email,
-                'document_id': document.id,
-                'modification_type': modification_type,
+        audit.record(
+            'documents', modification_type, actor=user, obj=document,
+            details={
+                'inspection_id': document.inspection_id,
                 'previous_status': details.get('previous_status') if details else None,
                 'new_status': document.status,
-                'details': details or {}
-            }
-            
-            logger.info(f"Document modification: {audit_entry}")
-            
-        except Exception as e:
-            logger.error(f"Error logging document modification: {str(e)}")
+                **(details or {}),
+            },
+        )
     
     @staticmethod
     def get_audit_trail(document: InspectionDocument, 
@@ -252,47 +245,22 @@ class DocumentAuditTrail:
             end_date: End date for filtering
             
         Returns:
-            List of audit entries
+            List of audit entries, oldest first
         """
-        try:
-            # In a real implementation, you would query audit records from database
-            # For now, return basic information
-            
-            audit_entries = []
-            
-            # Document creation
-            audit_entries.append({
-                'timestamp': document.generated_at,
-                'action': 'document_created',
-                'user': 'System',
-                'details': {
-                    'template_type': document.template_type,
-                    'status': 'generating'
-                }
-            })
-            
-            # Signature events
-            for signature in document.signatures.all():
-                if signature.signed_at:
-                    audit_entries.append({
-                        'timestamp': signature.signed_at,
-                        'action': 'document_signed',
-                        'user': signature.signer.email,
-                        'details': {
-                            'role': signature.role,
-                            'signature_method': signature.signature_method,
-                            'ip_address': signature.signer_ip
-                        }
-                    })
-            
-            # Sort by timestamp
-            audit_entries.sort(key=lambda x: x['timestamp'])
-            
-            return audit_entries
-            
-        except Exception as e:
-            logger.error(f"Error getting audit trail: {str(e)}")
-            return []
+        # events of this request not written yet belong in the trail
+        audit.flush()
+        return [
+            {
+                'timestamp': event.occurred_at,
+                'action': event.action,
+                'user': event.actor_email or 'System',
+                'stream': event.stream,
+                'sequence': event.sequence,
+                'ip_address': event.ip_address,
+                'details': event.details,
+            }
+            for event in audit.events(obj=document, start=start_date, end=end_date)
+        ]
 
 
 class DocumentSearchManager:
@@ -418,8 +386,9 @@ class DocumentRetentionManager:
                 'document_id': document.id,
                 'status': status,
                 'age_days': age_days,
-                'should_archive': should_archive if status == 'active' else False,
-                'should_delete': should_delete if status == 'archived' else False,
+                'legal_hold': document.legal_hold,
+                'should_archive': should_archive and not document.legal_hold if status == 'active' else False,
+                'should_delete': should_delete and not document.legal_hold if status == 'archived' else False,
                 'days_until_archive': days_until_archive if status == 'active' else None,
                 'days_until_deletion': days_until_deletion if status == 'archived' else None
             }
@@ -444,6 +413,7 @@ class DocumentRetentionManager:
             # Update document status
             previous_status = document.status
             document.status = 'archived'
+            document.archived_at = timezone.now()
             document.save()
             
             # Log the archival
@@ -459,62 +429,38 @@ class DocumentRetentionManager:
             return False
     
     @staticmethod
-    def delete_expired_documents() -> int:
+    def delete_expired_documents(**options) -> int:
         """
-        Delete documents that have exceeded retention period
+        Delete documents that have exceeded retention period, along with
+        their stored files. Runs in batches (see inspections.retention);
+        ``options`` are passed to run_retention.
         
         Returns:
             Number of documents deleted
         """
+        from .retention import run_retention
+        
         try:
-            cutoff_date = timezone.now() - timedelta(days=DocumentRetentionManager.RETENTION_ARCHIVED)
-            
-            # Find expired archived documents
-            expired_documents = InspectionDocument.objects.filter(
-                status='archived',
-                generated_at__lt=cutoff_date
-            )
-            
-            count = expired_documents.count()
-            
-            # Log before deletion
-            for doc in expired_documents:
-                logger.info(f"Deleting expired document {doc.id} (age: {(timezone.now() - doc.generated_at).days} days)")
-            
-            # Delete documents
-            expired_documents.delete()
-            
-            logger.info(f"Deleted {count} expired documents")
-            return count
+            return run_retention('delete', **options).processed
             
         except Exception as e:
             logger.error(f"Error deleting expired documents: {str(e)}")
             return 0
     
     @staticmethod
-    def archive_old_documents() -> int:
+    def archive_old_documents(**options) -> int:
         """
-        Archive documents that have exceeded active retention period
+        Archive documents that have exceeded active retention period. Runs
+        in batches (see inspections.retention); ``options`` are passed to
+        run_retention.
         
         Returns:
             Number of documents archived
         """
+        from .retention import run_retention
+        
         try:
-            cutoff_date = timezone.now() - timedelta(days=DocumentRetentionManager.RETENTION_ACTIVE)
-            
-            # Find old active documents
-            old_documents = InspectionDocument.objects.filter(
-                status__in=['ready', 'signed'],
-                generated_at__lt=cutoff_date
-            )
-            
-            count = 0
-            for doc in old_documents:
-                if DocumentRetentionManager.archive_document(doc, reason="Automatic archival - retention policy"):
-                    count += 1
-            
-            logger.info(f"Archived {count} old documents")
-            return count
+            return run_retention('archive', **options).processed
             
         except Exception as e:
             logger.error(f"Error archiving old documents: {str(e)}")
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inspections.retention import run_retention
+
+
+class Command(BaseCommand):
+    help = (
+        "Archive documents past the active retention period and delete archived documents "
+        "past the archive period, in resumable batches. Documents on legal hold are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--archive', action='store_true', help='Only run the archive job')
+        parser.add_argument('--delete', action='store_true', help='Only run the delete job')
+        parser.add_argument('--batch-size', type=int, default=None, help='Documents per batch')
+        parser.add_argument('--max-batches', type=int, default=None, help='Stop after this many batches')
+        parser.add_argument('--dry-run', action='store_true', help='Count what would change without changing it')
+        parser.add_argument('--no-resume', action='store_true', help='Start over instead of resuming an unfinished run')
+
+    def handle(self, *args, **options):
+        actions = [action for action in ('archive', 'delete') if options[action]] or ['archive', 'delete']
+        failed = []
+        for action in actions:
+            run = run_retention(
+                action,
+                batch_size=options['batch_size'],
+                dry_run=options['dry_run'],
+                resume=not options['no_resume'],
+                max_batches=options['max_batches'],
+            )
+            message = f"{run}: {run.processed} documents in {run.batches} batches"
+            if action == 'delete':
+                message += f", {run.files_deleted} files deleted, {run.files_failed} failed"
+            if run.status == 'failed':
+                failed.append(f"{action}: {run.error}")
+                self.stderr.write(self.style.ERROR(message))
+            else:
+                self.stdout.write(self.style.SUCCESS(message))
+        if failed:
+            raise CommandError(f"Retention failed, rerun to resume ({'; '.join(failed)})")
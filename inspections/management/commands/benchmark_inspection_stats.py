@@ -0,0 +1,127 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import Account, Customer, Dealership
+from inspections import analytics
+from inspections.models import InspectionDocument, VehicleInspection
+from listings.models import Car
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Benchmark the inspection stats queries on a large inspections table. Runs inside a rolled back transaction."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--inspections', type=int, default=500_000, help='Inspections to create (default: 500000)')
+        parser.add_argument('--dealers', type=int, default=10)
+        parser.add_argument('--iterations', type=int, default=10)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options)
+                raise _Rollback()
+        except _Rollback:
+            self.stdout.write(self.style.SUCCESS("Benchmark data rolled back."))
+
+    def _run(self, options):
+        total, iterations = options['inspections'], options['iterations']
+        rng = random.Random(7)
+        dealers, cars = [], []
+        for i in range(options['dealers']):
+            user = Account.objects.create_user(email=f'bench-stats-dealer{i}@veyu.test', password='bench-pass-123', user_type='dealer')
+            dealer = Dealership.objects.get(user=user)
+            dealers.append(dealer)
+            cars.append(Car.objects.create(dealer=dealer, name=f'Bench car {i}', brand='Toyota', color='Silver'))
+        customers = [
+            Customer.objects.get(user=Account.objects.create_user(
+                email=f'bench-stats-customer{i}@veyu.test', password='bench-pass-123', user_type='customer'
+            ))
+            for i in range(10)
+        ]
+        inspectors = [
+            Account.objects.create_user(email=f'bench-stats-mechanic{i}@veyu.test', password='bench-pass-123', user_type='mechanic')
+            for i in range(5)
+        ]
+        types = [key for key, _ in VehicleInspection.INSPECTION_TYPES]
+        statuses = [key for key, _ in VehicleInspection.STATUS_CHOICES]
+        ratings = [None, 'poor', 'fair', 'good', 'excellent']
+
+        started = time.perf_counter()
+        now = timezone.now()
+        for start in range(0, total, 50_000):
+            batch = []
+            for _ in range(start, min(start + 50_000, total)):
+                index = rng.randrange(len(dealers))
+                batch.append(VehicleInspection(
+                    vehicle=cars[index], dealer=dealers[index], customer=rng.choice(customers),
+                    inspector=rng.choice(inspectors), inspection_type=rng.choice(types), status=rng.choice(statuses),
+                    overall_rating=rng.choice(ratings), inspection_date=now - timedelta(minutes=rng.randrange(365 * 24 * 60)),
+                ))
+            VehicleInspection.objects.bulk_create(batch, batch_size=5000)
+        signed = VehicleInspection.objects.filter(dealer__in=dealers, status='signed').values_list('pk', flat=True)
+        InspectionDocument.objects.bulk_create(
+            [InspectionDocument(inspection_id=pk, status='signed') for pk in signed.iterator(chunk_size=5000)],
+            batch_size=5000,
+        )
+        self.stdout.write(f"Seeded {total} inspections in {time.perf_counter() - started:.2f}s")
+        started = time.perf_counter()
+        rows = analytics.rebuild()
+        self.stdout.write(f"Rebuilt {rows} rollup rows in {time.perf_counter() - started:.2f}s")
+
+        dealer = dealers[0]
+        dealer_inspections = VehicleInspection.objects.filter(dealer=dealer)
+        everything = VehicleInspection.objects.all()
+        self._measure('dealer, per-figure (old)', iterations, lambda: self._legacy(dealer_inspections))
+        self._measure('dealer, one query', iterations, lambda: analytics.summary(dealer_inspections))
+        self._measure('dealer, rollups', iterations, lambda: analytics.rollup_summary('dealer', dealer.pk))
+        self._measure('platform, per-figure (old)', max(1, iterations // 5), lambda: self._legacy(everything))
+        self._measure('platform, one query', max(1, iterations // 5), lambda: analytics.summary(everything))
+        self._measure('platform, rollups', iterations, lambda: analytics.rollup_summary())
+        self._measure('platform, 30 days', iterations, lambda: analytics.daily(days=30))
+        self._measure('dealer, 365 days', iterations, lambda: analytics.daily('dealer', dealer.pk, days=365))
+
+        inspection = dealer_inspections.first()
+
+        def change_status():
+            inspection.status = 'completed' if inspection.status != 'completed' else 'in_progress'
+            inspection.save(update_fields=['status'])
+        self._measure('status change (signals)', iterations, change_status)
+
+    @staticmethod
+    def _legacy(queryset):
+        # what InspectionStatsView used to do, minus the recent inspections
+        rating_map = {'poor': 1, 'fair': 2, 'good': 3, 'excellent': 4}
+        queryset.count()
+        queryset.filter(status__in=['completed', 'signed']).count()
+        queryset.filter(status__in=['draft', 'in_progress']).count()
+        InspectionDocument.objects.filter(inspection__in=queryset, status='signed').count()
+        [rating_map[rating] for rating in queryset.exclude(overall_rating__isnull=True).values_list('overall_rating', flat=True).iterator()]
+        dict(queryset.values('inspection_type').annotate(count=Count('id')).values_list('inspection_type', 'count'))
+        dict(queryset.values('status').annotate(count=Count('id')).values_list('status', 'count'))
+
+    def _measure(self, label, iterations, func):
+        # the seeding alone overflows the query log
+        reset_queries()
+        timings = []
+        with CaptureQueriesContext(connection) as ctx:
+            for _ in range(iterations):
+                started = time.perf_counter()
+                func()
+                timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p50 = timings[len(timings) // 2]
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(
+            f"{label:<28} p50={p50:9.2f}ms p95={p95:9.2f}ms queries/call={len(ctx.captured_queries) / iterations:.1f}"
+        )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from inspections.analytics import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily inspection stats rollups from the inspections table."
+
+    def handle(self, *args, **options):
+        rows = rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} inspection stats rows."))
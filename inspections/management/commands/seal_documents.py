@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inspections import sealing
+from inspections.models import InspectionDocument
+
+
+class Command(BaseCommand):
+    help = "Seal fully signed inspection documents that do not carry a seal yet."
+
+    def handle(self, *args, **options):
+        if not sealing.configured():
+            raise CommandError("Document sealing is not configured (DOCUMENT_SEAL_KEY_FILE, DOCUMENT_SEAL_CERTIFICATE_FILE)")
+        pending = InspectionDocument.objects.filter(status='signed', sealed_at__isnull=True).values_list('pk', flat=True)
+        sealed = failed = 0
+        for pk in pending.iterator():
+            if sealing.seal_signed_document(pk):
+                sealed += 1
+            else:
+                failed += 1
+        self.stdout.write(self.style.SUCCESS(f"Sealed {sealed} documents, {failed} failed"))
+        if failed:
+            raise CommandError(f"{failed} documents could not be sealed, see the log")
@@ -0,0 +1,35 @@
+from cryptography import x509
+from django.core.management.base import BaseCommand, CommandError
+
+from inspections import sealing
+
+
+class Command(BaseCommand):
+    help = "Check the seal of a PDF file: signer, signing time and whether it was changed after sealing."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='The PDF to check')
+        parser.add_argument('--trust-file', help='PEM certificates to trust instead of the configured ones')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], 'rb') as f:
+                pdf = f.read()
+            trust = None
+            if options['trust_file']:
+                with open(options['trust_file'], 'rb') as f:
+                    trust = x509.load_pem_x509_certificates(f.read())
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        result = sealing.verify(pdf, trust)
+        self.stdout.write(f"SHA-256:      {result.digest}")
+        if result.sealed:
+            self.stdout.write(f"Signer:       {result.signer or 'unknown'}")
+            self.stdout.write(f"Signed at:    {result.signing_time.isoformat() if result.signing_time else 'unknown'}")
+            self.stdout.write(f"Intact:       {'yes' if result.intact else 'NO'}")
+            self.stdout.write(f"Trusted:      {'yes' if result.trusted else 'NO'}")
+            self.stdout.write(f"Nothing added after sealing: {'yes' if result.complete else 'NO'}")
+        if not result.valid:
+            raise CommandError(result.error)
+        self.stdout.write(self.style.SUCCESS("Seal valid"))
@@ -0,0 +1,3 @@
+from utils import metrics
+
+INSPECTIONS_COMPLETED = metrics.counter('inspections_completed_total', 'Inspections marked completed', ['inspection_type'])
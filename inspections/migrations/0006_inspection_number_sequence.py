@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 21:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inspections', '0005_alter_vehicleinspection_customer'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='vehicleinspection',
+            name='inspection_number',
+            field=models.CharField(blank=True, help_text='Unique inspection slip number (e.g., INSP-2026-000123)', max_length=20, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.1.1 on 2026-10-18 23:11
+
+import django.db.models.deletion
+import utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inspections', '0006_inspection_number_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inspectiondocument',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='inspectiondocument',
+            name='legal_hold',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='RetentionRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(blank=True, default=utils.make_UUID)),
+                ('date_created', models.DateTimeField(auto_now=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('action', models.CharField(choices=[('archive', 'Archive'), ('delete', 'Delete')], max_length=20)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('interrupted', 'Interrupted'), ('completed', 'Completed'), ('failed', 'Failed')], default='running', max_length=20)),
+                ('dry_run', models.BooleanField(default=False)),
+                ('cutoff', models.DateTimeField()),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('batches', models.PositiveIntegerField(default=0)),
+                ('processed', models.PositiveIntegerField(default=0)),
+                ('files_deleted', models.PositiveIntegerField(default=0)),
+                ('files_failed', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Retention Run',
+                'verbose_name_plural': 'Retention Runs',
+                'ordering': ['-date_created'],
+                'indexes': [models.Index(fields=['action', 'status'], name='inspections_action_430ebb_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DocumentVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(blank=True, default=utils.make_UUID)),
+                ('date_created', models.DateTimeField(auto_now=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('version_number', models.PositiveIntegerField()),
+                ('status', models.CharField(choices=[('generating', 'Generating'), ('ready', 'Ready for Signature'), ('signed', 'Fully Signed'), ('archived', 'Archived')], max_length=20)),
+                ('file_hash', models.CharField(blank=True, max_length=64, null=True)),
+                ('reason', models.CharField(blank=True, max_length=255)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='versions', to='inspections.inspectiondocument')),
+            ],
+            options={
+                'verbose_name': 'Document Version',
+                'verbose_name_plural': 'Document Versions',
+                'ordering': ['document', 'version_number'],
+                'constraints': [models.UniqueConstraint(fields=('document', 'version_number'), name='unique_document_version')],
+            },
+        ),
+    ]
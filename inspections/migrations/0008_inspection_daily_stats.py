@@ -0,0 +1,44 @@
+# Generated by Django 5.1.1 on 2026-10-19 00:20
+
+import utils
+from django.db import migrations, models
+
+
+def build_rollups(apps, schema_editor):
+    from inspections.analytics import rebuild
+
+    rebuild(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inspections', '0007_document_retention'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InspectionDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(blank=True, default=utils.make_UUID)),
+                ('date_created', models.DateTimeField(auto_now=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('scope', models.CharField(choices=[('platform', 'Platform'), ('dealer', 'Dealer'), ('customer', 'Customer'), ('inspector', 'Inspector')], max_length=20)),
+                ('scope_id', models.BigIntegerField(default=0)),
+                ('day', models.DateField()),
+                ('inspection_type', models.CharField(choices=[('pre_purchase', 'Pre-Purchase Inspection'), ('pre_rental', 'Pre-Rental Inspection'), ('maintenance', 'Maintenance Inspection'), ('insurance', 'Insurance Inspection')], max_length=20)),
+                ('status', models.CharField(choices=[('pending_payment', 'Pending Payment'), ('draft', 'Draft'), ('in_progress', 'In Progress'), ('completed', 'Completed'), ('signed', 'Signed'), ('archived', 'Archived')], max_length=20)),
+                ('inspections', models.IntegerField(default=0)),
+                ('rated', models.IntegerField(default=0)),
+                ('rating_total', models.IntegerField(default=0)),
+                ('signed_documents', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Inspection Daily Stats',
+                'verbose_name_plural': 'Inspection Daily Stats',
+                'constraints': [models.UniqueConstraint(fields=('scope', 'scope_id', 'day', 'inspection_type', 'status'), name='unique_inspection_daily_stats')],
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
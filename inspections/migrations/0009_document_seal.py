@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-19 00:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inspections', '0008_inspection_daily_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inspectiondocument',
+            name='sealed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -50,7 +50,7 @@ class VehicleInspection(DbModel):
     dealer = models.ForeignKey('accounts.Dealership', on_delete=models.CASCADE, related_name='dealer_inspections', null=True, blank=True)
     
     # Inspection metadata
-    inspection_number = models.CharField(max_length=20, unique=True, blank=True, null=True, help_text="Unique inspection slip number (e.g., INSP-7)")
+    inspection_number = models.CharField(max_length=20, unique=True, blank=True, null=True, help_text="Unique inspection slip number (e.g., INSP-2026-000123)")
     inspection_type = models.CharField(max_length=20, choices=INSPECTION_TYPES)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending_payment')
     overall_rating = models.CharField(max_length=20, choices=CONDITION_CHOICES, blank=True, null=True)
@@ -110,9 +110,12 @@ class VehicleInspection(DbModel):
     
     def mark_completed(self):
         """Mark inspection as completed"""
+        from inspections.metrics import INSPECTIONS_COMPLETED
+
         self.status = 'completed'
         self.completed_at = timezone.now()
         self.save()
+        INSPECTIONS_COMPLETED.labels(self.inspection_type).inc()
     
     def mark_paid(self, transaction, payment_method='wallet'):
         """Mark inspection as paid"""
@@ -129,23 +132,9 @@ class VehicleInspection(DbModel):
         self.save()
     
     def _generate_inspection_number(self):
-        """Generate unique inspection number"""
-        prefix = 'INSP'
-        # Get the last inspection number
-        last_inspection = VehicleInspection.objects.filter(
-            inspection_number__startswith=prefix
-        ).order_by('-id').first()
-        
-        if last_inspection and last_inspection.inspection_number:
-            try:
-                last_number = int(last_inspection.inspection_number.split('-')[1])
-                new_number = last_number + 1
-            except (IndexError, ValueError):
-                new_number = 1
-        else:
-            new_number = 1
-        
-        return f"{prefix}-{new_number}"
+        """Generate unique inspection number (e.g. INSP-2026-000123)"""
+        from utils.sequences import inspection_numbers
+        return inspection_numbers.allocate()
     
     def get_inspection_summary(self):
         """Get a summary of inspection results"""
@@ -257,6 +246,14 @@ class InspectionDocument(DbModel):
     # Timestamps
     generated_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField(blank=True, null=True)
+
+    # Retention (inspections.retention): documents on legal hold are never
+    # archived or deleted by the retention jobs
+    legal_hold = models.BooleanField(default=False)
+    archived_at = models.DateTimeField(blank=True, null=True)
+
+    # Set once the fully signed PDF carries the platform's seal (inspections.sealing)
+    sealed_at = models.DateTimeField(blank=True, null=True)
     
     def __str__(self):
         return f"Document - {self.get_template_type_display()} for Inspection #{self.inspection.id}"
@@ -312,6 +309,32 @@ class InspectionDocument(DbModel):
         verbose_name_plural = 'Inspection Documents'
 
 
+class DocumentVersion(DbModel):
+    """
+    A point-in-time record of a document's status and hash, written when a
+    document is archived or otherwise changes state (DocumentVersionManager).
+    """
+    document = models.ForeignKey(InspectionDocument, on_delete=models.CASCADE, related_name='versions')
+    version_number = models.PositiveIntegerField()
+    status = models.CharField(max_length=20, choices=InspectionDocument.DOCUMENT_STATUS)
+    file_hash = models.CharField(max_length=64, blank=True, null=True)
+    reason = models.CharField(max_length=255, blank=True)
+
+    def __str__(self):
+        return f"Version {self.version_number} of document #{self.document_id}"
+
+    def __repr__(self):
+        return f"<DocumentVersion: {self.document_id} v{self.version_number} - {self.status}>"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['document', 'version_number'], name='unique_document_version'),
+        ]
+        ordering = ['document', 'version_number']
+        verbose_name = 'Document Version'
+        verbose_name_plural = 'Document Versions'
+
+
 class DigitalSignature(DbModel):
     """
     Model for storing digital signatures on inspection documents
@@ -480,3 +503,90 @@ class InspectionFeeSetting(DbModel):
     class Meta:
         verbose_name = 'Inspection Fee Setting'
         verbose_name_plural = 'Inspection Fee Settings'
+
+
+class RetentionRun(DbModel):
+    """
+    One pass of a document retention job (see inspections.retention).
+    ``last_id`` is the checkpoint: every document up to it has been handled,
+    so an interrupted run resumes after it with the same ``cutoff``.
+    """
+    ACTIONS = {
+        'archive': 'Archive',
+        'delete': 'Delete',
+    }
+    STATUS = {
+        'running': 'Running',
+        'interrupted': 'Interrupted',
+        'completed': 'Completed',
+        'failed': 'Failed',
+    }
+
+    action = models.CharField(max_length=20, choices=ACTIONS)
+    status = models.CharField(max_length=20, choices=STATUS, default='running')
+    dry_run = models.BooleanField(default=False)
+    cutoff = models.DateTimeField()
+    last_id = models.BigIntegerField(default=0)
+    batches = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    files_deleted = models.PositiveIntegerField(default=0)
+    files_failed = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        prefix = 'Dry run: ' if self.dry_run else ''
+        return f"{prefix}{self.get_action_display()} documents before {self.cutoff:%Y-%m-%d} ({self.get_status_display()})"
+
+    def __repr__(self):
+        return f"<RetentionRun: {self.action} - {self.status} at {self.last_id}>"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['action', 'status']),
+        ]
+        ordering = ['-date_created']
+        verbose_name = 'Retention Run'
+        verbose_name_plural = 'Retention Runs'
+
+
+class InspectionDailyStats(DbModel):
+    """
+    Inspections per day, type and status for one dealer, customer or
+    inspector, or for the whole platform (see inspections.analytics).
+    Kept up to date by inspections.signals; ``manage.py
+    rebuild_inspection_stats`` recomputes them from scratch.
+    """
+    SCOPES = {
+        'platform': 'Platform',
+        'dealer': 'Dealer',
+        'customer': 'Customer',
+        'inspector': 'Inspector',
+    }
+
+    scope = models.CharField(max_length=20, choices=SCOPES)
+    # Dealership, Customer or Account id; 0 for the platform
+    scope_id = models.BigIntegerField(default=0)
+    day = models.DateField()
+    inspection_type = models.CharField(max_length=20, choices=VehicleInspection.INSPECTION_TYPES)
+    status = models.CharField(max_length=20, choices=VehicleInspection.STATUS_CHOICES)
+    inspections = models.IntegerField(default=0)
+    rated = models.IntegerField(default=0)
+    rating_total = models.IntegerField(default=0)
+    signed_documents = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.get_scope_display()} {self.scope_id}: {self.inspections} {self.inspection_type} {self.status} on {self.day}"
+
+    def __repr__(self):
+        return f"<InspectionDailyStats: {self.scope}:{self.scope_id} {self.day} {self.inspection_type}/{self.status}>"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['scope', 'scope_id', 'day', 'inspection_type', 'status'], name='unique_inspection_daily_stats',
+            ),
+        ]
+        # the unique constraint's index serves (scope, scope_id, day) lookups
+        verbose_name = 'Inspection Daily Stats'
+        verbose_name_plural = 'Inspection Daily Stats'
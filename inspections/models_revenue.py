@@ -200,6 +200,7 @@ class InspectionRevenueSplit(DbModel):
         """
         Credit the dealer's wallet with their share
         """
+        from wallet import ledger
         from wallet.models import Wallet, Transaction
         from django.utils import timezone
         from django.db import transaction as db_transaction
@@ -228,10 +229,28 @@ class InspectionRevenueSplit(DbModel):
                 related_inspection=self.inspection
             )
             
-            # Credit wallet
-            dealer_wallet.ledger_balance += self.dealer_amount
+            # Card/bank payments never passed through a wallet, so bring
+            # them into escrow first; wallet payments are already there
+            dealer_amount = ledger.to_amount(self.dealer_amount)
+            platform_amount = ledger.to_amount(self.platform_amount)
+            held = dealer_amount + platform_amount
+            if self.payment_transaction.source != 'wallet':
+                ledger.post_entry(
+                    'payment', [('funding', -held), ('escrow', held)],
+                    narration=self.payment_transaction.narration,
+                    reference=f'inspection-payment:{self.payment_transaction.pk}',
+                    transaction=self.payment_transaction,
+                )
+            
+            # Release escrow to the dealer and the platform
+            ledger.post_entry(
+                'revenue_share',
+                [('escrow', -held), (dealer_wallet, dealer_amount), ('platform_fee', platform_amount)],
+                narration=credit_transaction.narration,
+                reference=f'inspection-split:{self.pk}',
+                transaction=credit_transaction,
+            )
             dealer_wallet.transactions.add(credit_transaction)
-            dealer_wallet.save()
             
             # Mark as credited
             self.dealer_credited = True
@@ -396,6 +415,7 @@ class WithdrawalRequest(DbModel):
     
     def process_withdrawal(self):
         """Process approved withdrawal"""
+        from wallet import ledger
         from wallet.models import Transaction
         from django.utils import timezone
         from django.db import transaction as db_transaction
@@ -408,19 +428,22 @@ class WithdrawalRequest(DbModel):
             withdrawal_transaction = Transaction.objects.create(
                 sender=self.user.name,
                 sender_wallet=self.wallet,
-                recipient=f"{self.payout_info.account_name} - {self.payout_info.account_number}",
+                recipient=f"{self.account_name} - {self.account_number}"[:50],
                 type='withdraw',
                 amount=self.amount,
                 status='completed',
                 source='bank',
-                narration=f'Withdrawal to {self.payout_info.bank_name}',
-                payout_info=self.payout_info
+                narration=f'Withdrawal to {self.bank_name}',
             )
             
-            # Deduct from wallet
-            self.wallet.ledger_balance -= self.amount
+            # Deduct from wallet; fails if the balance was spent since approval
+            ledger.withdraw(
+                self.wallet, self.amount,
+                narration=withdrawal_transaction.narration,
+                reference=f'withdrawal-request:{self.pk}',
+                transaction=withdrawal_transaction,
+            )
             self.wallet.transactions.add(withdrawal_transaction)
-            self.wallet.save()
             
             # Update request
             self.transaction = withdrawal_transaction
@@ -0,0 +1,242 @@
+"""
+Batched, resumable document retention.
+
+The two jobs apply DocumentRetentionManager's policy:
+
+    archive     ready/signed documents generated more than RETENTION_ACTIVE
+                days ago become 'archived', with a DocumentVersion row each
+    delete      archived documents generated more than RETENTION_ARCHIVED
+                days ago are deleted, their stored files (the document and
+                its signature images) first
+
+Documents are visited in primary key order, ``batch_size`` at a time. Each
+batch is a single transaction which also advances the run's checkpoint
+(``RetentionRun.last_id``), so a run that was interrupted, killed or failed
+resumes after the last committed batch with its original cutoff. Documents
+on legal hold are never touched, and ``dry_run`` only counts.
+
+Stored files are removed through ``DOCUMENT_RETENTION_STORAGE`` (anything
+with a storage-style ``delete(name)``), a few at a time in threads and with
+retries. A document whose files could not be deleted keeps its row and is
+picked up again by the next run.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Max
+from django.db.models.functions import Cast
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import analytics
+from .document_management import DocumentRetentionManager
+from .models import DigitalSignature, DocumentVersion, InspectionDocument, RetentionRun
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ('ready', 'signed')
+ARCHIVE_REASON = 'Archived: Automatic archival - retention policy'
+RETRY_DELAY = 0.5  # seconds, doubled after every failed attempt
+
+
+class CloudinaryDocumentStorage:
+    """
+    Deletes CloudinaryField values ("raw/upload/v1/documents/abc.pdf")
+    through the Cloudinary API. A resource that is already gone counts as
+    deleted.
+    """
+
+    def delete(self, name):
+        from cloudinary import uploader
+        from cloudinary.models import CloudinaryField
+
+        resource = CloudinaryField().parse_cloudinary_resource(name)
+        result = uploader.destroy(
+            resource.public_id, resource_type=resource.resource_type, type=resource.type, invalidate=True,
+        )
+        if result.get('result') not in ('ok', 'not found'):
+            raise IOError(f"Cloudinary did not delete {name}: {result}")
+
+
+def get_storage():
+    return import_string(settings.DOCUMENT_RETENTION_STORAGE)()
+
+
+def cutoff_for(action, now=None):
+    days = {
+        'archive': DocumentRetentionManager.RETENTION_ACTIVE,
+        'delete': DocumentRetentionManager.RETENTION_ARCHIVED,
+    }[action]
+    return (now or timezone.now()) - timedelta(days=days)
+
+
+def candidates(action, cutoff):
+    """Documents the action applies to (before the checkpoint is taken into account)."""
+    statuses = ACTIVE_STATUSES if action == 'archive' else ('archived',)
+    return InspectionDocument.objects.filter(status__in=statuses, generated_at__lt=cutoff, legal_hold=False)
+
+
+def _start(action, dry_run, resume, now):
+    if resume and not dry_run:
+        run = RetentionRun.objects.filter(
+            action=action, dry_run=False, status__in=['running', 'interrupted', 'failed'],
+        ).order_by('-id').first()
+        if run is not None:
+            logger.info(f"Resuming {run.action} run {run.id} after document {run.last_id}")
+            run.status, run.error = 'running', ''
+            run.save(update_fields=['status', 'error', 'last_updated'])
+            return run
+    return RetentionRun.objects.create(action=action, dry_run=dry_run, cutoff=cutoff_for(action, now))
+
+
+# archive
+
+def _archive_batch(run, ids, storage, now):
+    # Re-read under lock: a hold placed since the keyset query wins
+    rows = list(
+        candidates('archive', run.cutoff).filter(pk__in=ids).select_for_update()
+        .values_list('pk', 'document_hash')
+    )
+    if run.dry_run or not rows:
+        return {'processed': len(rows)}
+
+    pks = [pk for pk, _ in rows]
+    latest = dict(
+        DocumentVersion.objects.filter(document_id__in=pks).values('document_id')
+        .annotate(number=Max('version_number')).values_list('document_id', 'number')
+    )
+    analytics.documents_unsigned(InspectionDocument.objects.filter(pk__in=pks))
+    InspectionDocument.objects.filter(pk__in=pks).update(status='archived', archived_at=now, last_updated=now)
+    DocumentVersion.objects.bulk_create([
+        DocumentVersion(
+            document_id=pk, version_number=latest.get(pk, 0) + 1, status='archived',
+            file_hash=document_hash, reason=ARCHIVE_REASON,
+        )
+        for pk, document_hash in rows
+    ])
+    return {'processed': len(rows)}
+
+
+# delete
+
+def _delete_file(storage, name, retries):
+    for attempt in range(1, retries + 1):
+        try:
+            storage.delete(name)
+            return True
+        except Exception as e:
+            if attempt == retries:
+                logger.warning(f"Could not delete stored file {name} after {retries} attempts: {e}")
+                return False
+            time.sleep(RETRY_DELAY * 2 ** (attempt - 1))
+
+
+def _delete_files(storage, names):
+    """Delete ``names`` from ``storage``; returns the names that could not be deleted."""
+    if not names:
+        return set()
+    retries = max(1, getattr(settings, 'DOCUMENT_RETENTION_DELETE_RETRIES', 3))
+    workers = max(1, min(getattr(settings, 'DOCUMENT_RETENTION_DELETE_WORKERS', 8), len(names)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        deleted = pool.map(lambda name: _delete_file(storage, name, retries), names)
+        return {name for name, ok in zip(names, deleted) if not ok}
+
+
+def _delete_batch(run, ids, storage, now):
+    # The rows stay locked while their files are deleted so that a legal
+    # hold cannot slip in between the file and the row going away
+    files = {
+        pk: [name] if name else []
+        for pk, name in candidates('delete', run.cutoff).filter(pk__in=ids).select_for_update()
+        .values_list('pk', Cast('document_file', models.CharField()))
+    }
+    signatures = (
+        DigitalSignature.objects.filter(document_id__in=list(files))
+        .exclude(signature_image__isnull=True).exclude(signature_image='')
+        .values_list('document_id', Cast('signature_image', models.CharField()))
+    )
+    for pk, name in signatures:
+        files[pk].append(name)
+
+    names = [name for owned in files.values() for name in owned]
+    if run.dry_run:
+        return {'processed': len(files), 'files_deleted': len(names)}
+
+    failed = _delete_files(storage, names)
+    deletable = [pk for pk, owned in files.items() if not failed.intersection(owned)]
+    if deletable:
+        InspectionDocument.objects.filter(pk__in=deletable).delete()
+    return {
+        'processed': len(deletable),
+        'files_deleted': len(names) - len(failed),
+        'files_failed': len(failed),
+    }
+
+
+HANDLERS = {
+    'archive': _archive_batch,
+    'delete': _delete_batch,
+}
+
+
+def run_retention(action, batch_size=None, dry_run=False, resume=True, storage=None, max_batches=None, now=None):
+    """
+    Apply the ``action`` ('archive' or 'delete') policy in batches and return
+    the RetentionRun. Unless ``resume`` is off, the latest unfinished run of
+    the action is continued instead of starting over. ``max_batches`` stops
+    early and leaves the run 'interrupted'; an error leaves it 'failed' with
+    the message in ``error``. Either way the next call picks it up.
+    """
+    if action not in HANDLERS:
+        raise ValueError(f"Unknown retention action: {action}")
+    batch_size = batch_size or getattr(settings, 'DOCUMENT_RETENTION_BATCH_SIZE', 1000)
+    if action == 'delete' and not dry_run and storage is None:
+        storage = get_storage()
+
+    handler = HANDLERS[action]
+    run = _start(action, dry_run, resume, now)
+    batches = 0
+    try:
+        while max_batches is None or batches < max_batches:
+            ids = list(
+                candidates(action, run.cutoff).filter(pk__gt=run.last_id).order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                run.status, run.finished_at = 'completed', timezone.now()
+                run.save(update_fields=['status', 'finished_at', 'last_updated'])
+                break
+            with transaction.atomic():
+                counts = handler(run, ids, storage, now or timezone.now())
+                run.last_id = ids[-1]
+                run.batches += 1
+                for field, count in counts.items():
+                    setattr(run, field, getattr(run, field) + count)
+                run.save(update_fields=['last_id', 'batches', *counts, 'last_updated'])
+            batches += 1
+        else:
+            run.status = 'interrupted'
+            run.save(update_fields=['status', 'last_updated'])
+    except KeyboardInterrupt:
+        _stop(run, 'interrupted')
+        raise
+    except Exception as e:
+        logger.exception(f"Retention {action} run {run.id} failed")
+        _stop(run, 'failed', str(e))
+
+    logger.info(
+        f"Retention {action} run {run.id} {run.status}: {run.processed} documents, "
+        f"{run.files_deleted} files deleted, {run.files_failed} failed"
+    )
+    return run
+
+
+def _stop(run, status, error=''):
+    # The failed batch rolled back; drop its counts from the instance too
+    run.refresh_from_db()
+    run.status, run.error = status, error
+    run.save(update_fields=['status', 'error', 'last_updated'])
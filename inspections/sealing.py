@@ -0,0 +1,516 @@
+"""
+Sealing of signed inspection documents.
+
+Once every party has signed a document its final PDF is sealed: an
+incremental update adds an invisible signature field whose value is a
+detached PKCS#7/CMS signature (``adbe.pkcs7.detached``) over every byte of
+the file but the signature itself. It is made with the platform's signing
+key, ``DOCUMENT_SEAL_KEY_FILE``, and ``DOCUMENT_SEAL_CERTIFICATE_FILE``
+(PEM, the signing certificate first, then its chain). PDF readers show the
+seal, and a byte changed after sealing no longer matches its digest.
+
+``verify`` needs neither the database nor the network. It checks the
+digest of the signed byte ranges against the seal's message digest, the
+seal against the signer's certificate, the certificate chain against
+``DOCUMENT_SEAL_TRUST_FILE`` (by default the last certificate of the
+chain) and that nothing was appended after sealing. The
+``documents/verify-seal/`` endpoint and ``manage.py verify_document_seal``
+report its result.
+
+``seal_document`` runs when a document is fully signed (``inspections
+.signals``); it stores the sealed file in place of the unsigned one and
+records the file's digest in the audit log. ``manage.py seal_documents``
+seals signed documents that were missed.
+"""
+import hashlib
+import io
+import logging
+import re
+from dataclasses import dataclass
+from datetime import datetime, timezone as dt_timezone
+from functools import lru_cache
+
+from cryptography import x509
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec, padding, rsa
+from cryptography.hazmat.primitives.serialization import pkcs7
+from django.conf import settings
+from django.utils import timezone
+
+from utils import audit
+
+logger = logging.getLogger(__name__)
+
+# room for the CMS signature and its certificate chain, in bytes
+SIGNATURE_SIZE = 16384
+BYTE_RANGE_PLACEHOLDER = b'[0 0000000000 0000000000 0000000000]'
+FIELD_NAME = 'Veyu seal'
+SEAL_REASON = 'Signed by all parties on Veyu'
+MAX_CHAIN = 8
+
+OID_SIGNED_DATA = '1.2.840.113549.1.7.2'
+OID_MESSAGE_DIGEST = '1.2.840.113549.1.9.4'
+OID_SIGNING_TIME = '1.2.840.113549.1.9.5'
+DIGESTS = {
+    '1.3.14.3.2.26': hashes.SHA1,
+    '2.16.840.1.101.3.4.2.1': hashes.SHA256,
+    '2.16.840.1.101.3.4.2.2': hashes.SHA384,
+    '2.16.840.1.101.3.4.2.3': hashes.SHA512,
+}
+
+
+class SealError(Exception):
+    pass
+
+
+class Signer:
+    """A signing key and its certificate chain, leaf first."""
+
+    def __init__(self, key, certificates):
+        if not certificates:
+            raise SealError("A seal needs the signing certificate")
+        if certificates[0].public_key().public_numbers() != key.public_key().public_numbers():
+            raise SealError("The signing key does not belong to the first certificate")
+        self.key = key
+        self.certificate = certificates[0]
+        self.chain = list(certificates[1:])
+
+    @classmethod
+    def from_files(cls, key_file, certificate_file, password=None):
+        with open(key_file, 'rb') as f:
+            key = serialization.load_pem_private_key(f.read(), password.encode() if password else None)
+        with open(certificate_file, 'rb') as f:
+            certificates = x509.load_pem_x509_certificates(f.read())
+        return cls(key, certificates)
+
+    @property
+    def name(self):
+        return common_name(self.certificate)
+
+    def sign(self, data):
+        """A detached CMS signature over ``data``, DER-encoded."""
+        builder = pkcs7.PKCS7SignatureBuilder().set_data(data).add_signer(self.certificate, self.key, hashes.SHA256())
+        for certificate in self.chain:
+            builder = builder.add_certificate(certificate)
+        # Binary: sign the bytes as they are, without MIME line ending conversion
+        return builder.sign(serialization.Encoding.DER, [pkcs7.PKCS7Options.DetachedSignature, pkcs7.PKCS7Options.Binary])
+
+
+def configured():
+    return bool(getattr(settings, 'DOCUMENT_SEAL_KEY_FILE', '') and getattr(settings, 'DOCUMENT_SEAL_CERTIFICATE_FILE', ''))
+
+
+def default_signer():
+    if not configured():
+        raise SealError("Document sealing is not configured (DOCUMENT_SEAL_KEY_FILE, DOCUMENT_SEAL_CERTIFICATE_FILE)")
+    return _load_signer(
+        settings.DOCUMENT_SEAL_KEY_FILE, settings.DOCUMENT_SEAL_CERTIFICATE_FILE,
+        getattr(settings, 'DOCUMENT_SEAL_KEY_PASSWORD', '') or None,
+    )
+
+
+@lru_cache(maxsize=4)
+def _load_signer(key_file, certificate_file, password):
+    return Signer.from_files(key_file, certificate_file, password)
+
+
+def default_trust():
+    """The certificates a seal's chain must end in."""
+    trust_file = getattr(settings, 'DOCUMENT_SEAL_TRUST_FILE', '')
+    if trust_file:
+        with open(trust_file, 'rb') as f:
+            return x509.load_pem_x509_certificates(f.read())
+    if configured():
+        signer = default_signer()
+        return [(signer.chain or [signer.certificate])[-1]]
+    return []
+
+
+def common_name(certificate):
+    names = certificate.subject.get_attributes_for_oid(x509.NameOID.COMMON_NAME)
+    return names[0].value if names else certificate.subject.rfc4514_string()
+
+
+# sealing
+
+def _pdf_string(value):
+    escaped = value.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+    return b'(' + escaped.encode('latin-1', errors='replace') + b')'
+
+
+def _serialize(obj):
+    stream = io.BytesIO()
+    obj.write_to_stream(stream, None)
+    return stream.getvalue()
+
+
+def _startxref(pdf):
+    found = re.findall(rb'startxref\s+(\d+)\s+%%EOF', pdf[-2048:])
+    if not found:
+        raise SealError("Not a PDF: no cross-reference offset")
+    return int(found[-1])
+
+
+def seal(pdf, signer=None, reason=SEAL_REASON, location='', signed_at=None):
+    """The sealed copy of ``pdf`` (bytes)."""
+    from PyPDF2 import PdfReader
+    from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject
+
+    signer = signer or default_signer()
+    try:
+        reader = PdfReader(io.BytesIO(pdf))
+        encrypted = reader.is_encrypted
+        root = reader.trailer.raw_get('/Root')
+        catalog = DictionaryObject(reader.trailer['/Root'])
+        first_page = reader.pages[0]
+        size = int(reader.trailer['/Size'])
+    except Exception as e:
+        raise SealError(f"Not a readable PDF: {e}")
+    if encrypted:
+        raise SealError("Encrypted PDFs cannot be sealed")
+    if '/AcroForm' in catalog:
+        raise SealError("The PDF already has a form or a seal")
+
+    field_id, signature_id, form_id = size, size + 1, size + 2
+    page_ref = first_page.indirect_reference
+    page = DictionaryObject(first_page)
+    annotations = ArrayObject(first_page['/Annots'] if '/Annots' in first_page else [])
+    annotations.append(IndirectObject(field_id, 0, reader))
+    page[NameObject('/Annots')] = annotations
+    catalog[NameObject('/AcroForm')] = IndirectObject(form_id, 0, reader)
+
+    signed_at = signed_at or timezone.now()
+    objects = [
+        (root.idnum, root.generation, _serialize(catalog)),
+        (page_ref.idnum, page_ref.generation, _serialize(page)),
+        (field_id, 0, b'<< /Type /Annot /Subtype /Widget /FT /Sig /T ' + _pdf_string(FIELD_NAME)
+            + b' /F 132 /Rect [0 0 0 0] /P %d %d R /V %d 0 R >>' % (page_ref.idnum, page_ref.generation, signature_id)),
+        (signature_id, 0, b'<< /Type /Sig /Filter /Adobe.PPKLite /SubFilter /adbe.pkcs7.detached'
+            + b' /Name ' + _pdf_string(signer.name)
+            + b' /M ' + _pdf_string(signed_at.astimezone(dt_timezone.utc).strftime("D:%Y%m%d%H%M%S+00'00'"))
+            + b' /Reason ' + _pdf_string(reason) + b' /Location ' + _pdf_string(location)
+            + b' /ByteRange ' + BYTE_RANGE_PLACEHOLDER
+            + b' /Contents <' + b'0' * (SIGNATURE_SIZE * 2) + b'> >>'),
+        (form_id, 0, b'<< /Fields [%d 0 R] /SigFlags 3 >>' % field_id),
+    ]
+
+    # an incremental update: the original bytes stay as they are
+    out = bytearray(pdf)
+    if not out.endswith(b'\n'):
+        out += b'\n'
+    offsets = []
+    for number, generation, body in objects:
+        offsets.append((number, generation, len(out)))
+        out += b'%d %d obj\n' % (number, generation) + body + b'\nendobj\n'
+    xref_at = len(out)
+    out += b'xref\n'
+    for number, generation, offset in sorted(offsets):
+        out += b'%d 1\n%010d %05d n \n' % (number, offset, generation)
+    trailer = DictionaryObject({
+        NameObject(key): value for key, value in reader.trailer.items() if key in ('/Root', '/Info', '/ID')
+    })
+    trailer[NameObject('/Size')] = NumberObject(size + 3)
+    trailer[NameObject('/Prev')] = NumberObject(_startxref(pdf))
+    out += b'trailer\n' + _serialize(trailer) + b'\nstartxref\n%d\n%%%%EOF\n' % xref_at
+
+    signature_at = next(offset for number, _, offset in offsets if number == signature_id)
+    start = out.index(b'/Contents <', signature_at) + len(b'/Contents ')
+    end = start + SIGNATURE_SIZE * 2 + 2
+    byte_range_at = out.index(BYTE_RANGE_PLACEHOLDER, signature_at)
+    out[byte_range_at:byte_range_at + len(BYTE_RANGE_PLACEHOLDER)] = b'[0 %010d %010d %010d]' % (start, end, len(out) - end)
+
+    signature = signer.sign(bytes(out[:start] + out[end:])).hex().encode()
+    if len(signature) > SIGNATURE_SIZE * 2:
+        raise SealError(f"The signature needs {len(signature) // 2} bytes, more than the {SIGNATURE_SIZE} reserved")
+    out[start + 1:start + 1 + len(signature)] = signature
+    return bytes(out)
+
+
+# verification
+
+@dataclass(frozen=True)
+class Verification:
+    digest: str
+    sealed: bool = False
+    # the signed bytes match the seal
+    intact: bool = False
+    # the signer's chain ends in a trusted certificate
+    trusted: bool = False
+    # nothing was appended after sealing
+    complete: bool = False
+    signer: str = ''
+    signing_time: datetime = None
+    error: str = ''
+
+    @property
+    def valid(self):
+        return self.sealed and self.intact and self.trusted and self.complete
+
+    def as_dict(self):
+        return {
+            'valid': self.valid, 'sealed': self.sealed, 'intact': self.intact, 'trusted': self.trusted,
+            'complete': self.complete, 'signer': self.signer, 'signing_time': self.signing_time,
+            'digest': self.digest, 'error': self.error,
+        }
+
+
+def _tlv(data, offset):
+    """``(tag, value start, value end)`` of the DER element at ``offset``."""
+    tag, length = data[offset], data[offset + 1]
+    offset += 2
+    if length & 0x80:
+        count = length & 0x7f
+        length = int.from_bytes(data[offset:offset + count], 'big')
+        offset += count
+    if offset + length > len(data):
+        raise ValueError("truncated DER element")
+    return tag, offset, offset + length
+
+
+def _children(data, start, end):
+    """``(tag, element start, value start, value end)`` of each element in ``data[start:end]``."""
+    items = []
+    while start < end:
+        tag, value_start, value_end = _tlv(data, start)
+        items.append((tag, start, value_start, value_end))
+        start = value_end
+    return items
+
+
+def _oid(value):
+    first = value[0]
+    parts = [min(first // 40, 2), first - min(first // 40, 2) * 40]
+    number = 0
+    for byte in value[1:]:
+        number = (number << 7) | (byte & 0x7f)
+        if not byte & 0x80:
+            parts.append(number)
+            number = 0
+    return '.'.join(map(str, parts))
+
+
+def _time(tag, value):
+    text = value.decode('ascii')
+    moment = datetime.strptime(text, '%y%m%d%H%M%SZ' if tag == 0x17 else '%Y%m%d%H%M%SZ')
+    return moment.replace(tzinfo=dt_timezone.utc)
+
+
+def _signer_info(cms):
+    """The parts of a CMS SignedData's first SignerInfo that verification needs."""
+    _, start, end = _tlv(cms, 0)
+    content_type, content = _children(cms, start, end)[:2]
+    if _oid(cms[content_type[2]:content_type[3]]) != OID_SIGNED_DATA:
+        raise ValueError("not a CMS SignedData")
+    signed_data = _children(cms, content[2], content[3])[0]
+    signer_infos = _children(cms, signed_data[2], signed_data[3])[-1]
+    info = _children(cms, signer_infos[2], signer_infos[3])[0]
+    parts = _children(cms, info[2], info[3])
+    sid, digest_algorithm, rest = parts[1], parts[2], parts[3:]
+
+    algorithm = _children(cms, digest_algorithm[2], digest_algorithm[3])[0]
+    result = {'digest': _oid(cms[algorithm[2]:algorithm[3]])}
+    if sid[0] == 0x30:
+        issuer, serial = _children(cms, sid[2], sid[3])[:2]
+        result['issuer'] = cms[issuer[1]:issuer[3]]
+        result['serial'] = int.from_bytes(cms[serial[2]:serial[3]], 'big', signed=True)
+    else:
+        result['key_identifier'] = cms[sid[2]:sid[3]]
+    result['signed_attributes'] = None
+    if rest[0][0] == 0xa0:
+        attributes = rest.pop(0)
+        # signed over as a SET OF, not with the [0] IMPLICIT tag
+        result['signed_attributes'] = b'\x31' + cms[attributes[1] + 1:attributes[3]]
+        for _, _, attribute_start, attribute_end in _children(cms, attributes[2], attributes[3]):
+            kind, values = _children(cms, attribute_start, attribute_end)[:2]
+            tag, _, value_start, value_end = _children(cms, values[2], values[3])[0]
+            oid = _oid(cms[kind[2]:kind[3]])
+            if oid == OID_MESSAGE_DIGEST:
+                result['message_digest'] = cms[value_start:value_end]
+            elif oid == OID_SIGNING_TIME:
+                result['signing_time'] = _time(tag, cms[value_start:value_end])
+    result['signature'] = cms[rest[1][2]:rest[1][3]]
+    return result
+
+
+def _find_seal(pdf):
+    """``(signed bytes, covers the whole file, CMS)`` of the last seal in ``pdf``, or None."""
+    ranges = list(re.finditer(rb'/ByteRange\s*\[\s*(\d+)\s+(\d+)\s+(\d+)\s+(\d+)\s*\]', pdf))
+    if not ranges:
+        return None
+    a, b, c, d = (int(value) for value in ranges[-1].groups())
+    contents = re.fullmatch(rb'<([0-9A-Fa-f]*)>', pdf[a + b:c]) if a == 0 and b < c else None
+    if contents is None or c + d > len(pdf):
+        raise ValueError("the seal's byte range does not frame its signature")
+    cms = bytes.fromhex(contents.group(1).decode())
+    # the reserved room after the signature is not signed, so it must stay empty
+    if any(cms[_tlv(cms, 0)[2]:]):
+        raise ValueError("data after the signature")
+    return pdf[:b] + pdf[c:c + d], c + d == len(pdf), cms
+
+
+def _signer_certificate(info, certificates):
+    for certificate in certificates:
+        if 'serial' in info:
+            if certificate.serial_number == info['serial'] and certificate.issuer.public_bytes() == info['issuer']:
+                return certificate
+        else:
+            try:
+                identifier = certificate.extensions.get_extension_for_class(x509.SubjectKeyIdentifier).value.digest
+            except x509.ExtensionNotFound:
+                continue
+            if identifier == info['key_identifier']:
+                return certificate
+    return None
+
+
+def _verify_signature(certificate, signature, data, algorithm):
+    key = certificate.public_key()
+    try:
+        if isinstance(key, rsa.RSAPublicKey):
+            key.verify(signature, data, padding.PKCS1v15(), algorithm)
+        elif isinstance(key, ec.EllipticCurvePublicKey):
+            key.verify(signature, data, ec.ECDSA(algorithm))
+        else:
+            return False
+    except InvalidSignature:
+        return False
+    return True
+
+
+def _is_ca(certificate):
+    try:
+        return certificate.extensions.get_extension_for_class(x509.BasicConstraints).value.ca
+    except x509.ExtensionNotFound:
+        return False
+
+
+def _chain_trusted(certificate, pool, trust, moment):
+    current = certificate
+    for _ in range(MAX_CHAIN):
+        if not current.not_valid_before_utc <= moment <= current.not_valid_after_utc:
+            return False
+        if current in trust:
+            return True
+        for issuer in [*pool, *trust]:
+            if issuer == current or issuer.subject != current.issuer or not _is_ca(issuer):
+                continue
+            try:
+                current.verify_directly_issued_by(issuer)
+            except (ValueError, TypeError, InvalidSignature):
+                continue
+            current = issuer
+            break
+        else:
+            return False
+    return False
+
+
+def verify(pdf, trust=None):
+    """
+    Check the seal of ``pdf`` (bytes) against ``trust`` (certificates; the
+    configured ones by default). Returns a ``Verification``; never raises
+    on a malformed file.
+    """
+    digest = hashlib.sha256(pdf).hexdigest()
+    try:
+        found = _find_seal(pdf)
+    except ValueError as e:
+        return Verification(digest, sealed=True, error=f"Unreadable seal: {e}")
+    if found is None:
+        return Verification(digest, error="The file carries no seal")
+    signed, complete, cms = found
+
+    try:
+        info = _signer_info(cms)
+        certificates = pkcs7.load_der_pkcs7_certificates(cms)
+    except (ValueError, IndexError) as e:
+        return Verification(digest, sealed=True, complete=complete, error=f"Unreadable seal: {e}")
+    certificate = _signer_certificate(info, certificates)
+    algorithm = DIGESTS.get(info['digest'])
+    if certificate is None or algorithm is None:
+        error = "The seal does not carry its signer's certificate" if certificate is None else "Unsupported digest algorithm"
+        return Verification(digest, sealed=True, complete=complete, error=error)
+
+    hasher = hashes.Hash(algorithm())
+    hasher.update(signed)
+    content_digest = hasher.finalize()
+    if info['signed_attributes'] is None:
+        intact = _verify_signature(certificate, info['signature'], signed, algorithm())
+    else:
+        intact = info.get('message_digest') == content_digest and _verify_signature(
+            certificate, info['signature'], info['signed_attributes'], algorithm()
+        )
+    signing_time = info.get('signing_time')
+    trusted = _chain_trusted(
+        certificate, certificates, list(default_trust() if trust is None else trust), signing_time or timezone.now()
+    )
+
+    error = ''
+    if not intact:
+        error = "The document was modified after it was sealed"
+    elif not trusted:
+        error = "The signing certificate is not trusted"
+    elif not complete:
+        error = "Data was appended to the document after it was sealed"
+    return Verification(
+        digest, sealed=True, intact=intact, trusted=trusted, complete=complete,
+        signer=common_name(certificate), signing_time=signing_time, error=error,
+    )
+
+
+# documents
+
+def seal_document(document, pdf=None, signer=None):
+    """
+    Seal ``document``'s final PDF (rendered again from the inspection
+    unless ``pdf`` is given), store it in place of the unsealed file and
+    record its digest in the audit log.
+    """
+    from django.core.files.uploadedfile import SimpleUploadedFile
+
+    if pdf is None:
+        from .pdf_service import PDFGenerationService
+
+        content, _ = PDFGenerationService().generate_inspection_pdf(
+            inspection=document.inspection,
+            template_type=document.template_type,
+            include_photos=document.include_photos,
+            include_recommendations=document.include_recommendations,
+            language=document.language,
+        )
+        pdf = content.read()
+    signer = signer or default_signer()
+    sealed_at = timezone.now()
+    sealed = seal(pdf, signer, location='Veyu', signed_at=sealed_at)
+    digest = hashlib.sha256(sealed).hexdigest()
+
+    # CloudinaryField uploads UploadedFile values when the row is saved
+    document.document_file = SimpleUploadedFile(
+        f"inspection_{document.inspection_id}_{document.template_type}_sealed.pdf", sealed, content_type='application/pdf'
+    )
+    document.document_hash, document.file_size, document.sealed_at = digest, len(sealed), sealed_at
+    document.save(update_fields=['document_file', 'document_hash', 'file_size', 'sealed_at', 'last_updated'])
+    audit.record('documents', 'document_sealed', obj=document, details={
+        'inspection_id': document.inspection_id,
+        'sha256': digest,
+        'signer': signer.name,
+        'certificate_sha256': signer.certificate.fingerprint(hashes.SHA256()).hex(),
+    })
+    logger.info(f"Sealed document {document.pk} ({digest})")
+    return sealed
+
+
+def seal_signed_document(document_id):
+    """Seal a fully signed document if it is not sealed yet; failures are logged, not raised."""
+    from .models import InspectionDocument
+
+    document = InspectionDocument.objects.filter(pk=document_id, status='signed', sealed_at__isnull=True).first()
+    if document is None:
+        return False
+    try:
+        seal_document(document)
+    except Exception as e:
+        logger.error(f"Could not seal document {document_id}: {e}")
+        return False
+    return True
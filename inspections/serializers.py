@@ -423,6 +423,7 @@ class InspectionStatsSerializer(serializers.Serializer):
     average_rating = serializers.FloatField()
     inspections_by_type = serializers.DictField()
     inspections_by_status = serializers.DictField()
+    daily = serializers.ListField(child=serializers.DictField(), required=False)
     recent_inspections = VehicleInspectionListSerializer(many=True)
 
 
@@ -1,11 +1,15 @@
 """
 Signals for the vehicle inspection system
 """
-from django.db.models.signals import post_save, pre_save
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
 import logging
 
+from . import analytics, sealing
 from .models import VehicleInspection, InspectionDocument, DigitalSignature
 
 logger = logging.getLogger(__name__)
@@ -49,6 +53,8 @@ def signature_submitted(sender, instance, created, **kwargs):
             document.inspection.save(update_fields=['status'])
             
             logger.info(f"Document {document.id} fully signed - inspection {document.inspection.id} completed")
+            if sealing.configured():
+                transaction.on_commit(partial(sealing.seal_signed_document, document.pk))
 
 
 @receiver(pre_save, sender=VehicleInspection)
@@ -71,6 +77,54 @@ def validate_inspection_before_save(sender, instance, **kwargs):
             instance.overall_rating = InspectionValidationService.calculate_overall_rating(inspection_data)
 
 
+@receiver(pre_save, sender=VehicleInspection)
+def remember_inspection_stats_state(sender, instance, raw=False, **kwargs):
+    """
+    Remember what the stats rollups count for this inspection. A save
+    nested in a post_save handler keeps the outer save's state, so the
+    whole change is counted once, by whichever post_save runs first.
+    """
+    if not raw and '_stats_before' not in instance.__dict__:
+        instance._stats_before = analytics.stored_state(instance.pk)
+
+
+@receiver(post_save, sender=VehicleInspection)
+def update_inspection_stats(sender, instance, raw=False, **kwargs):
+    if raw or '_stats_before' not in instance.__dict__:
+        return
+    before = instance.__dict__.pop('_stats_before')
+    analytics.inspection_changed(instance.pk, before, analytics.state(instance))
+
+
+@receiver(post_delete, sender=VehicleInspection)
+def remove_inspection_stats(sender, instance, **kwargs):
+    # its documents were deleted first and took their signed count with them
+    analytics.inspection_changed(instance.pk, analytics.state(instance), None)
+
+
+@receiver(pre_save, sender=InspectionDocument)
+def remember_document_signed(sender, instance, raw=False, **kwargs):
+    if not raw and '_stats_signed' not in instance.__dict__:
+        instance._stats_signed = bool(instance.pk) and InspectionDocument.objects.filter(
+            pk=instance.pk, status='signed'
+        ).exists()
+
+
+@receiver(post_save, sender=InspectionDocument)
+def update_document_stats(sender, instance, raw=False, **kwargs):
+    if raw or '_stats_signed' not in instance.__dict__:
+        return
+    was_signed = instance.__dict__.pop('_stats_signed')
+    if was_signed != (instance.status == 'signed'):
+        analytics.documents_signed({instance.inspection_id: -1 if was_signed else 1})
+
+
+@receiver(post_delete, sender=InspectionDocument)
+def remove_document_stats(sender, instance, **kwargs):
+    if instance.status == 'signed':
+        analytics.documents_signed({instance.inspection_id: -1})
+
+
 # Add methods to VehicleInspection model for signal use
 def _should_auto_complete(self):
     """Check if inspection should be auto-completed"""
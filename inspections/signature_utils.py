@@ -12,8 +12,13 @@ from django.utils import timezone
 from django.core.exceptions import ValidationError
 import logging
 
+from utils import audit
+
 logger = logging.getLogger(__name__)
 
+# audit log object type of InspectionDocument
+DOCUMENT_TYPE = 'inspections.inspectiondocument'
+
 
 class SignatureValidator:
     """
@@ -126,7 +131,8 @@ class SignatureValidator:
 
 class SignatureAuditLogger:
     """
-    Utility class for logging signature-related events for audit trail
+    Utility class for recording signature-related events in the audit log
+    (the 'signatures' stream, see utils.audit)
     """
     
     @staticmethod
@@ -143,23 +149,16 @@ class SignatureAuditLogger:
             success: Whether the signature was successful
             error_message: Error message if failed
         """
-        log_data = {
-            'event': 'signature_attempt',
-            'document_id': document_id,
-            'signer_id': signer_id,
-            'ip_address': ip_address,
-            'user_agent': user_agent,
-            'success': success,
-            'timestamp': timezone.now().isoformat(),
-        }
-        
+        details = {'user_agent': (user_agent or '')[:500], 'success': success}
         if error_message:
-            log_data['error'] = error_message
+            details['error'] = error_message
+        audit.record(
+            'signatures', 'signature_submitted' if success else 'signature_failed', actor_id=signer_id,
+            obj=(DOCUMENT_TYPE, document_id), ip_address=ip_address, details=details,
+        )
         
-        if success:
-            logger.info(f"Signature successful: {json.dumps(log_data)}")
-        else:
-            logger.warning(f"Signature failed: {json.dumps(log_data)}")
+        if not success:
+            logger.warning(f"Signature failed on document {document_id} by user {signer_id}: {error_message}")
     
     @staticmethod
     def log_signature_verification(signature_id: int, verified: bool, verifier_id: int = None):
@@ -171,15 +170,10 @@ class SignatureAuditLogger:
             verified: Whether verification was successful
             verifier_id: ID of the verifier (if applicable)
         """
-        log_data = {
-            'event': 'signature_verification',
-            'signature_id': signature_id,
-            'verified': verified,
-            'verifier_id': verifier_id,
-            'timestamp': timezone.now().isoformat(),
-        }
-        
-        logger.info(f"Signature verification: {json.dumps(log_data)}")
+        audit.record(
+            'signatures', 'signature_verification', actor_id=verifier_id,
+            obj=('inspections.digitalsignature', signature_id), details={'verified': verified},
+        )
     
     @staticmethod
     def log_document_access(document_id: int, user_id: int, action: str, ip_address: str):
@@ -192,16 +186,7 @@ class SignatureAuditLogger:
             action: Action performed (view, download, sign, etc.)
             ip_address: IP address of the user
         """
-        log_data = {
-            'event': 'document_access',
-            'document_id': document_id,
-            'user_id': user_id,
-            'action': action,
-            'ip_address': ip_address,
-            'timestamp': timezone.now().isoformat(),
-        }
-        
-        logger.info(f"Document access: {json.dumps(log_data)}")
+        audit.record('documents', action, actor_id=user_id, obj=(DOCUMENT_TYPE, document_id), ip_address=ip_address)
 
 
 class SignatureSecurityManager:
@@ -1,3 +1,537 @@
-from django.test import TestCase
+import datetime
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from cloudinary import CloudinaryResource
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+
+from accounts.models import Account, Customer, Dealership
+from listings.models import Car
+from inspections import analytics, retention, sealing
+from inspections.document_management import DocumentVersionManager
+from inspections.models import (
+    DigitalSignature, DocumentVersion, InspectionDailyStats, InspectionDocument, RetentionRun, VehicleInspection,
+)
+from inspections.retention import run_retention
+from utils import audit
+
+
+class FlakyStorage(FileSystemStorage):
+    """Fails the first ``flaky`` attempts per name, and every attempt for ``broken`` names."""
+
+    def __init__(self, location, flaky=0, broken=()):
+        super().__init__(location=location)
+        self.flaky, self.broken, self.attempts = flaky, set(broken), {}
+
+    def delete(self, name):
+        self.attempts[name] = self.attempts.get(name, 0) + 1
+        if name in self.broken or self.attempts[name] <= self.flaky:
+            raise IOError(f"Storage unavailable for {name}")
+        super().delete(name)
+
+
+class DocumentRetentionTestCase(TestCase):
+    """
+    Retention over a synthetic document table. Every tenth document is
+    recent, six are past the active period and three are archived past the
+    archive period; every 97th is on legal hold.
+    """
+
+    ROWS = int(os.environ.get('DOCUMENT_RETENTION_TEST_ROWS', 100_000))
+    BATCH_SIZE = 5000
+
+    @staticmethod
+    def kind(i):
+        slot = i % 10
+        return 'archive' if slot < 6 else 'recent' if slot == 6 else 'delete'
+
+    @staticmethod
+    def held(i):
+        return i % 97 == 0
+
+    @classmethod
+    def setUpTestData(cls):
+        dealer_user = Account.objects.create_user(email='retention-dealer@example.com', password='testpass123', user_type='dealer')
+        car = Car.objects.create(dealer=Dealership.objects.get(user=dealer_user), name='Corolla', brand='Toyota', color='Silver')
+        inspection = VehicleInspection.objects.create(vehicle=car, inspection_type='pre_purchase')
+
+        documents = []
+        for i in range(cls.ROWS):
+            kind = cls.kind(i)
+            documents.append(InspectionDocument(
+                inspection=inspection,
+                status='archived' if kind == 'delete' else ('ready', 'signed')[i % 2],
+                document_file=f'documents/{i}.pdf' if kind == 'delete' else None,
+                document_hash=f'{i:064x}',
+                legal_hold=cls.held(i),
+            ))
+        InspectionDocument.objects.bulk_create(documents, batch_size=5000)
+        cls.ids = list(InspectionDocument.objects.order_by('pk').values_list('pk', flat=True))
+
+        # generated_at is auto_now_add, so ages are set afterwards
+        now = timezone.now()
+        ages = {'archive': 400, 'recent': 10, 'delete': 2600}
+        for kind, days in ages.items():
+            pks = [pk for i, pk in enumerate(cls.ids) if cls.kind(i) == kind]
+            for start in range(0, len(pks), 5000):
+                InspectionDocument.objects.filter(pk__in=pks[start:start + 5000]).update(
+                    generated_at=now - timedelta(days=days)
+                )
+
+        # a signature image for some of the documents due for deletion
+        cls.stored = [i for i in range(cls.ROWS) if cls.kind(i) == 'delete' and i % 30 == 7]
+        signatures = []
+        for i in cls.stored:
+            signatures.append(DigitalSignature(
+                document_id=cls.ids[i], signer=dealer_user, role='dealer', signature_image=f'signatures/{i}.png',
+            ))
+        DigitalSignature.objects.bulk_create(signatures)
+
+    def setUp(self):
+        # the stored files of those documents, fresh for every test
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        for folder in ('documents', 'signatures'):
+            os.makedirs(os.path.join(self.media, folder))
+        for i in self.stored:
+            for name in (f'documents/{i}.pdf', f'signatures/{i}.png'):
+                with open(os.path.join(self.media, name), 'w') as f:
+                    f.write('x')
+        self.storage = FileSystemStorage(location=self.media)
+        patcher = mock.patch.object(retention, 'RETRY_DELAY', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def expected(self, kind):
+        return [self.ids[i] for i in range(self.ROWS) if self.kind(i) == kind and not self.held(i)]
+
+    def test_archive_then_delete(self):
+        to_archive, to_delete = self.expected('archive'), self.expected('delete')
+
+        run = run_retention('archive', batch_size=self.BATCH_SIZE)
+        self.assertEqual((run.status, run.processed), ('completed', len(to_archive)))
+        self.assertEqual(InspectionDocument.objects.filter(pk__in=to_archive, status='archived').count(), len(to_archive))
+        self.assertFalse(InspectionDocument.objects.filter(pk__in=to_archive, archived_at__isnull=True).exists())
+        self.assertEqual(DocumentVersion.objects.filter(status='archived', version_number=1).count(), len(to_archive))
+        held = [self.ids[i] for i in range(self.ROWS) if self.held(i)]
+        self.assertFalse(InspectionDocument.objects.filter(pk__in=held, archived_at__isnull=False).exists())
+
+        run = run_retention('delete', batch_size=self.BATCH_SIZE, storage=self.storage)
+        self.assertEqual((run.status, run.processed, run.files_failed), ('completed', len(to_delete), 0))
+        stored_held = [i for i in self.stored if self.held(i)]
+        self.assertEqual(run.files_deleted, len(to_delete) + len(self.stored) - len(stored_held))
+        self.assertFalse(InspectionDocument.objects.filter(pk__in=to_delete).exists())
+        self.assertEqual(InspectionDocument.objects.count(), self.ROWS - len(to_delete))
+        for i in self.stored:
+            self.assertEqual(self.storage.exists(f'documents/{i}.pdf'), self.held(i), i)
+            self.assertEqual(self.storage.exists(f'signatures/{i}.png'), self.held(i), i)
+
+        # nothing left to do
+        self.assertEqual(run_retention('archive', batch_size=self.BATCH_SIZE).processed, 0)
+
+    def test_dry_run_changes_nothing(self):
+        archive = run_retention('archive', batch_size=self.BATCH_SIZE, dry_run=True)
+        delete = run_retention('delete', batch_size=self.BATCH_SIZE, dry_run=True, storage=self.storage)
+        self.assertEqual(archive.processed, len(self.expected('archive')))
+        self.assertEqual(delete.processed, len(self.expected('delete')))
+        self.assertEqual(InspectionDocument.objects.count(), self.ROWS)
+        self.assertFalse(InspectionDocument.objects.filter(archived_at__isnull=False).exists())
+        self.assertFalse(DocumentVersion.objects.exists())
+        self.assertTrue(all(self.storage.exists(f'documents/{i}.pdf') for i in self.stored))
+        # a dry run is never resumed by a real one
+        self.assertNotEqual(run_retention('archive', batch_size=self.BATCH_SIZE, max_batches=1).pk, archive.pk)
+
+    def test_interrupted_run_resumes_from_checkpoint(self):
+        to_archive = self.expected('archive')
+
+        run = run_retention('archive', batch_size=1000, max_batches=3)
+        self.assertEqual(run.status, 'interrupted')
+        self.assertEqual(run.batches, 3)
+        self.assertEqual(DocumentVersion.objects.count(), run.processed)
+
+        # the next batch fails: it rolls back and the checkpoint stays put
+        checkpoint = run.last_id
+        with mock.patch.dict(retention.HANDLERS, archive=mock.Mock(side_effect=RuntimeError('database went away'))):
+            failed = run_retention('archive', batch_size=1000)
+        self.assertEqual((failed.pk, failed.status, failed.error), (run.pk, 'failed', 'database went away'))
+        self.assertEqual(failed.last_id, checkpoint)
+
+        resumed = run_retention('archive', batch_size=self.BATCH_SIZE)
+        self.assertEqual((resumed.pk, resumed.status), (run.pk, 'completed'))
+        self.assertEqual(resumed.processed, len(to_archive))
+        self.assertEqual(DocumentVersion.objects.count(), len(to_archive))
+        self.assertEqual(DocumentVersion.objects.exclude(version_number=1).count(), 0)
+        self.assertEqual(RetentionRun.objects.filter(action='archive').count(), 1)
+
+    def test_file_deletion_is_retried_and_failures_kept(self):
+        to_delete = self.expected('delete')
+        broken = next(i for i in self.stored if not self.held(i))
+        storage = FlakyStorage(self.media, flaky=1, broken=[f'signatures/{broken}.png'])
+
+        with self.settings(DOCUMENT_RETENTION_DELETE_RETRIES=3):
+            run = run_retention('delete', batch_size=self.BATCH_SIZE, storage=storage)
+        self.assertEqual(run.status, 'completed')
+        self.assertEqual((run.processed, run.files_failed), (len(to_delete) - 1, 1))
+        self.assertEqual(storage.attempts[f'signatures/{broken}.png'], 3)
+        self.assertEqual(storage.attempts[f'documents/{broken}.pdf'], 2)
+        self.assertEqual(list(InspectionDocument.objects.filter(pk__in=to_delete).values_list('pk', flat=True)), [self.ids[broken]])
+
+        # once the storage recovers the next run removes it (deleting a missing file is fine)
+        run = run_retention('delete', storage=self.storage)
+        self.assertEqual((run.processed, run.files_deleted), (1, 2))
+        self.assertFalse(InspectionDocument.objects.filter(pk=self.ids[broken]).exists())
+
+    def test_command_runs_both_jobs(self):
+        with mock.patch.object(retention, 'get_storage', return_value=self.storage):
+            call_command('apply_document_retention', batch_size=self.BATCH_SIZE, stdout=io.StringIO())
+        self.assertEqual(
+            set(RetentionRun.objects.values_list('action', 'status')),
+            {('archive', 'completed'), ('delete', 'completed')},
+        )
+        self.assertEqual(InspectionDocument.objects.filter(status='archived').count(),
+                         len(self.expected('archive')) + sum(self.held(i) and self.kind(i) == 'delete' for i in range(self.ROWS)))
+
+    def test_versions_are_numbered_per_document(self):
+        document = InspectionDocument.objects.get(pk=self.ids[6])
+        self.assertEqual(DocumentVersionManager.get_version_history(document)[0]['version_number'], 1)
+        DocumentVersionManager.create_version(document, reason='Regenerated')
+        DocumentVersionManager.create_version(document, reason='Signed')
+        history = DocumentVersionManager.get_version_history(document)
+        self.assertEqual([(v['version_number'], v['is_current']) for v in history], [(2, True), (1, False)])
+        self.assertEqual(history[0]['reason'], 'Signed')
+
+
+class InspectionStatsTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dealer_user = Account.objects.create_user(email='stats-dealer@example.com', password='testpass123', user_type='dealer')
+        cls.dealer = Dealership.objects.get(user=cls.dealer_user)
+        cls.customer_user = Account.objects.create_user(email='stats-customer@example.com', password='testpass123', user_type='customer')
+        cls.customer = Customer.objects.get(user=cls.customer_user)
+        cls.mechanic = Account.objects.create_user(email='stats-mechanic@example.com', password='testpass123', user_type='mechanic')
+        cls.staff = Account.objects.create_user(email='stats-staff@example.com', password='testpass123', user_type='staff', is_staff=True)
+        cls.car = Car.objects.create(dealer=cls.dealer, name='Camry', brand='Toyota', color='Black')
+        cls.today = timezone.localdate()
+
+    def inspect(self, days_ago=0, **fields):
+        fields = {
+            'vehicle': self.car, 'dealer': self.dealer, 'customer': self.customer, 'inspector': self.mechanic,
+            'inspection_type': 'pre_purchase', 'status': 'draft', **fields,
+        }
+        return VehicleInspection.objects.create(inspection_date=timezone.now() - timedelta(days=days_ago), **fields)
+
+    def rollups(self):
+        return sorted(
+            InspectionDailyStats.objects.filter(inspections__gt=0)
+            .values_list('scope', 'scope_id', 'day', 'inspection_type', 'status', 'inspections', 'rated', 'rating_total', 'signed_documents')
+        )
+
+    def assertRollupsMatchTable(self):
+        maintained = self.rollups()
+        analytics.rebuild()
+        self.assertEqual(maintained, self.rollups())
+
+    def seed(self):
+        self.inspect(status='completed', overall_rating='excellent')
+        self.inspect(days_ago=1, status='completed', overall_rating='fair', inspection_type='maintenance')
+        self.inspect(days_ago=2, status='in_progress')
+        self.inspect(days_ago=3, status='pending_payment', customer=None, inspector=None)
+        signed = self.inspect(days_ago=3, status='signed', overall_rating='good', inspection_type='maintenance')
+        InspectionDocument.objects.create(inspection=signed, status='signed')
+        InspectionDocument.objects.create(inspection=signed, status='ready')
+        return signed
+
+    def test_summary_in_one_query(self):
+        self.seed()
+        self.inspect(dealer=None, status='completed', overall_rating='poor')
+        with self.assertNumQueries(1):
+            stats = analytics.summary(VehicleInspection.objects.filter(dealer=self.dealer))
+        self.assertEqual(stats, {
+            'total_inspections': 5,
+            'completed_inspections': 3,
+            'pending_inspections': 1,
+            'signed_documents': 1,
+            'average_rating': 3.0,
+            'inspections_by_type': {'pre_purchase': 3, 'maintenance': 2},
+            'inspections_by_status': {'pending_payment': 1, 'in_progress': 1, 'completed': 2, 'signed': 1},
+        })
+        with self.assertNumQueries(1):
+            platform = analytics.rollup_summary()
+        self.assertEqual(platform, analytics.summary(VehicleInspection.objects.all()))
+        self.assertEqual(analytics.rollup_summary('dealer', self.dealer.pk)['total_inspections'], 5)
+        self.assertEqual(analytics.rollup_summary('customer', self.customer.pk)['total_inspections'], 5)
+
+    def test_rollups_follow_changes(self):
+        signed = self.seed()
+        self.assertRollupsMatchTable()
+
+        inspection = self.inspect(status='in_progress')
+        inspection.status, inspection.overall_rating = 'completed', 'good'
+        inspection.save()
+        inspection.inspection_date -= timedelta(days=5)
+        inspection.inspection_type = 'insurance'
+        inspection.save()
+        self.assertRollupsMatchTable()
+
+        # moving owner and status carries the signed documents along
+        other = Account.objects.create_user(email='stats-dealer2@example.com', password='testpass123', user_type='dealer')
+        signed.dealer = Dealership.objects.get(user=other)
+        signed.status = 'archived'
+        signed.save()
+        document = signed.documents.get(status='ready')
+        document.status = 'signed'
+        document.save()
+        self.assertRollupsMatchTable()
+        self.assertEqual(analytics.rollup_summary('dealer', signed.dealer_id)['signed_documents'], 2)
+
+        document.delete()
+        inspection.delete()
+        signed.delete()
+        self.assertRollupsMatchTable()
+        self.assertEqual(analytics.rollup_summary()['total_inspections'], 4)
+
+    def test_nested_save_is_counted_once(self):
+        inspection = self.inspect(status='in_progress')
+        with mock.patch.object(VehicleInspection, '_should_auto_complete', return_value=True, create=True):
+            inspection.overall_rating = 'good'
+            inspection.save()
+        self.assertEqual(VehicleInspection.objects.get(pk=inspection.pk).status, 'completed')
+        self.assertRollupsMatchTable()
+        self.assertEqual(analytics.rollup_summary()['inspections_by_status'], {'completed': 1})
+
+    def test_retention_archive_unsigns(self):
+        signed = self.seed()
+        InspectionDocument.objects.filter(inspection=signed).update(generated_at=timezone.now() - timedelta(days=400))
+        run_retention('archive')
+        self.assertRollupsMatchTable()
+        self.assertEqual(analytics.rollup_summary()['signed_documents'], 0)
+
+    def test_daily_series(self):
+        self.seed()
+        series = analytics.daily(days=3)
+        self.assertEqual([entry['date'] for entry in series], [self.today - timedelta(days=2), self.today - timedelta(days=1), self.today])
+        self.assertEqual(series[0], {
+            'date': self.today - timedelta(days=2), 'total': 1, 'by_type': {'pre_purchase': 1}, 'by_status': {'in_progress': 1},
+        })
+        self.assertEqual(analytics.daily('inspector', self.mechanic.pk, days=7)[3]['total'], 1)
+        self.assertEqual(sum(entry['total'] for entry in analytics.daily(days=10)), 5)
+
+    def test_api_scopes(self):
+        self.seed()
+        client = APIClient()
+        for user, total in ((self.dealer_user, 5), (self.customer_user, 4), (self.mechanic, 4), (self.staff, 5)):
+            client.force_authenticate(user)
+            response = client.get('/api/v1/inspections/stats/', {'days': 7})
+            self.assertEqual(response.status_code, 200)
+            data = response.data['data']
+            self.assertEqual(data['total_inspections'], total, user.email)
+            self.assertEqual(len(data['daily']), 7)
+            self.assertEqual(len(data['recent_inspections']), min(total, 5))
+        self.assertEqual(client.get('/api/v1/inspections/stats/', {'days': 'week'}).status_code, 400)
+
+
+def make_certificate(name, key, issuer=None, issuer_key=None, ca=False, days=30):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    subject = x509.Name([x509.NameAttribute(x509.NameOID.COMMON_NAME, name)])
+    return (
+        x509.CertificateBuilder()
+        .subject_name(subject).issuer_name(issuer.subject if issuer else subject)
+        .public_key(key.public_key()).serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(days=1)).not_valid_after(now + timedelta(days=days))
+        .add_extension(x509.BasicConstraints(ca=ca, path_length=None), critical=True)
+        .sign(issuer_key or key, hashes.SHA256())
+    )
+
+
+def make_pdf(text='Inspection report'):
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer)
+    pdf.drawString(72, 720, text)
+    pdf.showPage()
+    pdf.drawString(72, 720, 'Signatures')
+    pdf.save()
+    return buffer.getvalue()
+
+
+class DocumentSealTestCase(TestCase):
+    """Seals over throwaway certificates: a root CA, an intermediate and an EC signing certificate."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        root_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        cls.root = make_certificate('Veyu Test Root', root_key, ca=True)
+        intermediate_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        intermediate = make_certificate('Veyu Test Documents CA', intermediate_key, cls.root, root_key, ca=True)
+        key = ec.generate_private_key(ec.SECP256R1())
+        certificate = make_certificate('Veyu Documents', key, intermediate, intermediate_key)
+        cls.signer = sealing.Signer(key, [certificate, intermediate, cls.root])
+
+        cls.directory = tempfile.mkdtemp()
+        cls.key_file = os.path.join(cls.directory, 'seal.key')
+        cls.certificate_file = os.path.join(cls.directory, 'seal.pem')
+        with open(cls.key_file, 'wb') as f:
+            f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+        with open(cls.certificate_file, 'wb') as f:
+            f.write(b''.join(c.public_bytes(serialization.Encoding.PEM) for c in (certificate, intermediate, cls.root)))
+
+        other_key = ec.generate_private_key(ec.SECP256R1())
+        cls.impostor = sealing.Signer(other_key, [make_certificate('Veyu Documents', other_key)])
+        cls.pdf = make_pdf()
+        cls.sealed = sealing.seal(cls.pdf, cls.signer)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.settings = override_settings(
+            DOCUMENT_SEAL_KEY_FILE=self.key_file, DOCUMENT_SEAL_CERTIFICATE_FILE=self.certificate_file, AUDIT_BUFFERED=False,
+        )
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+
+    def write(self, data):
+        path = os.path.join(self.directory, 'checked.pdf')
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_sealed_pdf_verifies(self):
+        from PyPDF2 import PdfReader
+
+        self.assertTrue(self.sealed.startswith(self.pdf))
+        self.assertEqual(len(PdfReader(io.BytesIO(self.sealed)).pages), 2)
+        result = sealing.verify(self.sealed)
+        self.assertTrue(result.valid, result.error)
+        self.assertEqual(result.signer, 'Veyu Documents')
+        self.assertLess(abs(result.signing_time - timezone.now()), timedelta(minutes=5))
+        self.assertFalse(sealing.verify(self.sealed, trust=[]).trusted)
+        with self.assertRaises(sealing.SealError):
+            sealing.seal(self.sealed, self.signer)
+
+    def test_tampered_bytes_are_detected(self):
+        contents = self.sealed.index(b'/Contents <')
+        # a byte of the original file, one of the seal's own dictionary and
+        # one of the unused room after the signature
+        for offset in (len(self.pdf) // 2, contents - 20, contents + sealing.SIGNATURE_SIZE * 2 - 10):
+            tampered = bytearray(self.sealed)
+            tampered[offset] ^= 0x01
+            result = sealing.verify(bytes(tampered))
+            self.assertFalse(result.valid)
+            self.assertFalse(result.intact, offset)
+
+        appended = sealing.verify(self.sealed + b'%% appended\n')
+        self.assertTrue(appended.intact)
+        self.assertFalse(appended.complete)
+        self.assertFalse(appended.valid)
+
+        forged = sealing.verify(sealing.seal(self.pdf, self.impostor))
+        self.assertTrue(forged.intact)
+        self.assertFalse(forged.trusted)
+
+        unsealed = sealing.verify(self.pdf)
+        self.assertFalse(unsealed.sealed)
+        self.assertIn('no seal', unsealed.error)
+
+    def test_verify_command(self):
+        out = io.StringIO()
+        call_command('verify_document_seal', self.write(self.sealed), stdout=out)
+        self.assertIn('Signer:       Veyu Documents', out.getvalue())
+        self.assertIn('Seal valid', out.getvalue())
+
+        tampered = bytearray(self.sealed)
+        tampered[len(self.pdf) // 2] ^= 0x01
+        with self.assertRaisesMessage(CommandError, 'modified after it was sealed'):
+            call_command('verify_document_seal', self.write(bytes(tampered)), stdout=io.StringIO())
+        trust_file = os.path.join(self.directory, 'other-root.pem')
+        with open(trust_file, 'wb') as f:
+            f.write(self.impostor.certificate.public_bytes(serialization.Encoding.PEM))
+        with self.assertRaisesMessage(CommandError, 'not trusted'):
+            call_command('verify_document_seal', self.write(self.sealed), '--trust-file', trust_file, stdout=io.StringIO())
+
+    def test_fully_signed_document_is_sealed_and_verifiable(self):
+        dealer_user = Account.objects.create_user(email='seal-dealer@example.com', password='testpass123', user_type='dealer')
+        customer_user = Account.objects.create_user(email='seal-customer@example.com', password='testpass123', user_type='customer')
+        mechanic = Account.objects.create_user(email='seal-mechanic@example.com', password='testpass123', user_type='mechanic')
+        dealer = Dealership.objects.get(user=dealer_user)
+        inspection = VehicleInspection.objects.create(
+            vehicle=Car.objects.create(dealer=dealer, name='Camry', brand='Toyota', color='Black'),
+            dealer=dealer, customer=Customer.objects.get(user=customer_user), inspector=mechanic,
+            inspection_type='pre_purchase', status='completed', overall_rating='good',
+        )
+        document = InspectionDocument.objects.create(inspection=inspection, status='ready')
+        signatures = [
+            DigitalSignature.objects.create(document=document, signer=user, role=role)
+            for user, role in ((mechanic, 'inspector'), (customer_user, 'customer'), (dealer_user, 'dealer'))
+        ]
+
+        uploads = []
+
+        def upload_resource(file, **options):
+            uploads.append(file.read())
+            return CloudinaryResource('inspections/documents/sealed', format='pdf', type='upload', resource_type='raw')
+
+        with mock.patch('cloudinary.uploader.upload_resource', side_effect=upload_resource):
+            with self.captureOnCommitCallbacks(execute=True):
+                for signature in signatures[:2]:
+                    signature.sign({'signature_image': 'data:image/png;base64,AAAA'})
+            self.assertEqual(uploads, [])
+            with self.captureOnCommitCallbacks(execute=True):
+                signatures[2].sign({'signature_image': 'data:image/png;base64,AAAA'})
+
+        document.refresh_from_db()
+        self.assertEqual(len(uploads), 1)
+        sealed = uploads[0]
+        self.assertIsNotNone(document.sealed_at)
+        self.assertEqual(document.document_hash, sealing.verify(sealed).digest)
+        event = audit.events(obj=document, action='document_sealed').get()
+        self.assertEqual(event.details['sha256'], document.document_hash)
+        self.assertEqual(event.details['signer'], 'Veyu Documents')
+
+        cache.clear()
+        client = APIClient()
+        response = client.post('/api/v1/inspections/documents/verify-seal/', {
+            'file': SimpleUploadedFile('report.pdf', sealed, content_type='application/pdf'),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        data = response.data['data']
+        self.assertTrue(data['valid'], data['error'])
+        self.assertTrue(data['issued_document'])
+        self.assertEqual(data['inspection_id'], inspection.id)
+
+        tampered = bytearray(sealed)
+        tampered[sealed.index(b'/Contents <') + 100] ^= 0x01
+        response = client.post('/api/v1/inspections/documents/verify-seal/', {
+            'file': SimpleUploadedFile('report.pdf', bytes(tampered), content_type='application/pdf'),
+        }, format='multipart')
+        data = response.data['data']
+        self.assertFalse(data['valid'])
+        self.assertFalse(data['intact'])
+        self.assertFalse(data['issued_document'])
+        # only checks of an issued document reach its audit trail
+        self.assertEqual(audit.events(action='seal_verified').count(), 1)
+
+        with override_settings(DOCUMENT_SEAL_VERIFY_RATE='2/hour'):
+            response = client.post('/api/v1/inspections/documents/verify-seal/', {
+                'file': SimpleUploadedFile('report.pdf', sealed, content_type='application/pdf'),
+            }, format='multipart')
+        self.assertEqual(response.status_code, 429)
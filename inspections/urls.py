@@ -20,6 +20,7 @@ urlpatterns = [
     path('documents/<int:document_id>/preview/', views.DocumentPreviewView.as_view(), name='document-preview'),
     path('documents/<int:document_id>/download/', views.DocumentDownloadView.as_view(), name='document-download'),
     path('documents/<int:document_id>/sign/', views.DocumentSignatureView.as_view(), name='document-sign'),
+    path('documents/verify-seal/', views.DocumentSealVerificationView.as_view(), name='document-verify-seal'),
     
     # Statistics and templates
     path('stats/', views.InspectionStatsView.as_view(), name='inspection-stats'),
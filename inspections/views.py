@@ -4,7 +4,9 @@ API views for the vehicle inspection system
 from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
+from rest_framework.throttling import SimpleRateThrottle
 from rest_framework.views import APIView
+from django.conf import settings
 from django.shortcuts import get_object_or_404
 from django.db.models import Count, Avg, Q
 from django.utils import timezone
@@ -30,6 +32,8 @@ from .serializers import (
     InspectionStatsSerializer
 )
 from .services import DocumentManagementService, InspectionValidationService
+from . import analytics, sealing
+from utils import audit
 
 logger = logging.getLogger(__name__)
 
@@ -421,75 +425,83 @@ class DocumentDownloadView(APIView):
         )
 
 
+class SealVerificationThrottle(SimpleRateThrottle):
+    """``DOCUMENT_SEAL_VERIFY_RATE`` per user, or per IP address for anonymous callers."""
+    scope = 'document_seal_verification'
+
+    def get_rate(self):
+        return settings.DOCUMENT_SEAL_VERIFY_RATE
+
+    def get_cache_key(self, request, view):
+        ident = request.user.pk if request.user.is_authenticated else self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+class DocumentSealVerificationView(APIView):
+    """
+    Check the seal of an uploaded inspection PDF. The check itself uses
+    only the file and the configured trust certificates, so anyone holding
+    a document can verify it; the response also says whether the file is
+    one this platform issued. Checks are throttled, and only those of an
+    issued document are written to its audit trail.
+    """
+    permission_classes = [permissions.AllowAny]
+    throttle_classes = [SealVerificationThrottle]
+    
+    def post(self, request):
+        """Verify the seal of the PDF in ``file``"""
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'Upload the PDF as file'}, status=status.HTTP_400_BAD_REQUEST)
+        if upload.size > settings.DOCUMENT_SEAL_MAX_UPLOAD:
+            return Response({'error': 'File too large'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        result = sealing.verify(upload.read())
+        document = InspectionDocument.objects.filter(document_hash=result.digest, sealed_at__isnull=False).first()
+        if document is not None:
+            audit.record(
+                'documents', 'seal_verified', actor=request.user, obj=document,
+                ip_address=request.META.get('REMOTE_ADDR'),
+                details={'sha256': result.digest, 'valid': result.valid, 'error': result.error},
+            )
+        return Response({
+            'success': True,
+            'data': {
+                **result.as_dict(),
+                'issued_document': document is not None,
+                'inspection_id': document.inspection_id if document else None,
+            }
+        })
+
+
 class InspectionStatsView(APIView):
     """
-    Get inspection statistics
+    Get inspection statistics. Customers, dealers and mechanics get their
+    own inspections, figured in one aggregate query; everyone else gets the
+    platform, read from the daily rollups. ``days`` (default 30, at most
+    366) sets the length of the daily series.
     """
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
         """Get inspection statistics for the user"""
         try:
-            user = request.user
-            
-            # Get base queryset based on user role
-            if hasattr(user, 'customer_profile'):
-                queryset = VehicleInspection.objects.filter(customer=user.customer_profile)
-            elif hasattr(user, 'dealership_profile'):
-                queryset = VehicleInspection.objects.filter(dealer=user.dealership_profile)
-            elif getattr(user, 'user_type', None) == 'mechanic':
-                queryset = VehicleInspection.objects.filter(inspector=user)
+            days = int(request.query_params.get('days', analytics.DEFAULT_DAYS))
+        except (TypeError, ValueError):
+            return Response({'error': 'days must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        days = max(1, min(days, analytics.MAX_DAYS))
+
+        try:
+            scope, scope_id = analytics.scope_for(request.user)
+            queryset = analytics.scoped_queryset(scope, scope_id)
+            if scope == 'platform':
+                stats_data = analytics.rollup_summary(scope, scope_id)
             else:
-                queryset = VehicleInspection.objects.all()
-            
-            # Calculate statistics
-            total_inspections = queryset.count()
-            completed_inspections = queryset.filter(status__in=['completed', 'signed']).count()
-            pending_inspections = queryset.filter(status__in=['draft', 'in_progress']).count()
-            
-            # Signed documents count
-            signed_documents = InspectionDocument.objects.filter(
-                inspection__in=queryset,
-                status='signed'
-            ).count()
-            
-            # Average rating
-            avg_rating = queryset.exclude(overall_rating__isnull=True).aggregate(
-                avg=Avg('overall_rating')
-            )['avg'] or 0
-            
-            # Convert rating to numeric for calculation
-            rating_map = {'poor': 1, 'fair': 2, 'good': 3, 'excellent': 4}
-            numeric_ratings = []
-            for inspection in queryset.exclude(overall_rating__isnull=True):
-                if inspection.overall_rating in rating_map:
-                    numeric_ratings.append(rating_map[inspection.overall_rating])
-            
-            average_rating = sum(numeric_ratings) / len(numeric_ratings) if numeric_ratings else 0
-            
-            # Inspections by type
-            inspections_by_type = dict(
-                queryset.values('inspection_type').annotate(count=Count('id')).values_list('inspection_type', 'count')
-            )
-            
-            # Inspections by status
-            inspections_by_status = dict(
-                queryset.values('status').annotate(count=Count('id')).values_list('status', 'count')
-            )
-            
-            # Recent inspections
-            recent_inspections = queryset.order_by('-inspection_date')[:5]
-            
-            stats_data = {
-                'total_inspections': total_inspections,
-                'completed_inspections': completed_inspections,
-                'pending_inspections': pending_inspections,
-                'signed_documents': signed_documents,
-                'average_rating': round(average_rating, 2),
-                'inspections_by_type': inspections_by_type,
-                'inspections_by_status': inspections_by_status,
-                'recent_inspections': recent_inspections
-            }
+                stats_data = analytics.summary(queryset)
+            stats_data['daily'] = analytics.daily(scope, scope_id, days=days)
+            stats_data['recent_inspections'] = queryset.select_related(
+                'vehicle', 'inspector', 'customer__user', 'dealer'
+            ).order_by('-inspection_date')[:5]
             
             serializer = InspectionStatsSerializer(stats_data)
             return Response({
@@ -644,6 +656,7 @@ def pay_for_inspection(request, inspection_id):
     from wallet.gateway.payment_adapter import PaystackAdapter
     from django.db import transaction as db_transaction
     from .models_revenue import InspectionRevenueSplit
+    from wallet import ledger
     import uuid
     
     try:
@@ -697,7 +710,7 @@ def pay_for_inspection(request, inspection_id):
                         status=status.HTTP_400_BAD_REQUEST
                     )
             
-            if user_wallet.balance < amount:
+            def insufficient_balance():
                 return Response(
                     {
                         'error': 'Insufficient wallet balance',
@@ -706,6 +719,9 @@ def pay_for_inspection(request, inspection_id):
                     },
                     status=status.HTTP_400_BAD_REQUEST
                 )
+
+            if user_wallet.balance < amount:
+                return insufficient_balance()
             
             with db_transaction.atomic():
                 # Create transaction
@@ -724,8 +740,13 @@ def pay_for_inspection(request, inspection_id):
                     related_inspection=inspection
                 )
                 
-                # Deduct from wallet
-                user_wallet.apply_transaction(payment_transaction)
+                # Deduct from wallet; a concurrent debit can still win the race
+                try:
+                    user_wallet.apply_transaction(payment_transaction)
+                except ledger.InsufficientFunds:
+                    db_transaction.set_rollback(True)
+                    user_wallet.refresh_from_db(fields=['ledger_balance'])
+                    return insufficient_balance()
                 
                 # Mark inspection as paid
                 inspection.mark_paid(payment_transaction, payment_method='wallet')
@@ -19,6 +19,14 @@ from .models import (
     BoostPricing,
     ListingBoost,
     PlatformFeeSettings,
+    AvailabilityBlock,
+    VehicleImageImport,
+    Coupon,
+    CouponRedemption,
+    TestDriveSchedule,
+    TestDriveWindow,
+    TestDriveException,
+    ValuationModelVersion,
 )
 
 
@@ -70,8 +78,9 @@ class OrderAdmin(admin.ModelAdmin):
 
 # @veyu_admin.register(TradeInRequest)
 class TradeInRequestAdmin(admin.ModelAdmin):
-    list_display = ['customer', 'vehicle', 'estimated_value']
+    list_display = ['customer', 'vehicle', 'estimated_value', 'asking_value', 'appraised_value', 'appraised_at']
     search_fields = ['customer__account__email', 'vehicle__name']
+    readonly_fields = ['appraised_by', 'appraised_at']
 
 
 # @veyu_admin.register(CarPurchase)
@@ -82,15 +91,17 @@ class CarPurchaseAdmin(admin.ModelAdmin):
 # 
 # @veyu_admin.register(PurchaseOffer)
 class PurchaseOfferAdmin(admin.ModelAdmin):
-    list_display = ['bidder', 'listing', 'amount']
-    list_filter = ['bidder', 'listing']
+    list_display = ['bidder', 'listing', 'amount', 'trade_in_credit', 'made_by', 'status', 'expires_at']
+    list_filter = ['status', 'made_by', 'listing']
+    readonly_fields = ['parent', 'responded_at', 'version']
     search_fields = ['bidder__account__email', 'listing__vehicle__name', 'amount']
 
 
 # @veyu_admin.register(TestDriveRequest)
 class TestDriveRequestAdmin(admin.ModelAdmin):
-    list_display = ['requested_by', 'requested_to', 'listing', 'granted', 'testdrive_complete']
-    list_filter = ['granted', 'testdrive_complete', 'requested_to']
+    list_display = ['requested_by', 'requested_to', 'listing', 'status', 'starts_at', 'granted', 'testdrive_complete']
+    list_filter = ['status', 'granted', 'testdrive_complete', 'requested_to']
+    readonly_fields = ['hold_expires_at', 'cancelled_at', 'cancelled_by', 'revision']
     search_fields = ['requested_by__account__email', 'listing__title']
 
 
@@ -213,6 +224,59 @@ class PlatformFeeSettingsAdmin(admin.ModelAdmin):
         return True
 
 
+class AvailabilityBlockAdmin(admin.ModelAdmin):
+    list_display = ['vehicle', 'kind', 'start_date', 'end_date', 'rental_order', 'note']
+    list_filter = ['kind', 'start_date']
+    search_fields = ['vehicle__name', 'vehicle__brand', 'note']
+    raw_id_fields = ['vehicle', 'rental_order']
+    date_hierarchy = 'start_date'
+
+
+class VehicleImageImportAdmin(admin.ModelAdmin):
+    list_display = ['vehicle', 'url', 'status', 'attempts', 'error', 'date_created']
+    list_filter = ['status']
+    search_fields = ['vehicle__name', 'vehicle__sku', 'url']
+    raw_id_fields = ['vehicle', 'image']
+
+
+class CouponAdmin(admin.ModelAdmin):
+    list_display = ['code', 'issuer', 'formatted_discount', 'priority', 'stackable', 'redemption_count',
+                    'max_redemptions', 'is_active', 'starts', 'expires']
+    list_filter = ['is_active', 'issuer', 'discount_type', 'stackable']
+    search_fields = ['code']
+    filter_horizontal = ['valid_in', 'users']
+    readonly_fields = ['redemption_count']
+
+
+class CouponRedemptionAdmin(admin.ModelAdmin):
+    list_display = ['coupon', 'customer', 'order', 'amount', 'date_created']
+    search_fields = ['coupon__code', 'customer__user__email']
+    raw_id_fields = ['coupon', 'customer', 'order']
+
+
+class ValuationModelVersionAdmin(admin.ModelAdmin):
+    list_display = ['version', 'is_current', 'date_created']
+    readonly_fields = ['version', 'data', 'is_current']
+
+
+class TestDriveWindowInline(admin.TabularInline):
+    model = TestDriveWindow
+    extra = 0
+
+
+class TestDriveExceptionInline(admin.TabularInline):
+    model = TestDriveException
+    extra = 0
+
+
+class TestDriveScheduleAdmin(admin.ModelAdmin):
+    list_display = ['dealer', 'timezone', 'slot_minutes', 'capacity', 'min_notice_minutes', 'horizon_days']
+    search_fields = ['dealer__business_name', 'dealer__user__email']
+    raw_id_fields = ['dealer']
+    readonly_fields = ['calendar_token']
+    inlines = [TestDriveWindowInline, TestDriveExceptionInline]
+
+
 veyu_admin.register(Listing, ListingAdmin)
 veyu_admin.register(RentalOrder, CarRentalAdmin)
 veyu_admin.register(Order, OrderAdmin)
@@ -231,4 +295,9 @@ veyu_admin.register(OrderInspection)
 veyu_admin.register(BoostPricing, BoostPricingAdmin)
 veyu_admin.register(ListingBoost, ListingBoostAdmin)
 veyu_admin.register(PlatformFeeSettings, PlatformFeeSettingsAdmin)
-
+veyu_admin.register(AvailabilityBlock, AvailabilityBlockAdmin)
+veyu_admin.register(VehicleImageImport, VehicleImageImportAdmin)
+veyu_admin.register(Coupon, CouponAdmin)
+veyu_admin.register(CouponRedemption, CouponRedemptionAdmin)
+veyu_admin.register(TestDriveSchedule, TestDriveScheduleAdmin)
+veyu_admin.register(ValuationModelVersion, ValuationModelVersionAdmin)
@@ -12,6 +12,13 @@ from .dealership_views import (
    ListingBoostView,
    ConfirmBoostPaymentView,
    MyBoostsView,
+   InventoryImportView,
+   InventoryExportView,
+   DealerTestDrivesView,
+   TestDriveScheduleView,
+   DealerOffersView,
+   DealerTradeInsView,
+   TradeInAppraisalView,
 )
 
 app_name = "dealership_api"
@@ -24,8 +31,15 @@ urlpatterns = [
     path('listings/', ListingsView.as_view(), name='listings'),
     path('listings/create/', CreateListingView.as_view(), name='create-listing'),
     path('listings/<uuid:listing_id>/', ListingDetailView.as_view(), name='listing-detail'),
+    path('inventory/import/', InventoryImportView.as_view(), name='inventory-import'),
+    path('inventory/export/', InventoryExportView.as_view(), name='inventory-export'),
     path('settings/', SettingsView.as_view(), name='transactions'),
     path('analytics/', AnalyticsView.as_view(), name='analytics'),
+    path('testdrives/', DealerTestDrivesView.as_view(), name='testdrives'),
+    path('testdrives/schedule/', TestDriveScheduleView.as_view(), name='testdrive-schedule'),
+    path('offers/', DealerOffersView.as_view(), name='offers'),
+    path('tradeins/', DealerTradeInsView.as_view(), name='tradeins'),
+    path('tradeins/<uuid:trade_in_id>/appraise/', TradeInAppraisalView.as_view(), name='tradein-appraise'),
     
     # Boost endpoints
     path('boost/pricing/', BoostPricingView.as_view(), name='boost-pricing'),
@@ -1,6 +1,7 @@
 from django.shortcuts import redirect, resolve_url
 from rest_framework.response import Response
 from django.db.models import Q
+import decimal
 import logging
 from utils import (
     OffsetPaginator,
@@ -46,6 +47,8 @@ from .serializers import (
     CompleteOrderSerializer,
     PurchaseOfferSerializer,
     DealerSerializer,
+    TestDriveBookingSerializer,
+    TestDriveScheduleSerializer,
 )
 from ..service_mapping import DealershipServiceProcessor
 from ..models import (
@@ -60,6 +63,10 @@ from ..models import (
     # CarRental,
     PurchaseOffer,
     VehicleImage,
+    TestDriveRequest,
+    TestDriveSchedule,
+    TestDriveException,
+    TradeInRequest,
 )
 from accounts.api.serializers import (
     GetDealershipSerializer,
@@ -85,12 +92,24 @@ from wallet.models import Wallet
 from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils.timezone import now, timedelta
-from django.db.models import Count, Sum
+from django.db.models import Count, Prefetch, Sum
+from django.urls import reverse
+from django.utils import timezone
 from utils import (
     OffsetPaginator,
     upload_multiple_files,
 )
 from utils.dispatch import (on_listing_created, )
+from django.http import StreamingHttpResponse
+from ..metrics import BOOSTS_PURCHASED
+from .. import offers, testdrives, valuation
+from ..inventory import (
+    InventoryError,
+    detect_format,
+    import_inventory,
+    read_rows,
+    stream_export,
+)
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
@@ -103,7 +122,7 @@ class DealershipView(APIView):
 
     def get(self, request):
         try:
-            dealership = Dealership.objects.get(user=request.user)
+            dealership = Dealership.objects.select_related('stats').get(user=request.user)
             data = {
                 'error': False,
                 'data': self.serializer_class(dealership, context={'request': request}).data
@@ -440,7 +459,8 @@ class CreateListingView(CreateAPIView):
             "For boats: hull_material, engine_count, propeller_type, length, beam_width, draft.\n"
             "For bikes: engine_capacity, bike_type, saddle_height.\n"
             "For UAVs: registration_number, uav_type, purpose, max_flight_time, max_range, max_altitude, camera_resolution, payload_capacity, weight, rotor_count.\n"
-            "For rental listings, payment_cycle is required."
+            "For rental listings, payment_cycle is required.\n"
+            "Sale listings come back with a top-level 'valuation' (value, low, high) once a valuation model is trained."
         ),
         request_body=openapi.Schema(
             type=openapi.TYPE_OBJECT,
@@ -548,6 +568,7 @@ class CreateListingView(CreateAPIView):
             action = data.get('action', 'create-listing')
             message = 'Successfully created new listing'
             listing = None
+            estimate = None
 
             if action == 'create-listing':
                 # Get vehicle type (default to 'car' for backward compatibility)
@@ -689,6 +710,10 @@ class CreateListingView(CreateAPIView):
                 dealer.listings.add(listing,)
                 dealer.save()
                 
+                # what comparable vehicles sell for, to check the asking price against
+                if listing.listing_type == 'sale':
+                    estimate = valuation.estimate_value(vehicle)
+
                 # Log successful creation with vehicle type
                 logger.info(f"Successfully created {vehicle_type} listing: {listing.title} (Vehicle ID: {vehicle.id}, Class: {vehicle.__class__.__name__})")
             elif action == 'upload-images':
@@ -715,6 +740,8 @@ class CreateListingView(CreateAPIView):
                 'message': message,
                 'data': self.serializer_class(listing, context={'request': request}).data
             }
+            if estimate is not None:
+                data['valuation'] = valuation.as_data(estimate)
             on_listing_created.send(dealer, listing=listing)
             return Response(data, 200)
         except Dealership.DoesNotExist:
@@ -1769,6 +1796,7 @@ class ConfirmBoostPaymentView(APIView):
             boost.payment_status = 'paid'
             boost.payment_reference = payment_reference
             boost.save()  # This will auto-update active status
+            BOOSTS_PURCHASED.labels(boost.duration_type).inc()
             
             return Response({
                 'error': False,
@@ -1847,3 +1875,237 @@ class MyBoostsView(APIView):
                 'error': True,
                 'message': 'Dealership profile not found'
             }, 404)
+
+
+class InventoryImportView(APIView):
+    """
+    Upsert the dealer's inventory from a CSV or JSON Lines file. Rows are
+    matched on VIN (cars) or SKU, validated field by field, and written in
+    chunks; the response reports what was created and updated and every
+    row that was rejected, by line.
+    """
+    permission_classes = [IsAuthenticated, IsDealerOrStaff]
+    parser_classes = [MultiPartParser, FormParser]
+
+    @swagger_auto_schema(
+        operation_summary="Bulk import inventory",
+        manual_parameters=[
+            openapi.Parameter('file', openapi.IN_FORM, description="CSV or JSON Lines file", type=openapi.TYPE_FILE, required=True),
+            openapi.Parameter('file_format', openapi.IN_FORM, description="csv or jsonl (default: from the file name)", type=openapi.TYPE_STRING),
+            openapi.Parameter('dry_run', openapi.IN_FORM, description="Validate only", type=openapi.TYPE_BOOLEAN),
+        ],
+        tags=['Inventory'],
+    )
+    def post(self, request):
+        try:
+            dealer = Dealership.objects.get(user=request.user)
+        except Dealership.DoesNotExist:
+            return Response({'error': True, 'message': 'Dealership profile not found'}, 404)
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': True, 'message': 'Upload the inventory as "file"'}, 400)
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+        try:
+            file_format = detect_format(upload.name, request.data.get('file_format'))
+            report = import_inventory(dealer, read_rows(upload.file, file_format), dry_run=dry_run)
+        except InventoryError as e:
+            return Response({'error': True, 'message': str(e)}, 400)
+
+        if report.new_listings:
+            on_listing_created.send(dealer, listing=report.new_listings[0])
+        result = report.as_dict()
+        return Response({
+            'error': False,
+            'message': f"{'Checked' if dry_run else 'Imported'} {result['rows']} rows, {result['failed']} failed",
+            'data': result,
+        }, 200)
+
+
+class InventoryExportView(APIView):
+    """The dealer's inventory in the import format, streamed as CSV or JSON Lines."""
+    permission_classes = [IsAuthenticated, IsDealerOrStaff]
+
+    @swagger_auto_schema(
+        operation_summary="Export inventory",
+        manual_parameters=[
+            openapi.Parameter('file_format', openapi.IN_QUERY, description="csv (default) or jsonl", type=openapi.TYPE_STRING),
+        ],
+        tags=['Inventory'],
+    )
+    def get(self, request):
+        try:
+            dealer = Dealership.objects.get(user=request.user)
+        except Dealership.DoesNotExist:
+            return Response({'error': True, 'message': 'Dealership profile not found'}, 404)
+        try:
+            file_format = detect_format(None, request.GET.get('file_format', 'csv'))
+        except InventoryError as e:
+            return Response({'error': True, 'message': str(e)}, 400)
+
+        content_type = 'text/csv' if file_format == 'csv' else 'application/x-ndjson'
+        response = StreamingHttpResponse(stream_export(dealer, file_format), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="inventory.{file_format}"'
+        return response
+
+
+class DealerTestDrivesView(APIView):
+    """The dealer's upcoming scheduled test drives."""
+    permission_classes = [IsAuthenticated, IsDealerOrStaff]
+
+    @swagger_auto_schema(
+        operation_summary="List upcoming test drives",
+        manual_parameters=[
+            openapi.Parameter('status', openapi.IN_QUERY, description="held, booked or cancelled (default: held and booked)", type=openapi.TYPE_STRING),
+        ],
+        tags=['Test Drives'],
+    )
+    def get(self, request):
+        try:
+            dealer = Dealership.objects.get(user=request.user)
+        except Dealership.DoesNotExist:
+            return Response({'error': True, 'message': 'Dealership profile not found'}, 404)
+        requested = request.GET.get('status')
+        if requested and requested not in TestDriveRequest.STATUS:
+            return Response({'error': True, 'message': f'Unknown status {requested}'}, 400)
+        drives = TestDriveRequest.objects.filter(
+            requested_to=dealer, ends_at__gte=timezone.now(),
+        ).select_related('listing', 'requested_by__user', 'requested_to').order_by('starts_at')
+        if requested:
+            drives = drives.filter(status=requested)
+        else:
+            drives = drives.filter(testdrives.active_q())
+        return Response({'error': False, 'data': TestDriveBookingSerializer(drives, many=True).data})
+
+
+class DealerOffersView(APIView):
+    """Offers on the dealer's listings; answer them through the listings offer endpoints."""
+    permission_classes = [IsAuthenticated, IsDealerOrStaff]
+
+    @swagger_auto_schema(
+        operation_summary="List offers on my listings",
+        manual_parameters=[
+            openapi.Parameter('status', openapi.IN_QUERY, description="pending, countered, accepted, rejected, withdrawn or expired (default: pending)", type=openapi.TYPE_STRING),
+            openapi.Parameter('listing', openapi.IN_QUERY, description="Only offers on this listing (uuid)", type=openapi.TYPE_STRING),
+        ],
+        tags=['Offers'],
+    )
+    def get(self, request):
+        try:
+            dealer = Dealership.objects.get(user=request.user)
+        except Dealership.DoesNotExist:
+            return Response({'error': True, 'message': 'Dealership profile not found'}, 404)
+        requested = request.GET.get('status', 'pending')
+        if requested not in PurchaseOffer.STATUS:
+            return Response({'error': True, 'message': f'Unknown status {requested}'}, 400)
+        offers = PurchaseOffer.objects.filter(listing__vehicle__dealer=dealer, status=requested).select_related(
+            'bidder__user', 'listing', 'parent', 'order',
+        ).order_by('-date_created')
+        if request.GET.get('listing'):
+            try:
+                offers = offers.filter(listing__uuid=request.GET['listing'])
+            except DjangoValidationError:
+                return Response({'error': True, 'message': 'listing must be a uuid'}, 400)
+        return Response({'error': False, 'data': PurchaseOfferSerializer(offers, many=True).data})
+
+
+class DealerTradeInsView(APIView):
+    """Trade-ins customers offered the dealer, with the valuation model's estimate to review."""
+    permission_classes = [IsAuthenticated, IsDealerOrStaff]
+
+    @swagger_auto_schema(
+        operation_summary="List trade-ins offered to me",
+        manual_parameters=[
+            openapi.Parameter('appraised', openapi.IN_QUERY, description="true or false (default: both)", type=openapi.TYPE_BOOLEAN),
+        ],
+        tags=['Trade-ins'],
+    )
+    def get(self, request):
+        try:
+            dealer = Dealership.objects.get(user=request.user)
+        except Dealership.DoesNotExist:
+            return Response({'error': True, 'message': 'Dealership profile not found'}, 404)
+        trade_ins = TradeInRequest.objects.filter(to=dealer).select_related('vehicle', 'to').order_by('-date_created')
+        appraised = request.GET.get('appraised')
+        if appraised in ('true', 'false'):
+            trade_ins = trade_ins.filter(appraised_value__isnull=appraised == 'false')
+        return Response({'error': False, 'data': TradeInRequestSerializer(trade_ins, many=True).data})
+
+
+class TradeInAppraisalView(APIView):
+    """Set the value a trade-in is credited at; only appraised trade-ins are credited against offers."""
+    permission_classes = [IsAuthenticated, IsDealerOrStaff]
+
+    @swagger_auto_schema(
+        operation_summary="Appraise a trade-in",
+        operation_description="Sets appraised_value, or approves the valuation model's estimate when it is left out.",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={'appraised_value': openapi.Schema(type=openapi.TYPE_STRING, description="Defaults to estimated_value")},
+        ),
+        tags=['Trade-ins'],
+    )
+    def post(self, request, trade_in_id):
+        try:
+            dealer = Dealership.objects.get(user=request.user)
+        except Dealership.DoesNotExist:
+            return Response({'error': True, 'message': 'Dealership profile not found'}, 404)
+        trade_in = get_object_or_404(TradeInRequest.objects.select_related('vehicle', 'to'), uuid=trade_in_id, to=dealer)
+        value = request.data.get('appraised_value')
+        if value not in (None, ''):
+            try:
+                value = decimal.Decimal(str(value))
+            except (decimal.InvalidOperation, ValueError):
+                value = None
+            # the value columns hold 12 digits, 2 of them decimals
+            if value is None or not value.is_finite() or not 0 < value < 10 ** 10:
+                return Response({'error': True, 'message': 'appraised_value must be a positive number'}, 400)
+        else:
+            value = None
+        try:
+            offers.appraise(trade_in, request.user, value)
+        except offers.OfferError as e:
+            code = 409 if e.reason in offers.CONFLICTS else 400
+            return Response({'error': True, 'message': offers.REASONS[e.reason], 'data': {'reason': e.reason}}, code)
+        return Response({'error': False, 'data': TradeInRequestSerializer(trade_in).data})
+
+
+class TestDriveScheduleView(APIView):
+    """The dealer's test drive hours; the schedule is created on first use."""
+    permission_classes = [IsAuthenticated, IsDealerOrStaff]
+
+    def _schedule(self, request):
+        dealer = Dealership.objects.get(user=request.user)
+        schedule, _ = TestDriveSchedule.objects.get_or_create(dealer=dealer)
+        upcoming = TestDriveException.objects.filter(date__gte=timezone.localdate())
+        return TestDriveSchedule.objects.prefetch_related('windows', Prefetch('exceptions', queryset=upcoming)).get(pk=schedule.pk)
+
+    def _response(self, request, schedule):
+        data = TestDriveScheduleSerializer(schedule).data
+        data['calendar_url'] = request.build_absolute_uri(
+            reverse('listings_api:testdrive-calendar', kwargs={'token': schedule.calendar_token})
+        )
+        return Response({'error': False, 'data': data})
+
+    @swagger_auto_schema(operation_summary="Get test drive schedule", tags=['Test Drives'])
+    def get(self, request):
+        try:
+            return self._response(request, self._schedule(request))
+        except Dealership.DoesNotExist:
+            return Response({'error': True, 'message': 'Dealership profile not found'}, 404)
+
+    @swagger_auto_schema(
+        operation_summary="Update test drive schedule",
+        operation_description="Replaces the weekly windows and the upcoming exceptions when they are given.",
+        request_body=TestDriveScheduleSerializer,
+        tags=['Test Drives'],
+    )
+    def put(self, request):
+        try:
+            schedule = self._schedule(request)
+        except Dealership.DoesNotExist:
+            return Response({'error': True, 'message': 'Dealership profile not found'}, 404)
+        serializer = TestDriveScheduleSerializer(schedule, data=request.data, partial=True)
+        if not serializer.is_valid():
+            return Response({'error': True, 'message': serializer.errors}, 400)
+        serializer.save()
+        return self._response(request, self._schedule(request))
@@ -1,6 +1,7 @@
 from django_filters.rest_framework import (
     FilterSet,
     CharFilter,
+    DateFilter,
 )
 from ..models import (
    Listing,
@@ -15,7 +16,10 @@ from ..models import (
 # from bookings.models import (
 #     Service
 # )
+from datetime import timedelta
 from django.db.models import Q
+from django.utils import timezone
+from listings.availability import available_between
 from listings.models import Listing
 
 
@@ -137,10 +141,24 @@ class CarRentalFilter(FilterSet):
     vehicle_type = CharFilter(method='filter_vehicle_type', label="Vehicle Type (car, boat, plane, bike, uav)")
     body_type = CharFilter(method='filter_body_type', label="Body Type (suv, sedan, etc.)")
     location = CharFilter(method='filter_location', label="Location (State or City)")
+    available_from = DateFilter(method='filter_availability', label="Available from (YYYY-MM-DD)")
+    available_until = DateFilter(method='filter_availability', label="Available until / return date (YYYY-MM-DD)")
 
     class Meta:
         model = Listing
-        fields = ['vehicle_type', 'body_type', 'location', 'make', 'brands', 'transmission', 'fuel_system', 'price']
+        fields = ['vehicle_type', 'body_type', 'location', 'make', 'brands', 'transmission', 'fuel_system', 'price', 'available_from', 'available_until']
+
+    def filter_availability(self, queryset, name, value):
+        # both bounds are applied together, on whichever filter runs first
+        start = self.form.cleaned_data.get('available_from')
+        end = self.form.cleaned_data.get('available_until')
+        if name == 'available_until' and start:
+            return queryset
+        start = start or timezone.localdate()
+        end = end or start + timedelta(days=1)
+        if end <= start:
+            return queryset.none()
+        return available_between(queryset, start, end)
 
     def filter_make(self, queryset, name, value):
         # Filter listing by car brands
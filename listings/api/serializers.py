@@ -12,6 +12,9 @@ from ..models import (
     OrderInspection,
     VehicleImage,
     TestDriveRequest,
+    TestDriveSchedule,
+    TestDriveWindow,
+    TestDriveException,
     TradeInRequest,
     PurchaseOffer,
     BoostPricing,
@@ -461,6 +464,7 @@ class OrderSerializer(ModelSerializer):
             'payment_option',
             'paid',
             'order_status',
+            'agreed_price',
             'applied_coupons',
             'inspections',
             'vehicle_inspections',
@@ -575,10 +579,120 @@ class TestDriveRequestSerializer(serializers.ModelSerializer):
         model = TestDriveRequest
         fields = ['requested_by', 'requested_to', 'listing']
 
+class TestDriveBookingSerializer(serializers.ModelSerializer):
+    listing = serializers.SerializerMethodField()
+    customer = serializers.SerializerMethodField()
+    dealer = serializers.SerializerMethodField()
+
+    class Meta:
+        model = TestDriveRequest
+        fields = [
+            'uuid', 'status', 'starts_at', 'ends_at', 'hold_expires_at', 'cancelled_at', 'cancel_reason',
+            'listing', 'customer', 'dealer', 'date_created',
+        ]
+
+    def get_listing(self, obj):
+        return {'uuid': str(obj.listing.uuid), 'title': obj.listing.title}
+
+    def get_customer(self, obj):
+        user = obj.requested_by.user
+        return {'name': user.name, 'email': user.email, 'phone_number': obj.requested_by.phone_number}
+
+    def get_dealer(self, obj):
+        return {'uuid': str(obj.requested_to.uuid), 'business_name': obj.requested_to.business_name}
+
+
+class TestDriveWindowSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TestDriveWindow
+        fields = ['weekday', 'starts_at', 'ends_at']
+
+    def validate(self, data):
+        if data['ends_at'] <= data['starts_at']:
+            raise serializers.ValidationError("ends_at must be after starts_at")
+        return data
+
+
+class TestDriveExceptionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TestDriveException
+        fields = ['date', 'starts_at', 'ends_at', 'note']
+
+    def validate(self, data):
+        starts_at, ends_at = data.get('starts_at'), data.get('ends_at')
+        if (starts_at is None) != (ends_at is None):
+            raise serializers.ValidationError("Give both starts_at and ends_at, or neither to close the date")
+        if starts_at is not None and ends_at <= starts_at:
+            raise serializers.ValidationError("ends_at must be after starts_at")
+        return data
+
+
+class TestDriveScheduleSerializer(serializers.ModelSerializer):
+    """A dealership's test drive hours. Updating replaces the weekly windows and the upcoming exceptions."""
+    windows = TestDriveWindowSerializer(many=True, required=False)
+    exceptions = TestDriveExceptionSerializer(many=True, required=False)
+
+    class Meta:
+        model = TestDriveSchedule
+        fields = ['timezone', 'slot_minutes', 'capacity', 'min_notice_minutes', 'horizon_days', 'windows', 'exceptions']
+
+    def validate_timezone(self, value):
+        from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+        try:
+            ZoneInfo(value)
+        except (ValueError, ZoneInfoNotFoundError):
+            raise serializers.ValidationError(f"Unknown timezone {value}")
+        return value
+
+    def validate_slot_minutes(self, value):
+        if not 5 <= value <= 24 * 60:
+            raise serializers.ValidationError("Slots must be between 5 minutes and a day long")
+        return value
+
+    def validate_horizon_days(self, value):
+        if not 1 <= value <= 365:
+            raise serializers.ValidationError("The booking horizon must be between 1 and 365 days")
+        return value
+
+    def update(self, instance, validated_data):
+        from django.db import transaction
+        from django.utils import timezone
+
+        windows = validated_data.pop('windows', None)
+        exceptions = validated_data.pop('exceptions', None)
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            if windows is not None:
+                instance.windows.all().delete()
+                TestDriveWindow.objects.bulk_create([TestDriveWindow(schedule=instance, **window) for window in windows])
+            if exceptions is not None:
+                instance.exceptions.filter(date__gte=timezone.localdate()).delete()
+                TestDriveException.objects.bulk_create([
+                    TestDriveException(schedule=instance, **exception) for exception in exceptions
+                ])
+        return instance
+
+
 class TradeInRequestSerializer(serializers.ModelSerializer):
+    vehicle = serializers.SerializerMethodField()
+    dealer = serializers.SerializerMethodField()
+
     class Meta:
         model = TradeInRequest
-        fields = ['vehicle', 'estimated_value', 'comments']
+        fields = [
+            'id', 'uuid', 'vehicle', 'dealer', 'estimated_value', 'asking_value', 'appraised_value', 'appraised_at',
+            'comments', 'date_created',
+        ]
+
+    def get_vehicle(self, obj):
+        vehicle = obj.vehicle
+        return {
+            'uuid': vehicle.uuid, 'name': vehicle.name, 'brand': vehicle.brand, 'model': vehicle.model,
+            'condition': vehicle.condition, 'mileage': vehicle.mileage,
+        }
+
+    def get_dealer(self, obj):
+        return {'uuid': obj.to.uuid, 'business_name': obj.to.business_name}
 
 class CompleteOrderSerializer(serializers.Serializer):
     recipient = serializers.EmailField(required=True)
@@ -599,9 +713,29 @@ class CompleteOrderSerializer(serializers.Serializer):
         return data
 
 class PurchaseOfferSerializer(serializers.ModelSerializer):
+    parent = serializers.SlugRelatedField(slug_field='uuid', read_only=True)
+    net_amount = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    listing = serializers.SerializerMethodField()
+    customer = serializers.SerializerMethodField()
+    order = serializers.SerializerMethodField()
+
     class Meta:
         model = PurchaseOffer
-        fields = '__all__'
+        fields = [
+            'uuid', 'parent', 'made_by', 'status', 'amount', 'trade_in', 'trade_in_credit', 'net_amount', 'message',
+            'expires_at', 'responded_at', 'version', 'listing', 'customer', 'order', 'date_created',
+        ]
+        read_only_fields = fields
+
+    def get_listing(self, obj):
+        return {'uuid': str(obj.listing.uuid), 'title': obj.listing.title, 'price': obj.listing.price}
+
+    def get_customer(self, obj):
+        return {'name': obj.bidder.user.name, 'email': obj.bidder.user.email}
+
+    def get_order(self, obj):
+        order = getattr(obj, 'order', None)
+        return str(order.uuid) if order is not None else None
 
 
 class BoostPricingSerializer(serializers.ModelSerializer):
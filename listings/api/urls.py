@@ -8,6 +8,7 @@ from .views import (
     ListingCountsView,
     BuyListingDetailView,
     RentListingDetailView,
+    RentalAvailabilityView,
     DealershipView,
     BookInspectionView,
     CheckoutDocumentView,
@@ -15,6 +16,16 @@ from .views import (
     FeaturedListingsView,
     UserOrdersView,
     CancelOrderView,
+    TestDriveSlotsView,
+    ReserveTestDriveView,
+    MyTestDrivesView,
+    TestDriveActionView,
+    TestDriveCalendarView,
+    MakeOfferView,
+    MyOffersView,
+    OfferActionView,
+    ValuationView,
+    TradeInView,
 )
 
 
@@ -36,7 +47,18 @@ urlpatterns = [
     path('my-orders/', UserOrdersView.as_view(), name='user-orders'),
     path('orders/<uuid:order_id>/cancel/', CancelOrderView.as_view(), name='cancel-order'),
     path('buy/<uuid>/', BuyListingDetailView.as_view(), name='buy-listing-detail'),
+    path('rentals/<uuid>/availability/', RentalAvailabilityView.as_view(), name='rental-availability'),
     path('rentals/<uuid>/', RentListingDetailView.as_view(), name='rental-detail'),
+    path('testdrives/', MyTestDrivesView.as_view(), name='my-testdrives'),
+    path('testdrives/<uuid:listing_id>/slots/', TestDriveSlotsView.as_view(), name='testdrive-slots'),
+    path('testdrives/<uuid:listing_id>/reserve/', ReserveTestDriveView.as_view(), name='testdrive-reserve'),
+    path('testdrives/bookings/<uuid:drive_id>/<str:action>/', TestDriveActionView.as_view(), name='testdrive-action'),
+    path('testdrives/calendar/<str:token>.ics', TestDriveCalendarView.as_view(), name='testdrive-calendar'),
+    path('offers/', MyOffersView.as_view(), name='my-offers'),
+    path('offers/<uuid:listing_id>/', MakeOfferView.as_view(), name='make-offer'),
+    path('offers/<uuid:offer_id>/<str:action>/', OfferActionView.as_view(), name='offer-action'),
+    path('valuation/', ValuationView.as_view(), name='valuation'),
+    path('tradeins/', TradeInView.as_view(), name='tradeins'),
     path('checkout/documents/', CheckoutDocumentView.as_view()),
     path('checkout/inspection/', BookInspectionView.as_view(), name='checkout-inspection'),
     path('checkout/<uuid:listingId>/', CheckoutView.as_view(), name='checkout'),
@@ -3,6 +3,7 @@ import requests
 from django.shortcuts import redirect, resolve_url
 from rest_framework.response import Response
 import decimal
+from django.db import transaction as db_transaction
 from django.db.models import Q, Count
 from utils import (
     OffsetPaginator,
@@ -44,10 +45,11 @@ from .serializers import (
     VehicleSerializer,
     # BookCarRentalSerializer,
     # TestDriveRequestSerializer,
-    # TradeInRequestSerializer,
+    TradeInRequestSerializer,
     CompleteOrderSerializer,
+    TestDriveBookingSerializer,
     # OrderInspectionSerializer,
-    # PurchaseOfferSerializer,
+    PurchaseOfferSerializer,
 )
 from ..models import (
     Vehicle,
@@ -57,6 +59,9 @@ from ..models import (
     OrderInspection,
     PurchaseOffer,
     ListingBoost,
+    TestDriveRequest,
+    TestDriveSchedule,
+    TradeInRequest,
 )
 from accounts.api.serializers import (
     DealershipSerializer,
@@ -70,10 +75,14 @@ from .filters import (
     CarSaleFilter,
     CarRentalFilter,
 )
+from listings.availability import VehicleUnavailable, book_rental, month_grid
+from listings.coupons import CouponUnavailable, evaluate, parse_codes, redeem
+from listings import offers, testdrives, valuation
 from rest_framework.viewsets import ModelViewSet
 from rest_framework import status
-from django.core.exceptions import ObjectDoesNotExist
+from django.core.exceptions import ObjectDoesNotExist, ValidationError as DjangoValidationError
 from rest_framework.exceptions import ValidationError
+from rest_framework.throttling import SimpleRateThrottle
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from rest_framework import status
@@ -83,17 +92,15 @@ from wallet.models import Wallet
 from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
 from utils import OffsetPaginator
+from utils import metrics
 from utils.dispatch import (on_checkout_success, on_inspection_created)
-from datetime import datetime
+from datetime import date, datetime
 from django.conf import settings
 from io import BytesIO
-from PyPDF2 import PdfReader, PdfWriter
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.utils import ImageReader
+from utils.lazy import lazy_import
 from django.views.decorators.csrf import csrf_exempt
 from django.core.files import File as DjangoFile
-from django.http import Http404
+from django.http import Http404, HttpResponse
 from django.core.files.storage import default_storage
 
 # ===== OpenAPI Schemas for Listings =====
@@ -498,6 +505,8 @@ class RentListingView(ListAPIView):
             openapi.Parameter('fuel_system', openapi.IN_QUERY, description='Comma-separated fuel system', type=openapi.TYPE_STRING),
             openapi.Parameter('price', openapi.IN_QUERY, description='Price range min-max', type=openapi.TYPE_STRING),
             openapi.Parameter('vehicle_type', openapi.IN_QUERY, description='Comma-separated vehicle types (car, boat, plane, bike, uav)', type=openapi.TYPE_STRING),
+            openapi.Parameter('available_from', openapi.IN_QUERY, description='Only vehicles free from this date (YYYY-MM-DD)', type=openapi.TYPE_STRING),
+            openapi.Parameter('available_until', openapi.IN_QUERY, description='...until this return date (YYYY-MM-DD)', type=openapi.TYPE_STRING),
         ],
         responses={200: EnvelopeListSchema}
     )
@@ -614,6 +623,473 @@ class RentListingDetailView(RetrieveUpdateDestroyAPIView):
         }
         return Response(data, 200)
 
+class RentalAvailabilityView(APIView):
+    allowed_methods = ['GET']
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    authentication_classes = [TokenAuthentication, SessionAuthentication]
+
+    @swagger_auto_schema(
+        operation_summary="Get a rental listing's availability for a month",
+        tags=["Listings"],
+        manual_parameters=[
+            openapi.Parameter('month', openapi.IN_QUERY, description='Month as YYYY-MM (default: current month)', type=openapi.TYPE_STRING),
+        ],
+    )
+    def get(self, request, uuid):
+        listing = get_object_or_404(Listing.objects.select_related('vehicle'), uuid=uuid, listing_type='rental')
+        month = request.query_params.get('month')
+        try:
+            if month:
+                year, month_number = (int(part) for part in month.split('-'))
+                date(year, month_number, 1)
+            else:
+                today = date.today()
+                year, month_number = today.year, today.month
+        except ValueError:
+            return Response({'error': True, 'message': 'month must be in YYYY-MM format'}, status=status.HTTP_400_BAD_REQUEST)
+
+        days = month_grid(listing.vehicle, year, month_number)
+        return Response({
+            'error': False,
+            'data': {
+                'listing': str(listing.uuid),
+                'month': f'{year:04d}-{month_number:02d}',
+                'available_days': sum(1 for day in days if day['available']),
+                'days': days,
+            }
+        })
+
+
+def _testdrive_start(request):
+    """The aware ``starts_at`` datetime in the request body, or None."""
+    from django.utils.dateparse import parse_datetime
+
+    try:
+        starts_at = parse_datetime(str(request.data.get('starts_at') or ''))
+    except ValueError:
+        return None
+    if starts_at is None or starts_at.tzinfo is None:
+        return None
+    return starts_at
+
+
+def _slot_unavailable(e):
+    return Response(
+        {'error': True, 'message': testdrives.REASONS[e.reason], 'data': {'reason': e.reason}},
+        status=status.HTTP_409_CONFLICT,
+    )
+
+
+class TestDriveSlotsView(APIView):
+    allowed_methods = ['GET']
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    authentication_classes = [TokenAuthentication, SessionAuthentication]
+
+    @swagger_auto_schema(
+        operation_summary="Get a listing's free test drive slots",
+        tags=["Test Drives"],
+        manual_parameters=[
+            openapi.Parameter('from', openapi.IN_QUERY, description='First date as YYYY-MM-DD (default: today)', type=openapi.TYPE_STRING),
+            openapi.Parameter('days', openapi.IN_QUERY, description=f'Number of days (default: 7, at most {testdrives.MAX_DAYS})', type=openapi.TYPE_INTEGER),
+        ],
+    )
+    def get(self, request, listing_id):
+        listing = get_object_or_404(Listing.objects.select_related('vehicle'), uuid=listing_id, verified=True)
+        try:
+            start = date.fromisoformat(request.query_params['from']) if request.query_params.get('from') else date.today()
+            days = int(request.query_params.get('days', 7))
+            slots = testdrives.slots(listing, start, days)
+        except ValueError as e:
+            return Response({'error': True, 'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        schedule = TestDriveSchedule.objects.filter(dealer_id=listing.vehicle.dealer_id).first()
+        return Response({
+            'error': False,
+            'data': {
+                'listing': str(listing.uuid),
+                'timezone': schedule.timezone if schedule else None,
+                'slots': [
+                    {'starts_at': slot.starts_at.isoformat(), 'ends_at': slot.ends_at.isoformat(), 'remaining': slot.remaining}
+                    for slot in slots
+                ],
+            }
+        })
+
+
+class TestDriveReserveThrottle(SimpleRateThrottle):
+    """``TESTDRIVE_RESERVE_RATE`` reservation requests per user."""
+    scope = 'testdrive_reserve'
+
+    def get_rate(self):
+        return settings.TESTDRIVE_RESERVE_RATE
+
+    def get_cache_key(self, request, view):
+        ident = request.user.pk if request.user.is_authenticated else self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+class ReserveTestDriveView(APIView):
+    allowed_methods = ['POST']
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [TestDriveReserveThrottle]
+
+    @swagger_auto_schema(
+        operation_summary="Hold a test drive slot",
+        operation_description="Holds the slot for TESTDRIVE_HOLD_MINUTES; confirm the booking before the hold expires.",
+        tags=["Test Drives"],
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=['starts_at'],
+            properties={'starts_at': openapi.Schema(type=openapi.TYPE_STRING, format='date-time')},
+        ),
+    )
+    def post(self, request, listing_id):
+        listing = get_object_or_404(Listing.objects.select_related('vehicle'), uuid=listing_id, verified=True)
+        customer = Customer.objects.filter(user=request.user).first()
+        if customer is None:
+            return Response({'error': True, 'message': 'Only customers can book test drives'}, status=status.HTTP_403_FORBIDDEN)
+        starts_at = _testdrive_start(request)
+        if starts_at is None:
+            return Response({'error': True, 'message': 'starts_at must be an ISO 8601 date-time with a UTC offset'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            drive = testdrives.reserve(listing, customer, starts_at)
+        except testdrives.SlotUnavailable as e:
+            return _slot_unavailable(e)
+        return Response({'error': False, 'data': TestDriveBookingSerializer(drive).data}, status=status.HTTP_201_CREATED)
+
+
+class MyTestDrivesView(ListAPIView):
+    serializer_class = TestDriveBookingSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = OffsetPaginator
+
+    @swagger_auto_schema(operation_summary="List my scheduled test drives", tags=["Test Drives"])
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return TestDriveRequest.objects.none()
+        return TestDriveRequest.objects.filter(
+            requested_by__user=self.request.user, starts_at__isnull=False,
+        ).select_related('listing', 'requested_by__user', 'requested_to').order_by('-starts_at')
+
+
+class TestDriveActionView(APIView):
+    """Confirm (customer), reschedule or cancel (either participant) a scheduled test drive."""
+    allowed_methods = ['POST']
+    permission_classes = [IsAuthenticated]
+    ACTIONS = ('confirm', 'reschedule', 'cancel')
+
+    @swagger_auto_schema(
+        operation_summary="Confirm, reschedule or cancel a test drive",
+        tags=["Test Drives"],
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'starts_at': openapi.Schema(type=openapi.TYPE_STRING, format='date-time', description='reschedule: the new slot'),
+                'reason': openapi.Schema(type=openapi.TYPE_STRING, description='cancel: shown to the other participant'),
+            },
+        ),
+    )
+    def post(self, request, drive_id, action):
+        if action not in self.ACTIONS:
+            raise Http404
+        drive = get_object_or_404(
+            TestDriveRequest.objects.select_related('listing', 'requested_by__user', 'requested_to__user'), uuid=drive_id,
+        )
+        is_customer = drive.requested_by.user == request.user
+        if not (is_customer or drive.requested_to.user == request.user or request.user.is_staff):
+            return Response({'error': True, 'message': 'You do not have permission to change this test drive'}, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            if action == 'confirm':
+                if not is_customer:
+                    return Response({'error': True, 'message': 'Only the customer can confirm a test drive'}, status=status.HTTP_403_FORBIDDEN)
+                drive = testdrives.confirm(drive)
+            elif action == 'reschedule':
+                starts_at = _testdrive_start(request)
+                if starts_at is None:
+                    return Response({'error': True, 'message': 'starts_at must be an ISO 8601 date-time with a UTC offset'}, status=status.HTTP_400_BAD_REQUEST)
+                drive = testdrives.reschedule(drive, starts_at, request.user)
+            else:
+                drive = testdrives.cancel(drive, request.user, str(request.data.get('reason', '')))
+        except testdrives.SlotUnavailable as e:
+            return _slot_unavailable(e)
+        return Response({'error': False, 'data': TestDriveBookingSerializer(drive).data})
+
+
+class TestDriveCalendarView(APIView):
+    """A dealership's test drives as an iCalendar feed; the token in the URL is the credential."""
+    allowed_methods = ['GET']
+    permission_classes = []
+    authentication_classes = []
+
+    @swagger_auto_schema(operation_summary="Dealership test drive calendar (.ics)", tags=["Test Drives"])
+    def get(self, request, token):
+        schedule = get_object_or_404(TestDriveSchedule.objects.select_related('dealer'), calendar_token=token)
+        response = HttpResponse(testdrives.calendar(schedule), content_type='text/calendar; charset=utf-8')
+        response['Content-Disposition'] = 'inline; filename="testdrives.ics"'
+        return response
+
+
+def _offer_error(e):
+    if e.reason in offers.CONFLICTS:
+        code = status.HTTP_409_CONFLICT
+    elif e.reason in ('not_party', 'not_your_turn', 'not_yours'):
+        code = status.HTTP_403_FORBIDDEN
+    else:
+        code = status.HTTP_400_BAD_REQUEST
+    data = {'reason': e.reason}
+    if e.offer is not None:
+        data['offer'] = PurchaseOfferSerializer(e.offer).data
+    return Response({'error': True, 'message': offers.REASONS[e.reason], 'data': data}, status=code)
+
+
+def _offer_amount(request, field='amount'):
+    try:
+        amount = decimal.Decimal(str(request.data.get(field)))
+    except (decimal.InvalidOperation, ValueError):
+        return None
+    # the offer columns hold 12 digits, 2 of them decimals
+    return amount if amount.is_finite() and 0 < amount < 10 ** 10 else None
+
+
+def _offer_version(request):
+    try:
+        return int(request.data['version']) if request.data.get('version') not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+OFFER_QUERYSET = PurchaseOffer.objects.select_related('bidder__user', 'listing__vehicle__dealer__user', 'parent', 'order')
+
+
+class MakeOfferView(APIView):
+    allowed_methods = ['POST']
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Make an offer on a sale listing",
+        operation_description="The offer stays open for OFFER_EXPIRY_HOURS. A trade-in's estimated value is credited against the amount.",
+        tags=["Offers"],
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=['amount'],
+            properties={
+                'amount': openapi.Schema(type=openapi.TYPE_STRING, description='Price offered for the vehicle'),
+                'trade_in': openapi.Schema(type=openapi.TYPE_INTEGER, description='Id of one of your trade-in requests to this dealership'),
+                'message': openapi.Schema(type=openapi.TYPE_STRING),
+            },
+        ),
+    )
+    def post(self, request, listing_id):
+        listing = get_object_or_404(Listing.objects.select_related('vehicle__dealer__user'), uuid=listing_id)
+        customer = Customer.objects.filter(user=request.user).first()
+        if customer is None:
+            return Response({'error': True, 'message': 'Only customers can make offers'}, status=status.HTTP_403_FORBIDDEN)
+        amount = _offer_amount(request)
+        if amount is None:
+            return Response({'error': True, 'message': 'amount must be a positive number'}, status=status.HTTP_400_BAD_REQUEST)
+        trade_in = None
+        if request.data.get('trade_in'):
+            trade_in = TradeInRequest.objects.filter(pk=request.data['trade_in'], customer=customer).first()
+            if trade_in is None:
+                return Response({'error': True, 'message': offers.REASONS['invalid_trade_in']}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            offer = offers.make_offer(listing, customer, amount, trade_in, str(request.data.get('message', '')))
+        except offers.OfferError as e:
+            return _offer_error(e)
+        return Response({'error': False, 'data': PurchaseOfferSerializer(offer).data}, status=status.HTTP_201_CREATED)
+
+
+class MyOffersView(ListAPIView):
+    serializer_class = PurchaseOfferSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = OffsetPaginator
+
+    @swagger_auto_schema(operation_summary="List my offers and the counter-offers to them", tags=["Offers"])
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return PurchaseOffer.objects.none()
+        return OFFER_QUERYSET.filter(bidder__user=self.request.user).order_by('-date_created')
+
+
+class OfferActionView(APIView):
+    """Answer (accept, reject, counter), withdraw or check out an offer; either side of the negotiation."""
+    allowed_methods = ['POST']
+    permission_classes = [IsAuthenticated]
+    ACTIONS = ('accept', 'reject', 'counter', 'withdraw', 'checkout')
+
+    @swagger_auto_schema(
+        operation_summary="Accept, reject, counter, withdraw or check out an offer",
+        operation_description="Pass the offer's version to fail with 409 if it changed since it was loaded.",
+        tags=["Offers"],
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'version': openapi.Schema(type=openapi.TYPE_INTEGER, description='The version of the offer being answered'),
+                'amount': openapi.Schema(type=openapi.TYPE_STRING, description='counter: the amount offered back'),
+                'message': openapi.Schema(type=openapi.TYPE_STRING, description='counter: shown to the other side'),
+                'reason': openapi.Schema(type=openapi.TYPE_STRING, description='reject: shown to the other side'),
+                'payment_option': openapi.Schema(type=openapi.TYPE_STRING, description='checkout: how the order is paid'),
+            },
+        ),
+    )
+    def post(self, request, offer_id, action):
+        if action not in self.ACTIONS:
+            raise Http404
+        offer = get_object_or_404(OFFER_QUERYSET, uuid=offer_id)
+        version = _offer_version(request)
+        try:
+            if action == 'accept':
+                offer = offers.accept(offer, request.user, version)
+            elif action == 'reject':
+                offer = offers.reject(offer, request.user, str(request.data.get('reason', '')), version)
+            elif action == 'withdraw':
+                offer = offers.withdraw(offer, request.user, version)
+            elif action == 'counter':
+                amount = _offer_amount(request)
+                if amount is None:
+                    return Response({'error': True, 'message': 'amount must be a positive number'}, status=status.HTTP_400_BAD_REQUEST)
+                reply = offers.counter(offer, request.user, amount, str(request.data.get('message', '')), version)
+                return Response({'error': False, 'data': PurchaseOfferSerializer(reply).data}, status=status.HTTP_201_CREATED)
+            else:
+                payment_option = request.data.get('payment_option', 'pay-after-inspection')
+                if payment_option not in Order.PAYMENT_OPTION:
+                    return Response({'error': True, 'message': f'Unknown payment option {payment_option}'}, status=status.HTTP_400_BAD_REQUEST)
+                order, created = offers.checkout(offer, request.user, payment_option)
+                if created:
+                    on_checkout_success.send(order, listing=offer.listing, customer=offer.bidder)
+                return Response(
+                    {'error': False, 'data': OrderSerializer(order, context={'request': request}).data},
+                    status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+                )
+        except offers.OfferError as e:
+            return _offer_error(e)
+        return Response({'error': False, 'data': PurchaseOfferSerializer(offer).data})
+
+
+VALUATION_FIELDS = {
+    'vehicle_type': openapi.Schema(type=openapi.TYPE_STRING, enum=list(valuation.KINDS), description='Defaults to car'),
+    'brand': openapi.Schema(type=openapi.TYPE_STRING),
+    'model': openapi.Schema(type=openapi.TYPE_STRING),
+    'condition': openapi.Schema(type=openapi.TYPE_STRING, enum=[key for key, _ in Vehicle.CONDITION_CHOICES]),
+    'fuel_system': openapi.Schema(type=openapi.TYPE_STRING, enum=[key for key, _ in Vehicle.FUEL_SYSTEM]),
+    'transmission': openapi.Schema(type=openapi.TYPE_STRING, enum=[key for key, _ in Vehicle.TRANSMISSION]),
+    'mileage': openapi.Schema(type=openapi.TYPE_STRING, description="e.g. '45,000 km' or '30k miles'"),
+    'body_type': openapi.Schema(type=openapi.TYPE_STRING, description='Cars only'),
+    'drivetrain': openapi.Schema(type=openapi.TYPE_STRING, description='Cars only'),
+}
+
+
+def _valuation_attributes(request):
+    """The vehicle attributes of a valuation or trade-in request, or None when they are not usable."""
+    kind = str(request.data.get('vehicle_type') or 'car').lower()
+    if kind not in valuation.KINDS or not request.data.get('brand'):
+        return None
+    attributes = {field: request.data.get(field) or None for field in VALUATION_FIELDS if field != 'vehicle_type'}
+    attributes['kind'] = kind
+    return attributes
+
+
+class ValuationView(APIView):
+    allowed_methods = ['POST']
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Estimate what a vehicle sells for",
+        operation_description="An estimate with an 80% interval from the current valuation model; data is null before one is trained.",
+        tags=["Trade-ins"],
+        request_body=openapi.Schema(type=openapi.TYPE_OBJECT, required=['brand'], properties=VALUATION_FIELDS),
+    )
+    def post(self, request):
+        attributes = _valuation_attributes(request)
+        if attributes is None:
+            return Response({'error': True, 'message': 'brand and a known vehicle_type are required'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'error': False, 'data': valuation.as_data(valuation.estimate(attributes))})
+
+
+class TradeInView(ListAPIView):
+    serializer_class = TradeInRequestSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = OffsetPaginator
+
+    @swagger_auto_schema(operation_summary="List my trade-in requests", tags=["Trade-ins"])
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return TradeInRequest.objects.none()
+        return TradeInRequest.objects.select_related('vehicle', 'to').filter(customer__user=self.request.user).order_by('-date_created')
+
+    @swagger_auto_schema(
+        operation_summary="Offer a vehicle to a dealership as a trade-in",
+        operation_description=(
+            "estimated_value is the valuation model's estimate (empty until a model is trained) and asking_value the "
+            "customer's own figure. Neither is credited: an offer to the same dealership is credited appraised_value, "
+            "once the dealership has reviewed the trade-in."
+        ),
+        tags=["Trade-ins"],
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=['dealer', 'brand'],
+            properties={
+                'dealer': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_UUID),
+                'name': openapi.Schema(type=openapi.TYPE_STRING),
+                'color': openapi.Schema(type=openapi.TYPE_STRING),
+                'asking_value': openapi.Schema(type=openapi.TYPE_STRING, description='Your own figure, if any'),
+                'comments': openapi.Schema(type=openapi.TYPE_STRING),
+                **VALUATION_FIELDS,
+            },
+        ),
+    )
+    def post(self, request):
+        customer = Customer.objects.filter(user=request.user).first()
+        if customer is None:
+            return Response({'error': True, 'message': 'Only customers can request trade-ins'}, status=status.HTTP_403_FORBIDDEN)
+        attributes = _valuation_attributes(request)
+        if attributes is None:
+            return Response({'error': True, 'message': 'brand and a known vehicle_type are required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            dealer = Dealership.objects.filter(uuid=request.data.get('dealer')).first()
+        except DjangoValidationError:
+            dealer = None
+        if dealer is None:
+            return Response({'error': True, 'message': 'Dealership not found'}, status=status.HTTP_404_NOT_FOUND)
+        if not dealer.offers_trade_in:
+            return Response({'error': True, 'message': 'This dealership does not take trade-ins'}, status=status.HTTP_400_BAD_REQUEST)
+
+        asking_value = None
+        if request.data.get('asking_value') not in (None, ''):
+            asking_value = _offer_amount(request, 'asking_value')
+            if asking_value is None:
+                return Response({'error': True, 'message': 'asking_value must be a positive number'}, status=status.HTTP_400_BAD_REQUEST)
+        estimate = valuation.estimate(attributes)
+
+        model = valuation.KINDS[attributes['kind']]
+        specific = {'body_type': attributes['body_type'], 'drivetrain': attributes['drivetrain']} if attributes['kind'] == 'car' else {}
+        name = request.data.get('name') or ' '.join(filter(None, [attributes['brand'], attributes['model']]))
+        with db_transaction.atomic():
+            vehicle = model.objects.create(
+                name=name, brand=attributes['brand'], model=attributes['model'], color=request.data.get('color') or '',
+                condition=attributes['condition'] or 'used-foreign', fuel_system=attributes['fuel_system'],
+                transmission=attributes['transmission'], mileage=attributes['mileage'], **specific,
+            )
+            trade_in = TradeInRequest.objects.create(
+                customer=customer, to=dealer, vehicle=vehicle, estimated_value=estimate.value if estimate else None,
+                asking_value=asking_value, comments=str(request.data.get('comments', '')),
+            )
+        return Response(
+            {'error': False, 'data': TradeInRequestSerializer(trade_in).data, 'valuation': valuation.as_data(estimate)},
+            status=status.HTTP_201_CREATED,
+        )
+
+
 class BuyListingDetailView(RetrieveAPIView):
     serializer_class = ListingSerializer
     permission_classes = [IsAuthenticated,]
@@ -777,10 +1253,12 @@ class DealershipView(APIView):
 
     def get(self, request, uuid=None, slug=None):
         dealer = None
+        # stats carries the counts and rating aggregates in the same query
+        dealers = Dealership.objects.select_related('user', 'location', 'stats')
         if uuid:
-            dealer = Dealership.objects.get(uuid=uuid)
+            dealer = dealers.get(uuid=uuid)
         elif slug:
-            dealer = Dealership.objects.get(slug=slug)
+            dealer = dealers.get(slug=slug)
         else:
             raise Http404("Dealer not found")
         data = {
@@ -818,6 +1296,14 @@ class CheckoutView(APIView):
         # Calculate total
         total = listing_price + tax + inspection_fee + service_fee
         
+        # Preview coupons (?coupons=CODE1,CODE2) against the listing price
+        codes = parse_codes(request.query_params.get('coupons'))
+        pricing = None
+        if codes:
+            customer = getattr(request.user, 'customer_profile', None)
+            pricing = evaluate(codes, customer, listing, listing.price or 0)
+            total -= float(pricing.discount_total)
+        
         # Check inspection payment status for sale listings
         inspection_status = None
         if listing.listing_type == 'sale':
@@ -862,6 +1348,7 @@ class CheckoutView(APIView):
                 'service_fee': round(service_fee, 2),
             },
             'total': round(total, 2),
+            'coupons': pricing.as_dict() if pricing else None,
             'listing': ListingSerializer(listing, context={'request': request}).data,
             'inspection_status': inspection_status,
         }
@@ -905,10 +1392,16 @@ class CheckoutView(APIView):
                 
                 try:
                     verify_url = f'https://api.paystack.co/transaction/verify/{payment_reference}'
-                    response = requests.get(verify_url, headers=headers)
-                    response_data = response.json()
+                    try:
+                        response = requests.get(verify_url, headers=headers)
+                        response_data = response.json()
+                    except Exception:
+                        metrics.record_payment_verification('paystack', 'error')
+                        raise
+                    verified = bool(response_data.get('status') and response_data.get('data', {}).get('status') == 'success')
+                    metrics.record_payment_verification('paystack', 'verified' if verified else 'failed')
                     
-                    if response_data.get('status') and response_data.get('data', {}).get('status') == 'success':
+                    if verified:
                         # Payment verified, create or update inspection
                         amount = response_data['data']['amount'] / 100  # Convert from kobo
                         
@@ -1056,16 +1549,60 @@ class CheckoutView(APIView):
                 else:
                     logger.info(f"Paid inspection found: {paid_inspection.id}, proceeding with order creation")
         
-        order = Order(
-            payment_option=payment_option,
-            customer=customer,
-            order_type=listing.listing_type,
-            order_item=listing,
-            paid=True if payment_option == 'card' else False
-        )
-        order.save()
-        listing.vehicle.available = False
-        listing.vehicle.save()
+        codes = parse_codes(data.get('coupons') or data.get('coupon_code'))
+
+        def apply_coupons(order):
+            # runs inside the order's transaction: a coupon that cannot be
+            # redeemed undoes the order
+            if not codes:
+                return
+            pricing = evaluate(codes, customer, listing, order.sub_total)
+            if pricing.rejected:
+                raise CouponUnavailable(*pricing.rejected[0])
+            redeem(order, pricing, customer)
+
+        rent_from, rent_until = data.get('rent_from'), data.get('rent_until')
+        try:
+            if listing.listing_type == 'rental' and rent_from and rent_until:
+                # dated rentals block the calendar instead of the whole vehicle
+                try:
+                    start, end = date.fromisoformat(str(rent_from)), date.fromisoformat(str(rent_until))
+                    if start < date.today():
+                        raise ValueError('rent_from cannot be in the past')
+                    order = book_rental(
+                        listing, start, end,
+                        on_booked=apply_coupons,
+                        payment_option=payment_option,
+                        customer=customer,
+                        paid=True if payment_option == 'card' else False
+                    )
+                except ValueError as e:
+                    return Response({'error': True, 'message': f'Invalid rental dates: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+                except VehicleUnavailable as e:
+                    return Response({
+                        'error': True,
+                        'message': 'This vehicle is already booked for some of the selected dates',
+                        'conflicts': [{'start': block.start_date, 'end': block.end_date} for block in e.conflicts],
+                    }, status=status.HTTP_409_CONFLICT)
+            else:
+                with db_transaction.atomic():
+                    order = Order(
+                        payment_option=payment_option,
+                        customer=customer,
+                        order_type=listing.listing_type,
+                        order_item=listing,
+                        paid=True if payment_option == 'card' else False
+                    )
+                    order.save()
+                    apply_coupons(order)
+                    listing.vehicle.available = False
+                    listing.vehicle.save()
+        except CouponUnavailable as e:
+            return Response({
+                'error': True,
+                'message': str(e),
+                'data': {'code': e.code, 'reason': e.reason},
+            }, status=status.HTTP_400_BAD_REQUEST)
         customer.orders.add(order,)
         listing.vehicle.dealer.orders.add(order,)
         customer.save()
@@ -1092,9 +1629,9 @@ class CheckoutView(APIView):
                 'tax': str(Decimal('0.075') * order.sub_total) if order.sub_total else '0.00',
                 'shipping': '0.00',
                 'total': str(order.sub_total * Decimal('1.075')) if order.sub_total else '0.00',
-                'shipping_address': order.shipping_address or 'Not specified',
-                'billing_address': order.billing_address or 'Same as shipping',
-                'tracking_number': order.tracking_number or 'Not available yet',
+                'shipping_address': getattr(order, 'shipping_address', None) or 'Not specified',
+                'billing_address': getattr(order, 'billing_address', None) or 'Same as shipping',
+                'tracking_number': getattr(order, 'tracking_number', None) or 'Not available yet',
                 'tracking_link': f"{settings.FRONTEND_URL}/orders/{order.uuid}/tracking" if hasattr(settings, 'FRONTEND_URL') else '#',
                 'support_email': settings.DEFAULT_FROM_EMAIL,
                 'order_details_link': f"{settings.FRONTEND_URL}/orders/{order.uuid}" if hasattr(settings, 'FRONTEND_URL') else '#'
@@ -1106,7 +1643,9 @@ class CheckoutView(APIView):
             import logging
             logger = logging.getLogger(__name__)
             logger.error(f"Failed to send order confirmation email: {str(e)}", exc_info=True)
-        return Response({'error': False, 'message': 'Your order was created', 'data': OrderSerializer(order).data}, 200)
+        response_data = OrderSerializer(order).data
+        response_data['pricing'] = order.pricing.as_dict()
+        return Response({'error': False, 'message': 'Your order was created', 'data': response_data}, 200)
 
 
 class BookInspectionView(APIView):
@@ -1371,6 +1910,12 @@ class CompleteOrderView(APIView):
 
 
 
+# PDF libraries are only needed by the checkout document endpoints
+PyPDF2 = lazy_import('PyPDF2')
+canvas = lazy_import('reportlab.pdfgen.canvas')
+pagesizes = lazy_import('reportlab.lib.pagesizes')
+reportlab_utils = lazy_import('reportlab.lib.utils')
+
 LETTERHEAD_PATH = os.path.join(settings.BASE_DIR, 'static', 'veyu/letterhead.pdf')
 MEDIA_SIGNED_DIR = os.path.join(settings.MEDIA_ROOT, 'docs')
 
@@ -1445,7 +1990,7 @@ class CheckoutDocumentView(APIView):
 
     def build_document(self, text_lines: list) -> BytesIO:
         content = BytesIO()
-        pdf_canvas = canvas.Canvas(content, pagesize=letter)
+        pdf_canvas = canvas.Canvas(content, pagesize=pagesizes.letter)
         x_coord, y_coord = 65, 700
 
         for line in text_lines:
@@ -1459,12 +2004,12 @@ class CheckoutDocumentView(APIView):
 
     def build_signature_overlay(self, signature_data: str) -> BytesIO:
         overlay = BytesIO()
-        c = canvas.Canvas(overlay, pagesize=letter)
+        c = canvas.Canvas(overlay, pagesize=pagesizes.letter)
         if signature_data:
             sig_b64 = signature_data.split('data:image/png;base64,')[1]
             sig_img = base64.b64decode(sig_b64)
             sig_buf = BytesIO(sig_img)
-            sig_reader = ImageReader(sig_buf)
+            sig_reader = reportlab_utils.ImageReader(sig_buf)
             c.drawImage(sig_reader, 100, 200, width=200, height=100, mask='auto')
         c.showPage()
         c.save()
@@ -1472,9 +2017,9 @@ class CheckoutDocumentView(APIView):
         return overlay
 
     def append_signature(self, base_pdf_path: str, overlay_buf: BytesIO) -> BytesIO:
-        base_pdf = PdfReader(open(base_pdf_path, 'rb'))
-        overlay_pdf = PdfReader(overlay_buf)
-        writer = PdfWriter()
+        base_pdf = PyPDF2.PdfReader(open(base_pdf_path, 'rb'))
+        overlay_pdf = PyPDF2.PdfReader(overlay_buf)
+        writer = PyPDF2.PdfWriter()
 
         base_page = base_pdf.pages[0]
         overlay_page = overlay_pdf.pages[0]
@@ -0,0 +1,165 @@
+"""
+Rental availability calendar.
+
+Every period a vehicle cannot be rented (a rental, maintenance, a dealer
+hold) is an ``AvailabilityBlock`` covering ``[start_date, end_date)``.
+Bookings go through ``block_dates`` / ``book_rental``, which take the
+vehicle's row lock before checking for overlaps, so two checkouts for the
+same dates cannot both succeed. PostgreSQL additionally enforces this with
+an exclusion constraint; on SQLite (tests, local) the lock is the guard.
+
+A rental's blocks are released (deleted) when its order is deleted or saved
+with a status in ``RELEASED_STATUSES`` (see ``listings.signals``); code that
+moves orders there with ``QuerySet.update`` must call ``release`` itself.
+"""
+import calendar
+import random
+import time
+from datetime import date, timedelta
+
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from listings.models import AvailabilityBlock, RentalOrder, Vehicle
+
+MAX_RETRIES = 50
+# order statuses after which a rental no longer holds its dates
+RELEASED_STATUSES = ('cancelled', 'expired', 'refunded')
+
+
+class VehicleUnavailable(Exception):
+    """The requested dates overlap an existing block."""
+
+    def __init__(self, vehicle, start, end, conflicts=()):
+        self.vehicle = vehicle
+        self.start = start
+        self.end = end
+        self.conflicts = list(conflicts)
+        super().__init__(f"{vehicle} is not available from {start} to {end}")
+
+
+def overlapping(start, end, prefix=''):
+    """Lookup kwargs for blocks overlapping ``[start, end)``."""
+    return {f'{prefix}start_date__lt': end, f'{prefix}end_date__gt': start}
+
+
+def conflicts(vehicle, start, end):
+    return AvailabilityBlock.objects.filter(vehicle=vehicle, **overlapping(start, end))
+
+
+def is_available(vehicle, start, end):
+    return not conflicts(vehicle, start, end).exists()
+
+
+def available_between(queryset, start, end, vehicle_ref='vehicle'):
+    """
+    Restrict ``queryset`` to rows whose vehicle has no block overlapping
+    ``[start, end)``. Compiles to a NOT EXISTS anti-join.
+    """
+    blocked = AvailabilityBlock.objects.filter(vehicle=OuterRef(vehicle_ref), **overlapping(start, end))
+    return queryset.filter(~Exists(blocked))
+
+
+def _validate_range(start, end):
+    if not (isinstance(start, date) and isinstance(end, date)):
+        raise ValueError("start and end must be dates")
+    if end <= start:
+        raise ValueError("end must be after start")
+
+
+def _lock_and_check(vehicle, start, end):
+    # an UPDATE takes the vehicle's row lock on PostgreSQL and the write
+    # lock on SQLite (where SELECT ... FOR UPDATE is a no-op) before the
+    # overlap check, so concurrent bookings for one vehicle serialize here
+    Vehicle.objects.filter(pk=vehicle.pk).update(last_updated=timezone.now())
+    clash = list(conflicts(vehicle, start, end))
+    if clash:
+        raise VehicleUnavailable(vehicle, start, end, clash)
+
+
+def _atomic(func, vehicle, start, end):
+    """
+    Run ``func`` atomically, retrying lock timeouts when we own the
+    transaction. A violated exclusion constraint means another booking won.
+    """
+    attempts = 1 if connection.in_atomic_block else MAX_RETRIES
+    for attempt in range(attempts):
+        try:
+            with transaction.atomic():
+                return func()
+        except IntegrityError as e:
+            raise VehicleUnavailable(vehicle, start, end) from e
+        except OperationalError:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(random.uniform(0.001, 0.01) * (attempt + 1))
+
+
+def block_dates(vehicle, start, end, kind='rental', rental_order=None, note=''):
+    """Block ``[start, end)`` on ``vehicle``; raises ``VehicleUnavailable`` on overlap."""
+    _validate_range(start, end)
+
+    def _block():
+        _lock_and_check(vehicle, start, end)
+        return AvailabilityBlock.objects.create(
+            vehicle=vehicle, kind=kind, start_date=start, end_date=end,
+            rental_order=rental_order, note=note,
+        )
+
+    return _atomic(_block, vehicle, start, end)
+
+
+def book_rental(listing, start, end, on_booked=None, **order_fields):
+    """
+    Create a ``RentalOrder`` for ``listing`` from ``start`` until the return
+    day ``end`` and block those dates, or raise ``VehicleUnavailable``.
+    ``on_booked(order)`` runs in the same transaction, so whatever it raises
+    undoes the booking too.
+    """
+    _validate_range(start, end)
+    vehicle = listing.vehicle
+
+    def _book():
+        _lock_and_check(vehicle, start, end)
+        order = RentalOrder.objects.create(
+            order_type='rental', order_item=listing, rent_from=start, rent_until=end, **order_fields
+        )
+        AvailabilityBlock.objects.create(
+            vehicle=vehicle, kind='rental', start_date=start, end_date=end, rental_order=order,
+        )
+        if on_booked is not None:
+            on_booked(order)
+        return order
+
+    return _atomic(_book, vehicle, start, end)
+
+
+def release(order_id):
+    """Free the dates held by a rental order. Returns the number of blocks removed."""
+    return AvailabilityBlock.objects.filter(rental_order_id=order_id).delete()[0]
+
+
+def month_grid(vehicle, year, month, today=None):
+    """
+    Day-by-day availability for one month:
+    ``[{'date': 'YYYY-MM-DD', 'available': bool, 'reason': None | kind | 'past'}, ...]``.
+    """
+    first = date(year, month, 1)
+    after = first + timedelta(days=calendar.monthrange(year, month)[1])
+    today = today or timezone.localdate()
+
+    reasons = {}
+    for start, end, kind in conflicts(vehicle, first, after).values_list('start_date', 'end_date', 'kind'):
+        day = max(start, first)
+        while day < min(end, after):
+            reasons.setdefault(day, kind)
+            day += timedelta(days=1)
+
+    grid = []
+    day = first
+    while day < after:
+        reason = 'past' if day < today else reasons.get(day)
+        grid.append({'date': day.isoformat(), 'available': reason is None, 'reason': reason})
+        day += timedelta(days=1)
+    return grid
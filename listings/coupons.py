@@ -0,0 +1,354 @@
+"""
+Coupon rules, pricing and redemption.
+
+A coupon's rules live on the ``Coupon`` row: when it is valid (``is_active``,
+``starts``, ``expires``), for whom (``users``, and ``valid_in`` for dealership
+coupons), for what (``listing_types``, ``min_order_value``), how often
+(``max_redemptions`` overall, ``max_redemptions_per_user``) and how it
+combines with others (``priority``, ``stackable``).
+
+    lookup(code)        the coupon's rules as a ``CouponRule``, cached by code
+    evaluate(...)       eligibility for a customer and listing, then ``price``
+    price(...)          pure: the itemized discounts for a set of rules
+    redeem(...)         records the discounts against an order, atomically
+
+``redeem`` claims each coupon with a conditional UPDATE on its row, which
+also takes the row lock, so concurrent checkouts can never push a coupon
+past its limits. Under that lock it checks again, from the database, who
+the coupon is for and what it applies to; the cached rules are only ever
+a preview.
+"""
+import random
+import time
+from dataclasses import dataclass
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import OperationalError, connection, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from listings.models import Coupon, CouponRedemption
+
+CENT = Decimal('0.01')
+MAX_RETRIES = 50
+_MISSING = 'missing'
+
+REASONS = {
+    'not_found': 'This coupon code does not exist',
+    'duplicate': 'This coupon was already applied',
+    'inactive': 'This coupon is no longer active',
+    'not_started': 'This coupon is not valid yet',
+    'expired': 'This coupon has expired',
+    'not_for_user': 'This coupon is not available to you',
+    'not_for_dealership': 'This coupon is not valid for this dealership',
+    'listing_type': 'This coupon does not apply to this type of listing',
+    'min_order_value': 'The order is below the minimum value for this coupon',
+    'exhausted': 'This coupon has been fully redeemed',
+    'user_limit': 'You have already used this coupon the maximum number of times',
+    'not_stackable': 'This coupon cannot be combined with the other coupons',
+}
+
+
+class CouponUnavailable(Exception):
+    """A coupon could not be applied; ``reason`` is a key of ``REASONS``."""
+
+    def __init__(self, code, reason):
+        self.code = code
+        self.reason = reason
+        super().__init__(f"{code}: {REASONS[reason]}")
+
+
+def to_money(amount):
+    return Decimal(str(amount)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+@dataclass(frozen=True)
+class CouponRule:
+    id: int
+    code: str
+    discount_type: str
+    discount_value: Decimal
+    priority: int = 100
+    stackable: bool = False
+    listing_types: tuple = ()
+    min_order_value: Decimal = None
+    max_discount: Decimal = None
+    # eligibility, checked by ``eligibility_error``
+    issuer: str = 'veyu'
+    is_active: bool = True
+    starts: object = None
+    expires: object = None
+    user_ids: frozenset = frozenset()
+    dealer_ids: frozenset = frozenset()
+    max_redemptions: int = None
+    max_redemptions_per_user: int = None
+    redemption_count: int = 0
+
+    @classmethod
+    def from_coupon(cls, coupon, user_ids=(), dealer_ids=()):
+        return cls(
+            id=coupon.pk,
+            code=coupon.code,
+            discount_type=coupon.discount_type,
+            discount_value=Decimal(coupon.discount_value),
+            priority=coupon.priority,
+            stackable=coupon.stackable,
+            listing_types=tuple(coupon.listing_types or ()),
+            min_order_value=coupon.min_order_value,
+            max_discount=coupon.max_discount,
+            issuer=coupon.issuer,
+            is_active=coupon.is_active,
+            starts=coupon.starts,
+            expires=coupon.expires,
+            user_ids=frozenset(user_ids),
+            dealer_ids=frozenset(dealer_ids),
+            max_redemptions=coupon.max_redemptions,
+            max_redemptions_per_user=coupon.max_redemptions_per_user,
+            redemption_count=coupon.redemption_count,
+        )
+
+    def discount_on(self, amount):
+        """The discount on ``amount``, rounded to the kobo and never more than ``amount``."""
+        if self.discount_type == 'percentage':
+            discount = amount * self.discount_value / 100
+            if self.max_discount is not None:
+                discount = min(discount, self.max_discount)
+        else:
+            discount = self.discount_value
+        return min(to_money(discount), amount)
+
+    def pricing_error(self, subtotal, listing_type):
+        if self.listing_types and listing_type not in self.listing_types:
+            return 'listing_type'
+        if self.min_order_value is not None and subtotal < self.min_order_value:
+            return 'min_order_value'
+        return None
+
+    def audience_error(self, customer_id=None, dealer_id=None):
+        if self.user_ids and customer_id not in self.user_ids:
+            return 'not_for_user'
+        if self.issuer != 'veyu' and dealer_id not in self.dealer_ids:
+            return 'not_for_dealership'
+        return None
+
+    def eligibility_error(self, customer_id=None, dealer_id=None, used=0, now=None):
+        now = now or timezone.now()
+        if not self.is_active:
+            return 'inactive'
+        if self.starts and now < self.starts:
+            return 'not_started'
+        if self.expires and now > self.expires:
+            return 'expired'
+        reason = self.audience_error(customer_id, dealer_id)
+        if reason:
+            return reason
+        if self.max_redemptions is not None and self.redemption_count >= self.max_redemptions:
+            return 'exhausted'
+        if self.max_redemptions_per_user is not None and used >= self.max_redemptions_per_user:
+            return 'user_limit'
+        return None
+
+
+@dataclass(frozen=True)
+class Discount:
+    rule: CouponRule
+    amount: Decimal
+
+    def as_dict(self):
+        return {
+            'code': self.rule.code,
+            'discount_type': self.rule.discount_type,
+            'discount_value': self.rule.discount_value,
+            'amount': self.amount,
+        }
+
+
+@dataclass(frozen=True)
+class Pricing:
+    subtotal: Decimal
+    lines: tuple = ()
+    # (code, reason) for every coupon that was not applied
+    rejected: tuple = ()
+
+    @property
+    def discount_total(self):
+        return sum((line.amount for line in self.lines), Decimal('0.00'))
+
+    @property
+    def total(self):
+        return self.subtotal - self.discount_total
+
+    def as_dict(self):
+        return {
+            'subtotal': self.subtotal,
+            'discounts': [line.as_dict() for line in self.lines],
+            'discount_total': self.discount_total,
+            'total': self.total,
+            'rejected': [{'code': code, 'reason': reason, 'message': REASONS[reason]} for code, reason in self.rejected],
+        }
+
+
+def price(subtotal, rules, listing_type=None, rejected=()):
+    """
+    Apply ``rules`` to ``subtotal``. Coupons apply in priority order, each to
+    what the ones before it left; a coupon that is not stackable is only
+    applied on its own. Every discount is rounded half up to the kobo.
+    Touches no database.
+    """
+    subtotal = to_money(subtotal)
+    remaining, lines, rejected, seen = subtotal, [], list(rejected), set()
+    for rule in sorted(rules, key=lambda rule: (rule.priority, rule.code or '')):
+        reason = 'duplicate' if rule.id in seen else rule.pricing_error(subtotal, listing_type)
+        if reason is None and lines and not (rule.stackable and all(line.rule.stackable for line in lines)):
+            reason = 'not_stackable'
+        seen.add(rule.id)
+        if reason:
+            rejected.append((rule.code, reason))
+            continue
+        amount = rule.discount_on(remaining)
+        lines.append(Discount(rule, amount))
+        remaining -= amount
+    return Pricing(subtotal, tuple(lines), tuple(rejected))
+
+
+# lookups
+
+def cache_key(code):
+    return f'coupon:{code}'
+
+
+def _load(coupon):
+    return CouponRule.from_coupon(
+        coupon,
+        user_ids=coupon.users.values_list('pk', flat=True),
+        dealer_ids=coupon.valid_in.values_list('pk', flat=True),
+    )
+
+
+def lookup(code):
+    """The ``CouponRule`` for ``code`` or None, cached for ``COUPON_CACHE_TIMEOUT`` seconds."""
+    key = cache_key(code)
+    rule = cache.get(key)
+    if rule is None:
+        coupon = Coupon.objects.filter(code=code).first()
+        rule = _MISSING if coupon is None else _load(coupon)
+        cache.set(key, rule, getattr(settings, 'COUPON_CACHE_TIMEOUT', 300))
+    return None if rule == _MISSING else rule
+
+
+def forget(code):
+    if code:
+        cache.delete(cache_key(code))
+
+
+def parse_codes(value):
+    """Coupon codes from a list or a comma separated string."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    return [str(code).strip() for code in value if str(code).strip()]
+
+
+def evaluate(codes, customer, listing, subtotal, now=None):
+    """Price ``subtotal`` for ``customer`` buying ``listing`` with the coupon ``codes``."""
+    rules, rejected = [], []
+    for code in codes:
+        rule = lookup(code)
+        if rule is None:
+            rejected.append((code, 'not_found'))
+        else:
+            rules.append(rule)
+
+    used = {}
+    if customer is not None and any(rule.max_redemptions_per_user is not None for rule in rules):
+        used = dict(
+            CouponRedemption.objects.filter(customer=customer, coupon_id__in=[rule.id for rule in rules])
+            .values('coupon_id').annotate(count=Count('id')).values_list('coupon_id', 'count')
+        )
+
+    eligible = []
+    customer_id = customer.pk if customer is not None else None
+    dealer_id = listing.vehicle.dealer_id if listing is not None else None
+    for rule in rules:
+        reason = rule.eligibility_error(customer_id, dealer_id, used.get(rule.id, 0), now)
+        if reason:
+            rejected.append((rule.code, reason))
+        else:
+            eligible.append(rule)
+    return price(subtotal, eligible, listing.listing_type if listing is not None else None, rejected)
+
+
+# redemption
+
+def _atomic(func):
+    """Run ``func`` atomically, retrying lock timeouts when we own the transaction."""
+    attempts = 1 if connection.in_atomic_block else MAX_RETRIES
+    for attempt in range(attempts):
+        try:
+            with transaction.atomic():
+                return func()
+        except OperationalError:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(random.uniform(0.001, 0.01) * (attempt + 1))
+
+
+def _unavailable_reason(coupon_id, now):
+    coupon = Coupon.objects.filter(pk=coupon_id).first()
+    if coupon is None:
+        return 'not_found'
+    if not coupon.is_active:
+        return 'inactive'
+    if coupon.starts and now < coupon.starts:
+        return 'not_started'
+    if coupon.expires and now > coupon.expires:
+        return 'expired'
+    return 'exhausted'
+
+
+def redeem(order, pricing, customer, now=None):
+    """
+    Record ``pricing``'s discounts against ``order`` and return the
+    ``CouponRedemption`` rows, or raise ``CouponUnavailable`` (and record
+    nothing) when a coupon ran out or was withdrawn in the meantime.
+    """
+    now = now or timezone.now()
+    listing = order.order_item
+    dealer_id = listing.vehicle.dealer_id if listing is not None else None
+    listing_type = listing.listing_type if listing is not None else None
+
+    def _redeem():
+        redemptions = []
+        for line in pricing.lines:
+            rule = line.rule
+            claimed = Coupon.objects.filter(
+                Q(starts__isnull=True) | Q(starts__lte=now),
+                Q(expires__isnull=True) | Q(expires__gte=now),
+                Q(max_redemptions__isnull=True) | Q(redemption_count__lt=F('max_redemptions')),
+                pk=rule.id, is_active=True,
+            ).update(redemption_count=F('redemption_count') + 1)
+            if not claimed:
+                raise CouponUnavailable(rule.code, _unavailable_reason(rule.id, now))
+            # the cached rule may predate a change to who or what the coupon is for
+            current = _load(Coupon.objects.get(pk=rule.id))
+            reason = current.audience_error(customer.pk, dealer_id) or current.pricing_error(pricing.subtotal, listing_type)
+            if reason:
+                raise CouponUnavailable(rule.code, reason)
+            # the UPDATE holds the coupon's row lock, so this count cannot race
+            limit = rule.max_redemptions_per_user
+            if limit is not None and CouponRedemption.objects.filter(coupon_id=rule.id, customer=customer).count() >= limit:
+                raise CouponUnavailable(rule.code, 'user_limit')
+            redemptions.append(CouponRedemption(coupon_id=rule.id, customer=customer, order=order, amount=line.amount))
+        CouponRedemption.objects.bulk_create(redemptions)
+        order.applied_coupons.add(*[line.rule.id for line in pricing.lines])
+        return redemptions
+
+    redemptions = _atomic(_redeem)
+    for line in pricing.lines:
+        if line.rule.max_redemptions is not None:
+            # the cached redemption count is only a preview, but keep it close
+            transaction.on_commit(lambda code=line.rule.code: forget(code))
+    return redemptions
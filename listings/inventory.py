@@ -0,0 +1,713 @@
+"""
+Bulk inventory import and export for dealerships.
+
+A file is one row per vehicle listing, as CSV (header row, list values
+separated by ``|``) or JSON Lines (one object per line, lists as arrays).
+``COLUMNS`` lists every column: the shared vehicle and listing fields, then
+the fields of each vehicle type (``vehicle_type`` picks Car, Boat, Plane,
+Bike or UAV; a column that does not belong to the row's type must be empty).
+
+Rows are matched to the dealer's existing vehicles by VIN (cars) or SKU,
+so importing the same file twice updates rather than duplicates. A row
+without either always creates a vehicle. An empty cell means "use the
+default" for a new vehicle and "leave unchanged" for an existing one. Rows
+without a ``listing_type`` only touch the vehicle; otherwise the vehicle's
+listing of that type is created or updated.
+
+Every row is validated with the model fields' own ``clean()`` and failures
+are reported per line and field. Valid rows are written ``chunk_size`` at a
+time with ``bulk_create``/``bulk_update``, each chunk inside its own
+savepoint: a chunk that fails in the database is rolled back and reported
+without losing the chunks around it.
+
+``image_urls`` are queued as ``VehicleImageImport`` rows and fetched in a
+background thread after the import commits (or by
+``manage.py fetch_vehicle_images``). ``export_rows`` emits the dealer's
+inventory in the same format, so an export can be edited and re-imported.
+"""
+import csv
+import io
+import ipaddress
+import json
+import logging
+import mimetypes
+import os
+import socket
+import threading
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from accounts.models import Dealership
+from listings.models import (
+    UAV,
+    Bike,
+    Boat,
+    Car,
+    Listing,
+    Plane,
+    Vehicle,
+    VehicleImage,
+    VehicleImageImport,
+)
+from utils.database_utils import bulk_create_inherited
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('csv', 'jsonl')
+DEFAULT_CHUNK_SIZE = 500
+# bulk_update() writes one CASE per field; small batches keep those cheap
+UPDATE_BATCH_SIZE = 100
+LIST_SEPARATOR = '|'
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+MAX_FETCH_ATTEMPTS = 3
+MAX_IMAGE_REDIRECTS = 3
+FETCH_CLAIM_TIMEOUT = timedelta(minutes=10)
+
+VEHICLE_TYPES = {'car': Car, 'boat': Boat, 'plane': Plane, 'bike': Bike, 'uav': UAV}
+TYPE_ALIASES = {'drone': 'uav'}
+
+# column -> model field, for the fields every vehicle type shares
+VEHICLE_COLUMNS = {
+    'sku': 'sku',
+    'title': 'name',
+    'brand': 'brand',
+    'model': 'model',
+    'condition': 'condition',
+    'transmission': 'transmission',
+    'fuel_system': 'fuel_system',
+    'color': 'color',
+    'mileage': 'mileage',
+    'available': 'available',
+    'custom_duty': 'custom_duty',
+    'features': 'features',
+    'tags': 'tags',
+}
+LISTING_COLUMNS = ['listing_type', 'price', 'currency', 'payment_cycle', 'notes']
+LIST_COLUMNS = {'features', 'tags', 'image_urls'}
+REQUIRED_COLUMNS = ['title', 'brand', 'model']
+
+
+def _type_fields(model):
+    return [f.name for f in model._meta.local_concrete_fields if not f.primary_key and not f.is_relation]
+
+
+TYPE_COLUMNS = {vehicle_type: _type_fields(model) for vehicle_type, model in VEHICLE_TYPES.items()}
+_type_specific = [column for columns in TYPE_COLUMNS.values() for column in columns if column != 'vin']
+
+COLUMNS = (
+    ['vehicle_type', 'sku', 'vin']
+    + [column for column in VEHICLE_COLUMNS if column != 'sku']
+    + LISTING_COLUMNS
+    + ['image_urls']
+    + list(dict.fromkeys(_type_specific))
+)
+
+
+class InventoryError(ValueError):
+    """The upload as a whole cannot be read (format, encoding, header)."""
+
+
+class ImportReport:
+    """Counts and per-line errors for one import; ``as_dict()`` is the API payload."""
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.listings_created = 0
+        self.listings_updated = 0
+        self.images_queued = 0
+        self.failed_lines = set()
+        self.errors = []
+        self.new_listings = []
+
+    def error(self, line, field, message):
+        self.failed_lines.add(line)
+        self.errors.append({'line': line, 'field': field, 'message': message})
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'listings_created': self.listings_created,
+            'listings_updated': self.listings_updated,
+            'images_queued': self.images_queued,
+            'failed': len(self.failed_lines),
+            'errors': sorted(self.errors, key=lambda error: error['line']),
+        }
+
+
+class _Row:
+    __slots__ = ('line', 'model', 'key', 'vehicle', 'listing', 'image_urls', 'instance')
+
+    def __init__(self, line, model, key, vehicle, listing, image_urls):
+        self.line = line
+        self.model = model
+        self.key = key
+        self.vehicle = vehicle
+        self.listing = listing
+        self.image_urls = image_urls
+        self.instance = None
+
+
+# reading
+
+def detect_format(name, requested=None):
+    if requested:
+        if requested not in FORMATS:
+            raise InventoryError(f"Unknown format '{requested}'. Choose from: {', '.join(FORMATS)}")
+        return requested
+    extension = os.path.splitext(name or '')[1].lower()
+    if extension in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if extension == '.csv':
+        return 'csv'
+    raise InventoryError("Cannot tell the file format; name it .csv or .jsonl or pass file_format")
+
+
+def read_rows(fileobj, file_format):
+    """Yield ``(line, row_dict)``; unparseable JSON lines yield ``(line, None)``."""
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    try:
+        if file_format == 'csv':
+            reader = csv.DictReader(text)
+            if not reader.fieldnames:
+                raise InventoryError("The CSV file is empty")
+            unknown = [name for name in reader.fieldnames if name and name not in COLUMNS]
+            if unknown:
+                raise InventoryError(f"Unknown columns: {', '.join(unknown)}")
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line, raw in enumerate(text, start=1):
+                if not raw.strip():
+                    continue
+                try:
+                    row = json.loads(raw)
+                except ValueError:
+                    row = None
+                yield line, row if isinstance(row, dict) else None
+    except UnicodeDecodeError:
+        raise InventoryError("The file must be UTF-8 encoded")
+    finally:
+        text.detach()
+
+
+# validation
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip()) or value == []
+
+
+def _as_list(value):
+    if isinstance(value, list):
+        return [str(item).strip() for item in value if str(item).strip()]
+    return [item.strip() for item in str(value).split(LIST_SEPARATOR) if item.strip()]
+
+
+def _choice(field, value):
+    # accept the stored value or its label, in any case ("Automatic" -> "auto")
+    wanted = str(value).strip().lower()
+    for choice, label in field.flatchoices:
+        if wanted in (str(choice).lower(), str(label).lower()):
+            return choice
+    return value
+
+
+def _clean(model, name, value):
+    field = model._meta.get_field(name)
+    if name in ('features', 'tags'):
+        return _as_list(value)
+    if isinstance(value, str):
+        value = value.strip()
+        if field.get_internal_type() == 'BooleanField':
+            value = {'yes': True, 'y': True, 'no': False, 'n': False}.get(value.lower(), value)
+    if field.choices:
+        value = _choice(field, value)
+    return field.clean(value, None)
+
+
+def _messages(error):
+    return '; '.join(error.messages) if isinstance(error, ValidationError) else str(error)
+
+
+def validate_row(line, row, report):
+    """Return a ``_Row`` for a valid row, or None after recording its errors."""
+    if row is None:
+        report.error(line, None, "Not a JSON object")
+        return None
+    before = len(report.errors)
+    row = {key: value for key, value in row.items() if key is not None}
+    unknown = [key for key in row if key not in COLUMNS]
+    for key in unknown:
+        report.error(line, key, "Unknown column")
+
+    vehicle_type = str(row.get('vehicle_type') or 'car').strip().lower()
+    vehicle_type = TYPE_ALIASES.get(vehicle_type, vehicle_type)
+    model = VEHICLE_TYPES.get(vehicle_type)
+    if model is None:
+        report.error(line, 'vehicle_type', f"Must be one of: {', '.join(VEHICLE_TYPES)}")
+        return None
+
+    vehicle = {}
+    for column, field in VEHICLE_COLUMNS.items():
+        if not _blank(row.get(column)):
+            try:
+                vehicle[field] = _clean(Vehicle, field, row[column])
+            except ValidationError as e:
+                report.error(line, column, _messages(e))
+    for column in dict.fromkeys(_type_specific + ['vin']):
+        if _blank(row.get(column)):
+            continue
+        if column not in TYPE_COLUMNS[vehicle_type]:
+            report.error(line, column, f"Not a {vehicle_type} field")
+            continue
+        try:
+            vehicle[column] = _clean(model, column, row[column])
+        except ValidationError as e:
+            report.error(line, column, _messages(e))
+
+    listing = None
+    if not _blank(row.get('listing_type')):
+        listing = {}
+        for column in LISTING_COLUMNS:
+            if not _blank(row.get(column)):
+                try:
+                    listing[column] = _clean(Listing, column, row[column])
+                except ValidationError as e:
+                    report.error(line, column, _messages(e))
+        if 'price' not in listing:
+            report.error(line, 'price', "Required for a listing")
+        if listing.get('listing_type') == 'rental' and 'payment_cycle' not in listing:
+            report.error(line, 'payment_cycle', "Required for rental listings")
+
+    image_urls = _as_list(row['image_urls']) if not _blank(row.get('image_urls')) else []
+    url_field = VehicleImageImport._meta.get_field('url')
+    for url in image_urls:
+        try:
+            url_field.clean(url, None)
+        except ValidationError as e:
+            report.error(line, 'image_urls', f"{url}: {_messages(e)}")
+
+    if vehicle.get('vin'):
+        vehicle['vin'] = vehicle['vin'].upper()
+    key = ('vin', vehicle['vin']) if vehicle.get('vin') else (('sku', vehicle['sku']) if vehicle.get('sku') else None)
+    if len(report.errors) > before:
+        return None
+    return _Row(line, model, key, vehicle, listing, image_urls)
+
+
+# writing
+
+def _existing(dealer, rows):
+    """{key: vehicle subclass instance} for the rows' VINs and SKUs."""
+    vins = [row.key[1] for row in rows if row.key and row.key[0] == 'vin']
+    skus = [row.key[1] for row in rows if row.key and row.key[0] == 'sku']
+    found = {}
+    if vins:
+        for car in Car.objects.filter(dealer=dealer, vin__in=vins):
+            found[('vin', car.vin)] = car
+    if skus:
+        children = list(VEHICLE_TYPES)
+        for vehicle in Vehicle.objects.filter(dealer=dealer, sku__in=skus).select_related(*children):
+            found[('sku', vehicle.sku)] = next(
+                (getattr(vehicle, child) for child in children if hasattr(vehicle, child)), vehicle
+            )
+    return found
+
+
+def _slug(name):
+    # the same slug Vehicle.save() derives, which bulk_create skips
+    return name.replace(' ', '-').replace('.', '').replace("'", '').lower().strip()
+
+
+def _assign(obj, values):
+    """Set ``values`` on ``obj`` and return the names of the fields that changed."""
+    changed = [field for field, value in values.items() if getattr(obj, field) != value]
+    for field in changed:
+        setattr(obj, field, values[field])
+    return changed
+
+
+def _prepare_vehicles(dealer, rows, report, now):
+    existing = _existing(dealer, rows)
+    creates, updates, update_fields = defaultdict(list), defaultdict(list), defaultdict(set)
+    ready, unchanged = [], 0
+    for row in rows:
+        vehicle = existing.get(row.key) if row.key else None
+        if vehicle is not None and type(vehicle) is not row.model:
+            report.error(row.line, row.key[0], f"Matches an existing {type(vehicle).__name__.lower()}")
+            continue
+        if vehicle is None:
+            missing = [column for column in REQUIRED_COLUMNS if VEHICLE_COLUMNS[column] not in row.vehicle]
+            if missing:
+                for column in missing:
+                    report.error(row.line, column, "Required for a new vehicle")
+                continue
+            vehicle = row.model(dealer=dealer, **{'color': '', **row.vehicle})
+            vehicle.slug = _slug(vehicle.name)
+            creates[row.model].append(vehicle)
+        else:
+            values = dict(row.vehicle)
+            if row.listing:
+                values['for_sale' if row.listing['listing_type'] == 'sale' else 'for_rent'] = True
+            changed = _assign(vehicle, values)
+            # re-importing an unchanged row costs no write
+            if changed:
+                vehicle.last_updated = now
+                update_fields[row.model].update(changed)
+                updates[row.model].append(vehicle)
+            else:
+                unchanged += 1
+        if vehicle.pk is None and row.listing:
+            setattr(vehicle, 'for_sale' if row.listing['listing_type'] == 'sale' else 'for_rent', True)
+        row.instance = vehicle
+        ready.append(row)
+    return ready, creates, updates, update_fields, unchanged
+
+
+def _write_listings(dealer, rows, now):
+    rows = [row for row in rows if row.listing]
+    existing = {}
+    listings = Listing.objects.filter(
+        vehicle_id__in={row.instance.pk for row in rows},
+        listing_type__in={row.listing['listing_type'] for row in rows},
+    ).order_by('-pk')
+    for listing in listings:
+        existing[(listing.vehicle_id, listing.listing_type)] = listing
+
+    creates, updates, fields = [], [], {'last_updated'}
+    for row in rows:
+        values = {**row.listing, 'title': row.instance.name}
+        listing = existing.get((row.instance.pk, values['listing_type']))
+        if listing is None:
+            listing = Listing(vehicle_id=row.instance.pk, created_by_id=dealer.user_id, **values)
+            existing[(row.instance.pk, values['listing_type'])] = listing
+            creates.append(listing)
+        elif listing.pk is not None:
+            changed = _assign(listing, values)
+            if changed:
+                listing.last_updated = now
+                fields.update(changed)
+                updates.append(listing)
+    Listing.objects.bulk_create(creates)
+    if updates:
+        Listing.objects.bulk_update(updates, sorted(fields), batch_size=UPDATE_BATCH_SIZE)
+    return creates, updates
+
+
+def _write_chunk(dealer, rows, report, dry_run=False):
+    now = timezone.now()
+    ready, creates, updates, update_fields, unchanged = _prepare_vehicles(dealer, rows, report, now)
+    if not ready:
+        return
+    if dry_run:
+        report.created += sum(len(objs) for objs in creates.values())
+        report.updated += sum(len(objs) for objs in updates.values())
+        report.unchanged += unchanged
+        return
+    try:
+        with transaction.atomic():
+            for model, objs in creates.items():
+                bulk_create_inherited(model, objs, len(objs))
+            for model, objs in updates.items():
+                model.objects.bulk_update(objs, sorted(update_fields[model] | {'last_updated'}), batch_size=UPDATE_BATCH_SIZE)
+            new_listings, updated_listings = _write_listings(dealer, ready, now)
+
+            Dealership.vehicles.through.objects.bulk_create([
+                Dealership.vehicles.through(dealership_id=dealer.pk, vehicle_id=vehicle.pk)
+                for objs in creates.values() for vehicle in objs
+            ], ignore_conflicts=True)
+            Dealership.listings.through.objects.bulk_create([
+                Dealership.listings.through(dealership_id=dealer.pk, listing_id=listing.pk)
+                for listing in new_listings
+            ], ignore_conflicts=True)
+            # the conflict check is only there for concurrent imports; known
+            # URLs are skipped up front so the report counts what was queued
+            known = set(VehicleImageImport.objects.filter(
+                vehicle_id__in=[row.instance.pk for row in ready if row.image_urls],
+            ).values_list('vehicle_id', 'url'))
+            queued = VehicleImageImport.objects.bulk_create([
+                VehicleImageImport(vehicle_id=row.instance.pk, url=url)
+                for row in ready for url in dict.fromkeys(row.image_urls)
+                if (row.instance.pk, url) not in known
+            ], ignore_conflicts=True)
+    except DatabaseError as e:
+        logger.warning(f"Inventory import chunk for dealer {dealer.pk} rolled back: {e}")
+        for row in ready:
+            report.error(row.line, None, f"Not saved: {e}")
+        return
+
+    report.created += sum(len(objs) for objs in creates.values())
+    report.updated += sum(len(objs) for objs in updates.values())
+    report.unchanged += unchanged
+    report.listings_created += len(new_listings)
+    report.listings_updated += len(updated_listings)
+    report.images_queued += len(queued)
+    report.new_listings.extend(new_listings)
+
+
+def import_inventory(dealer, rows, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False):
+    """
+    Validate and upsert ``rows`` (``(line, dict)`` pairs, see ``read_rows``)
+    into ``dealer``'s inventory. Returns an ``ImportReport``; with
+    ``dry_run`` rows are validated and matched but nothing is written.
+    """
+    report = ImportReport()
+    seen = {}
+    chunk = []
+
+    def flush():
+        if chunk:
+            _write_chunk(dealer, chunk, report, dry_run)
+        chunk.clear()
+
+    with transaction.atomic():
+        for line, row in rows:
+            report.rows += 1
+            parsed = validate_row(line, row, report)
+            if parsed is None:
+                continue
+            if parsed.key is not None:
+                if parsed.key in seen:
+                    report.error(line, parsed.key[0], f"Duplicates line {seen[parsed.key]}")
+                    continue
+                seen[parsed.key] = line
+            chunk.append(parsed)
+            if len(chunk) >= chunk_size:
+                flush()
+        flush()
+
+        if dry_run:
+            return report
+        if report.created or report.updated:
+            from accounts.dealer_stats import refresh_stats_on_commit
+            refresh_stats_on_commit(dealer.pk, 'listings')
+        if report.images_queued:
+            transaction.on_commit(start_image_fetch)
+    return report
+
+
+# export
+
+def _cell(value, file_format):
+    if isinstance(value, list):
+        return value if file_format == 'jsonl' else LIST_SEPARATOR.join(value)
+    if isinstance(value, Decimal):
+        return str(value)
+    if value is None:
+        return None if file_format == 'jsonl' else ''
+    return value
+
+
+def export_rows(dealer, file_format='csv', chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield the dealer's inventory as ``COLUMNS``-keyed dicts, one per listing."""
+    for vehicle_type, model in VEHICLE_TYPES.items():
+        fields = list(VEHICLE_COLUMNS.values()) + TYPE_COLUMNS[vehicle_type]
+        columns = {field: column for column, field in VEHICLE_COLUMNS.items()}
+        queryset = model.objects.filter(dealer=dealer).order_by('pk').values('pk', *fields)
+        last = 0
+        while True:
+            vehicles = list(queryset.filter(pk__gt=last)[:chunk_size])
+            if not vehicles:
+                break
+            last = vehicles[-1]['pk']
+            ids = [vehicle['pk'] for vehicle in vehicles]
+            listings = defaultdict(list)
+            for listing in Listing.objects.filter(vehicle_id__in=ids).order_by('pk').values('vehicle_id', *LISTING_COLUMNS):
+                listings[listing.pop('vehicle_id')].append(listing)
+            images = defaultdict(list)
+            for vehicle_id, url in VehicleImageImport.objects.filter(vehicle_id__in=ids).order_by('pk').values_list('vehicle_id', 'url'):
+                images[vehicle_id].append(url)
+
+            for vehicle in vehicles:
+                base = {column: None for column in COLUMNS}
+                base['vehicle_type'] = vehicle_type
+                for field in fields:
+                    base[columns.get(field, field)] = vehicle[field]
+                base['image_urls'] = images.get(vehicle['pk'], [])
+                for listing in listings.get(vehicle['pk']) or [{}]:
+                    row = {**base, **listing}
+                    yield {column: _cell(row[column], file_format) for column in COLUMNS}
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def stream_export(dealer, file_format='csv'):
+    """Yield the export as text lines, for a ``StreamingHttpResponse``."""
+    if file_format == 'csv':
+        writer = csv.DictWriter(_Echo(), fieldnames=COLUMNS)
+        yield writer.writeheader()
+        for row in export_rows(dealer, 'csv'):
+            yield writer.writerow(row)
+    else:
+        for row in export_rows(dealer, 'jsonl'):
+            yield json.dumps(row) + '\n'
+
+
+# image fetching
+
+def _public_address(url):
+    """
+    Return the address to connect to for ``url``, raising ValueError unless
+    it is http(s) and its host resolves only to globally routable addresses;
+    dealer supplied URLs must not reach internal services, carrier-grade NAT
+    or cloud metadata endpoints.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ValueError("Image URL must be http or https")
+    try:
+        addresses = socket.getaddrinfo(parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80))
+    except (socket.gaierror, UnicodeError) as e:
+        raise ValueError(f"Cannot resolve {parts.hostname}: {e}")
+    vetted = []
+    for *_, sockaddr in addresses:
+        address = ipaddress.ip_address(sockaddr[0].split('%')[0])
+        address = getattr(address, 'ipv4_mapped', None) or address
+        if not address.is_global:
+            raise ValueError(f"Image URL points to a non-public address ({address})")
+        vetted.append(address)
+    if not vetted:
+        raise ValueError(f"Cannot resolve {parts.hostname}")
+    return vetted[0]
+
+
+class _PinnedAdapter(HTTPAdapter):
+    """
+    Sends TLS SNI and checks the certificate for ``hostname`` while the
+    request itself goes to an address already vetted by ``_public_address``,
+    so the host is not resolved a second time (DNS rebinding).
+    """
+
+    def __init__(self, hostname, **kwargs):
+        self.hostname = hostname
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['server_hostname'] = self.hostname
+        super().init_poolmanager(*args, **kwargs)
+
+
+def _pinned_get(url):
+    parts = urlsplit(url)
+    address = _public_address(url)
+    host = f'[{address}]' if address.version == 6 else str(address)
+    port = parts.port or (443 if parts.scheme == 'https' else 80)
+    with requests.Session() as session:
+        session.mount(f'{parts.scheme}://', _PinnedAdapter(parts.hostname))
+        return session.get(
+            urlunsplit((parts.scheme, f'{host}:{port}', parts.path, parts.query, '')),
+            headers={'Host': parts.netloc.rpartition('@')[2]},
+            timeout=15, stream=True, allow_redirects=False,
+        )
+
+
+def _download(url):
+    # redirects are followed by hand so every hop is vetted and pinned
+    for _ in range(MAX_IMAGE_REDIRECTS + 1):
+        response = _pinned_get(url)
+        if not response.is_redirect:
+            break
+        url = urljoin(url, response.headers['Location'])
+        response.close()
+    else:
+        raise ValueError("Too many redirects")
+    with response:
+        response.raise_for_status()
+        content_type = response.headers.get('Content-Type', '').split(';')[0].strip()
+        if not content_type.startswith('image/'):
+            raise ValueError(f"Not an image ({content_type or 'no content type'})")
+        content = bytearray()
+        for block in response.iter_content(64 * 1024):
+            content += block
+            if len(content) > MAX_IMAGE_BYTES:
+                raise ValueError("Image is larger than 10MB")
+    return bytes(content), content_type
+
+
+def _store(vehicle_id, url, content, content_type):
+    name = os.path.basename(url.split('?')[0]) or 'image'
+    if not os.path.splitext(name)[1]:
+        name += mimetypes.guess_extension(content_type) or ''
+    image = VehicleImage(vehicle_id=vehicle_id, image=SimpleUploadedFile(name, content, content_type))
+    image.save()
+    Vehicle.images.through.objects.create(vehicle_id=vehicle_id, vehicleimage_id=image.pk)
+    return image
+
+
+def fetch_image(pending):
+    """
+    Fetch and attach one claimed image (see ``fetch_pending_images``).
+    Failures are retried up to MAX_FETCH_ATTEMPTS.
+    """
+    try:
+        content, content_type = _download(pending.url)
+        pending.image = _store(pending.vehicle_id, pending.url, content, content_type)
+    except Exception as e:
+        pending.error = str(e)[:500]
+        pending.status = 'failed' if pending.attempts >= MAX_FETCH_ATTEMPTS else 'pending'
+    else:
+        pending.status, pending.error = 'fetched', ''
+    pending.save(update_fields=['image', 'status', 'error', 'last_updated'])
+    return pending
+
+
+def fetch_pending_images(limit=None):
+    """
+    Fetch queued images in this process. Returns the processed rows.
+
+    Each row is claimed with a conditional UPDATE to ``fetching`` (counting
+    the attempt) before it is fetched, so concurrent workers never fetch the
+    same image. A claim older than FETCH_CLAIM_TIMEOUT is treated as a
+    crashed worker's and the row is queued again.
+    """
+    processed = []
+    stale = timezone.now() - FETCH_CLAIM_TIMEOUT
+    queued = VehicleImageImport.objects.filter(
+        Q(status='pending') | Q(status='fetching', last_updated__lt=stale)
+    ).order_by('attempts', 'pk')
+    for pending in queued[:limit] if limit else queued:
+        claimed = VehicleImageImport.objects.filter(
+            pk=pending.pk, status=pending.status, attempts=pending.attempts
+        ).update(status='fetching', attempts=F('attempts') + 1, last_updated=timezone.now())
+        if claimed == 1:
+            pending.status, pending.attempts = 'fetching', pending.attempts + 1
+            processed.append(fetch_image(pending))
+    return processed
+
+
+_fetching = threading.Lock()
+
+
+def start_image_fetch():
+    """Drain the image queue in a background thread (one at a time per process)."""
+    if not _fetching.acquire(blocking=False):
+        return
+
+    def _run():
+        try:
+            fetch_pending_images()
+        except Exception:
+            logger.exception("Vehicle image fetch failed")
+        finally:
+            _fetching.release()
+            close_old_connections()
+
+    threading.Thread(target=_run, daemon=True).start()
@@ -0,0 +1,90 @@
+import csv
+import io
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import Dealership
+from listings.inventory import COLUMNS, export_rows, import_inventory, read_rows
+
+BRANDS = [('Toyota', 'Camry'), ('Honda', 'Accord'), ('Lexus', 'RX 350'), ('Mercedes-Benz', 'GLE'), ('Ford', 'Ranger')]
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark bulk inventory import (create, update with new prices, unchanged re-import) "
+        "and export. Runs inside a rolled back transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000, help='Rows to import (default: 10000)')
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options)
+                raise _Rollback()
+        except _Rollback:
+            self.stdout.write(self.style.SUCCESS("Benchmark data rolled back."))
+
+    def _csv(self, total, seed):
+        # the same vehicles for any seed; the seed only varies mileage and prices
+        rng, values = random.Random(0), random.Random(seed)
+        out = io.StringIO()
+        writer = csv.DictWriter(out, fieldnames=COLUMNS)
+        writer.writeheader()
+        for i in range(total):
+            brand, model = rng.choice(BRANDS)
+            rental = rng.random() < 0.3
+            writer.writerow({
+                'vehicle_type': 'car', 'vin': f'BENCH{i:012d}', 'sku': f'STK-{i}',
+                'title': f'{brand} {model} {i}', 'brand': brand, 'model': model,
+                'condition': rng.choice(['new', 'used-foreign', 'used-local']),
+                'transmission': rng.choice(['auto', 'manual']), 'color': rng.choice(['Black', 'White', 'Silver']),
+                'mileage': str(values.randint(0, 200_000)), 'features': 'Bluetooth|Reverse camera',
+                'listing_type': 'rental' if rental else 'sale',
+                'price': values.randrange(50_000, 50_000_000, 1000), 'payment_cycle': 'day' if rental else '',
+                'doors': 4, 'seats': 5, 'body_type': 'sedan',
+            })
+        return out.getvalue().encode()
+
+    def _import(self, label, dealer, data, chunk_size):
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as ctx:
+            report = import_inventory(dealer, read_rows(io.BytesIO(data), 'csv'), chunk_size=chunk_size)
+        elapsed = time.perf_counter() - started
+        result = report.as_dict()
+        self.stdout.write(
+            f"{label:<7} {elapsed:7.2f}s {result['rows'] / elapsed:8.0f} rows/s queries={len(ctx.captured_queries)} "
+            f"created={result['created']} updated={result['updated']} unchanged={result['unchanged']} "
+            f"failed={result['failed']}"
+        )
+
+    def _run(self, options):
+        user = get_user_model().objects.create_user(
+            email='bench-inventory@veyu.test', password='bench-pass-123', user_type='dealer'
+        )
+        dealer = Dealership.objects.get(user=user)
+        data = self._csv(options['rows'], options['seed'])
+        changed = self._csv(options['rows'], options['seed'] + 1)
+
+        self._import('create', dealer, data, options['chunk_size'])
+        self._import('update', dealer, changed, options['chunk_size'])
+        self._import('same', dealer, changed, options['chunk_size'])
+
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as ctx:
+            exported = sum(1 for _ in export_rows(dealer))
+        self.stdout.write(
+            f"{'export':<7} {time.perf_counter() - started:7.2f}s rows={exported} queries={len(ctx.captured_queries)}"
+        )
@@ -0,0 +1,139 @@
+import random
+import time
+from datetime import time as clock, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import Account, Customer, Dealership
+from listings import testdrives
+from listings.models import (
+    Listing,
+    TestDriveException,
+    TestDriveRequest,
+    TestDriveSchedule,
+    TestDriveWindow,
+    Vehicle,
+)
+
+# weekday opening hours, one set per dealership; Saturdays are mornings only, Sundays closed
+WEEKDAY_HOURS = [[(clock(9), clock(17))], [(clock(8), clock(12)), (clock(13), clock(18))], [(clock(10), clock(16))]]
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark test drive slot generation across many dealerships, against generating "
+        "one dealership at a time. Runs inside a rolled back transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dealers', type=int, default=1000, help='Dealerships to create (default: 1000)')
+        parser.add_argument('--bookings', type=int, default=40, help='Booked drives per dealership (default: 40)')
+        parser.add_argument('--iterations', type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options)
+                raise _Rollback()
+        except _Rollback:
+            self.stdout.write(self.style.SUCCESS("Benchmark data rolled back."))
+
+    def _run(self, options):
+        total, iterations = options['dealers'], options['iterations']
+        rng = random.Random(7)
+        now = timezone.now()
+        today = timezone.localdate()
+
+        started = time.perf_counter()
+        # bulk_create skips password hashing and the profile signals
+        Account.objects.bulk_create([
+            Account(email=f'bench-testdrive-dealer{i}@veyu.test', user_type='dealer', password='!') for i in range(total)
+        ], batch_size=1000)
+        users = Account.objects.filter(email__startswith='bench-testdrive-dealer').order_by('pk')
+        Dealership.objects.bulk_create([
+            Dealership(user=user, business_name=f'Bench Motors {i}') for i, user in enumerate(users)
+        ], batch_size=1000)
+        dealers = list(Dealership.objects.filter(user__in=users).select_related('user').order_by('pk'))
+        Vehicle.objects.bulk_create([
+            Vehicle(dealer=dealer, name=f'Bench car {i}', brand='Toyota', color='Silver') for i, dealer in enumerate(dealers)
+        ], batch_size=1000)
+        vehicles = Vehicle.objects.filter(dealer__in=dealers).order_by('pk')
+        Listing.objects.bulk_create([
+            Listing(vehicle=vehicle, created_by_id=vehicle.dealer.user_id, title=vehicle.name, verified=True, approved=True)
+            for vehicle in vehicles.select_related('dealer')
+        ], batch_size=1000)
+        listings = {listing.vehicle.dealer_id: listing for listing in Listing.objects.filter(vehicle__in=vehicles).select_related('vehicle')}
+
+        TestDriveSchedule.objects.bulk_create([
+            TestDriveSchedule(dealer=dealer, slot_minutes=rng.choice([30, 45, 60]), capacity=rng.randint(1, 3), min_notice_minutes=0)
+            for dealer in dealers
+        ], batch_size=1000)
+        schedules = list(TestDriveSchedule.objects.filter(dealer__in=dealers))
+        windows, exceptions = [], []
+        for schedule in schedules:
+            hours = rng.choice(WEEKDAY_HOURS)
+            for weekday in range(5):
+                windows += [TestDriveWindow(schedule=schedule, weekday=weekday, starts_at=opens, ends_at=closes) for opens, closes in hours]
+            windows.append(TestDriveWindow(schedule=schedule, weekday=5, starts_at=clock(9), ends_at=clock(13)))
+            closed = today + timedelta(days=rng.randrange(30))
+            exceptions.append(TestDriveException(schedule=schedule, date=closed, note='Closed'))
+        TestDriveWindow.objects.bulk_create(windows, batch_size=5000)
+        TestDriveException.objects.bulk_create(exceptions, batch_size=5000)
+
+        customer = Customer.objects.get(user=Account.objects.create_user(
+            email='bench-testdrive-customer@veyu.test', password='bench-pass-123', user_type='customer'
+        ))
+        free = testdrives.dealer_slots([dealer.pk for dealer in dealers], today, 30, now=now)
+        drives = []
+        for dealer in dealers:
+            slots = free.get(dealer.pk, [])
+            for slot in rng.sample(slots, min(options['bookings'], len(slots))):
+                drives.append(TestDriveRequest(
+                    requested_by=customer, requested_to=dealer, listing=listings[dealer.pk], status='booked',
+                    granted=True, starts_at=slot.starts_at, ends_at=slot.ends_at,
+                ))
+        TestDriveRequest.objects.bulk_create(drives, batch_size=5000)
+        self.stdout.write(
+            f"Seeded {total} dealerships, {len(windows)} windows and {len(drives)} drives "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+
+        dealer_ids = [dealer.pk for dealer in dealers]
+        sample = dealers[:100]
+        self._measure('all dealers, 7 days', iterations, lambda: testdrives.dealer_slots(dealer_ids, today, 7))
+        self._measure('all dealers, 30 days', iterations, lambda: testdrives.dealer_slots(dealer_ids, today, 30))
+        self._measure('100 dealers one by one, 7d', 1, lambda: [
+            testdrives.slots(listings[dealer.pk], today, 7) for dealer in sample
+        ])
+        self._measure('one listing, 30 days', iterations * 10, lambda: testdrives.slots(listings[dealers[0].pk], today, 30))
+
+        listing = listings[dealers[-1].pk]
+
+        def reserve_and_cancel():
+            slot = testdrives.slots(listing, today, 30)[0]
+            drive = testdrives.reserve(listing, customer, slot.starts_at)
+            testdrives.cancel(drive, customer.user)
+        self._measure('reserve + cancel', iterations * 10, reserve_and_cancel)
+
+    def _measure(self, label, iterations, func):
+        # the seeding alone overflows the query log
+        reset_queries()
+        timings = []
+        with CaptureQueriesContext(connection) as ctx:
+            for _ in range(iterations):
+                started = time.perf_counter()
+                func()
+                timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p50 = timings[len(timings) // 2]
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(
+            f"{label:<28} p50={p50:9.2f}ms p95={p95:9.2f}ms queries/call={len(ctx.captured_queries) / iterations:.1f}"
+        )
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from listings import valuation
+from listings.models import Vehicle
+from utils.marketplace_data import EMAIL_DOMAIN, MarketplaceDataGenerator
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Train the valuation model on a synthetic marketplace and report its held-out error by segment. "
+        "Runs inside a rolled back transaction and saves nothing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42, help='Marketplace data seed (default: 42)')
+        parser.add_argument('--scale', type=float, default=0.5, help='Marketplace data scale (default: 0.5)')
+        parser.add_argument('--alpha', type=float, default=valuation.DEFAULT_ALPHA, help='Ridge penalty (default: %(default)s)')
+        parser.add_argument('--holdout', type=float, default=valuation.DEFAULT_HOLDOUT,
+                            help='Share of vehicles held out (default: %(default)s)')
+
+    def handle(self, *args, **options):
+        if options['scale'] <= 0 or not 0 < options['holdout'] < 1:
+            raise CommandError("--scale must be positive and --holdout in (0, 1)")
+        try:
+            with transaction.atomic():
+                self._run(options)
+                raise _Rollback()
+        except _Rollback:
+            self.stdout.write(self.style.SUCCESS("Marketplace data rolled back."))
+
+    def _run(self, options):
+        MarketplaceDataGenerator(seed=options['seed'], scale=options['scale']).generate()
+        vehicles = Vehicle.objects.filter(dealer__user__email__endswith=f'@{EMAIL_DOMAIN}')
+        try:
+            model = valuation.train(valuation.training_rows(vehicles), alpha=options['alpha'], holdout=options['holdout'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f"Trained on {model.samples} rows, {len(model.features)} features")
+        for line in valuation.report_lines(model.report):
+            self.stdout.write(f"  {line}")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from listings.offers import expire_offers
+
+
+class Command(BaseCommand):
+    help = "Mark purchase offers that were not answered in time as expired. Run it from the scheduler (e.g. every 15 minutes)."
+
+    def handle(self, *args, **kwargs):
+        count = expire_offers()
+        self.stdout.write(self.style.SUCCESS(f"Expired {count} purchase offers."))
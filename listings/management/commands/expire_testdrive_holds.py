@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from listings.testdrives import expire_holds
+
+
+class Command(BaseCommand):
+    help = "Mark test drive holds that were not confirmed in time as expired."
+
+    def handle(self, *args, **kwargs):
+        count = expire_holds()
+        self.stdout.write(self.style.SUCCESS(f"Expired {count} test drive holds."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from listings.inventory import fetch_pending_images
+
+
+class Command(BaseCommand):
+    help = "Fetch vehicle images queued by inventory imports (retries failed downloads up to 3 times)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help='Fetch at most this many images')
+
+    def handle(self, *args, **options):
+        processed = fetch_pending_images(options['limit'])
+        fetched = sum(1 for pending in processed if pending.status == 'fetched')
+        self.stdout.write(self.style.SUCCESS(f"Fetched {fetched} of {len(processed)} queued images."))
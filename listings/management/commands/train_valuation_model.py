@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from listings import valuation
+
+
+class Command(BaseCommand):
+    help = "Train the vehicle valuation model on sale listings and completed sales, save it and make it current."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alpha', type=float, default=valuation.DEFAULT_ALPHA, help='Ridge penalty (default: %(default)s)')
+        parser.add_argument('--holdout', type=float, default=valuation.DEFAULT_HOLDOUT,
+                            help='Share of vehicles held out for the report (default: %(default)s)')
+        parser.add_argument('--no-activate', action='store_true', help='Save the model without making it current')
+
+    def handle(self, *args, **options):
+        if options['alpha'] < 0 or not 0 <= options['holdout'] < 1:
+            raise CommandError("--alpha must not be negative and --holdout must be in [0, 1)")
+        try:
+            model = valuation.train(valuation.training_rows(), alpha=options['alpha'], holdout=options['holdout'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        valuation.save(model, make_current=not options['no_activate'])
+
+        for line in valuation.report_lines(model.report):
+            self.stdout.write(f"  {line}")
+        state = "saved" if options['no_activate'] else "saved and activated"
+        self.stdout.write(self.style.SUCCESS(f"Model {model.version} ({model.samples} rows) {state}"))
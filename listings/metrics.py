@@ -0,0 +1,19 @@
+from django.db.models.signals import post_save
+
+from listings.models import Order, PurchaseOrder, RentalOrder, VehicleImageImport
+from utils import metrics
+
+ORDERS_CREATED = metrics.counter('orders_created_total', 'Orders placed', ['order_type'])
+BOOSTS_PURCHASED = metrics.counter('boosts_purchased_total', 'Listing boosts paid for', ['duration_type'])
+
+
+def _order_created(sender, instance, created, **kwargs):
+    if created:
+        ORDERS_CREATED.labels(instance.order_type or 'unknown').inc()
+
+
+# post_save only fires for the concrete class of a multi-table model
+for _model in (Order, RentalOrder, PurchaseOrder):
+    post_save.connect(_order_created, sender=_model, dispatch_uid=f'metrics.order_created.{_model.__name__}')
+
+metrics.register_queue('vehicle_images', lambda: VehicleImageImport.objects.filter(status='pending').count())
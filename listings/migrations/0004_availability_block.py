@@ -0,0 +1,61 @@
+# Generated by Django 5.1.1 on 2026-10-18 22:02
+
+import django.db.models.deletion
+import utils
+from django.db import migrations, models
+
+EXCLUSION_CONSTRAINT = 'availability_block_no_overlap'
+
+
+def add_exclusion_constraint(apps, schema_editor):
+    """
+    Reject overlapping blocks for the same vehicle at the database level.
+    PostgreSQL only; other backends rely on the row lock taken by
+    listings.availability.block_dates.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    schema_editor.execute(
+        f'ALTER TABLE listings_availabilityblock ADD CONSTRAINT {EXCLUSION_CONSTRAINT} '
+        "EXCLUDE USING gist (vehicle_id WITH =, daterange(start_date, end_date, '[)') WITH &&)"
+    )
+
+
+def drop_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'ALTER TABLE listings_availabilityblock DROP CONSTRAINT IF EXISTS {EXCLUSION_CONSTRAINT}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0003_car_body_type_listing_currency'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvailabilityBlock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(blank=True, default=utils.make_UUID)),
+                ('date_created', models.DateTimeField(auto_now=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('kind', models.CharField(choices=[('rental', 'Rental'), ('maintenance', 'Maintenance'), ('hold', 'Dealer Hold')], default='rental', max_length=20)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('note', models.CharField(blank=True, default='', max_length=200)),
+                ('rental_order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='availability_blocks', to='listings.rentalorder')),
+                ('vehicle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability_blocks', to='listings.vehicle')),
+            ],
+            options={
+                'verbose_name': 'Availability Block',
+                'verbose_name_plural': 'Availability Blocks',
+                'ordering': ['start_date'],
+                'indexes': [models.Index(fields=['vehicle', 'start_date', 'end_date'], name='listings_av_vehicle_d0165f_idx'), models.Index(fields=['kind'], name='listings_av_kind_d68edf_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(('end_date__gt', models.F('start_date'))), name='availability_block_valid_range')],
+            },
+        ),
+        migrations.RunPython(add_exclusion_constraint, drop_exclusion_constraint),
+    ]
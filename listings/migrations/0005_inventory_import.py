@@ -0,0 +1,64 @@
+# Generated by Django 5.1.1 on 2026-10-18 22:49
+
+import django.db.models.deletion
+import utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_dealership_stats'),
+        ('listings', '0004_availability_block'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VehicleImageImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(blank=True, default=utils.make_UUID)),
+                ('date_created', models.DateTimeField(auto_now=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('url', models.URLField(max_length=1000)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('fetched', 'Fetched'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.CharField(blank=True, max_length=500)),
+            ],
+            options={
+                'verbose_name': 'Vehicle Image Import',
+                'verbose_name_plural': 'Vehicle Image Imports',
+            },
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='sku',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(fields=['vin'], name='listings_ca_vin_e0d057_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='vehicle',
+            constraint=models.UniqueConstraint(condition=models.Q(('sku__isnull', False)), fields=('dealer', 'sku'), name='unique_dealer_vehicle_sku'),
+        ),
+        migrations.AddField(
+            model_name='vehicleimageimport',
+            name='image',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='imports', to='listings.vehicleimage'),
+        ),
+        migrations.AddField(
+            model_name='vehicleimageimport',
+            name='vehicle',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='image_imports', to='listings.vehicle'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicleimageimport',
+            index=models.Index(fields=['status'], name='listings_ve_status_f27a7d_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='vehicleimageimport',
+            constraint=models.UniqueConstraint(fields=('vehicle', 'url'), name='unique_vehicle_image_import'),
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.1.1 on 2026-10-18 23:29
+
+import django.db.models.deletion
+import utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_dealership_stats'),
+        ('listings', '0005_inventory_import'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coupon',
+            name='is_active',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='coupon',
+            name='listing_types',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='coupon',
+            name='max_discount',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='coupon',
+            name='max_redemptions',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='coupon',
+            name='max_redemptions_per_user',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='coupon',
+            name='min_order_value',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='coupon',
+            name='priority',
+            field=models.PositiveSmallIntegerField(default=100),
+        ),
+        migrations.AddField(
+            model_name='coupon',
+            name='redemption_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='coupon',
+            name='stackable',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='coupon',
+            name='starts',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='CouponRedemption',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(blank=True, default=utils.make_UUID)),
+                ('date_created', models.DateTimeField(auto_now=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('coupon', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='redemptions', to='listings.coupon')),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='coupon_redemptions', to='accounts.customer')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='coupon_redemptions', to='listings.order')),
+            ],
+            options={
+                'verbose_name': 'Coupon Redemption',
+                'verbose_name_plural': 'Coupon Redemptions',
+                'indexes': [models.Index(fields=['coupon', 'customer'], name='listings_co_coupon__0b8eb3_idx')],
+                'constraints': [models.UniqueConstraint(fields=('coupon', 'order'), name='unique_coupon_per_order')],
+            },
+        ),
+    ]
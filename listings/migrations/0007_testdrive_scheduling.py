@@ -0,0 +1,172 @@
+# Generated by Django 5.1.1 on 2026-10-19 01:05
+
+import django.db.models.deletion
+import listings.models
+import utils
+from django.conf import settings
+from django.db import migrations, models
+
+
+def set_status(apps, schema_editor):
+    # existing requests have no time; only completion carries over
+    TestDriveRequest = apps.get_model('listings', 'TestDriveRequest')
+    TestDriveRequest.objects.filter(testdrive_complete=True).update(status='completed')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_dealership_stats'),
+        ('listings', '0006_coupon_rules'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestDriveException',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(blank=True, default=utils.make_UUID)),
+                ('date_created', models.DateTimeField(auto_now=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('date', models.DateField()),
+                ('starts_at', models.TimeField(blank=True, null=True)),
+                ('ends_at', models.TimeField(blank=True, null=True)),
+                ('note', models.CharField(blank=True, default='', max_length=200)),
+            ],
+            options={
+                'verbose_name': 'Test Drive Exception',
+                'verbose_name_plural': 'Test Drive Exceptions',
+                'ordering': ['date', 'starts_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TestDriveSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(blank=True, default=utils.make_UUID)),
+                ('date_created', models.DateTimeField(auto_now=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('timezone', models.CharField(default='Africa/Lagos', max_length=64)),
+                ('slot_minutes', models.PositiveSmallIntegerField(default=30)),
+                ('capacity', models.PositiveSmallIntegerField(default=1)),
+                ('min_notice_minutes', models.PositiveIntegerField(default=60)),
+                ('horizon_days', models.PositiveSmallIntegerField(default=30)),
+                ('calendar_token', models.CharField(default=listings.models.new_calendar_token, max_length=64, unique=True)),
+            ],
+            options={
+                'verbose_name': 'Test Drive Schedule',
+                'verbose_name_plural': 'Test Drive Schedules',
+            },
+        ),
+        migrations.CreateModel(
+            name='TestDriveWindow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(blank=True, default=utils.make_UUID)),
+                ('date_created', models.DateTimeField(auto_now=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')])),
+                ('starts_at', models.TimeField()),
+                ('ends_at', models.TimeField()),
+            ],
+            options={
+                'verbose_name': 'Test Drive Window',
+                'verbose_name_plural': 'Test Drive Windows',
+                'ordering': ['weekday', 'starts_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='testdrive_capacity',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='testdriverequest',
+            name='cancel_reason',
+            field=models.CharField(blank=True, default='', max_length=500),
+        ),
+        migrations.AddField(
+            model_name='testdriverequest',
+            name='cancelled_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='testdriverequest',
+            name='cancelled_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='testdriverequest',
+            name='ends_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='testdriverequest',
+            name='hold_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='testdriverequest',
+            name='revision',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='testdriverequest',
+            name='starts_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='testdriverequest',
+            name='status',
+            field=models.CharField(choices=[('requested', 'Requested'), ('held', 'Held'), ('booked', 'Booked'), ('cancelled', 'Cancelled'), ('expired', 'Expired'), ('completed', 'Completed')], default='requested', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='testdriverequest',
+            index=models.Index(fields=['requested_to', 'starts_at'], name='listings_te_request_84a129_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testdriverequest',
+            index=models.Index(fields=['listing', 'starts_at'], name='listings_te_listing_95e465_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testdriverequest',
+            index=models.Index(fields=['status', 'hold_expires_at'], name='listings_te_status_59d6fc_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='testdriverequest',
+            constraint=models.CheckConstraint(condition=models.Q(('starts_at__isnull', True), ('ends_at__gt', models.F('starts_at')), _connector='OR'), name='testdrive_valid_range'),
+        ),
+        migrations.AddField(
+            model_name='testdriveschedule',
+            name='dealer',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='testdrive_schedule', to='accounts.dealership'),
+        ),
+        migrations.AddField(
+            model_name='testdriveexception',
+            name='schedule',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exceptions', to='listings.testdriveschedule'),
+        ),
+        migrations.AddField(
+            model_name='testdrivewindow',
+            name='schedule',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='windows', to='listings.testdriveschedule'),
+        ),
+        migrations.AddIndex(
+            model_name='testdriveexception',
+            index=models.Index(fields=['schedule', 'date'], name='listings_te_schedul_3814ce_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='testdriveexception',
+            constraint=models.CheckConstraint(condition=models.Q(('starts_at__isnull', True), ('ends_at__isnull', True), ('ends_at__gt', models.F('starts_at')), _connector='OR'), name='testdrive_exception_valid_range'),
+        ),
+        migrations.AddIndex(
+            model_name='testdrivewindow',
+            index=models.Index(fields=['schedule', 'weekday'], name='listings_te_schedul_475b3c_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='testdrivewindow',
+            constraint=models.CheckConstraint(condition=models.Q(('ends_at__gt', models.F('starts_at'))), name='testdrive_window_valid_range'),
+        ),
+        migrations.RunPython(set_status, migrations.RunPython.noop),
+    ]
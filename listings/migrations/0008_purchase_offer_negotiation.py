@@ -0,0 +1,97 @@
+# Generated by Django 5.1.1 on 2026-10-19 01:28
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_dealership_stats'),
+        ('listings', '0007_testdrive_scheduling'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='auto_accept_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='auto_reject_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='agreed_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='offer',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='order', to='listings.purchaseoffer'),
+        ),
+        migrations.AddField(
+            model_name='purchaseoffer',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='purchaseoffer',
+            name='made_by',
+            field=models.CharField(choices=[('customer', 'Customer'), ('dealer', 'Dealer')], default='customer', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='purchaseoffer',
+            name='message',
+            field=models.CharField(blank=True, default='', max_length=500),
+        ),
+        migrations.AddField(
+            model_name='purchaseoffer',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='counters', to='listings.purchaseoffer'),
+        ),
+        migrations.AddField(
+            model_name='purchaseoffer',
+            name='responded_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='purchaseoffer',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('countered', 'Countered'), ('accepted', 'Accepted'), ('rejected', 'Rejected'), ('withdrawn', 'Withdrawn'), ('expired', 'Expired')], default='pending', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='purchaseoffer',
+            name='trade_in',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='purchase_offers', to='listings.tradeinrequest'),
+        ),
+        migrations.AddField(
+            model_name='purchaseoffer',
+            name='trade_in_credit',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='purchaseoffer',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseoffer',
+            index=models.Index(fields=['listing', 'status'], name='listings_pu_listing_c82fd9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseoffer',
+            index=models.Index(fields=['status', 'expires_at'], name='listings_pu_status_0c6229_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='purchaseoffer',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'accepted')), fields=('listing',), name='one_accepted_offer_per_listing'),
+        ),
+        migrations.AddConstraint(
+            model_name='purchaseoffer',
+            constraint=models.CheckConstraint(condition=models.Q(('trade_in_credit__gte', 0), ('amount__gt', models.F('trade_in_credit'))), name='offer_covers_trade_in'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-19 02:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0008_purchase_offer_negotiation'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='vehicleimageimport',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('fetching', 'Fetching'), ('fetched', 'Fetched'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+    ]
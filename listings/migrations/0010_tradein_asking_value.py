@@ -0,0 +1,33 @@
+# Generated by Django 5.1.1 on 2026-10-19 02:51
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def move_customer_figures(apps, schema_editor):
+    # existing values may be the customer's own figure, which must not be
+    # credited against offers; keep it as the asking value and leave the
+    # trade-in for the valuation model or the dealership to value
+    TradeInRequest = apps.get_model('listings', 'TradeInRequest')
+    TradeInRequest.objects.update(asking_value=F('estimated_value'), estimated_value=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0009_vehicle_image_import_fetching'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tradeinrequest',
+            name='asking_value',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.AlterField(
+            model_name='tradeinrequest',
+            name='estimated_value',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.RunPython(move_customer_figures, migrations.RunPython.noop),
+    ]
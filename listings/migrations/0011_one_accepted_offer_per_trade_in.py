@@ -0,0 +1,30 @@
+# Generated by Django 5.1.1 on 2026-10-19 03:20
+
+from django.db import migrations, models
+
+
+def detach_reused_trade_ins(apps, schema_editor):
+    # keep the first accepted offer on each trade-in; later ones keep their
+    # recorded trade_in_credit but no longer hold the trade-in
+    PurchaseOffer = apps.get_model('listings', 'PurchaseOffer')
+    seen = set()
+    accepted = PurchaseOffer.objects.filter(status='accepted', trade_in__isnull=False).order_by('responded_at', 'pk')
+    for offer_id, trade_in_id in accepted.values_list('pk', 'trade_in_id'):
+        if trade_in_id in seen:
+            PurchaseOffer.objects.filter(pk=offer_id).update(trade_in=None)
+        seen.add(trade_in_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0010_tradein_asking_value'),
+    ]
+
+    operations = [
+        migrations.RunPython(detach_reused_trade_ins, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='purchaseoffer',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'accepted')), fields=('trade_in',), name='one_accepted_offer_per_trade_in'),
+        ),
+    ]
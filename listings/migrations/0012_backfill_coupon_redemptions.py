@@ -0,0 +1,54 @@
+# Generated by Django 5.1.1 on 2026-10-19 03:40
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+CENT = Decimal('0.01')
+FEE = Decimal('0.005')
+
+
+def backfill_redemptions(apps, schema_editor):
+    # orders placed before coupon redemptions existed only list their
+    # coupons; record the discount each one was given then (applied in turn,
+    # a percentage of what the ones before it left, on the sub total with
+    # its 0.5% fee) so Order.pricing keeps it
+    Order = apps.get_model('listings', 'Order')
+    Coupon = apps.get_model('listings', 'Coupon')
+    CouponRedemption = apps.get_model('listings', 'CouponRedemption')
+    orders = (
+        Order.objects.filter(applied_coupons__isnull=False, order_item__isnull=False)
+        .exclude(coupon_redemptions__isnull=False).select_related('order_item').distinct()
+    )
+    redemptions = []
+    for order in orders.iterator(chunk_size=500):
+        price = order.agreed_price if order.agreed_price is not None else order.order_item.price
+        remaining = (Decimal(price) * (1 + FEE)).quantize(CENT, rounding=ROUND_HALF_UP)
+        for coupon in order.applied_coupons.order_by('pk'):
+            discount = Decimal(coupon.discount_value)
+            if coupon.discount_type == 'percentage':
+                discount = remaining * discount / 100
+            amount = min(discount.quantize(CENT, rounding=ROUND_HALF_UP), remaining)
+            remaining -= amount
+            redemptions.append(CouponRedemption(coupon=coupon, customer_id=order.customer_id, order=order, amount=amount))
+        if len(redemptions) >= 500:
+            CouponRedemption.objects.bulk_create(redemptions)
+            redemptions = []
+    CouponRedemption.objects.bulk_create(redemptions)
+
+    # usage limits count every past use
+    used = CouponRedemption.objects.filter(coupon=OuterRef('pk')).values('coupon').annotate(count=Count('pk')).values('count')
+    Coupon.objects.update(redemption_count=Coalesce(Subquery(used), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0011_one_accepted_offer_per_trade_in'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_redemptions, migrations.RunPython.noop),
+    ]
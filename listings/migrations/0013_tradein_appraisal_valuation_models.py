@@ -0,0 +1,50 @@
+# Generated by Django 5.1.1 on 2026-10-19 03:23
+
+import django.db.models.deletion
+import utils
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0012_backfill_coupon_redemptions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tradeinrequest',
+            name='appraised_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='tradeinrequest',
+            name='appraised_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='tradeinrequest',
+            name='appraised_value',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.CreateModel(
+            name='ValuationModelVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(blank=True, default=utils.make_UUID)),
+                ('date_created', models.DateTimeField(auto_now=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('version', models.CharField(max_length=40, unique=True)),
+                ('data', models.JSONField()),
+                ('is_current', models.BooleanField(default=False)),
+            ],
+            options={
+                'verbose_name': 'Valuation Model',
+                'verbose_name_plural': 'Valuation Models',
+                'ordering': ['version'],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('is_current', True)), fields=('is_current',), name='one_current_valuation_model')],
+            },
+        ),
+    ]
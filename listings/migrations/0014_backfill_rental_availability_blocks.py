@@ -0,0 +1,64 @@
+# Generated by Django 5.1.1 on 2026-10-19 03:33
+
+from django.db import migrations, models
+from django.utils import timezone
+
+# listings.availability.RELEASED_STATUSES when this migration was written
+RELEASED_STATUSES = ('cancelled', 'expired', 'refunded')
+
+
+def backfill_blocks(apps, schema_editor):
+    # rentals booked before the availability calendar hold no blocks, so
+    # their dates look free; block the ones still ahead of us. A legacy
+    # rental overlapping one already blocked for its vehicle is left out
+    # (the exclusion constraint would reject it) rather than failing the
+    # migration; the earlier booking keeps the dates.
+    RentalOrder = apps.get_model('listings', 'RentalOrder')
+    AvailabilityBlock = apps.get_model('listings', 'AvailabilityBlock')
+    AvailabilityBlock.objects.filter(rental_order__order_status__in=RELEASED_STATUSES).delete()
+
+    orders = (
+        RentalOrder.objects.filter(
+            rent_from__isnull=False, rent_until__gt=timezone.localdate(),
+            order_item__vehicle__isnull=False, availability_blocks__isnull=True,
+        )
+        .exclude(order_status__in=RELEASED_STATUSES)
+        .values_list('pk', 'order_item__vehicle_id', 'rent_from', 'rent_until')
+        .order_by('order_item__vehicle_id', 'rent_from', 'pk')
+    )
+    taken = {}
+    blocks = []
+    for order_id, vehicle_id, start, end in orders.iterator(chunk_size=500):
+        if end <= start:
+            continue
+        if vehicle_id not in taken:
+            taken[vehicle_id] = list(
+                AvailabilityBlock.objects.filter(vehicle_id=vehicle_id, end_date__gt=timezone.localdate())
+                .values_list('start_date', 'end_date')
+            )
+        if any(other_start < end and other_end > start for other_start, other_end in taken[vehicle_id]):
+            continue
+        taken[vehicle_id].append((start, end))
+        blocks.append(AvailabilityBlock(
+            vehicle_id=vehicle_id, kind='rental', start_date=start, end_date=end, rental_order_id=order_id,
+        ))
+        if len(blocks) >= 500:
+            AvailabilityBlock.objects.bulk_create(blocks)
+            blocks = []
+    AvailabilityBlock.objects.bulk_create(blocks)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0013_tradein_appraisal_valuation_models'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='order_status',
+            field=models.CharField(choices=[('awaiting-inspection', 'Awaiting Inspection'), ('inspecting', 'Inspecting'), ('pending', 'Pending'), ('completed', 'Completed'), ('expired', 'Expired'), ('renewed', 'Renewed'), ('cancelled', 'Cancelled'), ('refunded', 'Refunded')], default='pending', max_length=50),
+        ),
+        migrations.RunPython(backfill_blocks, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,4 @@
+import secrets
 from django.db import models
 from utils.models import DbModel, ArrayField
 from decimal import Decimal, InvalidOperation
@@ -57,6 +58,42 @@ class VehicleImage(DbModel):
         verbose_name_plural = 'Vehicle Images'
 
 
+class VehicleImageImport(DbModel):
+    """
+    An image URL supplied by a bulk inventory import, fetched and uploaded
+    in the background (see listings.inventory.fetch_pending_images).
+    """
+    STATUS = {
+        'pending': 'Pending',
+        'fetching': 'Fetching',
+        'fetched': 'Fetched',
+        'failed': 'Failed',
+    }
+
+    vehicle = models.ForeignKey('Vehicle', on_delete=models.CASCADE, related_name='image_imports')
+    url = models.URLField(max_length=1000)
+    status = models.CharField(max_length=20, choices=STATUS, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.CharField(max_length=500, blank=True)
+    image = models.ForeignKey(VehicleImage, blank=True, null=True, on_delete=models.SET_NULL, related_name='imports')
+
+    def __str__(self):
+        return f"{self.url} ({self.get_status_display()})"
+
+    def __repr__(self):
+        return f"<VehicleImageImport: {self.vehicle_id} - {self.status}>"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['vehicle', 'url'], name='unique_vehicle_image_import'),
+        ]
+        indexes = [
+            models.Index(fields=['status']),
+        ]
+        verbose_name = 'Vehicle Image Import'
+        verbose_name_plural = 'Vehicle Image Imports'
+
+
 class Vehicle(DbModel):
     CONDITION_CHOICES = [
         ('new', 'New'),
@@ -84,6 +121,8 @@ class Vehicle(DbModel):
     transmission = models.CharField(max_length=200, blank=True, null=True, choices=TRANSMISSION)
     color = models.CharField(max_length=200)
     mileage = models.CharField(max_length=200, blank=True, null=True)
+    # the dealer's own stock number; bulk imports upsert on it (or the VIN)
+    sku = models.CharField(max_length=100, blank=True, null=True)
 
     for_sale = models.BooleanField(default=False)
     for_rent = models.BooleanField(default=False)
@@ -157,6 +196,11 @@ class Vehicle(DbModel):
             models.Index(fields=['slug']),
             models.Index(fields=['date_created']),
         ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dealer', 'sku'], condition=Q(sku__isnull=False), name='unique_dealer_vehicle_sku'
+            ),
+        ]
         ordering = ['-date_created']
 
 
@@ -187,6 +231,11 @@ class Car(Vehicle):
     body_type = models.CharField(max_length=50, blank=True, null=True, choices=BODY_TYPE_CHOICES)
     vin = models.CharField(max_length=200, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['vin']),
+        ]
+
 
 class Boat(Vehicle):
     hull_material = models.CharField(max_length=100, blank=True, null=True)
@@ -329,6 +378,8 @@ class Order(DbModel):
         'completed': 'Completed',
         'expired': 'Expired', # when a rental expires
         'renewed': 'Renewed', # when a rental is renewed
+        'cancelled': 'Cancelled',
+        'refunded': 'Refunded',
     }
     PAYMENT_OPTION  = {
         'pay-after-inspection': 'Payment after Inspection',
@@ -344,6 +395,9 @@ class Order(DbModel):
     paid = models.BooleanField(default=False)
     order_status = models.CharField(max_length=50, choices=ORDER_STATUS, default='pending')
     applied_coupons = models.ManyToManyField('Coupon', blank=True, related_name='coupon_orders')
+    # orders checked out from an accepted offer are priced at the offer
+    offer = models.OneToOneField('PurchaseOffer', blank=True, null=True, on_delete=models.SET_NULL, related_name='order')
+    agreed_price = models.DecimalField(decimal_places=2, max_digits=12, blank=True, null=True)
     # for rentals
 
     @property
@@ -354,6 +408,8 @@ class Order(DbModel):
             cycle = 1
             days = 30 # count days
             amt += (self.order_item.price/30) * days
+        elif self.agreed_price is not None:
+            amt += self.agreed_price
         else:
             amt += self.order_item.price
 
@@ -361,15 +417,27 @@ class Order(DbModel):
         amt += (to_decimal(0.5/100) * amt)
         return amt
 
+    @property
+    def pricing(self):
+        """
+        Itemized coupon discounts on the sub total (see listings.coupons),
+        as recorded when the coupons were redeemed. Later edits to a coupon
+        never reprice a placed order; quotes before checkout come from
+        ``listings.coupons.evaluate``.
+        """
+        from listings.coupons import CouponRule, Discount, Pricing, to_money
+
+        redemptions = sorted(
+            self.coupon_redemptions.select_related('coupon') if self.pk else (),
+            key=lambda redemption: (redemption.coupon.priority, redemption.coupon.code or ''),
+        )
+        lines = tuple(Discount(CouponRule.from_coupon(redemption.coupon), redemption.amount) for redemption in redemptions)
+        return Pricing(to_money(self.sub_total), lines)
+
     @property
     def total(self):
-        amt = self.sub_total
-        # add discounts from coupons
-        for coupon in self.applied_coupons.all():
-            val = coupon.discount_value
-            if coupon.discount_type == 'percentage':
-                val = (to_decimal(coupon.discount_value/100) * amt)
-            amt -= val
+        # subtract discounts from coupons
+        amt = self.pricing.total
         # add 0.5% commission
         amt += to_decimal(0.5 / 100) * amt
         return amt
@@ -455,6 +523,67 @@ class RentalOrder(Order):
         verbose_name_plural = 'Rental Orders'
 
 
+class AvailabilityBlock(DbModel):
+    """
+    A date range during which a vehicle cannot be rented. Ranges are
+    half-open: ``start_date`` is the first blocked day and ``end_date`` the
+    first free day again (a rental's return day), so back-to-back rentals
+    do not overlap. On PostgreSQL an exclusion constraint (migration 0004)
+    rejects overlapping blocks for the same vehicle; book through
+    ``listings.availability.block_dates``.
+    """
+    BLOCK_KINDS = {
+        'rental': 'Rental',
+        'maintenance': 'Maintenance',
+        'hold': 'Dealer Hold',
+    }
+
+    vehicle = models.ForeignKey(Vehicle, on_delete=models.CASCADE, related_name='availability_blocks')
+    kind = models.CharField(max_length=20, choices=BLOCK_KINDS, default='rental')
+    start_date = models.DateField()
+    end_date = models.DateField()
+    # released when the order is deleted or reaches a status in
+    # listings.availability.RELEASED_STATUSES
+    rental_order = models.ForeignKey(RentalOrder, blank=True, null=True, on_delete=models.CASCADE, related_name='availability_blocks')
+    note = models.CharField(max_length=200, blank=True, default='')
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.vehicle} ({self.start_date} - {self.end_date})"
+
+    def __repr__(self):
+        return f"<AvailabilityBlock: {self.vehicle_id} {self.kind} {self.start_date}..{self.end_date}>"
+
+    @property
+    def days(self):
+        return (self.end_date - self.start_date).days
+
+    def clean(self):
+        # form-level check for admin edits; bookings are serialized in listings.availability
+        from django.core.exceptions import ValidationError
+        super().clean()
+        if not (self.start_date and self.end_date and self.vehicle_id):
+            return
+        if self.end_date <= self.start_date:
+            raise ValidationError({'end_date': 'End date must be after the start date.'})
+        overlapping = AvailabilityBlock.objects.filter(
+            vehicle_id=self.vehicle_id, start_date__lt=self.end_date, end_date__gt=self.start_date
+        ).exclude(pk=self.pk)
+        if overlapping.exists():
+            raise ValidationError('These dates overlap an existing block for this vehicle.')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['vehicle', 'start_date', 'end_date']),
+            models.Index(fields=['kind']),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=Q(end_date__gt=models.F('start_date')), name='availability_block_valid_range'),
+        ]
+        ordering = ['start_date']
+        verbose_name = 'Availability Block'
+        verbose_name_plural = 'Availability Blocks'
+
+
 class PurchaseOrder(Order):
 
     def __str__(self):
@@ -475,6 +604,20 @@ class Coupon(DbModel):
     discount_value = models.DecimalField(decimal_places=2, default=0.00, max_digits=12)
     code = models.CharField(blank=True, null=True, max_length=20, unique=True)
 
+    # rules (listings.coupons); blank limits mean no limit
+    is_active = models.BooleanField(default=True)
+    starts = models.DateTimeField(blank=True, null=True)
+    listing_types = models.JSONField(default=list, blank=True)  # ['rental', 'sale'], empty for all
+    min_order_value = models.DecimalField(decimal_places=2, max_digits=12, blank=True, null=True)
+    max_discount = models.DecimalField(decimal_places=2, max_digits=12, blank=True, null=True)  # caps percentages
+    max_redemptions = models.PositiveIntegerField(blank=True, null=True)
+    max_redemptions_per_user = models.PositiveIntegerField(blank=True, null=True)
+    redemption_count = models.PositiveIntegerField(default=0)
+    # coupons apply in ascending priority; a coupon that is not stackable
+    # is only ever applied alone
+    priority = models.PositiveSmallIntegerField(default=100)
+    stackable = models.BooleanField(default=False)
+
     def __str__(self):
         discount_text = f"{self.discount_value}%" if self.discount_type == 'percentage' else f"₦{self.discount_value}"
         return f"Coupon {self.code}: {discount_text} off - {self.dealership}"
@@ -514,6 +657,30 @@ class Coupon(DbModel):
         ]
 
 
+class CouponRedemption(DbModel):
+    """One use of a coupon on an order, with the discount it gave."""
+    coupon = models.ForeignKey(Coupon, on_delete=models.CASCADE, related_name='redemptions')
+    customer = models.ForeignKey('accounts.Customer', on_delete=models.CASCADE, related_name='coupon_redemptions')
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='coupon_redemptions')
+    amount = models.DecimalField(decimal_places=2, max_digits=12)
+
+    def __str__(self):
+        return f"{self.coupon.code} on order #{self.order_id}: ₦{self.amount:,.2f}"
+
+    def __repr__(self):
+        return f"<CouponRedemption: {self.coupon_id} - order {self.order_id} - {self.amount}>"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['coupon', 'order'], name='unique_coupon_per_order'),
+        ]
+        indexes = [
+            models.Index(fields=['coupon', 'customer']),
+        ]
+        verbose_name = 'Coupon Redemption'
+        verbose_name_plural = 'Coupon Redemptions'
+
+
 class Listing(DbModel):
     LISTING_TYPES  = {'rental': 'Car Rental', 'sale': 'Car Sale'}
     CURRENCY_CHOICES = [
@@ -535,6 +702,12 @@ class Listing(DbModel):
     testdrives = models.ManyToManyField('TestDriveRequest', blank=True, related_name='listing_testdrives')
     payment_cycle = models.CharField(max_length=20, choices=PAYMENT_CYCLES, default='week', blank=True,)
     notes = models.TextField(blank=True, null=True)
+    # test drives of this listing that can run at the same time (demo vehicles)
+    testdrive_capacity = models.PositiveSmallIntegerField(default=1)
+    # offers at or above auto_accept_price are accepted and offers below
+    # auto_reject_price declined without the dealer (see listings.offers)
+    auto_accept_price = models.DecimalField(decimal_places=2, max_digits=12, blank=True, null=True)
+    auto_reject_price = models.DecimalField(decimal_places=2, max_digits=12, blank=True, null=True)
 
     def __str__(self):
         status = "Published" if self.published else "Draft"
@@ -684,20 +857,52 @@ class ListingBoost(DbModel):
 
 
 class PurchaseOffer(DbModel):
+    """
+    An offer on a sale listing. Negotiations are threads: a counter-offer
+    is a new offer whose ``parent`` is the offer it answers, made by the
+    other side. Only pending offers can be answered; ``version`` is bumped
+    on every transition so that a stale answer loses (see
+    ``listings.offers``). ``amount`` is the price of the vehicle;
+    ``trade_in_credit`` is paid for by the customer's trade-in.
+    """
+    STATUS = {
+        'pending': 'Pending',
+        'countered': 'Countered',
+        'accepted': 'Accepted',
+        'rejected': 'Rejected',
+        'withdrawn': 'Withdrawn',
+        'expired': 'Expired',
+    }
+    SIDES = {'customer': 'Customer', 'dealer': 'Dealer'}
+
     bidder = models.ForeignKey('accounts.Customer', models.CASCADE, related_name='purchase_offers')
     listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='purchase_offers')
     amount = models.DecimalField(decimal_places=2, max_digits=12)
+    parent = models.ForeignKey('self', blank=True, null=True, on_delete=models.CASCADE, related_name='counters')
+    made_by = models.CharField(max_length=10, choices=SIDES, default='customer')
+    status = models.CharField(max_length=20, choices=STATUS, default='pending')
+    trade_in = models.ForeignKey('TradeInRequest', blank=True, null=True, on_delete=models.SET_NULL, related_name='purchase_offers')
+    trade_in_credit = models.DecimalField(decimal_places=2, max_digits=12, default=Decimal('0.00'))
+    message = models.CharField(max_length=500, blank=True, default='')
+    expires_at = models.DateTimeField(blank=True, null=True)
+    responded_at = models.DateTimeField(blank=True, null=True)
+    version = models.PositiveIntegerField(default=0)
     
     def __str__(self):
         return f"Offer by {self.bidder.user.name} - ₦{self.amount:,.2f} for {self.listing.title}"
     
     def __repr__(self):
-        return f"<PurchaseOffer: {self.bidder.user.email} - ₦{self.amount}>"
+        return f"<PurchaseOffer: {self.bidder.user.email} - ₦{self.amount} ({self.status})>"
     
     @property
     def formatted_amount(self):
         """Returns formatted offer amount"""
         return f"₦{self.amount:,.2f}"
+
+    @property
+    def net_amount(self):
+        """What the customer pays once the trade-in is credited"""
+        return self.amount - self.trade_in_credit
     
     @property
     def days_since_offer(self):
@@ -710,6 +915,16 @@ class PurchaseOffer(DbModel):
             models.Index(fields=['listing']),
             models.Index(fields=['amount']),
             models.Index(fields=['date_created']),
+            models.Index(fields=['listing', 'status']),
+            models.Index(fields=['status', 'expires_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['listing'], condition=Q(status='accepted'), name='one_accepted_offer_per_listing'),
+            # a trade-in is credited against one sale only
+            models.UniqueConstraint(fields=['trade_in'], condition=Q(status='accepted'), name='one_accepted_offer_per_trade_in'),
+            models.CheckConstraint(
+                condition=Q(trade_in_credit__gte=0) & Q(amount__gt=models.F('trade_in_credit')), name='offer_covers_trade_in',
+            ),
         ]
         ordering = ['-amount', '-date_created']
         verbose_name = 'Purchase Offer'
@@ -717,12 +932,37 @@ class PurchaseOffer(DbModel):
 
 
 class TestDriveRequest(DbModel):
+    """
+    A test drive. Scheduled drives (``starts_at`` set) are reserved through
+    ``listings.testdrives``: a reservation is 'held' until the customer
+    confirms it or ``hold_expires_at`` passes, and only held and booked
+    drives take up capacity. Requests without a time are the older
+    free-form kind, arranged in chat.
+    """
+    STATUS = {
+        'requested': 'Requested',
+        'held': 'Held',
+        'booked': 'Booked',
+        'cancelled': 'Cancelled',
+        'expired': 'Expired',
+        'completed': 'Completed',
+    }
+
     requested_by = models.ForeignKey('accounts.Customer', on_delete=models.CASCADE, related_name='testdrive_requests')
     requested_to = models.ForeignKey('accounts.Dealership', on_delete=models.CASCADE, related_name='received_testdrive_requests')
     listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='testdrive_requests')
     granted = models.BooleanField(default=False)
     testdrive_complete = models.BooleanField(default=False)
-    
+    status = models.CharField(max_length=20, choices=STATUS, default='requested')
+    starts_at = models.DateTimeField(blank=True, null=True)
+    ends_at = models.DateTimeField(blank=True, null=True)
+    hold_expires_at = models.DateTimeField(blank=True, null=True)
+    cancelled_at = models.DateTimeField(blank=True, null=True)
+    cancelled_by = models.ForeignKey('accounts.Account', blank=True, null=True, on_delete=models.SET_NULL, related_name='+')
+    cancel_reason = models.CharField(max_length=500, blank=True, default='')
+    # bumped on every reschedule and cancellation (the calendar feed's SEQUENCE)
+    revision = models.PositiveIntegerField(default=0)
+
     def __str__(self):
         status = "Completed" if self.testdrive_complete else ("Granted" if self.granted else "Pending")
         return f"Test Drive: {self.requested_by.user.name} → {self.listing.title} ({status})"
@@ -753,21 +993,141 @@ class TestDriveRequest(DbModel):
             models.Index(fields=['granted']),
             models.Index(fields=['testdrive_complete']),
             models.Index(fields=['date_created']),
+            models.Index(fields=['requested_to', 'starts_at']),
+            models.Index(fields=['listing', 'starts_at']),
+            models.Index(fields=['status', 'hold_expires_at']),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=Q(starts_at__isnull=True) | Q(ends_at__gt=models.F('starts_at')), name='testdrive_valid_range',
+            ),
         ]
         ordering = ['-date_created']
         verbose_name = 'Test Drive Request'
         verbose_name_plural = 'Test Drive Requests'
 
 
+def new_calendar_token():
+    return secrets.token_urlsafe(24)
+
+
+class TestDriveSchedule(DbModel):
+    """
+    When a dealership takes test drives: weekly ``windows``, overridden on
+    particular dates by ``exceptions``, cut into ``slot_minutes`` slots.
+    ``capacity`` is how many drives the dealership runs at once; each
+    listing's ``testdrive_capacity`` caps its own. ``calendar_token``
+    authenticates the dealership's .ics feed.
+    """
+    dealer = models.OneToOneField('accounts.Dealership', on_delete=models.CASCADE, related_name='testdrive_schedule')
+    timezone = models.CharField(max_length=64, default='Africa/Lagos')
+    slot_minutes = models.PositiveSmallIntegerField(default=30)
+    capacity = models.PositiveSmallIntegerField(default=1)
+    min_notice_minutes = models.PositiveIntegerField(default=60)
+    horizon_days = models.PositiveSmallIntegerField(default=30)
+    calendar_token = models.CharField(max_length=64, unique=True, default=new_calendar_token)
+
+    def __str__(self):
+        return f"Test drive schedule: {self.dealer.business_name} ({self.timezone})"
+
+    def __repr__(self):
+        return f"<TestDriveSchedule: {self.dealer_id} every {self.slot_minutes}min x{self.capacity}>"
+
+    def clean(self):
+        from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+        from django.core.exceptions import ValidationError
+        if not self.slot_minutes:
+            raise ValidationError({'slot_minutes': 'Slots must be at least a minute long'})
+        try:
+            ZoneInfo(self.timezone)
+        except (ValueError, ZoneInfoNotFoundError):
+            raise ValidationError({'timezone': f'Unknown timezone {self.timezone}'})
+
+    class Meta:
+        verbose_name = 'Test Drive Schedule'
+        verbose_name_plural = 'Test Drive Schedules'
+
+
+class TestDriveWindow(DbModel):
+    """Weekly opening hours for test drives, in the schedule's timezone."""
+    WEEKDAYS = {0: 'Monday', 1: 'Tuesday', 2: 'Wednesday', 3: 'Thursday', 4: 'Friday', 5: 'Saturday', 6: 'Sunday'}
+
+    schedule = models.ForeignKey(TestDriveSchedule, on_delete=models.CASCADE, related_name='windows')
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAYS)
+    starts_at = models.TimeField()
+    ends_at = models.TimeField()
+
+    def __str__(self):
+        return f"{self.get_weekday_display()} {self.starts_at:%H:%M}-{self.ends_at:%H:%M}"
+
+    def __repr__(self):
+        return f"<TestDriveWindow: {self.schedule_id} {self.weekday} {self.starts_at}..{self.ends_at}>"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['schedule', 'weekday']),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=Q(ends_at__gt=models.F('starts_at')), name='testdrive_window_valid_range'),
+        ]
+        ordering = ['weekday', 'starts_at']
+        verbose_name = 'Test Drive Window'
+        verbose_name_plural = 'Test Drive Windows'
+
+
+class TestDriveException(DbModel):
+    """
+    Different hours on one date: a date's exceptions replace its weekly
+    windows. One without times closes the date.
+    """
+    schedule = models.ForeignKey(TestDriveSchedule, on_delete=models.CASCADE, related_name='exceptions')
+    date = models.DateField()
+    starts_at = models.TimeField(blank=True, null=True)
+    ends_at = models.TimeField(blank=True, null=True)
+    note = models.CharField(max_length=200, blank=True, default='')
+
+    @property
+    def closed(self):
+        return self.starts_at is None or self.ends_at is None
+
+    def __str__(self):
+        hours = 'closed' if self.closed else f"{self.starts_at:%H:%M}-{self.ends_at:%H:%M}"
+        return f"{self.date}: {hours}"
+
+    def __repr__(self):
+        return f"<TestDriveException: {self.schedule_id} {self.date} {self.starts_at}..{self.ends_at}>"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['schedule', 'date']),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=Q(starts_at__isnull=True) | Q(ends_at__isnull=True) | Q(ends_at__gt=models.F('starts_at')),
+                name='testdrive_exception_valid_range',
+            ),
+        ]
+        ordering = ['date', 'starts_at']
+        verbose_name = 'Test Drive Exception'
+        verbose_name_plural = 'Test Drive Exceptions'
+
+
 class TradeInRequest(DbModel):
     customer = models.ForeignKey('accounts.Customer', on_delete=models.CASCADE, related_name='tradein_requests')
     to = models.ForeignKey('accounts.Dealership', on_delete=models.CASCADE, related_name='received_tradein_requests')
     vehicle = models.ForeignKey('Vehicle', on_delete=models.CASCADE, related_name='tradein_requests')
-    estimated_value = models.DecimalField(decimal_places=2, max_digits=12)
+    # the valuation model's estimate, for the dealership to review
+    estimated_value = models.DecimalField(decimal_places=2, max_digits=12, blank=True, null=True)
+    # what the customer thinks it is worth, for the dealership to consider
+    asking_value = models.DecimalField(decimal_places=2, max_digits=12, blank=True, null=True)
+    # the dealership's reviewed figure; the only one credited against offers
+    appraised_value = models.DecimalField(decimal_places=2, max_digits=12, blank=True, null=True)
+    appraised_by = models.ForeignKey('accounts.Account', blank=True, null=True, on_delete=models.SET_NULL, related_name='+')
+    appraised_at = models.DateTimeField(blank=True, null=True)
     comments = models.TextField(blank=True, null=True)
 
     def __str__(self):
-        return f'Trade-in: {self.vehicle.name} by {self.customer.user.name} → {self.to.business_name} (₦{self.estimated_value:,.2f})'
+        return f'Trade-in: {self.vehicle.name} by {self.customer.user.name} → {self.to.business_name} ({self.formatted_value})'
     
     def __repr__(self):
         return f"<TradeInRequest: {self.customer.user.email} - ₦{self.estimated_value}>"
@@ -775,6 +1135,8 @@ class TradeInRequest(DbModel):
     @property
     def formatted_value(self):
         """Returns formatted estimated value"""
+        if self.estimated_value is None:
+            return 'Not valued'
         return f"₦{self.estimated_value:,.2f}"
     
     @property
@@ -795,6 +1157,24 @@ class TradeInRequest(DbModel):
         verbose_name_plural = 'Trade-in Requests'
 
 
+class ValuationModelVersion(DbModel):
+    """A trained valuation model (listings.valuation); ``is_current`` marks the one in use."""
+    version = models.CharField(max_length=40, unique=True)
+    data = models.JSONField()
+    is_current = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"Valuation model {self.version}{' (current)' if self.is_current else ''}"
+
+    class Meta:
+        ordering = ['version']
+        constraints = [
+            models.UniqueConstraint(fields=['is_current'], condition=Q(is_current=True), name='one_current_valuation_model'),
+        ]
+        verbose_name = 'Valuation Model'
+        verbose_name_plural = 'Valuation Models'
+
+
 
 
 
@@ -0,0 +1,433 @@
+"""
+Purchase offer negotiation.
+
+A customer makes an offer on a sale listing, optionally with a trade-in
+whose estimated value is credited against it. The side that did not make
+a pending offer answers it:
+
+    make_offer(listing, customer, amount, trade_in)  open a thread
+    counter(offer, by, amount)    close the offer as 'countered' and answer with a new one
+    accept / reject               close the thread
+    withdraw(offer, by)           the side that made the offer takes it back
+    expire_offers()               pending offers past ``expires_at`` (``manage.py expire_offers``)
+    checkout(offer, by)           an accepted offer as an order at the agreed price, once
+    appraise(trade_in, by, value) the dealership's reviewed value of a trade-in
+
+Every transition is a conditional UPDATE on the offer's status and
+``version``: it only succeeds if the offer is still pending, unexpired and
+at the version the caller saw, so of two answers to the same offer one
+wins and the other gets ``OfferError('not_pending')`` or ``('stale')``. A
+partial unique index allows one accepted offer per listing, so accepting
+two offers of different threads at once cannot both succeed either;
+accepting one rejects the listing's other pending offers. Another allows
+one accepted offer per trade-in: once an offer crediting it is accepted,
+the trade-in is used up and refused on any other offer or acceptance.
+
+Customer offers and counter-offers whose net amount (after the trade-in
+credit) is at or above the listing's ``auto_accept_price`` are accepted,
+and those below its ``auto_reject_price`` rejected, on the dealer's behalf.
+Only a trade-in's ``appraised_value``, the figure the dealership reviewed
+(its own or the valuation model's estimate it approved), is ever
+credited; an offer keeps the credit it was made with. Every transition is recorded on the 'offers' audit stream
+and the other side is notified once it commits.
+"""
+import logging
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+from functools import partial
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from listings.models import PurchaseOffer, PurchaseOrder, TradeInRequest
+from utils import audit
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRIES = 50
+
+REASONS = {
+    'not_for_sale': 'Offers can only be made on published sale listings',
+    'sold': 'An offer on this listing has already been accepted',
+    'open_offer': 'You already have an open offer on this listing',
+    'invalid_amount': 'The offer must be more than the trade-in credit',
+    'invalid_trade_in': 'The trade-in must be yours and addressed to this dealership',
+    'trade_in_unvalued': 'The dealership has not appraised the trade-in yet',
+    'invalid_appraisal': 'The appraised value must be positive, or approve an existing estimate',
+    'trade_in_used': 'The trade-in has already been credited on an accepted offer',
+    'not_party': 'You are not part of this negotiation',
+    'not_your_turn': 'Only the other side can answer this offer',
+    'not_yours': 'Only the side that made this offer can withdraw it',
+    'not_pending': 'This offer is no longer open',
+    'expired': 'This offer has expired',
+    'stale': 'This offer has changed since you last saw it',
+    'not_accepted': 'Only accepted offers can be checked out',
+}
+# reasons that mean someone else got there first
+CONFLICTS = ('sold', 'trade_in_used', 'not_pending', 'expired', 'stale')
+OTHER_SIDE = {'customer': 'dealer', 'dealer': 'customer'}
+
+
+class OfferError(Exception):
+    """A negotiation step was refused; ``reason`` is a key of ``REASONS``."""
+
+    def __init__(self, reason, offer=None):
+        self.reason = reason
+        self.offer = offer
+        super().__init__(REASONS[reason])
+
+
+def expiry_duration():
+    return timedelta(hours=getattr(settings, 'OFFER_EXPIRY_HOURS', 48))
+
+
+def side_of(offer, user):
+    """'customer', 'dealer' or None: the side ``user`` negotiates ``offer`` for. Staff act for the dealer."""
+    if user is None:
+        return None
+    if offer.bidder.user_id == user.pk:
+        return 'customer'
+    if offer.listing.vehicle.dealer.user_id == user.pk or user.is_staff:
+        return 'dealer'
+    return None
+
+
+def _atomic(func):
+    """Run ``func`` atomically, retrying lock timeouts when we own the transaction."""
+    attempts = 1 if connection.in_atomic_block else MAX_RETRIES
+    for attempt in range(attempts):
+        try:
+            with transaction.atomic():
+                return func()
+        except OperationalError:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(random.uniform(0.001, 0.01) * (attempt + 1))
+
+
+def _answering(offer, by):
+    """The side answering ``offer`` as ``by``; None (the dealer's thresholds) answers for the dealer."""
+    side = 'dealer' if by is None else side_of(offer, by)
+    if side is None:
+        raise OfferError('not_party', offer)
+    if side == offer.made_by:
+        raise OfferError('not_your_turn', offer)
+    return side
+
+
+def _transition(offer, to_status, version, moment):
+    """Move a pending offer to ``to_status`` if nobody else moved it since ``version``."""
+    version = offer.version if version is None else version
+    claimed = PurchaseOffer.objects.filter(
+        Q(expires_at__isnull=True) | Q(expires_at__gt=moment), pk=offer.pk, status='pending', version=version,
+    ).update(status=to_status, version=F('version') + 1, responded_at=moment, last_updated=moment)
+    offer.refresh_from_db()
+    if not claimed:
+        if offer.status != 'pending':
+            raise OfferError('not_pending', offer)
+        raise OfferError('stale' if offer.version != version else 'expired', offer)
+
+
+def _trade_in_used(trade_in_id, exclude=None):
+    if trade_in_id is None:
+        return False
+    return PurchaseOffer.objects.filter(trade_in_id=trade_in_id, status='accepted').exclude(pk=exclude).exists()
+
+
+def _create(listing, customer, amount, made_by, moment, parent=None, trade_in=None, credit=Decimal('0.00'), message=''):
+    if amount <= credit:
+        raise OfferError('invalid_amount')
+    if PurchaseOffer.objects.filter(listing=listing, status='accepted').exists():
+        raise OfferError('sold')
+    if trade_in is not None and _trade_in_used(trade_in.pk):
+        raise OfferError('trade_in_used')
+    offer = PurchaseOffer.objects.create(
+        bidder=customer, listing=listing, amount=amount, made_by=made_by, parent=parent, trade_in=trade_in,
+        trade_in_credit=credit, message=message[:500], expires_at=moment + expiry_duration(),
+    )
+    listing.offers.add(offer)
+    return offer
+
+
+def make_offer(listing, customer, amount, trade_in=None, message='', now=None):
+    """Open a negotiation on ``listing``. The dealer is notified, or the listing's thresholds answer at once."""
+    moment = now or timezone.now()
+    amount = Decimal(amount)
+    if listing.listing_type != 'sale' or not listing.verified:
+        raise OfferError('not_for_sale')
+    credit = Decimal('0.00')
+    if trade_in is not None:
+        if trade_in.customer_id != customer.pk or trade_in.to_id != listing.vehicle.dealer_id:
+            raise OfferError('invalid_trade_in')
+        if trade_in.appraised_value is None:
+            raise OfferError('trade_in_unvalued')
+        if _trade_in_used(trade_in.pk):
+            raise OfferError('trade_in_used')
+        credit = trade_in.appraised_value
+
+    def _make():
+        open_offers = PurchaseOffer.objects.filter(
+            Q(expires_at__isnull=True) | Q(expires_at__gt=moment), listing=listing, bidder=customer, status='pending',
+        )
+        if open_offers.exists():
+            raise OfferError('open_offer')
+        offer = _create(listing, customer, amount, 'customer', moment, trade_in=trade_in, credit=credit, message=message)
+        _record('offer_made', offer, customer.user)
+        _notify_on_commit(
+            listing.vehicle.dealer.user, 'New offer',
+            f"{customer.user.name} offered {offer.formatted_amount} for {listing.title}.", offer,
+        )
+        return _auto_answer(offer, moment)
+
+    return _atomic(_make)
+
+
+def counter(offer, by, amount, message='', version=None, now=None):
+    """Answer a pending offer with another amount. Returns the counter-offer."""
+    moment = now or timezone.now()
+    amount = Decimal(amount)
+
+    def _counter():
+        side = _answering(offer, by)
+        if amount <= offer.trade_in_credit:
+            raise OfferError('invalid_amount', offer)
+        _transition(offer, 'countered', version, moment)
+        reply = _create(
+            offer.listing, offer.bidder, amount, side, moment, parent=offer, trade_in=offer.trade_in,
+            credit=offer.trade_in_credit, message=message,
+        )
+        _record('offer_countered', offer, by, {'counter_offer': str(reply.uuid), 'amount': reply.amount})
+        _notify_on_commit(
+            _user(offer, offer.made_by), 'Counter-offer',
+            f"Your offer of {offer.formatted_amount} for {offer.listing.title} was countered with {reply.formatted_amount}.", reply,
+        )
+        return _auto_answer(reply, moment)
+
+    return _atomic(_counter)
+
+
+def _accept(offer, by, version, moment):
+    if _trade_in_used(offer.trade_in_id, exclude=offer.pk):
+        raise OfferError('trade_in_used', offer)
+    try:
+        with transaction.atomic():
+            _transition(offer, 'accepted', version, moment)
+    except IntegrityError:
+        # another thread of the listing, or another offer crediting the
+        # same trade-in, was accepted first
+        if _trade_in_used(offer.trade_in_id, exclude=offer.pk):
+            raise OfferError('trade_in_used', offer)
+        raise OfferError('sold', offer)
+    _record('offer_accepted', offer, by, {'auto': by is None})
+    _notify_on_commit(
+        _user(offer, offer.made_by), 'Offer accepted',
+        f"The offer of {offer.formatted_amount} for {offer.listing.title} was accepted.", offer,
+    )
+    # nobody else can buy the vehicle now
+    others = PurchaseOffer.objects.filter(listing_id=offer.listing_id, status='pending').exclude(pk=offer.pk)
+    for other in others.select_related('bidder__user', 'listing__vehicle__dealer__user'):
+        try:
+            _transition(other, 'rejected', None, moment)
+        except OfferError:
+            continue
+        _record('offer_rejected', other, None, {'reason': 'sold'})
+        _notify_on_commit(
+            other.bidder.user, 'Offer closed',
+            f"{other.listing.title} has been sold to another buyer, so your offer was closed.", other,
+        )
+    return offer
+
+
+def accept(offer, by, version=None, now=None):
+    """Accept a pending offer; the other pending offers on the listing are rejected."""
+    moment = now or timezone.now()
+
+    def _accept_answer():
+        _answering(offer, by)
+        return _accept(offer, by, version, moment)
+
+    return _atomic(_accept_answer)
+
+
+def _reject(offer, by, reason, version, moment):
+    _transition(offer, 'rejected', version, moment)
+    _record('offer_rejected', offer, by, {'reason': reason, 'auto': by is None})
+    message = f"Your offer of {offer.formatted_amount} for {offer.listing.title} was declined."
+    if reason:
+        message += f" Reason: {reason}"
+    _notify_on_commit(_user(offer, offer.made_by), 'Offer declined', message, offer)
+    return offer
+
+
+def reject(offer, by, reason='', version=None, now=None):
+    """Decline a pending offer, ending the negotiation."""
+    moment = now or timezone.now()
+
+    def _reject_answer():
+        _answering(offer, by)
+        return _reject(offer, by, reason[:500], version, moment)
+
+    return _atomic(_reject_answer)
+
+
+def withdraw(offer, by, version=None, now=None):
+    """Take back a pending offer ``by`` made."""
+    moment = now or timezone.now()
+
+    def _withdraw():
+        side = side_of(offer, by)
+        if side is None:
+            raise OfferError('not_party', offer)
+        if side != offer.made_by:
+            raise OfferError('not_yours', offer)
+        _transition(offer, 'withdrawn', version, moment)
+        _record('offer_withdrawn', offer, by)
+        _notify_on_commit(
+            _user(offer, OTHER_SIDE[side]), 'Offer withdrawn',
+            f"The offer of {offer.formatted_amount} for {offer.listing.title} was withdrawn.", offer,
+        )
+        return offer
+
+    return _atomic(_withdraw)
+
+
+def _auto_answer(offer, moment):
+    # the dealer's thresholds answer customer offers, on what the dealer
+    # would actually be paid
+    listing = offer.listing
+    if offer.made_by != 'customer':
+        return offer
+    try:
+        if listing.auto_accept_price is not None and offer.net_amount >= listing.auto_accept_price:
+            return _accept(offer, None, None, moment)
+        if listing.auto_reject_price is not None and offer.net_amount < listing.auto_reject_price:
+            return _reject(offer, None, 'below the asking range', None, moment)
+    except OfferError as e:
+        logger.info(f"Left offer {offer.uuid} pending: {e}")
+    return offer
+
+
+def expire_offers(now=None):
+    """Mark pending offers past ``expires_at`` as expired. Returns the number expired."""
+    now = now or timezone.now()
+    expired = 0
+    due = PurchaseOffer.objects.filter(status='pending', expires_at__lte=now).select_related(
+        'bidder__user', 'listing__vehicle__dealer__user',
+    )
+    for offer in due.iterator(chunk_size=500):
+        claimed = PurchaseOffer.objects.filter(pk=offer.pk, status='pending', version=offer.version).update(
+            status='expired', version=F('version') + 1, last_updated=now,
+        )
+        if not claimed:
+            continue
+        expired += 1
+        _record('offer_expired', offer, None)
+        for user in (offer.bidder.user, offer.listing.vehicle.dealer.user):
+            _notify(user, 'Offer expired', f"The offer of {offer.formatted_amount} for {offer.listing.title} expired.", offer.uuid)
+    logger.info(f"Expired {expired} purchase offers")
+    return expired
+
+
+def checkout(offer, by, payment_option='pay-after-inspection'):
+    """
+    ``(order, created)`` for an accepted offer: the order is created at the
+    offer's price less the trade-in credit on the first call and returned
+    as is after that. Only the customer checks out.
+    """
+    def _checkout():
+        if side_of(offer, by) != 'customer':
+            raise OfferError('not_party', offer)
+        offer.refresh_from_db()
+        if offer.status != 'accepted':
+            raise OfferError('not_accepted', offer)
+        existing = PurchaseOrder.objects.filter(offer=offer).first()
+        if existing is not None:
+            return existing, False
+        listing = offer.listing
+        order = PurchaseOrder.objects.create(
+            customer=offer.bidder, order_type='sale', order_item=listing, payment_option=payment_option,
+            paid=payment_option == 'card', offer=offer, agreed_price=offer.net_amount,
+        )
+        listing.vehicle.available = False
+        listing.vehicle.save()
+        offer.bidder.orders.add(order)
+        listing.vehicle.dealer.orders.add(order)
+        _record('offer_checked_out', offer, by, {'order': str(order.uuid), 'agreed_price': order.agreed_price})
+        _notify_on_commit(
+            listing.vehicle.dealer.user, 'Offer checked out',
+            f"{offer.bidder.user.name} placed an order for {listing.title} at {offer.formatted_amount}.", offer,
+        )
+        return order, True
+
+    try:
+        return _atomic(_checkout)
+    except IntegrityError:
+        # a concurrent checkout of the same offer created it
+        return PurchaseOrder.objects.get(offer=offer), False
+
+
+def appraise(trade_in, by, value=None, now=None):
+    """
+    Record what ``trade_in`` is worth to its dealership: ``value``, or the
+    valuation model's estimate when none is given. A trade-in already
+    credited on an accepted offer cannot be appraised again.
+    """
+    moment = now or timezone.now()
+    value = trade_in.estimated_value if value is None else Decimal(value)
+    if value is None or value <= 0:
+        raise OfferError('invalid_appraisal')
+
+    def _appraise():
+        if _trade_in_used(trade_in.pk):
+            raise OfferError('trade_in_used')
+        TradeInRequest.objects.filter(pk=trade_in.pk).update(
+            appraised_value=value, appraised_by=by, appraised_at=moment, last_updated=moment,
+        )
+        trade_in.refresh_from_db()
+        transaction.on_commit(partial(
+            audit.record, 'offers', 'trade_in_appraised', actor=by, obj=trade_in,
+            details={'appraised_value': trade_in.appraised_value, 'estimated_value': trade_in.estimated_value},
+        ))
+        return trade_in
+
+    return _atomic(_appraise)
+
+
+# audit and notifications
+
+def _record(action, offer, by, details=None):
+    transaction.on_commit(partial(
+        audit.record, 'offers', action, actor=by, obj=offer,
+        details={
+            'listing': str(offer.listing.uuid), 'status': offer.status, 'amount': offer.amount,
+            'trade_in_credit': offer.trade_in_credit, 'version': offer.version, **(details or {}),
+        },
+    ))
+
+
+def _user(offer, side):
+    return offer.bidder.user if side == 'customer' else offer.listing.vehicle.dealer.user
+
+
+def _notify(user, subject, message, offer_id):
+    from feedback.models import create_and_send_user_notifications
+
+    try:
+        create_and_send_user_notifications(
+            user=user,
+            subject=subject,
+            message=message,
+            cta_text='View Offer',
+            cta_link=f'/offers/{offer_id}',
+            category='orders',
+        )
+    except Exception as e:
+        logger.error(f"Failed to notify {user.email} about offer {offer_id}: {e}")
+
+
+def _notify_on_commit(user, subject, message, offer):
+    transaction.on_commit(partial(_notify, user, subject, message, offer.uuid))
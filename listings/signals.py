@@ -1,6 +1,6 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
 from django.dispatch import receiver
-from .models import Listing, ListingBoost, Order
+from .models import Coupon, Listing, ListingBoost, Order, RentalOrder
 from accounts.models import Customer
 from feedback.models import create_and_send_user_notifications
 import threading
@@ -8,7 +8,7 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-def _broadcast_worker(subject, message, cta_link=None, cta_text=None, level='info'):
+def _broadcast_worker(subject, message, cta_link=None, cta_text=None, level='info', category='listings'):
     try:
         customers = Customer.objects.select_related('user').all()
         count = 0
@@ -20,17 +20,18 @@ def _broadcast_worker(subject, message, cta_link=None, cta_text=None, level='inf
                 level=level,
                 cta_link=cta_link,
                 cta_text=cta_text,
+                category=category,
             )
             count += 1
         logger.info(f"Broadcasted notification '{subject}' to {count} customers.")
     except Exception as e:
         logger.error(f"Error broadcasting notification: {e}")
 
-def broadcast_notification(subject, message, cta_link=None, cta_text=None, level='info'):
+def broadcast_notification(subject, message, cta_link=None, cta_text=None, level='info', category='listings'):
     # Run in thread to avoid blocking response
     t = threading.Thread(
         target=_broadcast_worker, 
-        args=(subject, message, cta_link, cta_text, level), 
+        args=(subject, message, cta_link, cta_text, level, category), 
         daemon=True
     )
     t.start()
@@ -112,4 +113,52 @@ def order_post_save(sender, instance, created, **kwargs):
             level='info',
             cta_text='View Order',
             cta_link=order_link,
+            category='orders',
         )
+
+
+# post_save only fires for the class saved, and a rental may be saved as
+# either its Order row or its RentalOrder
+@receiver(post_save, sender=Order)
+@receiver(post_save, sender=RentalOrder)
+def release_rental_dates(sender, instance, created, **kwargs):
+    from .availability import RELEASED_STATUSES, release
+
+    if instance.order_type == 'rental' and instance.order_status in RELEASED_STATUSES:
+        release(instance.pk)
+
+
+# --- Coupon Signals ---
+# listings.coupons caches each coupon's rules by code
+
+@receiver(pre_save, sender=Coupon)
+def coupon_pre_save(sender, instance, **kwargs):
+    from .coupons import forget
+
+    if instance.pk:
+        # the old code must not keep resolving after a rename
+        forget(Coupon.objects.filter(pk=instance.pk).values_list('code', flat=True).first())
+
+@receiver(post_save, sender=Coupon)
+@receiver(post_delete, sender=Coupon)
+def coupon_changed(sender, instance, **kwargs):
+    from .coupons import forget
+
+    forget(instance.code)
+
+@receiver(m2m_changed, sender=Coupon.users.through)
+@receiver(m2m_changed, sender=Coupon.valid_in.through)
+def coupon_scope_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    from .coupons import forget
+
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        forget(instance.code)
+        return
+    # changed from the customer or dealership side
+    if action == 'pre_clear':
+        field = 'users' if sender is Coupon.users.through else 'valid_in'
+        pk_set = Coupon.objects.filter(**{field: instance}).values_list('pk', flat=True)
+    for code in Coupon.objects.filter(pk__in=pk_set).values_list('code', flat=True):
+        forget(code)
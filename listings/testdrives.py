@@ -0,0 +1,470 @@
+"""
+Test-drive scheduling.
+
+A dealership's ``TestDriveSchedule`` offers slots of ``slot_minutes``
+inside its weekly ``windows``; a date with ``exceptions`` uses those
+instead (or is closed). A slot is free while fewer than the schedule's
+``capacity`` drives at the dealership, and fewer than the listing's
+``testdrive_capacity`` drives of the listing, overlap it. Booked drives and
+held drives whose hold has not expired count (``active_q``).
+
+    slots(listing, start, days)          a listing's free slots
+    dealer_slots(dealer_ids, start, days) the free slots of many dealerships
+    reserve / confirm / reschedule / cancel
+    calendar(schedule)                    a dealership's drives as .ics
+
+Slot generation does not query per day or per slot: schedules, their
+windows and their exceptions come in as plain rows (three queries), the
+active drives in the range in one more, and slots are worked out in epoch
+seconds, every slot's load in one merge pass over the drives' sorted start
+and end times.
+
+``reserve`` holds a slot for ``TESTDRIVE_HOLD_MINUTES`` until the customer
+confirms it. A customer holds at most one unconfirmed slot per listing and
+``TESTDRIVE_MAX_HOLDS`` per dealership, so one account cannot tie up a
+dealership's calendar by holding and releasing slots. Reservations, confirmations and reschedules take the
+schedule's row lock before counting the drives overlapping the slot, so
+concurrent requests for a dealership's last free place cannot both get
+it. Expired holds stop counting at once; ``expire_holds`` (``manage.py
+expire_testdrive_holds``) only marks them.
+"""
+import logging
+import random
+import time
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from functools import partial
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from listings.models import TestDriveException, TestDriveRequest, TestDriveSchedule, TestDriveWindow
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRIES = 50
+MAX_DAYS = 62
+# past drives stay in the calendar feed this long
+CALENDAR_PAST_DAYS = 30
+
+Slot = namedtuple('Slot', 'starts_at ends_at remaining')
+# a schedule as plain values; windows map weekdays and exceptions dates to
+# [(opens, closes)], None standing for a closed date
+PLAN_FIELDS = ('dealer_id', 'timezone', 'slot_minutes', 'capacity', 'min_notice_minutes', 'horizon_days')
+Plan = namedtuple('Plan', [*PLAN_FIELDS, 'windows', 'exceptions'])
+
+REASONS = {
+    'no_schedule': 'This dealership does not take test drive bookings',
+    'not_offered': 'This time is not an available test drive slot',
+    'full': 'This slot is fully booked',
+    'already_held': 'You already hold a test drive slot for this vehicle; confirm or cancel it first',
+    'too_many_holds': 'You hold too many unconfirmed test drive slots at this dealership; confirm or cancel one first',
+    'hold_expired': 'The hold on this slot has expired',
+    'not_active': 'This test drive is no longer active',
+}
+
+
+class SlotUnavailable(Exception):
+    """A slot could not be reserved; ``reason`` is a key of ``REASONS``."""
+
+    def __init__(self, starts_at, reason):
+        self.starts_at = starts_at
+        self.reason = reason
+        super().__init__(f"{starts_at}: {REASONS[reason]}")
+
+
+def active_q(now=None):
+    """Drives that take up capacity at ``now``."""
+    return Q(status='booked') | Q(status='held', hold_expires_at__gt=now or timezone.now())
+
+
+def hold_duration():
+    return timedelta(minutes=getattr(settings, 'TESTDRIVE_HOLD_MINUTES', 15))
+
+
+def max_holds():
+    return getattr(settings, 'TESTDRIVE_MAX_HOLDS', 3)
+
+
+# slot generation
+
+def _validate_days(days):
+    if not 1 <= days <= MAX_DAYS:
+        raise ValueError(f"days must be between 1 and {MAX_DAYS}")
+
+
+def plans(dealer_ids, start_date, days):
+    """
+    ``{dealer_id: Plan}`` for the dealerships in ``dealer_ids`` that have a
+    schedule, with the exceptions of the ``days`` dates from
+    ``start_date``. Three queries, no model instances.
+    """
+    by_schedule = {
+        pk: Plan(*fields, defaultdict(list), defaultdict(list))
+        for pk, *fields in TestDriveSchedule.objects.filter(dealer_id__in=dealer_ids).values_list('pk', *PLAN_FIELDS)
+    }
+    if not by_schedule:
+        return {}
+    windows = TestDriveWindow.objects.filter(schedule_id__in=list(by_schedule))
+    for schedule_id, weekday, opens, closes in windows.values_list('schedule_id', 'weekday', 'starts_at', 'ends_at'):
+        by_schedule[schedule_id].windows[weekday].append((opens, closes))
+    exceptions = TestDriveException.objects.filter(
+        schedule_id__in=list(by_schedule), date__gte=start_date, date__lt=start_date + timedelta(days=days),
+    )
+    for schedule_id, day, opens, closes in exceptions.values_list('schedule_id', 'date', 'starts_at', 'ends_at'):
+        by_schedule[schedule_id].exceptions[day].append(None if opens is None or closes is None else (opens, closes))
+    return {plan.dealer_id: plan for plan in by_schedule.values()}
+
+
+def candidates(plan, start_date, days, now):
+    """
+    The start times, in epoch seconds, of ``plan``'s slots on the ``days``
+    dates from ``start_date`` (local dates), sorted, leaving out slots
+    inside the minimum notice or past the booking horizon.
+    """
+    tz = ZoneInfo(plan.timezone)
+    step = plan.slot_minutes * 60
+    earliest = now.timestamp() + plan.min_notice_minutes * 60
+    latest = now.timestamp() + plan.horizon_days * 86400
+    starts = set()
+    for offset in range(days):
+        day = start_date + timedelta(days=offset)
+        hours = plan.exceptions[day] if day in plan.exceptions else plan.windows.get(day.weekday(), ())
+        for opening in hours:
+            if opening is None:
+                continue
+            opens = int(datetime.combine(day, opening[0], tzinfo=tz).timestamp())
+            closes = int(datetime.combine(day, opening[1], tzinfo=tz).timestamp())
+            starts.update(start for start in range(opens, closes - step + 1, step) if earliest <= start <= latest)
+    return sorted(starts)
+
+
+def _loads(starts, step, drives):
+    """
+    How many of ``drives`` (``(start, end)`` pairs) overlap each slot
+    starting at ``starts``: one merge pass over the drives' sorted start and
+    end times, counting those that started before the slot ends less those
+    that ended before it started.
+    """
+    begins, ends = sorted(start for start, _ in drives), sorted(end for _, end in drives)
+    loads, begun, ended = [], 0, 0
+    for start in starts:
+        while begun < len(begins) and begins[begun] < start + step:
+            begun += 1
+        while ended < len(ends) and ends[ended] <= start:
+            ended += 1
+        loads.append(begun - ended)
+    return loads
+
+
+def _free(plan, starts, limits):
+    """Slots starting at ``starts`` with room under every ``(capacity, drives)`` in ``limits``."""
+    tz, step = ZoneInfo(plan.timezone), plan.slot_minutes * 60
+    remaining = [min(room) for room in zip(*(
+        [capacity - load for load in _loads(starts, step, drives)] for capacity, drives in limits
+    ))]
+    return [
+        Slot(datetime.fromtimestamp(start, tz), datetime.fromtimestamp(start + step, tz), room)
+        for start, room in zip(starts, remaining) if room > 0
+    ]
+
+
+def _active_drives(now, first, last, **filters):
+    """Active drives overlapping ``[first, last)`` (epoch seconds)."""
+    return TestDriveRequest.objects.filter(
+        active_q(now), starts_at__lt=datetime.fromtimestamp(last, dt_timezone.utc),
+        ends_at__gt=datetime.fromtimestamp(first, dt_timezone.utc), **filters,
+    )
+
+
+def slots(listing, start_date, days=7, now=None):
+    """``listing``'s free slots on the ``days`` dates from ``start_date``, in four queries."""
+    _validate_days(days)
+    now = now or timezone.now()
+    dealer_id = listing.vehicle.dealer_id
+    plan = plans([dealer_id], start_date, days).get(dealer_id)
+    starts = candidates(plan, start_date, days, now) if plan else []
+    if not starts:
+        return []
+    dealer, own = [], []
+    rows = _active_drives(now, starts[0], starts[-1] + plan.slot_minutes * 60, requested_to_id=dealer_id)
+    for listing_id, starts_at, ends_at in rows.values_list('listing_id', 'starts_at', 'ends_at'):
+        dealer.append((starts_at.timestamp(), ends_at.timestamp()))
+        if listing_id == listing.pk:
+            own.append(dealer[-1])
+    return _free(plan, starts, [(plan.capacity, dealer), (listing.testdrive_capacity, own)])
+
+
+def dealer_slots(dealer_ids, start_date, days=7, now=None):
+    """
+    ``{dealer_id: [Slot, ...]}`` for every dealership in ``dealer_ids``
+    with a schedule, by dealership capacity only. Four queries however
+    many dealerships there are.
+    """
+    _validate_days(days)
+    now = now or timezone.now()
+    found = plans(dealer_ids, start_date, days)
+    starts = {dealer_id: candidates(plan, start_date, days, now) for dealer_id, plan in found.items()}
+    drives = defaultdict(list)
+    bounds = [(dealer_starts[0], dealer_starts[-1] + found[dealer_id].slot_minutes * 60)
+              for dealer_id, dealer_starts in starts.items() if dealer_starts]
+    if bounds:
+        first, last = min(start for start, _ in bounds), max(end for _, end in bounds)
+        rows = _active_drives(now, first, last, requested_to_id__in=list(found))
+        for dealer_id, starts_at, ends_at in rows.values_list('requested_to_id', 'starts_at', 'ends_at').iterator(chunk_size=5000):
+            drives[dealer_id].append((starts_at.timestamp(), ends_at.timestamp()))
+    return {
+        dealer_id: _free(plan, starts[dealer_id], [(plan.capacity, drives[dealer_id])])
+        for dealer_id, plan in found.items()
+    }
+
+
+# reservations
+
+def _atomic(func):
+    """Run ``func`` atomically, retrying lock timeouts when we own the transaction."""
+    attempts = 1 if connection.in_atomic_block else MAX_RETRIES
+    for attempt in range(attempts):
+        try:
+            with transaction.atomic():
+                return func()
+        except OperationalError:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(random.uniform(0.001, 0.01) * (attempt + 1))
+
+
+def _lock(dealer_id, starts_at=None):
+    # an UPDATE takes the schedule's row lock (the write lock on SQLite), so
+    # bookings at one dealership serialize here; see listings.availability
+    if not TestDriveSchedule.objects.filter(dealer_id=dealer_id).update(last_updated=timezone.now()):
+        raise SlotUnavailable(starts_at, 'no_schedule')
+    return TestDriveSchedule.objects.get(dealer_id=dealer_id)
+
+
+def _check(schedule, listing, starts_at, now, exclude=None, customer=None):
+    """
+    The end of the slot at ``starts_at`` if it is offered and has room, and
+    ``customer`` (when given) may hold another slot; call with the schedule
+    locked.
+    """
+    if customer is not None:
+        holds = TestDriveRequest.objects.filter(
+            requested_by=customer, requested_to_id=schedule.dealer_id, status='held', hold_expires_at__gt=now,
+        ).exclude(pk=exclude).aggregate(dealer=Count('pk'), listing=Count('pk', filter=Q(listing_id=listing.pk)))
+        if holds['listing']:
+            raise SlotUnavailable(starts_at, 'already_held')
+        if holds['dealer'] >= max_holds():
+            raise SlotUnavailable(starts_at, 'too_many_holds')
+    day = starts_at.astimezone(ZoneInfo(schedule.timezone)).date()
+    if starts_at.timestamp() not in candidates(plans([schedule.dealer_id], day, 1)[schedule.dealer_id], day, 1, now):
+        raise SlotUnavailable(starts_at, 'not_offered')
+    ends_at = starts_at + timedelta(minutes=schedule.slot_minutes)
+    load = TestDriveRequest.objects.filter(
+        active_q(now), requested_to_id=schedule.dealer_id, starts_at__lt=ends_at, ends_at__gt=starts_at,
+    ).exclude(pk=exclude).aggregate(dealer=Count('pk'), listing=Count('pk', filter=Q(listing_id=listing.pk)))
+    if load['dealer'] >= schedule.capacity or load['listing'] >= listing.testdrive_capacity:
+        raise SlotUnavailable(starts_at, 'full')
+    return ends_at
+
+
+def reserve(listing, customer, starts_at, now=None):
+    """Hold the slot at ``starts_at`` on ``listing`` for ``customer``, or raise ``SlotUnavailable``."""
+    dealer_id = listing.vehicle.dealer_id
+
+    def _reserve():
+        schedule = _lock(dealer_id, starts_at)
+        # read the clock after the lock, so holds expire in lock order
+        moment = now or timezone.now()
+        ends_at = _check(schedule, listing, starts_at, moment, customer=customer)
+        return TestDriveRequest.objects.create(
+            requested_by=customer, requested_to_id=dealer_id, listing=listing, status='held',
+            starts_at=starts_at, ends_at=ends_at, hold_expires_at=moment + hold_duration(),
+        )
+
+    return _atomic(_reserve)
+
+
+def _refresh_active(drive, now):
+    drive.refresh_from_db()
+    if drive.status == 'held' and drive.hold_expires_at <= now:
+        raise SlotUnavailable(drive.starts_at, 'hold_expired')
+    if drive.status not in ('held', 'booked'):
+        raise SlotUnavailable(drive.starts_at, 'not_active')
+
+
+def confirm(drive, now=None):
+    """Book a held drive while its hold lasts. The dealership and the customer are notified."""
+
+    def _confirm():
+        schedule = _lock(drive.requested_to_id, drive.starts_at)
+        moment = now or timezone.now()
+        _refresh_active(drive, moment)
+        if drive.status == 'booked':
+            return drive
+        drive.status, drive.granted, drive.hold_expires_at = 'booked', True, None
+        drive.save(update_fields=['status', 'granted', 'hold_expires_at', 'last_updated'])
+        when = _local(schedule, drive.starts_at)
+        _notify_on_commit(
+            drive.requested_to.user, 'New test drive booked',
+            f"{drive.requested_by.user.name} booked a test drive of {drive.listing.title} on {when}.", drive,
+        )
+        _notify_on_commit(
+            drive.requested_by.user, 'Test drive booked',
+            f"Your test drive of {drive.listing.title} with {drive.requested_to.business_name} is booked for {when}.", drive,
+        )
+        return drive
+
+    return _atomic(_confirm)
+
+
+def reschedule(drive, starts_at, by, now=None):
+    """Move an active drive to the slot at ``starts_at``. The other participant is notified."""
+
+    def _reschedule():
+        schedule = _lock(drive.requested_to_id, starts_at)
+        moment = now or timezone.now()
+        _refresh_active(drive, moment)
+        ends_at = _check(schedule, drive.listing, starts_at, moment, exclude=drive.pk)
+        previous = _local(schedule, drive.starts_at)
+        drive.starts_at, drive.ends_at, drive.revision = starts_at, ends_at, drive.revision + 1
+        drive.save(update_fields=['starts_at', 'ends_at', 'revision', 'last_updated'])
+        if drive.status == 'booked' or by != drive.requested_by.user:
+            _notify_on_commit(
+                _other_party(drive, by), 'Test drive rescheduled',
+                f"The test drive of {drive.listing.title} on {previous} was moved to {_local(schedule, starts_at)}.", drive,
+            )
+        return drive
+
+    return _atomic(_reschedule)
+
+
+def cancel(drive, by, reason='', now=None):
+    """Cancel an active drive, freeing its slot. The other participant is notified."""
+    moment = now or timezone.now()
+    with transaction.atomic():
+        _refresh_active(drive, moment)
+        was_booked = drive.status == 'booked'
+        claimed = TestDriveRequest.objects.filter(pk=drive.pk, status=drive.status).update(
+            status='cancelled', cancelled_at=moment, cancelled_by=by, cancel_reason=reason[:500],
+            revision=drive.revision + 1, last_updated=moment,
+        )
+        if not claimed:
+            raise SlotUnavailable(drive.starts_at, 'not_active')
+        drive.refresh_from_db()
+        # a customer dropping an unconfirmed hold is no news to the dealership
+        if was_booked or by != drive.requested_by.user:
+            schedule = TestDriveSchedule.objects.filter(dealer_id=drive.requested_to_id).first()
+            message = f"The test drive of {drive.listing.title} on {_local(schedule, drive.starts_at)} was cancelled."
+            if reason:
+                message += f" Reason: {reason}"
+            _notify_on_commit(_other_party(drive, by), 'Test drive cancelled', message, drive)
+    return drive
+
+
+def expire_holds(now=None):
+    """Mark held drives whose hold has run out as expired. Returns the number expired."""
+    now = now or timezone.now()
+    expired = TestDriveRequest.objects.filter(status='held', hold_expires_at__lte=now).update(
+        status='expired', last_updated=now,
+    )
+    logger.info(f"Expired {expired} test drive holds")
+    return expired
+
+
+# notifications
+
+def _local(schedule, moment):
+    tz = ZoneInfo(schedule.timezone) if schedule is not None else timezone.get_current_timezone()
+    return f"{moment.astimezone(tz):%a %d %b %Y, %H:%M}"
+
+
+def _other_party(drive, by):
+    return drive.requested_to.user if by == drive.requested_by.user else drive.requested_by.user
+
+
+def _notify(user, subject, message, drive_id):
+    from feedback.models import create_and_send_user_notifications
+
+    try:
+        create_and_send_user_notifications(
+            user=user,
+            subject=subject,
+            message=message,
+            cta_text='View Test Drive',
+            cta_link=f'/testdrives/{drive_id}',
+            category='orders',
+        )
+    except Exception as e:
+        logger.error(f"Failed to notify {user.email} about test drive {drive_id}: {e}")
+
+
+def _notify_on_commit(user, subject, message, drive):
+    transaction.on_commit(partial(_notify, user, subject, message, drive.uuid))
+
+
+# calendar feed
+
+def _ics_escape(text):
+    return str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n')
+
+
+def _ics_time(moment):
+    return moment.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _fold(line):
+    # RFC 5545: lines of at most 75 octets, continued after CRLF and a space
+    parts, current, size, limit = [], '', 0, 75
+    for char in line:
+        width = len(char.encode())
+        if size + width > limit:
+            parts.append(current)
+            current, size, limit = '', 0, 74
+        current += char
+        size += width
+    parts.append(current)
+    return '\r\n '.join(parts)
+
+
+def calendar(schedule, now=None):
+    """
+    ``schedule``'s dealership's booked, completed and cancelled drives from
+    ``CALENDAR_PAST_DAYS`` ago on, as an iCalendar document. Cancelled drives
+    stay in the feed with STATUS:CANCELLED so subscribed calendars drop them.
+    """
+    now = now or timezone.now()
+    drives = TestDriveRequest.objects.filter(
+        requested_to_id=schedule.dealer_id, status__in=['booked', 'completed', 'cancelled'],
+        starts_at__gte=now - timedelta(days=CALENDAR_PAST_DAYS),
+    ).select_related('listing', 'requested_by__user').order_by('starts_at')
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Veyu//Test Drives//EN',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_ics_escape(f"Test drives - {schedule.dealer.business_name}")}',
+        f'X-WR-TIMEZONE:{schedule.timezone}',
+    ]
+    for drive in drives:
+        customer = drive.requested_by
+        contact = ', '.join(filter(None, [customer.user.name, customer.user.email, customer.phone_number]))
+        lines += [
+            'BEGIN:VEVENT',
+            f'UID:testdrive-{drive.uuid}@veyu',
+            f'DTSTAMP:{_ics_time(drive.last_updated)}',
+            f'DTSTART:{_ics_time(drive.starts_at)}',
+            f'DTEND:{_ics_time(drive.ends_at)}',
+            f'SEQUENCE:{drive.revision}',
+            f'STATUS:{"CANCELLED" if drive.status == "cancelled" else "CONFIRMED"}',
+            f'SUMMARY:{_ics_escape(f"Test drive: {drive.listing.title}")}',
+            f'DESCRIPTION:{_ics_escape(f"Customer: {contact}")}',
+            'END:VEVENT',
+        ]
+    lines.append('END:VCALENDAR')
+    return ''.join(f'{_fold(line)}\r\n' for line in lines)
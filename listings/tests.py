@@ -1,6 +1,40 @@
-from django.test import TestCase
+import io
+import json
+import random
+import threading
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from functools import partial
+from importlib import import_module
+from unittest import mock
+from zoneinfo import ZoneInfo
+
+import requests
+
+from django.apps import apps as django_apps
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
 from django.contrib.auth import get_user_model
-from accounts.models import Dealership
+from rest_framework.test import APIClient
+from accounts.models import Customer, Dealership
+from listings import inventory
+from listings.api.filters import CarRentalFilter
+from listings.availability import VehicleUnavailable, block_dates, book_rental, is_available, month_grid
+from listings.coupons import CouponRule, CouponUnavailable, evaluate, lookup, price, redeem
+from listings import offers, testdrives, valuation
+from listings.offers import OfferError
+from listings.testdrives import SlotUnavailable
+from listings.models import (
+    AvailabilityBlock, Boat, Car, Coupon, CouponRedemption, Listing, Order, PlatformFeeSettings, PurchaseOffer, PurchaseOrder,
+    RentalOrder, TradeInRequest, VehicleImage, VehicleImageImport, TestDriveException, TestDriveRequest, TestDriveSchedule,
+    TestDriveWindow, ValuationModelVersion,
+)
+from feedback.models import Notification
+from utils import audit
 from listings.service_mapping import DealershipServiceProcessor
 from django.core.exceptions import ValidationError
 
@@ -59,3 +93,1484 @@ class DealershipServiceMappingTest(TestCase):
         self.assertFalse(result['offers_rental'])
         self.assertFalse(result['offers_drivers'])
         self.assertFalse(result['offers_trade_in'])
+
+
+class RentalFixturesMixin:
+
+    def make_rental_listing(self, email='rentals@test.com'):
+        dealer_user = User.objects.create_user(email=email, password='testpass123', user_type='dealer')
+        dealership = Dealership.objects.get(user=dealer_user)
+        car = Car.objects.create(dealer=dealership, name='Camry', brand='Toyota', color='Black', for_rent=True)
+        return Listing.objects.create(
+            vehicle=car, created_by=dealer_user, listing_type='rental', price=50000,
+            title='Toyota Camry', approved=True, verified=True,
+        )
+
+    def make_customer(self, email):
+        user = User.objects.create_user(email=email, password='testpass123', user_type='customer')
+        return Customer.objects.get(user=user)
+
+
+class RentalAvailabilityTest(RentalFixturesMixin, TestCase):
+
+    def setUp(self):
+        self.listing = self.make_rental_listing()
+        self.vehicle = self.listing.vehicle
+        self.start = date.today() + timedelta(days=10)
+
+    def test_overlapping_blocks_rejected(self):
+        block_dates(self.vehicle, self.start, self.start + timedelta(days=3))
+        with self.assertRaises(VehicleUnavailable) as ctx:
+            block_dates(self.vehicle, self.start + timedelta(days=2), self.start + timedelta(days=5), kind='maintenance')
+        self.assertEqual(len(ctx.exception.conflicts), 1)
+        # the return day is free again
+        block_dates(self.vehicle, self.start + timedelta(days=3), self.start + timedelta(days=4), kind='hold')
+        with self.assertRaises(ValueError):
+            block_dates(self.vehicle, self.start, self.start)
+
+    def test_date_range_filter(self):
+        other = self.make_rental_listing('other@test.com')
+        block_dates(self.vehicle, self.start, self.start + timedelta(days=3))
+
+        def filtered(**params):
+            return set(CarRentalFilter(params, queryset=Listing.objects.all()).qs)
+
+        overlapping = {'available_from': self.start + timedelta(days=1), 'available_until': self.start + timedelta(days=7)}
+        self.assertEqual(filtered(**overlapping), {other})
+        after = {'available_from': self.start + timedelta(days=3), 'available_until': self.start + timedelta(days=7)}
+        self.assertEqual(filtered(**after), {self.listing, other})
+        self.assertEqual(filtered(available_from=self.start), {other})
+        self.assertIn('NOT EXISTS', str(CarRentalFilter(overlapping, queryset=Listing.objects.all()).qs.query))
+
+    def test_month_grid(self):
+        first = date(2030, 3, 1)
+        block_dates(self.vehicle, date(2030, 2, 27), date(2030, 3, 3))
+        block_dates(self.vehicle, date(2030, 3, 31), date(2030, 4, 2), kind='maintenance')
+        grid = month_grid(self.vehicle, 2030, 3, today=first)
+        self.assertEqual(len(grid), 31)
+        self.assertEqual([day['reason'] for day in grid[:3]], ['rental', 'rental', None])
+        self.assertEqual(grid[-1], {'date': '2030-03-31', 'available': False, 'reason': 'maintenance'})
+
+        response = self.client.get(f'/api/v1/listings/rentals/{self.listing.uuid}/availability/?month=2030-03')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['available_days'], 28)
+        response = self.client.get(f'/api/v1/listings/rentals/{self.listing.uuid}/availability/?month=2030-13')
+        self.assertEqual(response.status_code, 400)
+
+    def test_checkout_books_dates(self):
+        url = f'/api/v1/listings/checkout/{self.listing.uuid}/'
+        dates = {'rent_from': self.start.isoformat(), 'rent_until': (self.start + timedelta(days=2)).isoformat()}
+        first = self.make_customer('first@test.com')
+        second = self.make_customer('second@test.com')
+
+        self.client.force_login(first.user)
+        response = self.client.post(url, {**dates, 'payment_option': 'wallet'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        order = RentalOrder.objects.get(customer=first)
+        self.assertEqual(order.availability_blocks.get().end_date, self.start + timedelta(days=2))
+
+        self.client.force_login(second.user)
+        response = self.client.post(url, {**dates, 'payment_option': 'wallet'}, content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(RentalOrder.objects.filter(customer=second).exists())
+
+        # cancelling the order frees the dates
+        order.delete()
+        self.assertTrue(is_available(self.vehicle, self.start, self.start + timedelta(days=2)))
+
+    def test_terminal_status_releases_dates(self):
+        customer = self.make_customer('renter@test.com')
+        until = self.start + timedelta(days=2)
+        for status in ('cancelled', 'expired', 'refunded'):
+            order = book_rental(self.listing, self.start, until, customer=customer)
+            order.order_status = 'completed'
+            order.save()
+            self.assertFalse(is_available(self.vehicle, self.start, until))
+            # saved through its Order row or as the RentalOrder alike
+            if status == 'expired':
+                order = Order.objects.get(pk=order.pk)
+            order.order_status = status
+            order.save()
+            self.assertTrue(is_available(self.vehicle, self.start, until), status)
+
+    def test_rentals_booked_before_the_calendar_are_blocked(self):
+        backfill = import_module('listings.migrations.0014_backfill_rental_availability_blocks').backfill_blocks
+        customer = self.make_customer('legacy@test.com')
+
+        def legacy(start, days, status='pending'):
+            return RentalOrder.objects.create(
+                customer=customer, order_type='rental', order_item=self.listing, order_status=status,
+                rent_from=start, rent_until=start + timedelta(days=days),
+            )
+
+        active = legacy(self.start, 3)
+        clashing = legacy(self.start + timedelta(days=1), 3)
+        cancelled = legacy(self.start + timedelta(days=5), 2, status='cancelled')
+        past = legacy(date.today() - timedelta(days=10), 3)
+        booked = book_rental(self.listing, self.start + timedelta(days=8), self.start + timedelta(days=9), customer=customer)
+        AvailabilityBlock.objects.create(
+            vehicle=self.vehicle, rental_order=cancelled, start_date=cancelled.rent_from, end_date=cancelled.rent_until,
+        )
+
+        backfill(django_apps, None)
+        backfill(django_apps, None)
+        blocks = dict(AvailabilityBlock.objects.values_list('rental_order_id', 'start_date'))
+        self.assertEqual(blocks, {active.pk: self.start, booked.pk: self.start + timedelta(days=8)})
+        self.assertNotIn(clashing.pk, blocks)
+        self.assertNotIn(past.pk, blocks)
+
+
+class ParallelMixin:
+
+    THREADS = 8
+    PER_THREAD = 25
+
+    def _run_parallel(self, attempt):
+        errors = []
+
+        def worker(index):
+            rng = random.Random(index)
+            try:
+                for _ in range(self.PER_THREAD):
+                    attempt(rng)
+            except Exception as e:  # surfaced by the assertion below
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+
+class RentalBookingConcurrencyTest(ParallelMixin, RentalFixturesMixin, TransactionTestCase):
+    """Parallel checkouts must never double-book a vehicle."""
+
+    def test_same_dates_booked_once(self):
+        listing = self.make_rental_listing()
+        customers = [self.make_customer(f'c{i}@test.com') for i in range(self.THREADS)]
+        start = date.today() + timedelta(days=1)
+        booked = []
+
+        def attempt(rng):
+            try:
+                booked.append(book_rental(listing, start, start + timedelta(days=3), customer=rng.choice(customers)))
+            except VehicleUnavailable:
+                pass
+
+        self._run_parallel(attempt)
+        self.assertEqual(len(booked), 1)
+        self.assertEqual(RentalOrder.objects.count(), 1)
+        self.assertEqual(AvailabilityBlock.objects.count(), 1)
+
+    def test_random_ranges_never_overlap(self):
+        listing = self.make_rental_listing()
+        customer = self.make_customer('c@test.com')
+        base = date.today() + timedelta(days=1)
+        successes = []
+
+        def attempt(rng):
+            start = base + timedelta(days=rng.randint(0, 90))
+            try:
+                book_rental(listing, start, start + timedelta(days=rng.randint(1, 7)), customer=customer)
+                successes.append(start)
+            except VehicleUnavailable:
+                pass
+
+        self._run_parallel(attempt)
+        blocks = list(AvailabilityBlock.objects.order_by('start_date').values_list('start_date', 'end_date'))
+        self.assertEqual(len(blocks), len(successes))
+        self.assertEqual(RentalOrder.objects.count(), len(successes))
+        for (_, previous_end), (next_start, _) in zip(blocks, blocks[1:]):
+            self.assertLessEqual(previous_end, next_start)
+
+
+class InventoryImportTest(TestCase):
+
+    HEADER = 'vehicle_type,sku,vin,title,brand,model,transmission,features,listing_type,price,payment_cycle,doors,hull_material,image_urls'
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='inventory@test.com', password='testpass123', user_type='dealer')
+        self.dealer = Dealership.objects.get(user=self.user)
+
+    def run_import(self, text, file_format='csv', **kwargs):
+        rows = inventory.read_rows(io.BytesIO(text.encode()), file_format)
+        return inventory.import_inventory(self.dealer, rows, **kwargs).as_dict()
+
+    def csv(self, *rows):
+        return '\n'.join([self.HEADER, *rows]) + '\n'
+
+    def test_import_creates_then_upserts_by_vin_and_sku(self):
+        report = self.run_import(self.csv(
+            'car,,1hgcm82633a004352,Honda Accord,Honda,Accord,Automatic,Bluetooth|Sunroof,sale,4500000,,4,,',
+            'boat,BT-1,,Sea Ray,Sea Ray,SPX 190,,,rental,250000,day,,fiberglass,',
+            'car,,,Toyota Corolla,Toyota,Corolla,manual,,,,,,,',
+        ))
+        self.assertEqual(report['errors'], [])
+        self.assertEqual((report['created'], report['listings_created']), (3, 2))
+        car = Car.objects.get(vin='1HGCM82633A004352')
+        self.assertEqual((car.transmission, car.features, car.slug), ('auto', ['Bluetooth', 'Sunroof'], 'honda-accord'))
+        self.assertTrue(car.for_sale)
+        self.assertEqual(Boat.objects.get(sku='BT-1').hull_material, 'fiberglass')
+        self.assertEqual(self.dealer.vehicles.count(), 3)
+        self.assertEqual(self.dealer.listings.count(), 2)
+
+        # same keys again: prices change, empty cells keep what is stored
+        report = self.run_import(self.csv(
+            'car,,1HGCM82633A004352,Honda Accord,Honda,Accord,,,sale,4200000,,,,',
+            'boat,BT-1,,Sea Ray,Sea Ray,SPX 190,,,rental,250000,day,,,',
+        ))
+        self.assertEqual((report['created'], report['updated'], report['unchanged']), (0, 0, 2))
+        self.assertEqual((report['listings_created'], report['listings_updated']), (0, 1))
+        car.refresh_from_db()
+        self.assertEqual(car.features, ['Bluetooth', 'Sunroof'])
+        self.assertEqual(Listing.objects.get(vehicle=car).price, Decimal('4200000'))
+        self.assertEqual(Car.objects.filter(dealer=self.dealer).count(), 2)
+
+    def test_row_errors_are_reported_and_valid_rows_kept(self):
+        report = self.run_import(self.csv(
+            'car,,VIN1,Honda Accord,Honda,Accord,,,sale,4500000,,,,',
+            'car,,VIN1,Honda Accord,Honda,Accord,,,sale,4500000,,,,',
+            'car,,,Honda Accord,Honda,Accord,sideways,,sale,cheap,,,,',
+            'car,,,,Honda,Accord,,,,,,,wood,',
+            'boat,,,Sea Ray,Sea Ray,SPX,,,rental,100,,,,',
+            'tank,,,T-90,Uralvagonzavod,T-90,,,,,,,,',
+            'car,,,Toyota Corolla,Toyota,Corolla,,,,,,,,not-a-url',
+            'car,STK-1,,,Kia,Rio,,,,,,,,',
+        ))
+        self.assertEqual(report['rows'], 8)
+        self.assertEqual(report['created'], 1)
+        self.assertEqual(report['failed'], 7)
+        errors = {(error['line'], error['field']) for error in report['errors']}
+        self.assertEqual(errors, {
+            (3, 'vin'), (4, 'transmission'), (4, 'price'), (5, 'hull_material'),
+            (6, 'payment_cycle'), (7, 'vehicle_type'), (8, 'image_urls'), (9, 'title'),
+        })
+
+    def test_dry_run_writes_nothing(self):
+        report = self.run_import(self.csv('car,,VIN1,Honda Accord,Honda,Accord,,,sale,4500000,,,,'), dry_run=True)
+        self.assertEqual(report['created'], 1)
+        self.assertFalse(Car.objects.exists())
+
+    def test_export_round_trips(self):
+        self.run_import(self.csv(
+            'car,STK-9,VIN9,Lexus RX,Lexus,RX 350,auto,Leather|Navigation,rental,90000,week,4,,https://img.test/a.jpg|https://img.test/b.jpg',
+            'car,STK-10,,Kia Rio,Kia,Rio,,,,,,,,',
+        ))
+        exported = ''.join(inventory.stream_export(self.dealer, 'jsonl'))
+        rows = [json.loads(line) for line in exported.splitlines()]
+        self.assertEqual(len(rows), 2)
+        lexus = next(row for row in rows if row['sku'] == 'STK-9')
+        self.assertEqual(lexus['features'], ['Leather', 'Navigation'])
+        self.assertEqual(lexus['image_urls'], ['https://img.test/a.jpg', 'https://img.test/b.jpg'])
+        self.assertEqual((lexus['listing_type'], lexus['price'], lexus['payment_cycle']), ('rental', '90000.00', 'week'))
+
+        for file_format, text in (('jsonl', exported), ('csv', ''.join(inventory.stream_export(self.dealer, 'csv')))):
+            report = self.run_import(text, file_format)
+            self.assertEqual(report['errors'], [])
+            self.assertEqual((report['created'], report['updated'], report['unchanged']), (0, 0, 2))
+            self.assertEqual(report['images_queued'], 0)
+
+    def test_images_are_queued_and_fetched(self):
+        report = self.run_import(self.csv('car,,VIN1,Honda Accord,Honda,Accord,,,,,,,,https://img.test/a.jpg|https://img.test/b.jpg'))
+        self.assertEqual(report['images_queued'], 2)
+        car = Car.objects.get(vin='VIN1')
+
+        def store(vehicle_id, url, content, content_type):
+            image = VehicleImage.objects.create(vehicle_id=vehicle_id, image='vehicles/test')
+            car.images.add(image)
+            return image
+
+        def download(url):
+            if url.endswith('b.jpg'):
+                raise ValueError('Not an image (text/html)')
+            return b'jpeg', 'image/jpeg'
+
+        with mock.patch.object(inventory, '_download', side_effect=download), \
+                mock.patch.object(inventory, '_store', side_effect=store):
+            inventory.fetch_pending_images()
+        fetched = VehicleImageImport.objects.get(url='https://img.test/a.jpg')
+        self.assertEqual((fetched.status, fetched.attempts), ('fetched', 1))
+        self.assertEqual(list(car.images.all()), [fetched.image])
+        failed = VehicleImageImport.objects.get(url='https://img.test/b.jpg')
+        self.assertEqual((failed.status, failed.error), ('pending', 'Not an image (text/html)'))
+
+        # a row another worker already claimed is not fetched again
+        failed.refresh_from_db()
+        VehicleImageImport.objects.filter(pk=failed.pk).update(status='fetching')
+        with mock.patch.object(inventory, '_download', side_effect=download) as fetch:
+            self.assertEqual(inventory.fetch_pending_images(), [])
+        fetch.assert_not_called()
+
+    def test_image_urls_must_be_public(self):
+        for url in ('file:///etc/passwd', 'http://127.0.0.1/a.jpg', 'http://169.254.169.254/latest/meta-data/',
+                    'http://10.0.0.5/a.jpg', 'http://[::1]/a.jpg', 'http://[::ffff:192.168.0.1]/a.jpg'):
+            with self.assertRaises(ValueError, msg=url):
+                inventory._download(url)
+
+        def resolve(host, port):
+            lookups.append(host)
+            return [(None, None, None, '', (public if host == 'img.test' else host, port))]
+
+        # carrier-grade NAT (Alibaba's metadata service) is not private but not global either
+        lookups, public = [], '100.100.100.200'
+        with mock.patch.object(inventory.socket, 'getaddrinfo', side_effect=resolve), \
+                mock.patch.object(inventory.HTTPAdapter, 'send') as send:
+            with self.assertRaises(ValueError):
+                inventory._download('http://img.test/a.jpg')
+        send.assert_not_called()
+
+        # the request goes to the vetted address, so the host is resolved once per hop
+        lookups, public = [], '93.184.216.34'
+        redirect = requests.Response()
+        redirect.status_code, redirect.headers['Location'] = 302, 'http://127.0.0.1/admin'
+        with mock.patch.object(inventory.socket, 'getaddrinfo', side_effect=resolve), \
+                mock.patch.object(inventory.HTTPAdapter, 'send', return_value=redirect) as send:
+            with self.assertRaises(ValueError):
+                inventory._download('https://img.test/a.jpg?size=2')
+        request = send.call_args.args[0]
+        self.assertEqual((request.url, request.headers['Host']), ('https://93.184.216.34:443/a.jpg?size=2', 'img.test'))
+        self.assertEqual(lookups, ['img.test', '127.0.0.1'])
+        self.assertEqual(send.call_count, 1)
+
+    def test_import_and_export_endpoints(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        upload = SimpleUploadedFile('stock.csv', self.csv('car,STK-1,,Kia Rio,Kia,Rio,,,sale,3000000,,,,').encode())
+        response = client.post('/api/v1/admin/dealership/inventory/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['created'], 1)
+
+        response = client.get('/api/v1/admin/dealership/inventory/export/?file_format=csv')
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(','), inventory.COLUMNS)
+        self.assertIn('STK-1', lines[1])
+
+        upload = SimpleUploadedFile('stock.txt', b'nope')
+        response = client.post('/api/v1/admin/dealership/inventory/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+
+
+def rule(code, discount_type='percentage', value='10', **kwargs):
+    return CouponRule(id=code, code=code, discount_type=discount_type, discount_value=Decimal(value), **kwargs)
+
+
+class CouponPricingTest(SimpleTestCase):
+
+    def test_rounding_is_exact(self):
+        pricing = price(Decimal('999.99'), [rule('EIGHTH', value='12.5')])
+        self.assertEqual(pricing.lines[0].amount, Decimal('125.00'))  # 124.99875 rounds half up
+        self.assertEqual(pricing.total, Decimal('874.99'))
+
+        # stacked coupons apply in priority order, each to what is left
+        pricing = price(Decimal('1000.05'), [
+            rule('FIVE', value='5', priority=2, stackable=True),
+            rule('TEN', value='10', priority=1, stackable=True),
+        ])
+        self.assertEqual([(line.rule.code, line.amount) for line in pricing.lines],
+                         [('TEN', Decimal('100.01')), ('FIVE', Decimal('45.00'))])
+        self.assertEqual((pricing.discount_total, pricing.total), (Decimal('145.01'), Decimal('855.04')))
+
+    def test_caps(self):
+        self.assertEqual(price(1000, [rule('HALF', value='50', max_discount=Decimal('300'))]).total, Decimal('700.00'))
+        pricing = price(Decimal('80'), [rule('BIG', discount_type='flat', value='100')])
+        self.assertEqual((pricing.discount_total, pricing.total), (Decimal('80.00'), Decimal('0.00')))
+
+    def test_stacking_and_scope(self):
+        pricing = price(1000, [
+            rule('SOLO', priority=1),
+            rule('EXTRA', discount_type='flat', value='50', priority=2, stackable=True),
+            rule('RENTALS', listing_types=('rental',), stackable=True),
+            rule('BIGSPEND', min_order_value=Decimal('5000'), stackable=True),
+        ], listing_type='sale')
+        self.assertEqual([line.rule.code for line in pricing.lines], ['SOLO'])
+        self.assertEqual(dict(pricing.rejected), {
+            'EXTRA': 'not_stackable', 'RENTALS': 'listing_type', 'BIGSPEND': 'min_order_value',
+        })
+        # an exclusive coupon is rejected after a stackable one too
+        pricing = price(1000, [rule('FIRST', priority=1, stackable=True), rule('SOLO', priority=2)])
+        self.assertEqual(pricing.rejected, (('SOLO', 'not_stackable'),))
+
+
+class CouponTest(RentalFixturesMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.listing = self.make_rental_listing()
+        self.listing.listing_type = 'sale'
+        self.listing.price = 100000
+        self.listing.save()
+        self.customer = self.make_customer('buyer@test.com')
+        self.url = f'/api/v1/listings/checkout/{self.listing.uuid}/'
+
+    def test_order_total_uses_pricing(self):
+        order = Order.objects.create(customer=self.customer, order_type='sale', order_item=self.listing)
+        coupon = Coupon.objects.create(issuer='veyu', code='TENOFF', discount_type='percentage', discount_value=10)
+        redeem(order, evaluate(['TENOFF'], self.customer, self.listing, order.sub_total), self.customer)
+        # 100000 + 0.5% fee = 100500.00, less 10% = 90450.00, plus 0.5% commission
+        self.assertEqual(order.pricing.discount_total, Decimal('10050.00'))
+        self.assertEqual(order.total, Decimal('90902.25'))
+
+        # the order keeps the discount it was given
+        coupon.discount_value, coupon.listing_types, coupon.min_order_value = 50, ['rental'], 10**9
+        coupon.save()
+        order = Order.objects.get(pk=order.pk)
+        self.assertEqual(order.pricing.discount_total, Decimal('10050.00'))
+        self.assertEqual(order.total, Decimal('90902.25'))
+
+    def test_orders_placed_before_redemptions_keep_their_discounts(self):
+        backfill = import_module('listings.migrations.0012_backfill_coupon_redemptions').backfill_redemptions
+        tenoff = Coupon.objects.create(issuer='veyu', code='TENOFF', discount_type='percentage', discount_value=10)
+        flat = Coupon.objects.create(issuer='veyu', code='FLAT', discount_type='flat', discount_value=500, max_redemptions=2)
+        old = Order.objects.create(customer=self.customer, order_type='sale', order_item=self.listing)
+        old.applied_coupons.add(tenoff, flat)
+        again = Order.objects.create(customer=self.customer, order_type='sale', order_item=self.listing)
+        again.applied_coupons.add(flat)
+        redeemed = Order.objects.create(customer=self.customer, order_type='sale', order_item=self.listing)
+        redeem(redeemed, evaluate(['TENOFF'], self.customer, self.listing, redeemed.sub_total), self.customer)
+
+        backfill(django_apps, None)
+        backfill(django_apps, None)
+        # 100500.00 less 10% = 90450.00, less 500
+        old = Order.objects.get(pk=old.pk)
+        self.assertEqual({line.rule.code: line.amount for line in old.pricing.lines}, {'TENOFF': Decimal('10050.00'), 'FLAT': Decimal('500.00')})
+        self.assertEqual(old.pricing.total, Decimal('89950.00'))
+        self.assertEqual(CouponRedemption.objects.filter(order=redeemed).count(), 1)
+        self.assertEqual(CouponRedemption.objects.count(), 4)
+        tenoff.refresh_from_db()
+        flat.refresh_from_db()
+        self.assertEqual((tenoff.redemption_count, flat.redemption_count), (2, 2))
+        with self.assertRaises(CouponUnavailable) as ctx:
+            order = Order.objects.create(customer=self.customer, order_type='sale', order_item=self.listing)
+            redeem(order, price(order.sub_total, [lookup('FLAT')]), self.customer)
+        self.assertEqual(ctx.exception.reason, 'exhausted')
+
+    def test_redeem_rechecks_who_the_coupon_is_for(self):
+        coupon = Coupon.objects.create(issuer='veyu', code='OPEN', discount_value=10)
+        order = Order.objects.create(customer=self.customer, order_type='sale', order_item=self.listing)
+        pricing = evaluate(['OPEN'], self.customer, self.listing, order.sub_total)
+        self.assertEqual(len(pricing.lines), 1)
+
+        # restricted after the customer's pricing was worked out
+        coupon.users.add(self.make_customer('vip@test.com'))
+        with self.assertRaises(CouponUnavailable) as ctx:
+            redeem(order, pricing, self.customer)
+        self.assertEqual(ctx.exception.reason, 'not_for_user')
+        Coupon.objects.filter(pk=coupon.pk).update(issuer='dealership')
+        coupon.users.clear()
+        with self.assertRaises(CouponUnavailable) as ctx:
+            redeem(order, pricing, self.customer)
+        self.assertEqual(ctx.exception.reason, 'not_for_dealership')
+        coupon.refresh_from_db()
+        self.assertEqual(coupon.redemption_count, 0)
+        self.assertFalse(CouponRedemption.objects.exists())
+
+    def test_eligibility(self):
+        dealer = self.listing.vehicle.dealer
+        other = self.make_customer('other@test.com')
+        now = timezone.now()
+        Coupon.objects.create(issuer='veyu', code='OLD', expires=now - timedelta(days=1))
+        Coupon.objects.create(issuer='veyu', code='SOON', starts=now + timedelta(days=1))
+        Coupon.objects.create(issuer='veyu', code='OFF', is_active=False)
+        Coupon.objects.create(issuer='veyu', code='GONE', max_redemptions=2, redemption_count=2)
+        Coupon.objects.create(issuer='dealership', code='ELSEWHERE').valid_in.add(
+            Dealership.objects.get(user=User.objects.create_user(email='d2@test.com', password='testpass123', user_type='dealer'))
+        )
+        Coupon.objects.create(issuer='veyu', code='VIP', discount_value=10).users.add(other)
+        Coupon.objects.create(issuer='dealership', code='HERE', discount_type='flat', discount_value=500).valid_in.add(dealer)
+
+        pricing = evaluate(['OLD', 'SOON', 'OFF', 'GONE', 'ELSEWHERE', 'VIP', 'HERE', 'NOPE'], self.customer, self.listing, 1000)
+        self.assertEqual([line.rule.code for line in pricing.lines], ['HERE'])
+        self.assertEqual(dict(pricing.rejected), {
+            'OLD': 'expired', 'SOON': 'not_started', 'OFF': 'inactive', 'GONE': 'exhausted',
+            'ELSEWHERE': 'not_for_dealership', 'VIP': 'not_for_user', 'NOPE': 'not_found',
+        })
+        self.assertEqual(evaluate(['VIP'], other, self.listing, 1000).discount_total, Decimal('10.00'))
+
+    def test_lookups_are_cached_until_the_coupon_changes(self):
+        coupon = Coupon.objects.create(issuer='veyu', code='CACHED', discount_value=5)
+        self.assertEqual(lookup('CACHED').discount_value, Decimal('5'))
+        self.assertIsNone(lookup('NOPE'))
+        with self.assertNumQueries(0):
+            lookup('CACHED')
+            self.assertIsNone(lookup('NOPE'))
+
+        coupon.discount_value = 7
+        coupon.save()
+        self.assertEqual(lookup('CACHED').discount_value, Decimal('7'))
+        coupon.users.add(self.customer)
+        self.assertEqual(lookup('CACHED').user_ids, frozenset([self.customer.pk]))
+        self.customer.available_coupons.clear()
+        self.assertEqual(lookup('CACHED').user_ids, frozenset())
+
+        coupon.code = 'RENAMED'
+        coupon.save()
+        self.assertIsNone(lookup('CACHED'))
+        self.assertEqual(lookup('RENAMED').id, coupon.pk)
+
+    def test_checkout_redeems_coupons(self):
+        coupon = Coupon.objects.create(
+            issuer='veyu', code='WELCOME', discount_type='flat', discount_value='2500.50', max_redemptions_per_user=1,
+        )
+        self.client.force_login(self.customer.user)
+
+        PlatformFeeSettings.objects.create(is_active=True)
+        preview = self.client.get(f'{self.url}?coupons=WELCOME,NOPE').json()['coupons']
+        self.assertEqual(Decimal(str(preview['discount_total'])), Decimal('2500.50'))
+        self.assertEqual(preview['rejected'][0]['reason'], 'not_found')
+
+        response = self.client.post(self.url, {'payment_option': 'wallet', 'coupons': ['WELCOME']}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        order = Order.objects.get(customer=self.customer)
+        redemption = CouponRedemption.objects.get(order=order)
+        self.assertEqual((redemption.coupon, redemption.amount), (coupon, Decimal('2500.50')))
+        self.assertEqual(list(order.applied_coupons.all()), [coupon])
+        self.assertEqual(order.pricing.total, Decimal('97999.50'))
+        coupon.refresh_from_db()
+        self.assertEqual(coupon.redemption_count, 1)
+
+        # the per-user limit is reached; the whole checkout is refused
+        response = self.client.post(self.url, {'payment_option': 'wallet', 'coupon_code': 'WELCOME'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['data']['reason'], 'user_limit')
+        self.assertEqual(Order.objects.filter(customer=self.customer).count(), 1)
+
+    def test_rejected_coupon_undoes_rental_booking(self):
+        rental = self.make_rental_listing('rental-dealer@test.com')
+        Coupon.objects.create(issuer='veyu', code='SALEONLY', listing_types=['sale'])
+        start = date.today() + timedelta(days=5)
+        self.client.force_login(self.customer.user)
+        response = self.client.post(f'/api/v1/listings/checkout/{rental.uuid}/', {
+            'payment_option': 'wallet', 'coupons': 'SALEONLY',
+            'rent_from': start.isoformat(), 'rent_until': (start + timedelta(days=2)).isoformat(),
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['data'], {'code': 'SALEONLY', 'reason': 'listing_type'})
+        self.assertFalse(RentalOrder.objects.exists())
+        self.assertFalse(AvailabilityBlock.objects.exists())
+
+
+class CouponRedemptionConcurrencyTest(ParallelMixin, RentalFixturesMixin, TransactionTestCase):
+    """Parallel checkouts must never redeem a coupon past its limits."""
+
+    PER_THREAD = 5
+
+    def setUp(self):
+        cache.clear()
+        self.listing = self.make_rental_listing()
+
+    def redeem_in_parallel(self, coupon, customers):
+        # orders and prices up front; only the redemptions race
+        pricing = price(self.listing.price, [lookup(coupon.code)])
+        orders = [
+            Order.objects.create(customer=customers[i % len(customers)], order_type='rental', order_item=self.listing)
+            for i in range(self.THREADS * self.PER_THREAD)
+        ]
+        redeemed = []
+
+        def attempt(rng):
+            order = orders.pop()
+            try:
+                redeemed.extend(redeem(order, pricing, order.customer))
+            except CouponUnavailable:
+                pass
+
+        self._run_parallel(attempt)
+        coupon.refresh_from_db()
+        return redeemed
+
+    def test_global_limit(self):
+        coupon = Coupon.objects.create(issuer='veyu', code='FIRST5', max_redemptions=5)
+        customers = [self.make_customer(f'c{i}@test.com') for i in range(self.THREADS)]
+        redeemed = self.redeem_in_parallel(coupon, customers)
+        self.assertEqual(len(redeemed), 5)
+        self.assertEqual(coupon.redemption_count, 5)
+        self.assertEqual(CouponRedemption.objects.count(), 5)
+
+    def test_per_user_limit(self):
+        coupon = Coupon.objects.create(issuer='veyu', code='ONCE', max_redemptions_per_user=1)
+        customers = [self.make_customer(f'c{i}@test.com') for i in range(2)]
+        redeemed = self.redeem_in_parallel(coupon, customers)
+        self.assertEqual(sorted(r.customer_id for r in redeemed), sorted(c.pk for c in customers))
+        self.assertEqual(coupon.redemption_count, 2)
+
+
+LAGOS = ZoneInfo('Africa/Lagos')
+
+
+class TestDriveFixturesMixin(RentalFixturesMixin):
+
+    def setUp(self):
+        today = date.today()
+        # a Monday at least a week out, and "now" the Sunday noon before it
+        self.monday = today + timedelta(days=7 + (7 - today.weekday()) % 7)
+        self.now = datetime.combine(self.monday - timedelta(days=1), time(12), tzinfo=LAGOS)
+
+    def at(self, hour, minute=0, days=0):
+        return datetime.combine(self.monday + timedelta(days=days), time(hour, minute), tzinfo=LAGOS)
+
+    def make_schedule(self, listing, **fields):
+        fields.setdefault('min_notice_minutes', 0)
+        schedule = TestDriveSchedule.objects.create(dealer_id=listing.vehicle.dealer_id, **fields)
+        TestDriveWindow.objects.bulk_create([
+            TestDriveWindow(schedule=schedule, weekday=weekday, starts_at=time(9), ends_at=time(12)) for weekday in range(5)
+        ])
+        return schedule
+
+    def make_second_listing(self, listing):
+        car = Car.objects.create(dealer=listing.vehicle.dealer, name='Corolla', brand='Toyota', color='White')
+        return Listing.objects.create(
+            vehicle=car, created_by=listing.created_by, price=9000000, title='Toyota Corolla', approved=True, verified=True,
+        )
+
+
+class TestDriveSchedulingTest(TestDriveFixturesMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.listing = self.make_rental_listing()
+        self.schedule = self.make_schedule(self.listing)
+        self.customer = self.make_customer('driver@test.com')
+
+    def test_slots_follow_windows_and_exceptions(self):
+        slots = testdrives.slots(self.listing, self.monday, 7, now=self.now)
+        self.assertEqual(len(slots), 5 * 6)
+        self.assertEqual(slots[0].starts_at, self.at(9))
+        self.assertEqual(slots[0].ends_at, self.at(9, 30))
+        self.assertEqual(slots[-1].starts_at, self.at(11, 30, days=4))
+
+        TestDriveException.objects.create(schedule=self.schedule, date=self.monday + timedelta(days=1), note='Holiday')
+        TestDriveException.objects.create(schedule=self.schedule, date=self.monday + timedelta(days=2), starts_at=time(14), ends_at=time(15))
+        starts = [slot.starts_at for slot in testdrives.slots(self.listing, self.monday, 7, now=self.now)]
+        self.assertEqual(len(starts), 6 + 2 + 6 + 6)
+        self.assertNotIn(self.at(9, days=1), starts)
+        self.assertIn(self.at(14, 30, days=2), starts)
+        self.assertNotIn(self.at(9, days=2), starts)
+
+        # minimum notice and booking horizon
+        self.schedule.min_notice_minutes = 60
+        self.schedule.horizon_days = 1
+        self.schedule.save()
+        starts = [slot.starts_at for slot in testdrives.slots(self.listing, self.monday, 7, now=self.at(10, 10))]
+        self.assertEqual(starts, [self.at(11, 30)])
+        with self.assertRaises(ValueError):
+            testdrives.slots(self.listing, self.monday, testdrives.MAX_DAYS + 1)
+
+    def test_listing_and_dealer_capacity(self):
+        self.schedule.capacity = 2
+        self.schedule.save()
+        other = self.make_second_listing(self.listing)
+        third = self.make_second_listing(self.listing)
+
+        testdrives.reserve(self.listing, self.customer, self.at(9), now=self.now)
+        with self.assertRaises(SlotUnavailable) as ctx:
+            testdrives.reserve(self.listing, self.make_customer('second@test.com'), self.at(9), now=self.now)
+        self.assertEqual(ctx.exception.reason, 'full')
+        self.assertNotIn(self.at(9), [slot.starts_at for slot in testdrives.slots(self.listing, self.monday, 1, now=self.now)])
+        self.assertEqual(testdrives.slots(other, self.monday, 1, now=self.now)[0], (self.at(9), self.at(9, 30), 1))
+
+        testdrives.reserve(other, self.customer, self.at(9), now=self.now)
+        with self.assertRaises(SlotUnavailable):
+            testdrives.reserve(third, self.customer, self.at(9), now=self.now)
+        # a drive only blocks the slots it overlaps
+        testdrives.reserve(third, self.customer, self.at(9, 30), now=self.now)
+
+        free = testdrives.dealer_slots([self.schedule.dealer_id], self.monday, 1, now=self.now)[self.schedule.dealer_id]
+        self.assertEqual(free[0], (self.at(9, 30), self.at(10), 1))
+        self.assertEqual(len(free), 5)
+
+    @override_settings(TESTDRIVE_MAX_HOLDS=2)
+    def test_holds_per_customer_are_capped(self):
+        other = self.make_second_listing(self.listing)
+        third = self.make_second_listing(self.listing)
+        drive = testdrives.reserve(self.listing, self.customer, self.at(9), now=self.now)
+        with self.assertRaises(SlotUnavailable) as ctx:
+            testdrives.reserve(self.listing, self.customer, self.at(10), now=self.now)
+        self.assertEqual(ctx.exception.reason, 'already_held')
+        # moving a hold does not count against itself
+        testdrives.reschedule(drive, self.at(10), self.customer.user, now=self.now)
+
+        testdrives.reserve(other, self.customer, self.at(9), now=self.now)
+        with self.assertRaises(SlotUnavailable) as ctx:
+            testdrives.reserve(third, self.customer, self.at(11), now=self.now)
+        self.assertEqual(ctx.exception.reason, 'too_many_holds')
+        # other customers are not affected
+        testdrives.reserve(third, self.make_customer('second@test.com'), self.at(11), now=self.now)
+
+        # confirmed and expired holds no longer count
+        testdrives.confirm(drive, now=self.now)
+        testdrives.reserve(third, self.customer, self.at(11, 30), now=self.now)
+        later = self.now + timedelta(minutes=16)
+        testdrives.reserve(self.listing, self.customer, self.at(9), now=later)
+        testdrives.reserve(other, self.customer, self.at(10, 30), now=later)
+
+    @override_settings(TESTDRIVE_RESERVE_RATE='2/hour')
+    def test_reserve_endpoint_is_throttled(self):
+        client = APIClient()
+        client.force_authenticate(user=self.customer.user)
+        url = f'/api/v1/listings/testdrives/{self.listing.uuid}/reserve/'
+        self.assertEqual(client.post(url, {'starts_at': self.at(9).isoformat()}, format='json').status_code, 201)
+        self.assertEqual(client.post(url, {'starts_at': self.at(10).isoformat()}, format='json').status_code, 409)
+        self.assertEqual(client.post(url, {'starts_at': self.at(11).isoformat()}, format='json').status_code, 429)
+
+    def test_times_not_offered(self):
+        for starts_at in (self.at(9, 10), self.at(9, days=6), self.at(12), self.now - timedelta(days=1)):
+            with self.assertRaises(SlotUnavailable) as ctx:
+                testdrives.reserve(self.listing, self.customer, starts_at, now=self.now)
+            self.assertEqual(ctx.exception.reason, 'not_offered')
+        self.schedule.delete()
+        with self.assertRaises(SlotUnavailable) as ctx:
+            testdrives.reserve(self.listing, self.customer, self.at(9), now=self.now)
+        self.assertEqual(ctx.exception.reason, 'no_schedule')
+
+    def test_holds_expire(self):
+        drive = testdrives.reserve(self.listing, self.customer, self.at(9), now=self.now)
+        self.assertEqual(drive.status, 'held')
+        self.assertEqual(drive.hold_expires_at, self.now + timedelta(minutes=15))
+
+        later = self.now + timedelta(minutes=16)
+        self.assertIn(self.at(9), [slot.starts_at for slot in testdrives.slots(self.listing, self.monday, 1, now=later)])
+        with self.assertRaises(SlotUnavailable) as ctx:
+            testdrives.confirm(drive, now=later)
+        self.assertEqual(ctx.exception.reason, 'hold_expired')
+        testdrives.reserve(self.listing, self.make_customer('second@test.com'), self.at(9), now=later)
+
+        self.assertEqual(testdrives.expire_holds(now=later), 1)
+        drive.refresh_from_db()
+        self.assertEqual(drive.status, 'expired')
+
+    @mock.patch('feedback.models.create_and_send_user_notifications')
+    def test_confirm_reschedule_cancel(self, notify):
+        dealer_user = self.listing.created_by
+        drive = testdrives.reserve(self.listing, self.customer, self.at(9), now=self.now)
+        with self.captureOnCommitCallbacks(execute=True):
+            testdrives.confirm(drive, now=self.now + timedelta(minutes=5))
+        drive.refresh_from_db()
+        self.assertEqual((drive.status, drive.granted, drive.hold_expires_at), ('booked', True, None))
+        self.assertEqual({call.kwargs['user'] for call in notify.call_args_list}, {dealer_user, self.customer.user})
+        self.assertEqual({call.kwargs['category'] for call in notify.call_args_list}, {'orders'})
+
+        # another customer holds 10:00, so the drive cannot move there
+        testdrives.reserve(self.listing, self.make_customer('second@test.com'), self.at(10), now=self.now)
+        with self.assertRaises(SlotUnavailable):
+            testdrives.reschedule(drive, self.at(10), dealer_user, now=self.now)
+
+        notify.reset_mock()
+        with self.captureOnCommitCallbacks(execute=True):
+            testdrives.reschedule(drive, self.at(11, days=1), dealer_user, now=self.now)
+        drive.refresh_from_db()
+        self.assertEqual((drive.starts_at, drive.ends_at, drive.revision), (self.at(11, days=1), self.at(11, 30, days=1), 1))
+        notify.assert_called_once()
+        self.assertEqual(notify.call_args.kwargs['user'], self.customer.user)
+        self.assertIn('moved to Tue', notify.call_args.kwargs['message'])
+        self.assertIn(self.at(9), [slot.starts_at for slot in testdrives.slots(self.listing, self.monday, 1, now=self.now)])
+
+        notify.reset_mock()
+        with self.captureOnCommitCallbacks(execute=True):
+            testdrives.cancel(drive, self.customer.user, 'Bought elsewhere', now=self.now)
+        self.assertEqual((drive.status, drive.revision, drive.cancel_reason), ('cancelled', 2, 'Bought elsewhere'))
+        self.assertEqual(drive.cancelled_by, self.customer.user)
+        self.assertEqual(notify.call_args.kwargs['user'], dealer_user)
+        self.assertIn('Bought elsewhere', notify.call_args.kwargs['message'])
+        with self.assertRaises(SlotUnavailable) as ctx:
+            testdrives.cancel(drive, self.customer.user, now=self.now)
+        self.assertEqual(ctx.exception.reason, 'not_active')
+
+    @mock.patch('feedback.models.create_and_send_user_notifications')
+    def test_dropping_a_hold_is_silent(self, notify):
+        drive = testdrives.reserve(self.listing, self.customer, self.at(9), now=self.now)
+        with self.captureOnCommitCallbacks(execute=True):
+            testdrives.cancel(drive, self.customer.user, now=self.now)
+        notify.assert_not_called()
+
+    def test_calendar_feed(self):
+        # long enough to be folded
+        Dealership.objects.filter(pk=self.schedule.dealer_id).update(business_name='Lekki Premium Motors and Test Track Admiralty Way')
+        Listing.objects.filter(pk=self.listing.pk).update(title='Toyota Camry, 2021; demo unit')
+        booked = testdrives.reserve(self.listing, self.customer, self.at(9), now=self.now)
+        testdrives.confirm(booked, now=self.now)
+        cancelled = testdrives.reserve(self.listing, self.customer, self.at(10), now=self.now)
+        testdrives.confirm(cancelled, now=self.now)
+        testdrives.cancel(cancelled, self.customer.user, now=self.now)
+        testdrives.reserve(self.listing, self.customer, self.at(11), now=self.now)  # held only
+
+        response = APIClient().get(f'/api/v1/listings/testdrives/calendar/{self.schedule.calendar_token}.ics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/calendar'))
+        body = response.content.decode()
+        self.assertTrue(body.endswith('END:VCALENDAR\r\n'))
+        self.assertNotIn('\n', body.replace('\r\n', ''))
+        for line in body.split('\r\n'):
+            self.assertLessEqual(len(line.encode()), 75)
+        self.assertIn('\r\n ', body)
+        unfolded = body.replace('\r\n ', '')
+        self.assertEqual(unfolded.count('BEGIN:VEVENT'), 2)
+        self.assertIn(f'UID:testdrive-{booked.uuid}@veyu', unfolded)
+        self.assertIn(f'DTSTART:{self.at(9).astimezone(ZoneInfo("UTC")):%Y%m%dT%H%M%SZ}', unfolded)
+        self.assertIn('STATUS:CANCELLED', unfolded)
+        self.assertIn('SEQUENCE:1', unfolded)
+        self.assertIn('SUMMARY:Test drive: Toyota Camry\\, 2021\\; demo unit', unfolded)
+
+        self.assertEqual(APIClient().get('/api/v1/listings/testdrives/calendar/nope.ics').status_code, 404)
+
+    def test_api(self):
+        customer_client, dealer_client = APIClient(), APIClient()
+        customer_client.force_authenticate(user=self.customer.user)
+        dealer_client.force_authenticate(user=self.listing.created_by)
+
+        response = dealer_client.put('/api/v1/admin/dealership/testdrives/schedule/', {
+            'slot_minutes': 60,
+            'windows': [{'weekday': 0, 'starts_at': '09:00', 'ends_at': '11:00'}],
+            'exceptions': [{'date': str(self.monday + timedelta(days=7)), 'note': 'Closed'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()['data']
+        self.assertEqual(len(data['windows']), 1)
+        self.assertTrue(data['calendar_url'].endswith(f'{self.schedule.calendar_token}.ics'))
+        bad = dealer_client.put('/api/v1/admin/dealership/testdrives/schedule/', {
+            'windows': [{'weekday': 0, 'starts_at': '11:00', 'ends_at': '09:00'}],
+        }, format='json')
+        self.assertEqual(bad.status_code, 400)
+
+        response = customer_client.get(f'/api/v1/listings/testdrives/{self.listing.uuid}/slots/', {'from': str(self.monday), 'days': 14})
+        self.assertEqual(response.status_code, 200)
+        slots = response.json()['data']['slots']
+        self.assertEqual(len(slots), 2)
+        starts_at = slots[0]['starts_at']
+
+        response = customer_client.post(f'/api/v1/listings/testdrives/{self.listing.uuid}/reserve/', {'starts_at': starts_at}, format='json')
+        self.assertEqual(response.status_code, 201)
+        drive_id = response.json()['data']['uuid']
+        response = customer_client.post(f'/api/v1/listings/testdrives/{self.listing.uuid}/reserve/', {'starts_at': starts_at}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['data']['reason'], 'already_held')
+        other_client = APIClient()
+        other_client.force_authenticate(user=self.make_customer('other@test.com').user)
+        response = other_client.post(f'/api/v1/listings/testdrives/{self.listing.uuid}/reserve/', {'starts_at': starts_at}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['data']['reason'], 'full')
+
+        self.assertEqual(dealer_client.post(f'/api/v1/listings/testdrives/bookings/{drive_id}/confirm/').status_code, 403)
+        response = customer_client.post(f'/api/v1/listings/testdrives/bookings/{drive_id}/confirm/')
+        self.assertEqual(response.json()['data']['status'], 'booked')
+        self.assertEqual(customer_client.post(f'/api/v1/listings/testdrives/bookings/{drive_id}/refund/').status_code, 404)
+
+        response = dealer_client.get('/api/v1/admin/dealership/testdrives/')
+        self.assertEqual([drive['uuid'] for drive in response.json()['data']], [drive_id])
+        self.assertEqual(customer_client.get('/api/v1/listings/testdrives/').json()['results'][0]['uuid'], drive_id)
+
+        response = dealer_client.post(f'/api/v1/listings/testdrives/bookings/{drive_id}/cancel/', {'reason': 'Car sold'}, format='json')
+        self.assertEqual(response.json()['data']['status'], 'cancelled')
+        stranger = APIClient()
+        stranger.force_authenticate(user=self.make_customer('stranger@test.com').user)
+        self.assertEqual(stranger.post(f'/api/v1/listings/testdrives/bookings/{drive_id}/cancel/').status_code, 403)
+
+
+class TestDriveReservationConcurrencyTest(ParallelMixin, TestDriveFixturesMixin, TransactionTestCase):
+    """Parallel reservations must never exceed a slot's listing or dealership capacity."""
+
+    PER_THREAD = 10
+
+    def test_last_place_taken_once(self):
+        listing = self.make_rental_listing()
+        self.make_schedule(listing)
+        customers = [self.make_customer(f'c{i}@test.com') for i in range(self.THREADS)]
+        held = []
+
+        def attempt(rng):
+            try:
+                held.append(testdrives.reserve(listing, rng.choice(customers), self.at(9), now=self.now))
+            except SlotUnavailable:
+                pass
+
+        self._run_parallel(attempt)
+        self.assertEqual(len(held), 1)
+        self.assertEqual(TestDriveRequest.objects.count(), 1)
+
+    def test_capacities_hold(self):
+        listing = self.make_rental_listing()
+        listing.testdrive_capacity = 2
+        listing.save()
+        other = self.make_second_listing(listing)
+        other.testdrive_capacity = 2
+        other.save()
+        self.make_schedule(listing, capacity=3)
+        customers = [self.make_customer(f'c{i}@test.com') for i in range(self.THREADS)]
+        starts = [self.at(9) + timedelta(minutes=30 * i) for i in range(6)]
+
+        def attempt(rng):
+            try:
+                testdrives.reserve(rng.choice([listing, other]), rng.choice(customers), rng.choice(starts), now=self.now)
+            except SlotUnavailable:
+                pass
+
+        self._run_parallel(attempt)
+        drives = list(TestDriveRequest.objects.values_list('listing_id', 'starts_at'))
+        self.assertTrue(drives)
+        for starts_at in starts:
+            in_slot = [listing_id for listing_id, start in drives if start == starts_at]
+            self.assertLessEqual(len(in_slot), 3)
+            self.assertLessEqual(in_slot.count(listing.pk), 2)
+            self.assertLessEqual(in_slot.count(other.pk), 2)
+
+
+class OfferFixturesMixin(RentalFixturesMixin):
+
+    def make_sale_listing(self, email='sales@test.com', **fields):
+        listing = self.make_rental_listing(email)
+        Listing.objects.filter(pk=listing.pk).update(listing_type='sale', price=Decimal('10000000'), **fields)
+        listing.refresh_from_db()
+        return listing
+
+
+class OfferNegotiationTest(OfferFixturesMixin, TestCase):
+
+    def setUp(self):
+        self.listing = self.make_sale_listing()
+        self.dealer = self.listing.vehicle.dealer.user
+        self.customer = self.make_customer('buyer@test.com')
+
+    def test_counter_accept_and_checkout(self):
+        offer = offers.make_offer(self.listing, self.customer, 9000000)
+        self.assertEqual((offer.status, offer.made_by, offer.version), ('pending', 'customer', 0))
+        self.assertIsNotNone(offer.expires_at)
+        reply = offers.counter(offer, self.dealer, 9600000, 'Best I can do')
+        offer.refresh_from_db()
+        self.assertEqual((offer.status, offer.version), ('countered', 1))
+        self.assertEqual((reply.parent, reply.made_by, reply.bidder), (offer, 'dealer', self.customer))
+
+        with self.assertRaises(OfferError) as ctx:
+            offers.checkout(reply, self.customer.user)
+        self.assertEqual(ctx.exception.reason, 'not_accepted')
+        offers.accept(reply, self.customer.user)
+        self.assertEqual(reply.status, 'accepted')
+
+        order, created = offers.checkout(reply, self.customer.user)
+        self.assertTrue(created)
+        self.assertIsInstance(order, PurchaseOrder)
+        self.assertEqual(order.agreed_price, Decimal('9600000'))
+        self.assertEqual(order.sub_total, Decimal('9600000') * Decimal('1.005'))
+        self.assertEqual(offers.checkout(reply, self.customer.user), (order, False))
+        with self.assertRaises(OfferError):
+            offers.checkout(reply, self.dealer)
+        self.assertEqual(self.listing.total_offers, 2)
+
+    def test_trade_in_credit(self):
+        trade_in = TradeInRequest.objects.create(
+            customer=self.customer, to=self.listing.vehicle.dealer, vehicle=self.listing.vehicle, appraised_value=2000000,
+        )
+        with self.assertRaises(OfferError) as ctx:
+            offers.make_offer(self.listing, self.customer, 2000000, trade_in)
+        self.assertEqual(ctx.exception.reason, 'invalid_amount')
+        with self.assertRaises(OfferError) as ctx:
+            offers.make_offer(self.listing, self.make_customer('other@test.com'), 9000000, trade_in)
+        self.assertEqual(ctx.exception.reason, 'invalid_trade_in')
+
+        offer = offers.make_offer(self.listing, self.customer, 9000000, trade_in)
+        self.assertEqual((offer.trade_in_credit, offer.net_amount), (Decimal('2000000'), Decimal('7000000')))
+        reply = offers.counter(offer, self.dealer, 9500000)
+        self.assertEqual(reply.trade_in, trade_in)
+        offers.accept(reply, self.customer.user)
+        order, _ = offers.checkout(reply, self.customer.user)
+        self.assertEqual(order.agreed_price, Decimal('7500000'))
+
+        # neither the customer's figure nor an estimate the dealership has not reviewed is credited
+        unvalued = TradeInRequest.objects.create(
+            customer=self.customer, to=self.listing.vehicle.dealer, vehicle=self.listing.vehicle, asking_value=9000000,
+            estimated_value=8000000,
+        )
+        with self.assertRaises(OfferError) as ctx:
+            offers.make_offer(self.listing, self.customer, 9500000, unvalued)
+        self.assertEqual(ctx.exception.reason, 'trade_in_unvalued')
+
+    def test_trade_in_is_credited_once(self):
+        trade_in = TradeInRequest.objects.create(
+            customer=self.customer, to=self.listing.vehicle.dealer, vehicle=self.listing.vehicle, appraised_value=2000000,
+        )
+        car = Car.objects.create(dealer=self.listing.vehicle.dealer, name='Corolla', brand='Toyota', color='White')
+        other = Listing.objects.create(
+            vehicle=car, created_by=self.listing.created_by, listing_type='sale', price=9000000,
+            title='Toyota Corolla', approved=True, verified=True,
+        )
+        first = offers.make_offer(self.listing, self.customer, 9000000, trade_in)
+        second = offers.make_offer(other, self.customer, 8000000, trade_in)
+        offers.accept(first, self.dealer)
+        with self.assertRaises(OfferError) as ctx:
+            offers.accept(second, self.dealer)
+        self.assertEqual(ctx.exception.reason, 'trade_in_used')
+        with self.assertRaises(OfferError) as ctx:
+            offers.make_offer(other, self.customer, 8500000, trade_in)
+        self.assertEqual(ctx.exception.reason, 'trade_in_used')
+
+        # the constraint holds even if the check is raced past
+        with mock.patch.object(offers, '_trade_in_used', side_effect=[False, True]):
+            with self.assertRaises(OfferError) as ctx:
+                offers.accept(second, self.dealer)
+        self.assertEqual(ctx.exception.reason, 'trade_in_used')
+        second.refresh_from_db()
+        self.assertEqual(second.status, 'pending')
+        offers.checkout(first, self.customer.user)
+        self.assertEqual(PurchaseOrder.objects.count(), 1)
+
+    def test_thresholds(self):
+        Listing.objects.filter(pk=self.listing.pk).update(auto_accept_price=9500000, auto_reject_price=8000000)
+        self.listing.refresh_from_db()
+        low = offers.make_offer(self.listing, self.customer, 7000000)
+        self.assertEqual(low.status, 'rejected')
+        middle = offers.make_offer(self.listing, self.customer, 9000000)
+        self.assertEqual(middle.status, 'pending')
+        # the customer's counter-offers are answered the same way
+        reply = offers.counter(middle, self.dealer, 9900000)
+        self.assertEqual(offers.counter(reply, self.customer.user, 9500000).status, 'accepted')
+
+    def test_thresholds_apply_to_the_net_amount(self):
+        Listing.objects.filter(pk=self.listing.pk).update(auto_accept_price=9500000, auto_reject_price=8000000)
+        self.listing.refresh_from_db()
+        trade_in = TradeInRequest.objects.create(
+            customer=self.customer, to=self.listing.vehicle.dealer, vehicle=self.listing.vehicle, appraised_value=1000000,
+        )
+        # 9,500,000 gross is only 8,500,000 to the dealer
+        offer = offers.make_offer(self.listing, self.customer, 9500000, trade_in)
+        self.assertEqual(offer.status, 'pending')
+        reply = offers.counter(offer, self.dealer, 10600000)
+        # a counter whose net amount drops below the floor is declined
+        self.assertEqual(offers.counter(reply, self.customer.user, 8900000).status, 'rejected')
+        self.assertFalse(PurchaseOrder.objects.exists())
+
+    def test_turns_and_versions(self):
+        offer = offers.make_offer(self.listing, self.customer, 9000000)
+        stranger = self.make_customer('stranger@test.com').user
+        for action, by, reason in (
+            (offers.accept, self.customer.user, 'not_your_turn'),
+            (offers.accept, stranger, 'not_party'),
+            (offers.withdraw, self.dealer, 'not_yours'),
+        ):
+            with self.assertRaises(OfferError) as ctx:
+                action(offer, by)
+            self.assertEqual(ctx.exception.reason, reason)
+        with self.assertRaises(OfferError) as ctx:
+            offers.make_offer(self.listing, self.customer, 9100000)
+        self.assertEqual(ctx.exception.reason, 'open_offer')
+
+        offers.reject(offer, self.dealer, 'Too low')
+        stale = PurchaseOffer.objects.get(pk=offer.pk)
+        with self.assertRaises(OfferError) as ctx:
+            offers.accept(stale, self.dealer, version=0)
+        self.assertEqual(ctx.exception.reason, 'not_pending')
+
+        offer = offers.make_offer(self.listing, self.customer, 9100000)
+        with self.assertRaises(OfferError) as ctx:
+            offers.accept(offer, self.dealer, version=3)
+        self.assertEqual(ctx.exception.reason, 'stale')
+        self.assertEqual(PurchaseOffer.objects.get(pk=offer.pk).status, 'pending')
+
+    def test_accepting_closes_the_listing(self):
+        other = self.make_customer('other@test.com')
+        first = offers.make_offer(self.listing, self.customer, 9000000)
+        second = offers.make_offer(self.listing, other, 9200000)
+        offers.accept(second, self.dealer)
+        first.refresh_from_db()
+        self.assertEqual(first.status, 'rejected')
+        with self.assertRaises(OfferError) as ctx:
+            offers.make_offer(self.listing, self.make_customer('late@test.com'), 9900000)
+        self.assertEqual(ctx.exception.reason, 'sold')
+
+    def test_expiry(self):
+        now = timezone.now()
+        offer = offers.make_offer(self.listing, self.customer, 9000000, now=now - offers.expiry_duration())
+        # expired offers cannot be answered before the scheduler marks them
+        with self.assertRaises(OfferError) as ctx:
+            offers.accept(offer, self.dealer, now=now)
+        self.assertEqual(ctx.exception.reason, 'expired')
+        self.assertEqual(offers.expire_offers(now=now), 1)
+        self.assertEqual(offers.expire_offers(now=now), 0)
+        offer.refresh_from_db()
+        self.assertEqual((offer.status, offer.version), ('expired', 1))
+        # and the customer may make a new one
+        offers.make_offer(self.listing, self.customer, 9000000, now=now)
+
+    @override_settings(AUDIT_BUFFERED=False)
+    def test_transitions_audited_and_notified(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            offer = offers.make_offer(self.listing, self.customer, 9000000)
+        with self.captureOnCommitCallbacks(execute=True):
+            reply = offers.counter(offer, self.dealer, 9500000)
+        with self.captureOnCommitCallbacks(execute=True):
+            offers.accept(reply, self.customer.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            offers.checkout(reply, self.customer.user)
+
+        self.assertEqual(list(audit.events(stream='offers', obj=offer).values_list('action', flat=True)), ['offer_made', 'offer_countered'])
+        self.assertEqual(
+            list(audit.events(stream='offers', obj=reply).values_list('action', 'actor_id')),
+            [('offer_accepted', self.customer.user.pk), ('offer_checked_out', self.customer.user.pk)],
+        )
+        self.assertIsNone(audit.verify('offers')[1])
+        self.assertEqual(
+            list(Notification.objects.filter(cta_link__startswith='/offers/', channel='in-app').order_by('date_created', 'pk').values_list('user', 'subject')),
+            [(self.dealer.pk, 'New offer'), (self.customer.user.pk, 'Counter-offer'),
+             (self.dealer.pk, 'Offer accepted'), (self.dealer.pk, 'Offer checked out')],
+        )
+
+    def test_api(self):
+        customer_client, dealer_client = APIClient(), APIClient()
+        customer_client.force_authenticate(user=self.customer.user)
+        dealer_client.force_authenticate(user=self.dealer)
+
+        response = customer_client.post(f'/api/v1/listings/offers/{self.listing.uuid}/', {'amount': '9000000'}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        offer_id = response.json()['data']['uuid']
+        self.assertEqual(customer_client.post(f'/api/v1/listings/offers/{self.listing.uuid}/', {'amount': 'lots'}, format='json').status_code, 400)
+
+        response = dealer_client.get('/api/v1/admin/dealership/offers/')
+        self.assertEqual([offer['uuid'] for offer in response.json()['data']], [offer_id])
+        self.assertEqual(customer_client.post(f'/api/v1/listings/offers/{offer_id}/accept/').status_code, 403)
+        response = dealer_client.post(f'/api/v1/listings/offers/{offer_id}/counter/', {'amount': '9500000', 'version': 0}, format='json')
+        self.assertEqual(response.status_code, 201)
+        reply_id = response.json()['data']['uuid']
+        self.assertEqual(response.json()['data']['parent'], offer_id)
+        response = dealer_client.post(f'/api/v1/listings/offers/{offer_id}/reject/', {'version': 0}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['data']['reason'], 'not_pending')
+
+        response = customer_client.post(f'/api/v1/listings/offers/{reply_id}/accept/', {'version': 0}, format='json')
+        self.assertEqual(response.json()['data']['status'], 'accepted')
+        response = customer_client.post(f'/api/v1/listings/offers/{reply_id}/checkout/', {'payment_option': 'card'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Decimal(response.json()['data']['agreed_price']), Decimal('9500000'))
+        self.assertEqual(customer_client.post(f'/api/v1/listings/offers/{reply_id}/checkout/').status_code, 200)
+        self.assertEqual(customer_client.post(f'/api/v1/listings/offers/{reply_id}/haggle/').status_code, 404)
+        self.assertEqual(len(customer_client.get('/api/v1/listings/offers/').json()['results']), 2)
+
+
+class OfferTransitionRulesTest(OfferFixturesMixin, TestCase):
+    """
+    Random negotiations, seeded so failures replay: every step must succeed
+    exactly when the transition rules allow it, and the invariants below
+    must hold after it.
+    """
+
+    SEEDS = 6
+    STEPS = 40
+    ACTIONS = ('make', 'make', 'counter', 'counter', 'accept', 'reject', 'withdraw', 'expire')
+
+    def expected(self, offer, side, action, moment):
+        if side is None:
+            return 'not_party'
+        if action == 'withdraw':
+            if side != offer.made_by:
+                return 'not_yours'
+        elif side == offer.made_by:
+            return 'not_your_turn'
+        if offer.status != 'pending':
+            return 'not_pending'
+        if offer.expires_at <= moment:
+            return 'expired'
+        return None
+
+    def assert_invariants(self, listing, moment, closed):
+        rows = list(PurchaseOffer.objects.filter(listing=listing).select_related('parent'))
+        statuses = [offer.status for offer in rows]
+        self.assertLessEqual(statuses.count('accepted'), 1)
+        if 'accepted' in statuses:
+            # expired offers are left for expire_offers
+            self.assertFalse([offer for offer in rows if offer.status == 'pending' and offer.expires_at > moment])
+        for offer in rows:
+            if offer.parent is not None:
+                self.assertEqual(offer.parent.status, 'countered')
+                self.assertNotEqual(offer.made_by, offer.parent.made_by)
+                self.assertEqual(offer.bidder_id, offer.parent.bidder_id)
+            if offer.status == 'countered':
+                self.assertEqual(sum(1 for other in rows if other.parent_id == offer.pk), 1)
+            # every transition closes an offer, and closed offers never change
+            self.assertEqual(offer.version, 0 if offer.status == 'pending' else 1)
+            if offer.pk in closed:
+                self.assertEqual(closed[offer.pk], offer.status)
+            elif offer.status != 'pending':
+                closed[offer.pk] = offer.status
+        open_by_bidder = [offer.bidder_id for offer in rows if offer.status == 'pending' and offer.expires_at > moment]
+        self.assertEqual(len(open_by_bidder), len(set(open_by_bidder)))
+
+    def negotiate(self, seed):
+        rng = random.Random(seed)
+        listing = self.make_sale_listing(f'dealer{seed}@test.com')
+        dealer = listing.vehicle.dealer.user
+        customers = [self.make_customer(f'buyer{seed}-{i}@test.com') for i in range(3)]
+        moment, closed = timezone.now(), {}
+        for step in range(self.STEPS):
+            moment += timedelta(hours=rng.choice((0, 0, 1, 6, 30)))
+            action = rng.choice(self.ACTIONS)
+            amount = rng.randint(80, 110) * 100000
+            existing = list(PurchaseOffer.objects.filter(listing=listing).select_related('bidder__user', 'listing__vehicle__dealer'))
+            if action == 'expire':
+                offers.expire_offers(now=moment)
+                self.assert_invariants(listing, moment, closed)
+                continue
+            if action == 'make' or not existing:
+                customer = rng.choice(customers)
+                if any(offer.status == 'accepted' for offer in existing):
+                    expected = 'sold'
+                else:
+                    expected = None
+                if any(o.bidder_id == customer.pk and o.status == 'pending' and o.expires_at > moment for o in existing):
+                    expected = 'open_offer'
+                call = partial(offers.make_offer, listing, customer, amount, now=moment)
+            else:
+                offer = rng.choice(existing)
+                by = rng.choice([dealer, offer.bidder.user, rng.choice(customers).user])
+                side = offers.side_of(offer, by)
+                expected = self.expected(offer, side, action, moment)
+                if action == 'counter':
+                    call = partial(offers.counter, offer, by, amount, now=moment)
+                else:
+                    call = partial(getattr(offers, action), offer, by, now=moment)
+            try:
+                call()
+                outcome = None
+            except OfferError as e:
+                outcome = e.reason
+            self.assertEqual(outcome, expected, f"seed {seed}, step {step}: {action}")
+            self.assert_invariants(listing, moment, closed)
+
+    def test_transition_rules(self):
+        for seed in range(self.SEEDS):
+            with self.subTest(seed=seed):
+                self.negotiate(seed)
+
+
+class OfferAcceptanceConcurrencyTest(ParallelMixin, OfferFixturesMixin, TransactionTestCase):
+    """Parallel acceptances must never accept two offers on a listing."""
+
+    PER_THREAD = 5
+
+    def tearDown(self):
+        # write the buffered audit events while their tables still exist
+        audit.flush()
+
+    def test_one_offer_wins(self):
+        listing = self.make_sale_listing()
+        dealer = listing.vehicle.dealer.user
+        pending = [
+            offers.make_offer(listing, self.make_customer(f'c{i}@test.com'), 9000000 + i) for i in range(self.THREADS)
+        ]
+        # every attempt works from its own stale copy of an offer
+        copies = [PurchaseOffer.objects.get(pk=offer.pk) for offer in pending for _ in range(self.PER_THREAD)]
+        accepted = []
+
+        def attempt(rng):
+            offer = copies.pop(rng.randrange(len(copies)))
+            try:
+                accepted.append(offers.accept(offer, dealer, version=0))
+            except OfferError:
+                pass
+
+        self._run_parallel(attempt)
+        self.assertEqual(len(accepted), 1)
+        self.assertEqual(PurchaseOffer.objects.filter(status='accepted').count(), 1)
+        self.assertEqual(PurchaseOffer.objects.filter(status='rejected').count(), self.THREADS - 1)
+
+    def test_one_checkout(self):
+        listing = self.make_sale_listing()
+        customer = self.make_customer('c@test.com')
+        offer = offers.accept(offers.make_offer(listing, customer, 9000000), listing.vehicle.dealer.user)
+        copies = [PurchaseOffer.objects.get(pk=offer.pk) for _ in range(self.THREADS * self.PER_THREAD)]
+        created = []
+
+        def attempt(rng):
+            order, new = offers.checkout(copies.pop(), customer.user)
+            if new:
+                created.append(order)
+
+        self._run_parallel(attempt)
+        self.assertEqual(len(created), 1)
+        self.assertEqual(PurchaseOrder.objects.count(), 1)
+
+
+class ValuationTest(TestCase):
+    BASE = {'Toyota': 20_000_000, 'Lexus': 50_000_000}
+    CONDITIONS = {'new': 1.0, 'used-foreign': 0.8, 'used-local': 0.6}
+
+    def setUp(self):
+        # models are rows of each test's database; check for the current one on every use
+        settings = override_settings(VALUATION_MODEL_CHECK_SECONDS=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        dealer_user = User.objects.create_user(email='valuer@test.com', password='testpass123', user_type='dealer')
+        self.dealer = Dealership.objects.get(user=dealer_user)
+        rng = random.Random(3)
+        for i in range(60):
+            brand, condition = rng.choice(list(self.BASE)), rng.choice(list(self.CONDITIONS))
+            km = rng.randint(0, 150_000)
+            car = Car.objects.create(
+                dealer=self.dealer, name=f'{brand} {i}', brand=brand, model='ES' if brand == 'Lexus' else 'Camry',
+                color='Black', condition=condition, mileage=f'{km:,} km', body_type='sedan',
+            )
+            price = self.BASE[brand] * self.CONDITIONS[condition] * 0.8 ** (km / 100_000) * rng.uniform(0.95, 1.05)
+            Listing.objects.create(vehicle=car, created_by=dealer_user, listing_type='sale', price=round(price), title=car.name)
+
+    def test_normalize_mileage(self):
+        cases = {
+            '45,000 km': 45000, '45k': 45000, '120000': 120000, '25000.0': 25000, 0: 0,
+            '10,000 miles': 16093.44, '30K mi': 48280.32, '': None, 'low': None, None: None, '-5': None,
+        }
+        for text, km in cases.items():
+            with self.subTest(text=text):
+                km_found = valuation.normalize_mileage(text)
+                self.assertEqual(round(km_found, 2) if km_found is not None else None, km)
+
+    def test_no_model(self):
+        self.assertIsNone(valuation.current_model())
+        self.assertIsNone(valuation.estimate_value(Car.objects.first()))
+
+    def test_train_estimate_and_rollback(self):
+        rows = valuation.training_rows()
+        self.assertEqual(len(rows), 60)
+        self.assertEqual(rows[0]['attributes']['kind'], 'car')
+        first = valuation.train(rows, version='v1')
+        valuation.save(first)
+        self.assertEqual(set(first.report), {'all', 'kind', 'condition', 'brand'})
+        # a near-noiseless market is learned closely
+        self.assertLess(first.report['all']['all']['mape'], 15)
+
+        lexus = {'kind': 'car', 'brand': 'Lexus', 'model': 'ES', 'condition': 'used-foreign', 'mileage': '50,000 km'}
+        estimate = valuation.estimate(lexus)
+        self.assertEqual(estimate.version, 'v1')
+        self.assertLessEqual(estimate.low, estimate.value)
+        self.assertLessEqual(estimate.value, estimate.high)
+        self.assertAlmostEqual(float(estimate.value), 50_000_000 * 0.8 * 0.8 ** 0.5, delta=4_000_000)
+        self.assertGreater(estimate.value, valuation.estimate({**lexus, 'brand': 'Toyota', 'model': 'Camry'}).value)
+        self.assertGreater(estimate.value, valuation.estimate({**lexus, 'mileage': '140k km'}).value)
+        self.assertGreater(estimate.value, valuation.estimate({**lexus, 'condition': 'used-local'}).value)
+        # unknown values fall back to the intercept
+        self.assertIsNotNone(valuation.estimate({'brand': 'Unknown', 'mileage': 'lots'}))
+
+        car = Car.objects.filter(brand='Lexus').first()
+        self.assertEqual(valuation.estimate_value(car).version, 'v1')
+        self.assertEqual(valuation.estimate_value(car.vehicle_ptr).version, 'v1')
+
+        # a new version takes over; activating the old one rolls back
+        valuation.save(valuation.train(rows, alpha=5.0, version='v2'))
+        self.assertEqual(valuation.versions(), ['v1', 'v2'])
+        self.assertEqual(valuation.estimate(lexus).version, 'v2')
+        valuation.activate('v1')
+        self.assertEqual(valuation.estimate(lexus), estimate)
+        with self.assertRaises(ValueError):
+            valuation.activate('v3')
+
+    def test_current_model_is_shared_through_the_database(self):
+        rows = valuation.training_rows()
+        valuation.save(valuation.train(rows, version='v1'))
+        valuation.save(valuation.train(rows, alpha=5.0, version='v2'), make_current=False)
+        self.assertEqual(valuation.current_model().version, 'v1')
+        self.assertEqual(ValuationModelVersion.objects.get(is_current=True).version, 'v1')
+
+        # another process makes v2 current: seen at this process's next check
+        ValuationModelVersion.objects.update(is_current=False)
+        ValuationModelVersion.objects.filter(version='v2').update(is_current=True)
+        with override_settings(VALUATION_MODEL_CHECK_SECONDS=3600):
+            with self.assertNumQueries(0):
+                self.assertEqual(valuation.current_model().version, 'v1')
+        self.assertEqual(valuation.current_model().version, 'v2')
+        ValuationModelVersion.objects.update(is_current=False)
+        self.assertIsNone(valuation.current_model())
+
+    def test_orders_count_at_the_agreed_price(self):
+        listing = Listing.objects.first()
+        customer = Customer.objects.get(user=User.objects.create_user(email='b@test.com', password='testpass123', user_type='customer'))
+        Order.objects.create(customer=customer, order_type='sale', order_item=listing, order_status='completed', agreed_price=1_000_000)
+        Order.objects.create(customer=customer, order_type='sale', order_item=listing, order_status='pending')
+        rows = valuation.training_rows()
+        self.assertEqual(len(rows), 61)
+        self.assertEqual((rows[-1]['price'], rows[-1]['weight']), (1_000_000, valuation.ORDER_WEIGHT))
+        with self.assertRaises(ValueError):
+            valuation.train(rows[:10])
+
+    def test_api(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(email='tradein@test.com', password='testpass123', user_type='customer'))
+        quote = {'vehicle_type': 'car', 'brand': 'Lexus', 'model': 'ES', 'condition': 'new', 'mileage': '1,000 km'}
+        response = client.post('/api/v1/listings/valuation/', quote, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data['data'])
+        tradein = {**quote, 'dealer': str(self.dealer.uuid), 'color': 'White'}
+        Dealership.objects.filter(pk=self.dealer.pk).update(offers_trade_in=True)
+        # without a model the trade-in waits for the dealership's valuation
+        response = client.post('/api/v1/listings/tradeins/', {**tradein, 'asking_value': '42000000'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['data']['estimated_value'], response.data['data']['asking_value']), (None, '42000000.00'))
+
+        call_command('train_valuation_model', stdout=io.StringIO())
+        response = client.post('/api/v1/listings/valuation/', quote, format='json')
+        self.assertEqual(response.status_code, 200)
+        value = response.data['data']['value']
+        self.assertGreater(value, 0)
+        self.assertEqual(client.post('/api/v1/listings/valuation/', {'vehicle_type': 'tank', 'brand': 'X'}, format='json').status_code, 400)
+
+        response = client.post('/api/v1/listings/tradeins/', tradein, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['valuation']['value'], value)
+        trade_in = TradeInRequest.objects.get(uuid=response.data['data']['uuid'])
+        self.assertEqual((trade_in.estimated_value, trade_in.to, trade_in.vehicle.dealer), (value, self.dealer, None))
+        self.assertEqual(trade_in.vehicle.car.mileage, '1,000 km')
+        # the customer's own figure is kept apart and never credited
+        response = client.post('/api/v1/listings/tradeins/', {**tradein, 'estimated_value': '42000000', 'asking_value': '42000000'}, format='json')
+        self.assertEqual((response.data['data']['estimated_value'], response.data['data']['asking_value']), (f'{value}.00', '42000000.00'))
+        self.assertEqual(client.get('/api/v1/listings/tradeins/').data['count'], 3)
+        Dealership.objects.filter(pk=self.dealer.pk).update(offers_trade_in=False)
+        self.assertEqual(client.post('/api/v1/listings/tradeins/', tradein, format='json').status_code, 400)
+
+    def test_dealer_appraisal(self):
+        customer = Customer.objects.get(user=User.objects.create_user(email='seller@test.com', password='testpass123', user_type='customer'))
+        vehicle = Car.objects.create(name='Lexus ES', brand='Lexus', model='ES', color='White')
+        trade_in = TradeInRequest.objects.create(customer=customer, to=self.dealer, vehicle=vehicle, estimated_value=30000000)
+        url = f'/api/v1/admin/dealership/tradeins/{trade_in.uuid}/appraise/'
+        client = APIClient()
+        client.force_authenticate(customer.user)
+        self.assertEqual(client.post(url, {}, format='json').status_code, 403)
+        other = User.objects.create_user(email='other-dealer@test.com', password='testpass123', user_type='dealer')
+        client.force_authenticate(other)
+        self.assertEqual(client.post(url, {}, format='json').status_code, 404)
+
+        client.force_authenticate(self.dealer.user)
+        pending = client.get('/api/v1/admin/dealership/tradeins/?appraised=false').data['data']
+        self.assertEqual([(row['uuid'], row['appraised_value']) for row in pending], [(str(trade_in.uuid), None)])
+        # approving the estimate as it is
+        response = client.post(url, {}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['appraised_value'], '30000000.00')
+        trade_in.refresh_from_db()
+        self.assertEqual(trade_in.appraised_by, self.dealer.user)
+        self.assertEqual(client.post(url, {'appraised_value': '-5'}, format='json').status_code, 400)
+        response = client.post(url, {'appraised_value': '27500000'}, format='json')
+        self.assertEqual(response.data['data']['appraised_value'], '27500000.00')
+        self.assertEqual(client.get('/api/v1/admin/dealership/tradeins/?appraised=false').data['data'], [])
+
+        # only the appraised value is credited, and no longer changes once it is
+        listing = Listing.objects.filter(vehicle__dealer=self.dealer).first()
+        Listing.objects.filter(pk=listing.pk).update(price=60000000, verified=True)
+        listing.refresh_from_db()
+        offer = offers.make_offer(listing, customer, 55000000, TradeInRequest.objects.get(pk=trade_in.pk))
+        self.assertEqual(offer.trade_in_credit, Decimal('27500000'))
+        offers.accept(offer, self.dealer.user)
+        response = client.post(url, {'appraised_value': '40000000'}, format='json')
+        self.assertEqual((response.status_code, response.data['data']['reason']), (409, 'trade_in_used'))
+
+        unestimated = TradeInRequest.objects.create(customer=customer, to=self.dealer, vehicle=vehicle)
+        response = client.post(f'/api/v1/admin/dealership/tradeins/{unestimated.uuid}/appraise/', {}, format='json')
+        self.assertEqual((response.status_code, response.data['data']['reason']), (400, 'invalid_appraisal'))
+
+    def test_evaluate_on_synthetic_marketplace(self):
+        out = io.StringIO()
+        call_command('evaluate_valuation_model', scale=0.03, stdout=out)
+        report = out.getvalue()
+        self.assertIn('overall', report)
+        self.assertIn('kind=car', report)
+        self.assertIn('rolled back', report)
+        self.assertFalse(Dealership.objects.filter(user__email__endswith='loadtest.veyu.test').exists())
+        self.assertEqual(valuation.versions(), [])
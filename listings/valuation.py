@@ -0,0 +1,435 @@
+"""
+Vehicle valuation.
+
+A ridge regression on the log of sale prices, trained from the platform's
+sale listings (asking prices) and completed sale orders (what buyers paid:
+``agreed_price`` when it was negotiated, weighted ``ORDER_WEIGHT`` times a
+listing). The features are one-hot vehicle attributes (kind, brand, brand
+and model, condition, fuel system, transmission, body type and drivetrain)
+plus the normalized mileage (``normalize_mileage``). Attribute values seen
+fewer than ``MIN_CATEGORY_COUNT`` times are left to the intercept. The
+model is small enough to fit in pure Python: the normal equations are
+accumulated from sparse rows and solved by Cholesky decomposition.
+
+    training_rows(vehicles)     sale listings and completed sale orders as rows
+    train(rows)                 fit a model, holding out a share of vehicles for its report
+    save(model) / activate(version) / versions()
+    estimate_value(vehicle)     Estimate(value, low, high, version), or None without a model
+    estimate(attributes)        the same for a dict of vehicle attributes
+
+Models are stored in the database as ``ValuationModelVersion`` rows, one
+per version (the time they were trained), so every process sees a model
+however it was trained; ``is_current`` marks the one in use, so rolling
+back is activating an older version. A process loads the model once and
+checks which version is current every ``VALUATION_MODEL_CHECK_SECONDS``,
+so an estimate is a few dictionary lookups. Its low-high range spans the
+10th to 90th percentile of the held-out residuals, per vehicle kind when
+the kind had enough of them.
+
+``manage.py train_valuation_model`` retrains from the database and
+``manage.py evaluate_valuation_model`` reports the held-out MAE by segment
+on a synthetic marketplace (utils.marketplace_data).
+"""
+import hashlib
+import logging
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict, namedtuple
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from listings.models import UAV, Bike, Boat, Car, Listing, Order, Plane, ValuationModelVersion
+
+logger = logging.getLogger(__name__)
+
+KINDS = {'car': Car, 'bike': Bike, 'boat': Boat, 'plane': Plane, 'uav': UAV}
+CATEGORICAL = ('kind', 'brand', 'brand_model', 'condition', 'fuel_system', 'transmission', 'body_type', 'drivetrain')
+MIN_CATEGORY_COUNT = 3
+ORDER_WEIGHT = 2.0
+DEFAULT_ALPHA = 1.0
+DEFAULT_HOLDOUT = 0.2
+MIN_SAMPLES = 30
+# held-out residuals a kind needs for an interval of its own
+MIN_INTERVAL_SAMPLES = 20
+INTERVAL = (0.1, 0.9)
+KM_PER_MILE = 1.609344
+MAX_MILEAGE_KM = 2_000_000
+CURRENT = 'CURRENT'
+
+Estimate = namedtuple('Estimate', 'value low high version')
+
+_MILEAGE = re.compile(r'^([\d.,]+)\s*(k)?\s*(km|kms|kilomet(?:er|re)s?|mi|miles?)?$', re.IGNORECASE)
+_cache = {'key': None, 'model': None, 'checked': None}
+_lock = threading.Lock()
+
+
+def normalize_mileage(value):
+    """Kilometres from a free-text mileage ('45,000 km', '30k miles', '120000'), or None."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float, Decimal)):
+        km = float(value)
+    else:
+        match = _MILEAGE.match(str(value).strip())
+        if not match:
+            return None
+        number, thousands, unit = match.groups()
+        try:
+            km = float(number.replace(',', ''))
+        except ValueError:
+            return None
+        if thousands:
+            km *= 1000
+        if unit and unit.lower().startswith('mi'):
+            km *= KM_PER_MILE
+    if not math.isfinite(km) or not 0 <= km <= MAX_MILEAGE_KM:
+        return None
+    return km
+
+
+def _clean(value):
+    if value is None:
+        return None
+    return str(value).strip().lower() or None
+
+
+def _categories(attributes):
+    brand, model = _clean(attributes.get('brand')), _clean(attributes.get('model'))
+    values = {field: _clean(attributes.get(field)) for field in CATEGORICAL}
+    values['kind'] = values['kind'] or 'car'
+    values['brand'] = brand
+    values['brand_model'] = f'{brand}|{model}' if brand and model else None
+    return values
+
+
+def _mileage_feature(km):
+    return math.log1p(km / 1000)
+
+
+# rows
+
+def _kind_of(vehicle):
+    for kind, model in KINDS.items():
+        if isinstance(vehicle, model):
+            return kind, vehicle
+    for kind in KINDS:
+        try:
+            return kind, getattr(vehicle, kind)
+        except ObjectDoesNotExist:
+            continue
+    return None, vehicle
+
+
+def attributes_of(vehicle):
+    """The attributes ``estimate`` takes, from a vehicle of any kind."""
+    kind, specific = _kind_of(vehicle)
+    return {
+        'kind': kind,
+        'brand': vehicle.brand,
+        'model': vehicle.model,
+        'condition': vehicle.condition,
+        'fuel_system': vehicle.fuel_system,
+        'transmission': vehicle.transmission,
+        'body_type': getattr(specific, 'body_type', None) if kind == 'car' else None,
+        'drivetrain': getattr(specific, 'drivetrain', None) if kind == 'car' else None,
+        'mileage': vehicle.mileage,
+    }
+
+
+def _vehicle_fields(prefix):
+    fields = [f'{prefix}{field}' for field in ('id', 'brand', 'model', 'condition', 'fuel_system', 'transmission', 'mileage')]
+    return fields + [f'{prefix}car__body_type', f'{prefix}car__drivetrain'] + [f'{prefix}{kind}' for kind in KINDS]
+
+
+def _row(values, prefix, price, weight):
+    kind = next((kind for kind in KINDS if values[f'{prefix}{kind}'] is not None), None)
+    attributes = {field: values[f'{prefix}{field}'] for field in ('brand', 'model', 'condition', 'fuel_system', 'transmission', 'mileage')}
+    attributes.update(
+        kind=kind, body_type=values[f'{prefix}car__body_type'], drivetrain=values[f'{prefix}car__drivetrain'],
+    )
+    return {'key': values[f'{prefix}id'], 'attributes': attributes, 'price': float(price), 'weight': weight}
+
+
+def training_rows(vehicles=None):
+    """Sale listings and completed sale orders with a price, optionally only of ``vehicles`` (a queryset)."""
+    listings = Listing.objects.filter(listing_type='sale', price__gt=0)
+    orders = Order.objects.filter(order_type='sale', order_status='completed', order_item__isnull=False).annotate(
+        sale_price=Coalesce(F('agreed_price'), F('order_item__price')),
+    ).filter(sale_price__gt=0)
+    if vehicles is not None:
+        listings = listings.filter(vehicle__in=vehicles)
+        orders = orders.filter(order_item__vehicle__in=vehicles)
+
+    rows = [
+        _row(values, 'vehicle__', values['price'], 1.0)
+        for values in listings.values('price', *_vehicle_fields('vehicle__')).iterator(chunk_size=2000)
+    ]
+    rows += [
+        _row(values, 'order_item__vehicle__', values['sale_price'], ORDER_WEIGHT)
+        for values in orders.values('sale_price', *_vehicle_fields('order_item__vehicle__')).iterator(chunk_size=2000)
+    ]
+    return rows
+
+
+# the model
+
+class ValuationModel:
+    """Coefficients over named features; see the module docstring."""
+
+    def __init__(self, version, features, coefficients, mileage_mean, residuals, samples=0, alpha=DEFAULT_ALPHA, report=None):
+        self.version = version
+        self.features = features
+        self.coefficients = coefficients
+        self.mileage_mean = mileage_mean
+        self.residuals = residuals
+        self.samples = samples
+        self.alpha = alpha
+        self.report = report or {}
+
+    def encode(self, attributes):
+        """The sparse feature row of ``attributes``: [(index, value)]."""
+        row = [(0, 1.0)]
+        for field, value in _categories(attributes).items():
+            index = self.features.get(f'{field}={value}')
+            if index is not None:
+                row.append((index, 1.0))
+        km = normalize_mileage(attributes.get('mileage'))
+        if km is None:
+            row.append((self.features['mileage_missing'], 1.0))
+        else:
+            row.append((self.features['mileage'], _mileage_feature(km) - self.mileage_mean))
+        return row
+
+    def predict_log(self, attributes):
+        return sum(self.coefficients[index] * value for index, value in self.encode(attributes))
+
+    def estimate(self, attributes):
+        predicted = self.predict_log(attributes)
+        low, high = self.residuals.get(_clean(attributes.get('kind')) or 'car', self.residuals['all'])
+        return Estimate(
+            value=_money(math.exp(predicted)), low=_money(math.exp(predicted + low)),
+            high=_money(math.exp(predicted + high)), version=self.version,
+        )
+
+    def as_dict(self):
+        return {
+            'version': self.version, 'features': self.features, 'coefficients': self.coefficients,
+            'mileage_mean': self.mileage_mean, 'residuals': self.residuals, 'samples': self.samples,
+            'alpha': self.alpha, 'report': self.report,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+def _money(value):
+    # estimates are rounded to the nearest thousand
+    return Decimal(int(round(value, -3)))
+
+
+def _features(rows):
+    counts = Counter(
+        f'{field}={value}' for row in rows for field, value in _categories(row['attributes']).items() if value is not None
+    )
+    names = ['intercept', 'mileage', 'mileage_missing'] + sorted(name for name, count in counts.items() if count >= MIN_CATEGORY_COUNT)
+    return {name: index for index, name in enumerate(names)}
+
+
+def _cholesky_solve(matrix, vector):
+    size = len(vector)
+    lower = [[0.0] * size for _ in range(size)]
+    for i in range(size):
+        row = lower[i]
+        for j in range(i + 1):
+            other = lower[j]
+            total = matrix[i][j] - sum(row[k] * other[k] for k in range(j))
+            if i == j:
+                row[i] = math.sqrt(total)
+            else:
+                row[j] = total / other[j]
+    forward = [0.0] * size
+    for i in range(size):
+        forward[i] = (vector[i] - sum(lower[i][k] * forward[k] for k in range(i))) / lower[i][i]
+    solution = [0.0] * size
+    for i in reversed(range(size)):
+        solution[i] = (forward[i] - sum(lower[k][i] * solution[k] for k in range(i + 1, size))) / lower[i][i]
+    return solution
+
+
+def _fit(rows, alpha, version):
+    features = _features(rows)
+    known = [normalize_mileage(row['attributes'].get('mileage')) for row in rows]
+    known = [_mileage_feature(km) for km in known if km is not None]
+    model = ValuationModel(
+        version, features, [0.0] * len(features), sum(known) / len(known) if known else 0.0,
+        residuals={'all': [0.0, 0.0]}, samples=len(rows), alpha=alpha,
+    )
+
+    # normal equations (X'WX + alpha I) b = X'Wy; the intercept is not penalized
+    size = len(features)
+    matrix = [[0.0] * size for _ in range(size)]
+    vector = [0.0] * size
+    for row in rows:
+        encoded, target, weight = model.encode(row['attributes']), math.log(row['price']), row['weight']
+        for i, value in encoded:
+            vector[i] += weight * value * target
+            line = matrix[i]
+            for j, other in encoded:
+                line[j] += weight * value * other
+    for i in range(1, size):
+        matrix[i][i] += alpha
+    model.coefficients = _cholesky_solve(matrix, vector)
+    return model
+
+
+def _held_out(row, holdout):
+    # by vehicle, so a vehicle's listing and orders land on the same side
+    digest = hashlib.sha256(str(row['key']).encode()).digest()
+    return int.from_bytes(digest[:8], 'big') / 2 ** 64 < holdout
+
+
+def _quantile(values, share):
+    values = sorted(values)
+    position = (len(values) - 1) * share
+    below, above = math.floor(position), math.ceil(position)
+    return values[below] + (values[above] - values[below]) * (position - below)
+
+
+def _residuals(model, rows):
+    by_kind = defaultdict(list)
+    for row in rows:
+        residual = math.log(row['price']) - model.predict_log(row['attributes'])
+        by_kind['all'].append(residual)
+        by_kind[row['attributes'].get('kind') or 'car'].append(residual)
+    return {
+        kind: [_quantile(values, INTERVAL[0]), _quantile(values, INTERVAL[1])]
+        for kind, values in by_kind.items() if kind == 'all' or len(values) >= MIN_INTERVAL_SAMPLES
+    }
+
+
+def evaluate(model, rows):
+    """Mean absolute error (and percentage error) of ``model`` on ``rows``, overall and by segment."""
+    segments = defaultdict(lambda: defaultdict(list))
+    for row in rows:
+        attributes = row['attributes']
+        predicted = math.exp(model.predict_log(attributes))
+        error = abs(predicted - row['price'])
+        segments['all']['all'].append((error, error / row['price']))
+        segments['kind'][attributes.get('kind') or 'car'].append((error, error / row['price']))
+        segments['condition'][attributes.get('condition') or 'unknown'].append((error, error / row['price']))
+        segments['brand'][_clean(attributes.get('brand')) or 'unknown'].append((error, error / row['price']))
+
+    def summary(errors):
+        return {
+            'samples': len(errors),
+            'mae': round(sum(error for error, _ in errors) / len(errors), 2),
+            'mape': round(100 * sum(share for _, share in errors) / len(errors), 2),
+        }
+
+    return {segment: {value: summary(errors) for value, errors in sorted(groups.items())} for segment, groups in segments.items()}
+
+
+def report_lines(report):
+    """``evaluate``'s report as aligned text lines, for the management commands."""
+    lines = []
+    for segment in ('all', 'kind', 'condition', 'brand'):
+        for value, summary in report.get(segment, {}).items():
+            label = 'overall' if segment == 'all' else f'{segment}={value}'
+            lines.append(f"{label:<28} n={summary['samples']:>6}  MAE={summary['mae']:>16,.0f}  MAPE={summary['mape']:6.2f}%")
+    return lines
+
+
+def train(rows, alpha=DEFAULT_ALPHA, holdout=DEFAULT_HOLDOUT, version=None):
+    """
+    Fit a model on ``rows`` (see ``training_rows``). The vehicles of a
+    ``holdout`` share of the rows are left out of a first fit whose errors
+    on them give the report and the interval; the returned model is then
+    fitted on every row.
+    """
+    if len(rows) < MIN_SAMPLES:
+        raise ValueError(f"Need at least {MIN_SAMPLES} priced sales to train on, got {len(rows)}")
+    version = version or f"{timezone.now():%Y%m%dT%H%M%S%f}"
+    test = [row for row in rows if _held_out(row, holdout)]
+    fitted = [row for row in rows if not _held_out(row, holdout)]
+    if test and fitted:
+        first = _fit(fitted, alpha, version)
+        residuals, report = _residuals(first, test), evaluate(first, test)
+    else:
+        first = _fit(rows, alpha, version)
+        residuals, report = _residuals(first, rows), {}
+    model = _fit(rows, alpha, version)
+    model.residuals, model.report = residuals, report
+    logger.info(f"Trained valuation model {version} on {len(rows)} rows ({len(test)} held out)")
+    return model
+
+
+# artifacts
+
+def versions():
+    """The saved model versions, oldest first."""
+    return list(ValuationModelVersion.objects.order_by('version').values_list('version', flat=True))
+
+
+def save(model, make_current=True):
+    """Store ``model`` under its version (and make it the current one)."""
+    ValuationModelVersion.objects.update_or_create(version=model.version, defaults={'data': model.as_dict()})
+    if make_current:
+        activate(model.version)
+
+
+def activate(version):
+    """Serve estimates from the saved model ``version``."""
+    with transaction.atomic():
+        if not ValuationModelVersion.objects.filter(version=version).exists():
+            raise ValueError(f"No valuation model {version}")
+        ValuationModelVersion.objects.filter(is_current=True).exclude(version=version).update(is_current=False)
+        ValuationModelVersion.objects.filter(version=version).update(is_current=True)
+    # this process switches at once, the others at their next check
+    with _lock:
+        _cache['checked'] = None
+
+
+def load(version):
+    return ValuationModel.from_dict(ValuationModelVersion.objects.get(version=version).data)
+
+
+def current_model():
+    """The model in use, or None before one is trained."""
+    with _lock:
+        moment = time.monotonic()
+        interval = getattr(settings, 'VALUATION_MODEL_CHECK_SECONDS', 60)
+        if _cache['checked'] is None or moment - _cache['checked'] >= interval:
+            current = ValuationModelVersion.objects.filter(is_current=True).values_list('version', flat=True).first()
+            if current != _cache['key']:
+                _cache['model'] = load(current) if current is not None else None
+                _cache['key'] = current
+            _cache['checked'] = moment
+        return _cache['model']
+
+
+def estimate(attributes):
+    """An ``Estimate`` for a dict of vehicle attributes (see ``attributes_of``), or None without a model."""
+    model = current_model()
+    return model.estimate(attributes) if model is not None else None
+
+
+def estimate_value(vehicle):
+    """An ``Estimate`` of what ``vehicle`` sells for, or None without a model."""
+    model = current_model()
+    return model.estimate(attributes_of(vehicle)) if model is not None else None
+
+
+def as_data(result):
+    """An estimate as API data."""
+    if result is None:
+        return None
+    return {'value': result.value, 'low': result.low, 'high': result.high, 'model_version': result.version}
@@ -172,6 +172,10 @@ def main():
         logger.error("❌ Database migrations failed")
         sys.exit(1)
     
+    # Pre-build the API schema served at /api/docs/swagger.json (non-critical: built on first request otherwise)
+    logger.info("📘 Building OpenAPI schema...")
+    run_command('python manage.py build_openapi_schema', 'OpenAPI schema build', required=False)
+    
     # Test health endpoint
     try:
         logger.info("🏥 Testing health endpoint...")
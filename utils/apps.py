@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'utils'
+
+    def ready(self):
+        from django.utils.module_loading import autodiscover_modules
+
+        from utils import audit, metrics
+
+        metrics.install()
+        audit.install()
+        # each app's metrics.py declares its domain counters and queues
+        autodiscover_modules('metrics')
@@ -0,0 +1,222 @@
+"""
+Append-only, tamper-evident audit log.
+
+Events go to ``utils.AuditEvent``, one hash chain per stream ('documents',
+'signatures', 'business_documents', 'security', 'offers'). Each event
+stores the hash of the event before it in its stream and a SHA-256 over
+its own content plus that hash, so editing an event breaks its own hash and
+deleting one breaks the link (or the sequence) of the next. ``verify``
+walks a stream and reports the first break (``manage.py
+verify_audit_log``).
+
+``record`` only appends the event to an in-process buffer. The buffer is
+written in batches: once it holds ``AUDIT_BATCH_SIZE`` events, when a
+request has finished (after the response went out), and at exit. A batch
+takes the stream's ``utils.Sequence`` row (``audit:<stream>``) FOR UPDATE,
+so processes writing the same stream append one after the other and the
+chain stays linear. A batch that cannot be written stays buffered for the
+next flush; past ``AUDIT_MAX_BUFFER`` events the oldest are dropped with an
+error in the log. With ``AUDIT_BUFFERED`` off every event is written at
+once (tests, scripts).
+
+``events`` queries the log by stream, actor, object, action and time range.
+"""
+import atexit
+import hashlib
+import json
+import logging
+import threading
+from collections import namedtuple
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+STREAMS = ('documents', 'signatures', 'business_documents', 'security', 'offers')
+GENESIS_HASH = '0' * 64
+
+Break = namedtuple('Break', 'sequence reason')
+
+_buffer = []
+_lock = threading.Lock()
+_flushing = threading.Lock()
+
+
+def object_key(obj):
+    """``(object_type, object_id)`` for a model instance, e.g. ``('inspections.inspectiondocument', '42')``."""
+    if obj is None:
+        return '', ''
+    if isinstance(obj, tuple):
+        return obj[0], str(obj[1])
+    return obj._meta.label_lower, str(obj.pk)
+
+
+def digest(values):
+    """The hash of an event, given its chained fields (see ``_chained``)."""
+    payload = json.dumps(values, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _chained(event):
+    # every field the hash covers, as stored (details after a JSON round trip)
+    occurred_at = event['occurred_at'].astimezone(dt_timezone.utc).isoformat()
+    return {
+        'stream': event['stream'], 'sequence': event['sequence'], 'action': event['action'],
+        'actor_id': event['actor_id'], 'actor_email': event['actor_email'],
+        'object_type': event['object_type'], 'object_id': event['object_id'],
+        'ip_address': event['ip_address'], 'details': event['details'],
+        'occurred_at': occurred_at, 'previous_hash': event['previous_hash'],
+    }
+
+
+def record(stream, action, actor=None, obj=None, ip_address=None, details=None, actor_id=None):
+    """
+    Buffer an audit event. ``actor`` is an Account (or pass ``actor_id``);
+    ``obj`` is a model instance or an ``(object_type, object_id)`` pair.
+    Never raises: auditing must not fail the action being audited.
+    """
+    try:
+        if stream not in STREAMS:
+            raise ValueError(f"Unknown audit stream {stream}")
+        if actor is not None and not getattr(actor, 'is_authenticated', True):
+            actor = None
+        object_type, object_id = object_key(obj)
+        event = {
+            'stream': stream,
+            'action': action[:50],
+            'actor_id': actor.pk if actor is not None else actor_id,
+            'actor_email': getattr(actor, 'email', '') or '',
+            'object_type': object_type,
+            'object_id': object_id,
+            'ip_address': (ip_address or '')[:45] or None,
+            # stored as JSON, so hash what comes back out of it
+            'details': json.loads(json.dumps(details or {}, default=str)),
+            'occurred_at': timezone.now(),
+        }
+    except Exception as e:
+        logger.error(f"Could not record audit event {stream}/{action}: {e}")
+        return
+
+    with _lock:
+        _buffer.append(event)
+        full = len(_buffer) >= getattr(settings, 'AUDIT_BATCH_SIZE', 100)
+    if full or not getattr(settings, 'AUDIT_BUFFERED', True):
+        flush()
+
+
+def flush():
+    """Write the buffered events. Returns the number written."""
+    with _flushing:
+        with _lock:
+            pending = list(_buffer)
+            _buffer.clear()
+        if not pending:
+            return 0
+
+        written, failed = 0, []
+        for stream in STREAMS:
+            batch = [event for event in pending if event['stream'] == stream]
+            if not batch:
+                continue
+            try:
+                written += _write(stream, batch)
+            except Exception as e:
+                logger.error(f"Could not write {len(batch)} {stream} audit events, will retry: {e}")
+                failed.extend(batch)
+
+        if failed:
+            with _lock:
+                _buffer[:0] = failed
+                overflow = len(_buffer) - getattr(settings, 'AUDIT_MAX_BUFFER', 10_000)
+                if overflow > 0:
+                    del _buffer[:overflow]
+                    logger.error(f"Audit buffer full, dropped the {overflow} oldest events")
+        return written
+
+
+def _write(stream, batch):
+    from utils.models import AuditEvent, Sequence
+
+    with transaction.atomic():
+        head, _ = Sequence.objects.select_for_update().get_or_create(scope=f'audit:{stream}')
+        last = AuditEvent.objects.filter(stream=stream).order_by('-sequence').values_list('hash', flat=True).first()
+        previous_hash = last or GENESIS_HASH
+        rows = []
+        for offset, event in enumerate(batch, start=1):
+            event = {**event, 'sequence': head.last_value + offset, 'previous_hash': previous_hash}
+            event['hash'] = previous_hash = digest(_chained(event))
+            rows.append(AuditEvent(**event))
+        AuditEvent.objects.bulk_create(rows)
+        head.last_value += len(rows)
+        head.save(update_fields=['last_value', 'last_updated'])
+    return len(rows)
+
+
+def _flush_quietly(**kwargs):
+    try:
+        flush()
+    except Exception as e:
+        logger.error(f"Could not flush audit events: {e}")
+
+
+def install():
+    """Flush after every request and at exit (called from the utils app config's ``ready``)."""
+    request_finished.connect(_flush_quietly, dispatch_uid='utils.audit.flush')
+    atexit.register(_flush_quietly)
+
+
+# reading
+
+def events(stream=None, actor=None, obj=None, action=None, start=None, end=None):
+    """Audit events matching every given filter, oldest first."""
+    from utils.models import AuditEvent
+
+    queryset = AuditEvent.objects.all()
+    if stream is not None:
+        queryset = queryset.filter(stream=stream)
+    if actor is not None:
+        queryset = queryset.filter(actor_id=getattr(actor, 'pk', actor))
+    if obj is not None:
+        object_type, object_id = object_key(obj)
+        queryset = queryset.filter(object_type=object_type, object_id=object_id)
+    if action is not None:
+        queryset = queryset.filter(action=action)
+    if start is not None:
+        queryset = queryset.filter(occurred_at__gte=start)
+    if end is not None:
+        queryset = queryset.filter(occurred_at__lte=end)
+    return queryset.order_by('occurred_at', 'pk')
+
+
+def verify(stream, chunk_size=2000):
+    """
+    Walk ``stream``'s chain from the start. Returns ``(events checked,
+    first Break or None)``. A break is an event whose hash does not match
+    its content (edited), whose previous hash is not the hash of the event
+    before it or whose sequence skips (one deleted in between), or missing
+    events at the end of the chain.
+    """
+    from utils.models import AuditEvent, Sequence
+
+    fields = ['sequence', 'hash', 'stream', 'action', 'actor_id', 'actor_email', 'object_type', 'object_id',
+              'ip_address', 'details', 'occurred_at', 'previous_hash']
+    expected_sequence, previous_hash, checked = 1, GENESIS_HASH, 0
+    for event in AuditEvent.objects.filter(stream=stream).order_by('sequence').values(*fields).iterator(chunk_size=chunk_size):
+        sequence = event['sequence']
+        if sequence != expected_sequence:
+            return checked, Break(expected_sequence, f"events {expected_sequence} to {sequence - 1} are missing")
+        if event['previous_hash'] != previous_hash:
+            return checked, Break(sequence, "previous hash does not match the event before it")
+        if digest(_chained(event)) != event['hash']:
+            return checked, Break(sequence, "hash does not match the event's content")
+        checked += 1
+        expected_sequence, previous_hash = sequence + 1, event['hash']
+
+    last_value = Sequence.objects.filter(scope=f'audit:{stream}').values_list('last_value', flat=True).first() or 0
+    if last_value >= expected_sequence:
+        return checked, Break(expected_sequence, f"events {expected_sequence} to {last_value} are missing")
+    return checked, None
@@ -560,4 +560,30 @@ def safe_bulk_update(
         'failed_count': failed_count,
         'success_rate': (updated_count / len(objects)) * 100 if objects else 0,
         'errors': errors,
-    }
\ No newline at end of file
+    }
+
+
+def bulk_create_inherited(model, objs, batch_size):
+    """
+    ``bulk_create()`` for a multi-table inherited model (Car, RentalOrder, ...).
+
+    Django refuses to bulk create these, so the parent rows are bulk created
+    first and the child rows are then inserted with the same batched
+    ``_insert`` that ``bulk_create`` uses internally.
+    """
+    parent = model._meta.get_parent_list()[0]
+    parent_link = model._meta.get_ancestor_link(parent)
+    parent_fields = [f for f in parent._meta.concrete_fields if not f.primary_key]
+    parents = [parent(**{f.attname: getattr(obj, f.attname) for f in parent_fields}) for obj in objs]
+    parent.objects.bulk_create(parents, batch_size=batch_size)
+
+    for obj, parent_obj in zip(objs, parents):
+        obj.pk = parent_obj.pk
+        setattr(obj, parent_link.attname, parent_obj.pk)
+        obj._state.adding = False
+        obj._state.db = connection.alias
+
+    fields = model._meta.local_concrete_fields
+    for start in range(0, len(objs), batch_size):
+        model._base_manager._insert(objs[start:start + batch_size], fields=fields, using=connection.alias)
+    return objs
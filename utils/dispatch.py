@@ -35,6 +35,7 @@ def handle_booking_request(sender, **kwargs):
         level='success',
         cta_text='View Booking',
         cta_link='/bookings',
+        category='orders',
     )
 
     # Mechanic notification
@@ -45,6 +46,7 @@ def handle_booking_request(sender, **kwargs):
         level='info',
         cta_text='View Booking',
         cta_link='/bookings',
+        category='orders',
     )
 
     from django.conf import settings
@@ -114,6 +116,7 @@ def handle_wallet_deposit(sender, **kwargs):
         level='success',
         cta_text='View Wallet',
         cta_link='/wallet',
+        category='wallet',
     )
 
 
@@ -131,6 +134,7 @@ def handle_booking_completed(sender, **kwargs):
         level='success',
         cta_text='Rate Service',
         cta_link=f'/bookings/{booking.uuid}/review',
+        category='orders',
     )
 
 
@@ -175,6 +179,7 @@ def handle_inspection_created(sender, **kwargs):
         level='info',
         cta_text='View Details',
         cta_link=customer_cta_link,
+        category='orders',
     )
 
     if dealer and getattr(dealer, 'user', None):
@@ -185,6 +190,7 @@ def handle_inspection_created(sender, **kwargs):
             level='info',
             cta_text='View Order',
             cta_link=customer_cta_link,
+            category='orders',
         )
 
 
@@ -251,6 +257,7 @@ def handle_checkout_success(sender, listing, customer, **kwargs):
             level='success',
             cta_text=cta_text,
             cta_link='/orders',
+            category='orders',
         )
     send_customer_notification()
 
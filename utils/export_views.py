@@ -0,0 +1,130 @@
+import os
+import tempfile
+
+from django.http import FileResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from utils.exports import (
+    DATASETS,
+    Export,
+    ExportError,
+    create_job,
+    role_for,
+    stream_csv,
+    sync_max_rows,
+    write_xlsx,
+)
+from utils.models import ExportJob
+
+
+def _job_data(job):
+    return {
+        'uuid': str(job.uuid),
+        'dataset': job.dataset,
+        'format': job.file_format,
+        'params': job.params,
+        'status': job.status,
+        'row_count': job.row_count,
+        'error': job.error or None,
+        'created': job.date_created,
+        'finished_at': job.finished_at,
+        'download_url': f'/api/v1/exports/jobs/{job.uuid}/download/' if job.status == 'completed' else None,
+    }
+
+
+class ExportView(APIView):
+    """
+    Export a dataset as CSV or XLSX, scoped to what the caller's role may see.
+    Small exports are returned directly (CSV streams row by row); exports
+    over EXPORT_SYNC_MAX_ROWS rows or with ``background=true`` become a job
+    (202) whose file is downloaded once it finishes.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Export transactions, orders or inspections",
+        manual_parameters=[
+            openapi.Parameter('file_format', openapi.IN_QUERY, description="csv (default) or xlsx", type=openapi.TYPE_STRING),
+            openapi.Parameter('columns', openapi.IN_QUERY, description="Comma separated columns (default: all)", type=openapi.TYPE_STRING),
+            openapi.Parameter('start_date', openapi.IN_QUERY, description="From date (YYYY-MM-DD)", type=openapi.TYPE_STRING),
+            openapi.Parameter('end_date', openapi.IN_QUERY, description="To date, inclusive (YYYY-MM-DD)", type=openapi.TYPE_STRING),
+            openapi.Parameter('background', openapi.IN_QUERY, description="Always run as a background job", type=openapi.TYPE_BOOLEAN),
+        ],
+        tags=["Exports"],
+    )
+    def get(self, request, dataset):
+        if role_for(request.user) is None:
+            return Response({'error': True, 'message': 'Your account type cannot export data'}, 403)
+        try:
+            export = Export(
+                dataset, request.user,
+                columns=request.GET.get('columns'),
+                start_date=request.GET.get('start_date'),
+                end_date=request.GET.get('end_date'),
+                file_format=request.GET.get('file_format', 'csv'),
+            )
+        except ExportError as e:
+            return Response({'error': True, 'message': str(e), 'datasets': {
+                name: list(spec.columns) for name, spec in DATASETS.items()
+            }}, 400)
+
+        background = request.GET.get('background', '').lower() in ('1', 'true', 'yes')
+        if background or export.count() > sync_max_rows():
+            job = create_job(export)
+            return Response({
+                'error': False,
+                'message': 'Export queued; poll the job for its download link',
+                'data': _job_data(job),
+            }, 202)
+
+        if export.file_format == 'xlsx':
+            # a workbook is only valid once closed, so it is spooled to a
+            # temporary file before being sent
+            fileobj = tempfile.TemporaryFile()
+            try:
+                write_xlsx(export, fileobj)
+            except ExportError as e:
+                fileobj.close()
+                return Response({'error': True, 'message': str(e)}, 400)
+            fileobj.seek(0)
+            return FileResponse(fileobj, as_attachment=True, filename=export.filename)
+
+        response = StreamingHttpResponse(stream_csv(export), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{export.filename}"'
+        return response
+
+
+class ExportJobListView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(operation_summary="List my export jobs", tags=["Exports"])
+    def get(self, request):
+        jobs = ExportJob.objects.filter(user=request.user).order_by('-id')[:50]
+        return Response({'error': False, 'message': '', 'data': [_job_data(job) for job in jobs]}, 200)
+
+
+class ExportJobView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(operation_summary="Get an export job's status", tags=["Exports"])
+    def get(self, request, uuid):
+        job = get_object_or_404(ExportJob, uuid=uuid, user=request.user)
+        return Response({'error': False, 'message': '', 'data': _job_data(job)}, 200)
+
+
+class ExportDownloadView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(operation_summary="Download a finished export", tags=["Exports"])
+    def get(self, request, uuid):
+        job = get_object_or_404(ExportJob, uuid=uuid, user=request.user)
+        if job.status != 'completed':
+            return Response({'error': True, 'message': f'Export is {job.status}', 'data': _job_data(job)}, 409)
+        if not os.path.exists(job.file_path):
+            return Response({'error': True, 'message': 'Export file is no longer available'}, 410)
+        return FileResponse(open(job.file_path, 'rb'), as_attachment=True, filename=job.file_name)
@@ -0,0 +1,480 @@
+"""
+Bulk CSV/XLSX exports of transactions, orders and inspections.
+
+An export is a dataset (``DATASETS``), a list of its columns, an optional
+``[start, end]`` date range on ``date_created`` and the requesting user,
+whose role decides the rows they may see:
+
+    customer   their wallet's transactions and their own orders/inspections
+    dealer     their wallet, and orders/inspections for their vehicles
+    mechanic   their wallet, bookings paid to them, inspections they ran
+    staff      everything
+
+Rows are read in primary-key order a page at a time (``WHERE id > last``),
+projected with ``values_list`` so no model instances are built, and written
+out as they arrive, so memory stays flat however many rows match.
+``stream_csv`` feeds a ``StreamingHttpResponse`` directly; XLSX goes
+through openpyxl's write-only workbook (an optional dependency) into a
+file, since a workbook is only readable once it is closed.
+
+Exports over ``settings.EXPORT_SYNC_MAX_ROWS`` rows become an ``ExportJob``
+that a background thread (or ``manage.py run_export_jobs``) writes under
+``settings.EXPORT_ROOT`` for later download. A running job refreshes its
+``heartbeat_at`` as pages are written; one whose heartbeat is older than
+``settings.EXPORT_JOB_STALE_MINUTES`` lost its worker and is claimed again.
+"""
+import csv
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, models, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from bookings.models import ServiceBooking
+from inspections.models import VehicleInspection
+from listings.models import Order
+from utils.models import ExportJob
+from wallet.models import Transaction, Wallet
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 2000
+DEFAULT_SYNC_MAX_ROWS = 50_000
+DEFAULT_STALE_MINUTES = 10
+HEARTBEAT_INTERVAL = timedelta(seconds=30)
+FORMATS = ('csv', 'xlsx')
+ROLES = ('customer', 'dealer', 'mechanic', 'staff')
+
+
+class ExportError(ValueError):
+    """Invalid export parameters (unknown dataset, column, format or date)."""
+
+
+@dataclass
+class Dataset:
+    name: str
+    model: type
+    # column name -> ORM lookup, in default output order
+    columns: dict
+    # role -> (user) -> Q, rows that role may export; missing roles get nothing
+    scopes: dict = field(default_factory=dict)
+    date_field: str = 'date_created'
+
+    def queryset(self, user, role):
+        scope = self.scopes.get(role)
+        if scope is None:
+            return self.model.objects.none()
+        return self.model.objects.filter(scope(user))
+
+
+def _wallets(user):
+    return Wallet.objects.filter(user=user).values('pk')
+
+
+def _wallet_transactions(user):
+    wallets = _wallets(user)
+    return Q(sender_wallet_id__in=wallets) | Q(recipient_wallet_id__in=wallets)
+
+
+def _paid_outside_wallet(**related):
+    # payments made straight from a bank have no recipient wallet
+    related_q = Q()
+    for lookup, queryset in related.items():
+        related_q |= Q(**{f'{lookup}_id__in': queryset})
+    return related_q & Q(recipient_wallet__isnull=True)
+
+
+def customer_transactions(user):
+    """Transactions on ``user``'s wallet plus their card payments (see TransactionsView)."""
+    return _wallet_transactions(user) | _paid_outside_wallet(
+        related_order=Order.objects.filter(customer__user=user).values('pk'),
+        related_booking=ServiceBooking.objects.filter(customer__user=user).values('pk'),
+        related_inspection=VehicleInspection.objects.filter(customer__user=user).values('pk'),
+    )
+
+
+def _dealer_transactions(user):
+    return _wallet_transactions(user) | Q(
+        related_order_id__in=Order.objects.filter(order_item__vehicle__dealer__user=user).values('pk')
+    )
+
+
+def _mechanic_transactions(user):
+    return _wallet_transactions(user) | Q(
+        related_booking_id__in=ServiceBooking.objects.filter(mechanic__user=user).values('pk')
+    )
+
+
+def _everything(user):
+    return Q()
+
+
+DATASETS = {
+    'transactions': Dataset(
+        name='transactions',
+        model=Transaction,
+        columns={
+            'id': 'uuid',
+            'date': 'date_created',
+            'type': 'type',
+            'status': 'status',
+            'source': 'source',
+            'amount': 'amount',
+            'sender': 'sender',
+            'recipient': 'recipient',
+            'sender_email': 'sender_wallet__user__email',
+            'recipient_email': 'recipient_wallet__user__email',
+            'narration': 'narration',
+            'reference': 'tx_ref',
+            'order': 'related_order__uuid',
+            'booking': 'related_booking__uuid',
+            'inspection': 'related_inspection__inspection_number',
+        },
+        scopes={
+            'customer': customer_transactions,
+            'dealer': _dealer_transactions,
+            'mechanic': _mechanic_transactions,
+            'staff': _everything,
+        },
+    ),
+    'orders': Dataset(
+        name='orders',
+        model=Order,
+        columns={
+            'id': 'uuid',
+            'date': 'date_created',
+            'type': 'order_type',
+            'status': 'order_status',
+            'payment_option': 'payment_option',
+            'paid': 'paid',
+            'customer_email': 'customer__user__email',
+            'listing': 'order_item__title',
+            'listing_id': 'order_item__uuid',
+            'price': 'order_item__price',
+            'dealer': 'order_item__vehicle__dealer__business_name',
+        },
+        scopes={
+            'customer': lambda user: Q(customer__user=user),
+            'dealer': lambda user: Q(order_item__vehicle__dealer__user=user),
+            'staff': _everything,
+        },
+    ),
+    'inspections': Dataset(
+        name='inspections',
+        model=VehicleInspection,
+        columns={
+            'id': 'uuid',
+            'number': 'inspection_number',
+            'date': 'date_created',
+            'type': 'inspection_type',
+            'status': 'status',
+            'overall_rating': 'overall_rating',
+            'scheduled_date': 'scheduled_date',
+            'fee': 'inspection_fee',
+            'payment_status': 'payment_status',
+            'paid_at': 'paid_at',
+            'vehicle': 'vehicle__name',
+            'customer_email': 'customer__user__email',
+            'dealer': 'dealer__business_name',
+            'inspector_email': 'inspector__email',
+        },
+        scopes={
+            'customer': lambda user: Q(customer__user=user),
+            'dealer': lambda user: Q(dealer__user=user),
+            'mechanic': lambda user: Q(inspector=user),
+            'staff': _everything,
+        },
+    ),
+}
+
+
+def role_for(user):
+    if user.is_staff or user.user_type in ('admin', 'staff'):
+        return 'staff'
+    return user.user_type if user.user_type in ROLES else None
+
+
+def _parse_date(value, name):
+    if value in (None, ''):
+        return None
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise ExportError(f"{name} must be a date in YYYY-MM-DD format")
+
+
+def _as_datetime(day):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+class Export:
+    """A validated export request; iterate ``rows()`` for the data."""
+
+    def __init__(self, dataset, user, columns=None, start_date=None, end_date=None, file_format='csv'):
+        if dataset not in DATASETS:
+            raise ExportError(f"Unknown dataset '{dataset}'. Choose from: {', '.join(DATASETS)}")
+        if file_format not in FORMATS:
+            raise ExportError(f"Unknown format '{file_format}'. Choose from: {', '.join(FORMATS)}")
+        self.dataset = DATASETS[dataset]
+        self.user = user
+        self.file_format = file_format
+        # called after every page rows() reads (background jobs beat with it)
+        self.on_page = None
+
+        if isinstance(columns, str):
+            columns = [column.strip() for column in columns.split(',') if column.strip()]
+        self.columns = list(columns or self.dataset.columns)
+        unknown = [column for column in self.columns if column not in self.dataset.columns]
+        if unknown:
+            raise ExportError(
+                f"Unknown columns for {dataset}: {', '.join(unknown)}. "
+                f"Available: {', '.join(self.dataset.columns)}"
+            )
+
+        self.start_date = _parse_date(start_date, 'start_date')
+        self.end_date = _parse_date(end_date, 'end_date')
+        if self.start_date and self.end_date and self.end_date < self.start_date:
+            raise ExportError("end_date must not be before start_date")
+
+    @classmethod
+    def from_job(cls, job):
+        return cls(job.dataset, job.user, file_format=job.file_format, **job.params)
+
+    @property
+    def params(self):
+        return {
+            'columns': self.columns,
+            'start_date': self.start_date.isoformat() if self.start_date else None,
+            'end_date': self.end_date.isoformat() if self.end_date else None,
+        }
+
+    @property
+    def filename(self):
+        stamp = timezone.localdate().strftime('%Y%m%d')
+        return f"veyu-{self.dataset.name}-{stamp}.{self.file_format}"
+
+    def queryset(self):
+        queryset = self.dataset.queryset(self.user, role_for(self.user))
+        date_field = self.dataset.date_field
+        if self.start_date:
+            queryset = queryset.filter(**{f'{date_field}__gte': _as_datetime(self.start_date)})
+        if self.end_date:
+            # end_date is inclusive; compare against the next midnight so the
+            # column's index stays usable
+            queryset = queryset.filter(**{f'{date_field}__lt': _as_datetime(self.end_date + timedelta(days=1))})
+        return queryset
+
+    def count(self):
+        return self.queryset().count()
+
+    def converters(self, spreadsheet=False):
+        """
+        ``[(index, func)]`` for the columns a writer cannot take as fetched:
+        datetimes become local ISO strings (naive local datetimes for XLSX)
+        and, for XLSX, UUIDs become strings. csv.writer already renders None
+        as an empty cell and calls str() on everything else.
+        """
+        tz = timezone.get_current_timezone()
+        converters = []
+        for index, column in enumerate(self.columns):
+            field = _field(self.dataset.model, self.dataset.columns[column])
+            if isinstance(field, models.DateTimeField) and settings.USE_TZ:
+                func = (lambda value: value.astimezone(tz).replace(tzinfo=None)) if spreadsheet else (
+                    lambda value: value.astimezone(tz).isoformat()
+                )
+            elif spreadsheet and isinstance(field, models.UUIDField):
+                func = str
+            else:
+                continue
+            converters.append((index, func))
+        return converters
+
+    def rows(self, chunk_size=None, converters=()):
+        """Yield one row per record, in primary-key order, a page at a time."""
+        chunk_size = chunk_size or getattr(settings, 'EXPORT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+        lookups = [self.dataset.columns[column] for column in self.columns]
+        queryset = self.queryset().order_by('pk').values_list('pk', *lookups)
+        last = None
+        while True:
+            page = queryset if last is None else queryset.filter(pk__gt=last)
+            fetched = 0
+            for row in page[:chunk_size].iterator(chunk_size=chunk_size):
+                fetched += 1
+                last = row[0]
+                row = list(row[1:])
+                for index, func in converters:
+                    if row[index] is not None:
+                        row[index] = func(row[index])
+                yield row
+            if self.on_page:
+                self.on_page()
+            if fetched < chunk_size:
+                return
+
+
+def _field(model, lookup):
+    *path, name = lookup.split('__')
+    for part in path:
+        model = model._meta.get_field(part).related_model
+    return model._meta.get_field(name)
+
+
+class _Echo:
+    """File-like object whose write() returns the line for the generator to yield."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(export, chunk_size=None):
+    """Yield the CSV export line by line (for ``StreamingHttpResponse``)."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(export.columns)
+    for row in export.rows(chunk_size, export.converters()):
+        yield writer.writerow(row)
+
+
+def write_csv(export, fileobj, chunk_size=None):
+    writer = csv.writer(fileobj)
+    writer.writerow(export.columns)
+    count = 0
+    for row in export.rows(chunk_size, export.converters()):
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def write_xlsx(export, target, chunk_size=None):
+    """Write ``export`` to ``target`` (a path or binary file). Returns the row count."""
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise ExportError("XLSX exports need openpyxl installed; use format=csv")
+
+    # write-only workbooks stream rows to disk instead of keeping every cell
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=export.dataset.name)
+    sheet.append(export.columns)
+    count = 0
+    for row in export.rows(chunk_size, export.converters(spreadsheet=True)):
+        sheet.append(row)
+        count += 1
+    workbook.save(target)
+    return count
+
+
+def write_file(export, path, chunk_size=None):
+    """Write ``export`` to ``path`` in its format. Returns the row count."""
+    if export.file_format == 'xlsx':
+        return write_xlsx(export, path, chunk_size)
+    with open(path, 'w', newline='', encoding='utf-8') as fileobj:
+        return write_csv(export, fileobj, chunk_size)
+
+
+def export_root():
+    root = str(getattr(settings, 'EXPORT_ROOT', os.path.join(settings.BASE_DIR, 'exports')))
+    os.makedirs(root, exist_ok=True)
+    return root
+
+
+def sync_max_rows():
+    return getattr(settings, 'EXPORT_SYNC_MAX_ROWS', DEFAULT_SYNC_MAX_ROWS)
+
+
+# background jobs
+
+def create_job(export):
+    job = ExportJob.objects.create(
+        user=export.user, dataset=export.dataset.name, file_format=export.file_format, params=export.params,
+    )
+    transaction.on_commit(lambda: start_job(job.pk))
+    return job
+
+
+def _claimable():
+    """Pending jobs, and running ones whose worker stopped beating."""
+    minutes = getattr(settings, 'EXPORT_JOB_STALE_MINUTES', DEFAULT_STALE_MINUTES)
+    stale = timezone.now() - timedelta(minutes=minutes)
+    return Q(status='pending') | Q(status='running', heartbeat_at__lt=stale)
+
+
+def run_job(job_id):
+    """Write the file for a claimable job. Returns the job, or None if another worker has it."""
+    now = timezone.now()
+    claimed = ExportJob.objects.filter(_claimable(), pk=job_id).update(
+        status='running', started_at=now, heartbeat_at=now, last_updated=now
+    )
+    if not claimed:
+        return None
+    job = ExportJob.objects.select_related('user').get(pk=job_id)
+    # started_at identifies this claim: if the job is reclaimed after a missed
+    # heartbeat, the old worker's updates below match nothing
+    mine = ExportJob.objects.filter(pk=job_id, status='running', started_at=job.started_at)
+    beat = [now]
+
+    def heartbeat():
+        if timezone.now() - beat[0] >= HEARTBEAT_INTERVAL:
+            beat[0] = timezone.now()
+            mine.update(heartbeat_at=beat[0])
+
+    # one file per claim, so a reclaimed job never writes over a straggler
+    stamp = job.started_at.strftime('%Y%m%d%H%M%S%f')
+    path = os.path.join(export_root(), f"{job.uuid}-{stamp}.{job.file_format}")
+    try:
+        export = Export.from_job(job)
+        export.on_page = heartbeat
+        rows = write_file(export, path)
+    except Exception as e:
+        logger.exception(f"Export job {job.uuid} failed")
+        if os.path.exists(path):
+            os.remove(path)
+        job.status, job.error = 'failed', str(e)[:500]
+    else:
+        job.status, job.row_count, job.file_path = 'completed', rows, path
+        job.file_name = export.filename
+    job.finished_at = job.last_updated = timezone.now()
+    if not mine.update(
+        status=job.status, error=job.error, row_count=job.row_count, file_path=job.file_path,
+        file_name=job.file_name, finished_at=job.finished_at, last_updated=job.last_updated,
+    ):
+        logger.warning(f"Export job {job.uuid} was claimed by another worker; dropping this run")
+        if os.path.exists(path):
+            os.remove(path)
+        return None
+    return job
+
+
+def start_job(job_id):
+    def _run():
+        try:
+            run_job(job_id)
+        finally:
+            close_old_connections()
+
+    threading.Thread(target=_run, daemon=True).start()
+
+
+def run_pending_jobs(limit=None):
+    """
+    Run queued jobs in this process (e.g. after a restart lost their threads),
+    including running jobs whose worker died mid-export.
+    """
+    jobs = ExportJob.objects.filter(_claimable()).order_by('pk').values_list('pk', flat=True)
+    return [job for job in (run_job(job_id) for job_id in jobs[:limit]) if job]
+
+
+def purge_jobs(older_than_days):
+    """Delete finished jobs (and their files) older than ``older_than_days``."""
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    jobs = ExportJob.objects.filter(status__in=['completed', 'failed'], finished_at__lt=cutoff)
+    for path in jobs.exclude(file_path='').values_list('file_path', flat=True).iterator():
+        if os.path.exists(path):
+            os.remove(path)
+    return jobs.delete()[0]
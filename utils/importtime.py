@@ -0,0 +1,100 @@
+"""
+Cold-start profiling for ``django.setup()``.
+
+Runs setup in a fresh interpreter with ``python -X importtime`` so the
+numbers are not skewed by modules already loaded in the calling process,
+and parses the per-module timings it writes to stderr.
+"""
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+
+# SDKs that must only be imported on first use (see utils.lazy)
+DEFERRED_MODULES = (
+    'firebase_admin',
+    'africastalking',
+    'twilio',
+    'vonage',
+    'reportlab',
+    'PyPDF2',
+    'qrcode',
+)
+
+_SETUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+if {urls!r}:
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+elapsed = time.perf_counter() - started
+print(json.dumps({{'seconds': elapsed, 'modules': sorted(sys.modules)}}))
+"""
+
+
+def parse_importtime(output):
+    """Parse ``-X importtime`` stderr into a list of (module, self_us, cumulative_us, depth)."""
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        except ValueError:
+            continue
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return entries
+
+
+def profile_setup(settings_module=None, wsgi=False, urls=False, timeout=120):
+    """
+    Time ``django.setup()`` in a subprocess.
+
+    Returns a dict with the wall-clock ``seconds``, the loaded ``modules``
+    and the parsed ``imports`` timings.
+    """
+    env = dict(os.environ)
+    env['DJANGO_SETTINGS_MODULE'] = settings_module or settings.SETTINGS_MODULE
+    if wsgi:
+        env['VEYU_WSGI_WORKER'] = 'True'
+    else:
+        env.pop('VEYU_WSGI_WORKER', None)
+
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _SETUP_SCRIPT.format(urls=urls)],
+        cwd=str(settings.BASE_DIR), env=env, capture_output=True, text=True, timeout=timeout,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"django.setup() failed in subprocess:\n{result.stderr[-2000:]}")
+
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    report['imports'] = parse_importtime(result.stderr)
+    return report
+
+
+def top_offenders(imports, limit=20):
+    """Top-level imports (depth 0) ranked by cumulative time."""
+    roots = [entry for entry in imports if entry[3] == 0]
+    return sorted(roots, key=lambda entry: entry[2], reverse=True)[:limit]
+
+
+def time_by_package(imports, limit=20):
+    """Self time summed per top-level package."""
+    totals = defaultdict(int)
+    for name, self_us, _, _ in imports:
+        totals[name.split('.')[0]] += self_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+def loaded_deferred_modules(modules):
+    """Return the DEFERRED_MODULES (or their submodules) present in ``modules``."""
+    return sorted(
+        name for name in modules
+        if name.split('.')[0] in DEFERRED_MODULES
+    )
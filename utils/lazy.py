@@ -0,0 +1,110 @@
+"""
+Deferred imports and client initialization for heavy third-party SDKs.
+
+Web workers import every model, signal and URLconf module at boot, so an
+SDK imported at module level (Firebase, Africa's Talking, ReportLab, ...)
+is paid for by every worker even when the request that needs it never
+arrives. These helpers move that cost to first use.
+
+Usage::
+
+    messaging = lazy_import('firebase_admin.messaging')
+    messaging.send_each_for_multicast(...)   # imported here, once
+
+    sms_client = LazyResource(_create_sms_client, name='africastalking')
+    if sms_client:                           # initialized here, once
+        sms_client.send(...)
+"""
+import importlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class LazyModule:
+    """Proxy that imports ``module_name`` on first attribute access."""
+
+    def __init__(self, module_name):
+        self.__dict__['_module_name'] = module_name
+        self.__dict__['_module'] = None
+        self.__dict__['_lock'] = threading.Lock()
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            with self.__dict__['_lock']:
+                module = self.__dict__['_module']
+                if module is None:
+                    module = importlib.import_module(self.__dict__['_module_name'])
+                    self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        state = 'loaded' if self.__dict__['_module'] is not None else 'not loaded'
+        return f"<LazyModule {self.__dict__['_module_name']} ({state})>"
+
+
+def lazy_import(module_name):
+    """Return a module proxy; the import happens on first attribute access."""
+    return LazyModule(module_name)
+
+
+class LazyResource:
+    """
+    Thread-safe, initialize-once holder for an SDK client.
+
+    ``factory`` is called on first use and its result is cached. A factory
+    that raises or returns ``None`` is logged and retried on the next use,
+    so a transient failure at boot does not disable the client for the
+    lifetime of the worker. Attribute access is delegated to the client and
+    truthiness reports whether it could be initialized.
+    """
+
+    def __init__(self, factory, name=None):
+        self._factory = factory
+        self._name = name or getattr(factory, '__name__', 'resource')
+        self._value = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return the client, initializing it if needed (``None`` on failure)."""
+        value = self._value
+        if value is not None:
+            return value
+        with self._lock:
+            if self._value is None:
+                try:
+                    self._value = self._factory()
+                except Exception as e:
+                    logger.error(f"Failed to initialize {self._name}: {str(e)}")
+            return self._value
+
+    @property
+    def initialized(self):
+        return self._value is not None
+
+    def reset(self):
+        with self._lock:
+            self._value = None
+
+    def __bool__(self):
+        return self.get() is not None
+
+    def __getattr__(self, attr):
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        value = self.get()
+        if value is None:
+            raise AttributeError(f"{self._name} is not available")
+        return getattr(value, attr)
+
+    def __repr__(self):
+        state = 'initialized' if self.initialized else 'not initialized'
+        return f"<LazyResource {self._name} ({state})>"
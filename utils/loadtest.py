@@ -0,0 +1,278 @@
+"""
+Scenario-based load harness for the main API endpoints.
+
+Each ``Scenario`` is a named request (path template plus the account type
+it authenticates as). ``run_load_test`` drives every scenario with N worker
+threads either in-process through Django's test ``Client`` (query counts
+are captured per request) or over HTTP against a running server, and
+returns a JSON-serialisable report with p50/p95/p99 latency, throughput,
+status codes and queries per request for each endpoint.
+
+Reports are keyed by scenario name with sorted keys, so two runs can be
+compared with ``diff_reports`` (or plain ``diff``).
+
+Run ``manage.py generate_marketplace_data`` first; fixtures such as the
+listing or dealer to fetch are picked from that data with ``--seed``.
+"""
+import json
+import math
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from dataclasses import dataclass
+from typing import Optional
+
+from django.db import close_old_connections, connection
+from django.test import Client
+from rest_framework.authtoken.models import Token
+
+from accounts.models import Dealership
+from chat.models import ChatRoom
+from listings.models import Listing
+from utils.marketplace_data import EMAIL_DOMAIN
+
+
+@dataclass
+class Scenario:
+    """A single endpoint to exercise."""
+    name: str
+    path: str
+    auth: Optional[str] = None  # 'customer' | 'dealer' | None
+    method: str = 'GET'
+
+
+SCENARIOS = [
+    Scenario('listings.all', '/api/v1/listings/'),
+    Scenario('listings.featured', '/api/v1/listings/featured/'),
+    Scenario('listings.buy', '/api/v1/listings/buy/'),
+    Scenario('listings.rentals', '/api/v1/listings/rentals/'),
+    Scenario('listings.search', '/api/v1/listings/find/?brands=Toyota'),
+    Scenario('listings.buy_detail', '/api/v1/listings/buy/{sale_listing}/', auth='customer'),
+    Scenario('listings.dealer', '/api/v1/listings/dealer/{dealer}/', auth='customer'),
+    Scenario('listings.my_orders', '/api/v1/listings/my-orders/', auth='customer'),
+    Scenario('mechanics.all', '/api/v1/mechanics/'),
+    Scenario('chat.rooms', '/api/v1/chat/chats/', auth='customer'),
+    Scenario('chat.history', '/api/v1/chat/chats/{room}/messages/', auth='customer'),
+    Scenario('wallet.overview', '/api/v1/wallet/', auth='customer'),
+    Scenario('wallet.transactions', '/api/v1/wallet/transactions/', auth='customer'),
+]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def build_fixtures(seed=42, samples=20):
+    """
+    Pick accounts and objects from the generated dataset to fill the
+    scenario path templates. Each worker request draws one of ``samples``
+    candidates so caches are not trivially hot.
+    """
+    rng = random.Random(seed)
+    tokens = {}
+    for user_type in ('customer', 'dealer'):
+        keys = list(
+            Token.objects.filter(user__email__endswith=f'@{EMAIL_DOMAIN}', user__user_type=user_type)
+            .order_by('user__email').values_list('key', flat=True)
+        )
+        tokens[user_type] = rng.sample(keys, min(samples, len(keys)))
+
+    # chat rooms are only visible to their members, so keep each room's member token
+    member_tokens = dict(Token.objects.filter(key__in=tokens['customer']).values_list('user_id', 'key'))
+    rooms = list(
+        ChatRoom.members.through.objects.filter(account_id__in=member_tokens)
+        .order_by('chatroom_id').values_list('chatroom__uuid', 'account_id')[:samples * 10]
+    )
+    listings = list(Listing.objects.filter(listing_type='sale', approved=True).order_by('id').values_list('uuid', flat=True)[:samples * 10])
+    dealers = list(Dealership.objects.filter(user__email__endswith=f'@{EMAIL_DOMAIN}').order_by('id').values_list('uuid', flat=True))
+
+    fixtures = {
+        'tokens': tokens,
+        'sale_listing': [str(value) for value in rng.sample(listings, min(samples, len(listings)))],
+        'dealer': [str(value) for value in rng.sample(dealers, min(samples, len(dealers)))],
+        'room': [(str(room), member_tokens[member]) for room, member in rng.sample(rooms, min(samples, len(rooms)))],
+    }
+    if not tokens['customer'] or not fixtures['sale_listing']:
+        raise ValueError("No load test data found; run `manage.py generate_marketplace_data` first")
+    return fixtures
+
+
+def _render(scenario, fixtures, rng):
+    values = {key: rng.choice(fixtures[key]) for key in ('sale_listing', 'dealer') if fixtures.get(key)}
+    token = rng.choice(fixtures['tokens'][scenario.auth]) if scenario.auth else None
+    if '{room}' in scenario.path and fixtures.get('room'):
+        values['room'], token = rng.choice(fixtures['room'])
+    path = scenario.path.format(**values)
+    headers = {'Authorization': f'Token {token}'} if token else {}
+    return path, headers
+
+
+class _QueryCounter:
+    """execute_wrapper that counts queries on this thread's connection."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class _InProcessTransport:
+    """Calls the WSGI handler directly; records SQL queries per request."""
+
+    counts_queries = True
+
+    def __init__(self):
+        self.client = Client(raise_request_exception=False)
+
+    def request(self, method, path, headers):
+        extra = {f"HTTP_{key.upper().replace('-', '_')}": value for key, value in headers.items()}
+        # CaptureQueriesContext toggles a global signal, so it is not thread-safe
+        counter = _QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = self.client.generic(method, path, **extra)
+        return response.status_code, counter.count
+
+    def close(self):
+        close_old_connections()
+        connection.close()
+
+
+class _HTTPTransport:
+    """Requests against a running server (``runserver``, gunicorn, ...)."""
+
+    counts_queries = False
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method, path, headers):
+        req = urllib.request.Request(self.base_url + path, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                response.read()
+                return response.status, None
+        except urllib.error.HTTPError as e:
+            return e.code, None
+        except (urllib.error.URLError, OSError):
+            return 0, None
+
+    def close(self):
+        pass
+
+
+def _run_scenario(scenario, fixtures, make_transport, requests, concurrency, seed):
+    per_worker = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+    samples, lock = [], threading.Lock()
+
+    def worker(index, count):
+        rng = random.Random(f'{seed}:{scenario.name}:{index}')
+        transport = make_transport()
+        local = []
+        try:
+            for _ in range(count):
+                path, headers = _render(scenario, fixtures, rng)
+                started = time.perf_counter()
+                status, queries = transport.request(scenario.method, path, headers)
+                local.append(((time.perf_counter() - started) * 1000, status, queries))
+        finally:
+            transport.close()
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(i, n)) for i, n in enumerate(per_worker) if n]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    latencies = sorted(sample[0] for sample in samples)
+    statuses = {}
+    for _, status, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    queries = [sample[2] for sample in samples if sample[2] is not None]
+    errors = sum(count for status, count in statuses.items() if not status.startswith(('2', '3')))
+
+    return {
+        'path': scenario.path,
+        'requests': len(samples),
+        'errors': errors,
+        'status_codes': statuses,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'mean_ms': round(sum(latencies) / len(latencies), 2),
+        'max_ms': round(latencies[-1], 2),
+        'throughput_rps': round(len(samples) / wall, 1) if wall else None,
+        'queries_per_request': round(sum(queries) / len(queries), 1) if queries else None,
+        'max_queries': max(queries) if queries else None,
+    }
+
+
+def run_load_test(scenarios=None, mode='inprocess', base_url=None, requests=100, concurrency=4,
+                  warmup=2, seed=42, fixtures=None, progress=None):
+    """Drive ``scenarios`` and return the report dict."""
+    scenarios = scenarios or SCENARIOS
+    fixtures = fixtures or build_fixtures(seed)
+    if mode == 'http':
+        if not base_url:
+            raise ValueError("base_url is required for http mode")
+        make_transport = lambda: _HTTPTransport(base_url)
+    elif mode == 'inprocess':
+        make_transport = _InProcessTransport
+    else:
+        raise ValueError(f"Unknown mode {mode!r}")
+
+    endpoints = {}
+    for scenario in scenarios:
+        if warmup:
+            _run_scenario(scenario, fixtures, make_transport, warmup, 1, seed)
+        endpoints[scenario.name] = _run_scenario(scenario, fixtures, make_transport, requests, concurrency, seed)
+        if progress:
+            progress(scenario.name, endpoints[scenario.name])
+
+    return {
+        'meta': {
+            'mode': mode,
+            'base_url': base_url,
+            'requests_per_endpoint': requests,
+            'concurrency': concurrency,
+            'seed': seed,
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        },
+        'endpoints': endpoints,
+    }
+
+
+def diff_reports(old, new, metrics=('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps', 'queries_per_request')):
+    """Per-endpoint change between two reports: {name: {metric: (old, new, pct_change)}}."""
+    changes = {}
+    for name, current in new.get('endpoints', {}).items():
+        previous = old.get('endpoints', {}).get(name)
+        if previous is None:
+            continue
+        row = {}
+        for metric in metrics:
+            before, after = previous.get(metric), current.get(metric)
+            if before is None or after is None:
+                continue
+            pct = round((after - before) / before * 100, 1) if before else None
+            row[metric] = (before, after, pct)
+        changes[name] = row
+    return changes
+
+
+def write_report(report, path):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write('\n')
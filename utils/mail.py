@@ -10,6 +10,8 @@ from django.template.loader import render_to_string
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
 
+from utils import metrics
+
 logger = logging.getLogger('utils.mail')
 
 # Ensure the email directory exists
@@ -535,6 +537,15 @@ def _log_email_delivery_status(email_id: str, recipient: str, status: str, attem
     email_logger = logging.getLogger('utils.mail.delivery')
     email_logger.info(f"Email delivery status: {log_data}")
 
+    if status == 'delivered_fallback':
+        backend = getattr(settings, 'EMAIL_FALLBACK_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+    else:
+        backend = getattr(settings, 'EMAIL_BACKEND', '')
+    metrics.record_outbound(
+        'email', backend.rsplit('.', 2)[-2] if '.' in backend else backend,
+        'failed' if status == 'failed' else 'sent', delivery_time or None,
+    )
+
 def _queue_failed_email(email: EmailMultiAlternatives, exception: Exception):
     """Queue failed email for later retry."""
     try:
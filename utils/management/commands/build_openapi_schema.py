@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from utils import openapi
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the OpenAPI schema and save it as the versioned artifact /api/docs/swagger.json serves. "
+        "Run it where the web processes read it (the image build), not in a release phase."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--strict', action='store_true', help='Fail without saving if building raised warnings')
+        parser.add_argument('--no-activate', action='store_true', help='Save the schema without serving it')
+
+    def handle(self, *args, **options):
+        schema, problems = openapi.build()
+        for problem in problems:
+            self.stderr.write(f"  warning: {problem}")
+        if problems and options['strict']:
+            raise CommandError(f"Schema built with {len(problems)} warnings")
+
+        artifact = openapi.write(schema, make_current=not options['no_activate'])
+        state = "saved" if options['no_activate'] else "saved and serving"
+        self.stdout.write(self.style.SUCCESS(
+            f"Schema {artifact.version} ({len(schema.get('paths', {}))} paths, {len(artifact.body):,} bytes, "
+            f"{len(artifact.gzipped):,} gzipped) {state}"
+        ))
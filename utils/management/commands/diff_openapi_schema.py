@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from utils import openapi
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare two OpenAPI schema builds and fail on breaking changes (removed operations or fields, "
+        "type changes, newly required parameters). NEW defaults to a fresh build of the current code."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('old', help='A saved schema version or a JSON file')
+        parser.add_argument('new', nargs='?', help='A saved schema version or a JSON file (default: build now)')
+        parser.add_argument('--allow-breaking', action='store_true', help='Report breaking changes without failing')
+
+    def handle(self, *args, **options):
+        try:
+            old = openapi.load(options['old'])
+            new = openapi.load(options['new']) if options['new'] else openapi.build()[0]
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read schema: {e}")
+
+        changes = openapi.diff(old, new)
+        breaking = [change for change in changes if change.breaking]
+        for change in changes:
+            line = f"  {'BREAKING' if change.breaking else 'ok':<8} {change.location}: {change.message}"
+            self.stdout.write(self.style.ERROR(line) if change.breaking else line)
+
+        summary = f"{len(changes)} changes, {len(breaking)} breaking"
+        if breaking and not options['allow_breaking']:
+            raise CommandError(summary)
+        self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,61 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from utils.importtime import loaded_deferred_modules, profile_setup, time_by_package, top_offenders
+
+
+class Command(BaseCommand):
+    help = "Profile django.setup() in a fresh interpreter and list the slowest imports."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20, help='Number of offenders to list (default: 20)')
+        parser.add_argument('--settings-module', help='Settings module to profile (default: current)')
+        parser.add_argument('--wsgi', action='store_true', help='Profile as a WSGI worker (drops ASGI-only apps)')
+        parser.add_argument('--urls', action='store_true', help='Also load the URLconf, as the first request does')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        report = profile_setup(options['settings_module'], wsgi=options['wsgi'], urls=options['urls'])
+        imports, top = report['imports'], options['top']
+        summary = {
+            'seconds': round(report['seconds'], 3),
+            'modules': len(report['modules']),
+            'import_self_ms': round(sum(entry[1] for entry in imports) / 1000, 1),
+            'budget': {'modules': settings.IMPORT_BUDGET_MODULES, 'seconds': settings.IMPORT_BUDGET_SECONDS},
+            'deferred_sdks_loaded': loaded_deferred_modules(report['modules']),
+            'top_imports': [
+                {'module': name, 'cumulative_ms': round(cumulative / 1000, 1), 'self_ms': round(self_us / 1000, 1)}
+                for name, self_us, cumulative, _ in top_offenders(imports, top)
+            ],
+            'top_packages': [
+                {'package': name, 'self_ms': round(self_us / 1000, 1)}
+                for name, self_us in time_by_package(imports, top)
+            ],
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(summary, indent=2))
+            return
+
+        self.stdout.write(
+            f"django.setup(): {summary['seconds']:.2f}s, {summary['modules']} modules "
+            f"(budget {settings.IMPORT_BUDGET_SECONDS:.1f}s / {settings.IMPORT_BUDGET_MODULES} modules)"
+        )
+        self.stdout.write(f"\nTop {top} imports by cumulative time:")
+        for row in summary['top_imports']:
+            self.stdout.write(f"  {row['cumulative_ms']:9.1f}ms  {row['module']}")
+        self.stdout.write(f"\nTop {top} packages by self time:")
+        for row in summary['top_packages']:
+            self.stdout.write(f"  {row['self_ms']:9.1f}ms  {row['package']}")
+
+        if summary['deferred_sdks_loaded']:
+            self.stdout.write(self.style.WARNING(
+                "\nSDKs expected to load lazily were imported at setup: "
+                + ', '.join(summary['deferred_sdks_loaded'])
+            ))
+        within = (summary['modules'] <= settings.IMPORT_BUDGET_MODULES
+                  and summary['seconds'] <= settings.IMPORT_BUDGET_SECONDS)
+        style = self.style.SUCCESS if within else self.style.ERROR
+        self.stdout.write(style("\nWithin budget." if within else "\nOver budget."))
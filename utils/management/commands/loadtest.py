@@ -0,0 +1,67 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from utils.loadtest import SCENARIOS, diff_reports, run_load_test, write_report
+
+
+class Command(BaseCommand):
+    help = "Drive the main API endpoints with concurrent requests and write a p50/p95/p99 JSON report."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=['inprocess', 'http'], default='inprocess',
+                            help='Call views in-process (records query counts) or over HTTP (default: inprocess)')
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Server to hit in http mode')
+        parser.add_argument('--requests', type=int, default=100, help='Requests per endpoint (default: 100)')
+        parser.add_argument('--concurrency', type=int, default=4, help='Worker threads per endpoint (default: 4)')
+        parser.add_argument('--warmup', type=int, default=2, help='Unmeasured requests per endpoint (default: 2)')
+        parser.add_argument('--seed', type=int, default=42, help='Seed used to pick fixtures and paths (default: 42)')
+        parser.add_argument('--scenario', action='append', dest='scenarios',
+                            help='Only run this scenario (repeatable). Available: %s' % ', '.join(s.name for s in SCENARIOS))
+        parser.add_argument('--output', default='loadtest-report.json', help='Report path (default: loadtest-report.json)')
+        parser.add_argument('--compare', help='Previous report to compare against')
+
+    def handle(self, *args, **options):
+        scenarios = SCENARIOS
+        if options['scenarios']:
+            unknown = set(options['scenarios']) - {s.name for s in SCENARIOS}
+            if unknown:
+                raise CommandError(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+            scenarios = [s for s in SCENARIOS if s.name in options['scenarios']]
+
+        def progress(name, row):
+            self.stdout.write(
+                f"{name:<22} p50={row['p50_ms']:8.2f}ms p95={row['p95_ms']:8.2f}ms p99={row['p99_ms']:8.2f}ms "
+                f"{row['throughput_rps'] or 0:7.1f} req/s  queries={row['queries_per_request']}  errors={row['errors']}"
+            )
+
+        try:
+            # the test client uses the "testserver" host
+            with override_settings(ALLOWED_HOSTS=['*']):
+                report = run_load_test(
+                    scenarios=scenarios,
+                    mode=options['mode'],
+                    base_url=options['base_url'],
+                    requests=options['requests'],
+                    concurrency=options['concurrency'],
+                    warmup=options['warmup'],
+                    seed=options['seed'],
+                    progress=progress,
+                )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        write_report(report, options['output'])
+        self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                previous = json.load(f)
+            self.stdout.write(f"\nChange vs {options['compare']}:")
+            for name, metrics in diff_reports(previous, report).items():
+                parts = [
+                    f"{metric}={before}->{after}" + (f" ({pct:+.1f}%)" if pct is not None else '')
+                    for metric, (before, after, pct) in metrics.items()
+                ]
+                self.stdout.write(f"  {name:<22} " + '  '.join(parts))
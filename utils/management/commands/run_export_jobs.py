@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from utils.exports import purge_jobs, run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = "Run queued export jobs in this process and optionally purge old export files."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, help='Run at most this many jobs')
+        parser.add_argument('--purge-days', type=int, help='Delete finished jobs and files older than this many days')
+
+    def handle(self, *args, **options):
+        for job in run_pending_jobs(options['limit']):
+            style = self.style.SUCCESS if job.status == 'completed' else self.style.ERROR
+            self.stdout.write(style(
+                f"{job.uuid} {job.dataset}.{job.file_format}: {job.status}"
+                + (f" ({job.row_count} rows)" if job.row_count is not None else f" - {job.error}")
+            ))
+        if options['purge_days'] is not None:
+            purged = purge_jobs(options['purge_days'])
+            self.stdout.write(f"Purged {purged} export jobs older than {options['purge_days']} days.")
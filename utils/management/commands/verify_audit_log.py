@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from utils import audit
+
+
+class Command(BaseCommand):
+    help = "Walk the audit log hash chains and report the first break in each stream."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stream', choices=audit.STREAMS, action='append', help='Only verify this stream (repeatable)')
+
+    def handle(self, *args, **options):
+        broken = []
+        for stream in options['stream'] or audit.STREAMS:
+            checked, found = audit.verify(stream)
+            if found is None:
+                self.stdout.write(self.style.SUCCESS(f"{stream}: {checked} events, chain intact"))
+            else:
+                broken.append(stream)
+                self.stdout.write(self.style.ERROR(
+                    f"{stream}: chain broken at event {found.sequence} ({found.reason}) after {checked} good events"
+                ))
+        if broken:
+            raise CommandError(f"Audit log tampered with in: {', '.join(broken)}")
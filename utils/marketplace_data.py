@@ -0,0 +1,542 @@
+"""
+Deterministic synthetic marketplace data for load testing.
+
+``MarketplaceDataGenerator(seed=42).generate()`` builds accounts, profiles,
+locations, vehicles of every subclass, listings, boosts, orders,
+inspections, reviews, wallets with transactions and chat rooms. Every row
+is created with ``bulk_create`` in chunks and every random choice (including
+UUIDs) comes from a ``random.Random(seed)``, so the same seed and scale give
+the same dataset and the same URLs to hit.
+
+Generated accounts use the ``@loadtest.veyu.test`` email domain and the
+password ``LOADTEST_PASSWORD``; ``purge()`` removes them and everything that
+cascades from them.
+"""
+import logging
+import random
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from accounts.dealer_stats import rebuild_stats as rebuild_dealership_stats
+from accounts.models import Account, Customer, Dealership, DealershipStats, Location, Mechanic, MechanicStats
+from accounts.ranking import rebuild_stats as rebuild_mechanic_stats
+from chat.models import ChatMessage, ChatRoom
+from feedback.models import Rating, Review
+from inspections.models import VehicleInspection
+from listings.models import (
+    UAV, Bike, Boat, BoostPricing, Car, Listing, ListingBoost, Plane, PurchaseOrder, RentalOrder, Vehicle,
+)
+from utils.database_utils import bulk_create_inherited
+from utils.sequences import format_sequence, inspection_numbers, reserve
+from wallet import ledger
+from wallet.models import JournalEntry, LedgerAccount, Posting, Transaction, Wallet
+
+logger = logging.getLogger(__name__)
+
+EMAIL_DOMAIN = 'loadtest.veyu.test'
+LOADTEST_PASSWORD = 'loadtest-pass-123'
+
+# Row counts at scale 1.0
+DEFAULT_COUNTS = {
+    'customers': 2000,
+    'dealers': 100,
+    'mechanics': 200,
+    'vehicles_per_dealer': 20,
+    'orders': 3000,
+    'inspections': 1000,
+    'reviews': 3000,
+    'transactions_per_wallet': 8,
+    'chat_rooms': 1000,
+    'messages_per_room': 20,
+}
+
+# Share of generated vehicles per subclass
+VEHICLE_MIX = ((Car, 0.6), (Bike, 0.15), (UAV, 0.1), (Boat, 0.1), (Plane, 0.05))
+
+FIRST_NAMES = ['Ada', 'Chidi', 'Ngozi', 'Tunde', 'Amaka', 'Bola', 'Emeka', 'Funke', 'Ifeanyi', 'Kemi', 'Segun', 'Zainab']
+LAST_NAMES = ['Okafor', 'Adeyemi', 'Balogun', 'Eze', 'Ibrahim', 'Nwosu', 'Ogunleye', 'Bello', 'Okonkwo', 'Musa']
+STATES = {
+    'Lagos': ['Ikeja', 'Lekki', 'Yaba', 'Surulere'],
+    'Abuja': ['Garki', 'Wuse', 'Maitama'],
+    'Rivers': ['Port Harcourt', 'Obio'],
+    'Oyo': ['Ibadan', 'Ogbomosho'],
+}
+BRANDS = {
+    Car: [('Toyota', ['Camry', 'Corolla', 'Highlander']), ('Honda', ['Accord', 'Civic']), ('Lexus', ['RX 350', 'ES 350'])],
+    Bike: [('Yamaha', ['MT-07', 'R1']), ('Honda', ['CBR500R'])],
+    UAV: [('DJI', ['Mavic 3', 'Mini 4 Pro']), ('Autel', ['EVO II'])],
+    Boat: [('Yamaha', ['242X']), ('Sea Ray', ['SPX 190'])],
+    Plane: [('Cessna', ['172 Skyhawk']), ('Piper', ['PA-28'])],
+}
+# New-vehicle price of each BRANDS model. Sale prices are built from it so
+# that they follow the vehicle's attributes (see ``_sale_price``) and a
+# valuation model has something to learn (listings.valuation).
+BASE_PRICES = {
+    ('Toyota', 'Camry'): 28_000_000, ('Toyota', 'Corolla'): 20_000_000, ('Toyota', 'Highlander'): 42_000_000,
+    ('Honda', 'Accord'): 27_000_000, ('Honda', 'Civic'): 19_000_000,
+    ('Lexus', 'RX 350'): 60_000_000, ('Lexus', 'ES 350'): 48_000_000,
+    ('Yamaha', 'MT-07'): 8_000_000, ('Yamaha', 'R1'): 17_000_000, ('Honda', 'CBR500R'): 6_500_000,
+    ('DJI', 'Mavic 3'): 2_500_000, ('DJI', 'Mini 4 Pro'): 1_200_000, ('Autel', 'EVO II'): 2_000_000,
+    ('Yamaha', '242X'): 55_000_000, ('Sea Ray', 'SPX 190'): 40_000_000,
+    ('Cessna', '172 Skyhawk'): 300_000_000, ('Piper', 'PA-28'): 220_000_000,
+}
+CONDITION_FACTORS = {'new': 1.0, 'used-foreign': 0.8, 'used-local': 0.62}
+FUEL_FACTORS = {'petrol': 1.0, 'diesel': 1.03, 'hybrid': 1.1, 'electric': 1.15}
+BODY_FACTORS = {'suv': 1.12, 'sedan': 1.0, 'hatchback': 0.92, 'pickup': 1.05}
+DRIVETRAIN_FACTORS = {'FWD': 1.0, 'RWD': 1.03, 'AWD': 1.08}
+COLORS = ['Black', 'White', 'Silver', 'Blue', 'Red', 'Grey']
+RATING_AREAS = ['communication', 'support', 'service-delivery', 'car-quality', 'car-cleanliness']
+
+
+class MarketplaceDataGenerator:
+    """Builds a reproducible marketplace dataset; see module docstring."""
+
+    def __init__(self, seed=42, scale=1.0, chunk_size=1000, stdout=None):
+        self.seed = seed
+        self.scale = scale
+        self.chunk_size = chunk_size
+        self.rng = random.Random(seed)
+        self.counts = {key: max(1, int(round(value * scale))) for key, value in DEFAULT_COUNTS.items()}
+        # per-dealer / per-room / per-wallet counts are not scaled
+        for key in ('vehicles_per_dealer', 'transactions_per_wallet', 'messages_per_room'):
+            self.counts[key] = DEFAULT_COUNTS[key]
+        self.stdout = stdout
+        self.created = {}
+        self.now = timezone.now()
+
+    # helpers
+
+    def _uuid(self):
+        return uuid.UUID(int=self.rng.getrandbits(128), version=4)
+
+    def _bulk(self, model, objs):
+        model.objects.bulk_create(objs, batch_size=self.chunk_size)
+        self._record(model, len(objs))
+        return objs
+
+    def _bulk_through(self, descriptor, rows):
+        """Bulk insert (source_id, target_id) pairs into a many-to-many table."""
+        through, field = descriptor.through, descriptor.field
+        source, target = f'{field.m2m_field_name()}_id', f'{field.m2m_reverse_field_name()}_id'
+        objs = [through(**{source: a, target: b}) for a, b in rows]
+        through.objects.bulk_create(objs, batch_size=self.chunk_size, ignore_conflicts=True)
+
+    def _record(self, model, count):
+        label = model._meta.label
+        self.created[label] = self.created.get(label, 0) + count
+
+    def _log(self, message):
+        if self.stdout:
+            self.stdout.write(message)
+        logger.info(message)
+
+    def _name(self):
+        return self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+
+    def _money(self, low, high, step=1000):
+        return Decimal(self.rng.randrange(low, high, step))
+
+    # entry points
+
+    @classmethod
+    def purge(cls):
+        """Delete previously generated data (everything owned by load test accounts)."""
+        accounts = Account.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}')
+        dealers = Dealership.objects.filter(user__in=accounts)
+        Vehicle.objects.filter(dealer__in=dealers).delete()
+        ChatRoom.objects.filter(members__in=accounts).delete()
+        Review.objects.filter(reviewer__in=accounts).delete()
+        Transaction.objects.filter(sender_wallet__user__in=accounts).delete()
+        entries = JournalEntry.objects.filter(postings__account__wallet__user__in=accounts)
+        JournalEntry.objects.filter(pk__in=entries.values('pk')).delete()
+        LedgerAccount.objects.filter(wallet__user__in=accounts).delete()
+        count, _ = accounts.delete()
+        return count
+
+    def generate(self):
+        started = time.perf_counter()
+        with transaction.atomic():
+            accounts = self._accounts()
+            profiles = self._profiles(accounts)
+            vehicles = self._vehicles(profiles['dealers'])
+            listings = self._listings(vehicles)
+            self._boosts(listings)
+            self._orders(profiles['customers'], listings)
+            self._inspections(profiles, vehicles)
+            self._reviews(profiles)
+            self._profile_stats(profiles)
+            self._wallets(accounts)
+            self._chat_rooms(profiles)
+        self.elapsed = time.perf_counter() - started
+        return self.created
+
+    # stages
+
+    def _accounts(self):
+        password = make_password(LOADTEST_PASSWORD)
+        accounts = {}
+        for user_type, count_key in (('customer', 'customers'), ('dealer', 'dealers'), ('mechanic', 'mechanics')):
+            batch = []
+            for i in range(self.counts[count_key]):
+                first, last = self._name()
+                batch.append(Account(
+                    uuid=self._uuid(),
+                    email=f'{user_type}-{self.seed}-{i}@{EMAIL_DOMAIN}',
+                    first_name=first,
+                    last_name=last,
+                    user_type=user_type,
+                    password=password,
+                    verified_email=True,
+                    is_verified=True,
+                ))
+            accounts[user_type] = self._bulk(Account, batch)
+
+        everyone = [account for group in accounts.values() for account in group]
+        self._bulk(Token, [Token(user=account, key='%040x' % self.rng.getrandbits(160)) for account in everyone])
+        self._log(f"accounts: {len(everyone)}")
+        return accounts
+
+    def _location(self, account):
+        state = self.rng.choice(list(STATES))
+        return Location(
+            uuid=self._uuid(),
+            user=account,
+            state=state,
+            city=self.rng.choice(STATES[state]),
+            address=f'{self.rng.randint(1, 200)} {self.rng.choice(LAST_NAMES)} Street',
+            lat=Decimal(f'{self.rng.uniform(4.5, 9.5):.6f}'),
+            lng=Decimal(f'{self.rng.uniform(3.0, 8.0):.6f}'),
+        )
+
+    def _profiles(self, accounts):
+        owners = accounts['dealer'] + accounts['mechanic'] + accounts['customer'][::4]
+        locations = {location.user_id: location for location in self._bulk(Location, [self._location(a) for a in owners])}
+        phone = iter(range(10_000_000, 99_999_999))
+
+        dealers = self._bulk(Dealership, [
+            Dealership(
+                uuid=self._uuid(),
+                user=account,
+                phone_number=f'+23480{next(phone)}',
+                location=locations[account.id],
+                business_name=f'{account.last_name} Motors {i}',
+                slug=f'loadtest-{self.seed}-motors-{i}',
+                contact_email=account.email,
+                verified_business=True,
+                verified_id=True,
+                offers_rental=self.rng.random() < 0.6,
+                offers_purchase=True,
+                account_status='approved',
+                verification_status='completed',
+            )
+            for i, account in enumerate(accounts['dealer'])
+        ])
+        mechanics = self._bulk(Mechanic, [
+            Mechanic(
+                uuid=self._uuid(),
+                user=account,
+                phone_number=f'+23481{next(phone)}',
+                location=locations[account.id],
+                business_name=f'{account.last_name} Auto Repairs {i}',
+                slug=f'loadtest-{self.seed}-repairs-{i}',
+                available=self.rng.random() < 0.8,
+                account_status='approved',
+            )
+            for i, account in enumerate(accounts['mechanic'])
+        ])
+        customers = self._bulk(Customer, [
+            Customer(
+                uuid=self._uuid(),
+                user=account,
+                phone_number=f'+23490{next(phone)}',
+                location=locations.get(account.id),
+            )
+            for account in accounts['customer']
+        ])
+        self._log(f"profiles: {len(dealers)} dealers, {len(mechanics)} mechanics, {len(customers)} customers")
+        return {'dealers': dealers, 'mechanics': mechanics, 'customers': customers}
+
+    def _vehicle_fields(self, model):
+        if model is Car:
+            return {'doors': self.rng.choice([2, 4]), 'seats': self.rng.choice([2, 5, 7]),
+                    'drivetrain': self.rng.choice(['FWD', 'AWD', 'RWD']),
+                    'body_type': self.rng.choice(['suv', 'sedan', 'hatchback', 'pickup'])}
+        if model is Bike:
+            return {'engine_capacity': self.rng.choice([300, 650, 1000]), 'bike_type': self.rng.choice(['sport', 'cruiser'])}
+        if model is UAV:
+            return {'uav_type': 'quadcopter', 'purpose': self.rng.choice(['photography', 'surveying']),
+                    'max_flight_time': self.rng.randint(20, 45), 'rotor_count': 4}
+        if model is Boat:
+            return {'engine_count': self.rng.randint(1, 2), 'hull_material': 'fiberglass'}
+        return {'aircraft_type': 'propeller', 'range': self.rng.randint(500, 1200)}
+
+    def _vehicles(self, dealers):
+        models, weights = zip(*VEHICLE_MIX)
+        by_model = {model: [] for model in models}
+        for dealer in dealers:
+            for i in range(self.counts['vehicles_per_dealer']):
+                model = self.rng.choices(models, weights)[0]
+                brand, names = self.rng.choice(BRANDS[model])
+                model_name = self.rng.choice(names)
+                name = f'{brand} {model_name}'
+                by_model[model].append(model(
+                    uuid=self._uuid(),
+                    dealer=dealer,
+                    name=name,
+                    slug=f'{name.lower().replace(" ", "-")}-{dealer.id}-{i}',
+                    brand=brand,
+                    model=model_name,
+                    color=self.rng.choice(COLORS),
+                    condition=self.rng.choice(['new', 'used-foreign', 'used-local']),
+                    fuel_system=self.rng.choice(['petrol', 'diesel', 'hybrid', 'electric']),
+                    transmission=self.rng.choice(['auto', 'manual']),
+                    mileage=str(self.rng.randint(0, 150_000)),
+                    for_sale=self.rng.random() < 0.7,
+                    for_rent=self.rng.random() < 0.4,
+                    available=True,
+                    tags=[],
+                    features=self.rng.sample(['Bluetooth', 'Sunroof', 'Leather seats', 'Backup camera', 'GPS'], 2),
+                    **self._vehicle_fields(model),
+                ))
+
+        vehicles = []
+        for model, objs in by_model.items():
+            bulk_create_inherited(model, objs, self.chunk_size)
+            self._record(model, len(objs))
+            vehicles.extend(objs)
+
+        self._bulk_through(Dealership.vehicles, [(v.dealer_id, v.pk) for v in vehicles])
+        self._log(f"vehicles: {len(vehicles)} ({', '.join(f'{m.__name__}={len(o)}' for m, o in by_model.items())})")
+        return vehicles
+
+    def _sale_price(self, vehicle):
+        price = BASE_PRICES[(vehicle.brand, vehicle.model)] * CONDITION_FACTORS[vehicle.condition]
+        price *= FUEL_FACTORS[vehicle.fuel_system]
+        if vehicle.condition != 'new':
+            # about 20% off per 100,000 km
+            price *= 0.8 ** (int(vehicle.mileage) / 100_000)
+        if isinstance(vehicle, Car):
+            price *= BODY_FACTORS[vehicle.body_type] * DRIVETRAIN_FACTORS[vehicle.drivetrain]
+        price *= self.rng.lognormvariate(0, 0.12)
+        return Decimal(max(50_000, int(round(price / 50_000)) * 50_000))
+
+    def _listings(self, vehicles):
+        dealer_users = dict(Dealership.objects.filter(id__in={v.dealer_id for v in vehicles}).values_list('id', 'user_id'))
+        listings = []
+        for vehicle in vehicles:
+            listing_types = [t for t, flag in (('sale', vehicle.for_sale), ('rental', vehicle.for_rent)) if flag] or ['sale']
+            for listing_type in listing_types:
+                rental = listing_type == 'rental'
+                listings.append(Listing(
+                    uuid=self._uuid(),
+                    vehicle_id=vehicle.pk,
+                    created_by_id=dealer_users[vehicle.dealer_id],
+                    listing_type=listing_type,
+                    title=vehicle.name,
+                    price=self._money(20_000, 150_000) if rental else self._sale_price(vehicle),
+                    payment_cycle=self.rng.choice(['day', 'week']) if rental else 'single',
+                    verified=True,
+                    approved=self.rng.random() < 0.9,
+                ))
+        self._bulk(Listing, listings)
+        vehicle_dealers = {v.pk: v.dealer_id for v in vehicles}
+        self._bulk_through(Dealership.listings, [(vehicle_dealers[l.vehicle_id], l.pk) for l in listings])
+        self._log(f"listings: {len(listings)}")
+        return listings
+
+    def _boosts(self, listings):
+        for duration_type, price in (('daily', 2000), ('weekly', 12000), ('monthly', 40000)):
+            BoostPricing.objects.get_or_create(duration_type=duration_type, defaults={'price': Decimal(price)})
+
+        today = self.now.date()
+        dealer_by_vehicle = dict(Vehicle.objects.filter(id__in={l.vehicle_id for l in listings}).values_list('id', 'dealer_id'))
+        boosted = self.rng.sample(listings, max(1, len(listings) // 10))
+        boosts = []
+        for listing in boosted:
+            start = today - timedelta(days=self.rng.randint(0, 20))
+            end = start + timedelta(days=self.rng.choice([1, 7, 30]))
+            boosts.append(ListingBoost(
+                uuid=self._uuid(),
+                listing=listing,
+                dealer_id=dealer_by_vehicle[listing.vehicle_id],
+                start_date=start,
+                end_date=end,
+                duration_type='weekly',
+                amount_paid=Decimal(12000),
+                payment_status='paid',
+                active=start <= today <= end,
+            ))
+        self._bulk(ListingBoost, boosts)
+
+    def _orders(self, customers, listings):
+        approved = [listing for listing in listings if listing.approved]
+        dealer_by_vehicle = dict(Vehicle.objects.filter(id__in={l.vehicle_id for l in approved}).values_list('id', 'dealer_id'))
+        purchases, rentals = [], []
+        for _ in range(self.counts['orders']):
+            listing = self.rng.choice(approved)
+            fields = dict(
+                uuid=self._uuid(),
+                customer=self.rng.choice(customers),
+                order_type=listing.listing_type,
+                order_item=listing,
+                payment_option=self.rng.choice(['wallet', 'card', 'pay-after-inspection']),
+                paid=self.rng.random() < 0.6,
+                order_status=self.rng.choice(['pending', 'awaiting-inspection', 'completed']),
+            )
+            if listing.listing_type == 'rental':
+                rent_from = self.now.date() + timedelta(days=self.rng.randint(-30, 30))
+                rentals.append(RentalOrder(rent_from=rent_from, rent_until=rent_from + timedelta(days=self.rng.randint(1, 14)), **fields))
+            else:
+                # some sales closed below the asking price after an offer
+                if self.rng.random() < 0.3:
+                    fields['agreed_price'] = (listing.price * Decimal(self.rng.randint(88, 99)) / 100).quantize(Decimal('1'))
+                purchases.append(PurchaseOrder(**fields))
+
+        for model, objs in ((PurchaseOrder, purchases), (RentalOrder, rentals)):
+            bulk_create_inherited(model, objs, self.chunk_size)
+            self._record(model, len(objs))
+
+        orders = purchases + rentals
+        self._bulk_through(Customer.orders, [(o.customer_id, o.pk) for o in orders])
+        self._bulk_through(Dealership.orders, [(dealer_by_vehicle[o.order_item.vehicle_id], o.pk) for o in orders])
+        self._log(f"orders: {len(purchases)} purchases, {len(rentals)} rentals")
+
+    def _inspections(self, profiles, vehicles):
+        count = self.counts['inspections']
+        # reserve the whole block of inspection numbers in one update
+        scope = inspection_numbers.scope_for(self.now)
+        last = reserve(scope, count)
+        first = last - count + 1
+        conditions = ['excellent', 'good', 'fair', 'poor']
+        inspections = []
+        for offset in range(count):
+            vehicle = self.rng.choice(vehicles)
+            status = self.rng.choice(['completed', 'completed', 'signed', 'in_progress', 'draft'])
+            completed = status in ('completed', 'signed')
+            inspections.append(VehicleInspection(
+                uuid=self._uuid(),
+                vehicle_id=vehicle.pk,
+                dealer_id=vehicle.dealer_id,
+                customer=self.rng.choice(profiles['customers']),
+                inspector=self.rng.choice(profiles['mechanics']).user,
+                inspection_number=format_sequence(inspection_numbers.template, inspection_numbers.prefix, first + offset, self.now),
+                inspection_type=self.rng.choice(['pre_purchase', 'pre_rental', 'maintenance', 'insurance']),
+                status=status,
+                overall_rating=self.rng.choice(conditions) if completed else None,
+                inspection_fee=Decimal(self.rng.choice([15000, 25000, 35000])),
+                payment_status='paid' if status != 'draft' else 'unpaid',
+                exterior_data={'body_condition': self.rng.choice(conditions), 'paint_condition': self.rng.choice(conditions)},
+                engine_data={'engine_condition': self.rng.choice(conditions)},
+                completed_at=self.now - timedelta(days=self.rng.randint(0, 90)) if completed else None,
+            ))
+        self._bulk(VehicleInspection, inspections)
+        self._log(f"inspections: {len(inspections)}")
+
+    def _reviews(self, profiles):
+        targets = [('dealer', dealer) for dealer in profiles['dealers']] + [('mechanic', m) for m in profiles['mechanics']]
+        reviews, subjects = [], []
+        for _ in range(self.counts['reviews']):
+            object_type, subject = self.rng.choice(targets)
+            reviews.append(Review(
+                uuid=self._uuid(),
+                reviewer=self.rng.choice(profiles['customers']).user,
+                object_type=object_type,
+                related_object=subject.uuid,
+                comment=self.rng.choice(['Great service', 'Smooth process', 'Could be faster', 'Very professional']),
+            ))
+            subjects.append((object_type, subject))
+        self._bulk(Review, reviews)
+        self._bulk(Rating, [
+            Rating(uuid=self._uuid(), reviewId=review, area=area, stars=self.rng.randint(2, 5))
+            for review in reviews for area in self.rng.sample(RATING_AREAS, 3)
+        ])
+        self._bulk_through(Dealership.reviews, [(s.pk, r.pk) for r, (t, s) in zip(reviews, subjects) if t == 'dealer'])
+        self._bulk_through(Mechanic.reviews, [(s.pk, r.pk) for r, (t, s) in zip(reviews, subjects) if t == 'mechanic'])
+        self._log(f"reviews: {len(reviews)}")
+
+    def _profile_stats(self, profiles):
+        # bulk_create skips the signals that keep the stats tables current
+        mechanics = rebuild_mechanic_stats(Mechanic.objects.filter(pk__in=[m.pk for m in profiles['mechanics']]), self.chunk_size)
+        dealers = rebuild_dealership_stats(Dealership.objects.filter(pk__in=[d.pk for d in profiles['dealers']]), self.chunk_size)
+        self._record(MechanicStats, mechanics)
+        self._record(DealershipStats, dealers)
+        self._log(f"profile stats: {mechanics} mechanics, {dealers} dealers")
+
+    def _wallets(self, accounts):
+        everyone = [account for group in accounts.values() for account in group]
+        wallets = self._bulk(Wallet, [
+            Wallet(uuid=self._uuid(), user=account, ledger_balance=self._money(0, 2_000_000), currency='NGN')
+            for account in everyone
+        ])
+        # opening balances are posted like any other money movement so that
+        # `manage.py reconcile_ledger` stays clean
+        funding = ledger.system_account('funding')
+        ledger_accounts = self._bulk(LedgerAccount, [
+            LedgerAccount(uuid=self._uuid(), code=f'wallet:{wallet.pk}', account_type='wallet',
+                          wallet=wallet, currency=wallet.currency)
+            for wallet in wallets
+        ])
+        funded = [(wallet, account) for wallet, account in zip(wallets, ledger_accounts) if wallet.ledger_balance]
+        entries = self._bulk(JournalEntry, [
+            JournalEntry(uuid=self._uuid(), kind='opening', reference=f'opening:{wallet.pk}', narration='Opening balance')
+            for wallet, _ in funded
+        ])
+        self._bulk(Posting, [
+            posting
+            for entry, (wallet, account) in zip(entries, funded)
+            for posting in (
+                Posting(uuid=self._uuid(), entry=entry, account=account, amount=wallet.ledger_balance),
+                Posting(uuid=self._uuid(), entry=entry, account=funding, amount=-wallet.ledger_balance),
+            )
+        ])
+        transactions = []
+        for wallet in wallets:
+            for i in range(self.counts['transactions_per_wallet']):
+                tx_type = self.rng.choice(['deposit', 'deposit', 'payment', 'withdraw', 'charge'])
+                incoming = tx_type == 'deposit'
+                transactions.append(Transaction(
+                    uuid=self._uuid(),
+                    sender_wallet=None if incoming else wallet,
+                    recipient_wallet=wallet if incoming else None,
+                    sender='Veyu' if incoming else wallet.user.email[:50],
+                    recipient=wallet.user.email[:50] if incoming else 'Veyu',
+                    amount=self._money(1_000, 500_000, 500),
+                    source='bank' if incoming else 'wallet',
+                    type=tx_type,
+                    tx_ref=f'LT-{self.seed}-{wallet.user_id}-{i}',
+                    status=self.rng.choice(['completed', 'completed', 'completed', 'pending', 'failed']),
+                    narration=f'Load test {tx_type}',
+                ))
+        self._bulk(Transaction, transactions)
+        self._bulk_through(Wallet.transactions, [
+            (t.recipient_wallet_id or t.sender_wallet_id, t.pk) for t in transactions
+        ])
+        self._log(f"wallets: {len(wallets)}, transactions: {len(transactions)}")
+
+    def _chat_rooms(self, profiles):
+        pairs = [
+            (self.rng.choice(profiles['customers']).user_id, self.rng.choice(profiles['dealers']).user_id)
+            for _ in range(self.counts['chat_rooms'])
+        ]
+        rooms = self._bulk(ChatRoom, [ChatRoom(uuid=self._uuid(), room_type='sales-chat') for _ in pairs])
+        self._bulk_through(ChatRoom.members, [
+            (room.pk, member) for room, pair in zip(rooms, pairs) for member in pair
+        ])
+        messages = []
+        for room, (customer, dealer) in zip(rooms, pairs):
+            for i in range(self.counts['messages_per_room']):
+                messages.append(ChatMessage(
+                    uuid=self._uuid(),
+                    room=room,
+                    sender_id=customer if i % 2 == 0 else dealer,
+                    text=f'Message {i} about the listing',
+                ))
+        self._bulk(ChatMessage, messages)
+        self._log(f"chat: {len(rooms)} rooms, {len(messages)} messages")
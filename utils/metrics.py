@@ -0,0 +1,297 @@
+"""
+Prometheus metrics.
+
+``GET /metrics`` serves everything below in the Prometheus text format
+(a bearer ``METRICS_TOKEN`` is required; without one it is only served in DEBUG):
+
+    http_request_duration_seconds   per resolved URL name, method and status
+    db_queries_total                per connection alias and statement kind,
+    db_query_duration_seconds       recorded by a connection execute wrapper
+    cache_requests_total            hits and misses per cache alias
+    channels_connections            open websockets per consumer
+    outbound_messages_total         email, SMS and push sends per provider
+    outbound_message_duration_seconds   and outcome, and their latency
+    payment_verifications_total     per gateway and outcome
+    queue_depth                     computed at scrape time, see ``register_queue``
+
+Apps declare their own metrics in a ``metrics.py`` module, which is
+imported when the app registry is ready::
+
+    from utils import metrics
+
+    ORDERS_CREATED = metrics.counter('orders_created_total', 'Orders placed', ['order_type'])
+    metrics.register_queue('vehicle_images', lambda: VehicleImageImport.objects.filter(status='pending').count())
+
+``counter``/``gauge``/``histogram`` return the existing metric when the name
+is declared again, so a module may be imported more than once.
+
+Gunicorn workers are separate processes, each with its own counters. When
+``PROMETHEUS_MULTIPROC_DIR`` is set before the workers import Django (see
+``veyu/gunicorn.py``), every worker writes its samples to files in that
+directory and a scrape of any worker aggregates all of them.
+"""
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+_metrics = {}
+_queues = {}
+_lock = threading.Lock()
+
+
+def multiprocess_dir():
+    return os.environ.get('PROMETHEUS_MULTIPROC_DIR') or os.environ.get('prometheus_multiproc_dir')
+
+
+def _declare(kind, name, documentation, labelnames, **kwargs):
+    with _lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            metric = _metrics[name] = kind(name, documentation, labelnames, **kwargs)
+        elif not isinstance(metric, kind) or tuple(metric._labelnames) != tuple(labelnames):
+            raise ValueError(f"Metric {name} is already declared with a different type or labels")
+        return metric
+
+
+def counter(name, documentation, labelnames=()):
+    return _declare(Counter, name, documentation, labelnames)
+
+
+def gauge(name, documentation, labelnames=(), multiprocess_mode='livesum'):
+    # livesum: the value across the workers that are still running
+    return _declare(Gauge, name, documentation, labelnames, multiprocess_mode=multiprocess_mode)
+
+
+def histogram(name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+    return _declare(Histogram, name, documentation, labelnames, buckets=buckets)
+
+
+def register_queue(name, depth):
+    """Report ``depth()`` as ``queue_depth{queue=name}`` on every scrape."""
+    _queues[name] = depth
+
+
+class QueueCollector:
+    """Evaluates the registered queue depth callables when scraped."""
+
+    def collect(self):
+        family = GaugeMetricFamily('queue_depth', 'Items waiting in a work queue', labels=['queue'])
+        for name, depth in sorted(_queues.items()):
+            try:
+                family.add_metric([name], depth())
+            except Exception as e:
+                logger.warning(f"Queue depth for {name} failed: {e}")
+        yield family
+
+
+_queue_collector = QueueCollector()
+if not multiprocess_dir():
+    REGISTRY.register(_queue_collector)
+
+
+REQUEST_LATENCY = histogram(
+    'http_request_duration_seconds', 'Time spent handling requests',
+    ['view', 'method', 'status'],
+)
+DB_QUERIES = counter('db_queries_total', 'Database queries executed', ['alias', 'kind'])
+DB_QUERY_TIME = histogram('db_query_duration_seconds', 'Database query time', ['alias'], buckets=DB_BUCKETS)
+CACHE_REQUESTS = counter('cache_requests_total', 'Cache lookups', ['cache', 'result'])
+CHANNELS_CONNECTIONS = gauge('channels_connections', 'Open websocket connections', ['consumer'])
+OUTBOUND_MESSAGES = counter(
+    'outbound_messages_total', 'Outbound notifications sent', ['channel', 'provider', 'outcome'],
+)
+OUTBOUND_LATENCY = histogram(
+    'outbound_message_duration_seconds', 'Time spent sending outbound notifications', ['channel', 'provider'],
+)
+PAYMENT_VERIFICATIONS = counter(
+    'payment_verifications_total', 'Payment verifications against a gateway', ['gateway', 'outcome'],
+)
+
+
+def enabled():
+    return getattr(settings, 'METRICS_ENABLED', True)
+
+
+# recording helpers for call sites outside this module
+
+def record_outbound(channel, provider, outcome, seconds=None, count=1):
+    if count:
+        OUTBOUND_MESSAGES.labels(channel, provider, outcome).inc(count)
+    if seconds is not None:
+        OUTBOUND_LATENCY.labels(channel, provider).observe(seconds)
+
+
+def record_payment_verification(gateway, outcome):
+    PAYMENT_VERIFICATIONS.labels(gateway, outcome).inc()
+
+
+def track_connection(consumer, delta):
+    CHANNELS_CONNECTIONS.labels(consumer).inc(delta)
+
+
+# requests
+
+class MetricsMiddleware:
+    """
+    Times every request by resolved URL name rather than path, so the label
+    set stays bounded (``unmatched`` for 404s outside the URLconf).
+    Install it first in MIDDLEWARE so the time covers the other middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        if enabled():
+            match = getattr(request, 'resolver_match', None)
+            view = (match.view_name or match._func_path) if match else 'unmatched'
+            REQUEST_LATENCY.labels(view, request.method, str(response.status_code)).observe(
+                time.perf_counter() - started
+            )
+        return response
+
+
+# database
+
+def _statement_kind(sql):
+    kind = sql.lstrip()[:6].lower()
+    return kind if kind in ('select', 'insert', 'update', 'delete') else 'other'
+
+
+def _db_wrapper(alias):
+    queries, timer = {}, DB_QUERY_TIME.labels(alias)
+
+    def wrapper(execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            kind = _statement_kind(sql)
+            if kind not in queries:
+                queries[kind] = DB_QUERIES.labels(alias, kind)
+            queries[kind].inc()
+            timer.observe(time.perf_counter() - started)
+
+    wrapper.metrics = True
+    return wrapper
+
+
+def _instrument_connection(sender, connection, **kwargs):
+    if enabled() and not any(getattr(w, 'metrics', False) for w in connection.execute_wrappers):
+        connection.execute_wrappers.append(_db_wrapper(connection.alias))
+
+
+# cache
+
+_MISS = object()
+
+
+def _instrument_cache(backend, alias):
+    get, get_many = backend.get, backend.get_many
+    hits, misses = CACHE_REQUESTS.labels(alias, 'hit'), CACHE_REQUESTS.labels(alias, 'miss')
+
+    def instrumented_get(key, default=None, version=None):
+        value = get(key, _MISS, version=version)
+        if value is _MISS:
+            misses.inc()
+            return default
+        hits.inc()
+        return value
+
+    def instrumented_get_many(keys, version=None):
+        keys = list(keys)
+        found = get_many(keys, version=version)
+        hits.inc(len(found))
+        misses.inc(len(keys) - len(found))
+        return found
+
+    backend.get, backend.get_many = instrumented_get, instrumented_get_many
+    return backend
+
+
+def install():
+    """Hook the database and cache instrumentation; called from ``UtilsConfig.ready``."""
+    from django.core.cache import caches
+    from django.db import connections
+    from django.db.backends.signals import connection_created
+
+    if not enabled():
+        return
+    connection_created.connect(_instrument_connection, dispatch_uid='utils.metrics.db')
+    for connection in connections.all(initialized_only=True):
+        _instrument_connection(None, connection)
+
+    if not getattr(caches, '_metrics_installed', False):
+        create_connection = caches.create_connection
+        caches.create_connection = lambda alias: _instrument_cache(create_connection(alias), alias)
+        caches._metrics_installed = True
+
+
+# exposition
+
+def render(path=None):
+    """The current samples in the text format; ``path`` aggregates a multiprocess directory."""
+    path = path or multiprocess_dir()
+    if path:
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, path=path)
+        registry.register(_queue_collector)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def _email_retry_depth():
+    from utils.mail import get_email_queue_status
+
+    return get_email_queue_status().get('total', 0)
+
+
+def _export_depth():
+    from utils.models import ExportJob
+
+    return ExportJob.objects.filter(status__in=['pending', 'running']).count()
+
+
+register_queue('email_retry', _email_retry_depth)
+register_queue('exports', _export_depth)
+
+
+def authorized(request):
+    # without a token /metrics is only open in DEBUG; in production an unset
+    # METRICS_TOKEN must not publish request, query and queue figures
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token:
+        return settings.DEBUG
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    return header.startswith('Bearer ') and constant_time_compare(header[7:], token)
+
+
+def metrics_view(request):
+    from django.http import HttpResponse
+
+    if not authorized(request):
+        return HttpResponse(status=401, headers={'WWW-Authenticate': 'Bearer'})
+    return HttpResponse(render(), content_type=CONTENT_TYPE_LATEST)
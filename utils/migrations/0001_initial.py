@@ -0,0 +1,30 @@
+# Generated by Django 5.1.1 on 2026-10-18 21:20
+
+import utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(blank=True, default=utils.make_UUID)),
+                ('date_created', models.DateTimeField(auto_now=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('scope', models.CharField(max_length=100, unique=True)),
+                ('last_value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Sequence',
+                'verbose_name_plural': 'Sequences',
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.1 on 2026-10-18 22:36
+
+import django.db.models.deletion
+import utils
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utils', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(blank=True, default=utils.make_UUID)),
+                ('date_created', models.DateTimeField(auto_now=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('dataset', models.CharField(max_length=30)),
+                ('file_format', models.CharField(default='csv', max_length=10)),
+                ('params', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('row_count', models.PositiveIntegerField(blank=True, null=True)),
+                ('file_path', models.CharField(blank=True, max_length=500)),
+                ('file_name', models.CharField(blank=True, max_length=200)),
+                ('error', models.CharField(blank=True, max_length=500)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Export Job',
+                'verbose_name_plural': 'Export Jobs',
+                'indexes': [models.Index(fields=['user', 'status'], name='utils_expor_user_id_ad2460_idx')],
+            },
+        ),
+    ]
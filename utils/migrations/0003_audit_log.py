@@ -0,0 +1,44 @@
+# Generated by Django 5.1.1 on 2026-10-19 00:37
+
+import django.db.models.deletion
+import utils
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utils', '0002_export_jobs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(blank=True, default=utils.make_UUID)),
+                ('date_created', models.DateTimeField(auto_now=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('stream', models.CharField(max_length=30)),
+                ('sequence', models.BigIntegerField()),
+                ('action', models.CharField(max_length=50)),
+                ('actor_email', models.CharField(blank=True, max_length=254)),
+                ('object_type', models.CharField(blank=True, max_length=100)),
+                ('object_id', models.CharField(blank=True, max_length=64)),
+                ('ip_address', models.CharField(blank=True, max_length=45, null=True)),
+                ('details', models.JSONField(blank=True, default=dict)),
+                ('occurred_at', models.DateTimeField()),
+                ('previous_hash', models.CharField(max_length=64)),
+                ('hash', models.CharField(max_length=64)),
+                ('actor', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Audit Event',
+                'verbose_name_plural': 'Audit Events',
+                'indexes': [models.Index(fields=['actor', 'occurred_at'], name='utils_audit_actor_i_54ad94_idx'), models.Index(fields=['object_type', 'object_id', 'occurred_at'], name='utils_audit_object__98cc39_idx'), models.Index(fields=['action', 'occurred_at'], name='utils_audit_action_11266e_idx'), models.Index(fields=['occurred_at'], name='utils_audit_occurre_e47520_idx')],
+                'constraints': [models.UniqueConstraint(fields=('stream', 'sequence'), name='unique_audit_event_sequence')],
+            },
+        ),
+    ]
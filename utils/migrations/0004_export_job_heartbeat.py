@@ -0,0 +1,33 @@
+# Generated by Django 5.1.1 on 2026-10-19 03:32
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def start_heartbeats(apps, schema_editor):
+    # jobs already running beat from their start, so ones orphaned before this
+    # migration go stale and are picked up again
+    ExportJob = apps.get_model('utils', 'ExportJob')
+    ExportJob.objects.filter(status='running').update(heartbeat_at=F('started_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utils', '0003_audit_log'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='exportjob',
+            index=models.Index(fields=['status', 'heartbeat_at'], name='utils_expor_status_572859_idx'),
+        ),
+        migrations.RunPython(start_heartbeats, migrations.RunPython.noop),
+    ]
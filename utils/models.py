@@ -87,3 +87,115 @@ class ArrayField(models.TextField):
 
 
 
+
+
+class Sequence(DbModel):
+    """
+    Named counter backing human-readable identifiers (see utils.sequences).
+    One row per scope, e.g. ``INSP:2026``.
+    """
+    scope = models.CharField(max_length=100, unique=True)
+    last_value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.scope} @ {self.last_value}"
+
+    def __repr__(self):
+        return f"<Sequence: {self.scope} - {self.last_value}>"
+
+    class Meta:
+        verbose_name = 'Sequence'
+        verbose_name_plural = 'Sequences'
+
+
+class ExportJob(DbModel):
+    """
+    A bulk export too large to stream in the request (see utils.exports).
+    The file is written under ``settings.EXPORT_ROOT`` and downloaded later.
+    """
+    STATUS = {
+        'pending': 'Pending',
+        'running': 'Running',
+        'completed': 'Completed',
+        'failed': 'Failed',
+    }
+
+    user = models.ForeignKey('accounts.Account', on_delete=models.CASCADE, related_name='export_jobs')
+    dataset = models.CharField(max_length=30)
+    file_format = models.CharField(max_length=10, default='csv')
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS, default='pending')
+    row_count = models.PositiveIntegerField(null=True, blank=True)
+    file_path = models.CharField(max_length=500, blank=True)
+    file_name = models.CharField(max_length=200, blank=True)
+    error = models.CharField(max_length=500, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # refreshed while the file is written; a running job whose heartbeat goes
+    # stale lost its worker and is claimed again (see utils.exports.run_job)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.dataset} export ({self.get_status_display()})"
+
+    def __repr__(self):
+        return f"<ExportJob: {self.dataset}.{self.file_format} - {self.status}>"
+
+    class Meta:
+        verbose_name = 'Export Job'
+        verbose_name_plural = 'Export Jobs'
+        indexes = [
+            models.Index(fields=['user', 'status']),
+            models.Index(fields=['status', 'heartbeat_at']),
+        ]
+
+
+class AuditEvent(DbModel):
+    """
+    One entry of the append-only audit log (see utils.audit). ``hash``
+    chains the event to the one before it in its stream, so rows must never
+    be changed or deleted; ``manage.py verify_audit_log`` checks that they
+    were not.
+    """
+    stream = models.CharField(max_length=30)
+    sequence = models.BigIntegerField()
+    action = models.CharField(max_length=50)
+    # not a constraint: deleting an account must not rewrite its events
+    actor = models.ForeignKey(
+        'accounts.Account', on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+'
+    )
+    actor_email = models.CharField(max_length=254, blank=True)
+    object_type = models.CharField(max_length=100, blank=True)
+    object_id = models.CharField(max_length=64, blank=True)
+    ip_address = models.CharField(max_length=45, blank=True, null=True)
+    details = models.JSONField(default=dict, blank=True)
+    occurred_at = models.DateTimeField()
+    previous_hash = models.CharField(max_length=64)
+    hash = models.CharField(max_length=64)
+
+    def __str__(self):
+        return f"{self.stream} #{self.sequence}: {self.action}"
+
+    def __repr__(self):
+        return f"<AuditEvent: {self.stream}:{self.sequence} - {self.action}>"
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValidationError("Audit events cannot be changed")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValidationError("Audit events cannot be deleted")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['stream', 'sequence'], name='unique_audit_event_sequence'),
+        ]
+        indexes = [
+            models.Index(fields=['actor', 'occurred_at']),
+            models.Index(fields=['object_type', 'object_id', 'occurred_at']),
+            models.Index(fields=['action', 'occurred_at']),
+            models.Index(fields=['occurred_at']),
+        ]
+        verbose_name = 'Audit Event'
+        verbose_name_plural = 'Audit Events'
@@ -0,0 +1,273 @@
+"""
+Pre-built OpenAPI schema.
+
+drf-yasg builds the schema by introspecting every view and its
+``swagger_auto_schema``, which is too slow and memory hungry to do per
+request. The schema is built once at deploy instead:
+
+    build()                 the schema as a dict, and the warnings raised building it
+    write(schema)           save it as a versioned artifact and make it current
+    current()               the current Artifact, built and written on first use if missing
+    diff(old, new)          Changes from one schema to another, breaking ones flagged
+
+Artifacts live under ``OPENAPI_SCHEMA_ROOT`` as ``openapi-<version>.json``
+plus a gzipped copy. The version is a hash of the content, so it doubles as
+the ETag and an unchanged API keeps its version across deploys. The
+``CURRENT`` file there names the one served. ``utils.views.openapi_schema``
+serves it at /api/docs/swagger.json and the Swagger UI and ReDoc pages load
+it from there (``SPEC_URL``).
+
+``manage.py build_openapi_schema`` writes one. It must run where the web
+processes can read the result, never in a release phase, whose container
+is thrown away: the Dockerfile bakes it into the image, so booting only
+reads it. Where none was baked, the first schema request builds and writes
+it while holding a lock file, so one process on the machine builds it and
+the others read what it wrote. ``manage.py diff_openapi_schema`` compares
+two builds. Filter parameters come from
+utils.openapi_inspectors.
+"""
+import fcntl
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import warnings
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory
+from django.urls import reverse
+from rest_framework.request import Request
+
+logger = logging.getLogger(__name__)
+
+CURRENT = 'CURRENT'
+
+Artifact = namedtuple('Artifact', 'version body gzipped')
+Change = namedtuple('Change', 'breaking location message')
+
+_cache = {'key': None, 'artifact': None}
+_lock = threading.Lock()
+
+
+class _Capture(logging.Handler):
+
+    def __init__(self, records):
+        super().__init__(logging.WARNING)
+        self.records = records
+
+    def emit(self, record):
+        self.records.append(record.getMessage())
+
+
+def build():
+    """
+    Generate the schema as an anonymous visitor of the docs would see it,
+    without a host so it works on every domain. Returns ``(schema,
+    warnings)``; the warnings are drf-yasg's logged ones and any Python
+    warnings raised while introspecting views.
+    """
+    from drf_yasg.app_settings import swagger_settings
+    from drf_yasg.codecs import OpenAPICodecJson
+    from drf_yasg.generators import OpenAPISchemaGenerator
+
+    problems = []
+    handler = _Capture(problems)
+    yasg_logger = logging.getLogger('drf_yasg')
+    yasg_logger.addHandler(handler)
+    try:
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            request = Request(RequestFactory().get(reverse('schema-json')))
+            request.user = AnonymousUser()
+            generator = OpenAPISchemaGenerator(swagger_settings.DEFAULT_INFO, url='')
+            body = OpenAPICodecJson(validators=[]).encode(generator.get_schema(request=request, public=True))
+    finally:
+        yasg_logger.removeHandler(handler)
+    problems += [f"{warning.category.__name__}: {warning.message}" for warning in caught]
+    return json.loads(body), problems
+
+
+def _encode(schema):
+    body = json.dumps(schema, sort_keys=True, separators=(',', ':')).encode()
+    version = hashlib.sha256(body).hexdigest()[:16]
+    # mtime=0 so the same schema always compresses to the same bytes
+    return Artifact(version, body, gzip.compress(body, mtime=0))
+
+
+# artifacts
+
+def schema_root():
+    root = str(getattr(settings, 'OPENAPI_SCHEMA_ROOT', os.path.join(settings.BASE_DIR, 'openapi')))
+    os.makedirs(root, exist_ok=True)
+    return root
+
+
+def _path(version, suffix=''):
+    return os.path.join(schema_root(), f'openapi-{version}.json{suffix}')
+
+
+def _write(path, data):
+    temporary = f'{path}.tmp'
+    with open(temporary, 'wb') as handle:
+        handle.write(data)
+    os.replace(temporary, path)
+
+
+def versions():
+    """The saved schema versions, oldest first."""
+    names = [name for name in os.listdir(schema_root()) if name.startswith('openapi-') and name.endswith('.json')]
+    names.sort(key=lambda name: os.path.getmtime(os.path.join(schema_root(), name)))
+    return [name[len('openapi-'):-len('.json')] for name in names]
+
+
+def write(schema, make_current=True):
+    """Save ``schema`` (and make it the one served). Returns its Artifact."""
+    artifact = _encode(schema)
+    _write(_path(artifact.version), artifact.body)
+    _write(_path(artifact.version, '.gz'), artifact.gzipped)
+    if make_current:
+        _write(os.path.join(schema_root(), CURRENT), artifact.version.encode())
+    return artifact
+
+
+def load(version_or_path):
+    """A schema dict from a saved version or a JSON file."""
+    path = version_or_path if os.path.isfile(version_or_path) else _path(version_or_path)
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def _current_key():
+    path = os.path.join(schema_root(), CURRENT)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return path, None
+    return path, (stat.st_mtime_ns, stat.st_size)
+
+
+def _build_missing():
+    # the lock file makes concurrent workers wait for one build instead of each running their own
+    with open(os.path.join(schema_root(), '.build.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if _current_key()[1] is None:
+                logger.warning("No pre-built OpenAPI schema; building and saving it (run `manage.py build_openapi_schema`)")
+                write(build()[0])
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def current():
+    """The Artifact to serve, read from disk once per written version; see the module docstring when none was written."""
+    key = _current_key()
+    if _cache['key'] == key:
+        return _cache['artifact']
+
+    with _lock:
+        key = _current_key()
+        if key[1] is None:
+            _build_missing()
+            key = _current_key()
+        if _cache['key'] != key:
+            path = key[0]
+            with open(path) as handle:
+                version = handle.read().strip()
+            with open(_path(version), 'rb') as body, open(_path(version, '.gz'), 'rb') as gzipped:
+                _cache['artifact'], _cache['key'] = Artifact(version, body.read(), gzipped.read()), key
+        return _cache['artifact']
+
+
+# diffing
+
+def _type(schema):
+    if '$ref' in schema:
+        return schema['$ref'].rsplit('/', 1)[-1]
+    kind = schema.get('type', 'object')
+    return f"{kind} ({schema['format']})" if schema.get('format') else kind
+
+
+def _schemas(old, new, where, changes):
+    if _type(old) != _type(new):
+        changes.append(Change(True, where, f"type changed from {_type(old)} to {_type(new)}"))
+        return
+    if old.get('type') == 'array':
+        _schemas(old.get('items', {}), new.get('items', {}), f'{where}[]', changes)
+        return
+
+    old_fields, new_fields = old.get('properties', {}), new.get('properties', {})
+    for name, field in old_fields.items():
+        if name not in new_fields:
+            changes.append(Change(True, f'{where}.{name}', "field removed"))
+        else:
+            _schemas(field, new_fields[name], f'{where}.{name}', changes)
+    for name in new_fields.keys() - old_fields.keys():
+        changes.append(Change(False, f'{where}.{name}', "field added"))
+    for name in sorted(set(new.get('required', [])) - set(old.get('required', []))):
+        changes.append(Change(True, f'{where}.{name}', "field is now required"))
+
+
+def _parameters(operation, path_item):
+    merged = {(p['in'], p['name']): p for p in path_item.get('parameters', [])}
+    merged.update({(p['in'], p['name']): p for p in operation.get('parameters', [])})
+    return merged
+
+
+def _operation(old, new, old_item, new_item, where, changes):
+    old_parameters, new_parameters = _parameters(old, old_item), _parameters(new, new_item)
+    for key, parameter in old_parameters.items():
+        label = f'{where} {key[0]} parameter {key[1]}'
+        if key not in new_parameters:
+            changes.append(Change(False, label, "parameter removed"))
+        elif key[0] == 'body':
+            _schemas(parameter.get('schema', {}), new_parameters[key].get('schema', {}), f'{where} body', changes)
+        elif _type(parameter) != _type(new_parameters[key]):
+            changes.append(Change(True, label, f"type changed from {_type(parameter)} to {_type(new_parameters[key])}"))
+        elif new_parameters[key].get('required') and not parameter.get('required'):
+            changes.append(Change(True, label, "parameter is now required"))
+    for key in new_parameters.keys() - old_parameters.keys():
+        required = new_parameters[key].get('required', False)
+        message = "required parameter added" if required else "optional parameter added"
+        changes.append(Change(required, f'{where} {key[0]} parameter {key[1]}', message))
+
+    new_responses = new.get('responses', {})
+    for code, response in old.get('responses', {}).items():
+        if code not in new_responses:
+            changes.append(Change(False, f'{where} {code}', "response removed"))
+        elif 'schema' in response:
+            _schemas(response['schema'], new_responses[code].get('schema', {}), f'{where} {code}', changes)
+
+
+def diff(old, new):
+    """
+    Changes from schema ``old`` to ``new`` (dicts). Breaking: removed
+    operations, fields and definitions, type changes, and parameters or
+    fields that became required. Definitions are compared as requests,
+    so a newly required field in one is always breaking.
+    """
+    changes = []
+    new_paths = new.get('paths', {})
+    for path, item in old.get('paths', {}).items():
+        for method, operation in item.items():
+            if method == 'parameters':
+                continue
+            where = f'{method.upper()} {path}'
+            if method not in new_paths.get(path, {}):
+                changes.append(Change(True, where, "operation removed"))
+            else:
+                _operation(operation, new_paths[path][method], item, new_paths[path], where, changes)
+    for path, item in new_paths.items():
+        for method in sorted(item.keys() - old.get('paths', {}).get(path, {}).keys() - {'parameters'}):
+            changes.append(Change(False, f'{method.upper()} {path}', "operation added"))
+
+    new_definitions = new.get('definitions', {})
+    for name, definition in old.get('definitions', {}).items():
+        if name not in new_definitions:
+            changes.append(Change(True, f'#/definitions/{name}', "definition removed"))
+        else:
+            _schemas(definition, new_definitions[name], f'#/definitions/{name}', changes)
+    return changes
@@ -0,0 +1,33 @@
+"""
+drf-yasg inspectors (SWAGGER_SETTINGS). drf-yasg imports this module while
+loading its own inspectors, so it must not import utils.openapi or be
+imported before drf-yasg.
+"""
+from django_filters import filters
+from django_filters.rest_framework import DjangoFilterBackend
+from drf_yasg import openapi
+from drf_yasg.inspectors.base import FilterInspector, NotHandled
+
+
+class DjangoFilterInspector(FilterInspector):
+    """
+    Query parameters of a view's FilterSet. django-filter's own schema hook
+    is deprecated and calls ``get_queryset`` on a view with no user, which
+    fails (with a warning) on most of our views; the FilterSet class alone
+    is enough.
+    """
+
+    def get_filter_parameters(self, filter_backend):
+        if not isinstance(filter_backend, DjangoFilterBackend):
+            return NotHandled
+        filterset_class = filter_backend.get_filterset_class(self.view, getattr(self.view, 'queryset', None))
+        if filterset_class is None:
+            return []
+        return [
+            openapi.Parameter(
+                name, openapi.IN_QUERY, required=field.extra['required'],
+                type=openapi.TYPE_NUMBER if isinstance(field, filters.NumberFilter) else openapi.TYPE_STRING,
+                description=str(field.extra.get('help_text', '')),
+            )
+            for name, field in filterset_class.base_filters.items()
+        ]
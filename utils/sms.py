@@ -3,8 +3,8 @@ import re
 import time
 from typing import Dict, Any, List, Optional, Union
 from django.conf import settings
-import africastalking
-from africastalking.SMS import SMSService
+
+from utils.lazy import LazyResource
 
 logger = logging.getLogger(__name__)
 
@@ -13,14 +13,16 @@ SMS_USERNAME = getattr(settings, 'SMS_USERNAME', 'Veyu')
 SMS_API_KEY = getattr(settings, 'SMS_API_KEY', 'atsk_42e7f18bae53ab9f80e226feabe3a79351a6c1c8cf3af4fd0a823a93fb6643c02bf9e1a1')
 SMS_SENDER_ID = getattr(settings, 'SMS_SENDER_ID', 'Veyu')
 
-# Initialize Africa's Talking
-try:
+
+def _create_sms_service():
+    # imported on first send so web workers don't pay for the SDK at boot
+    import africastalking
     africastalking.initialize(SMS_USERNAME, SMS_API_KEY)
-    sms_service = africastalking.SMS
     logger.info("Africa's Talking SMS service initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize Africa's Talking SMS service: {str(e)}")
-    sms_service = None
+    return africastalking.SMS
+
+
+sms_service = LazyResource(_create_sms_service, name="Africa's Talking SMS service")
 
 class SMSDeliveryResult:
     """Class to represent SMS delivery result with detailed information."""
@@ -306,6 +308,10 @@ def send_bulk_sms(message: str, recipients: List[str], sender_id: str = None, fa
     """
     Send SMS to multiple recipients with detailed results.
     
+    Recipients are submitted in batches to the healthiest provider that
+    accepts them (see SMSProviderManager.send_bulk_with_fallback); any a
+    provider fails to deliver to are retried on the next one.
+    
     Args:
         message: SMS message content
         recipients: List of recipient phone numbers
@@ -315,12 +321,7 @@ def send_bulk_sms(message: str, recipients: List[str], sender_id: str = None, fa
     Returns:
         Dict with bulk sending results
     """
-    if not sms_service:
-        error_msg = "SMS service not initialized"
-        logger.error(error_msg)
-        if fail_silently:
-            return {'success': False, 'message': error_msg, 'results': []}
-        raise Exception(error_msg)
+    from utils.sms_providers import sms_provider_manager
     
     results = {
         'success': False,
@@ -350,46 +351,29 @@ def send_bulk_sms(message: str, recipients: List[str], sender_id: str = None, fa
             results['message'] = "No valid recipients found"
             return results
         
-        # Prepare SMS parameters
-        sms_params = {
-            'recipients': validated_recipients,
-            'message': message
-        }
-        
-        if sender_id or SMS_SENDER_ID:
-            sms_params['sender_id'] = sender_id or SMS_SENDER_ID
-        
-        # Send bulk SMS
         logger.info(f"Sending bulk SMS to {len(validated_recipients)} recipients")
-        response = sms_service.send(**sms_params)
-        
-        # Parse bulk response
-        if response and 'SMSMessageData' in response:
-            sms_data = response['SMSMessageData']
-            recipients_data = sms_data.get('Recipients', [])
+        response = sms_provider_manager.send_bulk_with_fallback(
+            message=message,
+            recipients=validated_recipients,
+            sender_id=sender_id or SMS_SENDER_ID
+        )
+        
+        for recipient_number, result in response['results'].items():
+            if result.get('success'):
+                results['successful_sends'] += 1
+            else:
+                results['failed_sends'] += 1
             
-            for recipient_data in recipients_data:
-                recipient_number = recipient_data.get('number', '')
-                status = recipient_data.get('status', 'Unknown')
-                status_code = recipient_data.get('statusCode', 0)
-                message_id = recipient_data.get('messageId', '')
-                cost = recipient_data.get('cost', '')
-                
-                success = status.lower() in ['success', 'sent'] or status_code in [100, 101]
-                
-                if success:
-                    results['successful_sends'] += 1
-                else:
-                    results['failed_sends'] += 1
-                
-                results['results'].append({
-                    'recipient': recipient_number,
-                    'success': success,
-                    'message': status,
-                    'message_id': message_id,
-                    'cost': cost,
-                    'status_code': status_code
-                })
+            results['results'].append({
+                'recipient': recipient_number,
+                'success': bool(result.get('success')),
+                'message': result.get('message', ''),
+                'provider': result.get('provider'),
+                'message_id': result.get('message_id', ''),
+                'cost': result.get('cost', ''),
+                'status_code': result.get('status_code')
+            })
+        results['summary'] = {'attempts': response['attempts']}
         
         # Calculate success rate
         success_rate = (results['successful_sends'] / results['total_recipients']) * 100
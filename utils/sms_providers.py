@@ -1,12 +1,24 @@
 import logging
+import time
 from typing import Dict, Any, List, Optional
 from abc import ABC, abstractmethod
 from django.conf import settings
 
+from utils import metrics
+from utils.lazy import LazyResource
+from utils.sms_routing import CircuitBreaker, ProviderHealth, ProviderSlots
+
 logger = logging.getLogger(__name__)
 
 class SMSProvider(ABC):
     """Abstract base class for SMS providers."""
+
+    # recipients accepted per API call; providers with a bulk API raise this
+    max_batch_size = 1
+    
+    def send_batch(self, message: str, recipients: List[str], **kwargs) -> Dict[str, Dict[str, Any]]:
+        """Send one message to several recipients; returns a result per recipient."""
+        return {recipient: self.send_sms(message, recipient, **kwargs) for recipient in recipients}
     
     @abstractmethod
     def send_sms(self, message: str, recipient: str, **kwargs) -> Dict[str, Any]:
@@ -26,23 +38,20 @@ class SMSProvider(ABC):
 class AfricasTalkingProvider(SMSProvider):
     """Africa's Talking SMS provider."""
     
+    max_batch_size = 100
+    
     def __init__(self):
         self.username = getattr(settings, 'SMS_USERNAME', 'Veyu')
         self.api_key = getattr(settings, 'SMS_API_KEY', '')
         self.sender_id = getattr(settings, 'SMS_SENDER_ID', 'Veyu')
-        self._service = None
-        self._initialize()
+        self._service = LazyResource(self._initialize, name="Africa's Talking")
     
     def _initialize(self):
-        """Initialize Africa's Talking service."""
-        try:
-            import africastalking
-            africastalking.initialize(self.username, self.api_key)
-            self._service = africastalking.SMS
-            logger.info("Africa's Talking SMS provider initialized")
-        except Exception as e:
-            logger.error(f"Failed to initialize Africa's Talking: {str(e)}")
-            self._service = None
+        """Initialize Africa's Talking service (on first use)."""
+        import africastalking
+        africastalking.initialize(self.username, self.api_key)
+        logger.info("Africa's Talking SMS provider initialized")
+        return africastalking.SMS
     
     def send_sms(self, message: str, recipient: str, **kwargs) -> Dict[str, Any]:
         """Send SMS via Africa's Talking."""
@@ -91,11 +100,54 @@ class AfricasTalkingProvider(SMSProvider):
                 'provider': self.get_provider_name()
             }
     
+    def send_batch(self, message: str, recipients: List[str], **kwargs) -> Dict[str, Dict[str, Any]]:
+        """Send to up to ``max_batch_size`` recipients in a single API call."""
+        if not self._service:
+            return {recipient: {
+                'success': False,
+                'message': 'Africa\'s Talking service not available',
+                'provider': self.get_provider_name()
+            } for recipient in recipients}
+        
+        try:
+            response = self._service.send(
+                recipients=list(recipients),
+                message=message,
+                sender_id=kwargs.get('sender_id', self.sender_id)
+            )
+        except Exception as e:
+            logger.error(f"Africa's Talking bulk SMS error: {str(e)}")
+            return {recipient: {
+                'success': False,
+                'message': f'Provider error: {str(e)}',
+                'provider': self.get_provider_name()
+            } for recipient in recipients}
+        
+        results = {recipient: {
+            'success': False,
+            'message': 'No status returned for recipient',
+            'provider': self.get_provider_name()
+        } for recipient in recipients}
+        recipients_data = (response or {}).get('SMSMessageData', {}).get('Recipients', [])
+        for recipient_data in recipients_data:
+            number = recipient_data.get('number', '')
+            status = recipient_data.get('status', 'Unknown')
+            status_code = recipient_data.get('statusCode', 0)
+            results[number] = {
+                'success': status.lower() in ['success', 'sent'] or status_code in [100, 101],
+                'message': status,
+                'provider': self.get_provider_name(),
+                'message_id': recipient_data.get('messageId', ''),
+                'cost': recipient_data.get('cost', ''),
+                'status_code': status_code,
+            }
+        return results
+    
     def get_provider_name(self) -> str:
         return "AfricasTalking"
     
     def is_available(self) -> bool:
-        return bool(self._service and self.api_key)
+        return bool(self.api_key and self._service)
 
 class TwilioProvider(SMSProvider):
     """Twilio SMS provider (fallback option)."""
@@ -104,20 +156,20 @@ class TwilioProvider(SMSProvider):
         self.account_sid = getattr(settings, 'TWILIO_ACCOUNT_SID', '')
         self.auth_token = getattr(settings, 'TWILIO_AUTH_TOKEN', '')
         self.from_number = getattr(settings, 'TWILIO_FROM_NUMBER', '')
-        self._client = None
-        self._initialize()
+        self._client = LazyResource(self._initialize, name="Twilio")
     
     def _initialize(self):
-        """Initialize Twilio client."""
+        """Initialize Twilio client (on first use)."""
+        if not (self.account_sid and self.auth_token):
+            return None
         try:
-            if self.account_sid and self.auth_token:
-                from twilio.rest import Client
-                self._client = Client(self.account_sid, self.auth_token)
-                logger.info("Twilio SMS provider initialized")
+            from twilio.rest import Client
         except ImportError:
             logger.warning("Twilio library not installed")
-        except Exception as e:
-            logger.error(f"Failed to initialize Twilio: {str(e)}")
+            return None
+        client = Client(self.account_sid, self.auth_token)
+        logger.info("Twilio SMS provider initialized")
+        return client
     
     def send_sms(self, message: str, recipient: str, **kwargs) -> Dict[str, Any]:
         """Send SMS via Twilio."""
@@ -161,7 +213,7 @@ class TwilioProvider(SMSProvider):
         return "Twilio"
     
     def is_available(self) -> bool:
-        return bool(self._client and self.account_sid and self.auth_token and self.from_number)
+        return bool(self.account_sid and self.auth_token and self.from_number and self._client)
 
 class VonageProvider(SMSProvider):
     """Vonage (formerly Nexmo) SMS provider (fallback option)."""
@@ -170,20 +222,20 @@ class VonageProvider(SMSProvider):
         self.api_key = getattr(settings, 'VONAGE_API_KEY', '')
         self.api_secret = getattr(settings, 'VONAGE_API_SECRET', '')
         self.from_number = getattr(settings, 'VONAGE_FROM_NUMBER', 'Veyu')
-        self._client = None
-        self._initialize()
+        self._client = LazyResource(self._initialize, name="Vonage")
     
     def _initialize(self):
-        """Initialize Vonage client."""
+        """Initialize Vonage client (on first use)."""
+        if not (self.api_key and self.api_secret):
+            return None
         try:
-            if self.api_key and self.api_secret:
-                import vonage
-                self._client = vonage.Client(key=self.api_key, secret=self.api_secret)
-                logger.info("Vonage SMS provider initialized")
+            import vonage
         except ImportError:
             logger.warning("Vonage library not installed")
-        except Exception as e:
-            logger.error(f"Failed to initialize Vonage: {str(e)}")
+            return None
+        client = vonage.Client(key=self.api_key, secret=self.api_secret)
+        logger.info("Vonage SMS provider initialized")
+        return client
     
     def send_sms(self, message: str, recipient: str, **kwargs) -> Dict[str, Any]:
         """Send SMS via Vonage."""
@@ -195,7 +247,8 @@ class VonageProvider(SMSProvider):
             }
         
         try:
-            sms = vonage.Sms(self._client)
+            import vonage
+            sms = vonage.Sms(self._client.get())
             response = sms.send_message({
                 'from': kwargs.get('from_number', self.from_number),
                 'to': recipient,
@@ -234,18 +287,37 @@ class VonageProvider(SMSProvider):
         return "Vonage"
     
     def is_available(self) -> bool:
-        return bool(self._client and self.api_key and self.api_secret)
+        return bool(self.api_key and self.api_secret and self._client)
 
 class SMSProviderManager:
-    """Manages multiple SMS providers with fallback support."""
+    """
+    Routes messages across SMS providers.
+
+    Each provider has a circuit breaker and rolling health score (shared
+    through the cache, see utils.sms_routing) and a per-process concurrency
+    limit. Providers are tried best score first; an open breaker is skipped
+    without paying its timeout, and the configured order only breaks ties.
+    """
     
-    def __init__(self):
-        self.providers = [
+    def __init__(self, providers: Optional[List[SMSProvider]] = None):
+        self.providers = providers if providers is not None else [
             AfricasTalkingProvider(),  # Primary provider
             TwilioProvider(),          # Fallback 1
             VonageProvider(),          # Fallback 2
         ]
-        self._log_provider_status()
+        failure_threshold = getattr(settings, 'SMS_BREAKER_FAILURE_THRESHOLD', 5)
+        recovery_timeout = getattr(settings, 'SMS_BREAKER_RECOVERY_SECONDS', 30)
+        max_concurrency = getattr(settings, 'SMS_PROVIDER_MAX_CONCURRENCY', 10)
+        self.acquire_timeout = getattr(settings, 'SMS_PROVIDER_ACQUIRE_TIMEOUT', 2.0)
+        self.breakers = {}
+        self.health = {}
+        self.slots = {}
+        for provider in self.providers:
+            name = provider.get_provider_name()
+            self.breakers[name] = CircuitBreaker(name, failure_threshold, recovery_timeout)
+            self.health[name] = ProviderHealth(name)
+            self.slots[name] = ProviderSlots(getattr(provider, 'max_concurrency', max_concurrency))
+        self._status_logged = False
     
     def _log_provider_status(self):
         """Log the status of all providers."""
@@ -255,8 +327,65 @@ class SMSProviderManager:
     
     def get_available_providers(self) -> List[SMSProvider]:
         """Get list of available providers."""
+        # Provider SDKs initialize on first use, so report their status then
+        # rather than when the module is imported.
+        if not self._status_logged:
+            self._status_logged = True
+            self._log_provider_status()
         return [provider for provider in self.providers if provider.is_available()]
     
+    def rank_providers(self) -> List[SMSProvider]:
+        """Available providers whose breaker is not open, best first."""
+        ranked = []
+        for priority, provider in enumerate(self.get_available_providers()):
+            name = provider.get_provider_name()
+            state = self.breakers[name].state
+            if state == CircuitBreaker.OPEN:
+                continue
+            # half-open providers only get the probe once closed ones are exhausted
+            ranked.append((state == CircuitBreaker.HALF_OPEN, -self.health[name].score, priority, provider))
+        return [entry[-1] for entry in sorted(ranked, key=lambda entry: entry[:3])]
+    
+    def _call(self, provider, send, batch_size=None):
+        """
+        Run ``send`` against ``provider`` under its breaker and concurrency
+        limit; ``batch_size`` is set when ``send`` returns per-recipient
+        results. Returns ``(outcome, result)`` where outcome is 'sent',
+        'skipped' (breaker open or no free slot) or 'failed'.
+        """
+        name = provider.get_provider_name()
+        if not self.breakers[name].allow_request():
+            return 'skipped', {'message': 'Circuit breaker open'}
+        slots = self.slots[name]
+        if not slots.acquire(timeout=self.acquire_timeout):
+            return 'skipped', {'message': f'Concurrency limit ({slots.limit}) reached'}
+        started = time.monotonic()
+        try:
+            result = send()
+        except Exception as e:
+            result = e
+        finally:
+            slots.release()
+        latency_ms = (time.monotonic() - started) * 1000
+        
+        if isinstance(result, Exception):
+            delivered = 0.0
+            result = {'success': False, 'message': f"Provider {name} error: {str(result)}"}
+        elif batch_size is None:
+            delivered = 1.0 if result.get('success') else 0.0
+        else:
+            delivered = sum(1 for r in result.values() if r.get('success')) / max(len(result), 1)
+        
+        self.health[name].record(delivered, latency_ms, batch_size or 1)
+        sent = round(delivered * (batch_size or 1))
+        metrics.record_outbound('sms', name, 'sent', latency_ms / 1000, count=sent)
+        metrics.record_outbound('sms', name, 'failed', count=(batch_size or 1) - sent)
+        if delivered > 0:
+            self.breakers[name].record_success()
+        else:
+            self.breakers[name].record_failure()
+        return ('sent' if delivered > 0 else 'failed'), result
+    
     def send_sms_with_fallback(self, message: str, recipient: str, **kwargs) -> Dict[str, Any]:
         """
         Send SMS with automatic fallback to other providers if primary fails.
@@ -269,9 +398,9 @@ class SMSProviderManager:
         Returns:
             Dict with sending result and provider information
         """
-        available_providers = self.get_available_providers()
+        providers = self.rank_providers()
         
-        if not available_providers:
+        if not providers:
             return {
                 'success': False,
                 'message': 'No SMS providers available',
@@ -281,58 +410,106 @@ class SMSProviderManager:
         
         attempts = []
         
-        for i, provider in enumerate(available_providers):
-            try:
-                logger.info(f"Attempting SMS via {provider.get_provider_name()} (attempt {i+1}/{len(available_providers)})")
-                
-                result = provider.send_sms(message, recipient, **kwargs)
-                attempts.append({
-                    'provider': provider.get_provider_name(),
-                    'success': result['success'],
-                    'message': result['message'],
-                    'attempt_number': i + 1
-                })
-                
-                if result['success']:
-                    logger.info(f"SMS sent successfully via {provider.get_provider_name()}")
-                    result['attempts'] = attempts
-                    result['fallback_used'] = i > 0
-                    return result
-                else:
-                    logger.warning(f"SMS failed via {provider.get_provider_name()}: {result['message']}")
-                    
-            except Exception as e:
-                error_msg = f"Provider {provider.get_provider_name()} error: {str(e)}"
-                logger.error(error_msg)
-                attempts.append({
-                    'provider': provider.get_provider_name(),
-                    'success': False,
-                    'message': error_msg,
-                    'attempt_number': i + 1
-                })
+        for i, provider in enumerate(providers):
+            name = provider.get_provider_name()
+            logger.info(f"Attempting SMS via {name} (attempt {i+1}/{len(providers)})")
+            outcome, result = self._call(provider, lambda: provider.send_sms(message, recipient, **kwargs))
+            attempts.append({
+                'provider': name,
+                'success': outcome == 'sent',
+                'skipped': outcome == 'skipped',
+                'message': result['message'],
+                'attempt_number': i + 1
+            })
+            
+            if outcome == 'sent':
+                logger.info(f"SMS sent successfully via {name}")
+                result['attempts'] = attempts
+                result['fallback_used'] = i > 0
+                return result
+            logger.warning(f"SMS {outcome} via {name}: {result['message']}")
         
         # All providers failed
         return {
             'success': False,
-            'message': f'All {len(available_providers)} SMS providers failed',
+            'message': f'All {len(providers)} SMS providers failed',
             'provider': None,
             'attempts': attempts,
             'fallback_used': True
         }
     
+    def send_bulk_with_fallback(self, message: str, recipients: List[str], **kwargs) -> Dict[str, Any]:
+        """
+        Send one message to many recipients, in batches of each provider's
+        ``max_batch_size``. Recipients a provider fails to deliver to are
+        retried on the next provider.
+        
+        Returns:
+            Dict with a per-recipient ``results`` map and the ``attempts`` made
+        """
+        pending = list(dict.fromkeys(recipients))
+        results, attempts = {}, []
+        
+        for provider in self.rank_providers():
+            if not pending:
+                break
+            name = provider.get_provider_name()
+            size = max(1, provider.max_batch_size)
+            still_pending = []
+            for start in range(0, len(pending), size):
+                chunk = pending[start:start + size]
+                outcome, batch = self._call(provider, lambda: provider.send_batch(message, chunk, **kwargs), len(chunk))
+                if outcome != 'sent':
+                    attempts.append({'provider': name, 'recipients': len(chunk), 'delivered': 0,
+                                     'skipped': outcome == 'skipped', 'message': batch.get('message', '')})
+                    batch = {recipient: {'success': False, 'message': batch.get('message', ''), 'provider': name}
+                             for recipient in chunk}
+                else:
+                    attempts.append({'provider': name, 'recipients': len(chunk), 'skipped': False,
+                                     'delivered': sum(1 for r in batch.values() if r.get('success'))})
+                for recipient in chunk:
+                    result = batch.get(recipient) or {'success': False, 'message': 'No result', 'provider': name}
+                    results[recipient] = result
+                    if not result.get('success'):
+                        still_pending.append(recipient)
+            pending = still_pending
+        
+        for recipient in pending:
+            results.setdefault(recipient, {'success': False, 'message': 'No SMS providers available', 'provider': None})
+        delivered = sum(1 for result in results.values() if result.get('success'))
+        return {
+            'success': delivered > 0,
+            'delivered': delivered,
+            'failed': len(results) - delivered,
+            'results': results,
+            'attempts': attempts,
+        }
+    
     def get_provider_status(self) -> Dict[str, Any]:
-        """Get status of all SMS providers."""
+        """Get status of all SMS providers, including breaker state and health."""
+        ranked = self.rank_providers()
         status = {
             'total_providers': len(self.providers),
             'available_providers': 0,
+            'primary': ranked[0].get_provider_name() if ranked else None,
             'providers': []
         }
         
         for provider in self.providers:
+            name = provider.get_provider_name()
+            health = self.health[name].get()
             provider_info = {
-                'name': provider.get_provider_name(),
+                'name': name,
                 'available': provider.is_available(),
-                'primary': provider == self.providers[0]
+                'primary': bool(ranked) and provider is ranked[0],
+                'breaker': self.breakers[name].snapshot(),
+                'score': round(self.health[name].score, 4),
+                'success_rate': round(health['success_rate'], 4),
+                'latency_ms': round(health['latency_ms'], 1),
+                'samples': health['samples'],
+                'in_flight': self.slots[name].in_flight,
+                'max_concurrency': self.slots[name].limit,
+                'max_batch_size': provider.max_batch_size,
             }
             
             if provider_info['available']:
@@ -343,4 +520,4 @@ class SMSProviderManager:
         return status
 
 # Global SMS provider manager instance
-sms_provider_manager = SMSProviderManager()
\ No newline at end of file
+sms_provider_manager = SMSProviderManager()
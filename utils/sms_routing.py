@@ -0,0 +1,146 @@
+"""
+Health tracking for SMS provider routing.
+
+``CircuitBreaker`` stops sending to a provider after repeated failures and
+lets a single probe through once the recovery timeout has passed
+(closed -> open -> half-open -> closed). ``ProviderHealth`` keeps rolling
+(exponentially weighted) success-rate and latency figures used to pick
+the primary provider. Both live in the Django cache so every worker sees
+the same state; updates are read-modify-write and therefore approximate
+under heavy concurrency, which is fine for routing decisions.
+
+``ProviderSlots`` caps in-flight requests per provider within a process.
+"""
+import threading
+import time
+
+from django.core.cache import cache
+
+CACHE_PREFIX = 'sms:routing'
+
+
+class CircuitBreaker:
+    """Cache-backed circuit breaker for one provider."""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=5, recovery_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._failures_key = f'{CACHE_PREFIX}:{name}:failures'
+        self._opened_key = f'{CACHE_PREFIX}:{name}:opened_at'
+        self._probe_key = f'{CACHE_PREFIX}:{name}:probe'
+
+    @property
+    def state(self):
+        opened_at = cache.get(self._opened_key)
+        if opened_at is None:
+            return self.CLOSED
+        if time.time() - opened_at < self.recovery_timeout:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def allow_request(self):
+        """
+        Whether a request may be sent now. In the half-open state only one
+        caller (across all workers) gets the probe until it reports back.
+        """
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.OPEN:
+            return False
+        return cache.add(self._probe_key, 1, timeout=self.recovery_timeout)
+
+    def record_success(self):
+        cache.delete_many([self._failures_key, self._opened_key, self._probe_key])
+
+    def record_failure(self):
+        if self.state == self.HALF_OPEN:
+            # the probe failed: stay open for another recovery period
+            self._open()
+            return
+        cache.add(self._failures_key, 0, timeout=None)
+        try:
+            failures = cache.incr(self._failures_key)
+        except ValueError:  # evicted between add and incr
+            cache.set(self._failures_key, 1, timeout=None)
+            failures = 1
+        if failures >= self.failure_threshold:
+            self._open()
+
+    def reset(self):
+        self.record_success()
+
+    def _open(self):
+        cache.set(self._opened_key, time.time(), timeout=None)
+        cache.delete(self._probe_key)
+
+    def snapshot(self):
+        opened_at = cache.get(self._opened_key)
+        return {
+            'state': self.state,
+            'consecutive_failures': cache.get(self._failures_key, 0),
+            'opened_at': opened_at,
+            'retry_in': max(0, round(opened_at + self.recovery_timeout - time.time(), 1)) if opened_at else 0,
+        }
+
+
+class ProviderHealth:
+    """Rolling success rate and latency for one provider."""
+
+    def __init__(self, name, alpha=0.2, latency_scale_ms=1000):
+        self.name = name
+        self.alpha = alpha
+        self.latency_scale_ms = latency_scale_ms
+        self._key = f'{CACHE_PREFIX}:{name}:health'
+
+    def get(self):
+        return cache.get(self._key) or {'success_rate': 1.0, 'latency_ms': 0.0, 'samples': 0}
+
+    def record(self, success_rate, latency_ms, weight=1):
+        """
+        Fold an outcome into the rolling figures. ``success_rate`` is 1/0 for
+        a single message or the delivered fraction of a batch of ``weight``.
+        """
+        stats = self.get()
+        # the first sample replaces the optimistic prior outright
+        alpha = 1.0 if not stats['samples'] else min(1.0, self.alpha * weight)
+        stats['success_rate'] += alpha * (float(success_rate) - stats['success_rate'])
+        stats['latency_ms'] += alpha * (latency_ms - stats['latency_ms'])
+        stats['samples'] += weight
+        cache.set(self._key, stats, timeout=None)
+
+    @property
+    def score(self):
+        """Higher is better: success rate discounted by latency."""
+        stats = self.get()
+        return stats['success_rate'] / (1 + stats['latency_ms'] / self.latency_scale_ms)
+
+    def reset(self):
+        cache.delete(self._key)
+
+
+class ProviderSlots:
+    """Per-process limit on concurrent requests to one provider."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._semaphore = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+
+    def acquire(self, timeout=None):
+        if not self._semaphore.acquire(timeout=timeout):
+            return False
+        with self._lock:
+            self.in_flight += 1
+        return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._semaphore.release()
@@ -0,0 +1,884 @@
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import Account, Dealership
+from inspections.document_management import DocumentAuditTrail
+from inspections.models import InspectionDocument, VehicleInspection
+from listings.models import Car, Listing, Order, PurchaseOrder, RentalOrder, Vehicle
+from utils import audit, metrics, openapi
+from utils.exports import Export, ExportError, run_job, run_pending_jobs, stream_csv
+from utils.importtime import loaded_deferred_modules, parse_importtime, profile_setup
+from utils.lazy import LazyResource, lazy_import
+from utils.loadtest import SCENARIOS, diff_reports, percentile, run_load_test
+from utils.marketplace_data import MarketplaceDataGenerator
+from utils.models import AuditEvent, ExportJob, Sequence
+from utils.sequences import SequenceAllocator, reserve
+from utils.sms import send_bulk_sms
+from utils.sms_providers import SMSProvider, SMSProviderManager
+from wallet.ledger import reconcile
+from wallet.models import Transaction, Wallet
+
+
+class SequenceAllocatorTestCase(TestCase):
+
+    def test_values_increase_from_one(self):
+        self.assertEqual(reserve('TEST'), 1)
+        self.assertEqual(reserve('TEST'), 2)
+        self.assertEqual(reserve('TEST', 10), 12)
+        self.assertEqual(Sequence.objects.get(scope='TEST').last_value, 12)
+
+    def test_format_and_yearly_scope(self):
+        allocator = SequenceAllocator('INS')
+        when = timezone.make_aware(datetime(2026, 3, 1))
+        self.assertEqual(allocator.allocate(when), 'INS-2026-000001')
+        self.assertEqual(allocator.allocate(when), 'INS-2026-000002')
+        next_year = timezone.make_aware(datetime(2027, 1, 1))
+        self.assertEqual(allocator.allocate(next_year), 'INS-2027-000001')
+
+    def test_block_allocation_reserves_ahead(self):
+        allocator = SequenceAllocator('BLK', block_size=10, per_year=False)
+        values = [allocator.next_value() for _ in range(12)]
+        self.assertEqual(values, list(range(1, 13)))
+        self.assertEqual(Sequence.objects.get(scope='BLK').last_value, 20)
+
+    def test_inspection_number_uses_sequence(self):
+        number = VehicleInspection()._generate_inspection_number()
+        self.assertRegex(number, r'^INSP-\d{4}-000001$')
+        self.assertNotEqual(number, VehicleInspection()._generate_inspection_number())
+
+
+class SequenceConcurrencyTestCase(TransactionTestCase):
+    """Parallel allocation must never hand out the same value twice."""
+
+    THREADS = 8
+    PER_THREAD = 250
+
+    def _run_parallel(self, allocate):
+        results, errors = [], []
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                local = [allocate() for _ in range(self.PER_THREAD)]
+                with lock:
+                    results.extend(local)
+            except Exception as e:  # surfaced by the assertion below
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        return results
+
+    def test_no_duplicates_or_gaps_without_blocks(self):
+        allocator = SequenceAllocator('PAR', per_year=False)
+        values = self._run_parallel(allocator.next_value)
+        total = self.THREADS * self.PER_THREAD
+        self.assertEqual(sorted(values), list(range(1, total + 1)))
+
+    def test_blocks_unique_with_bounded_gaps(self):
+        block_size = 16
+        # one allocator per "worker" so each thread reserves its own blocks
+        allocators = {}
+
+        def allocate():
+            ident = threading.get_ident()
+            if ident not in allocators:
+                allocators[ident] = SequenceAllocator('PBL', block_size=block_size, per_year=False)
+            return allocators[ident].next_value()
+
+        values = self._run_parallel(allocate)
+        self.assertEqual(len(values), len(set(values)))
+        reserved = Sequence.objects.get(scope='PBL').last_value
+        self.assertLessEqual(max(values), reserved)
+        # each worker can leave at most one partially used block
+        self.assertLessEqual(reserved - len(values), self.THREADS * (block_size - 1))
+
+
+class LazyLoadingTestCase(SimpleTestCase):
+
+    def test_lazy_import_defers_until_attribute_access(self):
+        module = lazy_import('json')
+        self.assertIn('not loaded', repr(module))
+        self.assertEqual(module.dumps([1]), '[1]')
+        self.assertIn('loaded', repr(module))
+
+    def test_resource_initialized_once_across_threads(self):
+        calls = []
+        barrier = threading.Barrier(8)
+
+        def factory():
+            calls.append(1)
+            return object()
+
+        resource = LazyResource(factory)
+        results = []
+
+        def worker():
+            barrier.wait()
+            results.append(resource.get())
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len({id(value) for value in results}), 1)
+
+    def test_failed_initialization_is_retried(self):
+        attempts = []
+
+        def factory():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError("SDK unavailable")
+            return 'client'
+
+        resource = LazyResource(factory, name='flaky')
+        with self.assertLogs('utils.lazy', level='ERROR'):
+            self.assertFalse(resource)
+        self.assertTrue(resource)
+        self.assertEqual(resource.get(), 'client')
+
+    def test_parse_importtime(self):
+        output = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   json.decoder\n"
+            "import time:       300 |        420 | json\n"
+        )
+        self.assertEqual(parse_importtime(output), [('json.decoder', 120, 120, 1), ('json', 300, 420, 0)])
+
+
+class ImportBudgetTestCase(SimpleTestCase):
+    """A WSGI worker's django.setup() must stay within the configured cold-start budget."""
+
+    def test_setup_within_budget(self):
+        report = profile_setup(wsgi=True)
+        self.assertLessEqual(len(report['modules']), settings.IMPORT_BUDGET_MODULES)
+        self.assertLessEqual(report['seconds'], settings.IMPORT_BUDGET_SECONDS)
+
+    def test_heavy_sdks_not_imported_at_setup(self):
+        report = profile_setup(wsgi=True, urls=True)
+        self.assertEqual(loaded_deferred_modules(report['modules']), [])
+        self.assertNotIn('twisted', {name.split('.')[0] for name in report['modules']})
+
+
+class MarketplaceLoadTestCase(TransactionTestCase):
+    """Synthetic data generation and the in-process load harness."""
+
+    def generate(self, seed=7):
+        return MarketplaceDataGenerator(seed=seed, scale=0.01, chunk_size=50).generate()
+
+    def test_generation_is_deterministic(self):
+        created = self.generate()
+        self.assertGreater(created['listings.Car'], 0)
+        self.assertGreater(created['listings.RentalOrder'] + created['listings.PurchaseOrder'], 0)
+        self.assertEqual(Car.objects.count(), created['listings.Car'])
+        self.assertEqual(Vehicle.objects.count(), sum(created[f'listings.{m}'] for m in ('Car', 'Bike', 'UAV', 'Boat', 'Plane')))
+        first = sorted(map(str, Listing.objects.values_list('uuid', flat=True)))
+
+        MarketplaceDataGenerator.purge()
+        self.assertFalse(Vehicle.objects.exists())
+        self.generate()
+        self.assertEqual(sorted(map(str, Listing.objects.values_list('uuid', flat=True))), first)
+
+    def test_inherited_rows_are_complete(self):
+        self.generate()
+        rental = RentalOrder.objects.select_related('customer__user', 'order_item').first()
+        self.assertIsNotNone(rental.rent_from)
+        self.assertEqual(rental.order_type, 'rental')
+        self.assertEqual(reconcile(), {'unbalanced_entries': [], 'mismatches': []})
+
+    def test_in_process_report(self):
+        self.generate()
+        scenarios = [s for s in SCENARIOS if s.name in ('listings.all', 'chat.rooms')]
+        report = run_load_test(scenarios=scenarios, requests=8, concurrency=2, warmup=0)
+        self.assertEqual(set(report['endpoints']), {'listings.all', 'chat.rooms'})
+        for row in report['endpoints'].values():
+            self.assertEqual(row['requests'], 8)
+            self.assertEqual(row['status_codes'], {'200': 8})
+            self.assertLessEqual(row['p50_ms'], row['p95_ms'])
+            self.assertLessEqual(row['p95_ms'], row['p99_ms'])
+            self.assertGreater(row['queries_per_request'], 0)
+
+        changes = diff_reports(report, report)
+        self.assertEqual(changes['listings.all']['p50_ms'][2], 0.0)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([5], 95), 5)
+
+
+class FakeSMSProvider(SMSProvider):
+    """Provider double that injects latency, exceptions and rejected numbers."""
+
+    def __init__(self, name, latency=0.0, fail=False, rejects=(), max_batch_size=1, max_concurrency=None):
+        self.name = name
+        self.latency = latency
+        self.fail = fail
+        self.rejects = set(rejects)
+        self.max_batch_size = max_batch_size
+        if max_concurrency:
+            self.max_concurrency = max_concurrency
+        self.calls = 0
+        self.batches = []
+        self.active = self.peak = 0
+        self._lock = threading.Lock()
+
+    def _request(self, recipients):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.latency)
+            if self.fail:
+                raise ConnectionError(f'{self.name} timed out')
+            return {
+                recipient: {'success': recipient not in self.rejects, 'provider': self.name,
+                            'message': 'Rejected' if recipient in self.rejects else 'Sent'}
+                for recipient in recipients
+            }
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def send_sms(self, message, recipient, **kwargs):
+        return self._request([recipient])[recipient]
+
+    def send_batch(self, message, recipients, **kwargs):
+        if self.max_batch_size == 1:
+            return super().send_batch(message, recipients, **kwargs)
+        self.batches.append(list(recipients))
+        return self._request(recipients)
+
+    def get_provider_name(self):
+        return self.name
+
+    def is_available(self):
+        return True
+
+
+@override_settings(SMS_BREAKER_FAILURE_THRESHOLD=3, SMS_BREAKER_RECOVERY_SECONDS=0.2, SMS_PROVIDER_ACQUIRE_TIMEOUT=0)
+class SMSRoutingTestCase(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_breaker_opens_and_skips_failing_provider(self):
+        down = FakeSMSProvider('Down', latency=0.02, fail=True)
+        manager = SMSProviderManager([down])
+        for _ in range(3):
+            self.assertFalse(manager.send_sms_with_fallback('hi', '+2348000000001')['success'])
+        self.assertEqual(manager.get_provider_status()['providers'][0]['breaker']['state'], 'open')
+
+        started = time.monotonic()
+        result = manager.send_sms_with_fallback('hi', '+2348000000001')
+        self.assertLess(time.monotonic() - started, 0.02)
+        self.assertEqual(result['message'], 'No SMS providers available')
+        self.assertEqual(down.calls, 3)
+
+    def test_half_open_probe_closes_breaker(self):
+        flaky = FakeSMSProvider('Flaky', fail=True)
+        manager = SMSProviderManager([flaky])
+        for _ in range(3):
+            manager.send_sms_with_fallback('hi', '+2348000000001')
+        time.sleep(0.25)
+        breaker = manager.breakers['Flaky']
+        self.assertEqual(breaker.state, 'half_open')
+        flaky.fail = False
+        self.assertTrue(manager.send_sms_with_fallback('hi', '+2348000000001')['success'])
+        self.assertEqual(breaker.state, 'closed')
+
+    def test_failed_probe_reopens_breaker(self):
+        manager = SMSProviderManager([FakeSMSProvider('Down', fail=True)])
+        breaker = manager.breakers['Down']
+        for _ in range(3):
+            breaker.record_failure()
+        time.sleep(0.25)
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.allow_request())  # one probe at a time
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+
+    def test_primary_follows_health_scores(self):
+        slow = FakeSMSProvider('Slow', latency=0.05)
+        fast = FakeSMSProvider('Fast', latency=0.001)
+        manager = SMSProviderManager([slow, fast])
+        self.assertEqual(manager.get_provider_status()['primary'], 'Slow')  # configured order breaks ties
+        for _ in range(4):
+            self.assertTrue(manager.send_sms_with_fallback('hi', '+2348000000001')['success'])
+        self.assertEqual(manager.get_provider_status()['primary'], 'Fast')
+        self.assertEqual(slow.calls, 1)
+
+        failing = FakeSMSProvider('Failing', fail=True)
+        manager = SMSProviderManager([failing, FakeSMSProvider('Backup')])
+        result = manager.send_sms_with_fallback('hi', '+2348000000001')
+        self.assertTrue(result['fallback_used'])
+        self.assertEqual(manager.get_provider_status()['primary'], 'Backup')
+
+    def test_concurrency_limit_spills_to_next_provider(self):
+        limited = FakeSMSProvider('Limited', latency=0.05, max_concurrency=2)
+        overflow = FakeSMSProvider('Overflow', latency=0.05)
+        manager = SMSProviderManager([limited, overflow])
+        threads = [
+            threading.Thread(target=manager.send_sms_with_fallback, args=('hi', '+2348000000001'))
+            for _ in range(6)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLessEqual(limited.peak, 2)
+        self.assertEqual(limited.calls + overflow.calls, 6)
+        self.assertGreater(overflow.calls, 0)
+
+    def test_bulk_send_batches_and_reroutes_rejections(self):
+        recipients = [f'+23480000000{i:02d}' for i in range(7)]
+        bulk = FakeSMSProvider('Bulk', max_batch_size=3, rejects={recipients[1]})
+        single = FakeSMSProvider('Single')
+        manager = SMSProviderManager([bulk, single])
+        response = manager.send_bulk_with_fallback('hi', recipients)
+        self.assertEqual([len(batch) for batch in bulk.batches], [3, 3, 1])
+        self.assertEqual(single.calls, 1)
+        self.assertEqual(response['delivered'], 7)
+        self.assertEqual(response['results'][recipients[1]]['provider'], 'Single')
+
+        with mock.patch('utils.sms_providers.sms_provider_manager', manager):
+            summary = send_bulk_sms('hi', ['08000000001', 'not-a-number'], fail_silently=True)
+        self.assertEqual(summary['successful_sends'], 1)
+        self.assertEqual(summary['failed_sends'], 1)
+
+
+class ExportTestCase(TestCase):
+
+    def setUp(self):
+        self.export_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.export_root, ignore_errors=True)
+        self.customer = Account.objects.create_user(email='buyer@example.com', password='testpass123', user_type='customer')
+        self.other = Account.objects.create_user(email='other@example.com', password='testpass123', user_type='customer')
+        self.dealer_user = Account.objects.create_user(email='dealer@example.com', password='testpass123', user_type='dealer')
+        self.staff = Account.objects.create_user(email='staff@example.com', password='testpass123', user_type='staff')
+        dealer = Dealership.objects.get(user=self.dealer_user)
+        car = Car.objects.create(dealer=dealer, name='Camry', brand='Toyota', color='Black')
+        listing = Listing.objects.create(vehicle=car, created_by=self.dealer_user, listing_type='sale', price=2500000, title='Toyota Camry')
+        self.order = Order.objects.create(customer=self.customer.customer_profile, order_type='sale', order_item=listing)
+        Order.objects.create(customer=self.other.customer_profile, order_type='sale', order_item=listing)
+
+        self.deposit = self.transact(self.customer, narration='Deposit', amount=1000)
+        self.transact(self.other, narration='Other deposit', amount=500)
+        # paid by card: no recipient wallet, linked through the order
+        self.card = Transaction.objects.create(type='payment', amount=2500000, related_order=self.order, narration='Card payment')
+        old = self.transact(self.customer, narration='Old deposit', amount=10)
+        Transaction.objects.filter(pk=old.pk).update(date_created=timezone.now() - timedelta(days=40))
+
+    def transact(self, user, **fields):
+        return Transaction.objects.create(recipient_wallet=Wallet.objects.get(user=user), type='deposit', **fields)
+
+    def export(self, user, dataset='transactions', **params):
+        self.client.force_login(user)
+        return self.client.get(f'/api/v1/exports/{dataset}/', params)
+
+    def rows(self, response):
+        self.assertEqual(response.status_code, 200)
+        return list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+    def test_scoped_by_role(self):
+        narrations = lambda user: {row['narration'] for row in self.rows(self.export(user))}
+        self.assertEqual(narrations(self.customer), {'Deposit', 'Card payment', 'Old deposit'})
+        self.assertEqual(narrations(self.other), {'Other deposit'})
+        self.assertEqual(narrations(self.dealer_user), {'Card payment'})
+        self.assertEqual(len(narrations(self.staff)), 4)
+
+        orders = self.rows(self.export(self.dealer_user, 'orders'))
+        self.assertEqual({row['customer_email'] for row in orders}, {'buyer@example.com', 'other@example.com'})
+        self.assertEqual([row['id'] for row in self.rows(self.export(self.customer, 'orders'))], [str(self.order.uuid)])
+
+    def test_columns_and_date_range(self):
+        today = timezone.localdate()
+        response = self.export(
+            self.customer, columns='narration,amount,date',
+            start_date=(today - timedelta(days=7)).isoformat(), end_date=today.isoformat(),
+        )
+        self.assertIn('attachment; filename="veyu-transactions-', response['Content-Disposition'])
+        rows = self.rows(response)
+        self.assertEqual(list(rows[0]), ['narration', 'amount', 'date'])
+        self.assertEqual([row['narration'] for row in rows], ['Deposit', 'Card payment'])
+        self.assertEqual(rows[0]['amount'], '1000.00')
+        self.assertEqual(datetime.fromisoformat(rows[0]['date']), self.deposit.date_created)
+
+        self.assertEqual(self.export(self.customer, columns='narration,secret').status_code, 400)
+        self.assertEqual(self.export(self.customer, start_date='yesterday').status_code, 400)
+        self.assertEqual(self.export(self.customer, 'wallets').status_code, 400)
+
+    def test_keyset_pages_cover_every_row(self):
+        export = Export('transactions', self.staff, columns=['narration'])
+        self.assertEqual(len(list(export.rows(chunk_size=1))), 4)
+        self.assertEqual(list(export.rows(chunk_size=3)), list(export.rows(chunk_size=100)))
+        with self.assertRaises(ExportError):
+            Export('transactions', self.staff, file_format='pdf')
+
+    def test_large_export_runs_as_job(self):
+        with override_settings(EXPORT_ROOT=self.export_root, EXPORT_SYNC_MAX_ROWS=2), \
+                mock.patch('utils.exports.start_job') as start_job, self.captureOnCommitCallbacks(execute=True):
+            response = self.export(self.staff, columns='narration')
+        self.assertEqual(response.status_code, 202)
+        job = ExportJob.objects.get(uuid=response.json()['data']['uuid'])
+        start_job.assert_called_once_with(job.pk)
+        self.assertEqual(self.client.get(f'/api/v1/exports/jobs/{job.uuid}/download/').status_code, 409)
+
+        with override_settings(EXPORT_ROOT=self.export_root):
+            [finished] = run_pending_jobs()
+        self.assertEqual((finished.status, finished.row_count), ('completed', 4))
+        data = self.client.get(f'/api/v1/exports/jobs/{job.uuid}/').json()['data']
+        self.assertEqual(data['download_url'], f'/api/v1/exports/jobs/{job.uuid}/download/')
+
+        download = self.client.get(data['download_url'])
+        self.assertEqual(download.status_code, 200)
+        self.assertEqual(b''.join(download.streaming_content).decode().splitlines()[0], 'narration')
+        # jobs belong to whoever asked for them
+        self.client.force_login(self.customer)
+        self.assertEqual(self.client.get(data['download_url']).status_code, 404)
+
+    def test_job_orphaned_by_a_dead_worker_is_run_again(self):
+        export = Export('transactions', self.staff, columns=['narration'])
+        long_ago = timezone.now() - timedelta(minutes=30)
+        orphan = ExportJob.objects.create(
+            user=self.staff, dataset='transactions', params=export.params,
+            status='running', started_at=long_ago, heartbeat_at=long_ago,
+        )
+        alive = ExportJob.objects.create(
+            user=self.staff, dataset='transactions', params=export.params,
+            status='running', started_at=timezone.now(), heartbeat_at=timezone.now(),
+        )
+        with override_settings(EXPORT_ROOT=self.export_root, EXPORT_JOB_STALE_MINUTES=10):
+            [finished] = run_pending_jobs()
+        self.assertEqual((finished.pk, finished.status, finished.row_count), (orphan.pk, 'completed', 4))
+        self.assertGreater(finished.started_at, long_ago)
+        alive.refresh_from_db()
+        self.assertEqual(alive.status, 'running')
+
+    def test_reclaimed_job_drops_the_stale_run(self):
+        job = ExportJob.objects.create(
+            user=self.staff, dataset='transactions', params={'columns': ['narration']},
+        )
+
+        def reclaimed(export, path, chunk_size=None):
+            # another worker takes the job over while this one is writing
+            ExportJob.objects.filter(pk=job.pk).update(started_at=timezone.now() + timedelta(seconds=1))
+            open(path, 'w').close()
+            return 4
+
+        with override_settings(EXPORT_ROOT=self.export_root), \
+                mock.patch('utils.exports.write_file', side_effect=reclaimed):
+            self.assertIsNone(run_job(job.pk))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.file_path), ('running', ''))
+        self.assertEqual(os.listdir(self.export_root), [])
+
+
+# synthetic uuid column per database vendor
+EXPORT_MEMORY_UUID_SQL = {
+    'sqlite': "printf('%%032x', n)",
+    'postgresql': "lpad(to_hex(n), 32, '0')::uuid",
+}
+
+
+@skipUnless(os.environ.get('RUN_EXPORT_MEMORY_TEST'), "set RUN_EXPORT_MEMORY_TEST=1 to run the 1M-row export")
+@skipUnless(connection.vendor in EXPORT_MEMORY_UUID_SQL, "no synthetic row generator for this database")
+class ExportMemoryTestCase(TestCase):
+    """Streaming an export keeps memory flat regardless of its size."""
+
+    ROWS = int(os.environ.get('EXPORT_MEMORY_TEST_ROWS', 1_000_000))
+    CEILING_BYTES = 16 * 1024 * 1024
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = Account.objects.create_user(email='finance@example.com', password='testpass123', user_type='staff')
+        now = timezone.now()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {Transaction._meta.db_table} "
+                "(uuid, date_created, last_updated, sender, recipient, amount, source, type, tx_ref, status, narration) "
+                "WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < %s) "
+                f"SELECT {EXPORT_MEMORY_UUID_SQL[connection.vendor]}, %s, %s, 'Veyu', 'Synthetic', n %% 100000 + 0.5, "
+                "'bank', 'deposit', 'TX' || n, 'completed', 'Synthetic deposit' FROM seq",
+                [cls.ROWS, now, now],
+            )
+
+    def test_memory_ceiling(self):
+        export = Export('transactions', self.staff)
+        rows = size = 0
+        tracemalloc.start()
+        try:
+            for line in stream_csv(export):
+                rows += 1
+                size += len(line)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(rows, self.ROWS + 1)
+        self.assertLess(peak, self.CEILING_BYTES, f"peak {peak / 2**20:.1f} MiB while writing {size / 2**20:.1f} MiB")
+
+
+@override_settings(METRICS_TOKEN='scrape-secret')
+class MetricsTestCase(TestCase):
+
+    def sample(self, name, **labels):
+        return metrics.REGISTRY.get_sample_value(name, labels) or 0
+
+    def scrape(self, **headers):
+        headers.setdefault('HTTP_AUTHORIZATION', 'Bearer scrape-secret')
+        response = self.client.get('/metrics', **headers)
+        return response, response.content.decode()
+
+    def test_scrape_reports_requests_queries_and_cache(self):
+        before = {
+            'requests': self.sample('http_request_duration_seconds_count', view='health_check', method='GET', status='200'),
+            'selects': self.sample('db_queries_total', alias='default', kind='select'),
+            'hits': self.sample('cache_requests_total', cache='default', result='hit'),
+            'misses': self.sample('cache_requests_total', cache='default', result='miss'),
+        }
+        self.client.get('/health/')
+        cache.set('metrics-test', 1)
+        self.assertEqual(cache.get('metrics-test'), 1)
+        self.assertEqual(cache.get('metrics-test-missing', 'fallback'), 'fallback')
+        self.assertEqual(cache.get_many(['metrics-test', 'metrics-test-missing']), {'metrics-test': 1})
+
+        response, text = self.scrape()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn('http_request_duration_seconds_bucket{le="0.005",method="GET",status="200",view="health_check"}', text)
+        self.assertEqual(
+            self.sample('http_request_duration_seconds_count', view='health_check', method='GET', status='200'),
+            before['requests'] + 1,
+        )
+        self.assertGreater(self.sample('db_queries_total', alias='default', kind='select'), before['selects'])
+        # the rate limiter reads the cache too, so only a lower bound is exact
+        self.assertGreaterEqual(self.sample('cache_requests_total', cache='default', result='hit'), before['hits'] + 2)
+        self.assertGreaterEqual(self.sample('cache_requests_total', cache='default', result='miss'), before['misses'] + 2)
+        self.assertIn('queue_depth{queue="exports"} 0.0', text)
+
+    def test_domain_counters_and_queues(self):
+        dealer_user = Account.objects.create_user(email='metrics-dealer@example.com', password='testpass123', user_type='dealer')
+        buyer = Account.objects.create_user(email='metrics-buyer@example.com', password='testpass123', user_type='customer')
+        car = Car.objects.create(dealer=Dealership.objects.get(user=dealer_user), name='Camry', brand='Toyota', color='Black')
+        listing = Listing.objects.create(vehicle=car, created_by=dealer_user, listing_type='sale', price=2500000)
+        before = self.sample('orders_created_total', order_type='sale')
+        PurchaseOrder.objects.create(customer=buyer.customer_profile, order_type='sale', order_item=listing)
+        self.assertEqual(self.sample('orders_created_total', order_type='sale'), before + 1)
+
+        jobs = metrics.counter('metrics_test_jobs_total', 'Jobs run in tests', ['kind'])
+        self.assertIs(metrics.counter('metrics_test_jobs_total', 'Jobs run in tests', ['kind']), jobs)
+        with self.assertRaises(ValueError):
+            metrics.gauge('metrics_test_jobs_total', 'Jobs run in tests', ['kind'])
+        jobs.labels('nightly').inc(3)
+        metrics.register_queue('metrics_test', lambda: 7)
+        self.addCleanup(metrics._queues.pop, 'metrics_test')
+
+        _, text = self.scrape()
+        self.assertIn('metrics_test_jobs_total{kind="nightly"} 3.0', text)
+        self.assertIn('queue_depth{queue="metrics_test"} 7.0', text)
+
+    def test_token_required_when_configured(self):
+        self.assertEqual(self.scrape(HTTP_AUTHORIZATION='')[0].status_code, 401)
+        self.assertEqual(self.scrape(HTTP_AUTHORIZATION='Bearer wrong')[0].status_code, 401)
+        self.assertEqual(self.scrape()[0].status_code, 200)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_closed_without_token_outside_debug(self):
+        self.assertEqual(self.scrape(HTTP_AUTHORIZATION='')[0].status_code, 401)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.scrape(HTTP_AUTHORIZATION='')[0].status_code, 200)
+
+    def test_multiprocess_samples_are_aggregated(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path, ignore_errors=True)
+        worker = (
+            "import sys\n"
+            "from prometheus_client import Counter\n"
+            "Counter('orders_created_total', 'Orders placed', ['order_type']).labels('rental').inc(int(sys.argv[1]))\n"
+        )
+        # two "workers" writing to the shared directory
+        for count in (2, 5):
+            subprocess.run(
+                [sys.executable, '-c', worker, str(count)], check=True,
+                env={**os.environ, 'PROMETHEUS_MULTIPROC_DIR': path},
+            )
+        text = metrics.render(path).decode()
+        self.assertIn('orders_created_total{order_type="rental"} 7.0', text)
+
+
+
+@override_settings(AUDIT_BUFFERED=False)
+class AuditLogTestCase(TestCase):
+
+    def setUp(self):
+        self.user = Account.objects.create_user(email='audit-user@example.com', password='testpass123', user_type='customer')
+
+    def record(self, count, stream='documents', **kwargs):
+        for i in range(count):
+            audit.record(stream, 'view', actor=self.user, obj=('inspections.inspectiondocument', i % 2), details={'n': i}, **kwargs)
+
+    def verify_command(self, *args):
+        out = io.StringIO()
+        call_command('verify_audit_log', *args, stdout=out)
+        return out.getvalue()
+
+    def test_events_are_chained(self):
+        self.record(3, ip_address='10.0.0.1')
+        events = list(AuditEvent.objects.filter(stream='documents').order_by('sequence'))
+        self.assertEqual([event.sequence for event in events], [1, 2, 3])
+        self.assertEqual(events[0].previous_hash, audit.GENESIS_HASH)
+        self.assertEqual(events[1].previous_hash, events[0].hash)
+        self.assertEqual(events[2].previous_hash, events[1].hash)
+        self.assertEqual((events[0].actor_email, events[0].ip_address), ('audit-user@example.com', '10.0.0.1'))
+        self.assertEqual(audit.verify('documents'), (3, None))
+        # streams are chained separately
+        self.record(1, stream='security')
+        self.assertEqual(AuditEvent.objects.get(stream='security').sequence, 1)
+
+    def test_events_cannot_be_changed_through_the_orm(self):
+        self.record(1)
+        event = AuditEvent.objects.get()
+        event.action = 'download'
+        with self.assertRaises(ValidationError):
+            event.save()
+        with self.assertRaises(ValidationError):
+            event.delete()
+
+    @override_settings(AUDIT_BUFFERED=True, AUDIT_BATCH_SIZE=3)
+    def test_events_are_buffered_until_flushed(self):
+        self.addCleanup(audit.flush)
+        self.record(2)
+        self.assertFalse(AuditEvent.objects.exists())
+        self.record(1)
+        self.assertEqual(AuditEvent.objects.count(), 3)
+        self.record(1)
+        self.assertEqual(audit.flush(), 1)
+        self.assertEqual(audit.verify('documents'), (4, None))
+
+    def test_failed_batch_stays_buffered(self):
+        with mock.patch('utils.audit._write', side_effect=RuntimeError('database down')):
+            self.record(2)
+        self.assertFalse(AuditEvent.objects.exists())
+        audit.record('documents', 'download', actor=self.user)
+        self.assertEqual(
+            list(AuditEvent.objects.order_by('sequence').values_list('action', flat=True)), ['view', 'view', 'download']
+        )
+        self.assertEqual(audit.verify('documents'), (3, None))
+
+    def test_verify_detects_edits_and_deletions(self):
+        self.record(5)
+        AuditEvent.objects.filter(stream='documents', sequence=2).update(action='download')
+        self.assertEqual(audit.verify('documents'), (1, audit.Break(2, "hash does not match the event's content")))
+
+        AuditEvent.objects.filter(stream='documents', sequence=2).update(action='view')
+        AuditEvent.objects.filter(stream='documents', sequence=3).delete()
+        checked, found = audit.verify('documents')
+        self.assertEqual((checked, found.sequence), (2, 3))
+
+        AuditEvent.objects.filter(stream='documents', sequence__gte=3).delete()
+        checked, found = audit.verify('documents')
+        self.assertEqual((checked, found.sequence), (2, 3))
+        self.assertIn('missing', found.reason)
+
+    def test_verify_command(self):
+        self.record(2)
+        self.record(1, stream='security')
+        output = self.verify_command()
+        self.assertIn('documents: 2 events, chain intact', output)
+        self.assertIn('security: 1 events, chain intact', output)
+
+        AuditEvent.objects.filter(stream='security').update(details={'n': 99})
+        self.assertIn('documents: 2 events, chain intact', self.verify_command('--stream', 'documents'))
+        with self.assertRaisesMessage(CommandError, 'security'):
+            self.verify_command()
+
+    def test_query_by_actor_object_action_and_time(self):
+        other = Account.objects.create_user(email='audit-other@example.com', password='testpass123', user_type='customer')
+        self.record(4)
+        audit.record('documents', 'download', actor=other, obj=('inspections.inspectiondocument', 1))
+        self.assertEqual(audit.events(actor=self.user).count(), 4)
+        self.assertEqual(audit.events(actor=other.pk).count(), 1)
+        self.assertEqual(audit.events(obj=('inspections.inspectiondocument', 1)).count(), 3)
+        self.assertEqual(audit.events(action='download').get().actor_email, 'audit-other@example.com')
+        self.assertEqual(audit.events(start=timezone.now() + timedelta(minutes=1)).count(), 0)
+        self.assertEqual(audit.events(stream='documents', end=timezone.now()).count(), 5)
+
+    def test_security_endpoints_are_recorded(self):
+        self.client.post('/api/v1/accounts/login/', {'email': 'audit-user@example.com', 'password': 'wrong'}, REMOTE_ADDR='10.1.2.3')
+        event = audit.events(stream='security').last()
+        self.assertIsNotNone(event)
+        self.assertEqual(event.ip_address, '10.1.2.3')
+        self.assertEqual(event.details['path'], '/api/v1/accounts/login/')
+        self.assertEqual(event.details['method'], 'POST')
+        self.client.get('/health/')
+        self.assertEqual(audit.events(stream='security').count(), 1)
+
+    def test_document_audit_trail(self):
+        car = Car.objects.create(name='Corolla', brand='Toyota', color='White')
+        document = InspectionDocument.objects.create(inspection=VehicleInspection.objects.create(vehicle=car, inspection_type='pre_purchase'))
+        DocumentAuditTrail.log_access(self.user, document, 'view', ip_address='10.0.0.2')
+        DocumentAuditTrail.log_modification(self.user, document, 'status_change', {'previous_status': 'draft'})
+        trail = DocumentAuditTrail.get_audit_trail(document)
+        self.assertEqual([entry['action'] for entry in trail], ['view', 'status_change'])
+        self.assertEqual(trail[0]['user'], 'audit-user@example.com')
+        self.assertEqual(trail[1]['details']['previous_status'], 'draft')
+        self.assertEqual(trail[1]['details']['inspection_id'], document.inspection_id)
+
+
+class OpenAPISchemaTestCase(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.schema, cls.problems = openapi.build()
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        overridden = override_settings(OPENAPI_SCHEMA_ROOT=self.root)
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+
+    def test_schema_builds_without_warnings(self):
+        self.assertEqual(self.problems, [])
+        self.assertNotIn('host', self.schema)
+        self.assertIn('/listings/offers/{listing_id}/', self.schema['paths'])
+        # filter parameters come from the FilterSet even where get_queryset needs a user
+        parameters = self.schema['paths']['/listings/my-orders/']['get']['parameters']
+        self.assertTrue(any(parameter['in'] == 'query' for parameter in parameters))
+
+    def test_artifact_is_served_with_etag_and_gzip(self):
+        artifact = openapi.write(self.schema)
+        self.assertEqual(openapi.versions(), [artifact.version])
+        self.assertEqual(openapi.write(self.schema).version, artifact.version)
+        self.assertEqual(openapi.current(), artifact)
+
+        response = self.client.get('/api/docs/swagger.json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), self.schema)
+        self.assertEqual(response['ETag'], f'"{artifact.version}"')
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertContains(self.client.get('/api/docs/'), '/api/docs/swagger.json')
+
+        response = self.client.get('/api/docs/swagger.json', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), artifact.body)
+        response = self.client.get('/api/docs/swagger.json', HTTP_IF_NONE_MATCH=f'"{artifact.version}"')
+        self.assertEqual((response.status_code, response.content), (304, b''))
+
+        # a new build is picked up without a restart
+        changed = {**self.schema, 'info': {**self.schema['info'], 'title': 'Changed'}}
+        self.assertNotEqual(openapi.write(changed).version, artifact.version)
+        response = self.client.get('/api/docs/swagger.json', HTTP_IF_NONE_MATCH=f'"{artifact.version}"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['info']['title'], 'Changed')
+
+    def test_missing_artifact_is_built_once_and_written(self):
+        openapi._cache.update(key=None, artifact=None)
+        with mock.patch.object(openapi, 'build', return_value=(self.schema, [])) as build:
+            artifact = openapi.current()
+            self.assertEqual(openapi.current(), artifact)
+            # a process that has not cached it reads what the first one wrote
+            openapi._cache.update(key=None, artifact=None)
+            self.assertEqual(openapi.current(), artifact)
+        build.assert_called_once_with()
+        self.assertEqual(openapi.versions(), [artifact.version])
+
+    def test_build_command(self):
+        out = io.StringIO()
+        call_command('build_openapi_schema', '--strict', stdout=out, stderr=io.StringIO())
+        self.assertIn('saved and serving', out.getvalue())
+        self.assertEqual(len(openapi.versions()), 1)
+
+    def test_diff(self):
+        old = {
+            'paths': {
+                '/cars/': {
+                    'get': {
+                        'parameters': [{'name': 'page', 'in': 'query', 'type': 'integer'}],
+                        'responses': {'200': {'schema': {'type': 'array', 'items': {'$ref': '#/definitions/Car'}}}},
+                    },
+                    'post': {'parameters': [{'name': 'data', 'in': 'body', 'schema': {'$ref': '#/definitions/Car'}}]},
+                },
+                '/cars/{id}/': {'delete': {'responses': {}}},
+            },
+            'definitions': {
+                'Car': {'type': 'object', 'required': ['brand'], 'properties': {
+                    'brand': {'type': 'string'}, 'price': {'type': 'string', 'format': 'decimal'}, 'color': {'type': 'string'},
+                }},
+                'Old': {'type': 'object'},
+            },
+        }
+        new = json.loads(json.dumps(old))
+        new['paths']['/cars/']['get']['parameters'] = [
+            {'name': 'page', 'in': 'query', 'type': 'string'}, {'name': 'city', 'in': 'query', 'type': 'string', 'required': True},
+            {'name': 'q', 'in': 'query', 'type': 'string'},
+        ]
+        del new['paths']['/cars/{id}/']
+        new['paths']['/bikes/'] = {'get': {'responses': {}}}
+        car = new['definitions']['Car']
+        car['properties']['price'] = {'type': 'number'}
+        del car['properties']['color']
+        car['properties']['year'] = {'type': 'integer'}
+        car['required'] = ['brand', 'year']
+        del new['definitions']['Old']
+
+        changes = {(change.location, change.message): change.breaking for change in openapi.diff(old, new)}
+        self.assertEqual(changes, {
+            ('GET /cars/ query parameter page', 'type changed from integer to string'): True,
+            ('GET /cars/ query parameter city', 'required parameter added'): True,
+            ('GET /cars/ query parameter q', 'optional parameter added'): False,
+            ('DELETE /cars/{id}/', 'operation removed'): True,
+            ('GET /bikes/', 'operation added'): False,
+            ('#/definitions/Car.price', 'type changed from string (decimal) to number'): True,
+            ('#/definitions/Car.color', 'field removed'): True,
+            ('#/definitions/Car.year', 'field added'): False,
+            ('#/definitions/Car.year', 'field is now required'): True,
+            ('#/definitions/Old', 'definition removed'): True,
+        })
+        self.assertEqual(openapi.diff(old, old), [])
+
+        old_path, new_path = os.path.join(self.root, 'old.json'), os.path.join(self.root, 'new.json')
+        for path, schema in ((old_path, old), (new_path, new)):
+            with open(path, 'w') as handle:
+                json.dump(schema, handle)
+        with self.assertRaisesMessage(CommandError, '10 changes, 7 breaking'):
+            call_command('diff_openapi_schema', old_path, new_path, stdout=io.StringIO())
+        out = io.StringIO()
+        call_command('diff_openapi_schema', old_path, new_path, '--allow-breaking', stdout=out)
+        self.assertIn('BREAKING #/definitions/Car.color: field removed', out.getvalue())
+        out = io.StringIO()
+        call_command('diff_openapi_schema', old_path, old_path, stdout=out)
+        self.assertIn('0 changes, 0 breaking', out.getvalue())
@@ -15,6 +15,7 @@ from .views import (
     system_health_check,
 )
 from .version_check import version_check
+from .export_views import ExportView, ExportJobListView, ExportJobView, ExportDownloadView
 
 
 
@@ -41,6 +42,12 @@ urlpatterns = [
     path('database/health/', database_health_check, name='database_health_check'),
     path('database/info/', database_info, name='database_info'),
     path('system/health/', system_health_check, name='system_health_check'),
+
+    # Bulk exports (streamed, or background jobs downloaded later)
+    path('exports/jobs/', ExportJobListView.as_view(), name='export_jobs'),
+    path('exports/jobs/<uuid:uuid>/', ExportJobView.as_view(), name='export_job'),
+    path('exports/jobs/<uuid:uuid>/download/', ExportDownloadView.as_view(), name='export_download'),
+    path('exports/<dataset>/', ExportView.as_view(), name='export'),
     
     path('<template>/', index_view, name='email'),
     # path('<room_name>/', chat_view, name='email'),
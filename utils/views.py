@@ -9,7 +9,10 @@ from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.conf import settings
 from django.shortcuts import render
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
 import os
+import re
 import logging
 
 from accounts.password_reset import validate_password_reset_token, reset_password_with_token
@@ -92,6 +95,31 @@ def health_check(request):
             'version': '1.0.0'
         }, status=503)
 
+_ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+
+@require_http_methods(["GET", "HEAD"])
+def openapi_schema(request):
+    """The pre-built OpenAPI schema (utils.openapi), with an ETag and gzipped when the client accepts it."""
+    from utils import openapi
+
+    artifact = openapi.current()
+    etag = f'"{artifact.version}"'
+    if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+    if etag in if_none_match or '*' in if_none_match:
+        response = HttpResponse(status=304)
+    elif _ACCEPTS_GZIP.search(request.headers.get('Accept-Encoding', '')):
+        response = HttpResponse(artifact.gzipped, content_type='application/json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(artifact.body, content_type='application/json')
+    response['ETag'] = etag
+    # cached, but checked against the ETag on every use so a deploy shows up at once
+    patch_cache_control(response, public=True, no_cache=True)
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+
 @csrf_exempt  
 @require_http_methods(["GET"])
 def root_handler(request):
@@ -193,6 +221,7 @@ def payment_webhook(request):
         return JsonResponse({'status': 'received'})
 
     try:
+        from django.db import transaction as db_transaction
         from wallet.models import Transaction
         from utils.simple_mail import send_simple_email
 
@@ -204,8 +233,13 @@ def payment_webhook(request):
         user = tx.sender_wallet.user if tx.sender_wallet else None
 
         if event == 'transfer.success':
-            tx.status = 'completed'
-            tx.save(update_fields=['status'])
+            # the pending withdrawal only held the funds; debit them now
+            # (apply_transaction is idempotent, so webhook retries are safe)
+            with db_transaction.atomic():
+                tx.status = 'completed'
+                tx.save(update_fields=['status'])
+                if tx.sender_wallet:
+                    tx.sender_wallet.apply_transaction(tx)
             logger.info(f"Withdrawal {reference} marked completed for {user and user.email}")
             if user:
                 send_simple_email(
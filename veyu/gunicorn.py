@@ -0,0 +1,31 @@
+"""
+Gunicorn settings: ``gunicorn -c python:veyu.gunicorn veyu.wsgi:application``.
+
+Command line flags still apply on top of these. The only thing configured
+here is multiprocess metrics: every worker writes its samples to files in
+PROMETHEUS_MULTIPROC_DIR so /metrics on any worker reports all of them.
+The variable must be set before prometheus_client is imported, which is
+why this module does not import it at the top.
+
+The OpenAPI schema is deliberately not built here: the Dockerfile bakes it
+into the image and workers only read it (utils.openapi), so booting stays
+within the cold-start budget.
+"""
+import os
+import shutil
+import tempfile
+
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'veyu-metrics'))
+
+
+def on_starting(server):
+    # samples from a previous master would otherwise be added to this one's
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -8,9 +8,6 @@ from datetime import timedelta
 from dotenv import load_dotenv
 from django.core.exceptions import ImproperlyConfigured
 import dj_database_url
-import cloudinary
-import cloudinary.uploader
-import cloudinary.api
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -152,6 +149,14 @@ JWT_ALLOW_REFRESH = True
 JWT_REFRESH_EXPIRATION_DELTA = timedelta(days=7)
 JWT_AUTH_COOKIE = None  # Disable cookie-based JWT for API security
 
+# Social Login
+# Google/Apple ID tokens are verified offline against cached provider JWKS.
+# Client IDs are comma separated (web, iOS and Android clients differ).
+GOOGLE_OAUTH_CLIENT_IDS = env.list('GOOGLE_OAUTH_CLIENT_IDS', default=[])
+APPLE_CLIENT_IDS = env.list('APPLE_CLIENT_IDS', default=[])
+OAUTH_JWKS_CACHE_TTL = env.int('OAUTH_JWKS_CACHE_TTL', default=3600)      # refresh key sets hourly
+OAUTH_JWKS_MAX_STALE = env.int('OAUTH_JWKS_MAX_STALE', default=86400)     # serve stale keys for up to a day if unreachable
+
 
 # Application definition
 
@@ -200,6 +205,16 @@ INSTALLED_APPS = [
     'cloudinary_storage',
 ]
 
+# daphne only overrides runserver for ASGI; WSGI workers (gunicorn) skip it to
+# avoid importing twisted at boot. veyu/wsgi.py sets VEYU_WSGI_WORKER.
+if env.bool('VEYU_WSGI_WORKER', False):
+    INSTALLED_APPS.remove('daphne')
+
+# Cold-start budget enforced by utils.tests.ImportBudgetTestCase and reported
+# by `manage.py importtime`.
+IMPORT_BUDGET_MODULES = env.int('IMPORT_BUDGET_MODULES', default=1500)
+IMPORT_BUDGET_SECONDS = float(env.get_value('IMPORT_BUDGET_SECONDS', default=4.0))
+
 SITE_ID = 1
 
 
@@ -207,6 +222,8 @@ AUTH_USER_MODEL = 'accounts.Account'
 SMS_API_KEY = env.get_value('AFRICAS_TALKING_API_KEY')
 
 MIDDLEWARE = [
+        # first, so request timings include the other middleware
+        'utils.metrics.MetricsMiddleware',
         'corsheaders.middleware.CorsMiddleware',
         'django.middleware.security.SecurityMiddleware',
         'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -302,6 +319,12 @@ if 'postgres' in DB_URL and not DEBUG:
 SWAGGER_SETTINGS = {
     'DEFAULT_INFO': 'veyu.urls.api_info',
     'USE_SESSION_AUTH': False,
+    # the UI loads the pre-built schema (utils.openapi) instead of generating it
+    'SPEC_URL': 'schema-json',
+    'DEFAULT_FILTER_INSPECTORS': [
+        'utils.openapi_inspectors.DjangoFilterInspector',
+        'drf_yasg.inspectors.CoreAPICompatInspector',
+    ],
     'SECURITY_DEFINITIONS': {
         'Bearer': {
             'type': 'apiKey',
@@ -311,6 +334,9 @@ SWAGGER_SETTINGS = {
         }
     },
 }
+REDOC_SETTINGS = {
+    'SPEC_URL': 'schema-json',
+}
 
 
 # Password validation
@@ -372,15 +398,8 @@ if CLOUDINARY_URL:
         'API_SECRET': api_secret,
         'SECURE': True,
     }
-    
-    # Initialize Cloudinary
-    import cloudinary
-    cloudinary.config(
-        cloud_name=cloud_name,
-        api_key=api_key,
-        api_secret=api_secret,
-        secure=True
-    )
+    # The SDK itself is configured on first use (cloudinary_storage and
+    # accounts.utils.document_storage), not at settings import.
 else:
     import logging as _logging
     _logging.getLogger(__name__).warning("CLOUDINARY_URL not set — media uploads will be unavailable")
@@ -407,6 +426,80 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 # Media files (user uploads)
 MEDIA_ROOT = BASE_DIR / 'uploads'
 
+# Bulk exports (utils.exports): larger exports run as background jobs whose
+# files are kept here until downloaded.
+EXPORT_ROOT = env.str('EXPORT_ROOT', default=str(BASE_DIR / 'exports'))
+EXPORT_SYNC_MAX_ROWS = env.int('EXPORT_SYNC_MAX_ROWS', default=50_000)
+EXPORT_CHUNK_SIZE = env.int('EXPORT_CHUNK_SIZE', default=2000)
+# A running job whose heartbeat is older than this lost its worker (a recycled
+# or killed web process) and is picked up again by the next worker.
+EXPORT_JOB_STALE_MINUTES = env.int('EXPORT_JOB_STALE_MINUTES', default=10)
+
+# Prometheus metrics (utils.metrics). /metrics requires
+# "Authorization: Bearer <METRICS_TOKEN>"; with no token set it is only served
+# when DEBUG is on. For gunicorn,
+# veyu/gunicorn.py sets PROMETHEUS_MULTIPROC_DIR so workers share samples.
+METRICS_ENABLED = env.bool('METRICS_ENABLED', default=True)
+METRICS_TOKEN = env.str('METRICS_TOKEN', default='')
+
+# Coupon rules are cached by code (listings.coupons); redemption always
+# re-checks the limits against the database.
+COUPON_CACHE_TIMEOUT = env.int('COUPON_CACHE_TIMEOUT', default=300)
+
+# Document retention jobs (inspections.retention). Stored files are deleted
+# through DOCUMENT_RETENTION_STORAGE, a dotted path to a class with a
+# storage-style delete(name); the default removes Cloudinary resources.
+DOCUMENT_RETENTION_STORAGE = env.str(
+    'DOCUMENT_RETENTION_STORAGE', default='inspections.retention.CloudinaryDocumentStorage'
+)
+DOCUMENT_RETENTION_BATCH_SIZE = env.int('DOCUMENT_RETENTION_BATCH_SIZE', default=1000)
+DOCUMENT_RETENTION_DELETE_WORKERS = env.int('DOCUMENT_RETENTION_DELETE_WORKERS', default=8)
+DOCUMENT_RETENTION_DELETE_RETRIES = env.int('DOCUMENT_RETENTION_DELETE_RETRIES', default=3)
+
+# Notification inbox retention (feedback.inbox.prune): read notifications
+# older than this are deleted in chunks by manage.py prune_notifications.
+NOTIFICATION_RETENTION_DAYS = env.int('NOTIFICATION_RETENTION_DAYS', default=90)
+NOTIFICATION_PRUNE_BATCH_SIZE = env.int('NOTIFICATION_PRUNE_BATCH_SIZE', default=5000)
+
+# Audit log (utils.audit): events are buffered in-process and written in
+# batches of AUDIT_BATCH_SIZE, after each request and at exit. With
+# AUDIT_BUFFERED off every event is written as it happens.
+AUDIT_BUFFERED = env.bool('AUDIT_BUFFERED', default=True)
+AUDIT_BATCH_SIZE = env.int('AUDIT_BATCH_SIZE', default=100)
+AUDIT_MAX_BUFFER = env.int('AUDIT_MAX_BUFFER', default=10_000)
+
+# Sealing of fully signed inspection PDFs (inspections.sealing). PEM files:
+# the signing key and the signing certificate followed by its chain. Seals
+# verify against DOCUMENT_SEAL_TRUST_FILE, or the chain's last certificate
+# when it is empty. Documents are not sealed while no key is configured.
+DOCUMENT_SEAL_KEY_FILE = env.str('DOCUMENT_SEAL_KEY_FILE', default='')
+DOCUMENT_SEAL_KEY_PASSWORD = env.str('DOCUMENT_SEAL_KEY_PASSWORD', default='')
+DOCUMENT_SEAL_CERTIFICATE_FILE = env.str('DOCUMENT_SEAL_CERTIFICATE_FILE', default='')
+DOCUMENT_SEAL_TRUST_FILE = env.str('DOCUMENT_SEAL_TRUST_FILE', default='')
+DOCUMENT_SEAL_MAX_UPLOAD = env.int('DOCUMENT_SEAL_MAX_UPLOAD', default=20 * 1024 * 1024)
+# seal checks per user (or IP address) on the public verification endpoint
+DOCUMENT_SEAL_VERIFY_RATE = env.str('DOCUMENT_SEAL_VERIFY_RATE', default='30/hour')
+
+# Test-drive reservations (listings.testdrives) hold their slot this long
+# for the customer to confirm; unconfirmed holds then free the slot.
+TESTDRIVE_HOLD_MINUTES = env.int('TESTDRIVE_HOLD_MINUTES', default=15)
+# unconfirmed holds one customer may have at a dealership at once, and
+# reservation requests per customer on the reserve endpoint
+TESTDRIVE_MAX_HOLDS = env.int('TESTDRIVE_MAX_HOLDS', default=3)
+TESTDRIVE_RESERVE_RATE = env.str('TESTDRIVE_RESERVE_RATE', default='20/hour')
+
+# Purchase offers (listings.offers) stay open this long for the other side
+# to answer; ``manage.py expire_offers`` closes the ones left unanswered.
+OFFER_EXPIRY_HOURS = env.int('OFFER_EXPIRY_HOURS', default=48)
+
+# Trade-in and listing valuation models (listings.valuation) are stored in
+# the database; each process checks this often whether a new one is current.
+VALUATION_MODEL_CHECK_SECONDS = env.int('VALUATION_MODEL_CHECK_SECONDS', default=60)
+
+# Pre-built OpenAPI schemas (utils.openapi); ``manage.py build_openapi_schema``
+# writes one when the image is built and /api/docs/swagger.json serves it.
+OPENAPI_SCHEMA_ROOT = env.str('OPENAPI_SCHEMA_ROOT', default=str(BASE_DIR / 'openapi'))
+
 # Create directories if they don't exist
 os.makedirs(STATIC_ROOT, exist_ok=True)
 os.makedirs(MEDIA_ROOT, exist_ok=True)
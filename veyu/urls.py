@@ -17,7 +17,8 @@ from drf_yasg import openapi
 from rest_framework.authentication import BasicAuthentication, SessionAuthentication
 from rest_framework import permissions
 from utils.admin import veyu_admin
-from utils.views import health_check, password_reset_form
+from utils.metrics import metrics_view
+from utils.views import health_check, openapi_schema, password_reset_form
 import logging
 
 logger = logging.getLogger(__name__)
@@ -52,6 +53,7 @@ except Exception as e:
 urlpatterns = [
     # Health check for Railway
     path('health/', health_check, name='health_check'),
+    path('metrics', metrics_view, name='metrics'),
     
     # Admin
     path('admin/', veyu_admin.urls, name='admin'),
@@ -59,7 +61,7 @@ urlpatterns = [
 
     # Api Documetation
     path('api/docs/', schema_view.with_ui('swagger', cache_timeout=0) if schema_view else health_check, name='schema-swagger-ui'),  # Swagger UI
-    path('api/docs/swagger.json', schema_view.without_ui(cache_timeout=0) if schema_view else health_check, name='schema-json'),  # JSON schema
+    path('api/docs/swagger.json', openapi_schema, name='schema-json'),  # pre-built JSON schema (utils.openapi)
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0) if schema_view else health_check, name='schema-redoc'),  # Redoc UI
 
     # API Endpoints
@@ -22,6 +22,8 @@ sys.path.insert(0, str(BASE_DIR))
 
 # Set Django settings module
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'veyu.railway_settings')
+# WSGI workers don't serve websockets; lets settings drop ASGI-only apps
+os.environ.setdefault('VEYU_WSGI_WORKER', 'True')
 
 try:
     from django.core.wsgi import get_wsgi_application
@@ -1,10 +1,12 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.db import transaction as db_transaction
 from django.utils.html import format_html
 from django.db.models import Sum, Count, Q
 from django.utils import timezone
 from datetime import timedelta
 from decimal import Decimal, InvalidOperation
-from .models import Wallet, Transaction
+from . import ledger
+from .models import Wallet, Transaction, LedgerAccount, JournalEntry, Posting
 from utils.admin import veyu_admin
 
 
@@ -69,30 +71,41 @@ class WalletAdmin(admin.ModelAdmin):
                 diff = new_balance - old_balance
 
                 if diff != 0:
-                    # Save the new balance first
-                    super().save_model(request, obj, form, change)
-
-                    # Create audit transaction
-                    tx_type = 'adjustment'
+                    # Balances only move through the ledger: keep the stored
+                    # balance and post the difference as an adjustment entry
+                    obj.ledger_balance = original.ledger_balance
                     narration = (
                         f"Admin balance adjustment by {request.user.email}: "
                         f"{'increased' if diff > 0 else 'decreased'} by ₦{abs(diff):,.2f} "
                         f"(₦{old_balance:,.2f} → ₦{new_balance:,.2f})"
                     )
-                    transaction = Transaction.objects.create(
-                        sender=request.user.email,
-                        recipient=obj.user.email,
-                        recipient_wallet=obj,
-                        type=tx_type,
-                        amount=abs(diff),
-                        status='completed',
-                        narration=narration,
-                        source='wallet',
-                    )
-                    obj.transactions.add(transaction)
+                    try:
+                        with db_transaction.atomic():
+                            super().save_model(request, obj, form, change)
+
+                            # Create audit transaction
+                            transaction = Transaction.objects.create(
+                                sender=request.user.email,
+                                recipient=obj.user.email,
+                                recipient_wallet=obj,
+                                type='adjustment',
+                                amount=abs(diff),
+                                status='completed',
+                                narration=narration,
+                                source='wallet',
+                            )
+                            ledger.adjust(obj, diff, narration=narration, transaction=transaction)
+                            obj.transactions.add(transaction)
+                    except ledger.InsufficientFunds:
+                        self.message_user(
+                            request,
+                            f"Balance cannot be reduced below the held amount (₦{obj.held_amount:,.2f}).",
+                            level=messages.ERROR,
+                        )
+                        return
                     self.message_user(
                         request,
-                        f"Balance updated from ₦{old_balance:,.2f} to ₦{new_balance:,.2f}. "
+                        f"Balance updated from ₦{old_balance:,.2f} to ₦{obj.ledger_balance:,.2f}. "
                         f"Adjustment transaction #{transaction.id} created.",
                     )
                     return
@@ -327,3 +340,48 @@ class TransactionAdmin(admin.ModelAdmin):
         updated = queryset.filter(status='pending').update(status='failed')
         self.message_user(request, f'{updated} transaction(s) marked as failed.')
     mark_as_failed.short_description = 'Mark selected as failed'
+
+
+class PostingInline(admin.TabularInline):
+    model = Posting
+    fields = ['account', 'amount']
+    readonly_fields = ['account', 'amount']
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(JournalEntry, site=veyu_admin)
+class JournalEntryAdmin(admin.ModelAdmin):
+    """Ledger entries are append-only; corrections are new adjustment entries."""
+    list_display = ['id', 'kind', 'reference', 'narration', 'transaction', 'date_created']
+    list_filter = ['kind', 'date_created']
+    search_fields = ['reference', 'narration', 'postings__account__code']
+    readonly_fields = ['kind', 'reference', 'narration', 'transaction', 'date_created']
+    inlines = [PostingInline]
+    ordering = ['-date_created']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(LedgerAccount, site=veyu_admin)
+class LedgerAccountAdmin(admin.ModelAdmin):
+    list_display = ['code', 'account_type', 'currency', 'wallet', 'posted_balance']
+    list_filter = ['account_type', 'currency']
+    search_fields = ['code', 'wallet__user__email']
+    readonly_fields = ['code', 'account_type', 'currency', 'wallet']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
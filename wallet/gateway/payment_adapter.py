@@ -4,6 +4,7 @@ from .payment_gateway import PaymentGateway
 from decouple import config
 from decimal import Decimal
 from django.conf import settings
+from utils import metrics
 
 
 class WalletPaymentAdapter(PaymentGateway):
@@ -16,41 +17,43 @@ class WalletPaymentAdapter(PaymentGateway):
             message, status = wallet_provider.w2w_transfer(25000) 
         """
 
-        # check balance
-        if amount <= (src_wallet.balance + self.get_transfer_fees(amount)):
-            transfer_out = Transaction(
-                recipient=dst_wallet.user.name,
-                sender=src_wallet.user.name,
-                sender_wallet=src_wallet,
-                source='wallet',
-                type='transfer_out',
-                recipient_wallet=dst_wallet,
-                tx_ref='',
-                status='completed',
-                amount=amount,
-            )
-            transfer_in = Transaction(
-                recipient=dst_wallet.user.name,
-                sender=src_wallet.user.name,
-                sender_wallet=src_wallet,
-                source='wallet',
-                type='transfer_in',
-                recipient_wallet=dst_wallet,
-                tx_ref='',
-                status='completed',
-                amount=amount,
-            )
-            if kwargs.get('related_order', False):
-                transfer_in.related_order = kwargs['related_order']
-                transfer_out.related_order = kwargs['related_order']
-                transfer_in.save()
-                transfer_out.save()
-                
-            dst_wallet.apply_transaction(transfer_in)
-            src_wallet.apply_transaction(transfer_out)
+        from django.db import transaction
+        from wallet import ledger
+        from wallet.models import Transaction
 
-        else:
+        # the balance is checked by the ledger while both wallets are locked
+        try:
+            with transaction.atomic():
+                transfer_out = Transaction.objects.create(
+                    recipient=dst_wallet.user.name,
+                    sender=src_wallet.user.name,
+                    sender_wallet=src_wallet,
+                    source='wallet',
+                    type='transfer_out',
+                    recipient_wallet=dst_wallet,
+                    tx_ref='',
+                    status='completed',
+                    amount=amount,
+                    related_order=kwargs.get('related_order'),
+                )
+                transfer_in = Transaction.objects.create(
+                    recipient=dst_wallet.user.name,
+                    sender=src_wallet.user.name,
+                    sender_wallet=src_wallet,
+                    source='wallet',
+                    type='transfer_in',
+                    recipient_wallet=dst_wallet,
+                    tx_ref='',
+                    status='completed',
+                    amount=amount,
+                    related_order=kwargs.get('related_order'),
+                )
+                ledger.transfer(src_wallet, dst_wallet, amount, transaction=transfer_out)
+                src_wallet.transactions.add(transfer_out)
+                dst_wallet.transactions.add(transfer_in)
+        except ledger.InsufficientFunds:
             return ("Error", False)
+        return ("Success", True)
 
     def get_conv_rate(self, pair:tuple) -> tuple:
         """
@@ -133,10 +136,13 @@ class FlutterwaveAdapter(PaymentGateway):
             response = requests.get(f'https://api.flutterwave.com/v3/transactions/{transaction_id}/verify', headers=headers)
             response_data = response.json()
 
-            if response_data['status'] == 'success':
+            verified = response_data['status'] == 'success'
+            metrics.record_payment_verification('flutterwave', 'verified' if verified else 'failed')
+            if verified:
                 return response_data
 
         except requests.exceptions.RequestException as e:
+            metrics.record_payment_verification('flutterwave', 'error')
             print(e)
             print(e.response.text if e.response else "No response text available.")
 
@@ -323,9 +329,12 @@ class PaystackAdapter(PaymentGateway):
     def verify_transaction(self, reference):
         try:
             verified_data = self.client.transaction.verify(reference)
-            return verified_data
         except Exception as error:
+            metrics.record_payment_verification('paystack', 'error')
             return {'status': 'error', 'message': str(error)}
+        verified = bool(verified_data.get('status')) and (verified_data.get('data') or {}).get('status') == 'success'
+        metrics.record_payment_verification('paystack', 'verified' if verified else 'failed')
+        return verified_data
 
 
     def get_banks(self, country="nigeria"):
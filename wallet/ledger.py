@@ -0,0 +1,259 @@
+"""
+Double-entry ledger for wallet balances.
+
+Every money movement is a ``JournalEntry`` whose ``Posting`` rows sum to
+zero: a deposit credits the user's wallet account and debits ``funding``,
+a wallet payment debits the wallet and credits ``escrow``, a revenue split
+moves escrow to the dealer's wallet and ``platform_fee``, and so on.
+
+``Wallet.ledger_balance`` is kept as a cached copy of the wallet account's
+postings so reads stay cheap; it is only ever changed here, inside the
+same database transaction that writes the postings, with the wallet rows
+locked in primary-key order. Debits use a conditional update, so a wallet
+can never go below its held (locked/pending) amount even when two workers
+debit it at once. System accounts have no row to lock and may go negative
+(``funding`` is negative by everything ever paid in).
+
+``reconcile()`` compares the cached balances against the postings.
+"""
+import logging
+import random
+import time
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.core.exceptions import ValidationError
+from django.db import OperationalError, connection, transaction as db_transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from wallet.models import JournalEntry, LedgerAccount, Posting, Transaction, Wallet
+
+logger = logging.getLogger(__name__)
+
+CENT = Decimal('0.01')
+MAX_RETRIES = 50
+
+SYSTEM_ACCOUNTS = ('funding', 'escrow', 'platform_fee', 'payout', 'adjustment')
+
+# Transaction.type -> (entry kind, counter account, whether the wallet is debited)
+TRANSACTION_ENTRIES = {
+    'deposit': ('deposit', 'funding', False),
+    'adjustment': ('adjustment', 'adjustment', False),
+    'transfer_in': ('transfer', 'escrow', False),
+    'transfer_out': ('transfer', 'escrow', True),
+    'payment': ('payment', 'escrow', True),
+    'charge': ('charge', 'platform_fee', True),
+    'withdraw': ('withdrawal', 'payout', True),
+}
+
+
+class InsufficientFunds(ValidationError):
+    """A debit would take a wallet below its held amount."""
+
+
+class UnbalancedEntry(ValueError):
+    """The postings of an entry do not sum to zero."""
+
+
+def to_amount(value):
+    return Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def system_account(kind, currency='NGN'):
+    if kind not in SYSTEM_ACCOUNTS:
+        raise ValueError(f"Unknown system account {kind!r}")
+    account, _ = LedgerAccount.objects.get_or_create(
+        code=f'{kind}:{currency}', defaults={'account_type': kind, 'currency': currency}
+    )
+    return account
+
+
+def wallet_account(wallet):
+    account, _ = LedgerAccount.objects.get_or_create(
+        code=f'wallet:{wallet.pk}',
+        defaults={'account_type': 'wallet', 'wallet': wallet, 'currency': wallet.currency},
+    )
+    return account
+
+
+def _resolve(target, currency):
+    if isinstance(target, LedgerAccount):
+        return target
+    if isinstance(target, Wallet):
+        return wallet_account(target)
+    return system_account(target, currency)
+
+
+def _held_amount(wallet_id):
+    held = Transaction.objects.filter(
+        wallet_transactions=wallet_id, status__in=['locked', 'pending']
+    ).aggregate(total=Sum('amount'))['total']
+    return held or Decimal('0.00')
+
+
+def _normalize(lines):
+    """Quantize amounts, merge lines on the same account and check the entry balances."""
+    merged = {}
+    for target, amount in lines:
+        key = target.pk if isinstance(target, (Wallet, LedgerAccount)) else target
+        key = (type(target).__name__, key)
+        previous = merged.get(key, (target, Decimal('0.00')))[1]
+        merged[key] = (target, previous + to_amount(amount))
+    normalized = [(target, amount) for target, amount in merged.values() if amount]
+    total = sum((amount for _, amount in normalized), Decimal('0.00'))
+    if total != 0:
+        raise UnbalancedEntry(f"Postings sum to {total}, not zero")
+    if not normalized:
+        raise UnbalancedEntry("An entry needs at least one non-zero posting")
+    return normalized
+
+
+def _in_transaction(func):
+    """
+    Run ``func`` atomically. Lock contention (SQLite's "database is locked")
+    is retried with backoff when we own the transaction; inside a caller's
+    atomic block the error is raised so the caller's transaction rolls back.
+    """
+    if connection.in_atomic_block:
+        with db_transaction.atomic():
+            return func()
+    for attempt in range(MAX_RETRIES):
+        try:
+            with db_transaction.atomic():
+                return func()
+        except OperationalError:
+            if attempt == MAX_RETRIES - 1:
+                raise
+            time.sleep(random.uniform(0.001, 0.01) * (attempt + 1))
+
+
+def post_entry(kind, lines, narration='', reference=None, transaction=None, currency='NGN'):
+    """
+    Write one balanced journal entry.
+
+    ``lines`` is a list of ``(target, amount)`` where target is a ``Wallet``,
+    a ``LedgerAccount`` or a system account name, and amount is signed
+    (credit positive, debit negative). Raises ``UnbalancedEntry`` if the
+    amounts do not sum to zero and ``InsufficientFunds`` if a wallet would
+    be debited below its held amount; nothing is written in either case.
+    Wallet instances passed in have their ``ledger_balance`` refreshed.
+    """
+    lines = _normalize(lines)
+
+    def _post():
+        if reference:
+            existing = JournalEntry.objects.filter(reference=reference).first()
+            if existing:
+                return existing
+
+        postings = [(_resolve(target, currency), amount) for target, amount in lines]
+        wallet_ids = sorted({account.wallet_id for account, _ in postings if account.wallet_id})
+        # lock every wallet up front, always in pk order, so two entries
+        # touching the same wallets cannot deadlock
+        list(Wallet.objects.select_for_update().filter(pk__in=wallet_ids).order_by('pk').values_list('pk', flat=True))
+
+        now = timezone.now()
+        for account, amount in sorted(postings, key=lambda posting: posting[0].wallet_id or 0):
+            if not account.wallet_id:
+                continue
+            wallets = Wallet.objects.filter(pk=account.wallet_id)
+            if amount < 0:
+                required = -amount + _held_amount(account.wallet_id)
+                wallets = wallets.filter(ledger_balance__gte=required)
+            if not wallets.update(ledger_balance=F('ledger_balance') + amount, last_updated=now):
+                raise InsufficientFunds("Insufficient funds to complete this transaction.")
+
+        entry = JournalEntry.objects.create(
+            kind=kind, reference=reference, narration=(narration or '')[:200], transaction=transaction
+        )
+        Posting.objects.bulk_create([
+            Posting(entry=entry, account=account, amount=amount) for account, amount in postings
+        ])
+
+        balances = dict(Wallet.objects.filter(pk__in=wallet_ids).values_list('pk', 'ledger_balance'))
+        for target, _ in lines:
+            if isinstance(target, Wallet):
+                target.ledger_balance = balances[target.pk]
+        return entry
+
+    return _in_transaction(_post)
+
+
+def deposit(wallet, amount, **kwargs):
+    """Money paid in from outside (card, bank transfer, ...)."""
+    return post_entry('deposit', [(wallet, amount), ('funding', -to_amount(amount))], currency=wallet.currency, **kwargs)
+
+
+def transfer(sender, recipient, amount, **kwargs):
+    """Wallet to wallet."""
+    return post_entry('transfer', [(sender, -to_amount(amount)), (recipient, amount)], currency=sender.currency, **kwargs)
+
+
+def pay(wallet, amount, to='escrow', kind='payment', **kwargs):
+    """Debit a wallet in favour of a system account (escrow by default)."""
+    return post_entry(kind, [(wallet, -to_amount(amount)), (to, amount)], currency=wallet.currency, **kwargs)
+
+
+def withdraw(wallet, amount, **kwargs):
+    """Money leaving to a bank account."""
+    return pay(wallet, amount, to='payout', kind='withdrawal', **kwargs)
+
+
+def adjust(wallet, amount, **kwargs):
+    """Signed manual correction against the adjustment account."""
+    return post_entry('adjustment', [(wallet, amount), ('adjustment', -to_amount(amount))], currency=wallet.currency, **kwargs)
+
+
+def record_transaction(wallet, trans):
+    """
+    Post the entry for a single-sided ``Transaction`` applied to ``wallet``
+    (see ``Wallet.apply_transaction``). Applying the same transaction to the
+    same wallet twice only posts once.
+    """
+    if trans.type not in TRANSACTION_ENTRIES:
+        raise ValueError(f"Cannot post transaction type {trans.type!r}")
+    kind, counter, debit = TRANSACTION_ENTRIES[trans.type]
+    amount = to_amount(trans.amount)
+    if debit:
+        amount = -amount
+    return post_entry(
+        kind, [(wallet, amount), (counter, -amount)],
+        narration=trans.narration, reference=f'tx:{trans.pk}:{wallet.pk}',
+        transaction=trans, currency=wallet.currency,
+    )
+
+
+def posted_balances():
+    """{wallet_id: sum of postings} for every wallet with a ledger account."""
+    return dict(
+        LedgerAccount.objects.filter(wallet__isnull=False)
+        .annotate(total=Coalesce(Sum('postings__amount'), Decimal('0.00')))
+        .values_list('wallet_id', 'total')
+    )
+
+
+def reconcile(fix=False):
+    """
+    Compare each wallet's cached ``ledger_balance`` with its postings.
+
+    Returns ``{'unbalanced_entries': [...], 'mismatches': [(wallet_id, cached, posted)]}``.
+    With ``fix=True`` mismatched wallets are reset to their posted balance
+    (postings are the source of truth).
+    """
+    unbalanced = list(
+        JournalEntry.objects.annotate(total=Sum('postings__amount'))
+        .exclude(total=0).values_list('pk', flat=True)
+    )
+    posted = posted_balances()
+    mismatches = []
+    for wallet_id, cached in Wallet.objects.values_list('pk', 'ledger_balance').iterator():
+        expected = posted.get(wallet_id, Decimal('0.00'))
+        if to_amount(cached) != to_amount(expected):
+            mismatches.append((wallet_id, to_amount(cached), to_amount(expected)))
+
+    if fix:
+        for wallet_id, _, expected in mismatches:
+            Wallet.objects.filter(pk=wallet_id).update(ledger_balance=expected, last_updated=timezone.now())
+            logger.warning(f"Wallet {wallet_id} ledger_balance reset to posted balance {expected}")
+    return {'unbalanced_entries': unbalanced, 'mismatches': mismatches}
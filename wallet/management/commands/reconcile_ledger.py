@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from wallet.ledger import reconcile
+
+
+class Command(BaseCommand):
+    help = "Check wallet balances against ledger postings and report unbalanced journal entries."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Reset mismatched wallets to their posted balance')
+
+    def handle(self, *args, **options):
+        result = reconcile(fix=options['fix'])
+
+        for entry_id in result['unbalanced_entries']:
+            self.stdout.write(self.style.ERROR(f"Journal entry #{entry_id} does not balance"))
+        for wallet_id, cached, posted in result['mismatches']:
+            self.stdout.write(self.style.WARNING(
+                f"Wallet #{wallet_id}: ledger_balance {cached:,.2f} != postings {posted:,.2f}"
+                + (" (fixed)" if options['fix'] else "")
+            ))
+
+        if not result['unbalanced_entries'] and not result['mismatches']:
+            self.stdout.write(self.style.SUCCESS("Ledger reconciled: all wallets match their postings."))
+        else:
+            self.stdout.write(
+                f"{len(result['unbalanced_entries'])} unbalanced entries, "
+                f"{len(result['mismatches'])} wallet mismatches."
+            )
@@ -0,0 +1,117 @@
+# Generated by Django 5.1.1 on 2026-10-18 21:46
+
+import django.db.models.deletion
+import utils
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def post_opening_balances(apps, schema_editor):
+    """Give every wallet with a balance an opening entry against funding."""
+    Wallet = apps.get_model('wallet', 'Wallet')
+    LedgerAccount = apps.get_model('wallet', 'LedgerAccount')
+    JournalEntry = apps.get_model('wallet', 'JournalEntry')
+    Posting = apps.get_model('wallet', 'Posting')
+    funding = {}
+    wallets = Wallet.objects.exclude(ledger_balance=0).values_list('id', 'ledger_balance', 'currency')
+    for wallet_id, balance, currency in wallets.iterator(chunk_size=2000):
+        if currency not in funding:
+            funding[currency], _ = LedgerAccount.objects.get_or_create(
+                code=f'funding:{currency}', defaults={'account_type': 'funding', 'currency': currency}
+            )
+        account, _ = LedgerAccount.objects.get_or_create(
+            code=f'wallet:{wallet_id}',
+            defaults={'account_type': 'wallet', 'wallet_id': wallet_id, 'currency': currency},
+        )
+        entry = JournalEntry.objects.create(
+            kind='opening', reference=f'opening:{wallet_id}', narration='Opening balance'
+        )
+        balance = Decimal(str(balance))
+        Posting.objects.bulk_create([
+            Posting(entry=entry, account=account, amount=balance),
+            Posting(entry=entry, account=funding[currency], amount=-balance),
+        ])
+
+
+def remove_opening_balances(apps, schema_editor):
+    JournalEntry = apps.get_model('wallet', 'JournalEntry')
+    JournalEntry.objects.filter(kind='opening').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0004_add_adjustment_transaction_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JournalEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(blank=True, default=utils.make_UUID)),
+                ('date_created', models.DateTimeField(auto_now=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('kind', models.CharField(choices=[('opening', 'Opening Balance'), ('deposit', 'Deposit'), ('transfer', 'Transfer'), ('payment', 'Payment'), ('charge', 'Charge'), ('withdrawal', 'Withdrawal'), ('revenue_share', 'Revenue Share'), ('adjustment', 'Adjustment')], max_length=20)),
+                ('reference', models.CharField(blank=True, max_length=100, null=True, unique=True)),
+                ('narration', models.CharField(blank=True, default='', max_length=200)),
+                ('transaction', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='journal_entries', to='wallet.transaction')),
+            ],
+            options={
+                'verbose_name': 'Journal Entry',
+                'verbose_name_plural': 'Journal Entries',
+                'ordering': ['-date_created'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LedgerAccount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(blank=True, default=utils.make_UUID)),
+                ('date_created', models.DateTimeField(auto_now=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('code', models.CharField(max_length=100, unique=True)),
+                ('account_type', models.CharField(choices=[('wallet', 'User Wallet'), ('funding', 'Funding'), ('escrow', 'Escrow'), ('platform_fee', 'Platform Fees'), ('payout', 'Payouts'), ('adjustment', 'Adjustments')], max_length=20)),
+                ('currency', models.CharField(default='NGN', max_length=4)),
+                ('wallet', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_account', to='wallet.wallet')),
+            ],
+            options={
+                'verbose_name': 'Ledger Account',
+                'verbose_name_plural': 'Ledger Accounts',
+            },
+        ),
+        migrations.CreateModel(
+            name='Posting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(blank=True, default=utils.make_UUID)),
+                ('date_created', models.DateTimeField(auto_now=True)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='postings', to='wallet.ledgeraccount')),
+                ('entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='wallet.journalentry')),
+            ],
+            options={
+                'verbose_name': 'Posting',
+                'verbose_name_plural': 'Postings',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='journalentry',
+            index=models.Index(fields=['kind'], name='wallet_jour_kind_552131_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='journalentry',
+            index=models.Index(fields=['date_created'], name='wallet_jour_date_cr_9502b4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ledgeraccount',
+            index=models.Index(fields=['account_type'], name='wallet_ledg_account_3d3519_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='posting',
+            index=models.Index(fields=['account'], name='wallet_post_account_f153b2_idx'),
+        ),
+        migrations.RunPython(post_opening_balances, remove_opening_balances),
+    ]
@@ -23,24 +23,19 @@ class Wallet(DbModel):
     def balance(self):
         # if there are locked transactions (ie awaiting escrow action)
         # do not allow the user withdraw funds from those transactions
-        # return ledger balance for now
-        amt = Decimal(str(self.ledger_balance))
-        locked_trans = self.transactions.filter(status__in=['locked', 'pending', ])
-        for trans in locked_trans:
-            amt -= trans.amount
-        return amt
+        return Decimal(str(self.ledger_balance)) - self.held_amount
+
+    @property
+    def held_amount(self):
+        """Sum of this wallet's locked and pending transactions"""
+        held = self.transactions.filter(status__in=['locked', 'pending', ]).aggregate(total=models.Sum('amount'))['total']
+        return held or Decimal('0.00')
 
     def apply_transaction(self, trans):
-        # Ensure ledger_balance is Decimal
-        if not isinstance(self.ledger_balance, Decimal):
-            self.ledger_balance = Decimal(str(self.ledger_balance))
-            
-        if trans.type in ['payment', 'charge', 'transfer_out', 'withdraw']:
-            self.ledger_balance -= trans.amount
-        elif trans.type in ['transfer_in', 'deposit', 'adjustment']:
-            self.ledger_balance += trans.amount
+        # balances only move through the ledger; see wallet.ledger.record_transaction
+        from wallet import ledger
+        ledger.record_transaction(self, trans)
         self.transactions.add(trans)
-        self.save()
         return f'{trans.amount} processed for {self.user} wallet'
 
     def set_pin(self, raw_pin):
@@ -62,42 +57,39 @@ class Wallet(DbModel):
     def transfer(self, amount, recipient_wallet, narration=None):
         # for use between wallets
         # e.g paying for a car rental from your wallet
-        if self.balance >= amount:
-            with transaction.atomic():
-                sender_transaction =  Transaction.objects.create(
-                    sender=self.user.name,
-                    sender_wallet=self,
-                    recipient=recipient_wallet.user.name,
-                    recipient_wallet=recipient_wallet,
-                    type='transfer_out',
-                    status='completed',
-                    source='wallet',
-                    amount=amount,
-                    narration=narration or f"Transfer to {recipient_wallet.user.name}"
-                )
-
-                recipient_transaction =  Transaction.objects.create(
-                    sender=self.user.name,
-                    sender_wallet=self,
-                    recipient=recipient_wallet.user.name,
-                    recipient_wallet=recipient_wallet,
-                    type='transfer_in',
-                    status='completed',
-                    source='wallet',
-                    amount=amount,
-                    narration=narration or f"Transfer from {self.user.name}"
-                )
-                
-                try:
-                    self.apply_transaction(sender_transaction)
-                    recipient_wallet.apply_transaction(recipient_transaction)
-                    return True
-                except Exception as e:
-                    # Because of atomic block, DB changes will be rolled back automatically
-                    raise ValidationError(f"Failed to complete transaction: {str(e)}")
-        else:
-            raise ValidationError("Insufficient funds to complete this transaction.")
-        return False
+        # the balance check happens inside the ledger while both wallet rows
+        # are locked, so concurrent debits cannot overdraw the sender
+        from wallet import ledger
+        with transaction.atomic():
+            sender_transaction =  Transaction.objects.create(
+                sender=self.user.name,
+                sender_wallet=self,
+                recipient=recipient_wallet.user.name,
+                recipient_wallet=recipient_wallet,
+                type='transfer_out',
+                status='completed',
+                source='wallet',
+                amount=amount,
+                narration=narration or f"Transfer to {recipient_wallet.user.name}"
+            )
+
+            recipient_transaction =  Transaction.objects.create(
+                sender=self.user.name,
+                sender_wallet=self,
+                recipient=recipient_wallet.user.name,
+                recipient_wallet=recipient_wallet,
+                type='transfer_in',
+                status='completed',
+                source='wallet',
+                amount=amount,
+                narration=narration or f"Transfer from {self.user.name}"
+            )
+
+            ledger.transfer(self, recipient_wallet, amount, transaction=sender_transaction,
+                            narration=sender_transaction.narration)
+            self.transactions.add(sender_transaction)
+            recipient_wallet.transactions.add(recipient_transaction)
+        return True
 
 
     def withdraw(self, amount, payout_info, narration=None):
@@ -262,11 +254,99 @@ class Transaction(DbModel):
         ordering = ['-date_created']
         verbose_name = 'Transaction'
         verbose_name_plural = 'Transactions'
-    
 
 
+class LedgerAccount(DbModel):
+    """
+    An account in the double-entry ledger. Every user wallet has one; the
+    system accounts (funding, escrow, platform fees, payouts, adjustments)
+    are the counter-parties of money entering, held by or leaving Veyu.
+    """
+    ACCOUNT_TYPES = {
+        'wallet': 'User Wallet',
+        'funding': 'Funding', # money coming in from cards, bank transfers, etc
+        'escrow': 'Escrow', # payments held until the service is settled
+        'platform_fee': 'Platform Fees', # veyu's share of payments and charges
+        'payout': 'Payouts', # money leaving to local banks
+        'adjustment': 'Adjustments', # manual corrections by admins
+    }
+
+    code = models.CharField(max_length=100, unique=True) # e.g wallet:12, escrow:NGN
+    account_type = models.CharField(max_length=20, choices=ACCOUNT_TYPES)
+    # kept when the wallet is deleted so its postings stay balanced
+    wallet = models.OneToOneField(Wallet, null=True, blank=True, on_delete=models.SET_NULL, related_name='ledger_account')
+    currency = models.CharField(max_length=4, default="NGN")
+
+    def __str__(self):
+        return f"{self.get_account_type_display()} ({self.code})"
+
+    def __repr__(self):
+        return f"<LedgerAccount: {self.code}>"
+
+    @property
+    def posted_balance(self):
+        """Sum of all postings to this account"""
+        total = self.postings.aggregate(total=models.Sum('amount'))['total']
+        return total or Decimal('0.00')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['account_type']),
+        ]
+        verbose_name = 'Ledger Account'
+        verbose_name_plural = 'Ledger Accounts'
 
 
+class JournalEntry(DbModel):
+    """A single money movement; its postings always sum to zero."""
+    ENTRY_KINDS = {
+        'opening': 'Opening Balance',
+        'deposit': 'Deposit',
+        'transfer': 'Transfer',
+        'payment': 'Payment',
+        'charge': 'Charge',
+        'withdrawal': 'Withdrawal',
+        'revenue_share': 'Revenue Share',
+        'adjustment': 'Adjustment',
+    }
 
+    kind = models.CharField(max_length=20, choices=ENTRY_KINDS)
+    # idempotency key, e.g tx:<transaction>:<wallet>; posting the same reference twice is a no-op
+    reference = models.CharField(max_length=100, unique=True, null=True, blank=True)
+    narration = models.CharField(max_length=200, blank=True, default='')
+    transaction = models.ForeignKey(Transaction, null=True, blank=True, on_delete=models.SET_NULL, related_name='journal_entries')
 
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.id} ({self.date_created.strftime('%d/%m/%Y %H:%M')})"
+
+    def __repr__(self):
+        return f"<JournalEntry: {self.kind} - {self.reference}>"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['kind']),
+            models.Index(fields=['date_created']),
+        ]
+        ordering = ['-date_created']
+        verbose_name = 'Journal Entry'
+        verbose_name_plural = 'Journal Entries'
+
+
+class Posting(DbModel):
+    """One leg of a journal entry: credits are positive, debits negative."""
+    entry = models.ForeignKey(JournalEntry, on_delete=models.CASCADE, related_name='postings')
+    account = models.ForeignKey(LedgerAccount, on_delete=models.PROTECT, related_name='postings')
+    amount = models.DecimalField(max_digits=20, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.account.code}: {self.amount:+,.2f}"
+
+    def __repr__(self):
+        return f"<Posting: {self.account_id} {self.amount}>"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['account']),
+        ]
+        verbose_name = 'Posting'
+        verbose_name_plural = 'Postings'
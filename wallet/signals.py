@@ -60,6 +60,7 @@ def transaction_post_save(sender, instance, created, **kwargs):
             level=level,
             cta_text='View Transaction',
             cta_link=cta_link,
+            category='wallet',
         )
         notified_users.add(sender_user.pk)
 
@@ -77,6 +78,7 @@ def transaction_post_save(sender, instance, created, **kwargs):
             level='success',
             cta_text='View Transaction',
             cta_link='/wallet/transactions',
+            category='wallet',
         )
         notified_users.add(recipient_user.pk)
 
@@ -88,4 +90,5 @@ def transaction_post_save(sender, instance, created, **kwargs):
             level=level,
             cta_text='View Transaction',
             cta_link=cta_link,
+            category='wallet',
         )
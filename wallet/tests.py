@@ -1,5 +1,163 @@
-from django.test import TestCase
+import random
+import threading
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase
 
+from wallet import ledger
+from wallet.models import JournalEntry, Posting, Transaction, Wallet
 
+User = get_user_model()
+
+
+def make_wallet(email, balance=0):
+    wallet = User.objects.create_user(email=email, password='testpass123').user_wallet
+    if balance:
+        ledger.deposit(wallet, balance, narration='Test funding')
+    wallet.refresh_from_db()
+    return wallet
+
+
+class LedgerInvariantsMixin:
+
+    def assertLedgerBalanced(self):
+        unbalanced = JournalEntry.objects.annotate(total=Sum('postings__amount')).exclude(total=0)
+        self.assertFalse(unbalanced.exists())
+        self.assertEqual(Posting.objects.aggregate(total=Sum('amount'))['total'] or 0, 0)
+        self.assertFalse(Wallet.objects.filter(ledger_balance__lt=0).exists())
+        self.assertEqual(ledger.reconcile(), {'unbalanced_entries': [], 'mismatches': []})
+
+
+class LedgerTestCase(LedgerInvariantsMixin, TestCase):
+
+    def setUp(self):
+        self.alice = make_wallet('alice@example.com', 1000)
+        self.bob = make_wallet('bob@example.com')
+
+    def test_deposit_posts_against_funding(self):
+        self.assertEqual(self.alice.ledger_balance, Decimal('1000.00'))
+        self.assertEqual(ledger.system_account('funding').posted_balance, Decimal('-1000.00'))
+        self.assertLedgerBalanced()
+
+    def test_transfer_moves_funds(self):
+        self.assertTrue(self.alice.transfer(Decimal('250.50'), self.bob))
+        self.alice.refresh_from_db()
+        self.bob.refresh_from_db()
+        self.assertEqual(self.alice.ledger_balance, Decimal('749.50'))
+        self.assertEqual(self.bob.ledger_balance, Decimal('250.50'))
+        self.assertEqual(self.alice.transactions.get().type, 'transfer_out')
+        self.assertEqual(self.bob.transactions.get().type, 'transfer_in')
+        self.assertLedgerBalanced()
+
+    def test_overdraft_rejected_and_nothing_written(self):
+        entries = JournalEntry.objects.count()
+        with self.assertRaises(ledger.InsufficientFunds):
+            self.alice.transfer(Decimal('1000.01'), self.bob)
+        self.alice.refresh_from_db()
+        self.assertEqual(self.alice.ledger_balance, Decimal('1000.00'))
+        self.assertEqual(JournalEntry.objects.count(), entries)
+        self.assertFalse(Transaction.objects.filter(type='transfer_out').exists())
+
+    def test_held_amount_cannot_be_spent(self):
+        pending = Transaction.objects.create(sender_wallet=self.alice, type='withdraw', amount=800, status='pending')
+        self.alice.transactions.add(pending)
+        self.assertEqual(self.alice.balance, Decimal('200.00'))
+        with self.assertRaises(ledger.InsufficientFunds):
+            ledger.pay(self.alice, 300)
+        ledger.pay(self.alice, 200)
+        self.assertEqual(self.alice.ledger_balance, Decimal('800.00'))
+
+    def test_unbalanced_entry_rejected(self):
+        with self.assertRaises(ledger.UnbalancedEntry):
+            ledger.post_entry('adjustment', [(self.alice, 10), ('adjustment', -9)])
+
+    def test_apply_transaction_is_idempotent(self):
+        charge = Transaction.objects.create(sender_wallet=self.alice, type='charge', amount=100, status='completed')
+        self.alice.apply_transaction(charge)
+        self.alice.apply_transaction(charge)
+        self.assertEqual(self.alice.ledger_balance, Decimal('900.00'))
+        self.assertEqual(ledger.system_account('platform_fee').posted_balance, Decimal('100.00'))
+        self.assertLedgerBalanced()
+
+    def test_reconcile_fix_restores_posted_balance(self):
+        Wallet.objects.filter(pk=self.bob.pk).update(ledger_balance=Decimal('5.00'))
+        result = ledger.reconcile()
+        self.assertEqual(result['mismatches'], [(self.bob.pk, Decimal('5.00'), Decimal('0.00'))])
+        call_command('reconcile_ledger', '--fix', stdout=open('/dev/null', 'w'))
+        self.bob.refresh_from_db()
+        self.assertEqual(self.bob.ledger_balance, Decimal('0.00'))
+        self.assertLedgerBalanced()
+
+    def test_randomized_operations_keep_ledger_balanced(self):
+        # property-style: seeded random operation sequences against a simple model
+        wallets = [self.alice, self.bob] + [make_wallet(f'user{i}@example.com', 200) for i in range(4)]
+        expected = {wallet.pk: wallet.ledger_balance for wallet in wallets}
+        for seed in range(5):
+            rng = random.Random(seed)
+            for _ in range(60):
+                wallet, other = rng.sample(wallets, 2)
+                amount = Decimal(rng.randint(1, 40000)) / 100
+                operation = rng.choice(['deposit', 'transfer', 'pay', 'withdraw', 'adjust'])
+                if operation == 'adjust' and rng.random() < 0.5:
+                    amount = -amount
+                debit = amount if operation in ('transfer', 'pay', 'withdraw') else -min(amount, 0)
+                try:
+                    if operation == 'transfer':
+                        ledger.transfer(wallet, other, amount)
+                        expected[other.pk] += amount
+                    else:
+                        getattr(ledger, operation)(wallet, amount)
+                except ledger.InsufficientFunds:
+                    self.assertGreater(debit, expected[wallet.pk])
+                    continue
+                self.assertLessEqual(debit, expected[wallet.pk])
+                expected[wallet.pk] += -amount if operation in ('transfer', 'pay', 'withdraw') else amount
+            for wallet in wallets:
+                wallet.refresh_from_db()
+                self.assertEqual(wallet.ledger_balance, expected[wallet.pk])
+            self.assertLedgerBalanced()
+
+
+class LedgerConcurrencyTestCase(LedgerInvariantsMixin, TransactionTestCase):
+    """Randomized concurrent transfers must never overdraw or create money."""
+
+    THREADS = 8
+    PER_THREAD = 300
+
+    def test_concurrent_transfers(self):
+        wallets = [make_wallet(f'user{i}@example.com', 500) for i in range(6)]
+        total = sum(wallet.ledger_balance for wallet in wallets)
+        errors, completed = [], []
+
+        def worker(index):
+            rng = random.Random(index)
+            done = 0
+            try:
+                for _ in range(self.PER_THREAD):
+                    sender, recipient = rng.sample(wallets, 2)
+                    try:
+                        ledger.transfer(sender, recipient, Decimal(rng.randint(1, 30000)) / 100)
+                        done += 1
+                    except ledger.InsufficientFunds:
+                        pass
+            except Exception as e:  # surfaced by the assertion below
+                errors.append(e)
+            finally:
+                completed.append(done)
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertGreater(sum(completed), 0)
+        self.assertEqual(JournalEntry.objects.filter(kind='transfer').count(), sum(completed))
+        self.assertEqual(Wallet.objects.filter(pk__in=[w.pk for w in wallets]).aggregate(total=Sum('ledger_balance'))['total'], total)
+        self.assertLedgerBalanced()
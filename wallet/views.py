@@ -11,6 +11,7 @@ from django.db.models import Q
 from django.utils import timezone
 from .models import Wallet, Transaction
 from accounts.models import Mechanic, Dealer, Customer
+from utils.exports import customer_transactions
 from decouple import config
 from drf_yasg import openapi
 from .serializers import *
@@ -170,17 +171,10 @@ class TransactionsView(APIView):
         from django.db.models import Sum
 
         wallet = get_object_or_404(Wallet, user=request.user)
-        related_non_wallet_filter = (
-            Q(related_order__customer__user=request.user) |
-            Q(related_booking__customer__user=request.user) |
-            Q(related_inspection__customer__user=request.user)
-        ) & Q(recipient_wallet__isnull=True)
-        user_transaction_filter = (
-            Q(sender_wallet__user=request.user) |
-            Q(recipient_wallet__user=request.user) |
-            related_non_wallet_filter
-        )
-        
+        # id subqueries rather than OR-ed joins: every path is to-one, so no
+        # .distinct() is needed and each branch can use its own index
+        user_transaction_filter = customer_transactions(request.user)
+
         # Get all transactions where the user is either the sender or the recipient, regardless of wallet.
         transactions = Transaction.objects.filter(
             user_transaction_filter
@@ -190,7 +184,7 @@ class TransactionsView(APIView):
             'related_order',
             'related_booking',
             'related_inspection'
-        ).order_by('-date_created').distinct()
+        ).order_by('-date_created')
         
         # Apply filters
         transaction_type = request.GET.get('type')
@@ -229,28 +223,20 @@ class TransactionsView(APIView):
         total_count = transactions.count()
         transactions = transactions[offset:offset + limit]
         
-        # Calculate summary statistics
-        all_user_transactions = Transaction.objects.filter(user_transaction_filter).distinct()
-        
-        total_deposits = all_user_transactions.filter(
-            type='deposit', status='completed'
-        ).aggregate(Sum('amount'))['amount__sum'] or 0
-        
-        total_withdrawals = all_user_transactions.filter(
-            type='withdraw', status='completed'
-        ).aggregate(Sum('amount'))['amount__sum'] or 0
-        
-        total_payments = all_user_transactions.filter(
-            type='payment', status='completed'
-        ).aggregate(Sum('amount'))['amount__sum'] or 0
-        
-        total_received = all_user_transactions.filter(
-            type='transfer_in', status='completed'
-        ).aggregate(Sum('amount'))['amount__sum'] or 0
-        
-        total_sent = all_user_transactions.filter(
-            type='transfer_out', status='completed'
-        ).aggregate(Sum('amount'))['amount__sum'] or 0
+        # Calculate summary statistics in one pass
+        completed = Q(status='completed')
+        totals = Transaction.objects.filter(user_transaction_filter).aggregate(
+            total_deposits=Sum('amount', filter=completed & Q(type='deposit')),
+            total_withdrawals=Sum('amount', filter=completed & Q(type='withdraw')),
+            total_payments=Sum('amount', filter=completed & Q(type='payment')),
+            total_received=Sum('amount', filter=completed & Q(type='transfer_in')),
+            total_sent=Sum('amount', filter=completed & Q(type='transfer_out')),
+        )
+        total_deposits = totals['total_deposits'] or 0
+        total_withdrawals = totals['total_withdrawals'] or 0
+        total_payments = totals['total_payments'] or 0
+        total_received = totals['total_received'] or 0
+        total_sent = totals['total_sent'] or 0
         summary = {
             'total_deposits': float(total_deposits),
             'total_withdrawals': float(total_withdrawals),